@@ -280,8 +280,26 @@ def _seed_admin_if_empty():
         db.session.rollback()
 
 
-def _ensure_vehicle_monthly_fixed_cost_column():
-    """Ensure vehicle.monthly_fixed_cost exists in SQLite databases."""
+# أعمدة أُضيفت لجداول موجودة (create_all لا يضيف أعمدة لجداول موجودة)
+_PATCH_COLUMNS = {
+    "vehicle": {
+        "monthly_fixed_cost": "FLOAT DEFAULT 0",
+        "next_expiry_date": "DATE",
+        "expired_docs_mask": "INTEGER NOT NULL DEFAULT 0",
+        "compliance_checked_on": "DATE",
+    },
+    "sim_cards": {
+        "renewal_date": "DATE",
+    },
+}
+_PATCH_INDEXES = {
+    ("vehicle", "next_expiry_date"): "ix_vehicle_next_expiry_date",
+    ("vehicle", "expired_docs_mask"): "ix_vehicle_expired_docs_mask",
+}
+
+
+def _ensure_patched_columns():
+    """Ensure columns added after table creation exist in SQLite databases."""
     database_uri = app.config.get("SQLALCHEMY_DATABASE_URI", "")
     if not database_uri.startswith("sqlite:///"):
         return
@@ -297,20 +315,26 @@ def _ensure_vehicle_monthly_fixed_cost_column():
     try:
         conn = sqlite3.connect(db_path)
         cur = conn.cursor()
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='vehicle'")
-        if not cur.fetchone():
-            return
-
-        cur.execute("PRAGMA table_info(vehicle)")
-        existing_columns = {row[1] for row in cur.fetchall()}
-        if "monthly_fixed_cost" in existing_columns:
-            return
-
-        cur.execute("ALTER TABLE vehicle ADD COLUMN monthly_fixed_cost FLOAT DEFAULT 0")
-        conn.commit()
-        logger.warning("Patched SQLite schema: added vehicle.monthly_fixed_cost")
+        for table, columns in _PATCH_COLUMNS.items():
+            cur.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table,))
+            if not cur.fetchone():
+                continue
+
+            cur.execute(f"PRAGMA table_info({table})")
+            existing_columns = {row[1] for row in cur.fetchall()}
+            missing = [name for name in columns if name not in existing_columns]
+            if not missing:
+                continue
+
+            for name in missing:
+                cur.execute(f"ALTER TABLE {table} ADD COLUMN {name} {columns[name]}")
+                index_name = _PATCH_INDEXES.get((table, name))
+                if index_name:
+                    cur.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({name})")
+            conn.commit()
+            logger.warning(f"Patched SQLite schema: added {table} columns {', '.join(missing)}")
     except Exception as e:
-        logger.warning(f"Failed to patch vehicle.monthly_fixed_cost column: {e}")
+        logger.warning(f"Failed to patch SQLite columns: {e}")
     finally:
         if conn is not None:
             conn.close()
@@ -335,23 +359,15 @@ with app.app_context():
 
     @app.route('/static/uploads/<path:filename>')
     def static_uploaded_file(filename):
-        from flask import send_from_directory, abort, Response
-        from werkzeug.security import safe_join
+        from flask import send_from_directory, abort, Response, request
         from utils.storage_helper import download_image
+        from infrastructure.storage.upload_delivery import resolve_upload, send_upload, uploads_root as _uploads_root
         import os
 
-        uploads_root = app.config.get("UPLOAD_FOLDER", os.path.join(app.root_path, "static", "uploads"))
-
-        safe_path = safe_join(uploads_root, filename)
-        if safe_path is None:
-            abort(404)
-
-        resolved = os.path.realpath(safe_path)
-        if not resolved.startswith(os.path.realpath(uploads_root) + os.sep):
-            abort(404)
-
-        if os.path.isfile(resolved):
-            return send_from_directory(os.path.dirname(resolved), os.path.basename(resolved))
+        uploads_root = _uploads_root()
+        resolved = resolve_upload(uploads_root, filename)
+        if resolved:
+            return send_upload(resolved, uploads_root, width=request.args.get("w", type=int))
 
         image_data = download_image(filename)
         if image_data:
@@ -414,17 +430,72 @@ with app.app_context():
     logger.info("Creating database tables...")
     try:
         db.create_all()
-        _ensure_vehicle_monthly_fixed_cost_column()
+        _ensure_patched_columns()
         logger.info("Database tables created successfully.")
     except Exception as e:
         logger.info(f"Database tables already exist: {str(e)}")
 
+    # فهرس البحث الموحد (FTS5 / pg_trgm) وأحداث تحديثه؛ البناء الأولي مهمة واحدة في الطابور
+    try:
+        from modules.search.application.search_service import init_search
+        init_search(app)
+    except Exception as e:
+        logger.warning(f"Search index not initialized: {e}")
+
+    # تقويم الانتهاء الموحد (مستندات، مركبات، شرائح) وأحداث تحديثه
+    from modules.expiry.application.expiry_calendar_service import init_expiry_calendar
+    init_expiry_calendar(app)
+
+    # دفتر عقود العقارات (جدول الأقساط وحالات العقود) وأحداث تحديثه
+    from modules.properties.application.property_ledger_service import init_property_ledger
+    init_property_ledger(app)
+
+    # العهدة الحالية للمركبات (آخر تسليم معتمد لكل مركبة) وأحداث تحديثها
+    from modules.vehicles.application.vehicle_custody_service import init_vehicle_custody
+    init_vehicle_custody(app)
+
+    # تقويم العمل المشترك (أيام الراحة والعطل الرسمية) للإجازات والحضور والرواتب
+    from modules.business_calendar.application.business_calendar_service import init_business_calendar
+    init_business_calendar(app)
+
+    # قياسات الأسطول اليومية من سجل المواقع وتسوية الوقود (أمر CLI؛ الجدولة في core.scheduler)
+    from modules.vehicles.application.fleet_telemetry_service import init_fleet_telemetry
+    init_fleet_telemetry(app)
+
+    # نموذج عرض بوابة الموظف (استعلامات مجمعة وذاكرة لكل موظف تُمسح عند حفظ السجلات المعروضة)
+    from modules.employees.application.portal_view_service import init_employee_portal
+    init_employee_portal(app)
+
+    # خط تسجيل الحضور من الجوال (ذاكرة مناطق العمل تُمسح عند تعديل المناطق أو تعيينها)
+    from modules.attendance.application.check_in_pipeline import init_check_in_pipeline
+    init_check_in_pipeline(app)
+
     _seed_admin_if_empty()
 
+# الملفات الثابتة المبصومة ونسخها المضغوطة مسبقاً (static/dist/manifest.json من flask assets-build)
+from core.static_assets import init_static_assets
+init_static_assets(app)
+
+# تسليم ملفات static/uploads: ETag/Range، إحالة البث للوكيل الأمامي، ونسخ مصغرة (upload_url في القوالب)
+from infrastructure.storage.upload_delivery import init_upload_delivery
+init_upload_delivery(app)
+
+# مُحلل SQL لكل طلب (Server-Timing + كشف N+1 على عينة من الطلبات)
+from core.sql_profiler import init_sql_profiler
+init_sql_profiler(app)
+
+# طابور المهام الخلفية (مجموعة عمال ثابتة الحجم + flask jobs-worker)
+from modules.jobs.application.job_queue import init_jobs
+init_jobs(app)
+
 # Register database backup blueprint OUTSIDE app_context to avoid Flask reloader issues
 app.register_blueprint(database_backup_bp, url_prefix='/backup')
 logger.info("Database backup blueprint registered successfully at /backup")
 
+from services.backup_stream_service import db_backup_command, db_restore_command
+app.cli.add_command(db_backup_command)
+app.cli.add_command(db_restore_command)
+
 @app.before_request
 def before_request():
     # تعيين اللغة الافتراضية للعربية
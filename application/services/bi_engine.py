@@ -14,7 +14,7 @@ from core.extensions import db
 from models import (
     Employee, Vehicle, Salary, Department, Attendance, 
     VehicleWorkshop, VehicleAccident, Document, Project,
-    VehicleProject, RentalProperty
+    VehicleProject, RentalProperty, VehicleTelemetryDaily
 )
 
 
@@ -416,6 +416,36 @@ class BIEngine:
         
         return attendance_facts
     
+    def get_fact_vehicle_telemetry(self, start_date: date = None, end_date: date = None) -> List[Dict[str, Any]]:
+        """
+        FACT_VehicleTelemetry: جدول حقائق قياسات الأسطول اليومية
+        يُقرأ من التجميع اليومي لكل مركبة (vehicle_telemetry_daily) لا من نقاط المواقع الخام
+        """
+        if not start_date:
+            start_date = date(self.current_year, 1, 1)
+        if not end_date:
+            end_date = self.today
+        
+        rows = VehicleTelemetryDaily.query.filter(
+            VehicleTelemetryDaily.day >= start_date,
+            VehicleTelemetryDaily.day <= end_date
+        ).order_by(VehicleTelemetryDaily.day, VehicleTelemetryDaily.vehicle_id).all()
+        
+        return [{
+            'date_key': int(row.day.strftime('%Y%m%d')),
+            'vehicle_key': row.vehicle_id,
+            'distance_km': round(row.distance_km or 0, 2),
+            'driving_hours': round((row.driving_seconds or 0) / 3600, 2),
+            'idle_hours': round((row.idle_seconds or 0) / 3600, 2),
+            'speeding_events': row.speeding_events or 0,
+            'max_speed_kmh': round(row.max_speed_kmh or 0, 1),
+            'fuel_liters': round(row.fuel_liters or 0, 2),
+            'fuel_cost': round(row.fuel_cost or 0, 2),
+            'odometer_delta_km': row.odometer_delta_km,
+            'km_per_liter': row.km_per_liter,
+            'fuel_anomaly': row.anomaly or '',
+        } for row in rows]
+    
     def get_kpi_summary(self) -> Dict[str, Any]:
         """
         الحصول على ملخص KPIs الرئيسية
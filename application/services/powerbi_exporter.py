@@ -198,6 +198,28 @@ class PowerBIExporter:
         self._auto_size_columns(sheet)
         sheet.freeze_panes = 'A2'
     
+    def add_fact_vehicle_telemetry_sheet(self):
+        """إضافة ورقة FACT_VehicleTelemetry"""
+        data = bi_engine.get_fact_vehicle_telemetry()
+        
+        if not data:
+            return
+        
+        df = pd.DataFrame(data)
+        sheet = self.workbook.create_sheet('FACT_VehicleTelemetry')
+        
+        for col_num, column_title in enumerate(df.columns, 1):
+            cell = sheet.cell(row=1, column=col_num)
+            cell.value = column_title
+        
+        for row_num, row_data in enumerate(df.values, 2):
+            for col_num, value in enumerate(row_data, 1):
+                sheet.cell(row=row_num, column=col_num, value=value)
+        
+        self._style_header_row(sheet)
+        self._auto_size_columns(sheet)
+        sheet.freeze_panes = 'A2'
+    
     def add_kpi_summary_sheet(self):
         """إضافة ورقة KPI Summary"""
         kpis = bi_engine.get_kpi_summary()
@@ -248,6 +270,7 @@ class PowerBIExporter:
             'FACT_Financials: Financial facts (salaries, bonuses, costs)',
             'FACT_Maintenance: Maintenance facts',
             'FACT_Attendance: Attendance facts',
+            'FACT_VehicleTelemetry: Daily vehicle distance, driving time and fuel facts',
             'KPI_Summary: Key Performance Indicators'
         ]
         
@@ -274,6 +297,7 @@ class PowerBIExporter:
         self.add_fact_financials_sheet()
         self.add_fact_maintenance_sheet()
         self.add_fact_attendance_sheet()
+        self.add_fact_vehicle_telemetry_sheet()
         self.add_kpi_summary_sheet()
         
         # حفظ في الذاكرة
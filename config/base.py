@@ -25,6 +25,69 @@ class BaseConfig:
     REDIS_URL = os.environ.get("REDIS_URL") or "redis://localhost:6379/0"
     CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL") or "redis://localhost:6379/1"
 
+    # التخزين المؤقت داخل العملية (عند غياب Redis): أقصى عدد مفاتيح قبل حذف الأقل استخداماً
+    MEMORY_CACHE_MAX_ENTRIES = int(os.environ.get("MEMORY_CACHE_MAX_ENTRIES", "1024"))
+
+    # طابور المهام الخلفية: عدد العمال في كل عملية (0 = التشغيل عبر flask jobs-worker فقط)
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+
+    # حزم مشاركة العمليات المخزنة: الحد الأقصى للحجم الكلي (MB) وعمر الحزمة غير المستخدمة (أيام)
+    SHARE_PACKAGE_CACHE_MAX_BYTES = int(os.environ.get("SHARE_PACKAGE_CACHE_MAX_MB", "512")) * 1024 * 1024
+    SHARE_PACKAGE_CACHE_MAX_AGE = int(os.environ.get("SHARE_PACKAGE_CACHE_MAX_DAYS", "7")) * 24 * 3600
+
+    # طابور الرفع إلى Google Drive: أقصى عدد ملفات تُرفع بالتوازي في العملية
+    DRIVE_UPLOAD_WORKERS = int(os.environ.get("DRIVE_UPLOAD_WORKERS", "3"))
+
+    # ذاكرة هوية JWT لواجهات الجوال: عمر المدخل (ثوانٍ) وعدد المدخلات في كل عملية
+    PRINCIPAL_CACHE_TTL = int(os.environ.get("PRINCIPAL_CACHE_TTL", "60"))
+    PRINCIPAL_CACHE_SIZE = int(os.environ.get("PRINCIPAL_CACHE_SIZE", "2048"))
+
+    # مُحلل SQL لكل طلب: Server-Timing لكل الطلبات، وتجميع الأشكال وكشف N+1 لعينة منها
+    SQL_PROFILE_ENABLED = os.environ.get("SQL_PROFILE_ENABLED", "1") == "1"
+    SQL_PROFILE_SAMPLE_RATE = float(os.environ.get("SQL_PROFILE_SAMPLE_RATE", "0.05"))
+    SQL_PROFILE_NPLUS1_THRESHOLD = int(os.environ.get("SQL_PROFILE_NPLUS1_THRESHOLD", "5"))
+    SQL_PROFILE_LOG_QUERIES = int(os.environ.get("SQL_PROFILE_LOG_QUERIES", "50"))
+
+    # تقويم العمل: أيام الراحة الأسبوعية العامة (0 = الإثنين، 4,5 = الجمعة والسبت) وعمر ذاكرة القواعد (ثوانٍ)
+    BUSINESS_WEEKEND_DAYS = os.environ.get("BUSINESS_WEEKEND_DAYS", "4,5")
+    BUSINESS_CALENDAR_CACHE_TTL = int(os.environ.get("BUSINESS_CALENDAR_CACHE_TTL", "300"))
+
+    # بوابة الموظف: عمر ذاكرة لوحة المعلومات وصفحة السيارات لكل موظف (ثوانٍ، 0 للتعطيل)
+    EMPLOYEE_PORTAL_CACHE_TTL = int(os.environ.get("EMPLOYEE_PORTAL_CACHE_TTL", "60"))
+
+    # تسجيل الحضور من الجوال: عمر ذاكرة مناطق العمل لكل موظف (ثوانٍ) وعدد خيوط كتابة صور الوجه
+    CHECK_IN_FENCE_CACHE_TTL = int(os.environ.get("CHECK_IN_FENCE_CACHE_TTL", "300"))
+    CHECK_IN_IMAGE_WORKERS = int(os.environ.get("CHECK_IN_IMAGE_WORKERS", "2"))
+
+    # تصدير الحضور إلى Excel: عدد السجلات في كل دفعة تُقرأ من مؤشر الخادم
+    ATTENDANCE_EXPORT_CHUNK_SIZE = int(os.environ.get("ATTENDANCE_EXPORT_CHUNK_SIZE", "5000"))
+
+    # قياسات الأسطول: حد السرعة، سرعة التوقف، أطول انقطاع يُحسب زمنه (ثوانٍ)، نطاق كم/لتر المقبول،
+    # ونسبة السماح بين مسافة GPS وفرق العداد
+    TELEMETRY_SPEED_LIMIT_KMH = float(os.environ.get("TELEMETRY_SPEED_LIMIT_KMH", "120"))
+    TELEMETRY_IDLE_SPEED_KMH = float(os.environ.get("TELEMETRY_IDLE_SPEED_KMH", "5"))
+    TELEMETRY_MAX_GAP_SECONDS = int(os.environ.get("TELEMETRY_MAX_GAP_SECONDS", "600"))
+    TELEMETRY_MIN_KM_PER_LITER = float(os.environ.get("TELEMETRY_MIN_KM_PER_LITER", "4"))
+    TELEMETRY_MAX_KM_PER_LITER = float(os.environ.get("TELEMETRY_MAX_KM_PER_LITER", "25"))
+    TELEMETRY_GPS_TOLERANCE = float(os.environ.get("TELEMETRY_GPS_TOLERANCE", "0.25"))
+
+    # الملفات الثابتة المبصومة (flask assets-build): تفعيل البيان، عمر التخزين في المتصفح (ثوانٍ)،
+    # وأصغر حجم يُبنى له .br/.gz مسبقاً
+    ASSETS_ENABLED = os.environ.get("ASSETS_ENABLED", "1") == "1"
+    ASSETS_MAX_AGE = int(os.environ.get("ASSETS_MAX_AGE", str(365 * 24 * 3600)))
+    ASSETS_COMPRESS_MIN_SIZE = int(os.environ.get("ASSETS_COMPRESS_MIN_SIZE", "1024"))
+
+    # تسليم static/uploads: "" يبث التطبيق، "x-accel" (nginx) أو "x-sendfile" (Apache) يبثه الوكيل،
+    # عمر التخزين في المتصفح (ثوانٍ)، وعروض النسخ المصغرة المسموحة (?w=)
+    UPLOADS_DELIVERY_MODE = os.environ.get("UPLOADS_DELIVERY_MODE", "")
+    UPLOADS_ACCEL_PREFIX = os.environ.get("UPLOADS_ACCEL_PREFIX", "/_uploads_internal/")
+    UPLOADS_MAX_AGE = int(os.environ.get("UPLOADS_MAX_AGE", "86400"))
+    UPLOADS_VARIANT_WIDTHS = os.environ.get("UPLOADS_VARIANT_WIDTHS", "160,320,640,1280")
+
+    # الاستيراد المرحلي (SIM، الأرقام، الأجهزة، المركبات): حجم دفعة الكتابة، وعمر الدفعات غير المعتمدة (ساعات)
+    IMPORT_CHUNK_SIZE = int(os.environ.get("IMPORT_CHUNK_SIZE", "1000"))
+    IMPORT_STAGING_TTL_HOURS = int(os.environ.get("IMPORT_STAGING_TTL_HOURS", "24"))
+
     # Session: استخدام Redis في الإنتاج
     SESSION_TYPE = "redis" if os.environ.get("REDIS_URL") else "filesystem"
 
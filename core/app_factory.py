@@ -54,9 +54,21 @@ def create_app(config_name=None):
     _register_legacy_static(app)
 
     _init_extensions(app)
+    _init_sql_profiler(app)
     _init_redis(app)
     _init_celery(app)
     _register_blueprints(app)
+    _init_search(app)
+    _init_expiry_calendar(app)
+    _init_property_ledger(app)
+    _init_vehicle_custody(app)
+    _init_business_calendar(app)
+    _init_fleet_telemetry(app)
+    _init_employee_portal(app)
+    _init_check_in_pipeline(app)
+    _init_static_assets(app)
+    _init_upload_delivery(app)
+    _init_jobs(app)
     _register_error_handlers(app)
     _register_template_filters(app)
     _register_context_processors(app)
@@ -108,6 +120,118 @@ def _init_celery(app):
         app.celery = None
 
 
+def _init_sql_profiler(app):
+    """مُحلل SQL لكل طلب: ترويسة Server-Timing وكشف N+1 على عينة من الطلبات."""
+    try:
+        from core.sql_profiler import init_sql_profiler
+        init_sql_profiler(app)
+    except Exception as e:
+        app.logger.warning(f"SQL profiler not initialized: {e}")
+
+
+def _init_search(app):
+    """تهيئة فهرس البحث الموحد (FTS5 / pg_trgm) وأحداث تحديثه."""
+    try:
+        from modules.search.application.search_service import init_search
+        with app.app_context():
+            init_search(app)
+    except Exception as e:
+        app.logger.warning(f"Search index not initialized: {e}")
+
+
+def _init_expiry_calendar(app):
+    """تهيئة تقويم الانتهاء الموحد وأحداث تحديثه."""
+    try:
+        from modules.expiry.application.expiry_calendar_service import init_expiry_calendar
+        with app.app_context():
+            init_expiry_calendar(app)
+    except Exception as e:
+        app.logger.warning(f"Expiry calendar not initialized: {e}")
+
+
+def _init_property_ledger(app):
+    """تهيئة دفتر عقود العقارات وأحداث تحديثه."""
+    try:
+        from modules.properties.application.property_ledger_service import init_property_ledger
+        with app.app_context():
+            init_property_ledger(app)
+    except Exception as e:
+        app.logger.warning(f"Property ledger not initialized: {e}")
+
+
+def _init_vehicle_custody(app):
+    """تهيئة جدول العهدة الحالية للمركبات وأحداث تحديثه."""
+    try:
+        from modules.vehicles.application.vehicle_custody_service import init_vehicle_custody
+        with app.app_context():
+            init_vehicle_custody(app)
+    except Exception as e:
+        app.logger.warning(f"Vehicle custody not initialized: {e}")
+
+
+def _init_business_calendar(app):
+    """تهيئة تقويم العمل (أمر البذر ومسح ذاكرة القواعد عند تعديلها)."""
+    try:
+        from modules.business_calendar.application.business_calendar_service import init_business_calendar
+        init_business_calendar(app)
+    except Exception as e:
+        app.logger.warning(f"Business calendar not initialized: {e}")
+
+
+def _init_fleet_telemetry(app):
+    """تسجيل أمر تجميع قياسات الأسطول وتسوية الوقود."""
+    try:
+        from modules.vehicles.application.fleet_telemetry_service import init_fleet_telemetry
+        init_fleet_telemetry(app)
+    except Exception as e:
+        app.logger.warning(f"Fleet telemetry not initialized: {e}")
+
+
+def _init_employee_portal(app):
+    """مسح ذاكرة بوابة الموظف عند حفظ التسليمات والفحوصات والرواتب والحضور."""
+    try:
+        from modules.employees.application.portal_view_service import init_employee_portal
+        init_employee_portal(app)
+    except Exception as e:
+        app.logger.warning(f"Employee portal view not initialized: {e}")
+
+
+def _init_check_in_pipeline(app):
+    """مسح ذاكرة مناطق العمل لتسجيل الحضور من الجوال عند تعديل المناطق أو تعيين الموظفين لها."""
+    try:
+        from modules.attendance.application.check_in_pipeline import init_check_in_pipeline
+        init_check_in_pipeline(app)
+    except Exception as e:
+        app.logger.warning(f"Check-in pipeline not initialized: {e}")
+
+
+def _init_static_assets(app):
+    """روابط الملفات الثابتة المبصومة وخدمتها مضغوطة مسبقاً مع تخزين طويل في المتصفح."""
+    try:
+        from core.static_assets import init_static_assets
+        init_static_assets(app)
+    except Exception as e:
+        app.logger.warning(f"Static assets not initialized: {e}")
+
+
+def _init_upload_delivery(app):
+    """upload_url في القوالب لروابط static/uploads ونسخها المصغرة."""
+    try:
+        from infrastructure.storage.upload_delivery import init_upload_delivery
+        init_upload_delivery(app)
+    except Exception as e:
+        app.logger.warning(f"Upload delivery not initialized: {e}")
+
+
+def _init_jobs(app):
+    """تهيئة طابور المهام الخلفية ومجموعة العمال."""
+    try:
+        from modules.jobs.application.job_queue import init_jobs
+        init_jobs(app)
+    except Exception as e:
+        app.logger.warning(f"Job queue not initialized: {e}")
+
+
 def _register_blueprints(app):
     """تسجيل Blueprints: ويب، API، مصادقة، الموظفين (Vertical Slice)، ثم Legacy."""
     from presentation.web.routes import web_bp
@@ -405,6 +529,12 @@ def _register_template_filters(app):
                 return str(date)
         return default
 
+    @app.template_filter("hijri")
+    def hijri_date_filter(date, format="short"):
+        """التاريخ الهجري (أم القرى) من الجدول المحسوب مسبقاً: short أو full أو iso."""
+        from utils.hijri_table import hijri_filter
+        return hijri_filter(date, format)
+
     @app.template_filter("days_remaining")
     def days_remaining_filter(date, from_date=None):
         """حساب عدد الأيام المتبقية من التاريخ المحدد حتى اليوم."""
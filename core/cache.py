@@ -0,0 +1,133 @@
+"""
+طبقة تخزين مؤقت مشتركة بسيطة (قيم JSON مع مدة صلاحية).
+- Redis عند ضبط REDIS_URL (مشترك بين كل العمليات/العمال).
+- قاموس داخل العملية كبديل عند غياب Redis (بيئة التطوير)، محدود بعدد مفاتيح
+  (MEMORY_CACHE_MAX_ENTRIES) مع حذف المنتهي ثم الأقل استخداماً عند الامتلاء.
+"""
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_MAX_ENTRIES = 1024
+
+
+class MemoryCache:
+    """تخزين مؤقت داخل العملية مع انتهاء صلاحية، آمن للخيوط.
+    عند تجاوز max_entries تُحذف المفاتيح المنتهية ثم الأقل استخداماً، فلا تتراكم المفاتيح التي لا تُقرأ ثانية."""
+
+    def __init__(self, max_entries: int = DEFAULT_MEMORY_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def _store(self, key: str, value: Any, ttl: int) -> None:
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        if len(self._data) > self.max_entries:
+            now = time.monotonic()
+            for expired in [k for k, (_, expires_at) in self._data.items() if expires_at < now]:
+                del self._data[expired]
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value: Any, ttl: int) -> bool:
+        """الكتابة فقط إن لم يكن المفتاح موجوداً (قفل بسيط)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] >= time.monotonic():
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisCache:
+    """نفس واجهة MemoryCache فوق عميل Redis (القيم مخزنة كـ JSON).
+    تعذّر الاتصال بـ Redis يُعامل كغياب للقيمة حتى لا تتعطل الصفحات."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def get(self, key: str) -> Optional[Any]:
+        try:
+            raw = self._client.get(key)
+        except Exception as e:
+            logger.warning(f"Redis cache get failed: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        try:
+            self._client.set(key, json.dumps(value, ensure_ascii=False, default=str), ex=ttl)
+        except Exception as e:
+            logger.warning(f"Redis cache set failed: {e}")
+
+    def add(self, key: str, value: Any, ttl: int) -> bool:
+        try:
+            return bool(self._client.set(key, json.dumps(value, default=str), ex=ttl, nx=True))
+        except Exception as e:
+            logger.warning(f"Redis cache add failed: {e}")
+            return False
+
+    def delete(self, key: str) -> None:
+        try:
+            self._client.delete(key)
+        except Exception as e:
+            logger.warning(f"Redis cache delete failed: {e}")
+
+
+def _redis_client(app):
+    if hasattr(app, "redis"):
+        return app.redis
+    app.redis = None
+    redis_url = app.config.get("REDIS_URL")
+    if redis_url:
+        try:
+            import redis as redis_lib
+            app.redis = redis_lib.from_url(redis_url)
+        except ImportError:
+            pass
+    return app.redis
+
+
+def get_cache(app=None):
+    """التخزين المؤقت المشترك للتطبيق الحالي (يُنشأ مرة واحدة لكل تطبيق)."""
+    app = app or current_app._get_current_object()
+    cache = app.extensions.get("nuzum_cache")
+    if cache is None:
+        client = _redis_client(app)
+        if client is not None:
+            cache = RedisCache(client)
+        else:
+            cache = MemoryCache(int(app.config.get("MEMORY_CACHE_MAX_ENTRIES", DEFAULT_MEMORY_MAX_ENTRIES)))
+        app.extensions["nuzum_cache"] = cache
+    return cache
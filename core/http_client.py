@@ -0,0 +1,244 @@
+"""
+عميل HTTP صادر مشترك للتكاملات الخارجية (ERPNext، واتساب، Resend، SendGrid...).
+- جلسة requests واحدة لكل تكامل مع مجمع اتصالات keep-alive (بدون مصافحة TCP/TLS لكل طلب).
+- حد أقصى للطلبات المتزامنة لكل تكامل.
+- إعادة المحاولة بتأخير أسي عشوائي (jitter) للطلبات المتكررة الأمان فقط (GET/PUT/DELETE...).
+- قاطع دائرة: بعد إخفاقات متتالية تُرفض الطلبات فوراً لفترة تهدئة ثم يُسمح بطلب تجريبي.
+- مدرج زمني للاستجابة لكل تكامل: get_http_metrics().
+الأخطاء كلها من requests.RequestException فتبقى معالجات الاستثناء الحالية صالحة.
+"""
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+# أخطاء النقل التي تُعاد محاولتها؛ بقية أخطاء requests تُحسب فشلاً في القاطع دون إعادة
+RETRY_ERRORS = (requests.ConnectionError, requests.Timeout)
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass(frozen=True)
+class IntegrationConfig:
+    """إعدادات تكامل خارجي واحد."""
+    timeout: float = 30.0
+    max_concurrency: int = 8
+    pool_size: int = 8
+    max_retries: int = 2
+    backoff_base: float = 0.5
+    backoff_max: float = 8.0
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+
+
+INTEGRATIONS: Dict[str, IntegrationConfig] = {
+    "erpnext": IntegrationConfig(timeout=30.0, max_concurrency=4),
+    "whatsapp": IntegrationConfig(timeout=20.0, max_concurrency=8),
+    "resend": IntegrationConfig(timeout=30.0, max_concurrency=8),
+    "sendgrid": IntegrationConfig(timeout=30.0, max_concurrency=8),
+    "replit-connectors": IntegrationConfig(timeout=10.0, max_concurrency=2),
+}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """التكامل معطل مؤقتاً بعد إخفاقات متتالية."""
+
+
+class CircuitBreaker:
+    """قاطع دائرة بسيط: مغلق ← مفتوح (بعد failure_threshold) ← نصف مفتوح (طلب تجريبي واحد)."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_timeout:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at < self.reset_timeout or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class LatencyHistogram:
+    """مدرج زمني تراكمي بحدود ثابتة (بالملّي ثانية)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+
+    def observe(self, elapsed_ms: float, error: bool = False) -> None:
+        index = next((i for i, edge in enumerate(LATENCY_BUCKETS_MS) if elapsed_ms <= edge), len(LATENCY_BUCKETS_MS))
+        with self._lock:
+            self.counts[index] += 1
+            self.total += 1
+            self.sum_ms += elapsed_ms
+            if error:
+                self.errors += 1
+
+    def bump(self, counter: str) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            buckets = {f"le_{edge}": count for edge, count in zip(LATENCY_BUCKETS_MS, self.counts)}
+            buckets["le_inf"] = self.counts[-1]
+            return {
+                "count": self.total,
+                "errors": self.errors,
+                "retries": self.retries,
+                "rejected": self.rejected,
+                "avg_ms": round(self.sum_ms / self.total, 1) if self.total else 0.0,
+                "buckets": buckets,
+            }
+
+
+class OutboundClient:
+    """عميل تكامل واحد: جلسة مُجمّعة + حد تزامن + إعادة محاولة + قاطع دائرة + قياس."""
+
+    def __init__(self, name: str, config: IntegrationConfig):
+        self.name = name
+        self.config = config
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=config.pool_size, pool_maxsize=config.pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.breaker = CircuitBreaker(config.failure_threshold, config.reset_timeout)
+        self.histogram = LatencyHistogram()
+        self._slots = threading.BoundedSemaphore(config.max_concurrency)
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), self.config.backoff_max)
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    def request(self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """مثل requests.request. idempotent=True يسمح بإعادة محاولة POST معروف الأمان (مع مفتاح تكرار من المزود)."""
+        method = method.upper()
+        kwargs.setdefault("timeout", self.config.timeout)
+        retryable = method in IDEMPOTENT_METHODS if idempotent is None else idempotent
+        attempts = 1 + (self.config.max_retries if retryable else 0)
+
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                self.histogram.bump("rejected")
+                raise CircuitOpenError(f"{self.name} circuit is open; skipping {method} {url}")
+
+            response = None
+            error = None
+            with self._slots:
+                started = time.perf_counter()
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except requests.RequestException as exc:
+                    error = exc
+                except BaseException:
+                    # كل محاولة تنتهي بنتيجة في القاطع، وإلا بقيت تجربة نصف الفتح معلّقة ورُفض كل ما بعدها
+                    self.breaker.record_failure()
+                    raise
+                elapsed_ms = (time.perf_counter() - started) * 1000
+
+            failed = error is not None or response.status_code >= 500 or response.status_code == 429
+            self.histogram.observe(elapsed_ms, error=failed)
+            if failed:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+
+            should_retry = attempt + 1 < attempts and (
+                isinstance(error, RETRY_ERRORS) if error is not None else response.status_code in RETRY_STATUSES
+            )
+            if not should_retry:
+                if error is not None:
+                    raise error
+                return response
+
+            self.histogram.bump("retries")
+            delay = self._backoff(attempt, response)
+            logger.info(f"Retrying {self.name} {method} in {delay:.2f}s (attempt {attempt + 2}/{attempts})")
+            time.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def close(self) -> None:
+        self.session.close()
+
+
+_clients: Dict[str, OutboundClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_http_client(name: str) -> OutboundClient:
+    """العميل المشترك لتكامل معين (يُنشأ مرة واحدة لكل عملية)."""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                client = OutboundClient(name, INTEGRATIONS.get(name, IntegrationConfig()))
+                _clients[name] = client
+    return client
+
+
+def get_http_metrics() -> Dict[str, Dict]:
+    """زمن الاستجابة وحالة القاطع لكل تكامل مستخدم في هذه العملية."""
+    return {
+        name: dict(client.histogram.snapshot(), circuit=client.breaker.state)
+        for name, client in sorted(_clients.items())
+    }
+
+
+def reset_http_clients() -> None:
+    """إغلاق الجلسات وإزالة العملاء (للاختبارات أو بعد fork)."""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
@@ -27,6 +27,14 @@ def init_filters(app):
             return date.strftime(format)
         return default
 
+    @app.template_filter('hijri')
+    def hijri_date_filter(date, format='short'):
+        """
+        التاريخ الهجري (أم القرى) من الجدول المحسوب مسبقاً: short أو full أو iso
+        """
+        from utils.hijri_table import hijri_filter
+        return hijri_filter(date, format)
+
     @app.template_filter('days_remaining')
     def days_remaining_filter(date, from_date=None):
         """
@@ -0,0 +1,15 @@
+"""
+أدوات مشتركة لمستمعي أحداث النماذج التي تُبقي جداول مشتقة متزامنة مع مصدرها
+(فهرس البحث، تقويم الانتهاء، العهدة الحالية، دفتر العقود).
+المستمعون يكتبون على نفس اتصال الـ flush فتُحفظ تحديثاتهم مع المعاملة أو تُلغى معها؛
+التحديثات الجماعية (query.update/delete والإدراج الجماعي) لا تطلقهم وتحتاج أمر إعادة البناء الخاص بكل جدول.
+"""
+from typing import Iterable
+
+from sqlalchemy import inspect
+
+
+def columns_changed(target, columns: Iterable[str]) -> bool:
+    """هل تغيّر أحد الأعمدة في الكائن ضمن الـ flush الحالي (لتجاهل الحفظ الذي لا يمس الجدول المشتق)."""
+    state = inspect(target)
+    return any(state.attrs[c].history.has_changes() for c in columns)
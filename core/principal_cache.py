@@ -0,0 +1,259 @@
+"""
+ذاكرة الهوية المصادق عليها لواجهات الجوال (JWT).
+- LRU داخل العملية بمدة صلاحية: التوكن → (claims، لقطة الموظف) فلا يُفك التوكن ولا يُستعلم عن الموظف لكل طلب.
+- صلاحية المدخل = الأقل من PRINCIPAL_CACHE_TTL وانتهاء التوكن نفسه.
+- أي تغيير على حالة الموظف أو قسمه أو رقمه يُسقط مدخلاته (أحداث SQLAlchemy بعد الحفظ).
+- الإبطال محلي للعملية؛ العمليات الأخرى تلتقط التغيير بعد انتهاء TTL على الأكثر.
+- نسبة الإصابة: get_principal_cache_stats() وعبر /api/health/auth-cache.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set, Tuple
+
+import jwt
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, selectinload
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 60
+DEFAULT_SIZE = 2048
+
+# أعمدة الموظف التي تغيّر نتيجة المصادقة أو اللقطة
+_TRACKED_COLUMNS = ("status", "department_id", "employee_id", "name", "job_title")
+_PENDING_KEY = "principal_cache_invalidate"
+
+
+@dataclass(frozen=True)
+class EmployeePrincipal:
+    """لقطة الموظف المصادق عليه — نفس أسماء حقول Employee المستخدمة في مسارات الجوال."""
+    id: int
+    employee_id: str
+    name: str
+    status: Optional[str]
+    department_id: Optional[int]
+    department_ids: Tuple[int, ...]
+    job_title: Optional[str]
+
+    @property
+    def is_active(self) -> bool:
+        return self.status == "active"
+
+    @classmethod
+    def from_employee(cls, employee) -> "EmployeePrincipal":
+        return cls(
+            id=employee.id,
+            employee_id=employee.employee_id,
+            name=employee.name,
+            status=employee.status,
+            department_id=employee.department_id,
+            department_ids=tuple(d.id for d in (employee.departments or [])),
+            job_title=employee.job_title,
+        )
+
+
+class PrincipalCache:
+    """LRU بمدة صلاحية، آمن للخيوط، مع فهرس عكسي من معرف الموظف إلى مفاتيحه."""
+
+    def __init__(self, max_size: int = DEFAULT_SIZE, ttl: int = DEFAULT_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any], EmployeePrincipal]]" = OrderedDict()
+        self._by_employee: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def key_for(secret: str, token: str) -> str:
+        # المفتاح يتضمن السر فلا يُقبل توكن مخزن بعد تغيير SESSION_SECRET
+        return hashlib.sha256(f"{secret}:{token}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], EmployeePrincipal]]:
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1], item[2]
+
+    def put(self, key: str, claims: Dict[str, Any], principal: EmployeePrincipal) -> None:
+        expires_at = time.time() + self.ttl
+        if claims.get("exp"):
+            expires_at = min(expires_at, float(claims["exp"]))
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (expires_at, claims, principal)
+            self._by_employee.setdefault(principal.id, set()).add(key)
+            while len(self._data) > self.max_size:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate_employee(self, employee_pk: int) -> None:
+        with self._lock:
+            keys = self._by_employee.pop(employee_pk, set())
+            for key in keys:
+                self._data.pop(key, None)
+            if keys:
+                self.invalidations += len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._by_employee.clear()
+
+    def _drop(self, key: str) -> None:
+        item = self._data.pop(key, None)
+        if item is None:
+            return
+        keys = self._by_employee.get(item[2].id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_employee[item[2].id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache: Optional[PrincipalCache] = None
+_init_lock = threading.Lock()
+_state = {"listeners": False}
+
+
+def get_principal_cache() -> PrincipalCache:
+    """الذاكرة المشتركة للعملية؛ تُنشأ عند أول استخدام مع تسجيل أحداث الإبطال."""
+    global _cache
+    if _cache is None:
+        with _init_lock:
+            if _cache is None:
+                config = current_app.config
+                if not _state["listeners"]:
+                    _register_listeners()
+                    _state["listeners"] = True
+                _cache = PrincipalCache(
+                    max_size=config.get("PRINCIPAL_CACHE_SIZE", DEFAULT_SIZE),
+                    ttl=config.get("PRINCIPAL_CACHE_TTL", DEFAULT_TTL),
+                )
+    return _cache
+
+
+def reset_principal_cache() -> None:
+    """إسقاط الذاكرة (للاختبارات أو بعد تغيير الإعدادات)."""
+    global _cache
+    _cache = None
+
+
+def get_principal_cache_stats() -> Dict[str, Any]:
+    return get_principal_cache().stats()
+
+
+def resolve_principal(token: str, secret: str) -> Tuple[Dict[str, Any], Optional[EmployeePrincipal]]:
+    """
+    (claims، لقطة الموظف) للتوكن. يرفع jwt.ExpiredSignatureError / jwt.InvalidTokenError كما jwt.decode.
+    اللقطة None إن لم يوجد موظف بالرقم الموجود في التوكن (لا تُخزن النتيجة السلبية).
+    """
+    cache = get_principal_cache()
+    key = cache.key_for(secret, token)
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    from models import Employee
+
+    claims = jwt.decode(token, secret, algorithms=["HS256"])
+    employee = (
+        Employee.query.options(selectinload(Employee.departments))
+        .filter_by(employee_id=claims.get("employee_id"))
+        .first()
+    )
+    if employee is None:
+        return claims, None
+    principal = EmployeePrincipal.from_employee(employee)
+    cache.put(key, claims, principal)
+    return claims, principal
+
+
+# ==================== الإبطال ====================
+
+def _mark(session: Session, employee_pk: Optional[int]) -> None:
+    if employee_pk is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(employee_pk)
+
+
+def _invalidate(pks) -> None:
+    cache = _cache
+    if cache is None:
+        return
+    for pk in pks:
+        cache.invalidate_employee(pk)
+
+
+def _employee_changed(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[c].history.has_changes() for c in _TRACKED_COLUMNS):
+        _invalidate([target.id])
+        _mark(state.session, target.id)
+
+
+def _employee_deleted(mapper, connection, target):
+    _invalidate([target.id])
+    _mark(inspect(target).session, target.id)
+
+
+def _membership_changed(target, value, initiator):
+    # Employee.departments أو Department.employees (نفس الجدول الوسيط)
+    from models import Employee
+
+    employee = target if isinstance(target, Employee) else value
+    _invalidate([employee.id])
+    session = inspect(employee).session
+    if session is not None:
+        _mark(session, employee.id)
+
+
+def _after_commit(session: Session) -> None:
+    # إعادة الإبطال بعد الحفظ: طلب متزامن ربما خزّن اللقطة القديمة قبل اكتمال المعاملة
+    pks = session.info.pop(_PENDING_KEY, None)
+    if pks:
+        _invalidate(pks)
+
+
+def _after_rollback(session: Session, previous_transaction) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _register_listeners() -> None:
+    from models import Department, Employee
+
+    event.listen(Employee, "after_update", _employee_changed)
+    event.listen(Employee, "after_delete", _employee_deleted)
+    for attribute in (Employee.departments, Department.employees):
+        event.listen(attribute, "append", _membership_changed)
+        event.listen(attribute, "remove", _membership_changed)
+    event.listen(Session, "after_commit", _after_commit)
+    event.listen(Session, "after_soft_rollback", _after_rollback)
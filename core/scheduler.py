@@ -7,10 +7,17 @@ from sqlalchemy import update
 logger = logging.getLogger(__name__)
 
 def cleanup_old_location_data(app):
-    """حذف مواقع الموظفين الأقدم من 14 ساعة"""
+    """حذف مواقع الموظفين الأقدم من 14 ساعة (بعد تجميع نقاط المركبات في قياسات الأسطول)"""
     with app.app_context():
         from models import EmployeeLocation
         from core.extensions import db
+        from modules.vehicles.application.fleet_telemetry_service import rollup_locations
+        
+        try:
+            rollup_locations()
+        except Exception as e:
+            # مدة الاحتفاظ بالمواقع تبقى كما هي حتى لو فشل التجميع
+            logger.error(f"خطأ في تجميع قياسات الأسطول: {str(e)}")
         
         try:
             cutoff_time = datetime.now(timezone.utc) - timedelta(hours=14)
@@ -66,16 +73,78 @@ def cleanup_old_geofence_events(app):
             db.session.rollback()
             return 0
 
+def refresh_vehicle_compliance(app):
+    """طلب إعادة حساب أعمدة امتثال المركبات (الوثائق المنتهية وأقرب انتهاء) في طابور المهام بعد منتصف الليل"""
+    with app.app_context():
+        from core.extensions import db
+        from modules.vehicles.application.vehicle_compliance_service import queue_compliance_refresh
+
+        try:
+            return queue_compliance_refresh()
+        except Exception as e:
+            logger.error(f"خطأ في طلب تحديث امتثال المركبات: {str(e)}")
+            db.session.rollback()
+            return None
+
+def refresh_expiry_calendar(app):
+    """نقل وثائق تقويم الانتهاء بين الشرائح (منتهية، 7، 30، 60، 90 يوماً) مع بداية اليوم"""
+    with app.app_context():
+        from modules.expiry.application.expiry_calendar_service import refresh_buckets
+
+        try:
+            return refresh_buckets()
+        except Exception as e:
+            logger.error(f"خطأ في تحديث تقويم الانتهاء: {str(e)}")
+            return 0
+
+def refresh_property_ledger(app):
+    """تعليم أقساط الإيجار المتأخرة ونقل العقود إلى قريبة الانتهاء/منتهية مع بداية اليوم"""
+    with app.app_context():
+        from modules.properties.application.property_ledger_service import mark_overdue
+
+        try:
+            return mark_overdue()
+        except Exception as e:
+            logger.error(f"خطأ في تحديث دفتر العقارات: {str(e)}")
+            return None
+
+def refresh_fleet_telemetry(app):
+    """تجميع نقاط المواقع الجديدة لكل مركبة وتسوية تعبئات الوقود مع العداد بعد منتصف الليل"""
+    with app.app_context():
+        from modules.vehicles.application.fleet_telemetry_service import refresh_telemetry
+
+        try:
+            return refresh_telemetry()
+        except Exception as e:
+            logger.error(f"خطأ في تحديث قياسات الأسطول: {str(e)}")
+            return None
+
+def warm_dashboard_snapshot(app):
+    """إعادة حساب لقطة لوحة التحكم قبل انتهاء صلاحيتها حتى لا يحسبها أول طلب"""
+    with app.app_context():
+        from services.dashboard_snapshot_service import refresh_dashboard_snapshot
+
+        try:
+            refresh_dashboard_snapshot(app)
+        except Exception as e:
+            logger.error(f"خطأ في تحديث لقطة لوحة التحكم: {str(e)}")
+
 def init_scheduler(app):
     """تهيئة وتشغيل المجدول لمهام التنظيف الخلفية"""
     scheduler = BackgroundScheduler()
     scheduler.add_job(func=lambda: cleanup_old_location_data(app), trigger="interval", hours=6)
     scheduler.add_job(func=lambda: cleanup_old_geofence_events(app), trigger="interval", hours=24)
+    scheduler.add_job(func=lambda: refresh_vehicle_compliance(app), trigger="cron", hour=0, minute=5)
+    scheduler.add_job(func=lambda: refresh_expiry_calendar(app), trigger="cron", hour=0, minute=10)
+    scheduler.add_job(func=lambda: refresh_property_ledger(app), trigger="cron", hour=0, minute=15)
+    scheduler.add_job(func=lambda: refresh_fleet_telemetry(app), trigger="cron", hour=0, minute=20)
+    scheduler.add_job(func=lambda: warm_dashboard_snapshot(app), trigger="interval", seconds=90)
     scheduler.start()
     
     # تشغيل التنظيف عند بدء التطبيق
     cleanup_old_location_data(app)
     cleanup_old_geofence_events(app)
+    refresh_vehicle_compliance(app)
     
     # إيقاف المجدول عند إيقاف التطبيق
     atexit.register(lambda: scheduler.shutdown())
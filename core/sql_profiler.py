@@ -0,0 +1,243 @@
+"""
+مُحلل استعلامات SQL لكل طلب وكاشف أنماط N+1.
+- مستمعا before/after_cursor_execute على كل المحركات: عدد الاستعلامات وزمن قاعدة البيانات لكل طلب.
+- النتيجة في ترويسة Server-Timing لكل استجابة (db;dur=...;desc="N queries").
+- عينة من الطلبات (SQL_PROFILE_SAMPLE_RATE) تُجمَّع استعلاماتها حسب الشكل المُطبَّع؛
+  تكرار نفس SELECT عدداً ≥ SQL_PROFILE_NPLUS1_THRESHOLD يُعلَّم N+1 ويُسجَّل تحذيراً.
+- تجميع داخل العملية لكل endpoint يُعرض في لوحة الإدارة (/admin/sql-profile).
+- خارج الطلبات (المهام الخلفية، CLI) لا يُحسب شيء.
+"""
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SAMPLE_RATE = 0.05
+DEFAULT_NPLUS1_THRESHOLD = 5
+DEFAULT_LOG_QUERIES = 50
+SHAPES_PER_ENDPOINT = 5
+SHAPE_PREVIEW_CHARS = 300
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:\?|%\(\w+\)s|%s|:\w+|\$\d+|[\d.]+)\s*,?)+\)", re.IGNORECASE)
+_POSTCOMPILE = re.compile(r"\(?__\[POSTCOMPILE_\w+\]\)?")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+|\$\d+|\?")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r"\s+")
+
+_state = {"listeners": False}
+
+
+@lru_cache(maxsize=4096)
+def normalize_statement(statement: str) -> str:
+    """شكل الاستعلام بدون القيم: السلاسل والأرقام والمعاملات → ?، قوائم IN → IN (...)."""
+    shape = _STRING.sub("?", statement)
+    shape = _POSTCOMPILE.sub("(...)", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    shape = _PLACEHOLDER.sub("?", shape)
+    shape = _NUMBER.sub("?", shape)
+    return _SPACE.sub(" ", shape).strip()
+
+
+class RequestProfile:
+    """عدادات طلب واحد (تعيش في flask.g)."""
+
+    __slots__ = ("queries", "db_ms", "sampled", "shapes", "shape_ms")
+
+    def __init__(self, sampled: bool):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.sampled = sampled
+        self.shapes: Counter = Counter()
+        self.shape_ms: Counter = Counter()
+
+    def record(self, statement: str, elapsed_ms: float) -> None:
+        self.queries += 1
+        self.db_ms += elapsed_ms
+        if self.sampled:
+            shape = normalize_statement(statement)
+            self.shapes[shape] += 1
+            self.shape_ms[shape] += elapsed_ms
+
+    def repeated_selects(self, threshold: int) -> List[tuple]:
+        """[(الشكل، العدد، الزمن)] لكل SELECT تكرر ≥ threshold مرة — مؤشر N+1."""
+        return [
+            (shape, count, self.shape_ms[shape])
+            for shape, count in self.shapes.most_common()
+            if count >= threshold and shape[:6].upper() == "SELECT"
+        ]
+
+
+class EndpointStats:
+    """تجميع الطلبات المأخوذة كعينة لنقطة نهاية واحدة."""
+
+    __slots__ = ("requests", "queries", "db_ms", "max_queries", "nplus1_requests", "shapes")
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_ms = 0.0
+        self.max_queries = 0
+        self.nplus1_requests = 0
+        self.shapes: Dict[str, List[float]] = {}  # الشكل → [مرات الظهور، أقصى تكرار في طلب، الزمن]
+
+    def add(self, profile: RequestProfile, repeated: List[tuple]) -> None:
+        self.requests += 1
+        self.queries += profile.queries
+        self.db_ms += profile.db_ms
+        self.max_queries = max(self.max_queries, profile.queries)
+        if repeated:
+            self.nplus1_requests += 1
+        for shape, count, elapsed in repeated:
+            entry = self.shapes.setdefault(shape, [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] = max(entry[1], count)
+            entry[2] += elapsed
+        if len(self.shapes) > SHAPES_PER_ENDPOINT * 4:
+            keep = sorted(self.shapes.items(), key=lambda kv: kv[1][2], reverse=True)[:SHAPES_PER_ENDPOINT * 2]
+            self.shapes = dict(keep)
+
+    def to_dict(self, endpoint: str) -> Dict[str, Any]:
+        shapes = sorted(self.shapes.items(), key=lambda kv: kv[1][2], reverse=True)[:SHAPES_PER_ENDPOINT]
+        return {
+            "endpoint": endpoint,
+            "requests": self.requests,
+            "avg_queries": round(self.queries / self.requests, 1) if self.requests else 0,
+            "max_queries": self.max_queries,
+            "avg_db_ms": round(self.db_ms / self.requests, 1) if self.requests else 0.0,
+            "nplus1_requests": self.nplus1_requests,
+            "nplus1_shapes": [
+                {"shape": shape[:SHAPE_PREVIEW_CHARS], "requests": int(seen), "max_repeat": int(repeat),
+                 "db_ms": round(elapsed, 1)}
+                for shape, (seen, repeat, elapsed) in shapes
+            ],
+        }
+
+
+_endpoints: Dict[str, EndpointStats] = {}
+_lock = threading.Lock()
+
+
+def _current_profile() -> Optional[RequestProfile]:
+    if not has_request_context():
+        return None
+    return g.get("_sql_profile")
+
+
+# ==================== مستمعا المحرك ====================
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile() is not None:
+        conn.info.setdefault("sql_profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    if profile is None:
+        return
+    starts = conn.info.get("sql_profile_start")
+    if not starts:
+        return
+    profile.record(statement, (time.perf_counter() - starts.pop()) * 1000)
+
+
+def _handle_error(exception_context):
+    # الاستعلام الفاشل لا يمر بـ after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("sql_profile_start"):
+        conn.info["sql_profile_start"].pop()
+
+
+# ==================== دورة الطلب ====================
+
+def _begin_request():
+    config = _config()
+    if not config["enabled"]:
+        return
+    g._sql_profile = RequestProfile(sampled=random.random() < config["sample_rate"])
+
+
+def _finish_request(response):
+    profile = g.pop("_sql_profile", None)
+    if profile is None:
+        return response
+    timing = f'db;dur={profile.db_ms:.1f};desc="{profile.queries} queries"'
+    existing = response.headers.get("Server-Timing")
+    response.headers["Server-Timing"] = f"{existing}, {timing}" if existing else timing
+    if profile.sampled:
+        _collect(profile)
+    return response
+
+
+def _collect(profile: RequestProfile) -> None:
+    config = _config()
+    endpoint = f"{request.method} {request.endpoint or '<unmatched>'}"
+    repeated = profile.repeated_selects(config["nplus1_threshold"])
+    with _lock:
+        stats = _endpoints.get(endpoint)
+        if stats is None:
+            stats = _endpoints[endpoint] = EndpointStats()
+        stats.add(profile, repeated)
+    if repeated:
+        shape, count, elapsed = repeated[0]
+        logger.warning(
+            f"N+1 suspected on {endpoint}: {count}x ({elapsed:.1f}ms) {shape[:SHAPE_PREVIEW_CHARS]} "
+            f"[{profile.queries} queries, {profile.db_ms:.1f}ms total]"
+        )
+    elif profile.queries >= config["log_queries"]:
+        logger.info(f"SQL profile {endpoint}: {profile.queries} queries, {profile.db_ms:.1f}ms")
+
+
+def _config() -> Dict[str, Any]:
+    from flask import current_app
+
+    config = current_app.config
+    return {
+        "enabled": config.get("SQL_PROFILE_ENABLED", True),
+        "sample_rate": config.get("SQL_PROFILE_SAMPLE_RATE", DEFAULT_SAMPLE_RATE),
+        "nplus1_threshold": config.get("SQL_PROFILE_NPLUS1_THRESHOLD", DEFAULT_NPLUS1_THRESHOLD),
+        "log_queries": config.get("SQL_PROFILE_LOG_QUERIES", DEFAULT_LOG_QUERIES),
+    }
+
+
+# ==================== القراءة ====================
+
+def get_worst_endpoints(limit: int = 20, order: str = "db_ms") -> List[Dict[str, Any]]:
+    """أسوأ نقاط النهاية حسب متوسط زمن قاعدة البيانات أو عدد الاستعلامات أو طلبات N+1."""
+    keys = {
+        "db_ms": lambda row: row["avg_db_ms"],
+        "queries": lambda row: row["avg_queries"],
+        "nplus1": lambda row: (row["nplus1_requests"], row["avg_queries"]),
+    }
+    with _lock:
+        rows = [stats.to_dict(endpoint) for endpoint, stats in _endpoints.items()]
+    rows.sort(key=keys.get(order, keys["db_ms"]), reverse=True)
+    return rows[:limit]
+
+
+def reset_sql_profile() -> None:
+    with _lock:
+        _endpoints.clear()
+
+
+# ==================== التهيئة ====================
+
+def init_sql_profiler(app) -> None:
+    """ربط المستمعين بالمحركات ودورة الطلب (مرة واحدة للعملية، ومرة لكل تطبيق)."""
+    if not _state["listeners"]:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        _state["listeners"] = True
+    app.before_request(_begin_request)
+    app.after_request(_finish_request)
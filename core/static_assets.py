@@ -0,0 +1,271 @@
+"""
+بناء وخدمة الملفات الثابتة ببصمة المحتوى.
+- flask assets-build: ينسخ ملفات static/ (CSS/JS/خطوط/صور) إلى static/dist/ باسم يحمل بصمة المحتوى
+  (css/theme.css -> dist/css/theme.3f2a9c1e07bd.css) مع نسخ .br و .gz مسبقة الضغط للملفات النصية،
+  ويكتب static/dist/manifest.json (الاسم المنطقي -> الاسم المبصوم + الترميزات المتاحة).
+- روابط url() داخل CSS تُعاد كتابتها إلى الأسماء المبصومة (أو للمسار الأصلي إن لم يكن الملف في البيان).
+- url_for('static', filename=...) يعطي الرابط المبصوم تلقائياً عبر url_defaults، و asset_url() للقوالب.
+- الملف المبصوم يُخدم بـ Cache-Control: immutable لسنة، وبالنسخة المضغوطة مسبقاً حسب Accept-Encoding،
+  فلا يضغطه Flask-Compress مع كل طلب (الاستجابة تحمل Content-Encoding جاهزاً).
+- بلا بيان (بيئة التطوير) يبقى كل شيء كما هو.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import click
+from flask import current_app, request, send_from_directory, url_for
+from flask.cli import with_appcontext
+
+try:
+    import brotli
+except ImportError:  # Flask-Compress يثبتها عادةً؛ بدونها تُبنى نسخ gzip فقط
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+DIST_DIR = "dist"
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+DEFAULT_MAX_AGE = 365 * 24 * 3600
+COMPRESS_MIN_SIZE = 1024
+
+ASSET_EXTENSIONS = {
+    ".css", ".js", ".mjs", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+}
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".mjs", ".svg", ".ttf", ".otf", ".eot", ".ico"}
+# ملفات رفع المستخدمين وما يحتاج رابطاً ثابتاً (نطاق service worker وبيان PWA) لا تُبصم
+EXCLUDED_DIRS = {DIST_DIR, "uploads", "templates", "test_images", "deploy"}
+EXCLUDED_NAMES = {"serviceworker.js", "service-worker.js", "sw.js", "manifest.json"}
+
+_CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+?)\1\s*\)")
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_state: Dict[str, Any] = {"assets": {}, "files": {}, "endpoints": {"static"}}
+
+
+# ==================== البناء ====================
+
+def _is_source(rel_path: str) -> bool:
+    parts = rel_path.split("/")
+    if any(p in EXCLUDED_DIRS or p.startswith("uploads") or p.startswith(".") for p in parts[:-1]):
+        return False
+    name = parts[-1]
+    return name not in EXCLUDED_NAMES and os.path.splitext(name)[1].lower() in ASSET_EXTENSIONS
+
+
+def _hashed_name(rel_path: str, content: bytes) -> str:
+    root, ext = os.path.splitext(rel_path)
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return f"{DIST_DIR}/{root}.{digest}{ext}"
+
+
+def _rewrite_css(content: bytes, rel_path: str, hashed_path: Optional[str], assets: Dict[str, dict],
+                 static_url_path: str) -> bytes:
+    """إعادة كتابة url() في CSS: نسبياً من موقع الملف المبصوم إلى الهدف المبصوم أو الأصلي."""
+    text = content.decode("utf-8", errors="surrogateescape")
+    source_dir = posixpath.dirname(rel_path)
+    out_dir = posixpath.dirname(hashed_path or f"{DIST_DIR}/{rel_path}")
+
+    def _replace(match):
+        quote, ref = match.group(1), match.group(2).strip()
+        if ref.startswith(("data:", "http:", "https:", "//", "#")):
+            return match.group(0)
+        ref_path, sep, suffix = ref.partition("?")
+        ref_path, hash_sep, fragment = ref_path.partition("#")
+        tail = f"{sep}{suffix}" if sep else (f"{hash_sep}{fragment}" if hash_sep else "")
+        if ref_path.startswith(static_url_path + "/"):
+            logical = ref_path[len(static_url_path) + 1:]
+            entry = assets.get(logical)
+            if entry is None:
+                return match.group(0)
+            return f"url({quote}{static_url_path}/{entry['path']}{tail}{quote})"
+        if ref_path.startswith("/"):
+            return match.group(0)
+        logical = posixpath.normpath(posixpath.join(source_dir, ref_path))
+        target = assets[logical]["path"] if logical in assets else logical
+        return f"url({quote}{posixpath.relpath(target, out_dir)}{tail}{quote})"
+
+    return _CSS_URL.sub(_replace, text).encode("utf-8", errors="surrogateescape")
+
+
+def _write_variants(path: str, content: bytes, min_size: int) -> list:
+    encodings = []
+    if os.path.splitext(path)[1].lower() not in COMPRESSIBLE_EXTENSIONS or len(content) < min_size:
+        return encodings
+    if brotli is not None:
+        compressed = brotli.compress(content, quality=11)
+        if len(compressed) < len(content):
+            with open(path + ".br", "wb") as fh:
+                fh.write(compressed)
+            encodings.append("br")
+    compressed = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(compressed) < len(content):
+        with open(path + ".gz", "wb") as fh:
+            fh.write(compressed)
+        encodings.append("gzip")
+    return encodings
+
+
+def build_assets(static_folder: str, static_url_path: str = "/static",
+                 min_size: int = COMPRESS_MIN_SIZE) -> Dict[str, Any]:
+    """
+    بناء static/dist والبيان. الملفات المبصومة السابقة تبقى (عمليات قيد التشغيل قد تشير إليها)؛
+    الأسماء لا تتصادم لأن البصمة من المحتوى.
+    """
+    sources = []
+    for root, dirs, files in os.walk(static_folder):
+        dirs.sort()
+        for name in sorted(files):
+            rel_path = os.path.relpath(os.path.join(root, name), static_folder).replace(os.sep, "/")
+            if _is_source(rel_path):
+                sources.append(rel_path)
+    # CSS أخيراً حتى تجد روابطه الخطوط والصور مبصومة
+    sources.sort(key=lambda p: (p.lower().endswith(".css"), p))
+
+    assets: Dict[str, dict] = {}
+    total = compressed = 0
+    for rel_path in sources:
+        with open(os.path.join(static_folder, rel_path), "rb") as fh:
+            content = fh.read()
+        if rel_path.lower().endswith(".css"):
+            # البصمة بعد إعادة الكتابة؛ المجلد نفسه قبلها وبعدها فالمسارات النسبية لا تتغير
+            provisional = _hashed_name(rel_path, content)
+            content = _rewrite_css(content, rel_path, provisional, assets, static_url_path)
+        hashed = _hashed_name(rel_path, content)
+        out_path = os.path.join(static_folder, *hashed.split("/"))
+        os.makedirs(os.path.dirname(out_path), exist_ok=True)
+        if not os.path.exists(out_path):
+            with open(out_path, "wb") as fh:
+                fh.write(content)
+        encodings = _write_variants(out_path, content, min_size)
+        assets[rel_path] = {"path": hashed, "encodings": encodings}
+        total += 1
+        compressed += bool(encodings)
+
+    manifest = {"version": 1, "built_at": datetime.utcnow().isoformat(timespec="seconds"), "assets": assets}
+    manifest_path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    os.makedirs(os.path.dirname(manifest_path), exist_ok=True)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+    logger.info(f"Static assets built: {total} files, {compressed} precompressed")
+    return manifest
+
+
+# ==================== الخدمة ====================
+
+def load_manifest(static_folder: str) -> Dict[str, dict]:
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh).get("assets", {})
+    except (OSError, ValueError) as e:
+        logger.warning(f"Static asset manifest not loaded: {e}")
+        return {}
+
+
+def _activate(assets: Dict[str, dict]) -> None:
+    _state["assets"] = assets
+    _state["files"] = {entry["path"]: entry for entry in assets.values()}
+
+
+def asset_path(filename: str) -> str:
+    """المسار المبصوم داخل static/ لاسم منطقي (أو الاسم نفسه إن لم يكن في البيان)."""
+    entry = _state["assets"].get(filename)
+    return entry["path"] if entry else filename
+
+
+def asset_url(filename: str, **values) -> str:
+    """مكافئ url_for('static', filename=...) يعطي الرابط المبصوم."""
+    return url_for("static", filename=asset_path(filename), **values)
+
+
+def _hashed_static_defaults(endpoint, values):
+    if endpoint in _state["endpoints"] and values.get("filename") in _state["assets"]:
+        values["filename"] = _state["assets"][values["filename"]]["path"]
+
+
+def _send_hashed(app, filename: str, entry: dict):
+    max_age = app.config.get("ASSETS_MAX_AGE", DEFAULT_MAX_AGE)
+    accepted = request.accept_encodings
+    for encoding, suffix in _ENCODINGS:
+        if encoding in entry.get("encodings", ()) and accepted[encoding]:
+            mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+            response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype,
+                                           max_age=max_age)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(app.static_folder, filename, max_age=max_age)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def _static_endpoints(app) -> set:
+    """static للتطبيق وأي مخطط يخدم المجلد نفسه (legacy_static في core.app_factory)."""
+    root = os.path.realpath(app.static_folder)
+    endpoints = {"static"}
+    for name, blueprint in app.blueprints.items():
+        if blueprint.static_folder and os.path.realpath(blueprint.static_folder) == root:
+            endpoints.add(f"{name}.static")
+    return endpoints
+
+
+def _wrap_static_view(app, endpoint: str) -> None:
+    original = app.view_functions.get(endpoint)
+    if original is None or getattr(original, "_hashed_assets", False):
+        return
+
+    def static_view(filename):
+        entry = _state["files"].get(filename)
+        if entry is None:
+            return original(filename=filename)
+        return _send_hashed(app, filename, entry)
+
+    static_view._hashed_assets = True
+    app.view_functions[endpoint] = static_view
+
+
+@click.command("assets-build")
+@with_appcontext
+def assets_build_command():
+    """بناء الملفات الثابتة المبصومة ونسخها المضغوطة مسبقاً في static/dist."""
+    app = current_app
+    manifest = build_assets(app.static_folder, app.static_url_path,
+                            app.config.get("ASSETS_COMPRESS_MIN_SIZE", COMPRESS_MIN_SIZE))
+    _activate(manifest["assets"])
+    click.echo(f"Static assets built: {len(manifest['assets'])} files -> {DIST_DIR}/{MANIFEST_NAME}")
+
+
+def init_static_assets(app) -> None:
+    """أمر البناء، الروابط المبصومة في url_for و asset_url، وخدمة الملفات المبصومة."""
+    if "assets-build" not in app.cli.commands:
+        app.cli.add_command(assets_build_command)
+    app.jinja_env.globals["asset_url"] = asset_url
+    if not app.config.get("ASSETS_ENABLED", True) or not app.static_folder:
+        return
+    assets = load_manifest(app.static_folder)
+    if not assets:
+        return
+    _activate(assets)
+    _state["endpoints"] = _static_endpoints(app)
+    defaults = app.url_default_functions.setdefault(None, [])
+    if _hashed_static_defaults not in defaults:
+        defaults.append(_hashed_static_defaults)
+    for endpoint in _state["endpoints"]:
+        _wrap_static_view(app, endpoint)
+    logger.info(f"Static asset manifest loaded: {len(assets)} files")
@@ -0,0 +1,34 @@
+"""
+قياس أداء المسارات الساخنة: مولّد بيانات بأحجام واقعية ومجموعة سيناريوهات تُقارن بخط أساس.
+"""
+from .dataset import SCALES, DatasetGenerator, DatasetScale, generate_dataset, get_scale
+from .runner import (
+    DEFAULT_SCENARIOS,
+    BenchmarkRunner,
+    Scenario,
+    ScenarioResult,
+    baseline_path,
+    compare,
+    count_queries,
+    format_report,
+    load_baseline,
+    save_baseline,
+)
+
+__all__ = [
+    "SCALES",
+    "DatasetGenerator",
+    "DatasetScale",
+    "generate_dataset",
+    "get_scale",
+    "DEFAULT_SCENARIOS",
+    "BenchmarkRunner",
+    "Scenario",
+    "ScenarioResult",
+    "baseline_path",
+    "compare",
+    "count_queries",
+    "format_report",
+    "load_baseline",
+    "save_baseline",
+]
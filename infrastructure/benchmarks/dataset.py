@@ -0,0 +1,285 @@
+"""
+مولّد بيانات اصطناعية بأحجام واقعية لقياس أداء المسارات الساخنة.
+- حتمي: نفس (seed، anchor، الحجم) ينتج نفس الصفوف بالضبط.
+- أحجام جاهزة: ci (اختبارات)، small (تطوير)، full (10 آلاف موظف، سنتان حضور، ملايين نقاط الموقع).
+- إدراج Core على دفعات (executemany) لا ORM: مستمعو الفهارس المشتقة لا يعملون أثناء التوليد،
+  لذا يُعاد بناء الفهارس المشتقة (البحث، تقويم الانتهاء) مرة واحدة في النهاية.
+- يعمل على قاعدة فارغة؛ لا يحذف بيانات موجودة.
+"""
+import logging
+import random
+from dataclasses import dataclass, replace
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from core.extensions import db
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+BENCH_ADMIN_EMAIL = "bench-admin@nuzum.local"
+
+
+@dataclass(frozen=True)
+class DatasetScale:
+    """أحجام مجموعة البيانات."""
+    employees: int
+    departments: int
+    attendance_days: int
+    tracked_drivers: int
+    tracking_days: int
+    points_per_day: int
+    vehicles: int
+    handovers_per_vehicle: int
+    salary_months: int
+
+
+SCALES: Dict[str, DatasetScale] = {
+    "ci": DatasetScale(employees=60, departments=4, attendance_days=45, tracked_drivers=20, tracking_days=3,
+                       points_per_day=12, vehicles=15, handovers_per_vehicle=4, salary_months=3),
+    "small": DatasetScale(employees=1000, departments=20, attendance_days=180, tracked_drivers=200,
+                          tracking_days=14, points_per_day=48, vehicles=150, handovers_per_vehicle=8,
+                          salary_months=12),
+    # ~7.3 مليون حضور، ~2.9 مليون نقطة موقع، 15 ألف تسليم، 240 ألف راتب
+    "full": DatasetScale(employees=10000, departments=100, attendance_days=730, tracked_drivers=2000,
+                         tracking_days=30, points_per_day=48, vehicles=1500, handovers_per_vehicle=10,
+                         salary_months=24),
+}
+
+_FIRST_NAMES = ["محمد", "أحمد", "عبدالله", "خالد", "فهد", "سعد", "عمر", "يوسف", "علي", "حسن", "ماجد", "سلطان"]
+_LAST_NAMES = ["العتيبي", "القحطاني", "الشهري", "الغامدي", "الزهراني", "الدوسري", "المطيري", "الحربي"]
+_JOB_TITLES = ["سائق", "سائق", "مشرف", "فني", "محاسب", "مندوب", "عامل"]
+_MAKES = [("تويوتا", "هايلكس"), ("هيونداي", "اكسنت"), ("نيسان", "صني"), ("ايسوزو", "دي ماكس"), ("فورد", "ترانزيت")]
+_COLORS = ["أبيض", "فضي", "أسود", "رمادي"]
+_CITIES = [("الرياض", 24.7136, 46.6753), ("جدة", 21.4858, 39.1925), ("الدمام", 26.4207, 50.0888)]
+# توزيع حالات الحضور: حاضر غالباً مع نسب غياب وإجازات واقعية
+_ATTENDANCE_STATES = ["present"] * 86 + ["absent"] * 5 + ["leave"] * 5 + ["sick"] * 4
+
+
+def get_scale(name: str, **overrides) -> DatasetScale:
+    """حجم جاهز بالاسم مع إمكانية تعديل حقول منه (employees=500 ...)."""
+    if name not in SCALES:
+        raise ValueError(f"Unknown dataset scale: {name} (expected one of {', '.join(SCALES)})")
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    return replace(SCALES[name], **overrides) if overrides else SCALES[name]
+
+
+def _batched(rows: Iterable[Dict], size: int = BATCH_SIZE) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _insert(table, rows: Iterable[Dict]) -> int:
+    count = 0
+    for batch in _batched(rows):
+        db.session.execute(table.insert(), batch)
+        db.session.commit()
+        count += len(batch)
+    return count
+
+
+class DatasetGenerator:
+    """يولّد كل الجداول بالترتيب؛ المعرفات متسلسلة من 1 فتُبنى العلاقات دون قراءة من القاعدة."""
+
+    def __init__(self, scale: DatasetScale, seed: int = 42, anchor: Optional[date] = None):
+        self.scale = scale
+        self.seed = seed
+        self.anchor = anchor or date.today()
+
+    def _rng(self, section: str) -> random.Random:
+        # مولد مستقل لكل قسم: تغيير حجم قسم لا يغيّر بيانات الأقسام الأخرى
+        return random.Random(f"{self.seed}:{section}")
+
+    # ==================== الجداول ====================
+
+    def departments(self) -> Iterator[Dict]:
+        for i in range(1, self.scale.departments + 1):
+            yield {"id": i, "name": f"مشروع {i:03d}", "description": f"قسم اصطناعي رقم {i}"}
+
+    def employees(self) -> Iterator[Dict]:
+        rng = self._rng("employees")
+        for i in range(1, self.scale.employees + 1):
+            basic = rng.choice([3000, 3500, 4000, 4500, 5000, 6500, 8000])
+            yield {
+                "id": i,
+                "employee_id": f"B{i:06d}",
+                "national_id": f"2{i:09d}",
+                "name": f"{rng.choice(_FIRST_NAMES)} {rng.choice(_FIRST_NAMES)} {rng.choice(_LAST_NAMES)}",
+                "mobile": f"05{rng.randint(10000000, 99999999)}",
+                "job_title": _JOB_TITLES[0] if i <= self.scale.tracked_drivers else rng.choice(_JOB_TITLES),
+                "status": "active" if rng.random() < 0.93 else rng.choice(["inactive", "on_leave"]),
+                "department_id": self._department_of(i),
+                "join_date": self.anchor - timedelta(days=rng.randint(30, 2500)),
+                "basic_salary": float(basic),
+                "daily_wage": round(basic / 30, 2),
+                "contract_type": "foreign" if rng.random() < 0.7 else "saudi",
+            }
+
+    def employee_departments(self) -> Iterator[Dict]:
+        for i in range(1, self.scale.employees + 1):
+            yield {"employee_id": i, "department_id": self._department_of(i)}
+
+    def attendance(self) -> Iterator[Dict]:
+        rng = self._rng("attendance")
+        start = self.anchor - timedelta(days=self.scale.attendance_days - 1)
+        for offset in range(self.scale.attendance_days):
+            day = start + timedelta(days=offset)
+            if day.weekday() == 4:  # الجمعة
+                continue
+            for employee_id in range(1, self.scale.employees + 1):
+                status = rng.choice(_ATTENDANCE_STATES)
+                row = {"employee_id": employee_id, "date": day, "status": status,
+                       "check_in": None, "check_out": None}
+                if status == "present":
+                    row["check_in"] = time(7 + rng.randint(0, 1), rng.randint(0, 59))
+                    row["check_out"] = time(16 + rng.randint(0, 2), rng.randint(0, 59))
+                yield row
+
+    def employee_locations(self) -> Iterator[Dict]:
+        rng = self._rng("locations")
+        end = datetime.combine(self.anchor, time(23, 59))
+        interval = timedelta(minutes=max(1, (16 * 60) // self.scale.points_per_day))
+        for employee_id in range(1, self.scale.tracked_drivers + 1):
+            _, lat, lng = _CITIES[employee_id % len(_CITIES)]
+            vehicle_id = (employee_id - 1) % self.scale.vehicles + 1 if self.scale.vehicles else None
+            for day in range(self.scale.tracking_days):
+                moment = end.replace(hour=6, minute=0) - timedelta(days=day)
+                for _ in range(self.scale.points_per_day):
+                    lat += rng.uniform(-0.002, 0.002)
+                    lng += rng.uniform(-0.002, 0.002)
+                    yield {
+                        "employee_id": employee_id,
+                        "latitude": round(lat, 8),
+                        "longitude": round(lng, 8),
+                        "accuracy_m": round(rng.uniform(3, 25), 2),
+                        "speed_kmh": round(rng.uniform(0, 90), 2),
+                        "vehicle_id": vehicle_id,
+                        "source": "android_app",
+                        "recorded_at": moment,
+                        "received_at": moment + timedelta(seconds=rng.randint(1, 30)),
+                    }
+                    moment += interval
+
+    def vehicles(self) -> Iterator[Dict]:
+        rng = self._rng("vehicles")
+        for i in range(1, self.scale.vehicles + 1):
+            make, model = rng.choice(_MAKES)
+            yield {
+                "id": i,
+                "plate_number": f"{i:04d} ب ن م",
+                "make": make,
+                "model": model,
+                "year": rng.randint(2015, self.anchor.year),
+                "color": rng.choice(_COLORS),
+                "status": rng.choice(["available", "in_project", "in_project", "in_workshop"]),
+                "type_of_car": "سيارة نقل" if make in ("ايسوزو", "فورد") else "سيدان",
+                "department_id": self._department_of(i),
+                "region": _CITIES[i % len(_CITIES)][0],
+                "authorization_expiry_date": self.anchor + timedelta(days=rng.randint(-60, 400)),
+                "registration_expiry_date": self.anchor + timedelta(days=rng.randint(-60, 400)),
+                "inspection_expiry_date": self.anchor + timedelta(days=rng.randint(-60, 400)),
+            }
+
+    def vehicle_handovers(self) -> Iterator[Dict]:
+        rng = self._rng("handovers")
+        for vehicle_id in range(1, self.scale.vehicles + 1):
+            mileage = rng.randint(5000, 60000)
+            day = self.anchor - timedelta(days=self.scale.handovers_per_vehicle * 30)
+            for n in range(self.scale.handovers_per_vehicle):
+                employee_id = rng.randint(1, self.scale.employees)
+                mileage += rng.randint(500, 4000)
+                day += timedelta(days=rng.randint(10, 30))
+                yield {
+                    "vehicle_id": vehicle_id,
+                    "employee_id": employee_id,
+                    "handover_type": "delivery" if n % 2 == 0 else "return",
+                    "handover_date": min(day, self.anchor),
+                    "mileage": mileage,
+                    "person_name": f"موظف {employee_id}",
+                    "fuel_level": rng.choice(["1/4", "1/2", "3/4", "full"]),
+                    "vehicle_plate_number": f"{vehicle_id:04d} ب ن م",
+                }
+
+    def salaries(self) -> Iterator[Dict]:
+        rng = self._rng("salaries")
+        year, month = self.anchor.year, self.anchor.month
+        periods = []
+        for _ in range(self.scale.salary_months):
+            month -= 1
+            if month == 0:
+                year, month = year - 1, 12
+            periods.append((year, month))
+        for year, month in reversed(periods):
+            for employee_id in range(1, self.scale.employees + 1):
+                basic = float(rng.choice([3000, 3500, 4000, 4500, 5000, 6500, 8000]))
+                deductions = float(rng.choice([0, 0, 0, 100, 250]))
+                yield {
+                    "employee_id": employee_id, "month": month, "year": year,
+                    "basic_salary": basic, "allowances": 500.0, "deductions": deductions,
+                    "net_salary": basic + 500.0 - deductions, "is_paid": True,
+                }
+
+    def _department_of(self, i: int) -> int:
+        return (i - 1) % self.scale.departments + 1
+
+    # ==================== التنفيذ ====================
+
+    def generate(self) -> Dict[str, int]:
+        from models import Attendance, Department, Employee, EmployeeLocation, Salary, Vehicle, VehicleHandover
+        from modules.employees.domain.models import employee_departments
+
+        steps = [
+            ("departments", Department.__table__, self.departments),
+            ("employees", Employee.__table__, self.employees),
+            ("employee_departments", employee_departments, self.employee_departments),
+            ("vehicles", Vehicle.__table__, self.vehicles),
+            ("vehicle_handovers", VehicleHandover.__table__, self.vehicle_handovers),
+            ("attendance", Attendance.__table__, self.attendance),
+            ("employee_locations", EmployeeLocation.__table__, self.employee_locations),
+            ("salaries", Salary.__table__, self.salaries),
+        ]
+        counts: Dict[str, int] = {}
+        for name, table, rows in steps:
+            counts[name] = _insert(table, rows())
+            logger.info(f"Benchmark dataset: {name} = {counts[name]}")
+        ensure_bench_admin()
+        _rebuild_derived()
+        return counts
+
+
+def ensure_bench_admin():
+    """مستخدم مدير ثابت تستخدمه سيناريوهات القياس لتسجيل الدخول."""
+    from models import User
+
+    user = User.query.filter_by(email=BENCH_ADMIN_EMAIL).first()
+    if user is None:
+        user = User(email=BENCH_ADMIN_EMAIL, username="bench-admin", name="Benchmark Admin",
+                    role="admin", is_admin=True, is_active=True)
+        db.session.add(user)
+        db.session.commit()
+    return user
+
+
+def _rebuild_derived() -> None:
+    # الفهارس المشتقة تُحدَّث عادة بمستمعي ORM الذين لا يرون إدراج Core
+    try:
+        from modules.search.application.search_service import rebuild_index
+        rebuild_index()
+    except Exception as e:
+        logger.warning(f"Benchmark dataset: search index not rebuilt: {e}")
+    try:
+        from modules.expiry.application.expiry_calendar_service import rebuild_calendar
+        rebuild_calendar()
+    except Exception as e:
+        logger.warning(f"Benchmark dataset: expiry calendar not rebuilt: {e}")
+
+
+def generate_dataset(scale: str = "ci", seed: int = 42, anchor: Optional[date] = None, **overrides) -> Dict[str, int]:
+    """توليد مجموعة بيانات كاملة في قاعدة التطبيق الحالي (داخل سياق التطبيق)."""
+    return DatasetGenerator(get_scale(scale, **overrides), seed=seed, anchor=anchor).generate()
@@ -0,0 +1,253 @@
+"""
+مجموعة قياس أداء المسارات الساخنة ومقارنتها بخط أساس محفوظ.
+- كل سيناريو: طلب عبر Flask test client (بجلسة مدير) أو استدعاء خدمة مباشرة.
+- لكل سيناريو: زمن (أدنى، وسيط، p95)، عدد الاستعلامات، ذروة الذاكرة (tracemalloc).
+- الاستعلامات تُعد بمستمع before_cursor_execute على المحرك طوال التنفيذ (طلبات وخدمات).
+- الذاكرة تُقاس في تشغيل منفصل حتى لا يُضخم tracemalloc أزمنة القياس.
+- خط الأساس JSON لكل حجم بيانات؛ المقارنة تعلّم تراجع الزمن فوق نسبة السماح وأي زيادة في الاستعلامات.
+- سيناريو لمسار غير مسجل في هذا التثبيت يُتخطى ولا يُعد فشلاً.
+"""
+import json
+import logging
+import statistics
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import event
+
+from core.extensions import db
+
+logger = logging.getLogger(__name__)
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+DEFAULT_REPEATS = 5
+DEFAULT_TOLERANCE = 0.25
+
+
+@dataclass
+class Scenario:
+    """سيناريو قياس: مسار (endpoint + معاملات) أو دالة خدمة."""
+    name: str
+    endpoint: Optional[str] = None
+    url_args: Dict[str, Any] = field(default_factory=dict)
+    service: Optional[Callable[[], Any]] = None
+    description: str = ""
+
+
+@dataclass
+class ScenarioResult:
+    name: str
+    status: str  # ok, skipped, error
+    latency_min_ms: float = 0.0
+    latency_median_ms: float = 0.0
+    latency_p95_ms: float = 0.0
+    queries: int = 0
+    peak_memory_kb: float = 0.0
+    detail: str = ""
+
+
+def _payroll_run():
+    from modules.payroll.application.payroll_processor import PayrollProcessor
+
+    today = date.today()
+    year, month = (today.year, today.month - 1) if today.month > 1 else (today.year - 1, 12)
+    return len(PayrollProcessor(year, month).process_all_employees())
+
+
+DEFAULT_SCENARIOS: List[Scenario] = [
+    Scenario("live_locations", endpoint="mobile.get_live_locations",
+             description="آخر موقع لكل موظف (خريطة التتبع الحي)"),
+    Scenario("attendance_dashboard", endpoint="attendance.dashboard", description="لوحة الحضور"),
+    Scenario("vehicle_list", endpoint="vehicles.index", description="قائمة المركبات"),
+    Scenario("vehicle_list_app", endpoint="vehicles_web.list_page", description="قائمة المركبات (الواجهة الجديدة)"),
+    Scenario("bi_export", endpoint="analytics.export_powerbi", description="تصدير Power BI (Excel)"),
+    Scenario("payroll_run", service=_payroll_run, description="احتساب رواتب الشهر السابق لكل الموظفين النشطين"),
+]
+
+
+@contextmanager
+def count_queries():
+    """عداد استعلامات على محرك القاعدة الحالي: with count_queries() as counter: ... counter['n']."""
+    counter = {"n": 0}
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["n"] += 1
+
+    engine = db.engine
+    event.listen(engine, "before_cursor_execute", _on_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _on_execute)
+
+
+class BenchmarkRunner:
+    """يشغل السيناريوهات على تطبيق جاهز (قاعدة مولّدة مسبقاً بـ dataset.generate_dataset)."""
+
+    def __init__(self, app, repeats: int = DEFAULT_REPEATS, warmup: int = 1):
+        self.app = app
+        self.repeats = max(1, repeats)
+        self.warmup = warmup
+        self._client = None
+
+    def client(self):
+        if self._client is None:
+            from infrastructure.benchmarks.dataset import ensure_bench_admin
+
+            self._client = self.app.test_client()
+            with self.app.app_context():
+                user_id = ensure_bench_admin().id
+            with self._client.session_transaction() as session:
+                session["_user_id"] = str(user_id)
+                session["_fresh"] = True
+        return self._client
+
+    def _callable_for(self, scenario: Scenario) -> Optional[Callable[[], Any]]:
+        if scenario.service is not None:
+            return scenario.service
+        if scenario.endpoint not in self.app.view_functions:
+            return None
+        with self.app.test_request_context():
+            from flask import url_for
+            url = url_for(scenario.endpoint, **scenario.url_args)
+        client = self.client()
+
+        def _request():
+            response = client.get(url)
+            response.get_data()  # استهلاك الاستجابات المتدفقة داخل القياس
+            if response.status_code >= 400:
+                raise RuntimeError(f"GET {url} -> {response.status_code}")
+            return response.status_code
+
+        return _request
+
+    def _call(self, scenario: Scenario, func: Callable[[], Any]) -> Any:
+        if scenario.service is None:
+            return func()
+        with self.app.app_context():
+            try:
+                return func()
+            finally:
+                db.session.remove()
+
+    def run_scenario(self, scenario: Scenario) -> ScenarioResult:
+        func = self._callable_for(scenario)
+        if func is None:
+            return ScenarioResult(scenario.name, "skipped", detail=f"endpoint {scenario.endpoint} not registered")
+        try:
+            for _ in range(self.warmup):
+                self._call(scenario, func)
+            timings = []
+            with self.app.app_context(), count_queries() as counter:
+                for _ in range(self.repeats):
+                    started = time.perf_counter()
+                    self._call(scenario, func)
+                    timings.append((time.perf_counter() - started) * 1000)
+            tracemalloc.start()
+            try:
+                self._call(scenario, func)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+        except Exception as e:
+            logger.warning(f"Benchmark {scenario.name} failed: {e}")
+            return ScenarioResult(scenario.name, "error", detail=str(e)[:300])
+        timings.sort()
+        return ScenarioResult(
+            scenario.name, "ok",
+            latency_min_ms=round(timings[0], 2),
+            latency_median_ms=round(statistics.median(timings), 2),
+            latency_p95_ms=round(timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))], 2),
+            queries=counter["n"] // self.repeats,
+            peak_memory_kb=round(peak / 1024, 1),
+        )
+
+    def run(self, scenarios: Optional[Sequence[Scenario]] = None,
+            only: Optional[Sequence[str]] = None) -> List[ScenarioResult]:
+        results = []
+        for scenario in scenarios or DEFAULT_SCENARIOS:
+            if only and scenario.name not in only:
+                continue
+            result = self.run_scenario(scenario)
+            logger.info(f"Benchmark {result.name}: {result.status} {result.latency_median_ms}ms "
+                        f"{result.queries} queries {result.peak_memory_kb}KB")
+            results.append(result)
+        return results
+
+
+# ==================== خط الأساس ====================
+
+def baseline_path(scale: str) -> Path:
+    return BASELINE_DIR / f"{scale}.json"
+
+
+def save_baseline(results: Sequence[ScenarioResult], path: Path, meta: Optional[Dict[str, Any]] = None) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "meta": meta or {},
+        "results": {r.name: asdict(r) for r in results if r.status == "ok"},
+    }
+    path.write_text(json.dumps(payload, ensure_ascii=False, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def load_baseline(path: Path) -> Dict[str, Dict[str, Any]]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8")).get("results", {})
+
+
+def compare(results: Sequence[ScenarioResult], baseline: Dict[str, Dict[str, Any]],
+            tolerance: float = DEFAULT_TOLERANCE) -> List[Dict[str, Any]]:
+    """
+    صف لكل سيناريو ناجح: القيم الحالية، قيم الأساس، ونسبة التغير.
+    regression=True إن زاد الوسيط فوق نسبة السماح، أو زادت الاستعلامات، أو زادت الذاكرة فوق السماح.
+    """
+    rows = []
+    for result in results:
+        if result.status != "ok":
+            continue
+        base = baseline.get(result.name)
+        row = {"name": result.name, "latency_median_ms": result.latency_median_ms, "queries": result.queries,
+               "peak_memory_kb": result.peak_memory_kb, "baseline": base, "regressions": []}
+        if base:
+            if result.latency_median_ms > base["latency_median_ms"] * (1 + tolerance):
+                row["regressions"].append("latency")
+            if result.queries > base["queries"]:
+                row["regressions"].append("queries")
+            if result.peak_memory_kb > base["peak_memory_kb"] * (1 + tolerance):
+                row["regressions"].append("memory")
+            row["latency_change"] = _change(result.latency_median_ms, base["latency_median_ms"])
+            row["queries_change"] = result.queries - base["queries"]
+            row["memory_change"] = _change(result.peak_memory_kb, base["peak_memory_kb"])
+        row["regression"] = bool(row["regressions"])
+        rows.append(row)
+    return rows
+
+
+def _change(current: float, base: float) -> Optional[float]:
+    return round((current - base) / base, 3) if base else None
+
+
+def format_report(results: Sequence[ScenarioResult], comparison: Sequence[Dict[str, Any]]) -> str:
+    by_name = {row["name"]: row for row in comparison}
+    lines = [f"{'scenario':<22}{'median ms':>11}{'p95 ms':>10}{'queries':>9}{'peak KB':>11}  vs baseline"]
+    for r in results:
+        if r.status != "ok":
+            lines.append(f"{r.name:<22}{r.status:>11}  {r.detail}")
+            continue
+        row = by_name.get(r.name, {})
+        if row.get("baseline"):
+            change = row.get("latency_change")
+            delta = f"{change:+.0%} time, {row['queries_change']:+d} queries" if change is not None else ""
+            if row["regression"]:
+                delta += f"  REGRESSION ({', '.join(row['regressions'])})"
+        else:
+            delta = "no baseline"
+        lines.append(f"{r.name:<22}{r.latency_median_ms:>11.1f}{r.latency_p95_ms:>10.1f}{r.queries:>9}"
+                     f"{r.peak_memory_kb:>11.0f}  {delta}")
+    return "\n".join(lines)
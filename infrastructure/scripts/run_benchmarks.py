@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+توليد بيانات القياس وتشغيل سيناريوهات الأداء ومقارنتها بخط الأساس.
+
+  python infrastructure/scripts/run_benchmarks.py seed --scale small
+  python infrastructure/scripts/run_benchmarks.py run --scale small
+  python infrastructure/scripts/run_benchmarks.py run --scale small --save-baseline
+
+القاعدة: instance/bench_<scale>.db (SQLite) ما لم يُمرر --database.
+رمز الخروج 1 عند وجود تراجع مقارنة بخط الأساس (صالح لـ CI).
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import date
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+
+def _parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Nuzum benchmark suite")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("seed", "run"):
+        p = sub.add_parser(name)
+        p.add_argument("--scale", default="ci", help="ci | small | full")
+        p.add_argument("--database", default=None, help="SQLAlchemy URL (الافتراضي instance/bench_<scale>.db)")
+    seed = sub.choices["seed"]
+    seed.add_argument("--seed", type=int, default=42)
+    seed.add_argument("--anchor", default=None, help="آخر يوم في البيانات YYYY-MM-DD (الافتراضي اليوم)")
+    seed.add_argument("--employees", type=int, default=None, help="تجاوز عدد الموظفين في الحجم")
+    run = sub.choices["run"]
+    run.add_argument("--repeats", type=int, default=5)
+    run.add_argument("--only", nargs="*", default=None, help="أسماء سيناريوهات محددة")
+    run.add_argument("--baseline", default=None, help="ملف خط الأساس (الافتراضي baselines/<scale>.json)")
+    run.add_argument("--save-baseline", action="store_true", help="حفظ النتائج كخط أساس جديد")
+    run.add_argument("--tolerance", type=float, default=0.25, help="نسبة السماح لتراجع الزمن والذاكرة")
+    return parser.parse_args(argv)
+
+
+def _create_app(args):
+    url = args.database or f"sqlite:///{os.path.join(PROJECT_ROOT, 'instance', f'bench_{args.scale}.db')}"
+    # قبل استيراد الإعدادات: DevelopmentConfig يقرأ DATABASE_URL عند الاستيراد
+    os.environ["DATABASE_URL"] = url
+    os.environ["JOB_WORKERS"] = "0"
+    os.environ.setdefault("SQL_PROFILE_ENABLED", "0")
+    from core.app_factory import create_app
+
+    app = create_app()
+    app.config["SQL_PROFILE_ENABLED"] = False
+    if not app.config.get("SECRET_KEY"):
+        app.config["SECRET_KEY"] = "benchmark-only"  # جلسة المدير في test client
+    return app
+
+
+def _seed(app, args) -> int:
+    from core.extensions import db
+    from infrastructure.benchmarks import generate_dataset
+    from models import Employee
+
+    with app.app_context():
+        db.create_all()
+        if Employee.query.first() is not None:
+            print("Database is not empty; use a fresh --database for seeding.")
+            return 1
+        anchor = date.fromisoformat(args.anchor) if args.anchor else None
+        counts = generate_dataset(args.scale, seed=args.seed, anchor=anchor, employees=args.employees)
+    for name, count in counts.items():
+        print(f"{name:<22}{count:>12,}")
+    return 0
+
+
+def _run(app, args) -> int:
+    from pathlib import Path
+
+    from infrastructure.benchmarks import (BenchmarkRunner, baseline_path, compare, format_report,
+                                           load_baseline, save_baseline)
+
+    path = Path(args.baseline) if args.baseline else baseline_path(args.scale)
+    results = BenchmarkRunner(app, repeats=args.repeats).run(only=args.only)
+    comparison = compare(results, load_baseline(path), tolerance=args.tolerance)
+    print(format_report(results, comparison))
+    if args.save_baseline:
+        save_baseline(results, path, meta={"scale": args.scale, "repeats": args.repeats,
+                                           "recorded_on": date.today().isoformat()})
+        print(f"Baseline saved: {path}")
+        return 0
+    return 1 if any(row["regression"] for row in comparison) else 0
+
+
+def main(argv=None) -> int:
+    args = _parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    app = _create_app(args)
+    return _seed(app, args) if args.command == "seed" else _run(app, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+تسليم ملفات static/uploads (مستندات الموظفين، صور التسليم، التواقيع، المخططات).
+- ETag قوي من محتوى الملف (sha256) يُحسب مرة لكل (مسار، mtime، حجم) ويُحفظ في ذاكرة العملية.
+- If-None-Match → 304، و Range/If-Range → 206 عبر werkzeug.send_file؛ لا تُقرأ بايتات لا يطلبها العميل.
+- UPLOADS_DELIVERY_MODE:
+  "" يبث التطبيق الملف، "x-sendfile" (Apache mod_xsendfile) أو "x-accel" (nginx) يبثه الوكيل الأمامي
+  بعد أن يتحقق التطبيق من المسار والصلاحية. إعداد nginx لوضع x-accel:
+      location /_uploads_internal/ { internal; alias /path/to/static/uploads/; }
+- ?w=320 يعيد نسخة مصغرة محفوظة على القرص في uploads/_variants/w320/ (عروض UPLOADS_VARIANT_WIDTHS فقط)،
+  وتُعاد إذا تغير الأصل.
+- upload_url(path, width) في القوالب يقبل المسارات المخزنة بأشكالها (static/uploads/..، uploads/..، ..).
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from flask import Response, current_app, request, url_for
+from werkzeug.security import safe_join
+from werkzeug.utils import send_file
+
+logger = logging.getLogger(__name__)
+
+MODE_APP = ""
+MODE_X_SENDFILE = "x-sendfile"
+MODE_X_ACCEL = "x-accel"
+
+VARIANTS_DIR = "_variants"
+RESIZABLE_EXTENSIONS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG", ".webp": "WEBP"}
+DEFAULT_VARIANT_WIDTHS = "160,320,640,1280"
+DEFAULT_MAX_AGE = 86400
+ETAG_CACHE_SIZE = 4096
+_HASH_CHUNK = 1024 * 1024
+
+_etags: "OrderedDict[str, Tuple[int, int, str]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def uploads_root() -> str:
+    return current_app.config.get("UPLOAD_FOLDER") or os.path.join(current_app.static_folder, "uploads")
+
+
+def resolve_upload(root: str, filename: str) -> Optional[str]:
+    """المسار الحقيقي لملف داخل مجلد الرفع، أو None إن لم يوجد أو خرج عن المجلد."""
+    safe_path = safe_join(root, filename)
+    if safe_path is None:
+        return None
+    resolved = os.path.realpath(safe_path)
+    if not resolved.startswith(os.path.realpath(root) + os.sep) or not os.path.isfile(resolved):
+        return None
+    return resolved
+
+
+def strong_etag(path: str, stat: Optional[os.stat_result] = None) -> str:
+    """بصمة المحتوى؛ تُعاد قراءة الملف فقط إذا تغير وقت تعديله أو حجمه."""
+    stat = stat or os.stat(path)
+    with _lock:
+        cached = _etags.get(path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            _etags.move_to_end(path)
+            return cached[2]
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(_HASH_CHUNK), b""):
+            digest.update(chunk)
+    etag = digest.hexdigest()[:32]
+    with _lock:
+        _etags[path] = (stat.st_mtime_ns, stat.st_size, etag)
+        while len(_etags) > ETAG_CACHE_SIZE:
+            _etags.popitem(last=False)
+    return etag
+
+
+# ==================== النسخ المصغرة ====================
+
+def variant_widths() -> Tuple[int, ...]:
+    raw = current_app.config.get("UPLOADS_VARIANT_WIDTHS", DEFAULT_VARIANT_WIDTHS)
+    return tuple(sorted(int(w) for w in str(raw).split(",") if w.strip().isdigit()))
+
+
+def snap_width(width: Optional[int]) -> Optional[int]:
+    """أصغر عرض مسموح ≥ المطلوب (أو الأكبر)، حتى لا تُنشأ نسخة لكل قيمة عشوائية في الرابط."""
+    widths = variant_widths()
+    if not width or width <= 0 or not widths:
+        return None
+    return next((w for w in widths if w >= width), widths[-1])
+
+
+def resized_variant(root: str, source: str, width: int) -> Optional[str]:
+    """مسار النسخة المصغرة (تُنشأ عند أول طلب)، أو None إن لم يكن الملف صورة قابلة للتصغير."""
+    fmt = RESIZABLE_EXTENSIONS.get(os.path.splitext(source)[1].lower())
+    if fmt is None:
+        return None
+    rel_path = os.path.relpath(source, os.path.realpath(root))
+    if rel_path.split(os.sep, 1)[0] == VARIANTS_DIR:
+        return None
+    target = os.path.join(root, VARIANTS_DIR, f"w{width}", rel_path)
+    try:
+        if os.path.getmtime(target) >= os.path.getmtime(source):
+            return target
+    except OSError:
+        pass
+    try:
+        from PIL import Image, ImageOps
+
+        with Image.open(source) as image:
+            if image.width <= width:
+                return None
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((width, width * 10), Image.LANCZOS)
+            if fmt == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            tmp_path = f"{target}.{os.getpid()}.tmp"
+            image.save(tmp_path, fmt, optimize=True, **({"quality": 82} if fmt != "PNG" else {}))
+        os.replace(tmp_path, target)
+        return target
+    except Exception as e:
+        logger.warning(f"Upload variant w{width} not generated for {rel_path}: {e}")
+        return None
+
+
+# ==================== الإرسال ====================
+
+def _not_modified(etag: str, max_age: int) -> Response:
+    response = Response(status=304)
+    response.set_etag(etag)
+    _cache_headers(response, max_age)
+    return response
+
+
+def _cache_headers(response: Response, max_age: int) -> None:
+    # ملفات الموظفين لا تُخزن في وسطاء مشتركين؛ المتصفح يعيد التحقق بـ ETag بعد انتهاء العمر
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = max_age
+
+
+def send_upload(path: str, root: str, width: Optional[int] = None, download_name: Optional[str] = None,
+                as_attachment: bool = False) -> Response:
+    """
+    إرسال ملف تحقق المستدعي من أنه داخل root (resolve_upload) ومن صلاحية الوصول إليه.
+    """
+    config = current_app.config
+    width = snap_width(width)
+    if width:
+        path = resized_variant(root, path, width) or path
+    stat = os.stat(path)
+    etag = strong_etag(path, stat)
+    max_age = config.get("UPLOADS_MAX_AGE", DEFAULT_MAX_AGE)
+    mimetype = mimetypes.guess_type(download_name or path)[0] or "application/octet-stream"
+
+    mode = (config.get("UPLOADS_DELIVERY_MODE") or MODE_APP).lower()
+    if mode == MODE_X_ACCEL:
+        if request.if_none_match.contains(etag):
+            return _not_modified(etag, max_age)
+        rel_path = os.path.relpath(path, os.path.realpath(root)).replace(os.sep, "/")
+        prefix = config.get("UPLOADS_ACCEL_PREFIX", "/_uploads_internal/").rstrip("/")
+        response = Response(mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(rel_path)}"
+        response.set_etag(etag)
+        response.last_modified = stat.st_mtime
+        if as_attachment or download_name:
+            response.headers.set("Content-Disposition", "attachment" if as_attachment else "inline",
+                                 filename=download_name or os.path.basename(path))
+    else:
+        response = send_file(
+            path, request.environ, mimetype=mimetype, as_attachment=as_attachment,
+            download_name=download_name, conditional=True, etag=etag, last_modified=stat.st_mtime,
+            max_age=max_age, use_x_sendfile=mode == MODE_X_SENDFILE,
+        )
+    _cache_headers(response, max_age)
+    return response
+
+
+# ==================== القوالب ====================
+
+def normalize_upload_path(path: str) -> str:
+    """'static/uploads/x.png' أو '/uploads/x.png' أو 'x.png' → 'x.png' (نسبي لمجلد الرفع)."""
+    path = (path or "").replace("\\", "/").lstrip("/")
+    for prefix in ("static/", "uploads/"):
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+    return path
+
+
+def upload_url(path: str, width: Optional[int] = None) -> str:
+    """رابط ملف مرفوع، مع ?w= لنسخة مصغرة في صفحات المعارض."""
+    values = {"w": snap_width(width)} if width else {}
+    return url_for("static", filename=f"uploads/{normalize_upload_path(path)}", **values)
+
+
+def init_upload_delivery(app) -> None:
+    app.jinja_env.globals["upload_url"] = upload_url
@@ -0,0 +1,82 @@
+"""add unified search index
+
+Revision ID: a1d4e7b9c2f0
+Revises: f3c1b9a7d2e4
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a1d4e7b9c2f0'
+down_revision = 'f3c1b9a7d2e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'search_index' not in inspector.get_table_names():
+        op.create_table(
+            'search_index',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('entity_type', sa.String(length=30), nullable=False),
+            sa.Column('entity_id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(length=255), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('entity_type', 'entity_id', name='uq_search_index_entity'),
+        )
+        op.create_index('idx_search_index_type', 'search_index', ['entity_type'], unique=False)
+
+    if bind.dialect.name == 'sqlite':
+        for table, tokenizer in (('search_index_fts', 'unicode61 remove_diacritics 2'),
+                                 ('search_index_trgm', 'trigram')):
+            op.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                f"content, content='search_index', content_rowid='id', tokenize='{tokenizer}')"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON search_index BEGIN "
+                f"INSERT INTO {table}(rowid, content) VALUES (new.id, new.content); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON search_index BEGIN "
+                f"INSERT INTO {table}({table}, rowid, content) VALUES ('delete', old.id, old.content); END"
+            )
+            op.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE ON search_index BEGIN "
+                f"INSERT INTO {table}({table}, rowid, content) VALUES ('delete', old.id, old.content); "
+                f"INSERT INTO {table}(rowid, content) VALUES (new.id, new.content); END"
+            )
+    elif bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS idx_search_index_tsv "
+            "ON search_index USING gin (to_tsvector('simple', content))"
+        )
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS idx_search_index_trgm "
+            "ON search_index USING gin (content gin_trgm_ops)"
+        )
+    # يُملأ الفهرس عند أول تشغيل للتطبيق أو عبر: flask search-reindex
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        for table in ('search_index_fts', 'search_index_trgm'):
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {table}_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {table}')
+    elif bind.dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS idx_search_index_trgm')
+        op.execute('DROP INDEX IF EXISTS idx_search_index_tsv')
+    inspector = sa.inspect(bind)
+    if 'search_index' in inspector.get_table_names():
+        op.drop_index('idx_search_index_type', table_name='search_index')
+        op.drop_table('search_index')
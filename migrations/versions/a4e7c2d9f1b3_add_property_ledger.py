@@ -0,0 +1,77 @@
+"""add property ledger tables
+
+Revision ID: a4e7c2d9f1b3
+Revises: f1d6a3c9b2e7
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'a4e7c2d9f1b3'
+down_revision = 'f1d6a3c9b2e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    if 'property_ledger_contracts' not in tables:
+        op.create_table(
+            'property_ledger_contracts',
+            sa.Column('property_id', sa.Integer(), nullable=False),
+            sa.Column('is_active', sa.Boolean(), nullable=False),
+            sa.Column('contract_status', sa.String(length=30), nullable=True),
+            sa.Column('property_type', sa.String(length=100), nullable=True),
+            sa.Column('annual_rent', sa.Float(), nullable=False),
+            sa.Column('period_amount', sa.Float(), nullable=False),
+            sa.Column('contract_end_date', sa.Date(), nullable=False),
+            sa.Column('expiring_on', sa.Date(), nullable=False),
+            sa.Column('expires_on', sa.Date(), nullable=False),
+            sa.Column('state', sa.String(length=12), nullable=False),
+            sa.Column('instalments', sa.Integer(), nullable=False),
+            sa.Column('total_due', sa.Float(), nullable=False),
+            sa.Column('total_paid', sa.Float(), nullable=False),
+            sa.Column('overdue_count', sa.Integer(), nullable=False),
+            sa.Column('next_due_date', sa.Date(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['property_id'], ['rental_properties.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('property_id'),
+        )
+        op.create_index('idx_property_ledger_contracts_state', 'property_ledger_contracts', ['is_active', 'state'])
+        op.create_index('idx_property_ledger_contracts_end', 'property_ledger_contracts',
+                        ['is_active', 'contract_end_date'])
+    if 'property_ledger_entries' not in tables:
+        op.create_table(
+            'property_ledger_entries',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('property_id', sa.Integer(), nullable=False),
+            sa.Column('seq', sa.Integer(), nullable=False),
+            sa.Column('due_date', sa.Date(), nullable=False),
+            sa.Column('amount_due', sa.Float(), nullable=False),
+            sa.Column('amount_paid', sa.Float(), nullable=False),
+            sa.Column('status', sa.String(length=12), nullable=False),
+            sa.Column('last_paid_on', sa.Date(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['property_id'], ['rental_properties.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('property_id', 'seq', name='uq_property_ledger_entry_seq'),
+        )
+        op.create_index('idx_property_ledger_entries_status', 'property_ledger_entries',
+                        ['is_active', 'status', 'due_date'])
+        op.create_index('idx_property_ledger_entries_due', 'property_ledger_entries', ['due_date'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    if 'property_ledger_entries' in tables:
+        op.drop_table('property_ledger_entries')
+    if 'property_ledger_contracts' in tables:
+        op.drop_table('property_ledger_contracts')
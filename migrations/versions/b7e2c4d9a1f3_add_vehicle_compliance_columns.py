@@ -0,0 +1,47 @@
+"""add precomputed compliance columns to vehicle
+
+Revision ID: b7e2c4d9a1f3
+Revises: a1d4e7b9c2f0
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b7e2c4d9a1f3'
+down_revision = 'a1d4e7b9c2f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {col['name'] for col in inspector.get_columns('vehicle')}
+    with op.batch_alter_table('vehicle', schema=None) as batch_op:
+        if 'next_expiry_date' not in columns:
+            batch_op.add_column(sa.Column('next_expiry_date', sa.Date(), nullable=True))
+            batch_op.create_index('ix_vehicle_next_expiry_date', ['next_expiry_date'], unique=False)
+        if 'expired_docs_mask' not in columns:
+            batch_op.add_column(sa.Column('expired_docs_mask', sa.Integer(), nullable=False, server_default='0'))
+            batch_op.create_index('ix_vehicle_expired_docs_mask', ['expired_docs_mask'], unique=False)
+        if 'compliance_checked_on' not in columns:
+            batch_op.add_column(sa.Column('compliance_checked_on', sa.Date(), nullable=True))
+    # القيم الأولية تُحسب عند أول تشغيل (refresh_all_compliance) أو عبر المهمة الليلية
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {col['name'] for col in inspector.get_columns('vehicle')}
+    indexes = {ix['name'] for ix in inspector.get_indexes('vehicle')}
+    with op.batch_alter_table('vehicle', schema=None) as batch_op:
+        if 'ix_vehicle_expired_docs_mask' in indexes:
+            batch_op.drop_index('ix_vehicle_expired_docs_mask')
+        if 'ix_vehicle_next_expiry_date' in indexes:
+            batch_op.drop_index('ix_vehicle_next_expiry_date')
+        for name in ('compliance_checked_on', 'expired_docs_mask', 'next_expiry_date'):
+            if name in columns:
+                batch_op.drop_column(name)
@@ -0,0 +1,60 @@
+"""make attendance (employee_id, date) unique
+
+Revision ID: b7e2d4f9a1c6
+Revises: e4a9c2d7f1b3
+Create Date: 2026-10-19 23:30:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b7e2d4f9a1c6'
+down_revision = 'e4a9c2d7f1b3'
+branch_labels = None
+depends_on = None
+
+INDEX_NAME = 'idx_attendance_employee_date'
+
+
+def _index(inspector):
+    for index in inspector.get_indexes('attendance'):
+        if index['name'] == INDEX_NAME:
+            return index
+    return None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'attendance' not in inspector.get_table_names():
+        return
+    index = _index(inspector)
+    if index is not None and index.get('unique'):
+        return
+    duplicates = bind.execute(sa.text(
+        'SELECT employee_id, date, COUNT(*) FROM attendance '
+        'GROUP BY employee_id, date HAVING COUNT(*) > 1'
+    )).fetchall()
+    if duplicates:
+        sample = ', '.join(f'({row[0]}, {row[1]})' for row in duplicates[:10])
+        raise RuntimeError(
+            f'attendance has {len(duplicates)} duplicated (employee_id, date) pairs, e.g. {sample}. '
+            'Merge or delete the extra rows, then re-run the upgrade.'
+        )
+    if index is not None:
+        op.drop_index(INDEX_NAME, table_name='attendance')
+    op.create_index(INDEX_NAME, 'attendance', ['employee_id', 'date'], unique=True)
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'attendance' not in inspector.get_table_names():
+        return
+    index = _index(inspector)
+    if index is None or not index.get('unique'):
+        return
+    op.drop_index(INDEX_NAME, table_name='attendance')
+    op.create_index(INDEX_NAME, 'attendance', ['employee_id', 'date'])
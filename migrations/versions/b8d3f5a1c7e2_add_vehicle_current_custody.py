@@ -0,0 +1,43 @@
+"""add vehicle current custody table
+
+Revision ID: b8d3f5a1c7e2
+Revises: a4e7c2d9f1b3
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'b8d3f5a1c7e2'
+down_revision = 'a4e7c2d9f1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'vehicle_current_custody' not in inspector.get_table_names():
+        op.create_table(
+            'vehicle_current_custody',
+            sa.Column('vehicle_id', sa.Integer(), nullable=False),
+            sa.Column('handover_id', sa.Integer(), nullable=False),
+            sa.Column('employee_id', sa.Integer(), nullable=True),
+            sa.Column('person_name', sa.String(length=100), nullable=True),
+            sa.Column('since', sa.Date(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['vehicle_id'], ['vehicle.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['handover_id'], ['vehicle_handover.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['employee_id'], ['employee.id'], ondelete='SET NULL'),
+            sa.PrimaryKeyConstraint('vehicle_id'),
+        )
+        op.create_index('idx_vehicle_custody_employee', 'vehicle_current_custody', ['employee_id'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'vehicle_current_custody' in inspector.get_table_names():
+        op.drop_table('vehicle_current_custody')
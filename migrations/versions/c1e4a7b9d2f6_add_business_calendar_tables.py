@@ -0,0 +1,61 @@
+"""add business calendar weekend rules and holidays
+
+Revision ID: c1e4a7b9d2f6
+Revises: b8d3f5a1c7e2
+Create Date: 2026-10-19 20:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c1e4a7b9d2f6'
+down_revision = 'b8d3f5a1c7e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    if 'business_weekend_rules' not in tables:
+        op.create_table(
+            'business_weekend_rules',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('department_id', sa.Integer(), nullable=True),
+            sa.Column('weekend_days', sa.String(length=20), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['department_id'], ['department.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('department_id'),
+        )
+    if 'business_holidays' not in tables:
+        op.create_table(
+            'business_holidays',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=100), nullable=False),
+            sa.Column('calendar', sa.String(length=10), nullable=False),
+            sa.Column('month', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Integer(), nullable=False),
+            sa.Column('year', sa.Integer(), nullable=True),
+            sa.Column('duration_days', sa.Integer(), nullable=False),
+            sa.Column('department_id', sa.Integer(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['department_id'], ['department.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('idx_business_holidays_active', 'business_holidays', ['is_active', 'department_id'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    if 'business_holidays' in tables:
+        op.drop_table('business_holidays')
+    if 'business_weekend_rules' in tables:
+        op.drop_table('business_weekend_rules')
@@ -0,0 +1,58 @@
+"""add expiry calendar and sim renewal date
+
+Revision ID: c5f8a2e6d3b1
+Revises: b7e2c4d9a1f3
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'c5f8a2e6d3b1'
+down_revision = 'b7e2c4d9a1f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'expiry_calendar' not in inspector.get_table_names():
+        op.create_table(
+            'expiry_calendar',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('entity_type', sa.String(length=30), nullable=False),
+            sa.Column('entity_id', sa.Integer(), nullable=False),
+            sa.Column('doc_type', sa.String(length=50), nullable=False),
+            sa.Column('doc_label', sa.String(length=100), nullable=False),
+            sa.Column('owner_label', sa.String(length=255), nullable=False),
+            sa.Column('employee_id', sa.Integer(), nullable=True),
+            sa.Column('expiry_date', sa.Date(), nullable=False),
+            sa.Column('bucket', sa.String(length=10), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('entity_type', 'entity_id', 'doc_type', name='uq_expiry_calendar_doc'),
+        )
+        op.create_index('idx_expiry_calendar_date', 'expiry_calendar', ['expiry_date'], unique=False)
+        op.create_index('idx_expiry_calendar_bucket', 'expiry_calendar', ['bucket', 'expiry_date'], unique=False)
+    # يُملأ الجدول عند أول تشغيل (init_expiry_calendar) أو عبر flask expiry-calendar-rebuild
+
+    columns = {col['name'] for col in inspector.get_columns('sim_cards')}
+    if 'renewal_date' not in columns:
+        with op.batch_alter_table('sim_cards', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('renewal_date', sa.Date(), nullable=True))
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    columns = {col['name'] for col in inspector.get_columns('sim_cards')}
+    if 'renewal_date' in columns:
+        with op.batch_alter_table('sim_cards', schema=None) as batch_op:
+            batch_op.drop_column('renewal_date')
+    if 'expiry_calendar' in inspector.get_table_names():
+        op.drop_index('idx_expiry_calendar_bucket', table_name='expiry_calendar')
+        op.drop_index('idx_expiry_calendar_date', table_name='expiry_calendar')
+        op.drop_table('expiry_calendar')
@@ -0,0 +1,60 @@
+"""add background jobs queue
+
+Revision ID: d2a7f4c8e6b9
+Revises: c5f8a2e6d3b1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd2a7f4c8e6b9'
+down_revision = 'c5f8a2e6d3b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'background_jobs' in inspector.get_table_names():
+        return
+    op.create_table(
+        'background_jobs',
+        sa.Column('id', sa.String(length=32), nullable=False),
+        sa.Column('kind', sa.String(length=64), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('payload', sa.JSON(), nullable=True),
+        sa.Column('progress', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('stage', sa.String(length=50), nullable=True),
+        sa.Column('message', sa.String(length=500), nullable=True),
+        sa.Column('state', sa.JSON(), nullable=True),
+        sa.Column('result', sa.JSON(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('max_attempts', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('idempotency_key', sa.String(length=190), nullable=True),
+        sa.Column('owner_id', sa.Integer(), nullable=True),
+        sa.Column('cancel_requested', sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column('run_after', sa.DateTime(), nullable=False),
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.Column('finished_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('idempotency_key'),
+    )
+    op.create_index('idx_background_jobs_claim', 'background_jobs', ['status', 'run_after'], unique=False)
+    op.create_index('idx_background_jobs_kind', 'background_jobs', ['kind', 'created_at'], unique=False)
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'background_jobs' in inspector.get_table_names():
+        op.drop_index('idx_background_jobs_kind', table_name='background_jobs')
+        op.drop_index('idx_background_jobs_claim', table_name='background_jobs')
+        op.drop_table('background_jobs')
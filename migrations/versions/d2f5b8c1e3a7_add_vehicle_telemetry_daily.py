@@ -0,0 +1,57 @@
+"""add vehicle telemetry daily rollups
+
+Revision ID: d2f5b8c1e3a7
+Revises: c1e4a7b9d2f6
+Create Date: 2026-10-19 22:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'd2f5b8c1e3a7'
+down_revision = 'c1e4a7b9d2f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'vehicle_telemetry_daily' not in inspector.get_table_names():
+        op.create_table(
+            'vehicle_telemetry_daily',
+            sa.Column('vehicle_id', sa.Integer(), nullable=False),
+            sa.Column('day', sa.Date(), nullable=False),
+            sa.Column('distance_km', sa.Float(), nullable=False),
+            sa.Column('driving_seconds', sa.Integer(), nullable=False),
+            sa.Column('idle_seconds', sa.Integer(), nullable=False),
+            sa.Column('speeding_events', sa.Integer(), nullable=False),
+            sa.Column('max_speed_kmh', sa.Float(), nullable=False),
+            sa.Column('points', sa.Integer(), nullable=False),
+            sa.Column('first_point_at', sa.DateTime(), nullable=True),
+            sa.Column('last_point_at', sa.DateTime(), nullable=True),
+            sa.Column('last_latitude', sa.Float(), nullable=True),
+            sa.Column('last_longitude', sa.Float(), nullable=True),
+            sa.Column('last_speed_kmh', sa.Float(), nullable=True),
+            sa.Column('fuel_liters', sa.Float(), nullable=False),
+            sa.Column('fuel_cost', sa.Float(), nullable=False),
+            sa.Column('odometer_km', sa.Integer(), nullable=True),
+            sa.Column('odometer_delta_km', sa.Integer(), nullable=True),
+            sa.Column('gps_interval_km', sa.Float(), nullable=True),
+            sa.Column('km_per_liter', sa.Float(), nullable=True),
+            sa.Column('anomaly', sa.String(length=30), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['vehicle_id'], ['vehicle.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('vehicle_id', 'day'),
+        )
+        op.create_index('idx_vehicle_telemetry_day', 'vehicle_telemetry_daily', ['day'])
+        op.create_index('idx_vehicle_telemetry_anomaly', 'vehicle_telemetry_daily', ['anomaly', 'day'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'vehicle_telemetry_daily' in inspector.get_table_names():
+        op.drop_table('vehicle_telemetry_daily')
@@ -0,0 +1,64 @@
+"""add staged import batches and rows
+
+Revision ID: e4a9c2d7f1b3
+Revises: d2f5b8c1e3a7
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e4a9c2d7f1b3'
+down_revision = 'd2f5b8c1e3a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    if 'import_batches' not in tables:
+        op.create_table(
+            'import_batches',
+            sa.Column('id', sa.String(length=32), nullable=False),
+            sa.Column('kind', sa.String(length=32), nullable=False),
+            sa.Column('filename', sa.String(length=255), nullable=True),
+            sa.Column('status', sa.String(length=16), nullable=False),
+            sa.Column('total_rows', sa.Integer(), nullable=False),
+            sa.Column('counts', sa.JSON(), nullable=True),
+            sa.Column('created_by', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=False),
+            sa.Column('applied_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('idx_import_batches_status_created', 'import_batches', ['status', 'created_at'])
+    if 'import_staging_rows' not in tables:
+        op.create_table(
+            'import_staging_rows',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('batch_id', sa.String(length=32), nullable=False),
+            sa.Column('row_number', sa.Integer(), nullable=False),
+            sa.Column('key', sa.String(length=100), nullable=True),
+            sa.Column('status', sa.String(length=16), nullable=False),
+            sa.Column('target_id', sa.Integer(), nullable=True),
+            sa.Column('data', sa.JSON(), nullable=True),
+            sa.Column('changes', sa.JSON(), nullable=True),
+            sa.Column('message', sa.String(length=255), nullable=True),
+            sa.ForeignKeyConstraint(['batch_id'], ['import_batches.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('idx_import_staging_batch_status', 'import_staging_rows', ['batch_id', 'status'])
+        op.create_index('idx_import_staging_batch_key', 'import_staging_rows', ['batch_id', 'key'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    if 'import_staging_rows' in tables:
+        op.drop_table('import_staging_rows')
+    if 'import_batches' in tables:
+        op.drop_table('import_batches')
@@ -0,0 +1,45 @@
+"""add payslip dispatch results
+
+Revision ID: e8b3c1f5a7d2
+Revises: d2a7f4c8e6b9
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'e8b3c1f5a7d2'
+down_revision = 'd2a7f4c8e6b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'payslip_dispatch_results' in inspector.get_table_names():
+        return
+    op.create_table(
+        'payslip_dispatch_results',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('dispatch_key', sa.String(length=190), nullable=False),
+        sa.Column('channel', sa.String(length=20), nullable=False),
+        sa.Column('payroll_record_id', sa.Integer(), nullable=False),
+        sa.Column('employee_id', sa.Integer(), nullable=True),
+        sa.Column('recipient', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('error', sa.String(length=500), nullable=True),
+        sa.Column('provider_message_id', sa.String(length=100), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('dispatch_key', 'payroll_record_id', name='uq_payslip_dispatch_record'),
+    )
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'payslip_dispatch_results' in inspector.get_table_names():
+        op.drop_table('payslip_dispatch_results')
@@ -0,0 +1,71 @@
+"""add drive sync tables
+
+Revision ID: f1d6a3c9b2e7
+Revises: e8b3c1f5a7d2
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'f1d6a3c9b2e7'
+down_revision = 'e8b3c1f5a7d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    if 'drive_folder_cache' not in tables:
+        op.create_table(
+            'drive_folder_cache',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('parent_id', sa.String(length=100), nullable=False),
+            sa.Column('name', sa.String(length=255), nullable=False),
+            sa.Column('folder_id', sa.String(length=100), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('parent_id', 'name', name='uq_drive_folder_cache_path'),
+        )
+        op.create_index('ix_drive_folder_cache_folder_id', 'drive_folder_cache', ['folder_id'])
+    if 'drive_uploads' not in tables:
+        op.create_table(
+            'drive_uploads',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('record_type', sa.String(length=50), nullable=False),
+            sa.Column('record_id', sa.Integer(), nullable=False),
+            sa.Column('role', sa.String(length=20), nullable=False),
+            sa.Column('source', sa.String(length=500), nullable=False),
+            sa.Column('folder_path', sa.String(length=500), nullable=False),
+            sa.Column('file_name', sa.String(length=255), nullable=True),
+            sa.Column('content_hash', sa.String(length=64), nullable=True),
+            sa.Column('file_size', sa.BigInteger(), nullable=True),
+            sa.Column('status', sa.String(length=16), nullable=False),
+            sa.Column('attempts', sa.Integer(), nullable=False),
+            sa.Column('error', sa.String(length=500), nullable=True),
+            sa.Column('folder_id', sa.String(length=100), nullable=True),
+            sa.Column('file_id', sa.String(length=100), nullable=True),
+            sa.Column('web_view_link', sa.String(length=500), nullable=True),
+            sa.Column('download_link', sa.String(length=500), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('uploaded_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_drive_uploads_content_hash', 'drive_uploads', ['content_hash'])
+        op.create_index('idx_drive_uploads_record', 'drive_uploads', ['record_type', 'record_id'])
+        op.create_index('idx_drive_uploads_status', 'drive_uploads', ['status', 'created_at'])
+
+
+def downgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = inspector.get_table_names()
+    if 'drive_uploads' in tables:
+        op.drop_table('drive_uploads')
+    if 'drive_folder_cache' in tables:
+        op.drop_table('drive_folder_cache')
@@ -6,12 +6,20 @@ backward compatibility and ensure flask db migrate recognizes all tables.
 All models are organized into domain-specific modules:
 - core/domain/models.py: User, UserRole, Permission, Module, SystemAudit, AuditLog, Notification
 - modules/employees/domain/models.py: Employee, Department, Attendance, Salary, Document, Nationality, EmployeeLocation
-- modules/vehicles/domain/: Vehicle, VehicleRental, VehicleWorkshop, and maintenance/inspection/accident models
+- modules/vehicles/domain/: Vehicle, VehicleRental, VehicleWorkshop, and maintenance/inspection/accident models,
+  VehicleCurrentCustody, VehicleTelemetryDaily
 - modules/attendance/domain/models.py: Geofence, GeofenceEvent, GeofenceSession, GeofenceAttendance
 - modules/operations/domain/models.py: EmployeeRequest, InvoiceRequest, AdvancePaymentRequest, CarWashRequest, etc.
 - modules/devices/domain/models.py: MobileDevice, SimCard, ImportedPhoneNumber, DeviceAssignment, VoiceHubCall, VoiceHubAnalysis
-- modules/properties/domain/models.py: RentalProperty, PropertyImage, PropertyPayment, PropertyFurnishing
+- modules/properties/domain/models.py: RentalProperty, PropertyImage, PropertyPayment, PropertyFurnishing,
+  PropertyLedgerContract, PropertyLedgerEntry
 - modules/fees/domain/models.py: RenewalFee, Fee, FeesCost
+- modules/search/domain/models.py: SearchIndexEntry
+- modules/expiry/domain/models.py: ExpiryCalendarEntry
+- modules/business_calendar/domain/models.py: WeekendRule, BusinessHoliday
+- modules/jobs/domain/models.py: BackgroundJob
+- modules/imports/domain/models.py: ImportBatch, ImportStagingRow
+- modules/drive_sync/domain/models.py: DriveFolderCache, DriveUpload
 """
 
 from core.extensions import db
@@ -63,6 +71,8 @@ from modules.vehicles.domain.models import (
     VehicleHandover,
     VehicleHandoverImage
 )
+from modules.vehicles.domain.custody_models import VehicleCurrentCustody
+from modules.vehicles.domain.telemetry_models import VehicleTelemetryDaily
 
 from modules.vehicles.domain.vehicle_maintenance_models import (
     VehicleChecklist,
@@ -141,6 +151,8 @@ from modules.properties.domain.models import (
     PropertyImage,
     PropertyPayment,
     PropertyFurnishing,
+    PropertyLedgerContract,
+    PropertyLedgerEntry,
     property_employees
 )
 
@@ -161,6 +173,36 @@ from modules.leave.domain.models import (
     LeaveBalance
 )
 
+# ============================================================================
+# Search Domain Models
+# ============================================================================
+from modules.search.domain.models import SearchIndexEntry
+
+# ============================================================================
+# Expiry Calendar Domain Models
+# ============================================================================
+from modules.expiry.domain.models import ExpiryCalendarEntry
+
+# ============================================================================
+# Business Calendar Domain Models
+# ============================================================================
+from modules.business_calendar.domain.models import BusinessHoliday, WeekendRule
+
+# ============================================================================
+# Background Jobs Domain Models
+# ============================================================================
+from modules.jobs.domain.models import BackgroundJob
+
+# ============================================================================
+# Staged Imports Domain Models
+# ============================================================================
+from modules.imports.domain.models import ImportBatch, ImportStagingRow
+
+# ============================================================================
+# Google Drive Sync Domain Models
+# ============================================================================
+from modules.drive_sync.domain.models import DriveFolderCache, DriveUpload
+
 # ============================================================================
 # EXPORT ALL MODELS
 # ============================================================================
@@ -176,7 +218,7 @@ __all__ = [
 
     # Vehicles
     'Vehicle', 'VehicleRental', 'VehicleWorkshop', 'VehicleWorkshopImage', 'VehicleProject',
-    'VehicleHandover', 'VehicleHandoverImage',
+    'VehicleHandover', 'VehicleHandoverImage', 'VehicleCurrentCustody', 'VehicleTelemetryDaily',
     'VehicleChecklist', 'VehicleChecklistItem', 'VehicleChecklistImage', 'VehicleDamageMarker',
     'VehicleMaintenance', 'VehicleMaintenanceImage', 'VehicleFuelConsumption',
     'VehiclePeriodicInspection', 'VehicleSafetyCheck',
@@ -205,6 +247,7 @@ __all__ = [
 
     # Properties
     'RentalProperty', 'PropertyImage', 'PropertyPayment', 'PropertyFurnishing', 'property_employees',
+    'PropertyLedgerContract', 'PropertyLedgerEntry',
 
     # Fees
     'RenewalFee', 'Fee', 'FeesCost',
@@ -212,6 +255,20 @@ __all__ = [
     # Leave
     'LeaveRequest', 'LeaveBalance',
 
+    # Search
+    'SearchIndexEntry',
+
+    # Expiry calendar
+    'ExpiryCalendarEntry',
+    # Business calendar
+    'WeekendRule', 'BusinessHoliday',
+    # Background jobs
+    'BackgroundJob',
+    # Staged imports
+    'ImportBatch', 'ImportStagingRow',
+    # Google Drive sync
+    'DriveFolderCache', 'DriveUpload',
+
     # Domain aliases requested in phase 5
     'VehicleInsurance', 'Contract', 'Request',
 ]
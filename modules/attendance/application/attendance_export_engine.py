@@ -0,0 +1,245 @@
+"""
+محرك تصدير الحضور إلى Excel (مصفوفة الموظف × اليوم) لملفات الأقسام والشهر والسنة.
+- السجلات تُقرأ كأعمدة (employee_id, date, status) على دفعات من مؤشر الخادم (yield_per، ATTENDANCE_EXPORT_CHUNK_SIZE)
+  وتُحفظ مصفوفات numpy صغيرة؛ لا تُنشأ كائنات Attendance.
+- pivot_matrix تبني مصفوفة رموز int8 (موظف × يوم) بفهرسة متجهة واحدة، والإحصائيات bincount عليها.
+- الكتابة بـ xlsxwriter في وضع constant_memory (كل صف يُكتب للقرص فور انتهائه) بتنسيقات مسجلة مرة لكل ملف
+  ومشتركة بين كل الخلايا؛ لذلك يجب أن تُكتب صفوف كل ورقة بالترتيب.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+from io import BytesIO
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import xlsxwriter
+from flask import current_app, has_app_context
+from sqlalchemy import select
+
+from core.extensions import db
+from models import Attendance
+
+DEFAULT_CHUNK_SIZE = 5000
+
+CODE_BLANK = 0
+CODE_PRESENT = 1
+CODE_ABSENT = 2
+CODE_LEAVE = 3
+CODE_SICK = 4
+STATUS_CODES = {"present": CODE_PRESENT, "absent": CODE_ABSENT, "leave": CODE_LEAVE, "sick": CODE_SICK}
+CODE_COUNT = 5
+
+# الرمز المعروض والتنسيق لكل رمز حالة (بترتيب CODE_*)
+MATRIX_LABELS = ("", "P", "A", "L", "S")
+MATRIX_CELL_FORMATS = ("normal", "present", "absent", "leave", "sick")
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+NO_DEPARTMENT = "بدون قسم"
+
+_CELL = {"border": 1, "align": "center", "valign": "vcenter"}
+_HEADER = {"bold": True, "bg_color": "#00B0B0", "font_color": "white", "border": 1, "align": "center",
+           "valign": "vcenter", "text_wrap": True}
+
+MATRIX_FORMATS = {
+    "header": _HEADER,
+    "date_header": _HEADER,
+    "normal": _CELL,
+    "right": dict(_CELL, align="right"),
+    "present": dict(_CELL, bold=True, font_color="#006100"),
+    "absent": dict(_CELL, bold=True, font_color="#FF0000"),
+    "leave": dict(_CELL, font_color="#FF9900"),
+    "sick": dict(_CELL, font_color="#0070C0"),
+    "legend_title": {"bold": True, "font_size": 14, "align": "center", "valign": "vcenter"},
+    "legend_description": {"align": "right", "valign": "vcenter", "text_wrap": True},
+}
+
+AttendanceFrame = namedtuple("AttendanceFrame", "employee_ids ordinals codes")
+
+
+def _config(key: str, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+# ==================== القراءة ====================
+
+def _frame_from_columns(employee_ids, dates, statuses) -> AttendanceFrame:
+    # fromiter على الأعمدة أسرع من بناء مصفوفات datetime64 أو Series من كائنات بايثون
+    count = len(employee_ids)
+    return AttendanceFrame(
+        np.fromiter(employee_ids, np.int64, count),
+        np.fromiter(map(date.toordinal, dates), np.int64, count),
+        np.fromiter((STATUS_CODES.get(status, CODE_BLANK) for status in statuses), np.int8, count),
+    )
+
+
+def _concat(parts: List[AttendanceFrame]) -> AttendanceFrame:
+    if not parts:
+        return AttendanceFrame(np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.int8))
+    return AttendanceFrame(*(np.concatenate(column) for column in zip(*parts)))
+
+
+def read_frame(statement, chunk_size: Optional[int] = None) -> AttendanceFrame:
+    """تنفيذ select يعيد (employee_id, date, status) على دفعات من مؤشر الخادم وتجميعه في مصفوفات."""
+    size = chunk_size or int(_config("ATTENDANCE_EXPORT_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+    result = db.session.execute(statement.execution_options(yield_per=size))
+    parts = [_frame_from_columns(*zip(*partition)) for partition in result.partitions() if partition]
+    return _concat(parts)
+
+
+def stream_attendance(start_date: date, end_date: date, employee_ids: Optional[Iterable[int]] = None,
+                      chunk_size: Optional[int] = None) -> AttendanceFrame:
+    """سجلات الحضور في الفترة (لموظفين محددين إن مُرروا)."""
+    table = Attendance.__table__
+    statement = select(table.c.employee_id, table.c.date, table.c.status).where(
+        table.c.date.between(start_date, end_date)
+    )
+    if employee_ids is not None:
+        statement = statement.where(table.c.employee_id.in_(list(employee_ids)))
+    return read_frame(statement, chunk_size)
+
+
+def as_frame(attendances) -> AttendanceFrame:
+    """AttendanceFrame كما هو، أو من قائمة كائنات لها employee_id و date و status."""
+    if isinstance(attendances, AttendanceFrame):
+        return attendances
+    records = list(attendances)
+    return _frame_from_columns([a.employee_id for a in records], [a.date for a in records],
+                               [a.status for a in records])
+
+
+# ==================== المصفوفة والإحصائيات ====================
+
+def date_range(start_date: date, end_date: date) -> List[date]:
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+
+def pivot_matrix(frame: AttendanceFrame, employee_ids: Sequence[int], day_ordinals: Sequence[int],
+                 missing: int = CODE_BLANK) -> np.ndarray:
+    """مصفوفة رموز (موظف × يوم) بترتيب employee_ids و day_ordinals؛ missing لليوم بلا سجل."""
+    matrix = np.full((len(employee_ids), len(day_ordinals)), missing, dtype=np.int8)
+    if not len(frame.codes) or not matrix.size:
+        return matrix
+    rows = pd.Index(employee_ids).get_indexer(frame.employee_ids)
+    cols = pd.Index(day_ordinals).get_indexer(frame.ordinals)
+    keep = (rows >= 0) & (cols >= 0)
+    matrix[rows[keep], cols[keep]] = frame.codes[keep]
+    return matrix
+
+
+def status_counts(codes: np.ndarray) -> np.ndarray:
+    """عدد كل رمز حالة (مفهرس بـ CODE_*)."""
+    return np.bincount(codes.astype(np.int64).ravel(), minlength=CODE_COUNT)
+
+
+def grouped_status_counts(frame: AttendanceFrame, group_of: Dict[int, int], groups: int) -> np.ndarray:
+    """(مجموعة × رمز) لسجلات الموظفين المعروفين؛ group_of: معرف الموظف -> رقم المجموعة."""
+    index = pd.Series(group_of, dtype=np.int64)
+    groups_of_rows = index.reindex(frame.employee_ids).to_numpy()
+    known = ~np.isnan(groups_of_rows)
+    flat = groups_of_rows[known].astype(np.int64) * CODE_COUNT + frame.codes[known]
+    return np.bincount(flat, minlength=groups * CODE_COUNT).reshape(groups, CODE_COUNT)
+
+
+def daily_status_counts(frame: AttendanceFrame, day_ordinals: Sequence[int]) -> np.ndarray:
+    """(يوم × رمز) لكل يوم في day_ordinals."""
+    cols = pd.Index(day_ordinals).get_indexer(frame.ordinals)
+    keep = cols >= 0
+    flat = cols[keep].astype(np.int64) * CODE_COUNT + frame.codes[keep]
+    return np.bincount(flat, minlength=len(day_ordinals) * CODE_COUNT).reshape(len(day_ordinals), CODE_COUNT)
+
+
+def department_name(employee) -> str:
+    return ", ".join(d.name for d in employee.departments) if employee.departments else NO_DEPARTMENT
+
+
+def group_by_department(employees) -> Dict[str, list]:
+    """أسماء الأقسام (مجمعة كما في الأوراق) -> الموظفون، بترتيب أول ظهور."""
+    departments: Dict[str, list] = {}
+    for employee in employees:
+        departments.setdefault(department_name(employee), []).append(employee)
+    return departments
+
+
+# ==================== الكتابة ====================
+
+def new_workbook(output: BytesIO) -> xlsxwriter.Workbook:
+    return xlsxwriter.Workbook(output, {"constant_memory": True})
+
+
+def register_formats(workbook, specs: Dict[str, dict]) -> Dict[str, object]:
+    """تسجيل التنسيقات مرة لكل ملف؛ الخلايا تشير إلى الكائن نفسه بدل إنشاء تنسيق لكل خلية."""
+    return {name: workbook.add_format(spec) for name, spec in specs.items()}
+
+
+def write_matrix_sheet(workbook, formats: Dict[str, object], sheet_name: str, headers: Sequence[str],
+                       widths: Sequence[float], info_rows: Sequence[Sequence[tuple]], dates: Sequence[date],
+                       matrix: np.ndarray, day_width: float = 5,
+                       labels: Sequence[str] = MATRIX_LABELS,
+                       cell_formats: Sequence[str] = MATRIX_CELL_FORMATS,
+                       total_code: int = CODE_PRESENT, rtl: bool = True,
+                       header_height: Optional[float] = None):
+    """
+    ورقة قسم: صف أيام الأسبوع ثم صف العناوين ثم صف لكل موظف.
+    info_rows: لكل موظف قائمة (قيمة، اسم تنسيق) للأعمدة قبل Total؛ Total عدد total_code في صفه.
+    """
+    worksheet = workbook.add_worksheet(sheet_name)
+    if rtl:
+        worksheet.right_to_left()
+    first_date_col = len(headers)
+    for col, width in enumerate(widths):
+        worksheet.set_column(col, col, width)
+    if dates:
+        worksheet.set_column(first_date_col, first_date_col + len(dates) - 1, day_width)
+
+    worksheet.set_row(0, 30)
+    for offset, day in enumerate(dates):
+        worksheet.write_string(0, first_date_col + offset, f"{WEEKDAYS[day.weekday()]}\n{day.strftime('%d/%m/%Y')}",
+                               formats["date_header"])
+    if header_height:
+        worksheet.set_row(1, header_height)
+    for col, header in enumerate(headers):
+        worksheet.write_string(1, col, header, formats["header"])
+
+    cell_format_objects = [formats[name] for name in cell_formats]
+    totals = (matrix == total_code).sum(axis=1) if matrix.size else np.zeros(len(info_rows), dtype=np.int64)
+    for index, info in enumerate(info_rows):
+        row = index + 2
+        for col, (value, format_name) in enumerate(info):
+            worksheet.write(row, col, value, formats[format_name])
+        worksheet.write_number(row, first_date_col - 1, int(totals[index]), formats["normal"])
+        col = first_date_col
+        for code in matrix[index].tolist():
+            label = labels[code]
+            if label:
+                worksheet.write_string(row, col, label, cell_format_objects[code])
+            else:
+                worksheet.write_blank(row, col, None, cell_format_objects[code])
+            col += 1
+    return worksheet
+
+
+def write_legend(workbook, formats: Dict[str, object]):
+    """ورقة دليل رموز الحضور والغياب."""
+    legend = workbook.add_worksheet("دليل الرموز")
+    legend.set_column(0, 0, 10)
+    legend.set_column(1, 1, 40)
+    legend.merge_range("A1:B1", "دليل رموز الحضور والغياب", formats["legend_title"])
+    rows = (("P", "present", "حاضر (Present)"), ("A", "absent", "غائب (Absent)"),
+            ("L", "leave", "إجازة (Leave)"), ("S", "sick", "مرضي (Sick Leave)"))
+    for row, (label, format_name, description) in enumerate(rows, start=2):
+        legend.write_string(row, 0, label, formats[format_name])
+        legend.write_string(row, 1, description, formats["legend_description"])
+    return legend
+
+
+def build_workbook(write: Callable[[xlsxwriter.Workbook], None]) -> BytesIO:
+    """تنفيذ write على ملف constant_memory جديد وإرجاعه جاهزاً للإرسال."""
+    output = BytesIO()
+    workbook = new_workbook(output)
+    try:
+        write(workbook)
+    finally:
+        workbook.close()
+    output.seek(0)
+    return output
@@ -0,0 +1,351 @@
+"""
+خط معالجة الحضور والانصراف من تطبيق الجوال (routes/attendance_api.py).
+- مناطق العمل المؤهلة للموظف (المعيّنة له أو لأحد أقسامه) صفوف خفيفة في ذاكرة العملية
+  (CHECK_IN_FENCE_CACHE_TTL)؛ حفظ منطقة أو تغيير تعيينها يمسحها، فالتحقق من الموقع حساب مسافات بلا استعلام.
+- صورة الوجه تُقرأ داخل الطلب وتُكتب على القرص من مجمّع خيوط (CHECK_IN_IMAGE_WORKERS) بعد الحفظ؛
+  مسارها يُحدد مسبقاً ويُخزن في السجل.
+- الحضور عبارة upsert واحدة على (employee_id, date) — ON CONFLICT في PostgreSQL/SQLite، وتحديث ثم إدراج
+  في غيرهما — والموقع INSERT واحد، في معاملة واحدة. الانصراف UPDATE مشروط واحد + INSERT الموقع.
+- العبارات المباشرة لا تطلق أحداث Attendance؛ عرض بوابة الموظف المعني يُبطل صراحة بعد الحفظ.
+- زمن كل مرحلة في نافذة متحركة: get_check_in_stats() (p50/p95/p99) وعبر /api/health/check-in.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime
+from datetime import time as time_of_day
+from math import atan2, cos, radians, sin, sqrt
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from core.extensions import db
+from models import Attendance, Employee, EmployeeLocation, Geofence
+from modules.attendance.domain.models import employee_geofences
+from modules.employees.application.portal_view_service import invalidate_portal_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FENCE_CACHE_TTL = 300
+DEFAULT_IMAGE_WORKERS = 2
+FENCE_CACHE_SIZE = 4096
+LATENCY_WINDOW = 2048
+EARTH_RADIUS_M = 6371000
+
+CODE_ALREADY_CHECKED_IN = "ALREADY_CHECKED_IN"
+CODE_NO_CHECK_IN = "NO_CHECK_IN"
+CODE_ALREADY_CHECKED_OUT = "ALREADY_CHECKED_OUT"
+
+Fence = namedtuple("Fence", "id name latitude longitude radius")
+StagedImage = namedtuple("StagedImage", "relative_path absolute_path data")
+
+
+@dataclass
+class AttendanceWrite:
+    ok: bool
+    code: Optional[str] = None
+    attendance_id: Optional[int] = None
+    check_in: Optional[time_of_day] = None
+    check_out: Optional[time_of_day] = None
+
+
+_fences: "OrderedDict[tuple, tuple]" = OrderedDict()
+_fences_lock = threading.Lock()
+_latency: Dict[str, deque] = {}
+_latency_lock = threading.Lock()
+_executor = {"pool": None}
+_executor_lock = threading.Lock()
+_state = {"listeners": False}
+
+
+def _config(key: str, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+# ==================== زمن المراحل ====================
+
+def observe(stage: str, elapsed_ms: float) -> None:
+    with _latency_lock:
+        samples = _latency.get(stage)
+        if samples is None:
+            samples = _latency[stage] = deque(maxlen=LATENCY_WINDOW)
+        samples.append(elapsed_ms)
+
+
+@contextmanager
+def timed(stage: str):
+    """قياس مرحلة (يُستخدم مع with أو كمزخرف لمسار)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, (time.perf_counter() - started) * 1000)
+
+
+def _percentile(ordered: Sequence[float], fraction: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def get_check_in_stats() -> Dict[str, Dict[str, float]]:
+    """{مرحلة: count و p50/p95/p99/max بالميلي ثانية} لآخر LATENCY_WINDOW عينة في هذه العملية."""
+    with _latency_lock:
+        snapshot = {stage: sorted(samples) for stage, samples in _latency.items()}
+    return {
+        stage: {
+            "count": len(ordered),
+            "p50_ms": round(_percentile(ordered, 0.50), 2),
+            "p95_ms": round(_percentile(ordered, 0.95), 2),
+            "p99_ms": round(_percentile(ordered, 0.99), 2),
+            "max_ms": round(ordered[-1], 2),
+        }
+        for stage, ordered in sorted(snapshot.items()) if ordered
+    }
+
+
+def reset_check_in_stats() -> None:
+    with _latency_lock:
+        _latency.clear()
+
+
+# ==================== مناطق العمل ====================
+
+def _department_ids(employee) -> Tuple[int, ...]:
+    """أقسام الموظف: من علاقة Employee.departments، أو من لقطة EmployeePrincipal المحسوبة منها."""
+    departments = getattr(employee, "departments", None)
+    if departments is not None:
+        ids = {d.id for d in departments}
+    else:
+        ids = set(getattr(employee, "department_ids", None) or ())
+    if getattr(employee, "department_id", None):
+        ids.add(employee.department_id)
+    return tuple(sorted(ids))
+
+
+def _load_fences(employee_pk: int, department_ids: Tuple[int, ...]) -> Tuple[Fence, ...]:
+    assigned = select(employee_geofences.c.geofence_id).where(employee_geofences.c.employee_id == employee_pk)
+    scope = Geofence.id.in_(assigned)
+    if department_ids:
+        scope = or_(scope, Geofence.department_id.in_(department_ids))
+    rows = db.session.execute(
+        select(Geofence.id, Geofence.name, Geofence.center_latitude, Geofence.center_longitude,
+               Geofence.radius_meters)
+        .where(Geofence.is_active == True, scope)  # noqa: E712
+        .order_by(Geofence.id)
+    )
+    return tuple(Fence(r.id, r.name, float(r.center_latitude), float(r.center_longitude), float(r.radius_meters))
+                 for r in rows)
+
+
+def eligible_fences(employee) -> Tuple[Fence, ...]:
+    """مناطق الموظف النشطة من الذاكرة، أو باستعلام واحد عند أول طلب أو بعد تعديل المناطق."""
+    department_ids = _department_ids(employee)
+    key = (employee.id, department_ids)  # تغيير الأقسام ينتج مفتاحاً جديداً
+    ttl = _config("CHECK_IN_FENCE_CACHE_TTL", DEFAULT_FENCE_CACHE_TTL)
+    now = time.monotonic()
+    with _fences_lock:
+        cached = _fences.get(key)
+        if cached and cached[0] > now:
+            _fences.move_to_end(key)
+            return cached[1]
+    fences = _load_fences(employee.id, department_ids)
+    if ttl > 0:
+        with _fences_lock:
+            _fences[key] = (now + ttl, fences)
+            while len(_fences) > FENCE_CACHE_SIZE:
+                _fences.popitem(last=False)
+    return fences
+
+
+def invalidate_fence_cache() -> None:
+    with _fences_lock:
+        _fences.clear()
+
+
+def distance_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """المسافة بالأمتار بين نقطتين (Haversine)."""
+    d_lat, d_lon = radians(lat2 - lat1), radians(lon2 - lon1)
+    a = sin(d_lat / 2) ** 2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(d_lon / 2) ** 2
+    return EARTH_RADIUS_M * 2 * atan2(sqrt(a), sqrt(1 - a))
+
+
+def nearest_fence(fences: Sequence[Fence], latitude: float,
+                  longitude: float) -> Tuple[bool, Optional[Fence], Optional[float]]:
+    """(داخل منطقة؟، المنطقة المطابقة أو الأقرب، المسافة إليها)."""
+    closest, closest_distance = None, None
+    for fence in fences:
+        distance = distance_m(fence.latitude, fence.longitude, latitude, longitude)
+        if distance <= fence.radius:
+            return True, fence, distance
+        if closest_distance is None or distance < closest_distance:
+            closest, closest_distance = fence, distance
+    return False, closest, closest_distance
+
+
+# ==================== صورة الوجه ====================
+
+def _image_pool() -> ThreadPoolExecutor:
+    if _executor["pool"] is None:
+        with _executor_lock:
+            if _executor["pool"] is None:
+                workers = int(_config("CHECK_IN_IMAGE_WORKERS", DEFAULT_IMAGE_WORKERS))
+                _executor["pool"] = ThreadPoolExecutor(max_workers=max(1, workers),
+                                                       thread_name_prefix="check-in-image")
+    return _executor["pool"]
+
+
+def stage_face_image(face_image, employee_code: str, check_type: str,
+                     now: Optional[datetime] = None) -> Optional[StagedImage]:
+    """قراءة الصورة من الطلب وتحديد مسارها؛ الكتابة لاحقاً بـ write_face_image_async."""
+    if not face_image:
+        return None
+    from infrastructure.storage.upload_delivery import uploads_root
+
+    data = face_image.read()
+    if not data:
+        return None
+    filename = f"{check_type}_{employee_code}_{(now or datetime.now()).strftime('%Y%m%d_%H%M%S')}.jpg"
+    return StagedImage(f"uploads/attendance/{filename}", os.path.join(uploads_root(), "attendance", filename), data)
+
+
+def _write_image(staged: StagedImage) -> None:
+    started = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(staged.absolute_path), exist_ok=True)
+        tmp_path = f"{staged.absolute_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(staged.data)
+        os.replace(tmp_path, staged.absolute_path)
+    except OSError as e:
+        logger.error(f"Check-in face image not saved ({staged.relative_path}): {e}")
+    finally:
+        observe("face_image_write", (time.perf_counter() - started) * 1000)
+
+
+def write_face_image_async(staged: Optional[StagedImage]):
+    """كتابة الصورة خارج خيط الطلب (بعد نجاح الحفظ حتى لا تبقى صور لمحاولات مرفوضة)."""
+    if staged is None:
+        return None
+    return _image_pool().submit(_write_image, staged)
+
+
+# ==================== الكتابة ====================
+
+def _dialect() -> str:
+    return db.session.get_bind().dialect.name
+
+
+def _day_filter(table, employee_pk: int, day: date):
+    return (table.c.employee_id == employee_pk, table.c.date == day)
+
+
+def _upsert_check_in(values: Dict[str, Any]) -> Optional[int]:
+    """معرف السجل بعد تسجيل الحضور، أو None إن كان للموظف حضور مسجل في اليوم نفسه."""
+    table = Attendance.__table__
+    dialect = _dialect()
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["employee_id", "date"],
+            set_={key: stmt.excluded[key] for key in values if key not in ("employee_id", "date", "created_at")},
+            where=table.c.check_in.is_(None),
+        ).returning(table.c.id)
+        return db.session.execute(stmt).scalar()
+
+    day_filter = _day_filter(table, values["employee_id"], values["date"])
+    changes = {k: v for k, v in values.items() if k not in ("employee_id", "date", "created_at")}
+    if db.session.execute(update(table).where(*day_filter, table.c.check_in.is_(None)).values(**changes)).rowcount:
+        return db.session.execute(select(table.c.id).where(*day_filter)).scalar()
+    try:
+        with db.session.begin_nested():
+            return db.session.execute(insert(table).values(**values)).inserted_primary_key[0]
+    except IntegrityError:
+        return None
+
+
+def _insert_location(employee_pk: int, latitude, longitude, accuracy, source: str,
+                     recorded_at: datetime, notes: str) -> None:
+    db.session.execute(insert(EmployeeLocation.__table__).values(
+        employee_id=employee_pk, latitude=latitude, longitude=longitude, accuracy_m=accuracy,
+        source=source, recorded_at=recorded_at, received_at=datetime.utcnow(), notes=notes,
+    ))
+
+
+def record_check_in(employee_pk: int, day: date, attendance: Dict[str, Any],
+                    location: Dict[str, Any]) -> AttendanceWrite:
+    """الحضور والموقع في معاملة واحدة؛ attendance حقول check_in_* و location حقول EmployeeLocation."""
+    now = datetime.utcnow()
+    values = dict(attendance, employee_id=employee_pk, date=day, status="present", created_at=now, updated_at=now)
+    try:
+        with timed("attendance_write"):
+            attendance_id = _upsert_check_in(values)
+            if attendance_id is None:
+                db.session.rollback()
+                existing = db.session.execute(
+                    select(Attendance.check_in).where(*_day_filter(Attendance.__table__, employee_pk, day))
+                ).scalar()
+                return AttendanceWrite(False, CODE_ALREADY_CHECKED_IN, check_in=existing)
+            _insert_location(employee_pk, source="attendance_check_in", **location)
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_portal_cache(employee_pk)
+    return AttendanceWrite(True, attendance_id=attendance_id, check_in=values["check_in"])
+
+
+def record_check_out(employee_pk: int, day: date, attendance: Dict[str, Any],
+                     location: Dict[str, Any]) -> AttendanceWrite:
+    """UPDATE مشروط واحد (حضور مسجل ولا انصراف) + موقع الانصراف، في معاملة واحدة."""
+    table = Attendance.__table__
+    day_filter = _day_filter(table, employee_pk, day)
+    values = dict(attendance, updated_at=datetime.utcnow())
+    try:
+        with timed("attendance_write"):
+            result = db.session.execute(
+                update(table)
+                .where(*day_filter, table.c.check_in.isnot(None), table.c.check_out.is_(None))
+                .values(**values)
+            )
+            row = db.session.execute(
+                select(table.c.id, table.c.check_in, table.c.check_out).where(*day_filter)
+            ).first()
+            if not result.rowcount:
+                db.session.rollback()
+                if row is None or row.check_in is None:
+                    return AttendanceWrite(False, CODE_NO_CHECK_IN)
+                return AttendanceWrite(False, CODE_ALREADY_CHECKED_OUT, row.id, row.check_in, row.check_out)
+            _insert_location(employee_pk, source="attendance_check_out", **location)
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    invalidate_portal_cache(employee_pk)
+    return AttendanceWrite(True, attendance_id=row.id, check_in=row.check_in, check_out=values["check_out"])
+
+
+# ==================== التهيئة ====================
+
+def _fences_changed(*args) -> None:
+    invalidate_fence_cache()
+
+
+def init_check_in_pipeline(app) -> None:
+    """مسح ذاكرة المناطق عند حفظ منطقة أو تغيير تعيين الموظفين لها."""
+    if not _state["listeners"]:
+        for name in ("after_insert", "after_update", "after_delete"):
+            event.listen(Geofence, name, _fences_changed)
+        for attribute in (Geofence.assigned_employees, Employee.assigned_geofences):
+            event.listen(attribute, "append", _fences_changed)
+            event.listen(attribute, "remove", _fences_changed)
+        _state["listeners"] = True
@@ -0,0 +1,4 @@
+"""
+وحدة تقويم العمل — أيام الراحة الأسبوعية لكل قسم والعطل الرسمية (ميلادية وهجرية)
+وعدّ أيام العمل بين تاريخين للإجازات والحضور والرواتب.
+"""
@@ -0,0 +1,306 @@
+"""
+خدمة تقويم العمل المشتركة بين الإجازات والحضور والرواتب.
+- يوم العمل = ليس يوم راحة أسبوعية للقسم وليس عطلة رسمية (ميلادية أو هجرية عبر utils.hijri_converter).
+- لكل (قسم، سنة) مصفوفة مجاميع تراكمية بطول أيام السنة تُبنى مرة واحدة عند أول طلب،
+  فعدّ أيام العمل بين تاريخين في نفس السنة عملية طرح واحدة بدل المرور على الأيام.
+- القواعد تُحمَّل باستعلامين وتُخزن مؤقتاً في العملية (BUSINESS_CALENDAR_CACHE_TTL) وتُمسح عند حفظ
+  قاعدة أو عطلة في هذه العملية.
+- قسم بلا قاعدة أو عطل خاصة يستخدم تقويم المنشأة العام (BUSINESS_WEEKEND_DAYS).
+- flask business-calendar-seed لإضافة القاعدة العامة والعطل الرسمية السعودية المعتادة.
+"""
+import logging
+import time
+from array import array
+from collections import namedtuple
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence
+
+import click
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import event, select
+
+from core.extensions import db
+from modules.business_calendar.domain.models import (
+    CALENDAR_HIJRI,
+    DEFAULT_WEEKEND_DAYS,
+    BusinessHoliday,
+    WeekendRule,
+    format_weekend_days,
+    parse_weekend_days,
+)
+from utils.hijri_converter import convert_gregorian_to_hijri, convert_hijri_to_gregorian
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 300
+
+HolidayRule = namedtuple("HolidayRule", "name calendar month day year duration department_id")
+
+# العطل الرسمية المعتادة في المملكة (تُضاف بـ flask business-calendar-seed)
+DEFAULT_HOLIDAYS = (
+    HolidayRule("يوم التأسيس", "gregorian", 2, 22, None, 1, None),
+    HolidayRule("اليوم الوطني", "gregorian", 9, 23, None, 1, None),
+    HolidayRule("عيد الفطر", "hijri", 10, 1, None, 4, None),
+    HolidayRule("عيد الأضحى", "hijri", 12, 9, None, 4, None),
+)
+
+_cache = {"rules": None, "loaded_at": 0.0, "calendars": {}}
+_state = {"listeners": False}
+
+
+class BusinessCalendar:
+    """تقويم عمل واحد: أيام راحة أسبوعية + مجموعة عطل، مع مجاميع تراكمية لكل سنة."""
+
+    def __init__(self, weekend_days: Iterable[int], holidays: Sequence[HolidayRule]):
+        self.weekend_days: FrozenSet[int] = frozenset(weekend_days)
+        self._holidays = tuple(holidays)
+        self._years: Dict[int, array] = {}
+        self._holiday_dates: Dict[int, FrozenSet[date]] = {}
+
+    # ---------- السنوات ----------
+
+    def holiday_dates(self, year: int) -> FrozenSet[date]:
+        """كل أيام العطل الرسمية الواقعة في سنة ميلادية (بما فيها الواقعة على أيام الراحة)."""
+        if year not in self._holiday_dates:
+            self._holiday_dates[year] = frozenset(_expand_holidays(self._holidays, year))
+        return self._holiday_dates[year]
+
+    def _prefix(self, year: int) -> array:
+        # prefix[i] = عدد أيام العمل في أول i يوم من السنة
+        prefix = self._years.get(year)
+        if prefix is None:
+            holidays = self.holiday_dates(year)
+            first = date(year, 1, 1)
+            length = (date(year + 1, 1, 1) - first).days
+            prefix = array("H", [0]) * (length + 1)
+            weekday = first.weekday()
+            for i in range(length):
+                day = first + timedelta(days=i)
+                working = (weekday + i) % 7 not in self.weekend_days and day not in holidays
+                prefix[i + 1] = prefix[i] + working
+            self._years[year] = prefix
+        return prefix
+
+    # ---------- الاستعلام ----------
+
+    def is_working_day(self, day: date) -> bool:
+        index = day.timetuple().tm_yday
+        prefix = self._prefix(day.year)
+        return prefix[index] != prefix[index - 1]
+
+    def is_holiday(self, day: date) -> bool:
+        return day in self.holiday_dates(day.year)
+
+    def working_days(self, start: date, end: date) -> int:
+        """عدد أيام العمل من start إلى end شاملاً الطرفين (0 إن كانت النهاية قبل البداية)."""
+        if end < start:
+            return 0
+        if start.year == end.year:
+            prefix = self._prefix(start.year)
+            return prefix[end.timetuple().tm_yday] - prefix[start.timetuple().tm_yday - 1]
+        head = self._prefix(start.year)
+        total = head[-1] - head[start.timetuple().tm_yday - 1]
+        for year in range(start.year + 1, end.year):
+            total += self._prefix(year)[-1]
+        return total + self._prefix(end.year)[end.timetuple().tm_yday]
+
+    def working_dates(self, start: date, end: date) -> List[date]:
+        """أيام العمل نفسها (للتسجيل الجماعي الذي يحتاج التواريخ لا عددها)."""
+        days = []
+        current = start
+        while current <= end:
+            if self.is_working_day(current):
+                days.append(current)
+            current += timedelta(days=1)
+        return days
+
+    def holidays_between(self, start: date, end: date, working_only: bool = True) -> List[date]:
+        """العطل الرسمية في الفترة؛ working_only يستبعد ما وقع منها على يوم راحة أسبوعية."""
+        days = []
+        for year in range(start.year, end.year + 1):
+            for day in self.holiday_dates(year):
+                if start <= day <= end and not (working_only and day.weekday() in self.weekend_days):
+                    days.append(day)
+        return sorted(days)
+
+
+def _expand_holidays(rules: Sequence[HolidayRule], year: int) -> Iterable[date]:
+    """تواريخ العطل في سنة ميلادية، بما فيها عطل بدأت في السنة السابقة وامتدت إليها."""
+    if not rules:
+        return
+    hijri_years = None
+    for rule in rules:
+        if rule.calendar == CALENDAR_HIJRI:
+            if hijri_years is None:
+                first = convert_gregorian_to_hijri(date(year - 1, 12, 1))
+                last = convert_gregorian_to_hijri(date(year, 12, 31))
+                hijri_years = range(first.year, last.year + 1) if first and last else range(0)
+            starts = [
+                convert_hijri_to_gregorian(h_year, rule.month, rule.day)
+                for h_year in hijri_years if rule.year in (None, h_year)
+            ]
+        else:
+            starts = []
+            for g_year in (year - 1, year):
+                if rule.year in (None, g_year):
+                    try:
+                        starts.append(date(g_year, rule.month, rule.day))
+                    except ValueError:  # 29 فبراير في سنة غير كبيسة
+                        continue
+        for start in starts:
+            if start is None:
+                continue
+            for offset in range(max(1, rule.duration)):
+                day = start + timedelta(days=offset)
+                if day.year == year:
+                    yield day
+
+
+# ==================== التحميل والتخزين المؤقت ====================
+
+def _config(key: str, default):
+    return current_app.config.get(key, default) if has_app_context() else default
+
+
+def _default_weekend() -> FrozenSet[int]:
+    return parse_weekend_days(_config("BUSINESS_WEEKEND_DAYS", format_weekend_days(DEFAULT_WEEKEND_DAYS)))
+
+
+def _load_rules():
+    weekend = {None: _default_weekend()}
+    holidays: List[HolidayRule] = []
+    try:
+        for department_id, days in db.session.execute(
+            select(WeekendRule.department_id, WeekendRule.weekend_days)
+        ):
+            weekend[department_id] = parse_weekend_days(days)
+        for row in db.session.execute(
+            select(BusinessHoliday.name, BusinessHoliday.calendar, BusinessHoliday.month, BusinessHoliday.day,
+                   BusinessHoliday.year, BusinessHoliday.duration_days, BusinessHoliday.department_id)
+            .where(BusinessHoliday.is_active.is_(True))
+        ):
+            holidays.append(HolidayRule(*row))
+    except Exception as e:
+        # قبل تطبيق الترحيل: تقويم عام بلا عطل بدل كسر الإجازات والحضور
+        db.session.rollback()
+        logger.warning(f"Business calendar rules not loaded: {e}")
+    return {"weekend": weekend, "holidays": holidays}
+
+
+def _rules():
+    ttl = _config("BUSINESS_CALENDAR_CACHE_TTL", DEFAULT_CACHE_TTL)
+    if _cache["rules"] is None or time.monotonic() - _cache["loaded_at"] > ttl:
+        _cache["rules"] = _load_rules()
+        _cache["loaded_at"] = time.monotonic()
+        _cache["calendars"] = {}
+    return _cache["rules"]
+
+
+def invalidate_calendar_cache() -> None:
+    _cache["rules"] = None
+    _cache["calendars"] = {}
+
+
+def _customized_departments() -> FrozenSet[int]:
+    rules = _rules()
+    departments = {d for d in rules["weekend"] if d is not None}
+    departments.update(h.department_id for h in rules["holidays"] if h.department_id is not None)
+    return frozenset(departments)
+
+
+def get_calendar(department_id: Optional[int] = None) -> BusinessCalendar:
+    """تقويم قسم (أو تقويم المنشأة العام إن لم يكن للقسم قاعدة أو عطل خاصة)."""
+    rules = _rules()
+    key = department_id if department_id in _customized_departments() else None
+    calendar = _cache["calendars"].get(key)
+    if calendar is None:
+        weekend = rules["weekend"].get(key, rules["weekend"][None])
+        holidays = [h for h in rules["holidays"] if h.department_id in (None, key)]
+        calendar = _cache["calendars"][key] = BusinessCalendar(weekend, holidays)
+    return calendar
+
+
+def calendar_departments_for(employee_ids: Sequence[int]) -> Dict[int, Optional[int]]:
+    """{employee_id: القسم الذي يحدد تقويمه} — أصغر قسم له تخصيص من أقسام الموظف، وإلا None."""
+    from models import employee_departments
+
+    customized = _customized_departments()
+    result: Dict[int, Optional[int]] = {employee_id: None for employee_id in employee_ids}
+    if not customized or not employee_ids:
+        return result
+    rows = db.session.execute(
+        select(employee_departments.c.employee_id, employee_departments.c.department_id)
+        .where(employee_departments.c.employee_id.in_(list(employee_ids)),
+               employee_departments.c.department_id.in_(customized))
+        .order_by(employee_departments.c.department_id)
+    )
+    for employee_id, department_id in rows:
+        if result.get(employee_id) is None:
+            result[employee_id] = department_id
+    return result
+
+
+def calendars_for_employees(employee_ids: Sequence[int]) -> Dict[int, BusinessCalendar]:
+    """تقويم كل موظف باستعلام واحد لعضوية الأقسام."""
+    return {
+        employee_id: get_calendar(department_id)
+        for employee_id, department_id in calendar_departments_for(employee_ids).items()
+    }
+
+
+def calendar_for_employee(employee_id: Optional[int]) -> BusinessCalendar:
+    if employee_id is None:
+        return get_calendar(None)
+    return calendars_for_employees([employee_id])[employee_id]
+
+
+def working_days_between(start: date, end: date, employee_id: Optional[int] = None,
+                         department_id: Optional[int] = None) -> int:
+    """عدد أيام العمل شاملاً الطرفين بتقويم الموظف أو القسم أو المنشأة."""
+    if employee_id is not None:
+        return calendar_for_employee(employee_id).working_days(start, end)
+    return get_calendar(department_id).working_days(start, end)
+
+
+# ==================== التهيئة ====================
+
+def seed_defaults() -> int:
+    """إضافة القاعدة العامة والعطل الافتراضية غير الموجودة؛ يعيد عدد الصفوف المضافة."""
+    added = 0
+    if WeekendRule.query.filter(WeekendRule.department_id.is_(None)).first() is None:
+        db.session.add(WeekendRule(department_id=None, weekend_days=format_weekend_days(_default_weekend())))
+        added += 1
+    for rule in DEFAULT_HOLIDAYS:
+        exists = BusinessHoliday.query.filter_by(
+            calendar=rule.calendar, month=rule.month, day=rule.day, department_id=None
+        ).first()
+        if exists is None:
+            db.session.add(BusinessHoliday(name=rule.name, calendar=rule.calendar, month=rule.month, day=rule.day,
+                                           year=rule.year, duration_days=rule.duration))
+            added += 1
+    db.session.commit()
+    invalidate_calendar_cache()
+    return added
+
+
+@click.command("business-calendar-seed")
+@with_appcontext
+def business_calendar_seed_command():
+    """إضافة قاعدة أيام الراحة العامة والعطل الرسمية الافتراضية."""
+    click.echo(f"Business calendar seeded: {seed_defaults()} rows added")
+
+
+def _rules_changed(mapper, connection, target):
+    invalidate_calendar_cache()
+
+
+def init_business_calendar(app) -> None:
+    """تهيئة تقويم العمل: أمر CLI ومسح الذاكرة المؤقتة عند حفظ القواعد والعطل."""
+    if "business-calendar-seed" not in app.cli.commands:
+        app.cli.add_command(business_calendar_seed_command)
+    if not _state["listeners"]:
+        for model in (WeekendRule, BusinessHoliday):
+            for name in ("after_insert", "after_update", "after_delete"):
+                event.listen(model, name, _rules_changed)
+        _state["listeners"] = True
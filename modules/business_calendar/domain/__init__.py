@@ -0,0 +1,4 @@
+"""Business calendar domain models package"""
+from modules.business_calendar.domain.models import BusinessHoliday, WeekendRule
+
+__all__ = ['BusinessHoliday', 'WeekendRule']
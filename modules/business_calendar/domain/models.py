@@ -0,0 +1,83 @@
+"""
+نماذج تقويم العمل.
+- WeekendRule: أيام الراحة الأسبوعية لقسم (department_id فارغ = القاعدة العامة للمنشأة).
+- BusinessHoliday: عطلة رسمية بتقويم ميلادي أو هجري، متكررة سنوياً (year فارغ) أو لسنة واحدة،
+  لكل الأقسام (department_id فارغ) أو لقسم محدد.
+الحساب والتخزين المؤقت في modules.business_calendar.application.business_calendar_service.
+"""
+from datetime import datetime
+from typing import FrozenSet, Iterable
+
+from core.extensions import db
+
+CALENDAR_GREGORIAN = "gregorian"
+CALENDAR_HIJRI = "hijri"
+
+# أيام الأسبوع بترقيم Python (0 = الإثنين): الجمعة والسبت
+DEFAULT_WEEKEND_DAYS = (4, 5)
+
+
+def parse_weekend_days(value) -> FrozenSet[int]:
+    """'4,5' أو [4, 5] -> frozenset({4, 5}) مع تجاهل القيم خارج 0..6."""
+    if value is None:
+        return frozenset()
+    items: Iterable = value.split(",") if isinstance(value, str) else value
+    days = set()
+    for item in items:
+        try:
+            day = int(str(item).strip())
+        except ValueError:
+            continue
+        if 0 <= day <= 6:
+            days.add(day)
+    return frozenset(days)
+
+
+def format_weekend_days(days: Iterable[int]) -> str:
+    return ",".join(str(d) for d in sorted(set(days)))
+
+
+class WeekendRule(db.Model):
+    """أيام الراحة الأسبوعية لقسم أو للمنشأة."""
+    __tablename__ = "business_weekend_rules"
+
+    id = db.Column(db.Integer, primary_key=True)
+    department_id = db.Column(db.Integer, db.ForeignKey("department.id", ondelete="CASCADE"),
+                              nullable=True, unique=True)
+    weekend_days = db.Column(db.String(20), nullable=False, default=format_weekend_days(DEFAULT_WEEKEND_DAYS))
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    department = db.relationship("Department", viewonly=True)
+
+    @property
+    def days(self) -> FrozenSet[int]:
+        return parse_weekend_days(self.weekend_days)
+
+    def __repr__(self):
+        return f"<WeekendRule department={self.department_id} days={self.weekend_days}>"
+
+
+class BusinessHoliday(db.Model):
+    """عطلة رسمية: تاريخ بدايتها بالتقويم المحدد وعدد أيامها."""
+    __tablename__ = "business_holidays"
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    calendar = db.Column(db.String(10), nullable=False, default=CALENDAR_GREGORIAN)  # gregorian, hijri
+    month = db.Column(db.Integer, nullable=False)
+    day = db.Column(db.Integer, nullable=False)
+    year = db.Column(db.Integer, nullable=True)  # فارغ = كل سنة (بنفس التقويم)
+    duration_days = db.Column(db.Integer, nullable=False, default=1)
+    department_id = db.Column(db.Integer, db.ForeignKey("department.id", ondelete="CASCADE"), nullable=True)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    department = db.relationship("Department", viewonly=True)
+
+    __table_args__ = (
+        db.Index("idx_business_holidays_active", "is_active", "department_id"),
+    )
+
+    def __repr__(self):
+        return f"<BusinessHoliday {self.name} {self.calendar} {self.month}/{self.day}>"
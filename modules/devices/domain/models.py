@@ -81,6 +81,7 @@ class SimCard(db.Model):
     activation_date = db.Column(db.Date, nullable=True)  # تاريخ التفعيل
     monthly_cost = db.Column(db.Float, default=0.0)  # التكلفة الشهرية
     plan_type = db.Column(db.String(100), nullable=True)  # نوع الباقة
+    renewal_date = db.Column(db.Date, nullable=True)  # تاريخ تجديد الباقة/الاشتراك
     
     # تواريخ النظام
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -0,0 +1,3 @@
+"""
+وحدة مزامنة Google Drive — طابور رفع دائم مع ذاكرة مسارات المجلدات.
+"""
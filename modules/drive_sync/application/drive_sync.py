@@ -0,0 +1,381 @@
+"""
+مزامنة ملفات السجلات مع Google Drive عبر طابور دائم بدل الرفع داخل الطلب.
+- كل ملف صف في drive_uploads، وكل سجل مصدر تُرفع ملفاته بمهمة خلفية واحدة (drive.sync_record).
+- الرفع resumable يُقرأ من القرص على دفعات، ومسارات المجلدات تُحل من drive_folder_cache.
+- الملفات المتطابقة (sha256) في نفس المجلد تُرفع مرة واحدة، وما رُفع سابقاً يُعاد استخدام رابطه.
+- تزامن محدود: DRIVE_UPLOAD_WORKERS رفع متزامن كحد أقصى في العملية كلها.
+- الإخفاق يعيد المهمة للطابور بتأخير متزايد؛ بعد آخر محاولة يُعلّم السجل failed.
+العميل: get_drive_client() يعيد drive_service، ويُستبدل بـ set_drive_client (بديل وهمي للاختبار بلا اتصال).
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+from sqlalchemy import case, func, select, update
+
+from core.extensions import db
+from modules.drive_sync.application.folder_cache import forget_folder, resolve_folder_path
+from modules.drive_sync.domain.models import (
+    PENDING_UPLOAD_STATUSES,
+    UPLOAD_DONE,
+    UPLOAD_FAILED,
+    UPLOAD_MISSING,
+    UPLOAD_QUEUED,
+    DriveUpload,
+)
+from modules.jobs.application.job_queue import enqueue, job_handler
+
+logger = logging.getLogger(__name__)
+
+DRIVE_SYNC_JOB = "drive.sync_record"
+DRIVE_SYNC_ATTEMPTS = 5
+DRIVE_SYNC_RETRY_SECONDS = 60
+DEFAULT_UPLOAD_WORKERS = 3
+HASH_CHUNK_SIZE = 1024 * 1024
+STORAGE_PREFIX = "storage:"
+
+_state = {"client": None, "slots": None}
+_state_lock = threading.Lock()
+
+
+class DriveSyncError(Exception):
+    """فشل رفع بعض ملفات السجل؛ تُعاد المهمة لاحقاً."""
+
+
+def get_drive_client():
+    """عميل Drive: يوفر get_root_folder و find_or_create_folder(name, parent_id) و stream_upload(path, folder_id, name)."""
+    if _state["client"] is None:
+        from utils.google_drive_service import drive_service
+        return drive_service
+    return _state["client"]
+
+
+def set_drive_client(client) -> None:
+    """استبدال عميل Drive (None = الافتراضي)."""
+    _state["client"] = client
+
+
+def _upload_slots() -> threading.BoundedSemaphore:
+    """حد الرفع المتزامن على مستوى العملية (يشمل كل المهام الجارية)."""
+    if _state["slots"] is None:
+        with _state_lock:
+            if _state["slots"] is None:
+                size = int(current_app.config.get("DRIVE_UPLOAD_WORKERS") or DEFAULT_UPLOAD_WORKERS)
+                _state["slots"] = threading.BoundedSemaphore(max(1, size))
+    return _state["slots"]
+
+
+def file_sha256(path: str) -> Tuple[str, int]:
+    """بصمة المحتوى والحجم بقراءة الملف على دفعات."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _segment(name) -> str:
+    return str(name or "غير_معروف").replace("/", "-").strip() or "غير_معروف"
+
+
+def queue_record_upload(record_type: str, record_id: int, folder_segments: Iterable[str],
+                        files: Iterable[Tuple[str, str]], owner_id: Optional[int] = None):
+    """وضع ملفات سجل في طابور الرفع. files: [(role, source)] حيث role = pdf/image و source مسار محلي
+    أو storage:<مفتاح>. الملفات المرفوعة سابقاً لنفس المجلد لا تُكرر، وغير المكتملة تُستبدل بالقائمة الجديدة.
+    يعيد مهمة الطابور (أو None إن لم يبق ملف للرفع)."""
+    folder_path = "/".join(_segment(s) for s in folder_segments)
+    existing = DriveUpload.query.filter_by(record_type=record_type, record_id=record_id).all()
+    uploaded = {(u.source, u.role) for u in existing if u.status == UPLOAD_DONE and u.folder_path == folder_path}
+    for upload in existing:
+        if upload.status != UPLOAD_DONE:
+            db.session.delete(upload)
+
+    added = 0
+    for role, source in files:
+        if not source or (source, role) in uploaded:
+            continue
+        db.session.add(DriveUpload(record_type=record_type, record_id=record_id, role=role,
+                                   source=source, folder_path=folder_path, status=UPLOAD_QUEUED))
+        added += 1
+    if not added:
+        db.session.commit()
+        return None
+    return enqueue(DRIVE_SYNC_JOB, {"record_type": record_type, "record_id": record_id}, owner_id=owner_id,
+                   idempotency_key=f"drive:{record_type}:{record_id}", message=f"رفع {added} ملف إلى Drive")
+
+
+def retry_record_upload(record_type: str, record_id: int):
+    """إعادة الملفات الفاشلة لسجل إلى الطابور. يعيد المهمة أو None إن لم يكن للسجل ملفات معلقة."""
+    t = DriveUpload.__table__
+    pending = db.session.execute(
+        update(t).where(t.c.record_type == record_type, t.c.record_id == record_id,
+                        t.c.status.in_(PENDING_UPLOAD_STATUSES))
+        .values(status=UPLOAD_QUEUED, error=None, updated_at=datetime.utcnow())
+    ).rowcount
+    if not pending:
+        db.session.commit()
+        return None
+    return enqueue(DRIVE_SYNC_JOB, {"record_type": record_type, "record_id": record_id},
+                   idempotency_key=f"drive:{record_type}:{record_id}", message="إعادة رفع إلى Drive")
+
+
+def _materialize(source: str) -> Tuple[Optional[str], bool]:
+    """مسار محلي قابل للقراءة للمصدر، وهل هو ملف مؤقت يُحذف بعد الرفع."""
+    if not source.startswith(STORAGE_PREFIX):
+        return (source, False) if os.path.exists(source) else (None, False)
+    from utils.storage_helper import download_image
+
+    key = source[len(STORAGE_PREFIX):]
+    data = download_image(key)
+    if not data:
+        return None, False
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(key)[1] or ".bin", delete=False) as tmp:
+        tmp.write(data)
+    return tmp.name, True
+
+
+def _prepare(row: dict) -> dict:
+    """تجهيز ملف للرفع في خيط العامل: المسار المحلي والبصمة والحجم."""
+    prepared = {"row": row, "path": None, "temporary": False, "error": None, "status": None}
+    try:
+        path, temporary = _materialize(row["source"])
+        if path is None:
+            # الملف المحلي المفقود لا يعود؛ التخزين السحابي قد يكون متعطلاً مؤقتاً
+            local = not row["source"].startswith(STORAGE_PREFIX)
+            prepared.update(error="الملف غير موجود", status=UPLOAD_MISSING if local else UPLOAD_FAILED)
+            return prepared
+        prepared.update(path=path, temporary=temporary)
+        prepared["hash"], prepared["size"] = file_sha256(path)
+    except Exception as e:
+        prepared.update(error=str(e), status=UPLOAD_FAILED)
+    return prepared
+
+
+def _is_missing_parent(error: Exception) -> bool:
+    return getattr(getattr(error, "resp", None), "status", None) == 404
+
+
+def _upload_group(client, slots, prepared: dict, folder_id: str) -> dict:
+    with slots:
+        return client.stream_upload(prepared["path"], folder_id, prepared["name"])
+
+
+def _previous_upload(content_hash: str, folder_id: str) -> Optional[dict]:
+    t = DriveUpload.__table__
+    row = db.session.execute(
+        select(t.c.file_id, t.c.file_name, t.c.web_view_link, t.c.download_link)
+        .where(t.c.content_hash == content_hash, t.c.folder_id == folder_id, t.c.status == UPLOAD_DONE)
+        .limit(1)
+    ).mappings().first()
+    if row is None:
+        return None
+    return {"file_id": row["file_id"], "file_name": row["file_name"],
+            "web_view_link": row["web_view_link"], "download_link": row["download_link"]}
+
+
+def _save(row_id: int, **values) -> None:
+    t = DriveUpload.__table__
+    values["updated_at"] = datetime.utcnow()
+    db.session.execute(update(t).where(t.c.id == row_id).values(**values))
+
+
+def _upload_rows(client, rows: List[dict]) -> int:
+    """رفع دفعة ملفات بالتوازي المحدود. يعيد عدد الإخفاقات القابلة لإعادة المحاولة."""
+    app = current_app._get_current_object()
+    workers = int(app.config.get("DRIVE_UPLOAD_WORKERS") or DEFAULT_UPLOAD_WORKERS)
+    slots = _upload_slots()
+
+    def _prepare_in_app(row):
+        with app.app_context():
+            return _prepare(row)
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="drive-upload") as pool:
+        prepared_files = list(pool.map(_prepare_in_app, rows))
+        try:
+            # (مجلد، بصمة) -> الملفات المتطابقة؛ يُرفع أولها فقط
+            groups: Dict[Tuple[str, str], List[dict]] = {}
+            for prepared in prepared_files:
+                row = prepared["row"]
+                if prepared["error"]:
+                    failures += prepared["status"] == UPLOAD_FAILED
+                    _save(row["id"], status=prepared["status"], error=prepared["error"][:500],
+                          attempts=row["attempts"] + 1)
+                    continue
+                folder_id = resolve_folder_path(client.get_root_folder(), row["folder_path"].split("/"),
+                                                client.find_or_create_folder)
+                if not folder_id:
+                    failures += 1
+                    _save(row["id"], status=UPLOAD_FAILED, error="تعذر إنشاء مجلد Drive", attempts=row["attempts"] + 1)
+                    continue
+                prepared["folder_id"] = folder_id
+                prepared["name"] = row["file_name"] or os.path.basename(row["source"])
+                groups.setdefault((folder_id, prepared["hash"]), []).append(prepared)
+
+            futures = {}
+            for (folder_id, content_hash), members in groups.items():
+                previous = _previous_upload(content_hash, folder_id)
+                if previous is not None:
+                    futures[(folder_id, content_hash)] = previous
+                else:
+                    futures[(folder_id, content_hash)] = pool.submit(_upload_group, client, slots, members[0], folder_id)
+
+            for (folder_id, content_hash), members in groups.items():
+                outcome = futures[(folder_id, content_hash)]
+                error = None
+                if not isinstance(outcome, dict):
+                    try:
+                        outcome = outcome.result()
+                    except Exception as e:
+                        error = e
+                for prepared in members:
+                    row = prepared["row"]
+                    if error is not None:
+                        failures += 1
+                        if _is_missing_parent(error):
+                            forget_folder(folder_id)
+                        _save(row["id"], status=UPLOAD_FAILED, error=str(error)[:500], attempts=row["attempts"] + 1)
+                        continue
+                    _save(row["id"], status=UPLOAD_DONE, error=None, attempts=row["attempts"] + 1,
+                          content_hash=content_hash, file_size=prepared["size"], folder_id=folder_id,
+                          file_id=outcome.get("file_id"), file_name=outcome.get("file_name") or prepared["name"],
+                          web_view_link=outcome.get("web_view_link"), download_link=outcome.get("download_link"),
+                          uploaded_at=datetime.utcnow())
+        finally:
+            for prepared in prepared_files:
+                if prepared["temporary"] and prepared["path"]:
+                    try:
+                        os.remove(prepared["path"])
+                    except OSError:
+                        pass
+    db.session.commit()
+    return failures
+
+
+def _record_models() -> Dict[str, type]:
+    from models import VehicleExternalSafetyCheck, VehicleHandover, VehicleWorkshop
+
+    return {
+        "vehicle_workshop": VehicleWorkshop,
+        "vehicle_handover": VehicleHandover,
+        "vehicle_safety": VehicleExternalSafetyCheck,
+    }
+
+
+def _apply_to_record(record_type: str, record_id: int, final_attempt: bool) -> dict:
+    """نسخ نتائج الرفع إلى أعمدة drive_* في سجل المصدر."""
+    uploads = DriveUpload.query.filter_by(record_type=record_type, record_id=record_id).order_by(DriveUpload.id).all()
+    done = [u for u in uploads if u.status == UPLOAD_DONE]
+    pending = [u for u in uploads if u.status in PENDING_UPLOAD_STATUSES]
+    summary = {"uploaded": len(done), "pending": len(pending),
+               "missing": sum(1 for u in uploads if u.status == UPLOAD_MISSING)}
+
+    model = _record_models().get(record_type)
+    record = db.session.get(model, record_id) if model is not None else None
+    if record is None:
+        db.session.commit()
+        return summary
+
+    if done:
+        record.drive_folder_id = done[0].folder_id
+        pdf = next((u for u in done if u.role == "pdf"), None)
+        if pdf is not None:
+            record.drive_pdf_link = pdf.web_view_link
+        images = [u.web_view_link for u in done if u.role == "image"]
+        if images:
+            record.drive_images_links = json.dumps(images)
+    if not pending:
+        record.drive_upload_status = "success" if done else "failed"
+        record.drive_uploaded_at = datetime.utcnow()
+    elif final_attempt:
+        record.drive_upload_status = "failed"
+    else:
+        record.drive_upload_status = "pending"
+    db.session.commit()
+    return summary
+
+
+def sync_record(record_type: str, record_id: int, final_attempt: bool = True) -> dict:
+    """رفع كل الملفات المعلقة لسجل. يرفع DriveSyncError إن بقيت إخفاقات ولم تكن المحاولة الأخيرة."""
+    client = get_drive_client()
+    t = DriveUpload.__table__
+    tried = set()
+    failures = 0
+    while True:
+        # ملفات أضيفت للسجل أثناء التشغيل تُلتقط في الدورة التالية
+        rows = [dict(r) for r in db.session.execute(
+            select(t).where(t.c.record_type == record_type, t.c.record_id == record_id,
+                            t.c.status.in_(PENDING_UPLOAD_STATUSES))
+        ).mappings() if r["id"] not in tried]
+        if not rows:
+            break
+        tried.update(r["id"] for r in rows)
+        failures += _upload_rows(client, rows)
+
+    summary = _apply_to_record(record_type, record_id, final_attempt)
+    if failures and not final_attempt:
+        raise DriveSyncError(f"{failures} Drive upload(s) failed for {record_type} {record_id}")
+    return summary
+
+
+@job_handler(DRIVE_SYNC_JOB, max_attempts=DRIVE_SYNC_ATTEMPTS, retry_delay=DRIVE_SYNC_RETRY_SECONDS)
+def sync_record_job(job, record_type: str, record_id: int) -> dict:
+    job.update(stage="uploading")
+    return sync_record(record_type, record_id, final_attempt=job.attempt >= DRIVE_SYNC_ATTEMPTS)
+
+
+def drive_queue_stats() -> Dict[str, int]:
+    t = DriveUpload.__table__
+    rows = db.session.execute(select(t.c.status, func.count()).group_by(t.c.status)).all()
+    stats = {UPLOAD_QUEUED: 0, UPLOAD_DONE: 0, UPLOAD_FAILED: 0, UPLOAD_MISSING: 0}
+    stats.update({status: count for status, count in rows})
+    return stats
+
+
+def list_queue_records(status: Optional[str] = None, page: int = 1, per_page: int = 50) -> Tuple[List[dict], int]:
+    """سجلات الطابور مجمعة لكل سجل مصدر: أعداد الملفات حسب الحالة وآخر خطأ."""
+    t = DriveUpload.__table__
+
+    def _count(value):
+        return func.sum(case((t.c.status == value, 1), else_=0))
+
+    grouped = (
+        select(t.c.record_type, t.c.record_id, t.c.folder_path.label("folder_path"),
+               func.count().label("files"), _count(UPLOAD_QUEUED).label("queued"),
+               _count(UPLOAD_DONE).label("done"), _count(UPLOAD_FAILED).label("failed"),
+               _count(UPLOAD_MISSING).label("missing"), func.max(t.c.attempts).label("attempts"),
+               func.max(t.c.updated_at).label("updated_at"))
+        .group_by(t.c.record_type, t.c.record_id, t.c.folder_path)
+    )
+    if status == UPLOAD_DONE:
+        grouped = grouped.having(_count(UPLOAD_DONE) == func.count())
+    elif status in (UPLOAD_QUEUED, UPLOAD_FAILED, UPLOAD_MISSING):
+        grouped = grouped.having(_count(status) > 0)
+
+    total = db.session.execute(select(func.count()).select_from(grouped.subquery())).scalar() or 0
+    rows = db.session.execute(
+        grouped.order_by(func.max(t.c.updated_at).desc()).offset((page - 1) * per_page).limit(per_page)
+    ).mappings().all()
+
+    records = [dict(row) for row in rows]
+    if records:
+        keys = {(r["record_type"], r["record_id"]) for r in records}
+        errors = db.session.execute(
+            select(t.c.record_type, t.c.record_id, t.c.error)
+            .where(t.c.status.in_((UPLOAD_FAILED, UPLOAD_MISSING)), t.c.error.isnot(None),
+                   t.c.record_id.in_([k[1] for k in keys]))
+            .order_by(t.c.updated_at)
+        ).all()
+        last_error = {(r.record_type, r.record_id): r.error for r in errors if (r.record_type, r.record_id) in keys}
+        for record in records:
+            record["last_error"] = last_error.get((record["record_type"], record["record_id"]))
+    return records, total
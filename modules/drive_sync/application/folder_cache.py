@@ -0,0 +1,98 @@
+"""
+ذاكرة معرفات مجلدات Google Drive حسب المسار (المجلد الأب + الاسم).
+- طبقتان: قاموس في العملية ثم جدول drive_folder_cache المشترك بين العمليات وبعد إعادة التشغيل.
+- استعلام files().list / إنشاء المجلد يحدث مرة واحدة فقط لكل مسار.
+- الكتابة باتصال مستقل فلا تُثبّت عمل db.session غير المكتمل لدى المستدعي.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from core.extensions import db
+from modules.drive_sync.domain.models import DriveFolderCache
+
+logger = logging.getLogger(__name__)
+
+_folder_ids: Dict[Tuple[str, str], str] = {}
+_lock = threading.Lock()
+
+
+def _table():
+    return DriveFolderCache.__table__
+
+
+def lookup_folder(parent_id: str, name: str) -> Optional[str]:
+    """معرف المجلد المخزن أو None."""
+    key = (parent_id, name)
+    folder_id = _folder_ids.get(key)
+    if folder_id:
+        return folder_id
+    t = _table()
+    try:
+        with db.engine.connect() as conn:
+            folder_id = conn.execute(
+                select(t.c.folder_id).where(t.c.parent_id == parent_id, t.c.name == name)
+            ).scalar()
+    except Exception as e:
+        logger.warning(f"Drive folder cache lookup failed: {e}")
+        return None
+    if folder_id:
+        with _lock:
+            _folder_ids[key] = folder_id
+    return folder_id
+
+
+def remember_folder(parent_id: str, name: str, folder_id: str) -> None:
+    with _lock:
+        _folder_ids[(parent_id, name)] = folder_id
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(insert(_table()).values(parent_id=parent_id, name=name[:255], folder_id=folder_id))
+    except IntegrityError:
+        pass  # عملية أخرى سجلت نفس المسار
+    except Exception as e:
+        logger.warning(f"Drive folder cache write failed: {e}")
+
+
+def forget_folder(folder_id: str) -> None:
+    """إزالة مجلد (حُذف من Drive) وأبنائه المباشرين من الذاكرة."""
+    with _lock:
+        for key in [k for k, v in _folder_ids.items() if v == folder_id or k[0] == folder_id]:
+            del _folder_ids[key]
+    t = _table()
+    try:
+        with db.engine.begin() as conn:
+            conn.execute(delete(t).where(or_(t.c.folder_id == folder_id, t.c.parent_id == folder_id)))
+    except Exception as e:
+        logger.warning(f"Drive folder cache invalidation failed: {e}")
+
+
+def cached_folder(parent_id: str, name: str, create: Callable[[str, str], Optional[str]]) -> Optional[str]:
+    """معرف المجلد name تحت parent_id؛ create(name, parent_id) يُستدعى فقط عند عدم وجوده في الذاكرة."""
+    folder_id = lookup_folder(parent_id, name)
+    if folder_id:
+        return folder_id
+    folder_id = create(name, parent_id)
+    if folder_id:
+        remember_folder(parent_id, name, folder_id)
+    return folder_id
+
+
+def resolve_folder_path(root_id: str, segments: Iterable[str],
+                        create: Callable[[str, str], Optional[str]]) -> Optional[str]:
+    """معرف المجلد الأخير في المسار root/segment1/segment2... مع إنشاء الناقص."""
+    parent_id = root_id
+    for name in segments:
+        parent_id = cached_folder(parent_id, name, create)
+        if not parent_id:
+            return None
+    return parent_id
+
+
+def clear_folder_memory() -> None:
+    """تفريغ طبقة الذاكرة (للاختبارات)."""
+    with _lock:
+        _folder_ids.clear()
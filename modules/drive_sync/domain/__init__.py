@@ -0,0 +1,4 @@
+"""Drive sync domain models package"""
+from modules.drive_sync.domain.models import DriveFolderCache, DriveUpload
+
+__all__ = ['DriveFolderCache', 'DriveUpload']
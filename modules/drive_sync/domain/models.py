@@ -0,0 +1,66 @@
+"""
+نماذج مزامنة Google Drive.
+- drive_folder_cache: معرف كل مجلد منشأ على Drive حسب (المجلد الأب، الاسم)، فلا يتكرر استعلام files().list.
+- drive_uploads: ملف واحد في طابور الرفع مع بصمة محتواه ونتيجة رفعه.
+"""
+from datetime import datetime
+
+from core.extensions import db
+
+UPLOAD_QUEUED = "queued"
+UPLOAD_DONE = "done"
+UPLOAD_FAILED = "failed"
+UPLOAD_MISSING = "missing"  # الملف المحلي غير موجود: لا تُعاد محاولته
+
+PENDING_UPLOAD_STATUSES = (UPLOAD_QUEUED, UPLOAD_FAILED)
+
+
+class DriveFolderCache(db.Model):
+    """معرف مجلد Drive لمسار (أب/اسم)."""
+    __tablename__ = "drive_folder_cache"
+
+    id = db.Column(db.Integer, primary_key=True)
+    parent_id = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(255), nullable=False)
+    folder_id = db.Column(db.String(100), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("parent_id", "name", name="uq_drive_folder_cache_path"),
+    )
+
+    def __repr__(self):
+        return f"<DriveFolderCache {self.parent_id}/{self.name} -> {self.folder_id}>"
+
+
+class DriveUpload(db.Model):
+    """ملف في طابور الرفع إلى Drive مرتبط بسجل مصدر (ورشة، تسليم، فحص سلامة...)."""
+    __tablename__ = "drive_uploads"
+
+    id = db.Column(db.Integer, primary_key=True)
+    record_type = db.Column(db.String(50), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    role = db.Column(db.String(20), nullable=False, default="image")  # pdf / image
+    source = db.Column(db.String(500), nullable=False)  # مسار محلي أو storage:<مفتاح>
+    folder_path = db.Column(db.String(500), nullable=False)  # مقاطع المجلد تحت الجذر مفصولة بـ /
+    file_name = db.Column(db.String(255), nullable=True)
+    content_hash = db.Column(db.String(64), nullable=True, index=True)  # sha256
+    file_size = db.Column(db.BigInteger, nullable=True)
+    status = db.Column(db.String(16), nullable=False, default=UPLOAD_QUEUED)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(500), nullable=True)
+    folder_id = db.Column(db.String(100), nullable=True)
+    file_id = db.Column(db.String(100), nullable=True)
+    web_view_link = db.Column(db.String(500), nullable=True)
+    download_link = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    uploaded_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("idx_drive_uploads_record", "record_type", "record_id"),
+        db.Index("idx_drive_uploads_status", "status", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<DriveUpload {self.record_type}:{self.record_id} {self.role} {self.status}>"
@@ -0,0 +1,327 @@
+"""
+نموذج عرض بوابة الموظف (لوحة المعلومات وصفحة "سياراتي") بعدد ثابت من الاستعلامات.
+- المركبات (العهدة، المؤجرة، المشاريع) تُجلب أولاً، ثم كل نوع سجل مرتبط باستعلام IN واحد
+  مع row_number() لكل مركبة، فلا يُجلب إلا ما تعرضه الصفحة ويُجمّع في الذاكرة.
+- النتيجة لقطات (SimpleNamespace) لا كائنات ORM: تبقى صالحة في الذاكرة المؤقتة بعد انتهاء الجلسة،
+  ولا تُلمس علاقات Vehicle (safety_checks و workshop_records فيها delete-orphan).
+- العرض يُخزن لكل موظف في التخزين المؤقت المشترك (EMPLOYEE_PORTAL_CACHE_TTL) بصيغة JSON موسومة الأنواع،
+  فيرى كل العمال نفس النسخة ونفس الإبطال.
+- حفظ تسليم أو فحص أو ورشة أو إيجار أو مشروع أو طلب عملية يبطلها كلها (رقم جيل في مفاتيحها)، وحفظ راتب
+  أو حضور يبطل مدخلات الموظف المعني فقط. التغييرات تُجمع في before_flush وتُبطل بعد commit فقط،
+  فلا يعيد طلب متزامن بناء العرض من بيانات لم تُحفظ بعد.
+- الكتابات المباشرة (upsert الحضور، الاستيراد الجماعي) لا تمر بالـ flush: تستدعي invalidate_portal_cache
+  بعد الحفظ أو mark_portal_changed قبله.
+"""
+import logging
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Sequence
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session, aliased
+
+from core.cache import get_cache
+from core.extensions import db
+from models import (
+    Attendance,
+    OperationRequest,
+    Salary,
+    Vehicle,
+    VehicleHandover,
+    VehiclePeriodicInspection,
+    VehicleProject,
+    VehicleRental,
+    VehicleSafetyCheck,
+    VehicleWorkshop,
+)
+from modules.vehicles.application.vehicle_custody_service import vehicles_in_custody_of
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_TTL = 60
+CACHE_KEY_PREFIX = "employee-portal:v1"
+GENERATION_KEY = "employee-portal:generation"
+GENERATION_TTL = 24 * 3600
+SHARED_VEHICLES_LIMIT = 10  # المؤجرة والمشاريع النشطة (عرض عام)
+HANDOVERS_PER_VEHICLE = 5
+RECORDS_PER_VEHICLE = 3
+
+PAGE_DASHBOARD = "dashboard"
+PAGE_VEHICLES = "vehicles"
+
+_PENDING_KEY = "employee_portal_invalidate"
+_ALL = None  # في مجموعة الإبطال المعلقة: كل الموظفين
+_state = {"listeners": False}
+
+# نماذج يغير حفظها قوائم مركبات أكثر من موظف (العهدة تتبع التسليم وطلبات اعتماده)
+SHARED_MODELS = (Vehicle, VehicleHandover, VehicleSafetyCheck, VehiclePeriodicInspection, VehicleWorkshop,
+                 VehicleRental, VehicleProject, OperationRequest)
+EMPLOYEE_MODELS = (Salary, Attendance)
+
+
+# ==================== اللقطات ====================
+
+def snapshot(obj) -> SimpleNamespace:
+    """نسخة من أعمدة كائن ORM تُقرأ في القوالب كالكائن نفسه (obj.field)."""
+    return SimpleNamespace(**{attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs})
+
+
+def vehicle_view(vehicle, **related) -> SimpleNamespace:
+    view = snapshot(vehicle)
+    for name in ("handovers", "employee_operations", "safety_checks", "inspections", "workshop_records"):
+        setattr(view, name, related.get(name, []))
+    return view
+
+
+def latest_per_vehicle(model, order_column, vehicle_ids: Sequence[int], limit: int,
+                       *criteria) -> Dict[int, List[SimpleNamespace]]:
+    """{vehicle_id: آخر limit سجلات} لعدة مركبات باستعلام واحد."""
+    if not vehicle_ids:
+        return {}
+    rank = func.row_number().over(partition_by=model.vehicle_id,
+                                  order_by=(order_column.desc(), model.id.desc())).label("rank")
+    ranked = select(model, rank).where(model.vehicle_id.in_(vehicle_ids), *criteria).subquery()
+    row = aliased(model, ranked)
+    grouped: Dict[int, List[SimpleNamespace]] = defaultdict(list)
+    for record in db.session.query(row).filter(ranked.c.rank <= limit).order_by(ranked.c.vehicle_id, ranked.c.rank):
+        grouped[record.vehicle_id].append(snapshot(record))
+    return grouped
+
+
+# ==================== الصفحات ====================
+
+def _custody_vehicles(employee_id: int) -> List[Any]:
+    return vehicles_in_custody_of(employee_id).order_by(Vehicle.id).all()
+
+
+def _build_dashboard(employee_id: int) -> Dict[str, Any]:
+    assigned = _custody_vehicles(employee_id)
+    latest_salary = Salary.query.filter_by(employee_id=employee_id).order_by(Salary.created_at.desc()).first()
+
+    today = date.today()
+    month_start = today.replace(day=1)
+    next_month = date(today.year + (today.month == 12), today.month % 12 + 1, 1)
+    attendance = dict(
+        db.session.query(Attendance.status, func.count(Attendance.id)).filter(
+            Attendance.employee_id == employee_id,
+            Attendance.date >= month_start,
+            Attendance.date < next_month,
+        ).group_by(Attendance.status).all()
+    )
+    stats = {
+        "assigned_vehicles_count": len(assigned),
+        "latest_salary": snapshot(latest_salary) if latest_salary else None,
+        "monthly_attendance_days": attendance.get("present", 0),
+        "monthly_absence_days": attendance.get("absent", 0),
+        "remaining_vacation_days": 30,  # قيمة افتراضية مؤقتة
+    }
+    return {"stats": stats, "assigned_vehicles": [vehicle_view(v) for v in assigned]}
+
+
+def _shared_vehicles(link_model) -> List[tuple]:
+    return (
+        db.session.query(Vehicle, link_model)
+        .join(link_model, Vehicle.id == link_model.vehicle_id)
+        .filter(link_model.is_active == True)  # noqa: E712
+        .order_by(link_model.id)
+        .limit(SHARED_VEHICLES_LIMIT)
+        .all()
+    )
+
+
+def _build_vehicles(employee_id: int) -> Dict[str, Any]:
+    custody = _custody_vehicles(employee_id)
+    rented = _shared_vehicles(VehicleRental)
+    projects = _shared_vehicles(VehicleProject)
+
+    custody_ids = [v.id for v in custody]
+    shared_ids = sorted({v.id for v, _ in rented} | {v.id for v, _ in projects})
+    all_ids = sorted(set(custody_ids) | set(shared_ids))
+
+    custody_handovers = latest_per_vehicle(VehicleHandover, VehicleHandover.handover_date, custody_ids,
+                                           HANDOVERS_PER_VEHICLE, VehicleHandover.employee_id == employee_id)
+    shared_handovers = latest_per_vehicle(VehicleHandover, VehicleHandover.handover_date, shared_ids,
+                                          HANDOVERS_PER_VEHICLE)
+    safety_checks = latest_per_vehicle(VehicleSafetyCheck, VehicleSafetyCheck.check_date, all_ids,
+                                       RECORDS_PER_VEHICLE)
+    inspections = latest_per_vehicle(VehiclePeriodicInspection, VehiclePeriodicInspection.inspection_date,
+                                     custody_ids, RECORDS_PER_VEHICLE)
+    workshop = latest_per_vehicle(VehicleWorkshop, VehicleWorkshop.entry_date, custody_ids, RECORDS_PER_VEHICLE)
+
+    total_safety_checks = 0
+    if custody_ids:
+        total_safety_checks = VehicleSafetyCheck.query.filter(VehicleSafetyCheck.vehicle_id.in_(custody_ids)).count()
+    operations = dict(
+        db.session.query(OperationRequest.status, func.count(OperationRequest.id))
+        .filter(OperationRequest.status.in_(("pending", "approved")))
+        .group_by(OperationRequest.status)
+        .all()
+    )
+    stats = {
+        "total_operations": VehicleHandover.query.filter_by(employee_id=employee_id).count(),
+        "total_safety_checks": total_safety_checks,
+        "pending_operations": operations.get("pending", 0),
+        "approved_operations": operations.get("approved", 0),
+    }
+
+    def _shared(pairs):
+        return [
+            (vehicle_view(v, handovers=shared_handovers.get(v.id, []), safety_checks=safety_checks.get(v.id, [])),
+             snapshot(link))
+            for v, link in pairs
+        ]
+
+    return {
+        "current_driver_vehicles": [
+            vehicle_view(
+                v,
+                handovers=custody_handovers.get(v.id, []),
+                safety_checks=safety_checks.get(v.id, []),
+                inspections=inspections.get(v.id, []),
+                workshop_records=workshop.get(v.id, []),
+            )
+            for v in custody
+        ],
+        "rented_vehicles": _shared(rented),
+        "project_vehicles": _shared(projects),
+        "stats": stats,
+    }
+
+
+# ==================== الذاكرة المؤقتة ====================
+
+def _cache_ttl() -> int:
+    return current_app.config.get("EMPLOYEE_PORTAL_CACHE_TTL", DEFAULT_CACHE_TTL) if has_app_context() else 0
+
+
+def _encode(value):
+    """العرض بصيغة JSON مع وسم اللقطات والتواريخ والأوقات والأزواج لاستعادتها كما هي."""
+    if isinstance(value, SimpleNamespace):
+        return {"__ns__": {k: _encode(v) for k, v in vars(value).items()}}
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    if isinstance(value, time):
+        return {"__time__": value.isoformat()}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, dict):
+        return {k: _encode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    return value
+
+
+_DECODERS = {
+    "__ns__": lambda fields: SimpleNamespace(**{k: _decode(v) for k, v in fields.items()}),
+    "__datetime__": datetime.fromisoformat,
+    "__date__": date.fromisoformat,
+    "__time__": time.fromisoformat,
+    "__tuple__": lambda items: tuple(_decode(v) for v in items),
+}
+
+
+def _decode(value):
+    if isinstance(value, dict):
+        if len(value) == 1:
+            tag, inner = next(iter(value.items()))
+            if tag in _DECODERS:
+                return _DECODERS[tag](inner)
+        return {k: _decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    return value
+
+
+def _generation(cache) -> str:
+    """رقم الجيل الحالي؛ تغييره يبطل كل العروض المخزنة دفعة واحدة."""
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, uuid.uuid4().hex, GENERATION_TTL)
+        generation = cache.get(GENERATION_KEY) or "0"
+    return generation
+
+
+def _cache_key(generation: str, page: str, employee_id: int) -> str:
+    return f"{CACHE_KEY_PREFIX}:{generation}:{page}:{employee_id}"
+
+
+def _cached(page: str, employee_id: int, build: Callable[[int], Dict[str, Any]]) -> Dict[str, Any]:
+    ttl = _cache_ttl()
+    if ttl <= 0:
+        return build(employee_id)
+    cache = get_cache()
+    key = _cache_key(_generation(cache), page, employee_id)
+    payload = cache.get(key)
+    if payload is not None:
+        try:
+            return _decode(payload)
+        except Exception as e:
+            logger.warning(f"تعذر قراءة عرض بوابة الموظف المخزن {key}: {str(e)}")
+    view = build(employee_id)
+    cache.set(key, _encode(view), ttl)
+    return view
+
+
+def get_dashboard_view(employee_id: int) -> Dict[str, Any]:
+    """{'stats', 'assigned_vehicles'} للوحة معلومات الموظف."""
+    return _cached(PAGE_DASHBOARD, employee_id, _build_dashboard)
+
+
+def get_vehicles_view(employee_id: int) -> Dict[str, Any]:
+    """{'current_driver_vehicles', 'rented_vehicles', 'project_vehicles', 'stats'} لصفحة سياراتي."""
+    return _cached(PAGE_VEHICLES, employee_id, _build_vehicles)
+
+
+def invalidate_portal_cache(employee_id=None) -> None:
+    """مسح مدخلات موظف واحد، أو الكل إن لم يُحدد (جيل جديد). يُستدعى بعد حفظ المعاملة."""
+    if not has_app_context():
+        return
+    cache = get_cache()
+    if employee_id is None:
+        cache.set(GENERATION_KEY, uuid.uuid4().hex, GENERATION_TTL)
+        return
+    generation = _generation(cache)
+    for page in (PAGE_DASHBOARD, PAGE_VEHICLES):
+        cache.delete(_cache_key(generation, page, employee_id))
+
+
+def mark_portal_changed(session: Session, employee_id=_ALL) -> None:
+    """تسجيل إبطال يُنفذ بعد commit الجلسة (للكتابات المباشرة التي لا تمر بالـ flush)."""
+    session.info.setdefault(_PENDING_KEY, set()).add(employee_id)
+
+
+def _collect_changes(session: Session, flush_context, instances) -> None:
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, SHARED_MODELS):
+            mark_portal_changed(session)
+        elif isinstance(obj, EMPLOYEE_MODELS):
+            mark_portal_changed(session, obj.employee_id)
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if _ALL in pending:
+        invalidate_portal_cache()
+        return
+    for employee_id in pending:
+        invalidate_portal_cache(employee_id)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def init_employee_portal(app) -> None:
+    """تسجيل أحداث الجلسة التي تبطل عروض بوابة الموظف بعد حفظ السجلات التي تعرضها."""
+    if not _state["listeners"]:
+        event.listen(Session, "before_flush", _collect_changes)
+        event.listen(Session, "after_commit", _after_commit)
+        event.listen(Session, "after_rollback", _after_rollback)
+        _state["listeners"] = True
@@ -248,7 +248,8 @@ class Attendance(db.Model):
 
     __table_args__ = (
         db.Index("idx_attendance_date", "date"),
-        db.Index("idx_attendance_employee_date", "employee_id", "date"),
+        # سجل واحد لكل موظف في اليوم؛ يعتمد عليه upsert تسجيل الحضور من الجوال
+        db.Index("idx_attendance_employee_date", "employee_id", "date", unique=True),
     )
 
     def __repr__(self):
@@ -288,6 +289,19 @@ class Salary(db.Model):
         return f"<Salary {getattr(self.employee, 'name', '')} for {self.month}/{self.year}>"
 
 
+# أسماء أنواع مستندات الموظف بالعربية
+DOCUMENT_TYPE_LABELS = {
+    "national_id": "الهوية الوطنية",
+    "passport": "جواز السفر",
+    "health_certificate": "الشهادة الصحية",
+    "work_permit": "رخصة العمل",
+    "education_certificate": "الشهادة التعليمية",
+    "driving_license": "رخصة القيادة",
+    "annual_leave": "إجازة سنوية",
+    "other": "أخرى",
+}
+
+
 class Document(db.Model):
     """مستندات الموظف."""
     __tablename__ = "document"
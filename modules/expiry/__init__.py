@@ -0,0 +1,3 @@
+"""
+وحدة تقويم الانتهاء — جدول موحد لتواريخ انتهاء وثائق الموظفين والمركبات وشرائح SIM.
+"""
@@ -0,0 +1,66 @@
+"""
+أحداث تحديث تقويم الانتهاء — تُبقي expiry_calendar متزامناً مع المستندات والمركبات والشرائح.
+بعد التحديثات الجماعية التي لا تطلق الأحداث (core.model_events): flask expiry-calendar-rebuild.
+"""
+from sqlalchemy import event, update
+
+from core.model_events import columns_changed
+from models import Document, Employee, SimCard, Vehicle
+from modules.expiry.application import expiry_calendar_service as svc
+from modules.expiry.domain.models import ExpiryCalendarEntry
+
+# الأعمدة التي يؤثر تغييرها على صفوف التقويم
+_TRACKED_COLUMNS = {
+    Document: ("document_type", "expiry_date", "employee_id"),
+    Vehicle: ("plate_number", "authorization_expiry_date", "registration_expiry_date", "inspection_expiry_date"),
+    SimCard: ("phone_number", "renewal_date", "employee_id"),
+}
+
+_ENTITY_TYPES = {
+    Document: svc.ENTITY_DOCUMENT,
+    Vehicle: svc.ENTITY_VEHICLE,
+    SimCard: svc.ENTITY_SIM,
+}
+
+
+def _make_upsert_listener(model, only_on_change):
+    entity_type = _ENTITY_TYPES[model]
+    columns = _TRACKED_COLUMNS[model]
+
+    def _upsert(mapper, connection, target):
+        if only_on_change and not columns_changed(target, columns):
+            return
+        svc.refresh_entities(connection, entity_type, [target.id])
+
+    return _upsert
+
+
+def _make_delete_listener(model):
+    entity_type = _ENTITY_TYPES[model]
+
+    def _remove(mapper, connection, target):
+        if target.id is not None:
+            svc.remove_entities(connection, entity_type, [target.id])
+
+    return _remove
+
+
+def _employee_renamed(mapper, connection, target):
+    # اسم الموظف يظهر في صفوف مستنداته
+    if not columns_changed(target, ("name",)):
+        return
+    t = ExpiryCalendarEntry.__table__
+    connection.execute(
+        update(t)
+        .where(t.c.entity_type == svc.ENTITY_DOCUMENT, t.c.employee_id == target.id)
+        .values(owner_label=target.name or "")
+    )
+
+
+def register_calendar_listeners() -> None:
+    """تسجيل أحداث الإدراج والتحديث والحذف لكل مصدر في التقويم."""
+    for model in _ENTITY_TYPES:
+        event.listen(model, "after_insert", _make_upsert_listener(model, only_on_change=False))
+        event.listen(model, "after_update", _make_upsert_listener(model, only_on_change=True))
+        event.listen(model, "after_delete", _make_delete_listener(model))
+    event.listen(Employee, "after_update", _employee_renamed)
@@ -0,0 +1,397 @@
+"""
+خدمة تقويم الانتهاء الموحد (expiry_calendar).
+- المصادر: مستندات الموظفين، وثائق المركبات (تفويض/استمارة/فحص)، تجديد شرائح SIM.
+- تحديث تدريجي: أحداث الحفظ تعيد كتابة صفوف الكيان المعدّل فقط (calendar_events).
+- تحديث يومي للشرائح (bucket) لأن مرور الوقت ينقل الوثائق بين الشرائح دون كتابة.
+- لوحات الانتهاء والإشعارات تقرأ نطاقاً مفهرساً من الجدول بدل مسح الجداول المصدر.
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, func, insert, select, update
+
+from core.extensions import db
+from modules.jobs.application.job_queue import enqueue, job_handler
+from modules.expiry.domain.models import (
+    BUCKET_EXPIRED,
+    BUCKET_LATER,
+    EXPIRY_BUCKETS,
+    ExpiryCalendarEntry,
+    bucket_for,
+)
+
+logger = logging.getLogger(__name__)
+
+ENTITY_DOCUMENT = "document"
+ENTITY_VEHICLE = "vehicle"
+ENTITY_SIM = "sim"
+
+BATCH_SIZE = 500
+NOTIFY_WINDOW_DAYS = 30
+# الوثيقة المنتهية يُنبَّه عنها أسبوعاً بعد انتهائها ثم تبقى في لوحة الانتهاء فقط
+NOTIFY_LOOKBACK_DAYS = 7
+NOTIFY_MAX_ENTRIES = 200
+NOTIFICATION_TYPE = "document_expiry"
+REBUILD_JOB = "expiry.rebuild"
+REBUILD_KEY = "expiry-calendar:rebuild"
+
+_OWNER_PREFIX = {
+    ENTITY_DOCUMENT: "للموظف",
+    ENTITY_VEHICLE: "للمركبة",
+    ENTITY_SIM: "للشريحة",
+}
+_ACTION_ENDPOINTS = {
+    ENTITY_DOCUMENT: "documents.dashboard",
+    ENTITY_VEHICLE: "vehicles.expired_documents",
+    ENTITY_SIM: "sim_management.index",
+}
+
+_state = {"listeners": False}
+
+
+# ==================== المصادر ====================
+
+def _document_rows(connection, ids: Optional[Sequence[int]]) -> Iterable[Dict[str, Any]]:
+    from models import Document, Employee
+    from modules.employees.domain.models import DOCUMENT_TYPE_LABELS
+
+    d, e = Document.__table__, Employee.__table__
+    stmt = (
+        select(d.c.id, d.c.document_type, d.c.expiry_date, d.c.employee_id, e.c.name)
+        .select_from(d.outerjoin(e, e.c.id == d.c.employee_id))
+        .where(d.c.expiry_date.isnot(None))
+    )
+    if ids is not None:
+        stmt = stmt.where(d.c.id.in_(ids))
+    for row in connection.execute(stmt):
+        yield {
+            "entity_id": row.id,
+            "doc_type": row.document_type,
+            "doc_label": DOCUMENT_TYPE_LABELS.get(row.document_type, row.document_type),
+            "owner_label": row.name or "",
+            "employee_id": row.employee_id,
+            "expiry_date": row.expiry_date,
+        }
+
+
+def _vehicle_rows(connection, ids: Optional[Sequence[int]]) -> Iterable[Dict[str, Any]]:
+    from modules.vehicles.domain.models import COMPLIANCE_DOCUMENTS, Vehicle
+
+    t = Vehicle.__table__
+    fields = [field for field, _, _, _ in COMPLIANCE_DOCUMENTS]
+    stmt = select(t.c.id, t.c.plate_number, *[t.c[f] for f in fields])
+    if ids is not None:
+        stmt = stmt.where(t.c.id.in_(ids))
+    for row in connection.execute(stmt):
+        for field, _, doc_type, doc_name in COMPLIANCE_DOCUMENTS:
+            expiry = row._mapping[field]
+            if expiry is not None:
+                yield {
+                    "entity_id": row.id,
+                    "doc_type": doc_type,
+                    "doc_label": doc_name,
+                    "owner_label": row.plate_number or "",
+                    "employee_id": None,
+                    "expiry_date": expiry,
+                }
+
+
+def _sim_rows(connection, ids: Optional[Sequence[int]]) -> Iterable[Dict[str, Any]]:
+    from models import SimCard
+
+    t = SimCard.__table__
+    stmt = select(t.c.id, t.c.phone_number, t.c.employee_id, t.c.renewal_date).where(t.c.renewal_date.isnot(None))
+    if ids is not None:
+        stmt = stmt.where(t.c.id.in_(ids))
+    for row in connection.execute(stmt):
+        yield {
+            "entity_id": row.id,
+            "doc_type": "sim_renewal",
+            "doc_label": "تجديد الشريحة",
+            "owner_label": row.phone_number or "",
+            "employee_id": row.employee_id,
+            "expiry_date": row.renewal_date,
+        }
+
+
+_SOURCES = {
+    ENTITY_DOCUMENT: _document_rows,
+    ENTITY_VEHICLE: _vehicle_rows,
+    ENTITY_SIM: _sim_rows,
+}
+
+
+def _with_bucket(rows: Iterable[Dict[str, Any]], entity_type: str, today: date) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    out = []
+    for row in rows:
+        row["entity_type"] = entity_type
+        row["bucket"] = bucket_for(row["expiry_date"], today)
+        row["updated_at"] = now
+        out.append(row)
+    return out
+
+
+# ==================== التحديث ====================
+
+def refresh_entities(connection, entity_type: str, ids: Sequence[int], today: Optional[date] = None) -> int:
+    """إعادة كتابة صفوف التقويم لكيانات محددة (يُستدعى من أحداث الحفظ على نفس الاتصال)."""
+    ids = [i for i in ids if i is not None]
+    if not ids:
+        return 0
+    today = today or date.today()
+    t = ExpiryCalendarEntry.__table__
+    written = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start:start + BATCH_SIZE]
+        connection.execute(delete(t).where(t.c.entity_type == entity_type, t.c.entity_id.in_(chunk)))
+        rows = _with_bucket(_SOURCES[entity_type](connection, chunk), entity_type, today)
+        if rows:
+            connection.execute(insert(t), rows)
+            written += len(rows)
+    return written
+
+
+def remove_entities(connection, entity_type: str, ids: Sequence[int]) -> None:
+    t = ExpiryCalendarEntry.__table__
+    connection.execute(delete(t).where(t.c.entity_type == entity_type, t.c.entity_id.in_(list(ids))))
+
+
+def rebuild_calendar(today: Optional[date] = None) -> int:
+    """إعادة بناء التقويم كاملاً من المصادر (التهيئة الأولى أو بعد تحديثات جماعية)."""
+    today = today or date.today()
+    t = ExpiryCalendarEntry.__table__
+    total = 0
+    with db.engine.begin() as conn:
+        conn.execute(delete(t))
+        for entity_type, source in _SOURCES.items():
+            batch: List[Dict[str, Any]] = []
+            for row in source(conn, None):
+                batch.append(row)
+                if len(batch) >= BATCH_SIZE:
+                    conn.execute(insert(t), _with_bucket(batch, entity_type, today))
+                    total += len(batch)
+                    batch = []
+            if batch:
+                conn.execute(insert(t), _with_bucket(batch, entity_type, today))
+                total += len(batch)
+    return total
+
+
+def _bucket_ranges(today: date):
+    """حدود كل شريحة كتواريخ: (الاسم، من، إلى) مع None للطرف المفتوح."""
+    ranges = [(BUCKET_EXPIRED, None, today - timedelta(days=1))]
+    first_day = 0
+    for name, last_day in EXPIRY_BUCKETS:
+        ranges.append((name, today + timedelta(days=first_day), today + timedelta(days=last_day)))
+        first_day = last_day + 1
+    ranges.append((BUCKET_LATER, today + timedelta(days=first_day), None))
+    return ranges
+
+
+def refresh_buckets(today: Optional[date] = None) -> int:
+    """نقل الصفوف بين الشرائح حسب اليوم الحالي (المهمة اليومية). يعيد عدد الصفوف المنقولة."""
+    today = today or date.today()
+    t = ExpiryCalendarEntry.__table__
+    moved = 0
+    with db.engine.begin() as conn:
+        for name, low, high in _bucket_ranges(today):
+            conditions = [t.c.bucket != name]
+            if low is not None:
+                conditions.append(t.c.expiry_date >= low)
+            if high is not None:
+                conditions.append(t.c.expiry_date <= high)
+            moved += conn.execute(update(t).where(and_(*conditions)).values(bucket=name)).rowcount or 0
+    logger.info(f"Expiry calendar buckets refreshed: {moved} rows moved")
+    return moved
+
+
+# ==================== القراءة ====================
+
+def get_bucket_counts(entity_types: Optional[Sequence[str]] = None) -> Dict[str, int]:
+    """عدد الوثائق في كل شريحة باستعلام GROUP BY واحد."""
+    query = db.session.query(ExpiryCalendarEntry.bucket, func.count(ExpiryCalendarEntry.id))
+    if entity_types:
+        query = query.filter(ExpiryCalendarEntry.entity_type.in_(list(entity_types)))
+    counts = {BUCKET_EXPIRED: 0, BUCKET_LATER: 0}
+    counts.update({name: 0 for name, _ in EXPIRY_BUCKETS})
+    for bucket, count in query.group_by(ExpiryCalendarEntry.bucket).all():
+        counts[bucket] = count
+    return counts
+
+
+def get_entries(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    entity_types: Optional[Sequence[str]] = None,
+    doc_types: Optional[Sequence[str]] = None,
+    limit: Optional[int] = None,
+    descending: bool = False,
+) -> List[ExpiryCalendarEntry]:
+    """قراءة نطاق مفهرسة على expiry_date مع تصفية اختيارية بالنوع."""
+    query = ExpiryCalendarEntry.query
+    if start is not None:
+        query = query.filter(ExpiryCalendarEntry.expiry_date >= start)
+    if end is not None:
+        query = query.filter(ExpiryCalendarEntry.expiry_date <= end)
+    if entity_types:
+        query = query.filter(ExpiryCalendarEntry.entity_type.in_(list(entity_types)))
+    if doc_types:
+        query = query.filter(ExpiryCalendarEntry.doc_type.in_(list(doc_types)))
+    order = ExpiryCalendarEntry.expiry_date.desc() if descending else ExpiryCalendarEntry.expiry_date
+    query = query.order_by(order, ExpiryCalendarEntry.id)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+# ==================== الإشعارات ====================
+
+def build_expiry_message(entity_type: str, doc_label: str, owner_label: str, days: int):
+    """(العنوان، الوصف، الأولوية) لإشعار انتهاء — نفس صياغة إشعارات المستندات."""
+    owner = f"{_OWNER_PREFIX.get(entity_type, '')} {owner_label}".strip()
+    if days < 0:
+        return f"وثيقة منتهية - {doc_label}", f"انتهت صلاحية {doc_label} {owner} منذ {abs(days)} يوم", "critical"
+    if days <= 7:
+        return "تنبيه عاجل: وثيقة تنتهي قريباً", f"{doc_label} {owner} تنتهي خلال {days} أيام", "critical"
+    if days <= 30:
+        return "تذكير: وثيقة تنتهي خلال شهر", f"{doc_label} {owner} تنتهي خلال {days} يوماً", "high"
+    return "تذكير: وثيقة قريبة من الانتهاء", f"{doc_label} {owner} تنتهي خلال {days} يوماً", "normal"
+
+
+def _action_urls() -> Dict[str, Optional[str]]:
+    from flask import url_for
+
+    urls: Dict[str, Optional[str]] = {}
+    for entity_type, endpoint in _ACTION_ENDPOINTS.items():
+        try:
+            urls[entity_type] = url_for(endpoint)
+        except Exception:
+            urls[entity_type] = None
+    return urls
+
+
+def dispatch_expiry_notifications(
+    today: Optional[date] = None,
+    days: int = NOTIFY_WINDOW_DAYS,
+    entity_types: Optional[Sequence[str]] = None,
+    user_ids: Optional[Sequence[int]] = None,
+    lookback_days: int = NOTIFY_LOOKBACK_DAYS,
+    max_entries: int = NOTIFY_MAX_ENTRIES,
+) -> int:
+    """
+    إنشاء إشعارات الانتهاء لكل المستخدمين بإدراج جماعي واحد لكل دفعة.
+    النطاق من (اليوم - lookback_days) إلى (اليوم + days) بحد max_entries وثيقة للتشغيلة،
+    الأقدم انتهاءً أولاً؛ الوثائق المنتهية منذ زمن لا يعاد التنبيه عنها.
+    التكرار ممنوع يومياً: لا يُعاد نفس الإشعار (مستخدم، كيان، نص) في نفس اليوم.
+    يعيد عدد الإشعارات المنشأة.
+    """
+    from models import Notification, User
+
+    today = today or date.today()
+    entries = get_entries(
+        start=today - timedelta(days=lookback_days),
+        end=today + timedelta(days=days),
+        entity_types=entity_types,
+        limit=max_entries,
+    )
+    if not entries:
+        return 0
+    if user_ids is None:
+        user_ids = [uid for (uid,) in db.session.query(User.id).all()]
+    if not user_ids:
+        return 0
+
+    n = Notification.__table__
+    day_start = datetime.combine(today, time.min)
+    existing = {
+        (row.user_id, row.related_entity_type, row.related_entity_id, row.description)
+        for row in db.session.execute(
+            select(n.c.user_id, n.c.related_entity_type, n.c.related_entity_id, n.c.description).where(
+                n.c.notification_type == NOTIFICATION_TYPE,
+                n.c.created_at >= day_start,
+            )
+        )
+    }
+    urls = _action_urls()
+    now = datetime.utcnow()
+    rows: List[Dict[str, Any]] = []
+    created = 0
+    for entry in entries:
+        days_left = (entry.expiry_date - today).days
+        title, description, priority = build_expiry_message(
+            entry.entity_type, entry.doc_label, entry.owner_label, days_left
+        )
+        for user_id in user_ids:
+            key = (user_id, entry.entity_type, entry.entity_id, description)
+            if key in existing:
+                continue
+            existing.add(key)
+            rows.append({
+                "user_id": user_id,
+                "notification_type": NOTIFICATION_TYPE,
+                "title": title,
+                "description": description,
+                "related_entity_type": entry.entity_type,
+                "related_entity_id": entry.entity_id,
+                "priority": priority,
+                "is_read": False,
+                "created_at": now,
+                "action_url": urls.get(entry.entity_type),
+            })
+            if len(rows) >= BATCH_SIZE:
+                db.session.execute(insert(n), rows)
+                created += len(rows)
+                rows = []
+    if rows:
+        db.session.execute(insert(n), rows)
+        created += len(rows)
+    db.session.commit()
+    return created
+
+
+# ==================== التهيئة ====================
+
+@click.command("expiry-calendar-rebuild")
+@with_appcontext
+def expiry_calendar_rebuild_command():
+    """إعادة بناء تقويم الانتهاء من جميع المصادر."""
+    click.echo(f"Expiry calendar rebuilt: {rebuild_calendar()} entries")
+
+
+@job_handler(REBUILD_JOB)
+def _rebuild_calendar_job(job):
+    job.update(stage="rebuilding", message="جاري بناء تقويم الانتهاء...")
+    return {"entries": rebuild_calendar()}
+
+
+def _queue_initial_build() -> None:
+    """بناء التقويم الفارغ مهمةً واحدة في الطابور (REBUILD_KEY يجمع طلبات كل العمليات التي تقلع معاً)."""
+    try:
+        enqueue(REBUILD_JOB, idempotency_key=REBUILD_KEY, message="بناء تقويم الانتهاء")
+        logger.info("Expiry calendar is empty: initial build queued")
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Expiry calendar build not queued (run flask expiry-calendar-rebuild): {e}")
+
+
+def init_expiry_calendar(app) -> None:
+    """تهيئة التقويم: أمر CLI، أحداث التحديث، وطلب بناء أولي في الطابور إن كان الجدول فارغاً."""
+    from modules.expiry.application.calendar_events import register_calendar_listeners
+
+    if "expiry-calendar-rebuild" not in app.cli.commands:
+        app.cli.add_command(expiry_calendar_rebuild_command)
+    if not _state["listeners"]:
+        register_calendar_listeners()
+        _state["listeners"] = True
+    try:
+        with db.engine.connect() as conn:
+            is_empty = conn.execute(select(ExpiryCalendarEntry.__table__.c.id).limit(1)).first() is None
+    except Exception as e:
+        logger.warning(f"Expiry calendar not checked: {e}")
+        return
+    if is_empty:
+        _queue_initial_build()
@@ -0,0 +1,4 @@
+"""Expiry calendar domain models package"""
+from modules.expiry.domain.models import ExpiryCalendarEntry
+
+__all__ = ['ExpiryCalendarEntry']
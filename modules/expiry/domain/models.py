@@ -0,0 +1,62 @@
+"""
+نماذج تقويم الانتهاء — جدول expiry_calendar المادي.
+كل صف يمثل وثيقة واحدة لها تاريخ انتهاء (مستند موظف، استمارة/فحص/تفويض مركبة، تجديد شريحة).
+يُحدَّث تدريجياً عند حفظ المصدر، وتُعاد شرائح (bucket) الانتهاء يومياً
+من modules.expiry.application.expiry_calendar_service.
+"""
+from datetime import date, datetime
+from typing import Optional
+
+from core.extensions import db
+
+# شرائح الانتهاء: (الاسم، آخر يوم متبقٍ ضمن الشريحة). الترتيب مهم.
+BUCKET_EXPIRED = "expired"
+BUCKET_LATER = "later"
+EXPIRY_BUCKETS = (
+    ("d7", 7),
+    ("d30", 30),
+    ("d60", 60),
+    ("d90", 90),
+)
+
+
+def bucket_for(expiry_date: Optional[date], today: date) -> Optional[str]:
+    """شريحة الانتهاء لتاريخ معين بالنسبة لليوم."""
+    if expiry_date is None:
+        return None
+    days = (expiry_date - today).days
+    if days < 0:
+        return BUCKET_EXPIRED
+    for name, last_day in EXPIRY_BUCKETS:
+        if days <= last_day:
+            return name
+    return BUCKET_LATER
+
+
+class ExpiryCalendarEntry(db.Model):
+    """تاريخ انتهاء وثيقة واحدة لكيان واحد."""
+    __tablename__ = "expiry_calendar"
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(30), nullable=False)  # document, vehicle, sim
+    entity_id = db.Column(db.Integer, nullable=False)
+    doc_type = db.Column(db.String(50), nullable=False)
+    doc_label = db.Column(db.String(100), nullable=False, default="")
+    owner_label = db.Column(db.String(255), nullable=False, default="")  # اسم الموظف / رقم اللوحة / رقم الشريحة
+    employee_id = db.Column(db.Integer, nullable=True)
+    expiry_date = db.Column(db.Date, nullable=False)
+    bucket = db.Column(db.String(10), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("entity_type", "entity_id", "doc_type", name="uq_expiry_calendar_doc"),
+        db.Index("idx_expiry_calendar_date", "expiry_date"),
+        db.Index("idx_expiry_calendar_bucket", "bucket", "expiry_date"),
+    )
+
+    @property
+    def days_remaining(self) -> int:
+        return (self.expiry_date - date.today()).days
+
+    def __repr__(self):
+        return f"<ExpiryCalendarEntry {self.entity_type}:{self.entity_id} {self.doc_type} {self.expiry_date}>"
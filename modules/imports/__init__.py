@@ -0,0 +1,3 @@
+"""
+وحدة الاستيراد المرحلي — رفع سجلات الأصول (شرائح SIM، الأرقام، الأجهزة، المركبات) عبر جدول مرحلي.
+"""
@@ -0,0 +1,398 @@
+"""
+خط الاستيراد المرحلي المشترك لسجلات الأصول.
+- stage_file: يقرأ الملف صفاً صفاً (openpyxl للقراءة فقط / csv؛ xls عبر pandas) ويكتب الصفوف المنظفة
+  إلى import_staging_rows على دفعات IMPORT_CHUNK_SIZE؛ التكرار داخل الملف يُعلّم أثناء القراءة.
+- validate_batch: مطابقة كل الدفعة مع الجدول الهدف باستعلام ربط واحد على المفتاح الطبيعي،
+  وحساب الفروق (جديد / تحديث / بلا تغيير) دون استعلام لكل صف.
+- preview_batch: ملخص ونماذج صفوف لكل حالة لصفحة المعاينة (imports/preview.html).
+- apply_batch: إدراج الجديد وتحديث الموجود (اختيارياً) جماعياً في معاملة واحدة بعد إعادة التحقق.
+- الدفعات غير المعتمدة تُحذف بعد IMPORT_STAGING_TTL_HOURS.
+"""
+import csv
+import io
+import logging
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+
+from core.extensions import db
+from modules.imports.application.import_specs import ImportSpec, get_spec, text
+from modules.imports.domain.models import (
+    BATCH_APPLIED,
+    BATCH_DISCARDED,
+    BATCH_STAGED,
+    ROW_DUPLICATE,
+    ROW_INVALID,
+    ROW_NEW,
+    ROW_STATUSES,
+    ROW_UNCHANGED,
+    ROW_UPDATE,
+    ImportBatch,
+    ImportStagingRow,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_STAGING_TTL_HOURS = 24
+ERROR_LIMIT = 100
+
+
+class ImportFormatError(ValueError):
+    """ملف لا يمكن استيراده (صيغة غير مدعومة، فارغ، أعمدة مطلوبة مفقودة)."""
+
+
+@dataclass
+class ImportResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    skipped_existing: int = 0
+    duplicates: int = 0
+    invalid: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def rejected(self) -> int:
+        return self.invalid + self.duplicates
+
+
+def _chunk_size() -> int:
+    return current_app.config.get("IMPORT_CHUNK_SIZE", DEFAULT_CHUNK_SIZE)
+
+
+def _chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# ==================== قراءة الملف ====================
+
+def _detect_format(stream, filename: Optional[str]) -> str:
+    head = stream.read(8)
+    stream.seek(0)
+    if head.startswith(b"PK\x03\x04"):
+        return "xlsx"
+    if head.startswith(b"\xd0\xcf\x11\xe0"):
+        return "xls"
+    if not filename or filename.lower().endswith((".csv", ".txt")):
+        return "csv"
+    raise ImportFormatError("صيغة الملف غير مدعومة؛ استخدم Excel (.xlsx أو .xls) أو CSV")
+
+
+def read_sheet(stream, filename: Optional[str] = None) -> Iterator[Tuple[int, tuple]]:
+    """(رقم الصف، القيم) لكل صف في الورقة الأولى دون تحميل الملف كاملاً في الذاكرة (عدا xls)."""
+    fmt = _detect_format(stream, filename)
+    if fmt == "xlsx":
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+        try:
+            yield from enumerate(workbook.active.iter_rows(values_only=True), start=1)
+        finally:
+            workbook.close()
+    elif fmt == "csv":
+        wrapper = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        try:
+            for number, values in enumerate(csv.reader(wrapper), start=1):
+                yield number, tuple(values)
+        finally:
+            wrapper.detach()
+    else:
+        import pandas as pd
+
+        frame = pd.read_excel(stream, header=None, dtype=object)
+        yield from enumerate(frame.itertuples(index=False, name=None), start=1)
+
+
+def resolve_columns(spec: ImportSpec, headers: Sequence) -> Dict[str, int]:
+    """الحقل -> رقم العمود: المطابقة التامة أولاً ثم الأجزاء (fuzzy_columns) ثم العمود الأول للمفتاح."""
+    names = [(text(h) or "").lower() for h in headers]
+    positions: Dict[str, int] = {}
+    for index, name in enumerate(names):
+        if name:
+            positions.setdefault(name, index)
+    mapping = {}
+    for field_name, aliases in spec.columns.items():
+        for alias in aliases:
+            if alias.lower() in positions:
+                mapping[field_name] = positions[alias.lower()]
+                break
+    used = set(mapping.values())
+    for field_name, parts in spec.fuzzy_columns.items():
+        if field_name in mapping:
+            continue
+        for index, name in enumerate(names):
+            if index not in used and name and any(p in name for p in parts):
+                mapping[field_name] = index
+                used.add(index)
+                break
+    if spec.key_from_first_column and spec.key_field not in mapping and names:
+        mapping[spec.key_field] = 0
+    missing = [spec.header_for(f) for f in spec.required if f not in mapping]
+    if missing:
+        raise ImportFormatError(f"الأعمدة التالية مفقودة: {', '.join(missing)}")
+    return mapping
+
+
+# ==================== المرحلة ====================
+
+def stage_file(kind: str, stream, filename: Optional[str] = None, user_id: Optional[int] = None) -> ImportBatch:
+    """قراءة الملف إلى جدول المرحلة والتحقق منه؛ لا يلمس الجدول الهدف."""
+    spec = get_spec(kind)
+    purge_stale_batches()
+    rows = read_sheet(stream, filename)
+    headers = next((values for _, values in rows if any(text(v) for v in values)), None)
+    if headers is None:
+        raise ImportFormatError("الملف فارغ")
+    mapping = resolve_columns(spec, headers)
+
+    batch = ImportBatch(id=uuid.uuid4().hex, kind=kind, filename=filename, created_by=user_id)
+    db.session.add(batch)
+    try:
+        db.session.flush()
+        batch.total_rows = _stage_rows(spec, batch.id, rows, mapping)
+        validate_batch(batch)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info(f"Import batch {batch.id} staged: {kind}, {batch.total_rows} rows, {batch.counts}")
+    return batch
+
+
+def _stage_rows(spec: ImportSpec, batch_id: str, rows: Iterator[Tuple[int, tuple]], mapping: Dict[str, int]) -> int:
+    size = _chunk_size()
+    seen, buffer, total = set(), [], 0
+    for row_number, values in rows:
+        raw = {f: values[i] if i < len(values) else None for f, i in mapping.items()}
+        entry = {"batch_id": batch_id, "row_number": row_number, "key": None, "status": ROW_NEW,
+                 "data": None, "message": None}
+        try:
+            data = spec.clean(raw)
+        except ValueError as e:
+            entry.update(status=ROW_INVALID, data={f: text(v) for f, v in raw.items()}, message=str(e)[:255])
+        else:
+            if data is None:
+                continue
+            key = str(data[spec.key_field])
+            entry.update(key=key, data=data)
+            if key in seen:
+                entry.update(status=ROW_DUPLICATE, message="مكرر في الملف نفسه")
+            seen.add(key)
+        buffer.append(entry)
+        total += 1
+        if len(buffer) >= size:
+            db.session.execute(insert(ImportStagingRow), buffer)
+            buffer = []
+    if buffer:
+        db.session.execute(insert(ImportStagingRow), buffer)
+    return total
+
+
+def _differs(current: Any, new: Any) -> bool:
+    if current in (None, "") and new in (None, ""):
+        return False
+    if isinstance(current, (int, float)) and isinstance(new, (int, float)):
+        return abs(current - new) > 1e-9
+    return current != new
+
+
+def validate_batch(batch: ImportBatch) -> Dict[str, int]:
+    """مطابقة صفوف الدفعة مع الجدول الهدف (استعلام ربط واحد) وتحديث حالاتها جماعياً."""
+    spec = get_spec(batch.kind)
+    model = spec.model
+    S = ImportStagingRow
+    db.session.execute(
+        update(S)
+        .where(S.batch_id == batch.id, S.status.in_((ROW_UPDATE, ROW_UNCHANGED)))
+        .values(status=ROW_NEW, target_id=None, changes=None),
+        execution_options={"synchronize_session": False},
+    )
+    current_columns = [getattr(model, f) for f in spec.update_fields]
+    matches = db.session.execute(
+        select(S.id, S.data, model.id, *current_columns)
+        .join(model, getattr(model, spec.key_field) == S.key)
+        .where(S.batch_id == batch.id, S.status == ROW_NEW)
+        .order_by(S.id, model.id)
+    )
+    updates, seen = [], set()
+    for staging_id, data, target_id, *current in matches:
+        if staging_id in seen:  # مفتاح مكرر في الجدول الهدف نفسه: أقدم سجل
+            continue
+        seen.add(staging_id)
+        changes = {
+            f: [old, data.get(f)]
+            for f, old in zip(spec.update_fields, current)
+            if _differs(old, data.get(f))
+        }
+        updates.append({"id": staging_id, "status": ROW_UPDATE if changes else ROW_UNCHANGED,
+                        "target_id": target_id, "changes": changes or None})
+    for chunk in _chunked(updates, _chunk_size()):
+        db.session.execute(update(S), list(chunk))
+
+    batch.counts = batch_counts(batch.id)
+    return batch.counts
+
+
+def batch_counts(batch_id: str) -> Dict[str, int]:
+    S = ImportStagingRow
+    counts = dict.fromkeys(ROW_STATUSES, 0)
+    rows = db.session.execute(
+        select(S.status, func.count()).where(S.batch_id == batch_id).group_by(S.status)
+    )
+    counts.update({status: count for status, count in rows})
+    return counts
+
+
+def preview_batch(batch_id: str, limit: int = 50) -> Optional[Dict[str, Any]]:
+    """ملخص الدفعة ونماذج من كل حالة لصفحة المعاينة."""
+    batch = db.session.get(ImportBatch, batch_id)
+    if batch is None:
+        return None
+    spec = get_spec(batch.kind)
+    S = ImportStagingRow
+    samples = {}
+    for status in ROW_STATUSES:
+        samples[status] = db.session.execute(
+            select(S).where(S.batch_id == batch_id, S.status == status).order_by(S.row_number).limit(limit)
+        ).scalars().all()
+    return {
+        "batch": batch,
+        "spec": spec,
+        "counts": batch.counts or batch_counts(batch_id),
+        "samples": samples,
+        "fields": list(spec.columns),
+        "headers": {f: spec.header_for(f) for f in spec.columns},
+        "limit": limit,
+    }
+
+
+# ==================== الاعتماد ====================
+
+def _row_messages(batch_id: str, update_existing: bool, key_label: str) -> List[str]:
+    S = ImportStagingRow
+    statuses = [ROW_INVALID, ROW_DUPLICATE] + ([] if update_existing else [ROW_UPDATE, ROW_UNCHANGED])
+    rows = db.session.execute(
+        select(S.row_number, S.key, S.status, S.message)
+        .where(S.batch_id == batch_id, S.status.in_(statuses))
+        .order_by(S.row_number)
+        .limit(ERROR_LIMIT)
+    )
+    messages = []
+    for row_number, key, status, message in rows:
+        if status in (ROW_UPDATE, ROW_UNCHANGED):
+            message = f"{key_label} {key} موجود مسبقاً"
+        messages.append(f"الصف {row_number}: {message}")
+    return messages
+
+
+def apply_batch(batch_id: str, update_existing: bool = False) -> ImportResult:
+    """إدراج الصفوف الجديدة وتحديث الموجودة جماعياً في معاملة واحدة."""
+    batch = db.session.get(ImportBatch, batch_id)
+    if batch is None or batch.status != BATCH_STAGED:
+        raise ImportFormatError("دفعة الاستيراد غير موجودة أو سبق اعتمادها")
+    spec = get_spec(batch.kind)
+    model = spec.model
+    key_column = getattr(model, spec.key_field)
+    S = ImportStagingRow
+    size = _chunk_size()
+    try:
+        counts = validate_batch(batch)
+        now = datetime.utcnow()
+        stamp = {spec.stamp_user_field: batch.created_by} if spec.stamp_user_field else {}
+
+        new_rows = db.session.execute(
+            select(S.data).where(S.batch_id == batch.id, S.status == ROW_NEW).order_by(S.row_number)
+        ).scalars().all()
+        affected_ids: List[int] = []
+        for chunk in _chunked(new_rows, size):
+            db.session.execute(insert(model), [{**spec.insert_defaults, **data, **stamp} for data in chunk])
+            keys = [data[spec.key_field] for data in chunk]
+            affected_ids += db.session.execute(select(model.id).where(key_column.in_(keys))).scalars().all()
+
+        updated = 0
+        if update_existing and spec.update_fields:
+            pending = db.session.execute(
+                select(S.target_id, S.data).where(S.batch_id == batch.id, S.status == ROW_UPDATE)
+            ).all()
+            touch = {"updated_at": now} if hasattr(model, "updated_at") else {}
+            for chunk in _chunked(pending, size):
+                db.session.execute(update(model), [
+                    {"id": target_id, **{f: data.get(f) for f in spec.update_fields}, **touch}
+                    for target_id, data in chunk
+                ])
+            updated = len(pending)
+            affected_ids += [target_id for target_id, _ in pending]
+
+        if spec.after_apply:
+            spec.after_apply(db.session.connection(), affected_ids)
+
+        result = ImportResult(
+            inserted=len(new_rows),
+            updated=updated,
+            unchanged=counts[ROW_UNCHANGED] + (0 if update_existing else counts[ROW_UPDATE]),
+            skipped_existing=0 if update_existing else counts[ROW_UPDATE] + counts[ROW_UNCHANGED],
+            duplicates=counts[ROW_DUPLICATE],
+            invalid=counts[ROW_INVALID],
+            errors=_row_messages(batch.id, update_existing, spec.header_for(spec.key_field)),
+        )
+        batch.status = BATCH_APPLIED
+        batch.applied_at = now
+        batch.counts = {**counts, "inserted": result.inserted, "updated": result.updated}
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info(f"Import batch {batch_id} applied: {result.inserted} inserted, {result.updated} updated")
+    return result
+
+
+def import_file(kind: str, stream, filename: Optional[str] = None, user_id: Optional[int] = None,
+                update_existing: bool = False) -> ImportResult:
+    """استيراد مباشر بلا معاينة (المرحلة ثم الاعتماد)."""
+    batch = stage_file(kind, stream, filename, user_id)
+    return apply_batch(batch.id, update_existing=update_existing)
+
+
+def discard_batch(batch_id: str) -> bool:
+    batch = db.session.get(ImportBatch, batch_id)
+    if batch is None or batch.status != BATCH_STAGED:
+        return False
+    db.session.execute(delete(ImportStagingRow).where(ImportStagingRow.batch_id == batch_id))
+    batch.status = BATCH_DISCARDED
+    db.session.commit()
+    return True
+
+
+def purge_stale_batches(max_age_hours: Optional[int] = None) -> int:
+    """حذف صفوف المرحلة للدفعات المنتهية أو القديمة؛ سجل الدفعة نفسه يبقى للتدقيق."""
+    if max_age_hours is None:
+        max_age_hours = current_app.config.get("IMPORT_STAGING_TTL_HOURS", DEFAULT_STAGING_TTL_HOURS)
+    cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+    stale = select(ImportBatch.id).where(
+        (ImportBatch.status != BATCH_STAGED) | (ImportBatch.created_at < cutoff)
+    )
+    deleted = db.session.execute(
+        delete(ImportStagingRow).where(ImportStagingRow.batch_id.in_(stale)),
+        execution_options={"synchronize_session": False},
+    ).rowcount
+    db.session.execute(
+        update(ImportBatch)
+        .where(ImportBatch.status == BATCH_STAGED, ImportBatch.created_at < cutoff)
+        .values(status=BATCH_DISCARDED),
+        execution_options={"synchronize_session": False},
+    )
+    return deleted or 0
+
+
+def owned_batch(batch_id: str, user_id: Optional[int], kind: str) -> Optional[ImportBatch]:
+    """الدفعة إن كانت من النوع المطلوب ورفعها المستخدم نفسه (للمسارات)."""
+    batch = db.session.get(ImportBatch, batch_id) if batch_id else None
+    if batch is None or batch.kind != kind or (batch.created_by is not None and batch.created_by != user_id):
+        return None
+    return batch
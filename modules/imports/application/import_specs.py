@@ -0,0 +1,230 @@
+"""
+مواصفات الاستيراد — لكل نوع سجل: الجدول والمفتاح الطبيعي وأعمدة الملف وتنظيف الصف وحقول التحديث.
+- clean(row) يعيد dict بالحقول المنظفة (ومنها المفتاح)، أو None لصف فارغ يُتجاهل، أو يرفع ValueError لصف غير صالح.
+- update_fields: ما يُحدّث في السجل الموجود عند اختيار "تحديث الموجود"؛ بقية الحقول للإدراج فقط.
+- after_apply(connection, ids): لما لا تطلقه الإدراجات الجماعية من أحداث (امتثال المركبات وفهرس البحث
+  وإبطال عروض بوابة الموظف بعد الحفظ).
+"""
+import math
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from models import ImportedPhoneNumber, MobileDevice, SimCard, Vehicle
+
+IMPORT_SIM_CARDS = "sim_cards"
+IMPORT_PHONE_NUMBERS = "phone_numbers"
+IMPORT_MOBILE_DEVICES = "mobile_devices"
+IMPORT_VEHICLES = "vehicles"
+
+
+@dataclass(frozen=True)
+class ImportSpec:
+    kind: str
+    label: str
+    model: Any
+    key_field: str
+    columns: Dict[str, Tuple[str, ...]]  # الحقل -> عناوين الأعمدة المقبولة (مطابقة تامة)
+    required: Tuple[str, ...]  # حقول يجب وجود عمودها في الملف
+    clean: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]
+    update_fields: Tuple[str, ...] = ()
+    insert_defaults: Dict[str, Any] = field(default_factory=dict)
+    fuzzy_columns: Dict[str, Tuple[str, ...]] = field(default_factory=dict)  # أجزاء نص للعناوين غير القياسية
+    key_from_first_column: bool = False
+    stamp_user_field: Optional[str] = None  # حقل يُملأ بمن رفع الملف عند الإدراج
+    after_apply: Optional[Callable[[Any, list], None]] = None
+
+    def header_for(self, field_name: str) -> str:
+        return self.columns.get(field_name, (field_name,))[0]
+
+
+# ==================== تنظيف القيم ====================
+
+def text(value, max_length: Optional[int] = None) -> Optional[str]:
+    """نص منظف؛ None للخلايا الفارغة و NaN ونص 'nan' الذي تتركه pandas."""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # 501234567.0 من خلايا الأرقام
+    result = str(value).strip()
+    if not result or result.lower() == "nan":
+        return None
+    return result[:max_length] if max_length else result
+
+
+def number(value, default: Optional[float] = None) -> Optional[float]:
+    raw = text(value)
+    if raw is None:
+        return default
+    try:
+        return float(raw.replace(",", ""))
+    except ValueError:
+        raise ValueError(f"قيمة رقمية غير صحيحة: {raw}")
+
+
+def integer(value) -> Optional[int]:
+    raw = number(value)
+    return int(raw) if raw is not None else None
+
+
+def phone(value) -> Optional[str]:
+    raw = text(value)
+    if raw is None:
+        return None
+    for char in " -()":
+        raw = raw.replace(char, "")
+    return raw or None
+
+
+# ==================== المواصفات ====================
+
+def _clean_sim(row):
+    phone_number = text(row.get("phone_number"), 20)
+    if not phone_number:
+        return None
+    carrier = text(row.get("carrier"), 50)
+    if not carrier:
+        raise ValueError("شركة الاتصالات مطلوبة")
+    return {
+        "phone_number": phone_number,
+        "carrier": carrier,
+        "plan_type": text(row.get("plan_type"), 100),
+        "monthly_cost": number(row.get("monthly_cost"), 0.0),
+        "description": text(row.get("description"), 200),
+    }
+
+
+def _clean_phone_number(row):
+    phone_number = phone(row.get("phone_number"))
+    if not phone_number:
+        return None
+    if len(phone_number) > 20:
+        raise ValueError(f"رقم الهاتف أطول من 20 خانة: {phone_number}")
+    return {"phone_number": phone_number, "description": text(row.get("description"), 100)}
+
+
+def _clean_device(row):
+    phone_number, imei = text(row.get("phone_number"), 20), text(row.get("imei"), 20)
+    if not phone_number and not imei:
+        return None
+    if not phone_number or not imei:
+        raise ValueError("رقم الهاتف أو IMEI فارغ")
+    return {
+        "imei": imei,
+        "phone_number": phone_number,
+        "email": text(row.get("email"), 100),
+        "device_model": text(row.get("device_model"), 50),
+        "device_brand": text(row.get("device_brand"), 50),
+    }
+
+
+VEHICLE_STATUS_BY_LABEL = {
+    "متاحة": "available",
+    "مؤجرة": "rented",
+    "في المشروع": "in_project",
+    "في الورشة": "in_workshop",
+    "حادث": "accident",
+}
+
+
+def _clean_vehicle(row):
+    plate_number = text(row.get("plate_number"), 20)
+    if not plate_number:
+        if any(text(v) for v in row.values()):
+            raise ValueError("رقم اللوحة مطلوب")
+        return None
+    year = integer(row.get("year"))
+    if year is None:
+        raise ValueError("سنة الصنع مطلوبة")
+    return {
+        "plate_number": plate_number,
+        "make": text(row.get("make"), 50) or "",
+        "model": text(row.get("model"), 50) or "",
+        "year": year,
+        "color": text(row.get("color"), 30) or "",
+        "type_of_car": text(row.get("type_of_car"), 100) or "سيارة عادية",
+        "status": VEHICLE_STATUS_BY_LABEL.get(text(row.get("status")) or "", "available"),
+        "notes": text(row.get("notes")),
+    }
+
+
+def _after_vehicles_applied(connection, ids):
+    from core.extensions import db
+    from modules.employees.application.portal_view_service import mark_portal_changed
+    from modules.search.application import search_service
+    from modules.vehicles.application.vehicle_compliance_service import refresh_compliance_rows
+
+    if not ids:
+        return
+    refresh_compliance_rows(connection, ids)
+    mark_portal_changed(db.session)
+    if search_service.is_enabled():
+        search_service.reindex_rows(connection, search_service.ENTITY_VEHICLE, ids)
+
+
+IMPORT_SPECS: Dict[str, ImportSpec] = {
+    spec.kind: spec
+    for spec in (
+        ImportSpec(
+            kind=IMPORT_SIM_CARDS, label="أرقام SIM", model=SimCard, key_field="phone_number",
+            columns={
+                "phone_number": ("رقم الهاتف", "phone_number"),
+                "carrier": ("شركة الاتصالات", "carrier"),
+                "plan_type": ("نوع الخطة", "plan_type"),
+                "monthly_cost": ("التكلفة الشهرية", "monthly_cost"),
+                "description": ("الوصف", "description"),
+            },
+            required=("phone_number", "carrier"),
+            clean=_clean_sim,
+            update_fields=("carrier", "plan_type", "monthly_cost", "description"),
+        ),
+        ImportSpec(
+            kind=IMPORT_PHONE_NUMBERS, label="أرقام الهواتف", model=ImportedPhoneNumber, key_field="phone_number",
+            columns={"phone_number": ("phone_number", "رقم الهاتف"), "description": ("description", "الوصف")},
+            required=(),
+            clean=_clean_phone_number,
+            update_fields=("description",),
+            fuzzy_columns={"phone_number": ("phone", "هاتف", "رقم"),
+                           "description": ("name", "description", "اسم", "وصف")},
+            key_from_first_column=True,
+            stamp_user_field="imported_by",
+        ),
+        ImportSpec(
+            kind=IMPORT_MOBILE_DEVICES, label="الأجهزة المحمولة", model=MobileDevice, key_field="imei",
+            columns={
+                "phone_number": ("phone_number", "رقم الهاتف"),
+                "imei": ("imei", "IMEI"),
+                "email": ("email", "الإيميل"),
+                "device_model": ("device_model", "نوع الجهاز"),
+                "device_brand": ("device_brand", "ماركة الجهاز"),
+            },
+            required=("phone_number", "imei"),
+            clean=_clean_device,
+            update_fields=("phone_number", "email", "device_model", "device_brand"),
+            insert_defaults={"status": "متاح"},
+        ),
+        ImportSpec(
+            kind=IMPORT_VEHICLES, label="المركبات", model=Vehicle, key_field="plate_number",
+            columns={
+                "plate_number": ("رقم اللوحة",),
+                "make": ("الشركة المصنعة",),
+                "model": ("الموديل",),
+                "year": ("السنة",),
+                "color": ("اللون",),
+                "type_of_car": ("نوع السيارة",),
+                "status": ("الحالة",),
+                "notes": ("ملاحظات",),
+            },
+            required=("plate_number", "make", "model", "year", "color", "type_of_car"),
+            clean=_clean_vehicle,
+            update_fields=("make", "model", "year", "color", "type_of_car", "notes"),
+            after_apply=_after_vehicles_applied,
+        ),
+    )
+}
+
+
+def get_spec(kind: str) -> ImportSpec:
+    try:
+        return IMPORT_SPECS[kind]
+    except KeyError:
+        raise ValueError(f"نوع استيراد غير معروف: {kind}")
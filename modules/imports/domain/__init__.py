@@ -0,0 +1,4 @@
+"""Staged imports domain models package"""
+from modules.imports.domain.models import ImportBatch, ImportStagingRow
+
+__all__ = ['ImportBatch', 'ImportStagingRow']
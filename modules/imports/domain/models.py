@@ -0,0 +1,65 @@
+"""
+نماذج الاستيراد المرحلي — جدولا import_batches و import_staging_rows.
+كل ملف مرفوع دفعة واحدة، وكل صف منه صف مرحلي بمفتاحه المطبّع وبياناته المنظفة وحالته بعد التحقق،
+فتُعرض المعاينة (جديد/تحديث/مكرر/غير صالح) قبل الاعتماد ويُطبق الاعتماد كاملاً في معاملة واحدة.
+"""
+from datetime import datetime
+
+from core.extensions import db
+
+BATCH_STAGED = "staged"
+BATCH_APPLIED = "applied"
+BATCH_DISCARDED = "discarded"
+
+ROW_NEW = "new"
+ROW_UPDATE = "update"
+ROW_UNCHANGED = "unchanged"
+ROW_DUPLICATE = "duplicate"
+ROW_INVALID = "invalid"
+
+ROW_STATUSES = (ROW_NEW, ROW_UPDATE, ROW_UNCHANGED, ROW_DUPLICATE, ROW_INVALID)
+
+
+class ImportBatch(db.Model):
+    """ملف استيراد واحد ونوع السجل الذي يستهدفه."""
+    __tablename__ = "import_batches"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid hex
+    kind = db.Column(db.String(32), nullable=False)  # مفتاح مواصفة الاستيراد (sim_cards، vehicles...)
+    filename = db.Column(db.String(255), nullable=True)
+    status = db.Column(db.String(16), nullable=False, default=BATCH_STAGED)
+    total_rows = db.Column(db.Integer, nullable=False, default=0)
+    counts = db.Column(db.JSON, nullable=True)  # عدد الصفوف لكل حالة بعد آخر تحقق أو اعتماد
+    created_by = db.Column(db.Integer, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    applied_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("idx_import_batches_status_created", "status", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<ImportBatch {self.id} {self.kind} {self.status}>"
+
+
+class ImportStagingRow(db.Model):
+    """صف واحد من الملف بعد التنظيف."""
+    __tablename__ = "import_staging_rows"
+
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.String(32), db.ForeignKey("import_batches.id", ondelete="CASCADE"), nullable=False)
+    row_number = db.Column(db.Integer, nullable=False)  # رقم الصف في الملف
+    key = db.Column(db.String(100), nullable=True)  # قيمة المفتاح الطبيعي بعد التطبيع (رقم الهاتف، IMEI، اللوحة)
+    status = db.Column(db.String(16), nullable=False, default=ROW_NEW)
+    target_id = db.Column(db.Integer, nullable=True)  # السجل الموجود المطابق للمفتاح
+    data = db.Column(db.JSON, nullable=True)
+    changes = db.Column(db.JSON, nullable=True)  # {الحقل: [القيمة الحالية، القيمة الجديدة]}
+    message = db.Column(db.String(255), nullable=True)
+
+    __table_args__ = (
+        db.Index("idx_import_staging_batch_status", "batch_id", "status"),
+        db.Index("idx_import_staging_batch_key", "batch_id", "key"),
+    )
+
+    def __repr__(self):
+        return f"<ImportStagingRow {self.batch_id}#{self.row_number} {self.status}>"
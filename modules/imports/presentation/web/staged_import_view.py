@@ -0,0 +1,80 @@
+"""
+معالج مسارات الاستيراد المرحلي — يستدعيه كل مسار استيراد قائم بعد تحقّقه من الصلاحية.
+- GET: نموذج الرفع الخاص بالمسار.
+- POST بملف: مرحلة + صفحة معاينة الفروق (imports/preview.html) دون حفظ.
+- POST بـ batch_id من صفحة المعاينة: اعتماد الدفعة في معاملة واحدة أو إلغاؤها.
+"""
+import logging
+from typing import Callable, Optional
+
+from flask import flash, redirect, render_template, request
+from flask_login import current_user
+
+from modules.imports.application import bulk_import_service as imports
+from modules.imports.application.bulk_import_service import ImportFormatError, ImportResult
+from modules.imports.application.import_specs import get_spec
+
+logger = logging.getLogger(__name__)
+
+
+def flash_import_result(result: ImportResult, label: str) -> None:
+    if result.inserted:
+        flash(f'تم استيراد {result.inserted} من {label} بنجاح', 'success')
+    if result.updated:
+        flash(f'تم تحديث {result.updated} سجل موجود', 'success')
+    if result.skipped_existing:
+        flash(f'تم تخطي {result.skipped_existing} سجل موجود مسبقاً', 'info')
+    if result.rejected:
+        flash(f'تم رفض {result.rejected} صف (غير صالح أو مكرر في الملف)', 'warning')
+    for error in result.errors[:10]:
+        flash(error, 'danger')
+    if not result.inserted and not result.updated:
+        flash('لم يتم استيراد أي سجلات جديدة', 'warning')
+
+
+def handle_staged_import(kind: str, upload_template: str, back_url: str, done_url: str,
+                         file_field: str = 'excel_file',
+                         on_applied: Optional[Callable[[ImportResult], None]] = None):
+    spec = get_spec(kind)
+    if request.method != 'POST':
+        return render_template(upload_template)
+    user_id = current_user.id if current_user.is_authenticated else None
+
+    batch_id = request.form.get('batch_id')
+    if batch_id:
+        if imports.owned_batch(batch_id, user_id, kind) is None:
+            flash('دفعة الاستيراد غير موجودة', 'danger')
+            return redirect(back_url)
+        if request.form.get('action') != 'apply':
+            imports.discard_batch(batch_id)
+            flash('تم إلغاء الاستيراد', 'info')
+            return redirect(back_url)
+        try:
+            result = imports.apply_batch(batch_id, update_existing=request.form.get('update_existing') == '1')
+        except ImportFormatError as e:
+            flash(str(e), 'danger')
+            return redirect(back_url)
+        except Exception as e:
+            logger.error(f"Error applying import batch {batch_id} ({kind}): {e}")
+            flash('حدث خطأ أثناء حفظ البيانات؛ لم يُحفظ أي سجل', 'danger')
+            return redirect(back_url)
+        flash_import_result(result, spec.label)
+        if on_applied:
+            on_applied(result)
+        return redirect(done_url)
+
+    file = request.files.get(file_field)
+    if not file or not file.filename:
+        flash('يرجى اختيار ملف Excel', 'danger')
+        return redirect(back_url)
+    try:
+        batch = imports.stage_file(kind, file.stream, file.filename, user_id)
+    except ImportFormatError as e:
+        flash(str(e), 'danger')
+        return redirect(back_url)
+    except Exception as e:
+        logger.error(f"Error staging import file ({kind}): {e}")
+        flash(f'حدث خطأ أثناء قراءة الملف: {str(e)}', 'danger')
+        return redirect(back_url)
+    return render_template('imports/preview.html', preview=imports.preview_batch(batch.id),
+                           action_url=request.path, back_url=back_url)
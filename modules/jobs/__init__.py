@@ -0,0 +1,3 @@
+"""
+وحدة المهام الخلفية — طابور مهام دائم في قاعدة البيانات مع مجموعة عمال ثابتة الحجم.
+"""
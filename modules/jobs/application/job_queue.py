@@ -0,0 +1,395 @@
+"""
+طابور المهام الخلفية — بديل خيوط threading.Thread المتفرقة.
+- المهام مخزنة في background_jobs، فتبقى بعد إعادة التشغيل ويقرأ حالتها أي عامل gunicorn.
+- مجموعة عمال ثابتة الحجم (JOB_WORKERS) لكل عملية، والحجز ذري عبر UPDATE ... WHERE status='queued'.
+- نبض خلفي يجدد حجز المهمة الجارية، وكل كتابة للعامل مشروطة بأنه ما زال مالكها (worker_id).
+- إعادة المحاولة مع تأخير متزايد، والإلغاء، ومفاتيح عدم التكرار (idempotency_key).
+- التشغيل المنفصل: flask jobs-worker (مع JOB_WORKERS=0 في عمليات الويب).
+تسجيل معالج: @job_handler("payroll.payslip_dispatch") ثم enqueue("payroll.payslip_dispatch", payload).
+"""
+import logging
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from core.extensions import db
+from modules.jobs.domain.models import (
+    ACTIVE_JOB_STATUSES,
+    JOB_CANCELLED,
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    BackgroundJob,
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+POLL_SECONDS = 2.0
+LEASE_SECONDS = 600  # مهمة قيد التشغيل بلا نبض لهذه المدة تعتبر يتيمة (توقف العامل)
+HEARTBEAT_SECONDS = 60  # تجديد الحجز أثناء التنفيذ، أقصر بكثير من LEASE_SECONDS
+MAINTENANCE_SECONDS = 60
+RETRY_BASE_SECONDS = 30
+FINISHED_RETENTION_DAYS = 30
+
+_HANDLERS: Dict[str, Dict[str, Any]] = {}
+_wake = threading.Event()
+_state = {"pool": None}
+
+
+class JobCancelled(Exception):
+    """يُرفع داخل المعالج عند طلب إلغاء المهمة."""
+
+
+class JobLeaseLost(Exception):
+    """يُرفع داخل المعالج عندما يُعاد حجز المهمة لعامل آخر؛ لا يُكتب شيء باسم العامل القديم."""
+
+
+def job_handler(kind: str, max_attempts: int = 1, retry_delay: int = RETRY_BASE_SECONDS):
+    """تسجيل دالة كمعالج لنوع مهمة. تُستدعى handler(job, **payload) وتعيد نتيجة قابلة لـ JSON."""
+    def _register(func: Callable):
+        _HANDLERS[kind] = {"func": func, "max_attempts": max_attempts, "retry_delay": retry_delay}
+        return func
+    return _register
+
+
+def _jobs_table():
+    return BackgroundJob.__table__
+
+
+class JobContext:
+    """واجهة المعالج لتحديث التقدم والتحقق من الإلغاء.
+    التحديثات تُكتب باتصال مستقل فلا تُثبّت عمل المعالج غير المكتمل في db.session."""
+
+    def __init__(self, job_id: str, kind: str, attempt: int, state: Optional[dict] = None, owner_id=None,
+                 worker_id: Optional[str] = None):
+        self.id = job_id
+        self.kind = kind
+        self.attempt = attempt
+        self.owner_id = owner_id
+        self.worker_id = worker_id
+        self.state = dict(state or {})
+
+    def update(self, progress: Optional[int] = None, stage: Optional[str] = None,
+               message: Optional[str] = None, **state) -> None:
+        values = {"heartbeat_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+        if progress is not None:
+            values["progress"] = max(0, min(100, int(progress)))
+        if stage is not None:
+            values["stage"] = stage
+        if message is not None:
+            values["message"] = message[:500]
+        if state:
+            self.state.update(state)
+            values["state"] = self.state
+        t = _jobs_table()
+        with db.engine.begin() as conn:
+            updated = conn.execute(update(t).where(_owned_by(self.id, self.worker_id)).values(**values)).rowcount
+        if not updated:
+            raise JobLeaseLost()
+
+    def is_cancelled(self) -> bool:
+        t = _jobs_table()
+        with db.engine.connect() as conn:
+            return bool(conn.execute(select(t.c.cancel_requested).where(t.c.id == self.id)).scalar())
+
+    def check_cancelled(self) -> None:
+        if self.is_cancelled():
+            raise JobCancelled()
+
+
+def _job_for_key(idempotency_key: str) -> Optional[BackgroundJob]:
+    return BackgroundJob.query.filter_by(idempotency_key=idempotency_key).first()
+
+
+def enqueue(kind: str, payload: Optional[dict] = None, owner_id: Optional[int] = None,
+            idempotency_key: Optional[str] = None, max_attempts: Optional[int] = None,
+            message: Optional[str] = None, **state) -> BackgroundJob:
+    """إضافة مهمة للطابور. مع idempotency_key تُعاد المهمة القائمة (في الانتظار/قيد التشغيل) بدل تكرارها."""
+    handler = _HANDLERS.get(kind)
+    if handler is None:
+        raise ValueError(f"Unknown job kind: {kind}")
+
+    if idempotency_key:
+        existing = _job_for_key(idempotency_key)
+        if existing is not None:
+            if existing.status in ACTIVE_JOB_STATUSES:
+                return existing
+            # المهمة السابقة انتهت: يُحرر المفتاح لمهمة جديدة
+            existing.idempotency_key = None
+            db.session.flush()
+
+    job = BackgroundJob(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        status=JOB_QUEUED,
+        payload=payload or {},
+        state=state or {},
+        message=message,
+        max_attempts=max_attempts or handler["max_attempts"],
+        idempotency_key=idempotency_key,
+        owner_id=owner_id,
+        run_after=datetime.utcnow(),
+    )
+    try:
+        # نقطة حفظ: تعارض المفتاح يلغي إدراج المهمة فقط لا ما أضافه المستدعي في نفس الجلسة
+        with db.session.begin_nested():
+            db.session.add(job)
+    except IntegrityError:
+        # طلب متزامن بنفس المفتاح سبقنا
+        existing = _job_for_key(idempotency_key)
+        if existing is None:
+            raise
+        db.session.commit()
+        return existing
+    db.session.commit()
+    _wake.set()
+    return job
+
+
+def get_job(job_id: str) -> Optional[BackgroundJob]:
+    return db.session.get(BackgroundJob, job_id)
+
+
+def cancel_job(job_id: str) -> Optional[BackgroundJob]:
+    """إلغاء فوري للمهمة المنتظرة، أو طلب إلغاء يتحقق منه المعالج للمهمة الجارية."""
+    job = get_job(job_id)
+    if job is None:
+        return None
+    if job.status == JOB_QUEUED:
+        job.status = JOB_CANCELLED
+        job.finished_at = datetime.utcnow()
+    elif job.status == JOB_RUNNING:
+        job.cancel_requested = True
+    db.session.commit()
+    return job
+
+
+def _claim_next_job(worker_id: str) -> Optional[dict]:
+    """حجز أقدم مهمة جاهزة لنوع مسجل. الحجز ذري فلا تُنفذ المهمة في عاملين."""
+    if not _HANDLERS:
+        return None
+    t = _jobs_table()
+    now = datetime.utcnow()
+    with db.engine.begin() as conn:
+        candidates = conn.execute(
+            select(t.c.id)
+            .where(t.c.status == JOB_QUEUED, t.c.run_after <= now, t.c.kind.in_(list(_HANDLERS)))
+            .order_by(t.c.created_at)
+            .limit(5)
+        ).scalars().all()
+        for job_id in candidates:
+            claimed = conn.execute(
+                update(t)
+                .where(t.c.id == job_id, t.c.status == JOB_QUEUED)
+                .values(status=JOB_RUNNING, attempts=t.c.attempts + 1, worker_id=worker_id,
+                        heartbeat_at=now, updated_at=now)
+            )
+            if claimed.rowcount == 1:
+                return dict(conn.execute(select(t).where(t.c.id == job_id)).mappings().one())
+    return None
+
+
+def _owned_by(job_id: str, worker_id: Optional[str]):
+    """شرط كتابات العامل: المهمة ما زالت قيد التشغيل ومحجوزة له هو."""
+    t = _jobs_table()
+    return and_(t.c.id == job_id, t.c.status == JOB_RUNNING, t.c.worker_id == worker_id)
+
+
+def _finish(job_id: str, worker_id: Optional[str], **values) -> bool:
+    """تسجيل نتيجة المهمة إن كان العامل ما زال مالكها. يعيد False إن أُعيد حجزها لغيره."""
+    t = _jobs_table()
+    values["updated_at"] = datetime.utcnow()
+    with db.engine.begin() as conn:
+        finished = conn.execute(update(t).where(_owned_by(job_id, worker_id)).values(**values)).rowcount == 1
+    if not finished:
+        logger.warning(f"Background job {job_id}: lease lost by {worker_id}, result discarded")
+    return finished
+
+
+class _Heartbeat:
+    """خيط يجدد heartbeat_at للمهمة الجارية كل HEARTBEAT_SECONDS حتى تنتهي،
+    فالخطوات الطويلة التي لا تستدعي ctx.update لا تُعتبر يتيمة."""
+
+    def __init__(self, engine, job_id: str, worker_id: Optional[str], interval: Optional[float] = None):
+        self.engine = engine
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.interval = interval or HEARTBEAT_SECONDS
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name=f"job-heartbeat-{job_id[:8]}")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def beat(self) -> bool:
+        now = datetime.utcnow()
+        with self.engine.begin() as conn:
+            return conn.execute(
+                update(_jobs_table()).where(_owned_by(self.job_id, self.worker_id))
+                .values(heartbeat_at=now, updated_at=now)
+            ).rowcount == 1
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                if not self.beat():
+                    return
+            except Exception as e:
+                logger.warning(f"Background job {self.job_id} heartbeat failed: {e}")
+
+
+def run_job(job: dict) -> None:
+    """تنفيذ مهمة محجوزة وتسجيل نتيجتها (نجاح، إلغاء، إعادة محاولة، فشل)."""
+    handler = _HANDLERS[job["kind"]]
+    worker_id = job.get("worker_id")
+    ctx = JobContext(job["id"], job["kind"], job["attempts"], job.get("state"), job.get("owner_id"), worker_id)
+    try:
+        with _Heartbeat(db.engine, job["id"], worker_id):
+            result = handler["func"](ctx, **(job.get("payload") or {}))
+        db.session.commit()
+        _finish(job["id"], worker_id, status=JOB_DONE, progress=100, result=result, error=None,
+                finished_at=datetime.utcnow())
+    except JobCancelled:
+        db.session.rollback()
+        _finish(job["id"], worker_id, status=JOB_CANCELLED, finished_at=datetime.utcnow(),
+                message="تم إلغاء المهمة")
+    except JobLeaseLost:
+        db.session.rollback()
+        logger.warning(f"Background job {job['kind']} {job['id']}: lease lost by {worker_id}, stopped")
+    except Exception as e:
+        db.session.rollback()
+        logger.exception(f"Background job {job['kind']} {job['id']} failed: {e}")
+        if job["attempts"] < job["max_attempts"]:
+            delay = handler["retry_delay"] * job["attempts"]
+            _finish(job["id"], worker_id, status=JOB_QUEUED, error=str(e)[:2000],
+                    run_after=datetime.utcnow() + timedelta(seconds=delay))
+        else:
+            _finish(job["id"], worker_id, status=JOB_FAILED, error=str(e)[:2000], finished_at=datetime.utcnow())
+    finally:
+        db.session.remove()
+
+
+def requeue_stale_jobs() -> int:
+    """إعادة المهام التي توقف عاملها (انتهت مهلة النبض) للطابور أو إفشالها إن استنفدت المحاولات."""
+    t = _jobs_table()
+    now = datetime.utcnow()
+    stale = and_(t.c.status == JOB_RUNNING, t.c.heartbeat_at < now - timedelta(seconds=LEASE_SECONDS))
+    with db.engine.begin() as conn:
+        failed = conn.execute(
+            update(t).where(stale, t.c.attempts >= t.c.max_attempts)
+            .values(status=JOB_FAILED, error="worker lost", finished_at=now, updated_at=now)
+        ).rowcount
+        requeued = conn.execute(
+            update(t).where(stale).values(status=JOB_QUEUED, run_after=now, updated_at=now)
+        ).rowcount
+    return failed + requeued
+
+
+def purge_finished_jobs(days: int = FINISHED_RETENTION_DAYS) -> int:
+    t = _jobs_table()
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    with db.engine.begin() as conn:
+        return conn.execute(
+            t.delete().where(t.c.status.in_((JOB_DONE, JOB_FAILED, JOB_CANCELLED)), t.c.finished_at < cutoff)
+        ).rowcount
+
+
+class JobWorkerPool:
+    """عدد ثابت من خيوط العمال تسحب من الطابور؛ هذا هو حد التزامن للمهام الثقيلة في العملية."""
+
+    def __init__(self, app, size: int = DEFAULT_WORKERS, poll_seconds: float = POLL_SECONDS):
+        self.app = app
+        self.size = size
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._threads = []
+        self._prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self._last_maintenance = None
+
+    def start(self) -> None:
+        for index in range(self.size):
+            thread = threading.Thread(target=self._loop, args=(f"{self._prefix}:{index}",),
+                                      daemon=True, name=f"job-worker-{index}")
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        _wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _maintenance(self) -> None:
+        now = datetime.utcnow()
+        if self._last_maintenance and (now - self._last_maintenance).total_seconds() < MAINTENANCE_SECONDS:
+            return
+        self._last_maintenance = now
+        requeue_stale_jobs()
+        purge_finished_jobs()
+
+    def _loop(self, worker_id: str) -> None:
+        while not self._stop.is_set():
+            job = None
+            try:
+                with self.app.app_context():
+                    self._maintenance()
+                    job = _claim_next_job(worker_id)
+                    if job is not None:
+                        run_job(job)
+            except Exception as e:
+                logger.error(f"Job worker {worker_id} error: {e}")
+            if job is None:
+                _wake.wait(self.poll_seconds)
+                _wake.clear()
+
+
+def _configured_workers(app) -> int:
+    value = app.config.get("JOB_WORKERS")
+    if value is None:
+        value = os.environ.get("JOB_WORKERS", DEFAULT_WORKERS)
+    return int(value)
+
+
+@click.command("jobs-worker")
+@click.option("--workers", type=int, default=None, help="عدد العمال (الافتراضي JOB_WORKERS)")
+@with_appcontext
+def jobs_worker_command(workers):
+    """تشغيل عمال طابور المهام في المقدمة حتى الإيقاف."""
+    from flask import current_app
+
+    app = current_app._get_current_object()
+    pool = JobWorkerPool(app, size=workers or _configured_workers(app) or DEFAULT_WORKERS)
+    pool.start()
+    click.echo(f"Job workers started: {pool.size}")
+    try:
+        while True:
+            threading.Event().wait(60)
+    except KeyboardInterrupt:
+        pool.stop()
+
+
+def init_jobs(app) -> None:
+    """تهيئة الطابور: أمر CLI وتشغيل مجموعة العمال داخل العملية (ما لم يكن JOB_WORKERS=0)."""
+    if "jobs-worker" not in app.cli.commands:
+        app.cli.add_command(jobs_worker_command)
+    size = _configured_workers(app)
+    if app.testing or size <= 0 or _state["pool"] is not None:
+        return
+    pool = JobWorkerPool(app, size=size)
+    pool.start()
+    _state["pool"] = pool
@@ -0,0 +1,4 @@
+"""Background jobs domain models package"""
+from modules.jobs.domain.models import BackgroundJob
+
+__all__ = ['BackgroundJob']
@@ -0,0 +1,72 @@
+"""
+نماذج المهام الخلفية — جدول background_jobs.
+كل صف مهمة واحدة: حالتها وتقدمها ونتيجتها، فتبقى بعد إعادة التشغيل ويراها أي عامل gunicorn.
+"""
+from datetime import datetime
+
+from core.extensions import db
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+
+ACTIVE_JOB_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+FINISHED_JOB_STATUSES = (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+
+class BackgroundJob(db.Model):
+    """مهمة خلفية في الطابور."""
+    __tablename__ = "background_jobs"
+
+    id = db.Column(db.String(32), primary_key=True)  # uuid hex
+    kind = db.Column(db.String(64), nullable=False)  # اسم المعالج المسجل
+    status = db.Column(db.String(16), nullable=False, default=JOB_QUEUED)
+    payload = db.Column(db.JSON, nullable=True)  # وسائط المعالج
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0..100
+    stage = db.Column(db.String(50), nullable=True)
+    message = db.Column(db.String(500), nullable=True)
+    state = db.Column(db.JSON, nullable=True)  # بيانات تقدم خاصة بالمهمة (عدد المرسل، الأخطاء...)
+    result = db.Column(db.JSON, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=1)
+    idempotency_key = db.Column(db.String(190), nullable=True, unique=True)
+    owner_id = db.Column(db.Integer, nullable=True)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    worker_id = db.Column(db.String(100), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("idx_background_jobs_claim", "status", "run_after"),
+        db.Index("idx_background_jobs_kind", "kind", "created_at"),
+    )
+
+    def to_dict(self):
+        """حالة المهمة للواجهات: الأعمدة العامة مدموجة مع بيانات state."""
+        data = dict(self.state or {})
+        data.update({
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'stage': self.stage,
+            'message': self.message,
+            'result': self.result,
+            'error': self.error,
+            'attempts': self.attempts,
+            'owner_id': self.owner_id,
+            'cancel_requested': self.cancel_requested,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        })
+        return data
+
+    def __repr__(self):
+        return f"<BackgroundJob {self.kind} {self.id} {self.status}>"
@@ -4,6 +4,10 @@ from decimal import Decimal
 
 from core.extensions import db
 from models import Employee
+from modules.business_calendar.application.business_calendar_service import (
+    calendar_for_employee,
+    working_days_between,
+)
 from modules.leave.domain.models import LeaveRequest, LeaveBalance
 from modules.payroll.domain.models import PayrollRecord
 from modules.payroll.application.payroll_processor import PayrollProcessor
@@ -34,18 +38,9 @@ class LeaveService:
 
         return balance
 
-    def calculate_working_days(self, start_date: date, end_date: date) -> int:
-        if end_date < start_date:
-            return 0
-
-        days = 0
-        current = start_date
-        while current <= end_date:
-            if current.weekday() not in (5, 6):
-                days += 1
-            current += timedelta(days=1)
-
-        return days
+    def calculate_working_days(self, start_date: date, end_date: date, employee_id: int = None) -> int:
+        # تقويم العمل المشترك: أيام راحة قسم الموظف والعطل الرسمية (نفس أرقام الحضور والرواتب)
+        return working_days_between(start_date, end_date, employee_id=employee_id)
 
     def has_sufficient_balance(self, employee_id: int, leave_type: str, leave_days: int, year: int) -> tuple[bool, Decimal]:
         if leave_type not in self.PAID_LEAVE_TYPES:
@@ -64,7 +59,7 @@ class LeaveService:
         if end_date < start_date:
             raise ValueError('End date must be greater than or equal to start date')
 
-        working_days = self.calculate_working_days(start_date, end_date)
+        working_days = self.calculate_working_days(start_date, end_date, employee_id)
         if working_days <= 0:
             raise ValueError('No working leave days in selected range')
 
@@ -132,13 +127,16 @@ class LeaveService:
         db.session.commit()
         return leave_request
 
-    def _count_unpaid_days_by_month(self, start_date: date, end_date: date) -> dict:
+    def _count_unpaid_days_by_month(self, start_date: date, end_date: date, employee_id: int = None) -> dict:
+        calendar = calendar_for_employee(employee_id)
         result = defaultdict(int)
         current = start_date
         while current <= end_date:
-            if current.weekday() not in (5, 6):
-                result[(current.year, current.month)] += 1
-            current += timedelta(days=1)
+            next_month = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+            days = calendar.working_days(current, min(end_date, next_month - timedelta(days=1)))
+            if days:
+                result[(current.year, current.month)] += days
+            current = next_month
         return result
 
     def sync_to_payroll(self, leave_request_id: int) -> dict:
@@ -159,7 +157,9 @@ class LeaveService:
         if not employee:
             raise ValueError('Employee not found')
 
-        days_by_month = self._count_unpaid_days_by_month(leave_request.start_date, leave_request.end_date)
+        days_by_month = self._count_unpaid_days_by_month(
+            leave_request.start_date, leave_request.end_date, employee.id
+        )
         updated_records = 0
 
         for (year, month), unpaid_days in days_by_month.items():
@@ -3,11 +3,16 @@ Strategic Payroll Processor Service
 محرك حساب الرواتب الاستراتيجي
 يتوافق مع قانون العمل السعودي
 """
+from calendar import monthrange
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from sqlalchemy import func
 from core.extensions import db
 from models import Employee, Attendance
+from modules.business_calendar.application.business_calendar_service import (
+    calendar_for_employee,
+    calendars_for_employees,
+)
 from modules.payroll.domain.models import PayrollRecord, PayrollConfiguration, PayrollHistory
 
 
@@ -18,6 +23,7 @@ class PayrollProcessor:
         self.pay_period_year = pay_period_year
         self.pay_period_month = pay_period_month
         self.config = self._get_active_configuration()
+        self._calendars = {}
         
     def _get_active_configuration(self) -> PayrollConfiguration:
         """الحصول على إعدادات الرواتب النشطة"""
@@ -35,19 +41,19 @@ class PayrollProcessor:
     
     def _calculate_period_dates(self) -> tuple:
         """حساب تواريخ بداية ونهاية الفترة"""
-        if self.pay_period_month == 2:
-            # فبراير - 28 أو 29 يوم
-            last_day = 29 if self.pay_period_year % 4 == 0 else 28
-        elif self.pay_period_month in [4, 6, 9, 11]:
-            last_day = 30
-        else:
-            last_day = 31
+        last_day = monthrange(self.pay_period_year, self.pay_period_month)[1]
         
         start_date = date(self.pay_period_year, self.pay_period_month, 1)
         end_date = date(self.pay_period_year, self.pay_period_month, last_day)
         
         return start_date, end_date
     
+    def _calendar_for(self, employee_id: int):
+        """تقويم عمل الموظف (أيام راحة قسمه والعطل الرسمية) — مشترك مع الإجازات والحضور"""
+        if employee_id not in self._calendars:
+            self._calendars[employee_id] = calendar_for_employee(employee_id)
+        return self._calendars[employee_id]
+    
     def calculate_daily_rate(self, basic_salary: Decimal) -> Decimal:
         """
         حساب الراتب اليومي
@@ -92,9 +98,15 @@ class PayrollProcessor:
             elif record.status == 'sick_leave':
                 sick_leave_days += 1
         
-        # حساب أيام العطل والعطل الرسمية
-        # (هذا يمكن تحسينه لاحقاً برابط قاعدة البيانات للعطل)
-        public_holiday_days = 0
+        # العطل الرسمية الواقعة على أيام عمل من تقويم الموظف، دون الأيام المحتسبة أصلاً بسجل حضور
+        counted_dates = {
+            record.date for record in attendance_records
+            if record.status in ('present', 'leave', 'sick_leave')
+        }
+        public_holiday_days = sum(
+            1 for day in self._calendar_for(employee_id).holidays_between(start_date, end_date)
+            if day not in counted_dates
+        )
         
         # إجمالي أيام العمل الفعلية
         working_days_required = self.config.working_days_per_month
@@ -239,6 +251,7 @@ class PayrollProcessor:
         payroll.leave_days = attendance['leave_days']
         payroll.unpaid_leave_days = attendance['unpaid_leave_days']
         payroll.sick_leave_days = attendance['sick_leave_days']
+        payroll.public_holiday_days = attendance['public_holiday_days']
         payroll.actual_working_days = attendance['actual_working_days']
         payroll.working_days_required = attendance['working_days_required']
         
@@ -292,6 +305,7 @@ class PayrollProcessor:
         """
         # جلب جميع الموظفين النشطين
         employees = Employee.query.filter_by(status='active').all()
+        self._calendars.update(calendars_for_employees([employee.id for employee in employees]))
         
         processed_payrolls = []
         
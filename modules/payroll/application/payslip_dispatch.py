@@ -0,0 +1,224 @@
+"""
+محرك الإرسال الجماعي لإشعارات قسائم الرواتب (بريد إلكتروني / روابط واتساب).
+- الرسائل تُجهّز دفعة واحدة قبل الإرسال.
+- الإرسال عبر مجموعة خيوط محدودة مع حد معدل لكل مزود (token bucket).
+- نتيجة كل مستلم تُحفظ في payslip_dispatch_results، فإعادة تشغيل نفس الإرسال تتخطى من وصلتهم القسيمة.
+  روابط واتساب تُحفظ بحالة link لا sent: تجهيز الرابط ليس تسليماً، فتُعاد في التشغيل التالي.
+- نسخ المالية تُجمع في رسالة ملخص واحدة مع مرفق CSV بدل نسخة لكل موظف.
+"""
+import csv
+import io
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select
+
+from core.extensions import db
+from modules.payroll.domain.models import PayslipDispatchResult
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_WORKERS = 8
+PROGRESS_EVERY = 25
+# (طلبات في الثانية، أقصى دفعة فورية) لكل مزود؛ None = بلا حد (روابط واتساب لا تستدعي API)
+PROVIDER_RATE_LIMITS = {
+    'sendgrid': (10.0, 20),
+    'whatsapp_link': None,
+}
+# مزودون يجهزون رابطاً يفتحه المسؤول يدوياً ولا يسلّمون الرسالة بأنفسهم
+LINK_ONLY_PROVIDERS = frozenset({'whatsapp_link'})
+
+RESULT_SENT = 'sent'
+RESULT_LINK = 'link'
+RESULT_FAILED = 'failed'
+
+
+@dataclass
+class PayslipMessage:
+    """رسالة قسيمة جاهزة للإرسال لمستلم واحد."""
+    payroll_record_id: int
+    employee_id: Optional[int]
+    employee_name: str
+    employee_code: str = ''
+    recipient: str = ''
+    subject: str = ''
+    body: str = ''
+    link: str = ''
+    error: Optional[str] = None  # خطأ معروف قبل الإرسال (لا بريد / لا جوال)
+
+
+@dataclass
+class DispatchOutcome:
+    message: PayslipMessage
+    status: str
+    error: Optional[str] = None
+    provider_message_id: Optional[str] = None
+
+
+@dataclass
+class DispatchSummary:
+    sent: int = 0  # يشمل روابط واتساب المجهزة
+    failed: int = 0
+    skipped: int = 0
+    outcomes: List[DispatchOutcome] = field(default_factory=list)
+
+    @property
+    def errors(self) -> List[str]:
+        return [f"{o.message.employee_name}: {o.error}" for o in self.outcomes if o.status == RESULT_FAILED]
+
+
+class TokenBucket:
+    """حد معدل آمن للخيوط: rate طلب/ثانية مع سماح بدفعة حتى capacity."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+def build_dispatch_key(year: int, month: int, department_id, project_name: str, channel: str) -> str:
+    return f"{year}-{int(month):02d}:{department_id or 0}:{(project_name or '').lower()}:{channel}"
+
+
+def load_sent_record_ids(dispatch_key: str) -> set:
+    """سجلات الرواتب التي أُرسلت قسيمتها بنجاح في تشغيل سابق لنفس الإرسال."""
+    t = PayslipDispatchResult.__table__
+    rows = db.session.execute(
+        select(t.c.payroll_record_id).where(t.c.dispatch_key == dispatch_key, t.c.status == RESULT_SENT)
+    ).scalars()
+    return set(rows)
+
+
+def save_results(dispatch_key: str, channel: str, outcomes: Iterable[DispatchOutcome]) -> None:
+    """حفظ نتائج دفعة مستلمين (تستبدل نتيجة سابقة فاشلة لنفس السجل)."""
+    outcomes = list(outcomes)
+    if not outcomes:
+        return
+    t = PayslipDispatchResult.__table__
+    now = datetime.utcnow()
+    db.session.execute(
+        delete(t).where(
+            t.c.dispatch_key == dispatch_key,
+            t.c.payroll_record_id.in_([o.message.payroll_record_id for o in outcomes]),
+        )
+    )
+    db.session.execute(insert(t), [
+        {
+            'dispatch_key': dispatch_key,
+            'channel': channel,
+            'payroll_record_id': o.message.payroll_record_id,
+            'employee_id': o.message.employee_id,
+            'recipient': (o.message.recipient or '')[:255],
+            'status': o.status,
+            'error': (o.error or '')[:500] or None,
+            'provider_message_id': o.provider_message_id,
+            'created_at': now,
+        }
+        for o in outcomes
+    ])
+    db.session.commit()
+
+
+def dispatch_messages(
+    app,
+    messages: List[PayslipMessage],
+    send: Callable[[PayslipMessage], Dict],
+    provider: str,
+    dispatch_key: str,
+    channel: str,
+    workers: int = DISPATCH_WORKERS,
+    on_progress: Optional[Callable[[DispatchSummary, int], bool]] = None,
+) -> DispatchSummary:
+    """إرسال الرسائل بالتوازي تحت حد المعدل مع حفظ النتائج على دفعات.
+    send(message) يعيد {'success': bool, 'message': str, 'id': ...}.
+    on_progress(summary, total) يُستدعى كل PROGRESS_EVERY رسالة؛ إعادة False توقف الإرسال (إلغاء)."""
+    limits = PROVIDER_RATE_LIMITS.get(provider)
+    bucket = TokenBucket(*limits) if limits else None
+    success_status = RESULT_LINK if provider in LINK_ONLY_PROVIDERS else RESULT_SENT
+    stop = threading.Event()
+    summary = DispatchSummary()
+    pending: List[DispatchOutcome] = []
+    total = len(messages)
+
+    def _send_one(message: PayslipMessage) -> DispatchOutcome:
+        if message.error:
+            return DispatchOutcome(message, RESULT_FAILED, message.error)
+        if stop.is_set():
+            return DispatchOutcome(message, 'skipped')
+        if bucket is not None:
+            bucket.acquire()
+        with app.app_context():
+            try:
+                result = send(message) or {}
+            except Exception as e:
+                return DispatchOutcome(message, RESULT_FAILED, str(e))
+        if result.get('success'):
+            return DispatchOutcome(message, success_status, provider_message_id=result.get('id'))
+        return DispatchOutcome(message, RESULT_FAILED, result.get('message') or 'send_failed')
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='payslip-send') as pool:
+        futures = [pool.submit(_send_one, message) for message in messages]
+        for done, future in enumerate(as_completed(futures), start=1):
+            outcome = future.result()
+            if outcome.status == 'skipped':
+                continue
+            summary.outcomes.append(outcome)
+            pending.append(outcome)
+            if outcome.status in (RESULT_SENT, RESULT_LINK):
+                summary.sent += 1
+            else:
+                summary.failed += 1
+            if len(pending) >= PROGRESS_EVERY or done == total:
+                save_results(dispatch_key, channel, pending)
+                pending = []
+                if on_progress is not None and on_progress(summary, total) is False:
+                    stop.set()
+    save_results(dispatch_key, channel, pending)
+    return summary
+
+
+def build_finance_digest(summary: DispatchSummary, period_label: str, channel: str):
+    """رسالة ملخص واحدة لقسم المالية: (الموضوع، HTML، مرفقات) مع CSV بكل المستلمين."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['employee_id', 'employee_name', 'recipient', 'status', 'error'])
+    for outcome in summary.outcomes:
+        m = outcome.message
+        writer.writerow([m.employee_code, m.employee_name, m.recipient, outcome.status, outcome.error or ''])
+
+    subject = f"[Archive] ملخص إرسال قسائم الرواتب - {period_label}"
+    html_body = (
+        f"<div dir='rtl' style='font-family:Cairo,Arial,sans-serif'>"
+        f"<h3>ملخص إرسال قسائم الرواتب</h3>"
+        f"<p>الفترة: <strong>{period_label}</strong></p>"
+        f"<p>القناة: <strong>{channel}</strong></p>"
+        f"<p>تم الإرسال: <strong>{summary.sent}</strong> — فشل: <strong>{summary.failed}</strong>"
+        f" — أُرسلت سابقاً: <strong>{summary.skipped}</strong></p>"
+        f"<p>تفاصيل كل مستلم في الملف المرفق.</p>"
+        f"</div>"
+    )
+    attachments = [{
+        'filename': f"payslips_{period_label.replace('/', '-')}.csv",
+        'content': ('\ufeff' + buffer.getvalue()).encode('utf-8'),
+        'content_type': 'text/csv',
+    }]
+    return subject, html_body, attachments
@@ -241,3 +241,26 @@ class BankTransferFile(db.Model):
     
     def __repr__(self):
         return f'<BankTransferFile {self.file_name}>'
+
+
+class PayslipDispatchResult(db.Model):
+    """نتيجة إرسال قسيمة راتب لمستلم واحد ضمن إرسال جماعي (للاستئناف بعد الفشل)"""
+    __tablename__ = 'payslip_dispatch_results'
+
+    id = db.Column(db.Integer, primary_key=True)
+    dispatch_key = db.Column(db.String(190), nullable=False)  # الفترة + النطاق + القناة
+    channel = db.Column(db.String(20), nullable=False)  # email, whatsapp
+    payroll_record_id = db.Column(db.Integer, nullable=False)
+    employee_id = db.Column(db.Integer, nullable=True)
+    recipient = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False)  # sent, failed
+    error = db.Column(db.String(500))
+    provider_message_id = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('dispatch_key', 'payroll_record_id', name='uq_payslip_dispatch_record'),
+    )
+
+    def __repr__(self):
+        return f'<PayslipDispatchResult {self.dispatch_key} {self.payroll_record_id} {self.status}>'
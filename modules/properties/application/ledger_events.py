@@ -0,0 +1,51 @@
+"""
+أحداث تحديث دفتر العقود — تُبقي property_ledger متزامناً مع العقود والدفعات.
+بعد التحديثات الجماعية التي لا تطلق الأحداث (core.model_events): flask property-ledger-rebuild.
+"""
+from sqlalchemy import event, inspect
+
+from core.model_events import columns_changed
+from models import PropertyPayment, RentalProperty
+from modules.properties.application import property_ledger_service as svc
+
+# الأعمدة التي يؤثر تغييرها على الدفتر
+_PROPERTY_COLUMNS = (
+    "contract_start_date", "contract_end_date", "annual_rent_amount", "payment_method",
+    "is_active", "status", "owner_id",
+)
+_PAYMENT_COLUMNS = ("property_id", "amount", "status", "payment_date", "actual_payment_date")
+
+
+def _property_saved(mapper, connection, target):
+    svc.refresh_properties(connection, [target.id])
+
+
+def _property_updated(mapper, connection, target):
+    if columns_changed(target, _PROPERTY_COLUMNS):
+        svc.refresh_properties(connection, [target.id])
+
+
+def _property_deleted(mapper, connection, target):
+    svc.remove_properties(connection, [target.id])
+
+
+def _payment_saved(mapper, connection, target):
+    svc.refresh_properties(connection, [target.property_id])
+
+
+def _payment_updated(mapper, connection, target):
+    if not columns_changed(target, _PAYMENT_COLUMNS):
+        return
+    # نقل الدفعة لعقار آخر يغيّر دفتر العقارين
+    moved_from = inspect(target).attrs["property_id"].history.deleted or []
+    svc.refresh_properties(connection, [target.property_id, *moved_from])
+
+
+def register_ledger_listeners() -> None:
+    """تسجيل أحداث الإدراج والتحديث والحذف للعقود والدفعات."""
+    event.listen(RentalProperty, "after_insert", _property_saved)
+    event.listen(RentalProperty, "after_update", _property_updated)
+    event.listen(RentalProperty, "after_delete", _property_deleted)
+    event.listen(PropertyPayment, "after_insert", _payment_saved)
+    event.listen(PropertyPayment, "after_update", _payment_updated)
+    event.listen(PropertyPayment, "after_delete", _payment_saved)
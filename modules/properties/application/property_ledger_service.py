@@ -0,0 +1,376 @@
+"""
+خدمة دفتر عقود العقارات (property_ledger).
+- يحوّل كل عقد RentalProperty إلى جدول أقساط مستحقة حسب طريقة السداد وتواريخ انتقال حالته.
+- الدفعات المدفوعة (PropertyPayment) تُخصص للأقساط بالأقدم أولاً؛ الفائض يُضاف لآخر قسط.
+- تحديث تدريجي: أحداث الحفظ تعيد كتابة دفتر العقار المعدّل فقط (ledger_events).
+- مهمة يومية تعلّم الأقساط المتأخرة وتنقل العقود بين الحالات بدل المسح عند كل عرض.
+- لوحة العقارات وتصدير Excel يقرآن تجميعاً شرطياً واحداً ونطاقات مفهرسة من الجدولين.
+"""
+import calendar
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, case, delete, func, insert, select, update
+from sqlalchemy.orm import selectinload
+
+from core.extensions import db
+from modules.jobs.application.job_queue import enqueue, job_handler
+from modules.properties.domain.models import (
+    CONTRACT_CURRENT,
+    CONTRACT_EXPIRED,
+    CONTRACT_EXPIRING,
+    EXPIRING_WINDOW_DAYS,
+    INSTALMENT_DUE,
+    INSTALMENT_OVERDUE,
+    INSTALMENT_PAID,
+    PropertyLedgerContract,
+    PropertyLedgerEntry,
+    PropertyPayment,
+    RentalProperty,
+    contract_state_for,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+MAX_INSTALMENTS = 600  # حماية من عقود بتواريخ خاطئة (50 سنة شهرياً)
+UPCOMING_WINDOW_DAYS = 30
+PAID_TOLERANCE = 0.01
+REBUILD_JOB = "properties.ledger_rebuild"
+REBUILD_KEY = "property-ledger:rebuild"
+
+# عدد الأشهر بين قسطين؛ أي قيمة أخرى تُعامل كسداد سنوي (مثل payment_amount_per_period)
+PERIOD_MONTHS = {
+    "monthly": 1,
+    "quarterly": 3,
+    "semi_annually": 6,
+    "annually": 12,
+}
+
+_state = {"listeners": False}
+
+
+# ==================== جدول الأقساط ====================
+
+def _add_months(start: date, months: int) -> date:
+    month_index = start.month - 1 + months
+    year, month = start.year + month_index // 12, month_index % 12 + 1
+    return date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+
+
+def instalment_schedule(start: date, end: date, payment_method: Optional[str], annual_rent: float):
+    """[(تاريخ الاستحقاق، المبلغ)] من بداية العقد كل فترة حتى نهايته (نفس معاينة نموذج الإنشاء)."""
+    if not start or not end or start > end:
+        return []
+    months = PERIOD_MONTHS.get(payment_method, 12)
+    amount = (annual_rent or 0) * months / 12
+    schedule = []
+    due = start
+    while due <= end and len(schedule) < MAX_INSTALMENTS:
+        schedule.append((due, amount))
+        due = _add_months(start, months * len(schedule))
+    return schedule
+
+
+def allocate_payments(schedule, payments, today: date) -> List[Dict[str, Any]]:
+    """
+    توزيع الدفعات المدفوعة [(التاريخ، المبلغ)] على الأقساط بالأقدم أولاً.
+    يعيد صفوف الأقساط بالحالة والمبلغ المدفوع وتاريخ آخر دفعة ساهمت فيها.
+    """
+    rows = [{"seq": i + 1, "due_date": due, "amount_due": amount, "amount_paid": 0.0, "last_paid_on": None}
+            for i, (due, amount) in enumerate(schedule)]
+    index = 0
+    for paid_on, amount in sorted(payments, key=lambda p: p[0]):
+        remaining = amount or 0
+        while remaining > 0 and rows:
+            row = rows[index]
+            room = row["amount_due"] - row["amount_paid"]
+            last = index == len(rows) - 1
+            portion = remaining if last else min(room, remaining)
+            if portion > 0:
+                row["amount_paid"] += portion
+                row["last_paid_on"] = max(filter(None, (row["last_paid_on"], paid_on)))
+                remaining -= portion
+            if not last and row["amount_paid"] >= row["amount_due"] - PAID_TOLERANCE:
+                index += 1
+    for row in rows:
+        if row["amount_paid"] >= row["amount_due"] - PAID_TOLERANCE:
+            row["status"] = INSTALMENT_PAID
+        elif row["due_date"] < today:
+            row["status"] = INSTALMENT_OVERDUE
+        else:
+            row["status"] = INSTALMENT_DUE
+    return rows
+
+
+# ==================== المصادر ====================
+
+def _property_rows(connection, ids: Optional[Sequence[int]]) -> Iterable[Any]:
+    t = RentalProperty.__table__
+    stmt = select(
+        t.c.id, t.c.contract_start_date, t.c.contract_end_date, t.c.annual_rent_amount,
+        t.c.payment_method, t.c.is_active, t.c.status, t.c.owner_id,
+    )
+    if ids is not None:
+        stmt = stmt.where(t.c.id.in_(ids))
+    return connection.execute(stmt.order_by(t.c.id))
+
+
+def _paid_payments(connection, ids: Sequence[int]) -> Dict[int, List[tuple]]:
+    p = PropertyPayment.__table__
+    payments: Dict[int, List[tuple]] = defaultdict(list)
+    stmt = select(p.c.property_id, p.c.payment_date, p.c.actual_payment_date, p.c.amount).where(
+        p.c.property_id.in_(list(ids)), p.c.status == INSTALMENT_PAID
+    )
+    for row in connection.execute(stmt):
+        payments[row.property_id].append((row.actual_payment_date or row.payment_date, row.amount or 0))
+    return payments
+
+
+def _ledger_rows(prop, payments, today: date):
+    """(صف العقد، صفوف الأقساط) لعقار واحد."""
+    now = datetime.utcnow()
+    is_active = bool(prop.is_active) if prop.is_active is not None else True
+    schedule = instalment_schedule(prop.contract_start_date, prop.contract_end_date,
+                                   prop.payment_method, prop.annual_rent_amount)
+    entries = allocate_payments(schedule, payments, today)
+    for entry in entries:
+        entry.update(property_id=prop.id, is_active=is_active, updated_at=now)
+    unpaid = [e for e in entries if e["status"] != INSTALMENT_PAID]
+    end = prop.contract_end_date
+    contract = {
+        "property_id": prop.id,
+        "is_active": is_active,
+        "contract_status": prop.status,
+        "property_type": prop.owner_id,
+        "annual_rent": prop.annual_rent_amount or 0,
+        "period_amount": schedule[0][1] if schedule else 0,
+        "contract_end_date": end,
+        "expiring_on": end - timedelta(days=EXPIRING_WINDOW_DAYS),
+        "expires_on": end + timedelta(days=1),
+        "state": contract_state_for(end, today),
+        "instalments": len(entries),
+        "total_due": sum(e["amount_due"] for e in entries),
+        "total_paid": sum(amount for _, amount in payments),
+        "overdue_count": sum(1 for e in unpaid if e["status"] == INSTALMENT_OVERDUE),
+        "next_due_date": unpaid[0]["due_date"] if unpaid else None,
+        "updated_at": now,
+    }
+    return contract, entries
+
+
+def _write(connection, props: List[Any], today: date) -> int:
+    ids = [prop.id for prop in props]
+    payments = _paid_payments(connection, ids)
+    contracts, entries = [], []
+    for prop in props:
+        if prop.contract_start_date is None or prop.contract_end_date is None:
+            continue
+        contract, rows = _ledger_rows(prop, payments.get(prop.id, []), today)
+        contracts.append(contract)
+        entries.extend(rows)
+    if contracts:
+        connection.execute(insert(PropertyLedgerContract.__table__), contracts)
+    if entries:
+        connection.execute(insert(PropertyLedgerEntry.__table__), entries)
+    return len(entries)
+
+
+# ==================== التحديث ====================
+
+def remove_properties(connection, ids: Sequence[int]) -> None:
+    ids = [i for i in ids if i is not None]
+    if not ids:
+        return
+    connection.execute(delete(PropertyLedgerEntry.__table__).where(PropertyLedgerEntry.__table__.c.property_id.in_(ids)))
+    connection.execute(
+        delete(PropertyLedgerContract.__table__).where(PropertyLedgerContract.__table__.c.property_id.in_(ids))
+    )
+
+
+def refresh_properties(connection, ids: Sequence[int], today: Optional[date] = None) -> int:
+    """إعادة كتابة دفتر عقارات محددة (يُستدعى من أحداث الحفظ على نفس الاتصال)."""
+    ids = sorted({i for i in ids if i is not None})
+    if not ids:
+        return 0
+    today = today or date.today()
+    written = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start:start + BATCH_SIZE]
+        remove_properties(connection, chunk)
+        written += _write(connection, list(_property_rows(connection, chunk)), today)
+    return written
+
+
+def rebuild_ledger(today: Optional[date] = None) -> int:
+    """إعادة بناء الدفتر كاملاً (التهيئة الأولى أو بعد تحديثات جماعية)."""
+    today = today or date.today()
+    total = 0
+    with db.engine.begin() as conn:
+        conn.execute(delete(PropertyLedgerEntry.__table__))
+        conn.execute(delete(PropertyLedgerContract.__table__))
+        batch: List[Any] = []
+        for prop in _property_rows(conn, None).fetchall():
+            batch.append(prop)
+            if len(batch) >= BATCH_SIZE:
+                total += _write(conn, batch, today)
+                batch = []
+        if batch:
+            total += _write(conn, batch, today)
+    return total
+
+
+def mark_overdue(today: Optional[date] = None) -> Dict[str, int]:
+    """المهمة اليومية: الأقساط التي فات موعدها تصبح متأخرة والعقود تنتقل حسب تواريخ الانتقال."""
+    today = today or date.today()
+    e, c = PropertyLedgerEntry.__table__, PropertyLedgerContract.__table__
+    with db.engine.begin() as conn:
+        overdue = conn.execute(
+            update(e).where(e.c.status == INSTALMENT_DUE, e.c.due_date < today).values(status=INSTALMENT_OVERDUE)
+        ).rowcount or 0
+        if overdue:
+            count = (
+                select(func.count()).select_from(e)
+                .where(e.c.property_id == c.c.property_id, e.c.status == INSTALMENT_OVERDUE)
+                .scalar_subquery()
+            )
+            conn.execute(update(c).where(c.c.overdue_count != count).values(overdue_count=count))
+        moved = 0
+        for state, condition in (
+            (CONTRACT_EXPIRED, c.c.expires_on <= today),
+            (CONTRACT_EXPIRING, and_(c.c.expiring_on <= today, c.c.expires_on > today)),
+            (CONTRACT_CURRENT, c.c.expiring_on > today),
+        ):
+            moved += conn.execute(update(c).where(c.c.state != state, condition).values(state=state)).rowcount or 0
+    logger.info(f"Property ledger refreshed: {overdue} instalments overdue, {moved} contracts moved")
+    return {"overdue": overdue, "moved": moved}
+
+
+# ==================== القراءة ====================
+
+def get_dashboard_stats(today: Optional[date] = None) -> Dict[str, Any]:
+    """إحصائيات لوحة العقارات: استعلام تجميع شرطي واحد لكل جدول."""
+    today = today or date.today()
+    c, e = PropertyLedgerContract, PropertyLedgerEntry
+
+    def _count(*conditions):
+        return func.coalesce(func.sum(case((and_(*conditions), 1), else_=0)), 0)
+
+    contracts = db.session.query(
+        _count(c.is_active.is_(True)),
+        _count(c.is_active.is_(True), c.contract_status == "active"),
+        _count(c.is_active.is_(True), c.state == CONTRACT_EXPIRED),
+        _count(c.is_active.is_(True), c.state == CONTRACT_EXPIRING),
+        func.coalesce(func.sum(case((and_(c.is_active.is_(True), c.contract_status == "active"), c.annual_rent),
+                                    else_=0)), 0),
+        func.coalesce(func.sum(c.total_paid), 0),
+    ).one()
+    entries = db.session.query(
+        _count(e.status == INSTALMENT_DUE),
+        _count(e.status == INSTALMENT_OVERDUE),
+    ).filter(e.is_active.is_(True)).one()
+    return {
+        "total_properties": contracts[0],
+        "active_properties": contracts[1],
+        "expired_properties": contracts[2],
+        "expiring_soon": contracts[3],
+        "total_annual_rent": contracts[4],
+        "total_paid": contracts[5],
+        "pending_payments": entries[0] + entries[1],
+        "overdue_payments": entries[1],
+        "expiring_soon_date": today + timedelta(days=EXPIRING_WINDOW_DAYS),
+    }
+
+
+def get_instalments(
+    statuses: Sequence[str] = (INSTALMENT_DUE, INSTALMENT_OVERDUE),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: Optional[int] = None,
+) -> List[PropertyLedgerEntry]:
+    """أقساط العقارات النشطة بحالة معينة في نطاق مفهرس على تاريخ الاستحقاق."""
+    query = PropertyLedgerEntry.query.options(selectinload(PropertyLedgerEntry.rental_property)).filter(
+        PropertyLedgerEntry.is_active.is_(True), PropertyLedgerEntry.status.in_(list(statuses))
+    )
+    if start is not None:
+        query = query.filter(PropertyLedgerEntry.due_date >= start)
+    if end is not None:
+        query = query.filter(PropertyLedgerEntry.due_date <= end)
+    query = query.order_by(PropertyLedgerEntry.due_date, PropertyLedgerEntry.id)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def get_upcoming_instalments(today: Optional[date] = None, days: int = UPCOMING_WINDOW_DAYS, limit=None):
+    today = today or date.today()
+    return get_instalments((INSTALMENT_DUE,), start=today, end=today + timedelta(days=days), limit=limit)
+
+
+def get_contracts(property_ids: Optional[Sequence[int]] = None) -> Dict[int, PropertyLedgerContract]:
+    """صفوف الدفتر حسب معرف العقار."""
+    query = PropertyLedgerContract.query
+    if property_ids is not None:
+        query = query.filter(PropertyLedgerContract.property_id.in_(list(property_ids)))
+    return {row.property_id: row for row in query.all()}
+
+
+def get_type_summary() -> List[tuple]:
+    """[(نوع العقار، العدد، إجمالي الإيجار السنوي للعقود النشطة)] بـ GROUP BY واحد."""
+    c = PropertyLedgerContract
+    rent = func.coalesce(func.sum(case((c.contract_status == "active", c.annual_rent), else_=0)), 0)
+    return (
+        db.session.query(c.property_type, func.count(c.property_id), rent)
+        .filter(c.is_active.is_(True))
+        .group_by(c.property_type)
+        .order_by(func.count(c.property_id).desc())
+        .all()
+    )
+
+
+# ==================== التهيئة ====================
+
+@click.command("property-ledger-rebuild")
+@with_appcontext
+def property_ledger_rebuild_command():
+    """إعادة بناء دفتر عقود العقارات من العقود والدفعات."""
+    click.echo(f"Property ledger rebuilt: {rebuild_ledger()} instalments")
+
+
+@job_handler(REBUILD_JOB)
+def _rebuild_ledger_job(job):
+    job.update(stage="rebuilding", message="جاري بناء دفتر العقارات...")
+    return {"instalments": rebuild_ledger()}
+
+
+def _queue_initial_build() -> None:
+    """طلب بناء الدفتر الفارغ في الطابور بدل بنائه متزامناً في كل عملية عند الإقلاع."""
+    try:
+        enqueue(REBUILD_JOB, idempotency_key=REBUILD_KEY, message="بناء دفتر العقارات")
+        logger.info("Property ledger is empty: initial build queued")
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Property ledger build not queued (run flask property-ledger-rebuild): {e}")
+
+
+def init_property_ledger(app) -> None:
+    """تهيئة الدفتر: أمر CLI، أحداث التحديث، وطلب بناء أولي في الطابور إن كان الجدول فارغاً."""
+    from modules.properties.application.ledger_events import register_ledger_listeners
+
+    if "property-ledger-rebuild" not in app.cli.commands:
+        app.cli.add_command(property_ledger_rebuild_command)
+    if not _state["listeners"]:
+        register_ledger_listeners()
+        _state["listeners"] = True
+    try:
+        with db.engine.connect() as conn:
+            is_empty = conn.execute(select(PropertyLedgerContract.__table__.c.property_id).limit(1)).first() is None
+    except Exception as e:
+        logger.warning(f"Property ledger not checked: {e}")
+        return
+    if is_empty:
+        _queue_initial_build()
@@ -4,6 +4,8 @@ from modules.properties.domain.models import (
     PropertyImage,
     PropertyPayment,
     PropertyFurnishing,
+    PropertyLedgerContract,
+    PropertyLedgerEntry,
     property_employees
 )
 
@@ -12,5 +14,7 @@ __all__ = [
     'PropertyImage',
     'PropertyPayment',
     'PropertyFurnishing',
+    'PropertyLedgerContract',
+    'PropertyLedgerEntry',
     'property_employees'
 ]
@@ -1,6 +1,7 @@
 """
 Properties & Housing Domain Models
-Contains: RentalProperty, PropertyImage, PropertyPayment, PropertyFurnishing
+Contains: RentalProperty, PropertyImage, PropertyPayment, PropertyFurnishing,
+PropertyLedgerContract, PropertyLedgerEntry (دفتر العقود المادي)
 """
 
 from datetime import datetime, date
@@ -229,3 +230,98 @@ class PropertyUtilityBill(db.Model):
 
     def __repr__(self):
         return f'<UtilityBill {self.bill_type} {self.month}/{self.year} - {self.amount} SAR>'
+
+
+# ============================================================================
+# LEDGER (جداول مشتقة — تُحدَّث من modules.properties.application.property_ledger_service)
+# ============================================================================
+
+# حالات العقد في الدفتر
+CONTRACT_CURRENT = 'current'
+CONTRACT_EXPIRING = 'expiring'
+CONTRACT_EXPIRED = 'expired'
+EXPIRING_WINDOW_DAYS = 60
+
+# حالات القسط
+INSTALMENT_DUE = 'due'
+INSTALMENT_PAID = 'paid'
+INSTALMENT_OVERDUE = 'overdue'
+
+
+def contract_state_for(end_date, today):
+    """حالة العقد بالنسبة لليوم — نفس حدود is_expired / is_expiring_soon."""
+    if end_date < today:
+        return CONTRACT_EXPIRED
+    if (end_date - today).days <= EXPIRING_WINDOW_DAYS:
+        return CONTRACT_EXPIRING
+    return CONTRACT_CURRENT
+
+
+class PropertyLedgerContract(db.Model):
+    """ملخص عقد عقار واحد: تواريخ انتقال الحالة ومجاميع أقساطه."""
+    __tablename__ = 'property_ledger_contracts'
+
+    property_id = db.Column(db.Integer, db.ForeignKey('rental_properties.id', ondelete='CASCADE'), primary_key=True)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)
+    contract_status = db.Column(db.String(30), nullable=True)  # نسخة من RentalProperty.status
+    property_type = db.Column(db.String(100), nullable=True)  # owner_id يحتوي نوع العقار مؤقتاً
+    annual_rent = db.Column(db.Float, nullable=False, default=0)
+    period_amount = db.Column(db.Float, nullable=False, default=0)
+    contract_end_date = db.Column(db.Date, nullable=False)
+    expiring_on = db.Column(db.Date, nullable=False)  # اليوم الذي يصبح فيه العقد "قريب الانتهاء"
+    expires_on = db.Column(db.Date, nullable=False)  # أول يوم بعد نهاية العقد
+    state = db.Column(db.String(12), nullable=False)
+    instalments = db.Column(db.Integer, nullable=False, default=0)
+    total_due = db.Column(db.Float, nullable=False, default=0)
+    total_paid = db.Column(db.Float, nullable=False, default=0)
+    overdue_count = db.Column(db.Integer, nullable=False, default=0)
+    next_due_date = db.Column(db.Date, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_property_ledger_contracts_state', 'is_active', 'state'),
+        db.Index('idx_property_ledger_contracts_end', 'is_active', 'contract_end_date'),
+    )
+
+    @property
+    def outstanding(self):
+        return max(self.total_due - self.total_paid, 0)
+
+    def __repr__(self):
+        return f'<PropertyLedgerContract {self.property_id} {self.state}>'
+
+
+class PropertyLedgerEntry(db.Model):
+    """قسط مستحق واحد في جدول سداد العقد مع ما خُصص له من الدفعات المدفوعة."""
+    __tablename__ = 'property_ledger_entries'
+
+    id = db.Column(db.Integer, primary_key=True)
+    property_id = db.Column(db.Integer, db.ForeignKey('rental_properties.id', ondelete='CASCADE'), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    due_date = db.Column(db.Date, nullable=False)
+    amount_due = db.Column(db.Float, nullable=False, default=0)
+    amount_paid = db.Column(db.Float, nullable=False, default=0)
+    status = db.Column(db.String(12), nullable=False)  # due, paid, overdue
+    last_paid_on = db.Column(db.Date, nullable=True)
+    is_active = db.Column(db.Boolean, nullable=False, default=True)  # نسخة من RentalProperty.is_active
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    rental_property = db.relationship('RentalProperty', viewonly=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('property_id', 'seq', name='uq_property_ledger_entry_seq'),
+        db.Index('idx_property_ledger_entries_status', 'is_active', 'status', 'due_date'),
+        db.Index('idx_property_ledger_entries_due', 'due_date'),
+    )
+
+    @property
+    def amount(self):
+        """المبلغ المتبقي من القسط (بنفس اسم PropertyPayment.amount لقوالب اللوحة)."""
+        return max(self.amount_due - self.amount_paid, 0)
+
+    @property
+    def payment_date(self):
+        return self.due_date
+
+    def __repr__(self):
+        return f'<PropertyLedgerEntry {self.property_id}#{self.seq} {self.due_date} {self.status}>'
@@ -0,0 +1,3 @@
+"""
+وحدة البحث الموحد — فهرس نصي كامل للموظفين والمركبات والمستندات مع توحيد النص العربي.
+"""
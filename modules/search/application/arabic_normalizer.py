@@ -0,0 +1,95 @@
+"""
+توحيد النص العربي لأغراض البحث.
+- إزالة التشكيل والتطويل.
+- توحيد الألف والهمزات والتاء المربوطة والألف المقصورة.
+- تحويل الأرقام العربية الهندية والفارسية إلى أرقام لاتينية.
+دوال نقية بلا اعتماد على قاعدة البيانات.
+"""
+import re
+import unicodedata
+from typing import List, Set
+
+# التشكيل: الفتحتان حتى السكون + الألف الخنجرية + علامات القرآن
+_DIACRITICS_RE = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed]")
+_TATWEEL = "\u0640"
+
+_CHAR_MAP = str.maketrans({
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ى": "ي",
+    "ئ": "ي",
+    "ؤ": "و",
+    "ة": "ه",
+    "ک": "ك",
+    "ی": "ي",
+    # الأرقام العربية الهندية ٠-٩
+    "٠": "0", "١": "1", "٢": "2", "٣": "3", "٤": "4",
+    "٥": "5", "٦": "6", "٧": "7", "٨": "8", "٩": "9",
+    # الأرقام الفارسية ۰-۹
+    "۰": "0", "۱": "1", "۲": "2", "۳": "3", "۴": "4",
+    "۵": "5", "۶": "6", "۷": "7", "۸": "8", "۹": "9",
+})
+
+# كل ما ليس حرفاً أو رقماً يتحول إلى مسافة (يشمل علامات الترقيم العربية)
+_NON_WORD_RE = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize_arabic(text) -> str:
+    """إرجاع نص موحد بحروف صغيرة ومسافات مفردة، جاهز للفهرسة أو الاستعلام."""
+    if text is None:
+        return ""
+    value = unicodedata.normalize("NFKC", str(text))
+    value = _DIACRITICS_RE.sub("", value).replace(_TATWEEL, "")
+    value = value.translate(_CHAR_MAP).casefold()
+    value = _NON_WORD_RE.sub(" ", value).replace("_", " ")
+    return " ".join(value.split())
+
+
+def tokenize(text) -> List[str]:
+    """تقسيم النص الموحد إلى كلمات مع إزالة التكرار والحفاظ على الترتيب."""
+    seen: Set[str] = set()
+    tokens: List[str] = []
+    for token in normalize_arabic(text).split():
+        if token not in seen:
+            seen.add(token)
+            tokens.append(token)
+    return tokens
+
+
+def trigrams(token: str) -> Set[str]:
+    """ثلاثيات الأحرف لكلمة واحدة مع حشو الأطراف (نفس أسلوب pg_trgm)."""
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def similarity(a: str, b: str) -> float:
+    """تشابه جاكارد بين ثلاثيات نصين موحدين (0..1) لتحمّل الأخطاء الإملائية."""
+    grams_a: Set[str] = set()
+    for token in normalize_arabic(a).split():
+        grams_a |= trigrams(token)
+    grams_b: Set[str] = set()
+    for token in normalize_arabic(b).split():
+        grams_b |= trigrams(token)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def token_similarity(query_token: str, text: str) -> float:
+    """أفضل تشابه بين كلمة الاستعلام وأي كلمة في النص (يُستخدم لترتيب نتائج التقريب)."""
+    grams_q = trigrams(query_token)
+    best = 0.0
+    for token in text.split():
+        if token.startswith(query_token):
+            return 1.0
+        if query_token in token:
+            # مطابقة داخل الكلمة، مثل "زهراني" داخل "الزهراني"
+            best = max(best, 0.9)
+            continue
+        grams_t = trigrams(token)
+        score = len(grams_q & grams_t) / len(grams_q | grams_t)
+        if score > best:
+            best = score
+    return best
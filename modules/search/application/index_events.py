@@ -0,0 +1,61 @@
+"""
+أحداث تحديث فهرس البحث — تُبقي search_index متزامناً مع الموظفين والمركبات والمستندات.
+بعد التحديثات الجماعية التي لا تطلق الأحداث (core.model_events): flask search-reindex.
+"""
+from sqlalchemy import event, select
+
+from core.model_events import columns_changed
+from models import Document, Employee, Vehicle
+from modules.search.application import search_service as svc
+
+# الأعمدة التي يؤثر تغييرها على نص الفهرس
+_INDEXED_COLUMNS = {
+    Employee: ("name", "employee_id", "national_id", "mobile", "job_title"),
+    Vehicle: ("plate_number", "make", "model", "type_of_car", "driver_name", "project"),
+    Document: ("document_type", "document_number", "employee_id"),
+}
+
+_ENTITY_TYPES = {
+    Employee: svc.ENTITY_EMPLOYEE,
+    Vehicle: svc.ENTITY_VEHICLE,
+    Document: svc.ENTITY_DOCUMENT,
+}
+
+
+def _make_upsert_listener(model, only_on_change):
+    entity_type = _ENTITY_TYPES[model]
+    columns = _INDEXED_COLUMNS[model]
+
+    def _upsert(mapper, connection, target):
+        if not svc.is_enabled():
+            return
+        if only_on_change and not columns_changed(target, columns):
+            return
+        svc.reindex_rows(connection, entity_type, [target.id])
+        if model is Employee and only_on_change and columns_changed(target, ("name", "employee_id")):
+            # نص المستندات يتضمن اسم الموظف ورقمه الوظيفي
+            doc_table = Document.__table__
+            doc_ids = connection.execute(
+                select(doc_table.c.id).where(doc_table.c.employee_id == target.id)
+            ).scalars().all()
+            svc.reindex_rows(connection, svc.ENTITY_DOCUMENT, doc_ids)
+
+    return _upsert
+
+
+def _make_delete_listener(model):
+    entity_type = _ENTITY_TYPES[model]
+
+    def _remove(mapper, connection, target):
+        if svc.is_enabled() and target.id is not None:
+            svc.remove_rows(connection, entity_type, [target.id])
+
+    return _remove
+
+
+def register_index_listeners() -> None:
+    """تسجيل أحداث الإدراج والتحديث والحذف لكل نموذج مفهرس."""
+    for model in _ENTITY_TYPES:
+        event.listen(model, "after_insert", _make_upsert_listener(model, only_on_change=False))
+        event.listen(model, "after_update", _make_upsert_listener(model, only_on_change=True))
+        event.listen(model, "after_delete", _make_delete_listener(model))
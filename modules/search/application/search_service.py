@@ -0,0 +1,437 @@
+"""
+خدمة البحث الموحد — فهرس نصي للموظفين والمركبات والمستندات.
+
+- SQLite: جدولا FTS5 خارجيا المحتوى (unicode61 للبادئات، trigram للتقريب) تُحدّثهما
+  قوادح (triggers) على جدول search_index.
+- PostgreSQL: فهرس GIN على to_tsvector('simple', content) وفهرس pg_trgm للتقريب.
+- غير ذلك (MySQL): مطابقة LIKE على النص الموحد (بدون تقريب).
+
+يُحدَّث الفهرس من أحداث SQLAlchemy (index_events) داخل نفس المعاملة،
+ويُعاد بناؤه بالكامل عبر الأمر: flask search-reindex
+البناء الأولي لفهرس فارغ مهمة واحدة في طابور المهام (لا يُبنى في كل عملية عند الإقلاع)،
+وحتى اكتماله تستخدم فلاتر القوائم ilike البديل؛ بعده تطابق النص الجزئي على content (trigram/ILIKE/LIKE).
+"""
+import logging
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import click
+from sqlalchemy import Integer, delete, insert, literal, or_, select, text, func
+
+from core.extensions import db
+from models import Document, Employee, Vehicle
+from modules.jobs.application.job_queue import enqueue, job_handler
+from modules.search.application.arabic_normalizer import normalize_arabic, tokenize, token_similarity
+from modules.search.domain.models import SearchIndexEntry
+
+logger = logging.getLogger(__name__)
+
+ENTITY_EMPLOYEE = "employee"
+ENTITY_VEHICLE = "vehicle"
+ENTITY_DOCUMENT = "document"
+ENTITY_TYPES = (ENTITY_EMPLOYEE, ENTITY_VEHICLE, ENTITY_DOCUMENT)
+
+# الحد الأدنى لتشابه الثلاثيات لقبول نتيجة تقريبية
+FUZZY_THRESHOLD = 0.35
+# عدد المرشحين الذين يُعاد ترتيبهم في بايثون عند البحث التقريبي
+FUZZY_CANDIDATES = 200
+REBUILD_BATCH_SIZE = 1000
+# أقصر كلمة يطابقها مُقسِّم trigram في FTS5
+TRIGRAM_MIN_LENGTH = 3
+REBUILD_JOB = "search.rebuild"
+
+_SQLITE_FTS_TABLES = {
+    "search_index_fts": "unicode61 remove_diacritics 2",
+    "search_index_trgm": "trigram",
+}
+
+_state = {"enabled": False, "listeners": False, "sqlite_tables": (), "pg_trgm": False, "ready": False}
+
+
+@dataclass(frozen=True)
+class SearchHit:
+    """نتيجة بحث واحدة."""
+    entity_type: str
+    entity_id: int
+    title: str
+    score: float
+
+
+# ─── بناء مستندات الفهرس ───
+
+def _employee_rows_select():
+    t = Employee.__table__
+    return select(
+        t.c.id, t.c.name.label("title"),
+        t.c.name, t.c.employee_id, t.c.national_id, t.c.mobile, t.c.job_title,
+    )
+
+
+def _vehicle_rows_select():
+    t = Vehicle.__table__
+    return select(
+        t.c.id, t.c.plate_number.label("title"),
+        t.c.plate_number, t.c.make, t.c.model, t.c.type_of_car, t.c.driver_name, t.c.project,
+    )
+
+
+def _document_rows_select():
+    d = Document.__table__
+    e = Employee.__table__
+    return select(
+        d.c.id, d.c.document_type.label("title"),
+        d.c.document_type, d.c.document_number, e.c.name, e.c.employee_id,
+    ).select_from(d.outerjoin(e, e.c.id == d.c.employee_id))
+
+
+_ROW_SELECTS = {
+    ENTITY_EMPLOYEE: (_employee_rows_select, Employee.__table__.c.id),
+    ENTITY_VEHICLE: (_vehicle_rows_select, Vehicle.__table__.c.id),
+    ENTITY_DOCUMENT: (_document_rows_select, Document.__table__.c.id),
+}
+
+
+def _row_to_entry(entity_type: str, row) -> Dict:
+    values = [v for v in row[2:] if v is not None]
+    if entity_type == ENTITY_VEHICLE and row.plate_number:
+        # اللوحة بدون مسافات: "أ ب ج 1234" تطابق "ابج1234"
+        values.append("".join(normalize_arabic(row.plate_number).split()))
+    return {
+        "entity_type": entity_type,
+        "entity_id": row.id,
+        "title": (str(row.title) if row.title is not None else "")[:255],
+        "content": normalize_arabic(" ".join(str(v) for v in values)),
+    }
+
+
+def reindex_rows(connection, entity_type: str, entity_ids: Iterable[int]) -> int:
+    """إعادة فهرسة كيانات محددة على اتصال قائم (يُستدعى من أحداث الحفظ)."""
+    ids = [i for i in set(entity_ids) if i is not None]
+    if not ids:
+        return 0
+    build_select, id_column = _ROW_SELECTS[entity_type]
+    rows = connection.execute(build_select().where(id_column.in_(ids))).all()
+    remove_rows(connection, entity_type, ids)
+    entries = [_row_to_entry(entity_type, row) for row in rows]
+    if entries:
+        connection.execute(insert(SearchIndexEntry.__table__), entries)
+    return len(entries)
+
+
+def remove_rows(connection, entity_type: str, entity_ids: Sequence[int]) -> None:
+    """حذف مدخلات الفهرس لكيانات محددة."""
+    t = SearchIndexEntry.__table__
+    connection.execute(delete(t).where(t.c.entity_type == entity_type, t.c.entity_id.in_(list(entity_ids))))
+
+
+def rebuild_index(entity_types: Optional[Sequence[str]] = None) -> Dict[str, int]:
+    """إعادة بناء الفهرس بالكامل على دفعات. يعيد عدد المدخلات لكل نوع."""
+    t = SearchIndexEntry.__table__
+    counts: Dict[str, int] = {}
+    with db.engine.begin() as connection:
+        for entity_type in entity_types or ENTITY_TYPES:
+            build_select, _ = _ROW_SELECTS[entity_type]
+            connection.execute(delete(t).where(t.c.entity_type == entity_type))
+            result = connection.execute(build_select().execution_options(yield_per=REBUILD_BATCH_SIZE))
+            total = 0
+            for batch in result.partitions(REBUILD_BATCH_SIZE):
+                connection.execute(insert(t), [_row_to_entry(entity_type, row) for row in batch])
+                total += len(batch)
+            counts[entity_type] = total
+    return counts
+
+
+# ─── مخطط الفهرس حسب المحرك ───
+
+def ensure_search_schema(engine) -> None:
+    """إنشاء الجدول والفهارس الخاصة بالمحرك (idempotent)."""
+    SearchIndexEntry.__table__.create(bind=engine, checkfirst=True)
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        _state["sqlite_tables"] = _ensure_sqlite_fts(engine)
+    elif dialect == "postgresql":
+        _state["pg_trgm"] = _ensure_postgres_indexes(engine)
+
+
+def _ensure_sqlite_fts(engine) -> tuple:
+    created = []
+    with engine.begin() as conn:
+        existing = {r[0] for r in conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))}
+        for table, tokenizer in _SQLITE_FTS_TABLES.items():
+            if table not in existing:
+                try:
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE {table} USING fts5("
+                        f"content, content='search_index', content_rowid='id', tokenize='{tokenizer}')"
+                    ))
+                except Exception as e:  # نسخة SQLite بدون FTS5 أو بدون trigram
+                    logger.warning(f"Search: FTS5 table {table} unavailable: {e}")
+                    continue
+                conn.execute(text(f"INSERT INTO {table}({table}) VALUES ('rebuild')"))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON search_index BEGIN "
+                f"INSERT INTO {table}(rowid, content) VALUES (new.id, new.content); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON search_index BEGIN "
+                f"INSERT INTO {table}({table}, rowid, content) VALUES ('delete', old.id, old.content); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE ON search_index BEGIN "
+                f"INSERT INTO {table}({table}, rowid, content) VALUES ('delete', old.id, old.content); "
+                f"INSERT INTO {table}(rowid, content) VALUES (new.id, new.content); END"
+            ))
+            created.append(table)
+    return tuple(created)
+
+
+def _ensure_postgres_indexes(engine) -> bool:
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_search_index_tsv "
+            "ON search_index USING gin (to_tsvector('simple', content))"
+        ))
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS idx_search_index_trgm "
+                "ON search_index USING gin (content gin_trgm_ops)"
+            ))
+        return True
+    except Exception as e:  # لا صلاحية لإنشاء الامتداد
+        logger.warning(f"Search: pg_trgm unavailable, fuzzy search disabled: {e}")
+        return False
+
+
+# ─── الاستعلام ───
+
+def is_enabled() -> bool:
+    return _state["enabled"]
+
+
+def _index_ready() -> bool:
+    """الفهرس مفعّل وفيه مدخلات (بُني). يُتحقق مرة حتى يصبح جاهزاً ثم يُحفظ في العملية."""
+    if not _state["enabled"]:
+        return False
+    if not _state["ready"]:
+        t = SearchIndexEntry.__table__
+        _state["ready"] = db.session.execute(select(t.c.id).limit(1)).first() is not None
+    return _state["ready"]
+
+
+def search(query: str, entity_types: Optional[Sequence[str]] = None, limit: int = 20,
+           fuzzy: bool = True) -> List[SearchHit]:
+    """
+    البحث الموحد: مطابقة بادئات لكل كلمات الاستعلام، ثم إكمال النتائج
+    بمطابقة تقريبية (ثلاثيات الأحرف) لتحمّل الأخطاء الإملائية.
+    """
+    tokens = tokenize(query)
+    if not tokens or not _state["enabled"]:
+        return []
+    dialect = db.engine.dialect.name
+    if dialect == "sqlite" and "search_index_fts" in _state["sqlite_tables"]:
+        hits = _sqlite_prefix(tokens, entity_types, limit)
+        if fuzzy and len(hits) < limit and "search_index_trgm" in _state["sqlite_tables"]:
+            hits = _merge(hits, _sqlite_fuzzy(tokens, entity_types), limit)
+    elif dialect == "postgresql":
+        hits = _postgres_prefix(tokens, entity_types, limit)
+        if fuzzy and len(hits) < limit and _state["pg_trgm"]:
+            hits = _merge(hits, _postgres_fuzzy(" ".join(tokens), entity_types, limit), limit)
+    else:
+        hits = _like_search(tokens, entity_types, limit)
+    return hits
+
+
+def _substring_conditions(tokens: Sequence[str]) -> list:
+    """شرط "النص الموحد يحوي كل كلمة" (مثل ilike '%كلمة%' على الأعمدة الأصلية)."""
+    s = SearchIndexEntry.__table__
+    if db.engine.dialect.name == "sqlite" and "search_index_trgm" in _state["sqlite_tables"]:
+        # مُقسِّم trigram يطابق النصوص الجزئية من 3 أحرف فأكثر عبر الفهرس؛ الأقصر بـ LIKE
+        indexed = [t for t in tokens if len(t) >= TRIGRAM_MIN_LENGTH]
+        conditions = [s.c.content.icontains(t, autoescape=True) for t in tokens if len(t) < TRIGRAM_MIN_LENGTH]
+        if indexed:
+            conditions.append(s.c.id.in_(
+                text("SELECT rowid FROM search_index_trgm WHERE search_index_trgm MATCH :search_match")
+                .bindparams(search_match=" AND ".join('"' + t.replace('"', '""') + '"' for t in indexed))
+                .columns(rowid=Integer)
+            ))
+        return conditions
+    # PostgreSQL: ILIKE يستخدم فهرس pg_trgm على content؛ غيره LIKE عادي
+    return [s.c.content.icontains(t, autoescape=True) for t in tokens]
+
+
+def matching_ids_select(entity_type: str, query: str):
+    """
+    استعلام فرعي بمعرّفات كل الكيانات التي يحوي نصها الموحد كل كلمات الاستعلام كنصوص جزئية
+    ("زهراني" تطابق "الزهراني" و"1234567" تطابق "0551234567")، بلا تقريب ولا حد،
+    أو None إن كان الفهرس غير جاهز أو الاستعلام بلا كلمات (ليستخدم المستدعي البديل).
+    """
+    tokens = tokenize(query)
+    if not tokens or not _index_ready():
+        return None
+    s = SearchIndexEntry.__table__
+    return select(s.c.entity_id).where(s.c.entity_type == entity_type, *_substring_conditions(tokens))
+
+
+def matching_ids(entity_type: str, query: str) -> Optional[List[int]]:
+    """معرّفات كل الكيانات المطابقة، أو None إن كان الفهرس غير جاهز."""
+    stmt = matching_ids_select(entity_type, query)
+    if stmt is None:
+        return None
+    return list(db.session.execute(stmt).scalars())
+
+
+def apply_search_filter(query, entity_type: str, id_column, term: str, *fallback_columns):
+    """
+    تطبيق فلتر البحث على استعلام ORM عبر الفهرس الموحد كاستعلام فرعي (IN)،
+    فلا حد لعدد النتائج وتبقى الصفحات والعد في قاعدة البيانات. الفلتر مطابقة نص جزئي كما كان بلا تقريب.
+    عند عدم جاهزية الفهرس يُستخدم ilike على الأعمدة البديلة كما كان سابقاً.
+    """
+    if not term:
+        return query
+    ids = matching_ids_select(entity_type, term)
+    if ids is None:
+        return query.filter(or_(*[column.ilike(f"%{term}%") for column in fallback_columns]))
+    return query.filter(id_column.in_(ids))
+
+
+def _merge(primary: List[SearchHit], extra: List[SearchHit], limit: int) -> List[SearchHit]:
+    seen = {(h.entity_type, h.entity_id) for h in primary}
+    merged = list(primary)
+    for hit in extra:
+        if (hit.entity_type, hit.entity_id) not in seen:
+            seen.add((hit.entity_type, hit.entity_id))
+            merged.append(hit)
+    return merged[:limit]
+
+
+def _type_filter_sql(entity_types, params: Dict) -> str:
+    if not entity_types:
+        return ""
+    names = []
+    for i, entity_type in enumerate(entity_types):
+        params[f"et{i}"] = entity_type
+        names.append(f":et{i}")
+    return f" AND s.entity_type IN ({', '.join(names)})"
+
+
+def _sqlite_prefix(tokens, entity_types, limit) -> List[SearchHit]:
+    params = {"match": " ".join(f'"{t}"*' for t in tokens), "limit": limit}
+    sql = (
+        "SELECT s.entity_type, s.entity_id, s.title, bm25(search_index_fts) AS rank "
+        "FROM search_index_fts JOIN search_index s ON s.id = search_index_fts.rowid "
+        "WHERE search_index_fts MATCH :match" + _type_filter_sql(entity_types, params)
+        + " ORDER BY rank LIMIT :limit"
+    )
+    rows = db.session.execute(text(sql), params).all()
+    return [SearchHit(r.entity_type, r.entity_id, r.title, -float(r.rank)) for r in rows]
+
+
+def _sqlite_fuzzy(tokens, entity_types) -> List[SearchHit]:
+    grams = sorted({t[i:i + 3] for t in tokens for i in range(len(t) - 2)})
+    if not grams:
+        return []
+    params = {"match": " OR ".join(f'"{g}"' for g in grams), "limit": FUZZY_CANDIDATES}
+    sql = (
+        "SELECT s.entity_type, s.entity_id, s.title, s.content "
+        "FROM search_index_trgm JOIN search_index s ON s.id = search_index_trgm.rowid "
+        "WHERE search_index_trgm MATCH :match" + _type_filter_sql(entity_types, params)
+        + " ORDER BY bm25(search_index_trgm) LIMIT :limit"
+    )
+    return _rerank(db.session.execute(text(sql), params).all(), tokens)
+
+
+def _rerank(rows, tokens) -> List[SearchHit]:
+    scored = []
+    for r in rows:
+        score = sum(token_similarity(t, r.content) for t in tokens) / len(tokens)
+        if score >= FUZZY_THRESHOLD:
+            scored.append(SearchHit(r.entity_type, r.entity_id, r.title, score))
+    scored.sort(key=lambda h: h.score, reverse=True)
+    return scored
+
+
+def _postgres_prefix(tokens, entity_types, limit) -> List[SearchHit]:
+    s = SearchIndexEntry
+    tsquery = func.to_tsquery("simple", " & ".join(f"{t}:*" for t in tokens))
+    tsvector = func.to_tsvector("simple", s.content)
+    rank = func.ts_rank(tsvector, tsquery)
+    q = db.session.query(s.entity_type, s.entity_id, s.title, rank.label("rank")).filter(tsvector.op("@@")(tsquery))
+    if entity_types:
+        q = q.filter(s.entity_type.in_(entity_types))
+    rows = q.order_by(rank.desc()).limit(limit).all()
+    return [SearchHit(r.entity_type, r.entity_id, r.title, float(r.rank)) for r in rows]
+
+
+def _postgres_fuzzy(normalized_query, entity_types, limit) -> List[SearchHit]:
+    s = SearchIndexEntry
+    score = func.word_similarity(normalized_query, s.content)
+    q = db.session.query(s.entity_type, s.entity_id, s.title, score.label("score")).filter(
+        literal(normalized_query).op("<%")(s.content)
+    )
+    if entity_types:
+        q = q.filter(s.entity_type.in_(entity_types))
+    rows = q.order_by(score.desc()).limit(limit).all()
+    return [SearchHit(r.entity_type, r.entity_id, r.title, float(r.score)) for r in rows]
+
+
+def _like_search(tokens, entity_types, limit) -> List[SearchHit]:
+    s = SearchIndexEntry
+    q = db.session.query(s.entity_type, s.entity_id, s.title)
+    for token in tokens:
+        q = q.filter(s.content.like(f"%{token}%"))
+    if entity_types:
+        q = q.filter(s.entity_type.in_(entity_types))
+    return [SearchHit(r.entity_type, r.entity_id, r.title, 1.0) for r in q.order_by(s.title).limit(limit).all()]
+
+
+# ─── التهيئة ───
+
+@click.command("search-reindex")
+@click.option("--entity", "entities", multiple=True, type=click.Choice(ENTITY_TYPES))
+def search_reindex_command(entities):
+    """إعادة بناء فهرس البحث الموحد."""
+    counts = rebuild_index(entities or None)
+    for entity_type, count in counts.items():
+        click.echo(f"{entity_type}: {count}")
+
+
+@job_handler(REBUILD_JOB)
+def _rebuild_index_job(job):
+    job.update(stage="rebuilding", message="جاري بناء فهرس البحث...")
+    counts = rebuild_index()
+    _state["ready"] = True
+    return counts
+
+
+def _queue_initial_build() -> None:
+    """طلب بناء الفهرس الفارغ مرة واحدة لكل النظام (مفتاح عدم التكرار يجمع طلبات كل العمليات)."""
+    try:
+        enqueue(REBUILD_JOB, idempotency_key=REBUILD_JOB, message="بناء فهرس البحث")
+        logger.info("Search index is empty: initial build queued")
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Search index build not queued (run flask search-reindex): {e}")
+
+
+def init_search(app) -> None:
+    """تهيئة الفهرس: المخطط، أحداث التحديث، أمر CLI، وطلب بناء أولي في الطابور إن كان الفهرس فارغاً."""
+    from modules.search.application.index_events import register_index_listeners
+
+    if "search-reindex" not in app.cli.commands:
+        app.cli.add_command(search_reindex_command)
+    try:
+        ensure_search_schema(db.engine)
+    except Exception as e:
+        logger.warning(f"Search index disabled: {e}")
+        _state["enabled"] = False
+        return
+    if not _state["listeners"]:
+        register_index_listeners()
+        _state["listeners"] = True
+    _state["enabled"] = True
+    with db.engine.connect() as conn:
+        _state["ready"] = conn.execute(select(SearchIndexEntry.__table__.c.id).limit(1)).first() is not None
+    if not _state["ready"]:
+        _queue_initial_build()
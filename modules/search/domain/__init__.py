@@ -0,0 +1,4 @@
+"""Search domain models package"""
+from modules.search.domain.models import SearchIndexEntry
+
+__all__ = ['SearchIndexEntry']
@@ -0,0 +1,28 @@
+"""
+نماذج نطاق البحث — جدول الفهرس الموحد search_index.
+كل صف يمثل كياناً واحداً (موظف، مركبة، مستند) بنصه الموحد.
+الفهارس الخاصة بكل محرك (FTS5 في SQLite، pg_trgm/tsvector في PostgreSQL)
+تُنشأ من modules.search.application.search_service.ensure_search_schema.
+"""
+from datetime import datetime
+from core.extensions import db
+
+
+class SearchIndexEntry(db.Model):
+    """مدخل فهرس البحث لكيان واحد."""
+    __tablename__ = "search_index"
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity_type = db.Column(db.String(30), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.String(255), nullable=False, default="")
+    content = db.Column(db.Text, nullable=False, default="")
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint("entity_type", "entity_id", name="uq_search_index_entity"),
+        db.Index("idx_search_index_type", "entity_type"),
+    )
+
+    def __repr__(self):
+        return f"<SearchIndexEntry {self.entity_type}:{self.entity_id}>"
@@ -0,0 +1,53 @@
+"""
+أحداث تحديث العهدة الحالية — تُبقي vehicle_current_custody متزامناً مع التسليمات وطلبات اعتمادها.
+بعد التحديثات الجماعية التي لا تطلق الأحداث (core.model_events): flask vehicle-custody-rebuild.
+"""
+from sqlalchemy import event, inspect
+
+from core.model_events import columns_changed
+from modules.operations.domain.models import OperationRequest
+from modules.vehicles.application import vehicle_custody_service as svc
+from modules.vehicles.domain.handover_models import VehicleHandover
+
+# الأعمدة التي يؤثر تغييرها على العهدة
+_HANDOVER_COLUMNS = ("vehicle_id", "handover_type", "handover_date", "employee_id", "person_name")
+_REQUEST_COLUMNS = ("operation_type", "related_record_id", "vehicle_id", "status")
+
+
+def _previous_vehicles(target):
+    # نقل السجل لمركبة أخرى يغيّر عهدة المركبتين
+    return inspect(target).attrs["vehicle_id"].history.deleted or []
+
+
+def _handover_saved(mapper, connection, target):
+    svc.refresh_vehicles(connection, [target.vehicle_id])
+
+
+def _handover_updated(mapper, connection, target):
+    if columns_changed(target, _HANDOVER_COLUMNS):
+        svc.refresh_vehicles(connection, [target.vehicle_id, *_previous_vehicles(target)])
+
+
+def _is_handover_request(target) -> bool:
+    state = inspect(target)
+    return target.operation_type == "handover" or "handover" in (state.attrs["operation_type"].history.deleted or [])
+
+
+def _request_saved(mapper, connection, target):
+    if target.operation_type == "handover":
+        svc.refresh_vehicles(connection, [target.vehicle_id])
+
+
+def _request_updated(mapper, connection, target):
+    if _is_handover_request(target) and columns_changed(target, _REQUEST_COLUMNS):
+        svc.refresh_vehicles(connection, [target.vehicle_id, *_previous_vehicles(target)])
+
+
+def register_custody_listeners() -> None:
+    """تسجيل أحداث الإدراج والتحديث والحذف للتسليمات وطلبات العمليات."""
+    event.listen(VehicleHandover, "after_insert", _handover_saved)
+    event.listen(VehicleHandover, "after_update", _handover_updated)
+    event.listen(VehicleHandover, "after_delete", _handover_saved)
+    event.listen(OperationRequest, "after_insert", _request_saved)
+    event.listen(OperationRequest, "after_update", _request_updated)
+    event.listen(OperationRequest, "after_delete", _request_saved)
@@ -0,0 +1,428 @@
+"""
+محرك قياسات الأسطول (vehicle_telemetry_daily).
+- يجمّع سجل المواقع (employee_locations ذات vehicle_id) لكل مركبة بمصفوفات NumPy:
+  مسافة haversine بين النقاط المتتالية، زمن القيادة والتوقف، وحالات تجاوز حد السرعة، لكل يوم.
+- تجميع تدريجي: آخر نقطة معالجة تُحفظ في صف اليوم ويبدأ التشغيل التالي بعدها؛
+  يُشغَّل قبل حذف المواقع القديمة (core.scheduler) حتى لا تضيع نقاط قبل تجميعها.
+- تسوية الوقود: فرق العداد بين تعبئتين ÷ لترات التعبئة = كم/لتر، ومقارنته بمسافة GPS للفترة نفسها؛
+  المعدل خارج النطاق أو الفرق الكبير أو رجوع العداد يُعلَّم شذوذاً.
+- اللوحات وتصدير Power BI تقرأ الصفوف اليومية المجمعة بدل النقاط الخام.
+- التجميع والتسوية يعملان تحت قفل على مستوى قاعدة البيانات، فتشغيلهما من عدة عمليات
+  (المجدول يعمل في كل عامل) يُنفَّذ بالتتابع ولا تُحسب النقاط مرتين.
+"""
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import click
+import numpy as np
+from flask import current_app, has_app_context
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, func, insert, or_, select, text, tuple_, update
+
+from core.extensions import db
+from modules.vehicles.domain.telemetry_models import (
+    ANOMALY_GPS_MISMATCH,
+    ANOMALY_HIGH_KMPL,
+    ANOMALY_LOW_KMPL,
+    ANOMALY_ODOMETER_ROLLBACK,
+    VehicleTelemetryDaily,
+)
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+MAX_PLAUSIBLE_SPEED_KMH = 250.0  # قفزات GPS أسرع من هذا تُهمل
+VEHICLE_BATCH = 200
+RECONCILE_DAYS = 60
+FUEL_LOOKBACK_DAYS = 120
+TELEMETRY_LOCK_NAME = "fleet_telemetry"
+TELEMETRY_LOCK_KEY = 0x666C6565  # مفتاح pg_advisory_xact_lock
+TELEMETRY_LOCK_TIMEOUT = 600
+
+_TRACK_FIELDS = ("distance_km", "driving_seconds", "idle_seconds", "speeding_events", "points")
+_EMPTY_TRACK = dict(distance_km=0.0, driving_seconds=0, idle_seconds=0, speeding_events=0, max_speed_kmh=0.0,
+                    points=0, first_point_at=None, last_point_at=None, last_latitude=None, last_longitude=None,
+                    last_speed_kmh=None)
+_EMPTY_FUEL = dict(fuel_liters=0.0, fuel_cost=0.0, odometer_km=None, odometer_delta_km=None,
+                   gps_interval_km=None, km_per_liter=None, anomaly=None)
+
+
+@dataclass
+class TelemetryThresholds:
+    speed_limit_kmh: float = 120.0
+    idle_speed_kmh: float = 5.0
+    max_gap_seconds: float = 600.0
+    min_km_per_liter: float = 4.0
+    max_km_per_liter: float = 25.0
+    gps_tolerance: float = 0.25
+
+    @classmethod
+    def from_config(cls) -> "TelemetryThresholds":
+        if not has_app_context():
+            return cls()
+        config = current_app.config
+        return cls(
+            speed_limit_kmh=float(config.get("TELEMETRY_SPEED_LIMIT_KMH", cls.speed_limit_kmh)),
+            idle_speed_kmh=float(config.get("TELEMETRY_IDLE_SPEED_KMH", cls.idle_speed_kmh)),
+            max_gap_seconds=float(config.get("TELEMETRY_MAX_GAP_SECONDS", cls.max_gap_seconds)),
+            min_km_per_liter=float(config.get("TELEMETRY_MIN_KM_PER_LITER", cls.min_km_per_liter)),
+            max_km_per_liter=float(config.get("TELEMETRY_MAX_KM_PER_LITER", cls.max_km_per_liter)),
+            gps_tolerance=float(config.get("TELEMETRY_GPS_TOLERANCE", cls.gps_tolerance)),
+        )
+
+
+# ==================== الحساب ====================
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """المسافة بالكيلومتر بين مصفوفتي نقاط (درجات)."""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float)) for a in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def summarize_track(times: Sequence[datetime], lats, lons, speeds, carry: Optional[tuple] = None,
+                    thresholds: Optional[TelemetryThresholds] = None) -> Dict[date, Dict[str, Any]]:
+    """
+    تجميع مسار مركبة واحدة مرتب زمنياً إلى {يوم: إحصائيات}.
+    carry = (recorded_at, lat, lon, speed) آخر نقطة من التشغيل السابق: تُحسب المسافة منها ولا تُعد نقطة.
+    المقطع بين نقطتين يُنسب ليوم نقطة نهايته؛ المقاطع بعد انقطاع أطول من max_gap تُحسب مسافتها دون زمنها.
+    """
+    th = thresholds or TelemetryThresholds()
+    offset = 1 if carry else 0
+    if carry:
+        times, lats, lons, speeds = [carry[0], *times], [carry[1], *lats], [carry[2], *lons], [carry[3], *speeds]
+    n = len(times)
+    if n - offset <= 0:
+        return {}
+    t = np.array(times, dtype="datetime64[s]")
+    lat = np.array(lats, dtype=float)
+    lon = np.array(lons, dtype=float)
+    reported = np.array([np.nan if s is None else s for s in speeds], dtype=float)
+
+    dt = np.diff(t).astype("timedelta64[s]").astype(float)
+    seg_km = haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        implied = np.where(dt > 0, seg_km / (dt / 3600.0), 0.0)
+    valid = (dt > 0) & (implied <= MAX_PLAUSIBLE_SPEED_KMH)
+    timed = valid & (dt <= th.max_gap_seconds)
+
+    # سرعة كل نقطة: المُبلغ عنها من الجهاز، وإلا السرعة الضمنية للمقطع المنتهي عندها
+    point_speed = reported.copy()
+    fallback = np.concatenate(([0.0], np.where(valid, implied, 0.0)))
+    point_speed[np.isnan(point_speed)] = fallback[np.isnan(point_speed)]
+    moving = point_speed[1:] >= th.idle_speed_kmh
+    over = point_speed > th.speed_limit_kmh
+    starts = over & ~np.concatenate(([False], over[:-1]))
+
+    days = t.astype("datetime64[D]")
+    uniq, inverse = np.unique(days[offset:], return_inverse=True)
+    seg_bins = inverse[1 - offset:]  # المقطع j ينتهي عند النقطة j + 1
+    size = len(uniq)
+
+    def _sum(weights, bins):
+        return np.bincount(bins, weights=weights, minlength=size)
+
+    distance = _sum(np.where(valid, seg_km, 0.0), seg_bins)
+    driving = _sum(np.where(timed & moving, dt, 0.0), seg_bins)
+    idle = _sum(np.where(timed & ~moving, dt, 0.0), seg_bins)
+    events = _sum(starts[offset:].astype(float), inverse)
+    points = np.bincount(inverse, minlength=size)
+    max_speed = np.zeros(size)
+    np.maximum.at(max_speed, inverse, np.where(point_speed[offset:] <= MAX_PLAUSIBLE_SPEED_KMH,
+                                                point_speed[offset:], 0.0))
+
+    result = {}
+    own_times = times[offset:]
+    for k, day in enumerate(uniq.astype(object)):
+        idx = np.flatnonzero(inverse == k)
+        first, last = idx[0], idx[-1] + offset
+        result[day] = {
+            "distance_km": float(distance[k]),
+            "driving_seconds": int(round(driving[k])),
+            "idle_seconds": int(round(idle[k])),
+            "speeding_events": int(events[k]),
+            "max_speed_kmh": float(max_speed[k]),
+            "points": int(points[k]),
+            "first_point_at": own_times[first],
+            "last_point_at": times[last],
+            "last_latitude": float(lat[last]),
+            "last_longitude": float(lon[last]),
+            "last_speed_kmh": None if np.isnan(reported[last]) else float(reported[last]),
+        }
+    return result
+
+
+def _merge(existing: Optional[Dict[str, Any]], new: Dict[str, Any]) -> Dict[str, Any]:
+    if not existing:
+        return {**_EMPTY_FUEL, **new}
+    merged = dict(existing)
+    for field in _TRACK_FIELDS:
+        merged[field] = (existing.get(field) or 0) + new[field]
+    merged["max_speed_kmh"] = max(existing.get("max_speed_kmh") or 0.0, new["max_speed_kmh"])
+    merged["first_point_at"] = min(filter(None, (existing.get("first_point_at"), new["first_point_at"])))
+    for field in ("last_point_at", "last_latitude", "last_longitude", "last_speed_kmh"):
+        merged[field] = new[field]
+    return merged
+
+
+# ==================== التجميع التدريجي ====================
+
+@contextmanager
+def _telemetry_lock(conn):
+    """
+    قفل حصري لكتابة القياسات طوال المعاملة: pg_advisory_xact_lock في PostgreSQL و GET_LOCK في MySQL.
+    يُؤخذ قبل أول قراءة، فالعملية التالية تقرأ العلامات والصفوف بعد التزام السابقة.
+    SQLite يسمح بكاتب واحد على الملف أصلاً.
+    """
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": TELEMETRY_LOCK_KEY})
+        yield
+        return
+    if dialect not in ("mysql", "mariadb"):
+        yield
+        return
+    acquired = conn.execute(text("SELECT GET_LOCK(:name, :timeout)"),
+                            {"name": TELEMETRY_LOCK_NAME, "timeout": TELEMETRY_LOCK_TIMEOUT}).scalar()
+    if acquired != 1:
+        raise RuntimeError("Fleet telemetry is locked by another process")
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": TELEMETRY_LOCK_NAME})
+
+
+def _latest_marks(vehicle_ids: Sequence[int]):
+    """استعلام فرعي: (vehicle_id, last_point_at) لآخر نقطة معالجة لكل مركبة."""
+    t = VehicleTelemetryDaily.__table__
+    return (
+        select(t.c.vehicle_id, func.max(t.c.last_point_at).label("last_point_at"))
+        .where(t.c.vehicle_id.in_(vehicle_ids), t.c.last_point_at.isnot(None))
+        .group_by(t.c.vehicle_id)
+        .subquery()
+    )
+
+
+def _watermarks(conn, vehicle_ids: Sequence[int]) -> Dict[int, tuple]:
+    """آخر نقطة معالجة لكل مركبة: (recorded_at, lat, lon, speed)."""
+    t = VehicleTelemetryDaily.__table__
+    latest = _latest_marks(vehicle_ids)
+    rows = conn.execute(
+        select(t.c.vehicle_id, t.c.last_point_at, t.c.last_latitude, t.c.last_longitude, t.c.last_speed_kmh)
+        .join(latest, and_(latest.c.vehicle_id == t.c.vehicle_id, latest.c.last_point_at == t.c.last_point_at))
+    )
+    return {row.vehicle_id: (row.last_point_at, row.last_latitude, row.last_longitude, row.last_speed_kmh)
+            for row in rows}
+
+
+def _rollup_batch(conn, vehicle_ids: Sequence[int], th: TelemetryThresholds) -> int:
+    from models import EmployeeLocation
+
+    loc = EmployeeLocation.__table__
+    marks = _watermarks(conn, vehicle_ids)
+    latest = _latest_marks(vehicle_ids)
+    tracks: Dict[int, List[tuple]] = defaultdict(list)
+    # النقاط بعد آخر نقطة معالجة فقط، مصفاة في قاعدة البيانات
+    for row in conn.execute(
+        select(loc.c.vehicle_id, loc.c.recorded_at, loc.c.latitude, loc.c.longitude, loc.c.speed_kmh)
+        .outerjoin(latest, latest.c.vehicle_id == loc.c.vehicle_id)
+        .where(loc.c.vehicle_id.in_(vehicle_ids),
+               or_(latest.c.last_point_at.is_(None), loc.c.recorded_at > latest.c.last_point_at))
+        .order_by(loc.c.vehicle_id, loc.c.recorded_at, loc.c.id)
+    ):
+        tracks[row.vehicle_id].append(row)
+
+    summaries = {}
+    for vehicle_id, rows in tracks.items():
+        times, lats, lons, speeds = zip(*[(r.recorded_at, float(r.latitude), float(r.longitude),
+                                           None if r.speed_kmh is None else float(r.speed_kmh)) for r in rows])
+        for day, stats in summarize_track(times, lats, lons, speeds, marks.get(vehicle_id), th).items():
+            summaries[(vehicle_id, day)] = stats
+    if not summaries:
+        return 0
+
+    t = VehicleTelemetryDaily.__table__
+    keys = list(summaries)
+    existing = {(r.vehicle_id, r.day): dict(r._mapping)
+                for r in conn.execute(select(t).where(tuple_(t.c.vehicle_id, t.c.day).in_(keys)))}
+    now = datetime.utcnow()
+    rows = []
+    for key in keys:
+        row = _merge(existing.get(key), summaries[key])
+        row.update(vehicle_id=key[0], day=key[1], updated_at=now)
+        rows.append(row)
+    conn.execute(delete(t).where(tuple_(t.c.vehicle_id, t.c.day).in_(keys)))
+    conn.execute(insert(t), rows)
+    return len(rows)
+
+
+def rollup_locations(vehicle_ids: Optional[Sequence[int]] = None) -> int:
+    """تجميع نقاط المواقع الجديدة (بعد آخر نقطة معالجة) لكل المركبات أو لمركبات محددة."""
+    from models import EmployeeLocation
+
+    th = TelemetryThresholds.from_config()
+    loc = EmployeeLocation.__table__
+    stmt = select(loc.c.vehicle_id).where(loc.c.vehicle_id.isnot(None)).distinct()
+    if vehicle_ids is not None:
+        stmt = stmt.where(loc.c.vehicle_id.in_(vehicle_ids))
+    written = 0
+    with db.engine.begin() as conn, _telemetry_lock(conn):
+        ids = sorted(r[0] for r in conn.execute(stmt))
+        for start in range(0, len(ids), VEHICLE_BATCH):
+            written += _rollup_batch(conn, ids[start:start + VEHICLE_BATCH], th)
+    logger.info(f"Fleet telemetry rolled up: {written} vehicle-days from {len(ids)} vehicles")
+    return written
+
+
+# ==================== تسوية الوقود ====================
+
+def _fuel_by_day(conn, start: date, end: date, vehicle_ids: Optional[Sequence[int]]):
+    from models import VehicleFuelConsumption
+
+    f = VehicleFuelConsumption.__table__
+    stmt = (
+        select(f.c.vehicle_id, f.c.date, func.sum(f.c.liters), func.sum(f.c.cost), func.max(f.c.kilometer_reading))
+        .where(f.c.date >= start - timedelta(days=FUEL_LOOKBACK_DAYS), f.c.date <= end)
+        .group_by(f.c.vehicle_id, f.c.date)
+        .order_by(f.c.vehicle_id, f.c.date)
+    )
+    if vehicle_ids is not None:
+        stmt = stmt.where(f.c.vehicle_id.in_(vehicle_ids))
+    fills = defaultdict(list)
+    for vehicle_id, day, liters, cost, odometer in conn.execute(stmt):
+        fills[vehicle_id].append((day, float(liters or 0), float(cost or 0), odometer))
+    return fills
+
+
+def _gps_distance_index(conn, vehicle_id: int, start: date, end: date):
+    """(أيام مرتبة كأرقام ترتيبية، مجموع تراكمي للمسافة) لحساب مسافة أي فترة بعملية طرح."""
+    t = VehicleTelemetryDaily.__table__
+    rows = conn.execute(
+        select(t.c.day, t.c.distance_km).where(t.c.vehicle_id == vehicle_id, t.c.day >= start, t.c.day <= end)
+        .order_by(t.c.day)
+    ).all()
+    days = np.array([r.day.toordinal() for r in rows], dtype=np.int64)
+    return days, np.concatenate(([0.0], np.cumsum([r.distance_km or 0.0 for r in rows])))
+
+
+def classify_fuel(delta_km: Optional[int], liters: float, gps_km: Optional[float],
+                  th: TelemetryThresholds) -> tuple:
+    """(كم/لتر، سبب الشذوذ أو None) لتعبئة واحدة."""
+    if delta_km is None:
+        return None, None
+    if delta_km < 0:
+        return None, ANOMALY_ODOMETER_ROLLBACK
+    kmpl = round(delta_km / liters, 2) if liters > 0 else None
+    if kmpl is not None and kmpl < th.min_km_per_liter:
+        return kmpl, ANOMALY_LOW_KMPL
+    if kmpl is not None and kmpl > th.max_km_per_liter:
+        return kmpl, ANOMALY_HIGH_KMPL
+    if gps_km and delta_km > 0 and abs(gps_km - delta_km) / delta_km > th.gps_tolerance:
+        return kmpl, ANOMALY_GPS_MISMATCH
+    return kmpl, None
+
+
+def reconcile_fuel(start: date, end: date, vehicle_ids: Optional[Sequence[int]] = None) -> int:
+    """إعادة كتابة أعمدة الوقود في الصفوف اليومية للفترة من سجلات التعبئة."""
+    th = TelemetryThresholds.from_config()
+    t = VehicleTelemetryDaily.__table__
+    written = 0
+    with db.engine.begin() as conn, _telemetry_lock(conn):
+        reset = update(t).where(t.c.day >= start, t.c.day <= end).values(**_EMPTY_FUEL)
+        if vehicle_ids is not None:
+            reset = reset.where(t.c.vehicle_id.in_(vehicle_ids))
+        conn.execute(reset)
+        for vehicle_id, fills in _fuel_by_day(conn, start, end, vehicle_ids).items():
+            days, cumulative = _gps_distance_index(conn, vehicle_id, fills[0][0], end)
+            previous = None  # (day, odometer) لآخر تعبئة بقراءة عداد
+            for day, liters, cost, odometer in fills:
+                values = dict(fuel_liters=liters, fuel_cost=cost, odometer_km=odometer)
+                if odometer is not None and previous is not None:
+                    delta = odometer - previous[1]
+                    lo, hi = np.searchsorted(days, [previous[0].toordinal(), day.toordinal()], side="right")
+                    gps_km = round(float(cumulative[hi] - cumulative[lo]), 2) if hi > lo else None
+                    kmpl, anomaly = classify_fuel(delta, liters, gps_km, th)
+                    values.update(odometer_delta_km=delta, gps_interval_km=gps_km, km_per_liter=kmpl,
+                                  anomaly=anomaly)
+                if odometer is not None:
+                    previous = (day, odometer)
+                if day < start:
+                    continue
+                result = conn.execute(update(t).where(t.c.vehicle_id == vehicle_id, t.c.day == day).values(**values))
+                if not result.rowcount:
+                    conn.execute(insert(t).values(vehicle_id=vehicle_id, day=day, updated_at=datetime.utcnow(),
+                                                  **{**_EMPTY_TRACK, **_EMPTY_FUEL, **values}))
+                written += 1
+    logger.info(f"Fleet fuel reconciled: {written} fill-days between {start} and {end}")
+    return written
+
+
+def refresh_telemetry(today: Optional[date] = None, reconcile_days: int = RECONCILE_DAYS) -> Dict[str, int]:
+    """المهمة الليلية: تجميع النقاط الجديدة ثم تسوية الوقود لآخر reconcile_days يوماً."""
+    today = today or date.today()
+    return {
+        "rolled_up": rollup_locations(),
+        "reconciled": reconcile_fuel(today - timedelta(days=reconcile_days), today),
+    }
+
+
+# ==================== القراءة ====================
+
+def get_daily(vehicle_id: int, start: date, end: date) -> List[VehicleTelemetryDaily]:
+    return VehicleTelemetryDaily.query.filter(
+        VehicleTelemetryDaily.vehicle_id == vehicle_id,
+        VehicleTelemetryDaily.day >= start,
+        VehicleTelemetryDaily.day <= end,
+    ).order_by(VehicleTelemetryDaily.day).all()
+
+
+def get_fleet_summary(start: date, end: date) -> List[Dict[str, Any]]:
+    """إجمالي كل مركبة في الفترة باستعلام تجميع واحد، الأكثر مسافة أولاً."""
+    t = VehicleTelemetryDaily
+    distance = func.sum(t.distance_km)
+    liters = func.sum(t.fuel_liters)
+    rows = db.session.query(
+        t.vehicle_id, distance, func.sum(t.driving_seconds), func.sum(t.idle_seconds),
+        func.sum(t.speeding_events), func.max(t.max_speed_kmh), liters, func.sum(t.fuel_cost),
+        func.count(t.anomaly),
+    ).filter(t.day >= start, t.day <= end).group_by(t.vehicle_id).order_by(distance.desc()).all()
+    return [{
+        "vehicle_id": vehicle_id,
+        "distance_km": round(km or 0.0, 1),
+        "driving_hours": round((driving or 0) / 3600, 1),
+        "idle_hours": round((idle or 0) / 3600, 1),
+        "speeding_events": int(events or 0),
+        "max_speed_kmh": round(top or 0.0, 1),
+        "fuel_liters": round(fuel or 0.0, 1),
+        "fuel_cost": round(cost or 0.0, 2),
+        "km_per_liter": round(km / fuel, 2) if km and fuel else None,
+        "anomalies": int(anomalies or 0),
+    } for vehicle_id, km, driving, idle, events, top, fuel, cost, anomalies in rows]
+
+
+def get_anomalies(start: date, end: date, limit: int = 100) -> List[VehicleTelemetryDaily]:
+    return VehicleTelemetryDaily.query.filter(
+        VehicleTelemetryDaily.anomaly.isnot(None),
+        VehicleTelemetryDaily.day >= start,
+        VehicleTelemetryDaily.day <= end,
+    ).order_by(VehicleTelemetryDaily.day.desc()).limit(limit).all()
+
+
+# ==================== التهيئة ====================
+
+@click.command("fleet-telemetry-refresh")
+@click.option("--reconcile-days", default=RECONCILE_DAYS, show_default=True, type=int)
+@with_appcontext
+def fleet_telemetry_refresh_command(reconcile_days):
+    """تجميع نقاط المواقع الجديدة لكل مركبة وتسوية الوقود للأيام الأخيرة."""
+    result = refresh_telemetry(reconcile_days=reconcile_days)
+    click.echo(f"Fleet telemetry: {result['rolled_up']} vehicle-days, {result['reconciled']} fill-days")
+
+
+def init_fleet_telemetry(app) -> None:
+    if "fleet-telemetry-refresh" not in app.cli.commands:
+        app.cli.add_command(fleet_telemetry_refresh_command)
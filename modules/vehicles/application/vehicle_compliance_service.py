@@ -0,0 +1,193 @@
+"""
+خدمة امتثال المركبات — أعمدة محسوبة مسبقاً (next_expiry_date, expired_docs_mask).
+- تُحدَّث عند كل حفظ للمركبة (حدث before_insert/before_update في النموذج).
+- تُحدَّث ليلياً عبر طابور المهام (REFRESH_JOB) لأن مرور الوقت يحوّل الوثائق إلى منتهية دون أي كتابة؛
+  صفحات العرض لا تكتب شيئاً.
+- توفر تجميعات الإحصائيات بقراءة واحدة مفهرسة بدل المرور على كل المركبات.
+"""
+import logging
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import bindparam, case, func, select, update
+
+from core.extensions import db
+from modules.jobs.application.job_queue import enqueue, job_handler
+from modules.vehicles.domain.models import COMPLIANCE_DOCUMENTS, Vehicle, compute_compliance
+from shared.utils.keyset import KeysetPage, paginate_keyset
+
+logger = logging.getLogger(__name__)
+
+REFRESH_BATCH_SIZE = 1000
+EXPIRING_WINDOW_DAYS = 30
+EXPIRED_PAGE_SIZE = 50
+REFRESH_JOB = "vehicles.compliance_refresh"
+
+DOC_BITS = {doc_type: bit for _, bit, doc_type, _ in COMPLIANCE_DOCUMENTS}
+
+
+def expired_doc_filter(doc_type: str):
+    """شرط "الوثيقة منتهية" اعتماداً على القناع المحسوب."""
+    return Vehicle.expired_docs_mask.op("&")(DOC_BITS[doc_type]) != 0
+
+
+def _compliance_update():
+    t = Vehicle.__table__
+    return (
+        update(t)
+        .where(t.c.id == bindparam("_id"))
+        .values(
+            next_expiry_date=bindparam("_next"),
+            expired_docs_mask=bindparam("_mask"),
+            compliance_checked_on=bindparam("_checked"),
+        )
+    )
+
+
+def _document_columns():
+    t = Vehicle.__table__
+    return [t.c[field] for field, _, _, _ in COMPLIANCE_DOCUMENTS]
+
+
+def refresh_all_compliance(today: Optional[date] = None) -> int:
+    """
+    إعادة حساب الامتثال لكل المركبات على دفعات (المهمة الليلية).
+    لا تُكتب إلا الصفوف التي تغيّرت قيمها. يعيد عدد الصفوف المحدَّثة.
+    """
+    today = today or date.today()
+    t = Vehicle.__table__
+    stmt = _compliance_update()
+    changed = 0
+    with db.engine.begin() as conn:
+        result = conn.execute(
+            select(t.c.id, t.c.next_expiry_date, t.c.expired_docs_mask, *_document_columns())
+            .execution_options(yield_per=REFRESH_BATCH_SIZE)
+        )
+        for batch in result.partitions(REFRESH_BATCH_SIZE):
+            params = []
+            for row in batch:
+                next_expiry, mask = compute_compliance(row[3:], today)
+                if next_expiry != row.next_expiry_date or mask != (row.expired_docs_mask or 0):
+                    params.append({"_id": row.id, "_next": next_expiry, "_mask": mask, "_checked": today})
+            if params:
+                conn.execute(stmt, params)
+                changed += len(params)
+    logger.info(f"Vehicle compliance refreshed: {changed} vehicles changed")
+    return changed
+
+
+def refresh_compliance_rows(connection, ids: List[int], today: Optional[date] = None) -> int:
+    """
+    إعادة حساب الامتثال لمركبات محددة على اتصال المعاملة الجارية؛
+    للإدراج والتحديث الجماعي الذي لا يطلق حدث before_insert/before_update في النموذج.
+    """
+    today = today or date.today()
+    t = Vehicle.__table__
+    stmt = _compliance_update()
+    refreshed = 0
+    for start in range(0, len(ids), REFRESH_BATCH_SIZE):
+        rows = connection.execute(
+            select(t.c.id, *_document_columns()).where(t.c.id.in_(ids[start:start + REFRESH_BATCH_SIZE]))
+        ).all()
+        params = []
+        for row in rows:
+            next_expiry, mask = compute_compliance(row[1:], today)
+            params.append({"_id": row.id, "_next": next_expiry, "_mask": mask, "_checked": today})
+        if params:
+            connection.execute(stmt, params)
+            refreshed += len(params)
+    return refreshed
+
+
+@job_handler(REFRESH_JOB)
+def _refresh_compliance_job(job, day: Optional[str] = None):
+    job.update(stage="refreshing", message="جاري تحديث امتثال المركبات...")
+    return {"changed": refresh_all_compliance(date.fromisoformat(day) if day else None)}
+
+
+def queue_compliance_refresh(today: Optional[date] = None):
+    """طلب تحديث الامتثال في الطابور؛ مفتاح اليوم يجمع طلبات كل العمليات في مهمة واحدة."""
+    today = today or date.today()
+    return enqueue(REFRESH_JOB, {"day": today.isoformat()}, idempotency_key=f"{REFRESH_JOB}:{today.isoformat()}",
+                   message="تحديث امتثال المركبات")
+
+
+def get_expired_vehicles(doc_type: str, after: Optional[str] = None,
+                         limit: int = EXPIRED_PAGE_SIZE) -> KeysetPage:
+    """المركبات المنتهية وثيقتها doc_type، صفحة بترقيم المفتاح على (plate_number, id)."""
+    return paginate_keyset(
+        Vehicle.query.filter(expired_doc_filter(doc_type)),
+        (Vehicle.plate_number, Vehicle.id),
+        lambda v: (v.plate_number, v.id),
+        limit=limit,
+        after=after,
+    )
+
+
+def get_status_counts(query=None) -> Dict[str, int]:
+    """عدد المركبات لكل حالة باستعلام GROUP BY واحد (على استعلام مفلتر اختيارياً)."""
+    if query is None:
+        rows = db.session.query(Vehicle.status, func.count(Vehicle.id)).group_by(Vehicle.status).all()
+    else:
+        sub = query.with_entities(Vehicle.id, Vehicle.status).order_by(None).subquery()
+        rows = db.session.query(sub.c.status, func.count(sub.c.id)).group_by(sub.c.status).all()
+    return {status: count for status, count in rows}
+
+
+def get_compliance_counts(today: Optional[date] = None, days: int = EXPIRING_WINDOW_DAYS) -> Dict[str, int]:
+    """
+    عدادات الوثائق المنتهية والقريبة من الانتهاء لكل نوع.
+    استعلامان تجميعيان على الفهرسين (expired_docs_mask > 0) و(next_expiry_date ضمن المدة)
+    فلا يُقرأ إلا المركبات غير الممتثلة.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=days)
+    expired_columns = [
+        func.sum(case((Vehicle.expired_docs_mask.op("&")(bit) != 0, 1), else_=0)).label(doc_type)
+        for _, bit, doc_type, _ in COMPLIANCE_DOCUMENTS
+    ]
+    expiring_columns = [
+        func.sum(case((getattr(Vehicle, field).between(today, horizon), 1), else_=0)).label(doc_type)
+        for field, _, doc_type, _ in COMPLIANCE_DOCUMENTS
+    ]
+    expired = db.session.query(*expired_columns).filter(Vehicle.expired_docs_mask > 0).one()
+    expiring = db.session.query(*expiring_columns).filter(Vehicle.next_expiry_date.between(today, horizon)).one()
+    counts: Dict[str, int] = {}
+    for doc_type in DOC_BITS:
+        counts[f"expired_{doc_type}"] = int(expired._mapping[doc_type] or 0)
+        counts[f"expiring_{doc_type}"] = int(expiring._mapping[doc_type] or 0)
+    counts["expired_total"] = sum(counts[f"expired_{t}"] for t in DOC_BITS)
+    counts["expiring_total"] = sum(counts[f"expiring_{t}"] for t in DOC_BITS)
+    tracked = db.session.query(
+        *[func.count(getattr(Vehicle, field)) for field, _, _, _ in COMPLIANCE_DOCUMENTS]
+    ).one()
+    counts["valid_total"] = max(sum(tracked) - counts["expired_total"] - counts["expiring_total"], 0)
+    return counts
+
+
+def get_expiring_documents(today: Optional[date] = None, days: int = EXPIRING_WINDOW_DAYS,
+                           limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    الوثائق التي تنتهي خلال المدة المحددة. قراءة نطاق مفهرسة على next_expiry_date:
+    المركبة لها وثيقة قريبة الانتهاء إذا وفقط إذا وقع أقرب تاريخ انتهاء قادم ضمن المدة.
+    """
+    today = today or date.today()
+    horizon = today + timedelta(days=days)
+    query = Vehicle.query.filter(Vehicle.next_expiry_date.between(today, horizon)).order_by(Vehicle.next_expiry_date)
+    if limit:
+        query = query.limit(limit)
+    documents = []
+    for v in query.all():
+        for field, _, doc_type, doc_name in COMPLIANCE_DOCUMENTS:
+            d = getattr(v, field, None)
+            if d and today <= d <= horizon:
+                documents.append({
+                    "vehicle_id": v.id,
+                    "plate_number": v.plate_number,
+                    "document_type": doc_type,
+                    "document_name": doc_name,
+                    "expiry_date": d,
+                    "days_remaining": (d - today).days,
+                })
+    documents.sort(key=lambda x: x["days_remaining"])
+    return documents
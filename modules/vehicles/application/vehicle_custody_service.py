@@ -0,0 +1,191 @@
+"""
+خدمة العهدة الحالية للمركبات (vehicle_current_custody).
+- السائق الحالي = آخر تسليم رسمي لكل مركبة: نوع تسليم، ومعتمد أو قديم بلا طلب عملية،
+  بالترتيب handover_date ثم id تنازلياً (نفس قاعدة get_vehicle_current_employee_id_approved).
+- تحديث داخل المعاملة: أحداث حفظ التسليم وطلبات اعتماده تعيد حساب صف المركبة المعنية فقط (custody_events).
+- القراءات (قائمة المركبات، فحوصات السلامة، بوابة الموظف) صارت ربطاً واحداً مفهرساً بدل
+  استعلام "آخر تسليم لكل مركبة" يبنيه كل مسار بطريقته.
+- flask vehicle-custody-rebuild لإعادة البناء بعد تحديثات جماعية.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import and_, delete, exists, func, insert, or_, select
+
+from core.extensions import db
+from modules.jobs.application.job_queue import enqueue, job_handler
+from modules.operations.domain.models import OperationRequest
+from modules.vehicles.domain.custody_models import DELIVERY_HANDOVER_TYPES, VehicleCurrentCustody
+from modules.vehicles.domain.handover_models import VehicleHandover
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+REBUILD_JOB = "vehicles.custody_rebuild"
+REBUILD_KEY = "vehicle-custody:rebuild"
+
+_state = {"listeners": False}
+
+
+# ==================== الحساب ====================
+
+def _official_deliveries_select(vehicle_ids: Optional[Sequence[int]]):
+    """آخر تسليم رسمي لكل مركبة: (vehicle_id, handover_id, employee_id, person_name, since)."""
+    h = VehicleHandover.__table__
+    o = OperationRequest.__table__
+    handover_request = and_(
+        o.c.operation_type == "handover",
+        o.c.related_record_id == h.c.id,
+        o.c.vehicle_id == h.c.vehicle_id,
+    )
+    ranked = (
+        select(
+            h.c.vehicle_id,
+            h.c.id.label("handover_id"),
+            h.c.employee_id,
+            h.c.person_name,
+            h.c.handover_date.label("since"),
+            func.row_number().over(
+                partition_by=h.c.vehicle_id,
+                order_by=(h.c.handover_date.desc(), h.c.id.desc()),
+            ).label("rank"),
+        )
+        .where(
+            h.c.handover_type.in_(DELIVERY_HANDOVER_TYPES),
+            or_(
+                ~exists().where(handover_request),
+                exists().where(handover_request, o.c.status == "approved"),
+            ),
+        )
+    )
+    if vehicle_ids is not None:
+        ranked = ranked.where(h.c.vehicle_id.in_(vehicle_ids))
+    ranked = ranked.subquery()
+    return select(
+        ranked.c.vehicle_id, ranked.c.handover_id, ranked.c.employee_id, ranked.c.person_name, ranked.c.since,
+    ).where(ranked.c.rank == 1)
+
+
+def _write(connection, vehicle_ids: Optional[Sequence[int]]) -> int:
+    rows = [dict(r._mapping) for r in connection.execute(_official_deliveries_select(vehicle_ids))]
+    if rows:
+        connection.execute(insert(VehicleCurrentCustody.__table__), rows)
+    return len(rows)
+
+
+def refresh_vehicles(connection, vehicle_ids: Iterable[int]) -> int:
+    """إعادة حساب عهدة مركبات محددة على اتصال قائم (داخل flush أو معاملة)."""
+    ids = sorted({i for i in vehicle_ids if i is not None})
+    written = 0
+    for start in range(0, len(ids), BATCH_SIZE):
+        chunk = ids[start:start + BATCH_SIZE]
+        connection.execute(
+            delete(VehicleCurrentCustody.__table__).where(VehicleCurrentCustody.__table__.c.vehicle_id.in_(chunk))
+        )
+        written += _write(connection, chunk)
+    return written
+
+
+def rebuild_custody() -> int:
+    """إعادة بناء جدول العهدة كاملاً (التهيئة الأولى أو بعد تحديثات جماعية)."""
+    with db.engine.begin() as conn:
+        conn.execute(delete(VehicleCurrentCustody.__table__))
+        return _write(conn, None)
+
+
+# ==================== القراءة ====================
+
+def get_current_custody(vehicle_id: int) -> Optional[VehicleCurrentCustody]:
+    return db.session.get(VehicleCurrentCustody, vehicle_id)
+
+
+def get_current_employee_id(vehicle_id: int) -> Optional[int]:
+    """معرف الموظف الحالي لمركبة (None لمستلم يدوي بلا موظف أو مركبة بلا عهدة)."""
+    return db.session.query(VehicleCurrentCustody.employee_id).filter(
+        VehicleCurrentCustody.vehicle_id == vehicle_id
+    ).scalar()
+
+
+def get_current_employee_ids(vehicle_ids: Sequence[int]) -> Dict[int, int]:
+    """{vehicle_id: employee_id} لعدة مركبات باستعلام مفهرس واحد."""
+    if not vehicle_ids:
+        return {}
+    rows = db.session.query(VehicleCurrentCustody.vehicle_id, VehicleCurrentCustody.employee_id).filter(
+        VehicleCurrentCustody.vehicle_id.in_(vehicle_ids),
+        VehicleCurrentCustody.employee_id.isnot(None),
+    )
+    return {vehicle_id: employee_id for vehicle_id, employee_id in rows}
+
+
+def get_current_drivers(vehicle_ids: Optional[Sequence[int]] = None) -> Dict[int, Optional[str]]:
+    """{vehicle_id: اسم المستلم} لكل المركبات أو لمجموعة محددة."""
+    query = db.session.query(VehicleCurrentCustody.vehicle_id, VehicleCurrentCustody.person_name)
+    if vehicle_ids is not None:
+        query = query.filter(VehicleCurrentCustody.vehicle_id.in_(vehicle_ids))
+    return {vehicle_id: name for vehicle_id, name in query}
+
+
+def get_current_driver_employees() -> List[Any]:
+    """[(vehicle_id, person_name, Employee أو None)] لكل المركبات في العهدة — ربط خارجي واحد."""
+    from models import Employee
+
+    return (
+        db.session.query(VehicleCurrentCustody.vehicle_id, VehicleCurrentCustody.person_name, Employee)
+        .outerjoin(Employee, Employee.id == VehicleCurrentCustody.employee_id)
+        .all()
+    )
+
+
+def vehicles_in_custody_of(employee_id: int):
+    """استعلام المركبات التي في عهدة الموظف الآن (Query قابل للتصفية)."""
+    from models import Vehicle
+
+    return Vehicle.query.join(VehicleCurrentCustody, VehicleCurrentCustody.vehicle_id == Vehicle.id).filter(
+        VehicleCurrentCustody.employee_id == employee_id
+    )
+
+
+# ==================== التهيئة ====================
+
+@click.command("vehicle-custody-rebuild")
+@with_appcontext
+def vehicle_custody_rebuild_command():
+    """إعادة بناء جدول العهدة الحالية من سجلات التسليم وطلبات اعتمادها."""
+    click.echo(f"Vehicle custody rebuilt: {rebuild_custody()} vehicles")
+
+
+@job_handler(REBUILD_JOB)
+def _rebuild_custody_job(job):
+    job.update(stage="rebuilding", message="جاري بناء العهدة الحالية...")
+    return {"vehicles": rebuild_custody()}
+
+
+def _queue_initial_build() -> None:
+    """طلب البناء الأولي مرة واحدة لكل النظام؛ مفتاح عدم التكرار يجمع طلبات كل العمليات عند الإقلاع."""
+    try:
+        enqueue(REBUILD_JOB, idempotency_key=REBUILD_KEY, message="بناء العهدة الحالية للمركبات")
+        logger.info("Vehicle custody is empty: initial build queued")
+    except Exception as e:
+        db.session.rollback()
+        logger.warning(f"Vehicle custody build not queued (run flask vehicle-custody-rebuild): {e}")
+
+
+def init_vehicle_custody(app) -> None:
+    """تهيئة العهدة: أمر CLI، أحداث التحديث، وطلب بناء أولي في الطابور إن كان الجدول فارغاً."""
+    from modules.vehicles.application.custody_events import register_custody_listeners
+
+    if "vehicle-custody-rebuild" not in app.cli.commands:
+        app.cli.add_command(vehicle_custody_rebuild_command)
+    if not _state["listeners"]:
+        register_custody_listeners()
+        _state["listeners"] = True
+    try:
+        with db.engine.connect() as conn:
+            is_empty = conn.execute(select(VehicleCurrentCustody.__table__.c.vehicle_id).limit(1)).first() is None
+    except Exception as e:
+        logger.warning(f"Vehicle custody not checked: {e}")
+        return
+    if is_empty:
+        _queue_initial_build()
@@ -5,11 +5,12 @@
 """
 import io
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Optional, Tuple
 
 import pandas as pd
 
+from modules.expiry.application.expiry_calendar_service import ENTITY_VEHICLE, get_entries
 from modules.vehicles.domain.models import Vehicle, VehicleProject, VehicleRental, VehicleWorkshop
 from domain.employees.models import Employee
 from utils.excel import generate_vehicles_excel
@@ -25,20 +26,20 @@ def build_expired_documents_excel() -> Tuple[io.BytesIO, str, str]:
     """
     today = datetime.now().date()
 
-    expired_registration = Vehicle.query.filter(
-        Vehicle.registration_expiry_date.isnot(None),
-        Vehicle.registration_expiry_date < today,
-    ).order_by(Vehicle.registration_expiry_date).all()
-
-    expired_inspection = Vehicle.query.filter(
-        Vehicle.inspection_expiry_date.isnot(None),
-        Vehicle.inspection_expiry_date < today,
-    ).order_by(Vehicle.inspection_expiry_date).all()
-
-    expired_authorization = Vehicle.query.filter(
-        Vehicle.authorization_expiry_date.isnot(None),
-        Vehicle.authorization_expiry_date < today,
-    ).order_by(Vehicle.authorization_expiry_date).all()
+    # قراءة نطاق مفهرسة من تقويم الانتهاء ثم تحميل المركبات المعنية باستعلام واحد
+    entries = get_entries(end=today - timedelta(days=1), entity_types=[ENTITY_VEHICLE])
+    vehicles = {
+        v.id: v
+        for v in Vehicle.query.filter(Vehicle.id.in_({e.entity_id for e in entries})).all()
+    } if entries else {}
+    expired_by_type = {"registration": [], "inspection": [], "authorization": []}
+    for entry in entries:
+        vehicle = vehicles.get(entry.entity_id)
+        if vehicle is not None and entry.doc_type in expired_by_type:
+            expired_by_type[entry.doc_type].append(vehicle)
+    expired_registration = expired_by_type["registration"]
+    expired_inspection = expired_by_type["inspection"]
+    expired_authorization = expired_by_type["authorization"]
 
     registration_data = [
         {
@@ -581,76 +582,22 @@ def build_vehicle_report_excel(vehicle_id: int) -> Tuple[Optional[io.BytesIO], O
     return buffer, f"تقرير_شامل_{vehicle.plate_number}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
 
 
-def process_import_vehicles(file_stream) -> Tuple[int, int, list]:
+def process_import_vehicles(file_stream, filename=None) -> Tuple[int, int, list]:
     """
-    معالجة استيراد مركبات من ملف Excel.
+    استيراد مركبات من ملف Excel عبر خط الاستيراد المرحلي (إدراج جماعي في معاملة واحدة، بلا معاينة).
     Returns:
         (success_count, error_count, errors_list)
     """
-    from core.extensions import db
+    from modules.imports.application.bulk_import_service import import_file
+    from modules.imports.application.import_specs import IMPORT_VEHICLES
     from utils.audit_logger import log_activity
 
-    import pandas as pd
-
-    required_columns = ["رقم اللوحة", "الشركة المصنعة", "الموديل", "السنة", "اللون", "نوع السيارة"]
-    status_reverse_map = {
-        "متاحة": "available",
-        "مؤجرة": "rented",
-        "في المشروع": "in_project",
-        "في الورشة": "in_workshop",
-        "حادث": "accident",
-    }
-    df = pd.read_excel(file_stream)
-    missing = [c for c in required_columns if c not in df.columns]
-    if missing:
-        raise ValueError(f"الأعمدة التالية مفقودة: {', '.join(missing)}")
-    success_count = 0
-    error_count = 0
-    errors = []
-    for index, row in df.iterrows():
-        try:
-            if pd.isna(row["رقم اللوحة"]) or str(row["رقم اللوحة"]).strip() == "":
-                error_count += 1
-                errors.append(f"الصف {index + 2}: رقم اللوحة مطلوب")
-                continue
-            plate_number = str(row["رقم اللوحة"]).strip()
-            if Vehicle.query.filter_by(plate_number=plate_number).first():
-                error_count += 1
-                errors.append(f"الصف {index + 2}: السيارة برقم اللوحة {plate_number} موجودة مسبقاً")
-                continue
-            vehicle = Vehicle()
-            vehicle.plate_number = plate_number
-            vehicle.make = str(row["الشركة المصنعة"]).strip() if not pd.isna(row["الشركة المصنعة"]) else ""
-            vehicle.model = str(row["الموديل"]).strip() if not pd.isna(row["الموديل"]) else ""
-            vehicle.color = str(row["اللون"]).strip() if not pd.isna(row["اللون"]) else ""
-            vehicle.type_of_car = (
-                str(row["نوع السيارة"]).strip() if not pd.isna(row["نوع السيارة"]) else "سيارة عادية"
-            )
-            if not pd.isna(row["السنة"]):
-                try:
-                    vehicle.year = int(float(row["السنة"]))
-                except (ValueError, TypeError):
-                    vehicle.year = None
-            else:
-                vehicle.year = None
-            if "الحالة" in df.columns and not pd.isna(row["الحالة"]):
-                vehicle.status = status_reverse_map.get(str(row["الحالة"]).strip(), "available")
-            else:
-                vehicle.status = "available"
-            if "ملاحظات" in df.columns and not pd.isna(row["ملاحظات"]):
-                vehicle.notes = str(row["ملاحظات"]).strip()
-            vehicle.created_at = datetime.now()
-            vehicle.updated_at = datetime.now()
-            db.session.add(vehicle)
-            success_count += 1
-        except Exception as e:
-            error_count += 1
-            errors.append(f"الصف {index + 2}: {str(e)}")
-    if success_count > 0:
-        db.session.commit()
+    result = import_file(IMPORT_VEHICLES, file_stream, filename)
+    error_count = result.rejected + result.skipped_existing
+    if result.inserted > 0:
         log_activity(
             action="استيراد السيارات من ملف Excel",
             entity_type="Vehicle",
-            details=f"تم استيراد {success_count} سيارة بنجاح، {error_count} خطأ",
+            details=f"تم استيراد {result.inserted} سيارة بنجاح، {error_count} خطأ",
         )
-    return success_count, error_count, errors
+    return result.inserted, error_count, result.errors
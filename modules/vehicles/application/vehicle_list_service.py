@@ -16,7 +16,8 @@ def get_vehicle_list_payload(
     يجمع سياق صفحة قائمة المركبات (index) بناءً على معاملات الطلب.
 
     يعالج نفس التصفيات الحالية: status, make, search_plate, project، وفلتر الفرع (assigned_department_id).
-    لا يستخدم pagination حالياً (مطابق للتنفيذ الحالي في get_index_context).
+    ترقيم بالمفتاح: after/before (مؤشرات من الصفحة السابقة) و sort (status|plate|expiry)،
+    و expired_authorization_after / expired_inspection_after لصفحات المركبات المنتهية وثائقها.
 
     Args:
         request_args: كائن يشبه request.args (يدعم .get)، أو dict.
@@ -24,14 +25,20 @@ def get_vehicle_list_payload(
 
     Returns:
         قاموس بنفس المفاتيح التي تُمرَّر لقالب vehicles/index.html:
-        vehicles, stats, status_filter, make_filter, search_plate, project_filter,
+        vehicles, stats, compliance, next_cursor, prev_cursor, sort, status_filter, make_filter, search_plate, project_filter,
         makes, projects, statuses, expiring_documents, expired_authorization_vehicles,
-        expired_inspection_vehicles, now, timedelta, today.
+        expired_authorization_next_cursor, expired_inspection_vehicles, expired_inspection_next_cursor,
+        now, timedelta, today.
     """
     status_filter = (request_args.get("status") or "").strip()
     make_filter = (request_args.get("make") or "").strip()
     search_plate = (request_args.get("search_plate") or "").strip()
     project_filter = (request_args.get("project") or "").strip()
+    after = (request_args.get("after") or "").strip() or None
+    before = (request_args.get("before") or "").strip() or None
+    sort = (request_args.get("sort") or "status").strip()
+    expired_authorization_after = (request_args.get("expired_authorization_after") or "").strip() or None
+    expired_inspection_after = (request_args.get("expired_inspection_after") or "").strip() or None
 
     return get_index_context(
         status_filter=status_filter,
@@ -39,4 +46,9 @@ def get_vehicle_list_payload(
         search_plate=search_plate,
         project_filter=project_filter,
         assigned_department_id=assigned_department_id,
+        after=after,
+        before=before,
+        sort=sort,
+        expired_authorization_after=expired_authorization_after,
+        expired_inspection_after=expired_inspection_after,
     )
@@ -26,6 +26,7 @@ from modules.vehicles.domain.models import (
     VehiclePeriodicInspection,
 )
 from modules.operations.domain.models import OperationRequest
+from modules.search.application.search_service import ENTITY_VEHICLE, apply_search_filter
 from utils.vehicle_route_helpers import format_date_arabic
 
 # قائمة بأهم حالات السيارة للاختيار منها في النماذج
@@ -87,16 +88,10 @@ def update_all_vehicle_drivers() -> int:
 
 
 def get_vehicle_current_employee_id(vehicle_id: int) -> Optional[int]:
-    """الحصول على معرف الموظف الحالي للسيارة."""
-    latest = (
-        VehicleHandover.query.filter_by(vehicle_id=vehicle_id)
-        .filter(
-            VehicleHandover.handover_type.in_(["delivery", "تسليم", "handover"])
-        )
-        .order_by(VehicleHandover.handover_date.desc())
-        .first()
-    )
-    return latest.employee_id if (latest and latest.employee_id) else None
+    """الحصول على معرف الموظف الحالي للسيارة (جدول العهدة الحالية)."""
+    from modules.vehicles.application.vehicle_custody_service import get_current_employee_id
+
+    return get_current_employee_id(vehicle_id)
 
 
 def calculate_rental_adjustment(vehicle_id: int, year: int, month: int) -> float:
@@ -218,38 +213,65 @@ def get_filtered_vehicle_documents(
     return expired_registration, expired_inspection, expired_authorization, expired_all
 
 
+# مفاتيح الترتيب المدعومة في قائمة المركبات (كل مفتاح ينتهي بـ id لترقيم المفتاح)
+VEHICLE_LIST_SORTS = {
+    "status": lambda: (Vehicle.status, Vehicle.plate_number, Vehicle.id),
+    "plate": lambda: (Vehicle.plate_number, Vehicle.id),
+    "expiry": lambda: (func.coalesce(Vehicle.next_expiry_date, date(9999, 12, 31)), Vehicle.id),
+}
+VEHICLE_LIST_SORT_KEYS = {
+    "status": lambda v: (v.status, v.plate_number, v.id),
+    "plate": lambda v: (v.plate_number, v.id),
+    "expiry": lambda v: (v.next_expiry_date or date(9999, 12, 31), v.id),
+}
+VEHICLE_LIST_PAGE_SIZE = 50
+
+
+def get_current_employee_ids(vehicle_ids: List[int]) -> Dict[int, int]:
+    """معرف الموظف الحالي لعدة سيارات باستعلام مفهرس واحد على جدول العهدة الحالية."""
+    from modules.vehicles.application.vehicle_custody_service import get_current_employee_ids as custody_employee_ids
+
+    return custody_employee_ids(vehicle_ids)
+
+
 def get_index_context(
     status_filter: str = "",
     make_filter: str = "",
     search_plate: str = "",
     project_filter: str = "",
     assigned_department_id: Optional[int] = None,
+    after: Optional[str] = None,
+    before: Optional[str] = None,
+    sort: str = "status",
+    page_size: int = VEHICLE_LIST_PAGE_SIZE,
+    expired_authorization_after: Optional[str] = None,
+    expired_inspection_after: Optional[str] = None,
 ) -> Dict[str, Any]:
-    """سياق صفحة قائمة السيارات (index). نفس أسماء المتغيرات الممررة للقالب."""
+    """
+    سياق صفحة قائمة السيارات (index). نفس أسماء المتغيرات الممررة للقالب.
+    صفحة واحدة بترقيم المفتاح (after/before) مع تصفية وترتيب في قاعدة البيانات؛
+    الإحصائيات والامتثال من الأعمدة المحسوبة مسبقاً (vehicle_compliance_service) دون أي كتابة،
+    وقوائم المركبات المنتهية وثائقها صفحات بمؤشراتها (expired_*_after).
+    """
+    from modules.vehicles.application.vehicle_compliance_service import (
+        get_compliance_counts,
+        get_expired_vehicles,
+        get_expiring_documents,
+        get_status_counts,
+    )
+    from shared.utils.keyset import paginate_keyset
+
     query = Vehicle.query
     if assigned_department_id:
         dept_employee_ids = (
-            db.session.query(Employee.id)
-            .join(employee_departments)
-            .join(Department)
-            .filter(Department.id == assigned_department_id)
-            .all()
+            db.session.query(employee_departments.c.employee_id)
+            .filter(employee_departments.c.department_id == assigned_department_id)
         )
-        dept_employee_ids = [e[0] for e in dept_employee_ids]
-        if dept_employee_ids:
-            vehicle_ids = [
-                r[0]
-                for r in db.session.query(VehicleHandover.vehicle_id)
-                .filter(
-                    VehicleHandover.handover_type == "delivery",
-                    VehicleHandover.employee_id.in_(dept_employee_ids),
-                )
-                .distinct()
-                .all()
-            ]
-            query = query.filter(Vehicle.id.in_(vehicle_ids)) if vehicle_ids else query.filter(Vehicle.id == -1)
-        else:
-            query = query.filter(Vehicle.id == -1)
+        dept_vehicle_ids = db.session.query(VehicleHandover.vehicle_id).filter(
+            VehicleHandover.handover_type == "delivery",
+            VehicleHandover.employee_id.in_(dept_employee_ids),
+        )
+        query = query.filter(Vehicle.id.in_(dept_vehicle_ids))
     if status_filter:
         query = query.filter(Vehicle.status == status_filter)
     if make_filter:
@@ -257,14 +279,21 @@ def get_index_context(
     if project_filter:
         query = query.filter(Vehicle.project == project_filter)
     if search_plate:
-        query = query.filter(Vehicle.plate_number.contains(search_plate))
-
-    vehicles = query.order_by(Vehicle.status, Vehicle.plate_number).all()
+        query = apply_search_filter(query, ENTITY_VEHICLE, Vehicle.id, search_plate, Vehicle.plate_number)
+
+    sort = sort if sort in VEHICLE_LIST_SORTS else "status"
+    page = paginate_keyset(
+        query,
+        VEHICLE_LIST_SORTS[sort](),
+        VEHICLE_LIST_SORT_KEYS[sort],
+        limit=page_size,
+        after=after,
+        before=before,
+    )
+    vehicles = page.items
+    current_employees = get_current_employee_ids([v.id for v in vehicles])
     for v in vehicles:
-        try:
-            v.current_employee_id = get_vehicle_current_employee_id(v.id)
-        except Exception:
-            v.current_employee_id = None
+        v.current_employee_id = current_employees.get(v.id)
 
     makes = [m[0] for m in db.session.query(Vehicle.make).distinct().all()]
     projects = [
@@ -275,57 +304,37 @@ def get_index_context(
         .all()
     ]
     today = datetime.now().date()
-    thirty_days = today + timedelta(days=30)
-    expiring_documents: List[Dict[str, Any]] = []
-    for v in vehicles:
-        for attr, doc_type, doc_name in [
-            ("authorization_expiry_date", "authorization", "تفويض المركبة"),
-            ("registration_expiry_date", "registration", "استمارة السيارة"),
-            ("inspection_expiry_date", "inspection", "الفحص الدوري"),
-        ]:
-            d = getattr(v, attr, None)
-            if d and today <= d <= thirty_days:
-                expiring_documents.append({
-                    "vehicle_id": v.id,
-                    "plate_number": v.plate_number,
-                    "document_type": doc_type,
-                    "document_name": doc_name,
-                    "expiry_date": d,
-                    "days_remaining": (d - today).days,
-                })
-    expiring_documents.sort(key=lambda x: x["days_remaining"])
+    expiring_documents = get_expiring_documents(today, limit=page_size)
 
-    stats = {
-        "total": Vehicle.query.count(),
-        "available": Vehicle.query.filter_by(status="available").count(),
-        "rented": Vehicle.query.filter_by(status="rented").count(),
-        "in_project": Vehicle.query.filter_by(status="in_project").count(),
-        "in_workshop": Vehicle.query.filter_by(status="in_workshop").count(),
-        "accident": Vehicle.query.filter_by(status="accident").count(),
-        "out_of_service": Vehicle.query.filter_by(status="out_of_service").count(),
-    }
-    expired_authorization_vehicles = Vehicle.query.filter(
-        Vehicle.authorization_expiry_date.isnot(None),
-        Vehicle.authorization_expiry_date < today,
-    ).all()
-    expired_inspection_vehicles = Vehicle.query.filter(
-        Vehicle.inspection_expiry_date.isnot(None),
-        Vehicle.inspection_expiry_date < today,
-    ).all()
+    status_counts = get_status_counts()
+    stats = {"total": sum(status_counts.values())}
+    for status in VEHICLE_STATUS_CHOICES:
+        stats[status] = status_counts.get(status, 0)
+    filtered_status_counts = get_status_counts(query)
+    expired_authorization = get_expired_vehicles("authorization", after=expired_authorization_after, limit=page_size)
+    expired_inspection = get_expired_vehicles("inspection", after=expired_inspection_after, limit=page_size)
 
     return {
         "vehicles": vehicles,
         "stats": stats,
+        "filtered_status_counts": filtered_status_counts,
+        "filtered_total": sum(filtered_status_counts.values()),
+        "compliance": get_compliance_counts(today),
         "status_filter": status_filter,
         "make_filter": make_filter,
         "search_plate": search_plate,
         "project_filter": project_filter,
+        "sort": sort,
+        "next_cursor": page.next_cursor,
+        "prev_cursor": page.prev_cursor,
         "makes": makes,
         "projects": projects,
         "statuses": VEHICLE_STATUS_CHOICES,
         "expiring_documents": expiring_documents,
-        "expired_authorization_vehicles": expired_authorization_vehicles,
-        "expired_inspection_vehicles": expired_inspection_vehicles,
+        "expired_authorization_vehicles": expired_authorization.items,
+        "expired_authorization_next_cursor": expired_authorization.next_cursor,
+        "expired_inspection_vehicles": expired_inspection.items,
+        "expired_inspection_next_cursor": expired_inspection.next_cursor,
         "now": datetime.now(),
         "timedelta": timedelta,
         "today": today,
@@ -9,6 +9,8 @@ from modules.vehicles.domain.models import (
     VehicleHandoverImage,
     vehicle_user_access
 )
+from modules.vehicles.domain.custody_models import VehicleCurrentCustody
+from modules.vehicles.domain.telemetry_models import VehicleTelemetryDaily
 
 from modules.vehicles.domain.vehicle_maintenance_models import (
     VehicleChecklist,
@@ -41,6 +43,8 @@ __all__ = [
     'VehicleHandover',
     'VehicleHandoverImage',
     'vehicle_user_access',
+    'VehicleCurrentCustody',
+    'VehicleTelemetryDaily',
     # Maintenance and inspection models
     'VehicleChecklist',
     'VehicleChecklistItem',
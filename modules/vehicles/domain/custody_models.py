@@ -0,0 +1,36 @@
+"""
+نموذج العهدة الحالية للمركبات — جدول vehicle_current_custody المادي.
+صف واحد لكل مركبة لها تسليم معتمد: آخر تسليم رسمي (معتمد أو قديم بلا طلب عملية)
+مع الموظف واسم المستلم وتاريخ بداية العهدة.
+يُحدَّث داخل نفس المعاملة عند حفظ التسليم أو اعتماد طلبه
+من modules.vehicles.application.vehicle_custody_service.
+"""
+from datetime import datetime
+
+from core.extensions import db
+
+# أنواع سجلات التسليم التي تنقل العهدة (القيم القديمة بالعربية ما زالت في البيانات)
+DELIVERY_HANDOVER_TYPES = ("delivery", "تسليم", "handover")
+
+
+class VehicleCurrentCustody(db.Model):
+    """السائق الحالي لمركبة واحدة."""
+    __tablename__ = "vehicle_current_custody"
+
+    vehicle_id = db.Column(db.Integer, db.ForeignKey("vehicle.id", ondelete="CASCADE"), primary_key=True)
+    handover_id = db.Column(db.Integer, db.ForeignKey("vehicle_handover.id", ondelete="CASCADE"), nullable=False)
+    employee_id = db.Column(db.Integer, db.ForeignKey("employee.id", ondelete="SET NULL"), nullable=True)
+    person_name = db.Column(db.String(100), nullable=True)
+    since = db.Column(db.Date, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    vehicle = db.relationship("Vehicle", viewonly=True)
+    employee = db.relationship("Employee", viewonly=True)
+    handover = db.relationship("VehicleHandover", viewonly=True)
+
+    __table_args__ = (
+        db.Index("idx_vehicle_custody_employee", "employee_id"),
+    )
+
+    def __repr__(self):
+        return f"<VehicleCurrentCustody vehicle={self.vehicle_id} employee={self.employee_id}>"
@@ -2,9 +2,17 @@
 نماذج نطاق المركبات — Vehicle, Workshop, Handover والجداول المرتبطة.
 مستخرجة من models.py. لا يتجاوز 400 سطر.
 """
-from datetime import datetime
+from datetime import date, datetime
+from sqlalchemy import event
 from core.extensions import db
 
+# وثائق المركبة المتتبعة للامتثال: (الحقل، البت في expired_docs_mask، النوع، الاسم)
+COMPLIANCE_DOCUMENTS = (
+    ("authorization_expiry_date", 1, "authorization", "تفويض المركبة"),
+    ("registration_expiry_date", 2, "registration", "استمارة السيارة"),
+    ("inspection_expiry_date", 4, "inspection", "الفحص الدوري"),
+)
+
 # جدول الربط بين المركبات والمستخدمين
 vehicle_user_access = db.Table(
     "vehicle_user_access",
@@ -40,6 +48,10 @@ class Vehicle(db.Model):
     region = db.Column(db.String(100), nullable=True)
     notes = db.Column(db.Text)
     monthly_fixed_cost = db.Column(db.Float, default=0.0)
+    # حالة الامتثال المحسوبة مسبقاً: تُحدَّث عند الحفظ وليلياً (vehicle_compliance_service)
+    next_expiry_date = db.Column(db.Date, nullable=True, index=True)
+    expired_docs_mask = db.Column(db.Integer, nullable=False, default=0, server_default="0", index=True)
+    compliance_checked_on = db.Column(db.Date, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -67,10 +79,42 @@ class Vehicle(db.Model):
         }
         return m.get(self.status, self.status)
 
+    def refresh_compliance(self, today=None):
+        """إعادة حساب أقرب تاريخ انتهاء قادم وقناع الوثائق المنتهية."""
+        today = today or date.today()
+        next_expiry, mask = compute_compliance(
+            [getattr(self, field) for field, _, _, _ in COMPLIANCE_DOCUMENTS], today
+        )
+        self.next_expiry_date = next_expiry
+        self.expired_docs_mask = mask
+        self.compliance_checked_on = today
+
     def __repr__(self):
         return f"<Vehicle {self.plate_number} {self.make} {self.model}>"
 
 
+def compute_compliance(expiry_dates, today):
+    """(أقرب تاريخ انتهاء >= اليوم، قناع البتات للوثائق المنتهية) بترتيب COMPLIANCE_DOCUMENTS."""
+    upcoming = []
+    mask = 0
+    for expiry, (_, bit, _, _) in zip(expiry_dates, COMPLIANCE_DOCUMENTS):
+        if expiry is None:
+            continue
+        if isinstance(expiry, datetime):
+            expiry = expiry.date()
+        if expiry < today:
+            mask |= bit
+        else:
+            upcoming.append(expiry)
+    return (min(upcoming) if upcoming else None), mask
+
+
+@event.listens_for(Vehicle, "before_insert")
+@event.listens_for(Vehicle, "before_update")
+def _vehicle_refresh_compliance(mapper, connection, target):
+    target.refresh_compliance()
+
+
 class VehicleRental(db.Model):
     """معلومات إيجار المركبة."""
     id = db.Column(db.Integer, primary_key=True)
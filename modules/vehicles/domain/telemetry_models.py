@@ -0,0 +1,58 @@
+"""
+نموذج قياسات الأسطول اليومية — جدول vehicle_telemetry_daily المادي.
+صف واحد لكل (مركبة، يوم): المسافة وزمن القيادة والتوقف وحالات تجاوز السرعة من سجل المواقع،
+مع تعبئات الوقود وقراءة العداد ومعدل كم/لتر وسبب الشذوذ إن وجد.
+آخر نقطة معالجة (last_*) تُحفظ في الصف لأن نقاط المواقع تُحذف بعد ساعات،
+فيُكمل التجميع التالي من حيث توقف (modules.vehicles.application.fleet_telemetry_service).
+"""
+from datetime import datetime
+
+from core.extensions import db
+
+# أسباب شذوذ الوقود
+ANOMALY_LOW_KMPL = "low_kmpl"
+ANOMALY_HIGH_KMPL = "high_kmpl"
+ANOMALY_GPS_MISMATCH = "gps_mismatch"
+ANOMALY_ODOMETER_ROLLBACK = "odometer_rollback"
+
+
+class VehicleTelemetryDaily(db.Model):
+    """تجميع يومي لمركبة واحدة."""
+    __tablename__ = "vehicle_telemetry_daily"
+
+    vehicle_id = db.Column(db.Integer, db.ForeignKey("vehicle.id", ondelete="CASCADE"), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+
+    # من سجل المواقع
+    distance_km = db.Column(db.Float, nullable=False, default=0.0)
+    driving_seconds = db.Column(db.Integer, nullable=False, default=0)
+    idle_seconds = db.Column(db.Integer, nullable=False, default=0)
+    speeding_events = db.Column(db.Integer, nullable=False, default=0)
+    max_speed_kmh = db.Column(db.Float, nullable=False, default=0.0)
+    points = db.Column(db.Integer, nullable=False, default=0)
+    first_point_at = db.Column(db.DateTime, nullable=True)
+    last_point_at = db.Column(db.DateTime, nullable=True)
+    last_latitude = db.Column(db.Float, nullable=True)
+    last_longitude = db.Column(db.Float, nullable=True)
+    last_speed_kmh = db.Column(db.Float, nullable=True)
+
+    # من سجلات الوقود (تسوية العداد مع المسافة المحسوبة)
+    fuel_liters = db.Column(db.Float, nullable=False, default=0.0)
+    fuel_cost = db.Column(db.Float, nullable=False, default=0.0)
+    odometer_km = db.Column(db.Integer, nullable=True)
+    odometer_delta_km = db.Column(db.Integer, nullable=True)
+    gps_interval_km = db.Column(db.Float, nullable=True)
+    km_per_liter = db.Column(db.Float, nullable=True)
+    anomaly = db.Column(db.String(30), nullable=True)
+
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    vehicle = db.relationship("Vehicle", viewonly=True)
+
+    __table_args__ = (
+        db.Index("idx_vehicle_telemetry_day", "day"),
+        db.Index("idx_vehicle_telemetry_anomaly", "anomaly", "day"),
+    )
+
+    def __repr__(self):
+        return f"<VehicleTelemetryDaily vehicle={self.vehicle_id} {self.day} {self.distance_km:.1f}km>"
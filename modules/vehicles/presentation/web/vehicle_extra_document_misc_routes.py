@@ -11,8 +11,9 @@ from werkzeug.utils import secure_filename
 
 from core.domain.models import Module, Permission, UserRole
 from core.extensions import db
+from modules.imports.application.import_specs import IMPORT_VEHICLES
+from modules.imports.presentation.web.staged_import_view import handle_staged_import
 from modules.vehicles.application.vehicle_document_service import get_valid_documents_context
-from modules.vehicles.application.vehicle_export_service import process_import_vehicles
 from modules.vehicles.domain.models import Vehicle, VehicleExternalSafetyCheck
 from utils.audit_logger import log_activity
 from utils.vehicle_helpers import allowed_file, log_audit
@@ -120,39 +121,21 @@ def register_vehicle_extra_document_misc_routes(bp):
     @bp.route('/import', methods=['GET', 'POST'])
     @login_required
     def import_vehicles():
-        if request.method == 'GET':
-            return render_template('vehicles/utilities/import_vehicles.html')
-
-        if 'file' not in request.files:
-            flash('لم يتم اختيار ملف للاستيراد', 'error')
-            return redirect(url_for('vehicles.import_vehicles'))
-
-        file = request.files['file']
-        if not file or file.filename == '':
-            flash('لم يتم اختيار ملف للاستيراد', 'error')
-            return redirect(url_for('vehicles.import_vehicles'))
-
-        if not file.filename.endswith(('.xlsx', '.xls')):
-            flash('يجب أن يكون الملف من نوع Excel (.xlsx أو .xls)', 'error')
-            return redirect(url_for('vehicles.import_vehicles'))
-
-        try:
-            success_count, error_count, errors = process_import_vehicles(file.stream)
-            flash(f'تم استيراد {success_count} سيارة بنجاح!', 'success')
-            if error_count > 0:
-                flash(f'حدثت {error_count} أخطاء أثناء الاستيراد', 'warning')
-            for err in errors[:10]:
-                flash(err, 'error')
-            if len(errors) > 10:
-                flash(f'وهناك {len(errors) - 10} أخطاء أخرى...', 'info')
-            if success_count == 0 and not errors:
-                flash('لم يتم استيراد أي سيارة', 'warning')
-        except ValueError as e:
-            flash(str(e), 'error')
-        except Exception as e:
-            flash(f'خطأ في قراءة الملف: {str(e)}', 'error')
+        def _log(result):
+            log_activity(
+                action="استيراد السيارات من ملف Excel",
+                entity_type="Vehicle",
+                details=f"تم استيراد {result.inserted} سيارة، تحديث {result.updated}، رفض {result.rejected} صف",
+            )
 
-        return redirect(url_for('vehicles.index'))
+        return handle_staged_import(
+            IMPORT_VEHICLES,
+            'vehicles/utilities/import_vehicles.html',
+            back_url=url_for('vehicles.import_vehicles'),
+            done_url=url_for('vehicles.index'),
+            file_field='file',
+            on_applied=_log,
+        )
 
     @bp.route('/valid-documents')
     @login_required
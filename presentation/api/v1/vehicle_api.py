@@ -27,6 +27,8 @@ def _vehicle_to_dict(v):
         "authorization_expiry_date": v.authorization_expiry_date.isoformat() if v.authorization_expiry_date else None,
         "registration_expiry_date": v.registration_expiry_date.isoformat() if v.registration_expiry_date else None,
         "inspection_expiry_date": v.inspection_expiry_date.isoformat() if v.inspection_expiry_date else None,
+        "next_expiry_date": v.next_expiry_date.isoformat() if v.next_expiry_date else None,
+        "expired_docs_mask": v.expired_docs_mask or 0,
     }
 
 
@@ -44,6 +46,11 @@ def _payload_to_json_serializable(payload):
     return {
         "vehicles": vehicles,
         "stats": payload["stats"],
+        "compliance": payload["compliance"],
+        "filtered_total": payload["filtered_total"],
+        "sort": payload["sort"],
+        "next_cursor": payload["next_cursor"],
+        "prev_cursor": payload["prev_cursor"],
         "status_filter": payload["status_filter"],
         "make_filter": payload["make_filter"],
         "search_plate": payload["search_plate"],
@@ -53,7 +60,9 @@ def _payload_to_json_serializable(payload):
         "statuses": payload["statuses"],
         "expiring_documents": expiring,
         "expired_authorization_vehicles": expired_auth,
+        "expired_authorization_next_cursor": payload["expired_authorization_next_cursor"],
         "expired_inspection_vehicles": expired_insp,
+        "expired_inspection_next_cursor": payload["expired_inspection_next_cursor"],
         "now": payload["now"].isoformat() if isinstance(payload.get("now"), datetime) else payload.get("now"),
         "today": payload["today"].isoformat() if isinstance(payload.get("today"), date) else payload.get("today"),
     }
@@ -62,7 +71,8 @@ def _payload_to_json_serializable(payload):
 @api_v1.route("/vehicles/data", methods=["GET"])
 def vehicles_data():
     """
-    GET /vehicles/data?status=...&make=...&search_plate=...&project=...&assigned_department_id=...
+    GET /vehicles/data?status=...&make=...&search_plate=...&project=...&assigned_department_id=...&sort=...&after=...&before=...
+        &expired_authorization_after=...&expired_inspection_after=...
     يُرجع نفس بيانات سياق index كـ JSON (مركبات، إحصائيات، تصفيات، وثائق منتهية/قريبة الانتهاء).
     """
     assigned_department_id = request.args.get("assigned_department_id", type=int)
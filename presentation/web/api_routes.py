@@ -2,13 +2,52 @@
 مسارات API — استخدام shared.utils.responses لردود JSON موحدة.
 لا يتجاوز 400 سطر.
 """
+from functools import wraps
+
 from flask import Blueprint
-from shared.utils.responses import json_success
+from flask_login import current_user
+from shared.utils.responses import json_forbidden, json_success, json_unauthorized
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
 
+def admin_api_required(f):
+    """مقاييس التشغيل التفصيلية للمديرين فقط؛ ردود JSON بدل إعادة التوجيه لصفحة الدخول."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            return json_unauthorized()
+        if not current_user._is_admin_role():
+            return json_forbidden()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
 @api_bp.route("/health")
 def health():
     """فحص صحة الخدمة."""
     return json_success(data={"status": "ok", "service": "nuzm"})
+
+
+@api_bp.route("/health/integrations")
+@admin_api_required
+def integrations_health():
+    """زمن استجابة التكاملات الخارجية وحالة قاطع الدائرة لكل منها (لهذه العملية)."""
+    from core.http_client import get_http_metrics
+    return json_success(data=get_http_metrics())
+
+
+@api_bp.route("/health/auth-cache")
+@admin_api_required
+def auth_cache_health():
+    """نسبة إصابة ذاكرة هوية JWT لواجهات الجوال (لهذه العملية) لضبط الحجم والمدة."""
+    from core.principal_cache import get_principal_cache_stats
+    return json_success(data=get_principal_cache_stats())
+
+
+@api_bp.route("/health/check-in")
+@admin_api_required
+def check_in_health():
+    """زمن مراحل تسجيل الحضور/الانصراف من الجوال (p50/p95/p99 لهذه العملية)."""
+    from modules.attendance.application.check_in_pipeline import get_check_in_stats
+    return json_success(data=get_check_in_stats())
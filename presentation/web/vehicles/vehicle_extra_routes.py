@@ -1579,7 +1579,7 @@ def register_vehicle_extra_routes(bp):
             flash('يجب أن يكون الملف من نوع Excel (.xlsx أو .xls)', 'error')
             return redirect(url_for('vehicles.import_vehicles'))
         try:
-            success_count, error_count, errors = process_import_vehicles(file.stream)
+            success_count, error_count, errors = process_import_vehicles(file.stream, file.filename)
             flash(f'تم استيراد {success_count} سيارة بنجاح!', 'success')
             if error_count > 0:
                 flash(f'حدثت {error_count} أخطاء أثناء الاستيراد', 'warning')
@@ -3,12 +3,9 @@ Finance bridge routes: NUZUM ↔ ERPNext integration.
 """
 
 import os
-import time
-import uuid
-import threading
 from datetime import datetime
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 
 from services.finance_bridge import ERPNextClient, ERPNextBridgeError
@@ -20,100 +17,55 @@ from services.finance_bridge_app_service import (
 from routes.accounting.accounting_helpers import check_accounting_access
 from modules.accounting.domain.profitability_models import ProjectContract
 from models_accounting import CostCenter
+from modules.jobs.application.job_queue import enqueue, get_job, job_handler
 
 
 finance_bridge_bp = Blueprint('finance_bridge', __name__, url_prefix='/accounting/finance-bridge')
 
-_invoice_jobs = {}
-_invoice_jobs_lock = threading.Lock()
-_invoice_jobs_ttl_seconds = 3600
+INVOICE_GENERATION_JOB = 'finance_bridge.invoice_generation'
 
 
-def _cleanup_invoice_jobs():
-    now = time.time()
-    with _invoice_jobs_lock:
-        expired = [
-            job_id
-            for job_id, job in _invoice_jobs.items()
-            if now - float(job.get('updated_at', now)) > _invoice_jobs_ttl_seconds
-        ]
-        for job_id in expired:
-            _invoice_jobs.pop(job_id, None)
-
-
-def _set_invoice_job(job_id, **updates):
-    with _invoice_jobs_lock:
-        job = _invoice_jobs.get(job_id, {})
-        job.update(updates)
-        job['updated_at'] = time.time()
-        _invoice_jobs[job_id] = job
-        return dict(job)
-
-
-def _get_invoice_job(job_id):
-    with _invoice_jobs_lock:
-        job = _invoice_jobs.get(job_id)
-        return dict(job) if job else None
+@job_handler(INVOICE_GENERATION_JOB)
+def _run_invoice_generation_job(job, contract_id, payload):
+    try:
+        job.update(progress=20, stage='collecting', message='جاري حصر ساعات العمل القابلة للفوترة...')
+        settings_data = FinanceBridgeSettingsService.load_settings()
+        client = ERPNextClient(config_overrides=settings_data)
+        if not client.is_configured():
+            raise ERPNextBridgeError('ERPNext env variables are missing')
 
+        job.update(progress=65, stage='erp_sync', message='جاري الاتصال بـ ERPNext وإنشاء الفاتورة...')
+        result = client.create_sales_invoice_for_contract(
+            contract_id=contract_id,
+            month=payload['month'],
+            year=payload['year'],
+            tax_rate=payload['tax_rate'],
+            discount=payload['discount'],
+            payment_terms=payload['payment_terms'],
+            manual_ot_hours=payload.get('manual_ot_hours', 0),
+        )
 
-def _run_invoice_generation_job(app, job_id, contract_id, payload):
-    with app.app_context():
-        try:
-            _set_invoice_job(job_id, status='running', progress=20, stage='collecting', message='جاري حصر ساعات العمل القابلة للفوترة...')
-            settings_data = FinanceBridgeSettingsService.load_settings()
-            client = ERPNextClient(config_overrides=settings_data)
-            if not client.is_configured():
-                _set_invoice_job(job_id, status='failed', progress=100, stage='failed', message='ERPNext env variables are missing')
-                return
-
-            _set_invoice_job(job_id, status='running', progress=65, stage='erp_sync', message='جاري الاتصال بـ ERPNext وإنشاء الفاتورة...')
-            result = client.create_sales_invoice_for_contract(
-                contract_id=contract_id,
-                month=payload['month'],
-                year=payload['year'],
-                tax_rate=payload['tax_rate'],
-                discount=payload['discount'],
-                payment_terms=payload['payment_terms'],
-                manual_ot_hours=payload.get('manual_ot_hours', 0),
-            )
-
-            _set_invoice_job(
-                job_id,
-                status='done',
-                progress=100,
-                stage='completed',
-                message=f"تم إنشاء الفاتورة {result.get('invoice_name')} بنجاح",
-                result=result,
-            )
-        except ERPNextBridgeError as exc:
-            _set_invoice_job(job_id, status='failed', progress=100, stage='failed', message=str(exc))
-        except Exception as exc:
-            _set_invoice_job(job_id, status='failed', progress=100, stage='failed', message=f'Unexpected error: {exc}')
+        job.update(stage='completed', message=f"تم إنشاء الفاتورة {result.get('invoice_name')} بنجاح")
+        return result
+    except ERPNextBridgeError as exc:
+        job.update(progress=100, stage='failed', message=str(exc))
+        raise
+    except Exception as exc:
+        job.update(progress=100, stage='failed', message=f'Unexpected error: {exc}')
+        raise
 
 
 def _start_invoice_job(contract_id, payload, user_id):
-    _cleanup_invoice_jobs()
-    job_id = uuid.uuid4().hex
-    _set_invoice_job(
-        job_id,
-        id=job_id,
-        contract_id=contract_id,
+    # فاتورة نفس العقد والفترة لا تُنشأ مرتين بالتوازي
+    job = enqueue(
+        INVOICE_GENERATION_JOB,
+        payload={'contract_id': contract_id, 'payload': payload},
         owner_id=user_id,
-        status='queued',
-        progress=5,
-        stage='queued',
+        idempotency_key=f"invoice:{contract_id}:{payload['year']}-{payload['month']}",
         message='تم استلام الطلب، جارٍ بدء المعالجة...',
-        created_at=time.time(),
-    )
-    app_obj = current_app._get_current_object()
-    worker = threading.Thread(
-        target=_run_invoice_generation_job,
-        args=(app_obj, job_id, contract_id, payload),
-        daemon=True,
-        name=f'invoice-job-{job_id[:8]}',
+        contract_id=contract_id,
     )
-    worker.start()
-    return job_id
+    return job.id
 
 
 def _wants_json_response():
@@ -355,21 +307,21 @@ def invoice_job_status(job_id):
     if not check_accounting_access(current_user):
         return jsonify({'ok': False, 'message': 'Unauthorized'}), 403
 
-    job = _get_invoice_job(job_id)
-    if not job:
+    job = get_job(job_id)
+    if job is None or job.kind != INVOICE_GENERATION_JOB:
         return jsonify({'ok': False, 'message': 'Job not found'}), 404
-    if int(job.get('owner_id') or 0) != int(current_user.id):
+    if int(job.owner_id or 0) != int(current_user.id):
         return jsonify({'ok': False, 'message': 'Unauthorized'}), 403
 
     return jsonify({
         'ok': True,
         'job': {
-            'id': job.get('id'),
-            'status': job.get('status'),
-            'progress': job.get('progress', 0),
-            'stage': job.get('stage'),
-            'message': job.get('message'),
-            'result': job.get('result') if job.get('status') == 'done' else None,
+            'id': job.id,
+            'status': job.status,
+            'progress': job.progress,
+            'stage': job.stage,
+            'message': job.message,
+            'result': job.result if job.status == 'done' else None,
         },
     })
 
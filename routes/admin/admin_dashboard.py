@@ -180,6 +180,29 @@ def mobile_devices():
                          devices=devices,
                          search=search)
 
+@admin_dashboard_bp.route('/sql-profile')
+@login_required
+@admin_required
+def sql_profile():
+    """أسوأ نقاط النهاية من حيث استعلامات قاعدة البيانات (عينة الطلبات)"""
+    from core.sql_profiler import get_worst_endpoints
+    order = request.args.get('order', 'db_ms', type=str)
+    if order not in ('db_ms', 'queries', 'nplus1'):
+        order = 'db_ms'
+    return render_template('admin_dashboard/sql_profile.html',
+                         endpoints=get_worst_endpoints(limit=50, order=order),
+                         order=order)
+
+@admin_dashboard_bp.route('/sql-profile/reset', methods=['POST'])
+@login_required
+@admin_required
+def reset_sql_profile():
+    """تصفير إحصاءات مُحلل SQL"""
+    from core.sql_profiler import reset_sql_profile as reset_profile
+    reset_profile()
+    flash('تم تصفير إحصاءات الاستعلامات', 'success')
+    return redirect(url_for('admin_dashboard.sql_profile'))
+
 # API Endpoints للعمليات CRUD
 
 @admin_dashboard_bp.route('/api/employee/<int:id>', methods=['DELETE'])
@@ -10,7 +10,6 @@ from sqlalchemy import func, and_, or_
 from sqlalchemy.orm import joinedload
 from io import BytesIO, StringIO
 import csv
-import threading
 import os
 from urllib.parse import quote_plus
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
@@ -21,6 +20,15 @@ from modules.payroll.application.payroll_processor import PayrollProcessor
 from modules.payroll.application.bank_transfer_generator import BankTransferGenerator
 from services.finance_bridge import ERPNextClient, ERPNextBridgeError
 from services.finance_bridge_app_service import FinanceBridgeSettingsService
+from modules.jobs.application.job_queue import JobCancelled, cancel_job, enqueue, get_job, job_handler
+from modules.payroll.application.payslip_dispatch import (
+    RESULT_LINK,
+    PayslipMessage,
+    build_dispatch_key,
+    build_finance_digest,
+    dispatch_messages,
+    load_sent_record_ids,
+)
 
 
 payroll_bp = Blueprint('payroll', __name__)
@@ -468,23 +476,7 @@ def _build_payslip_payload(employee, payroll_record, month, year):
     }
 
 
-_payslip_jobs = {}
-_payslip_jobs_lock = threading.Lock()
-
-
-def _set_payslip_job(job_id, **updates):
-    with _payslip_jobs_lock:
-        snapshot = _payslip_jobs.get(job_id, {})
-        snapshot.update(updates)
-        snapshot['updated_at'] = datetime.utcnow().isoformat()
-        _payslip_jobs[job_id] = snapshot
-        return dict(snapshot)
-
-
-def _get_payslip_job(job_id):
-    with _payslip_jobs_lock:
-        row = _payslip_jobs.get(job_id)
-        return dict(row) if row else None
+PAYSLIP_DISPATCH_JOB = 'payroll.payslip_dispatch'
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -1681,11 +1673,79 @@ def automation_generate_bulk_payslips():
     })
 
 
-def _send_payslips_email_job(job_id, month, year, department_id, project_name, channel, finance_cc_email, triggered_by_user_id):
-    try:
-        from services.email_service import EmailService
+def _normalize_whatsapp_phone(phone_number):
+    normalized_phone = ''.join(ch for ch in phone_number if ch.isdigit())
+    if normalized_phone.startswith('0'):
+        normalized_phone = '966' + normalized_phone[1:]
+    elif normalized_phone.startswith('5') and len(normalized_phone) == 9:
+        normalized_phone = '966' + normalized_phone
+    return normalized_phone
+
+
+def _render_payslip_messages(records, month, year, channel):
+    """تجهيز رسائل كل القسائم دفعة واحدة قبل الإرسال."""
+    messages = []
+    for record in records:
+        employee = record.employee
+        message = PayslipMessage(
+            payroll_record_id=record.id,
+            employee_id=getattr(employee, 'id', None),
+            employee_name=getattr(employee, 'name', '-') or '-',
+            employee_code=getattr(employee, 'employee_id', '') or '',
+        )
+        messages.append(message)
+        if employee is None:
+            message.error = 'employee_not_found'
+            continue
+        secure_payslip_url = _build_secure_payslip_url(employee, month, year)
+
+        if channel == 'whatsapp':
+            phone_number = (getattr(employee, 'mobile', None) or getattr(employee, 'phone', None) or '').strip()
+            if not phone_number:
+                message.error = 'phone_not_found'
+                continue
+            message.recipient = _normalize_whatsapp_phone(phone_number)
+            message_text = (
+                f"عزيزي {employee.name}، تم صدور قسيمة راتبك لشهر {str(month).zfill(2)}/{year}. "
+                f"يمكنك عرضها عبر الرابط التالي: {secure_payslip_url}"
+            )
+            message.link = f"https://wa.me/{message.recipient}?text={quote_plus(message_text)}"
+        else:
+            if not employee.email:
+                message.error = 'email_not_found'
+                continue
+            message.recipient = employee.email
+            message.subject = f"قسيمة راتب - {employee.name} - {year}/{str(month).zfill(2)}"
+            message.body = (
+                f"<div dir='rtl' style='font-family:Cairo,Arial,sans-serif'>"
+                f"<h3>قسيمة راتب نُظم</h3>"
+                f"<p>الموظف: <strong>{employee.name}</strong></p>"
+                f"<p>الفترة: <strong>{year}/{str(month).zfill(2)}</strong></p>"
+                f"<p>رابط القسيمة الآمن: <a href='{secure_payslip_url}'>{secure_payslip_url}</a></p>"
+                f"</div>"
+            )
+    return messages
 
-        _set_payslip_job(job_id, status='running', sent=0, failed=0, total=0, message='جاري تجهيز القسائم...')
+
+def _whatsapp_links(summary):
+    """كل روابط واتساب المجهزة في هذا التشغيل (لا تُحفظ كمرسلة، فيعيد التشغيل التالي توليدها)."""
+    return [
+        {
+            'employee': outcome.message.employee_name,
+            'employee_id': outcome.message.employee_code,
+            'phone': outcome.message.recipient,
+            'link': outcome.message.link,
+        }
+        for outcome in summary.outcomes
+        if outcome.status == RESULT_LINK
+    ]
+
+
+@job_handler(PAYSLIP_DISPATCH_JOB)
+def _send_payslips_email_job(job, month, year, department_id, project_name, channel, finance_cc_email,
+                             triggered_by_user_id, resend=False):
+    try:
+        job.update(progress=0, stage='collecting', message='جاري تجهيز القسائم...', sent=0, failed=0, total=0)
 
         query = PayrollRecord.query.options(joinedload(PayrollRecord.employee)).filter_by(
             pay_period_month=month,
@@ -1712,108 +1772,74 @@ def _send_payslips_email_job(job_id, month, year, department_id, project_name, c
                 if item.employee and _employee_in_user_scope(triggered_user, item.employee)
             ]
 
-        _set_payslip_job(
-            job_id,
-            total=len(records),
-            channel=channel,
-            project=project_name,
-            finance_cc_email=finance_cc_email,
-        )
+        # استئناف: تخطي من وصلتهم القسيمة في تشغيل سابق لنفس الفترة والنطاق والقناة
+        dispatch_key = build_dispatch_key(year, month, department_id, project_name, channel)
+        already_sent = set() if resend else load_sent_record_ids(dispatch_key)
+        pending_records = [record for record in records if record.id not in already_sent]
+        messages = _render_payslip_messages(pending_records, month, year, channel)
+        job.update(stage='sending', total=len(records), skipped=len(already_sent & {r.id for r in records}))
 
-        email_service = EmailService() if channel == 'email' else None
-        sent = 0
-        failed = 0
-        errors = []
-        whatsapp_links = []
+        email_service = None
+        if channel == 'email':
+            from services.email_service import EmailService
 
-        for record in records:
-            employee = record.employee
-            secure_payslip_url = _build_secure_payslip_url(employee, month, year)
+            email_service = EmailService()
 
+        def _send(message):
             if channel == 'whatsapp':
-                phone_number = (getattr(employee, 'mobile', None) or getattr(employee, 'phone', None) or '').strip()
-                if not phone_number:
-                    failed += 1
-                    errors.append(f"{getattr(employee, 'name', '-')}: phone_not_found")
-                    continue
-                try:
-                    normalized_phone = ''.join(ch for ch in phone_number if ch.isdigit())
-                    if normalized_phone.startswith('0'):
-                        normalized_phone = '966' + normalized_phone[1:]
-                    elif normalized_phone.startswith('5') and len(normalized_phone) == 9:
-                        normalized_phone = '966' + normalized_phone
-
-                    message_text = (
-                        f"عزيزي {employee.name}، تم صدور قسيمة راتبك لشهر {str(month).zfill(2)}/{year}. "
-                        f"يمكنك عرضها عبر الرابط التالي: {secure_payslip_url}"
-                    )
-                    wa_link = f"https://wa.me/{normalized_phone}?text={quote_plus(message_text)}"
-                    whatsapp_links.append({
-                        'employee': employee.name,
-                        'employee_id': employee.employee_id,
-                        'phone': normalized_phone,
-                        'link': wa_link,
-                    })
-                    sent += 1
-                except Exception as wa_exc:
-                    failed += 1
-                    errors.append(f"{employee.name}: {wa_exc}")
-            else:
-                if not employee or not employee.email:
-                    failed += 1
-                    errors.append(f"{getattr(employee, 'name', '-')}: email_not_found")
-                    continue
-
-                subject = f"قسيمة راتب - {employee.name} - {year}/{str(month).zfill(2)}"
-                html_body = (
-                    f"<div dir='rtl' style='font-family:Cairo,Arial,sans-serif'>"
-                    f"<h3>قسيمة راتب نُظم</h3>"
-                    f"<p>الموظف: <strong>{employee.name}</strong></p>"
-                    f"<p>الفترة: <strong>{year}/{str(month).zfill(2)}</strong></p>"
-                    f"<p>رابط القسيمة الآمن: <a href='{secure_payslip_url}'>{secure_payslip_url}</a></p>"
-                    f"</div>"
-                )
-
-                result = email_service.send_simple_email(employee.email, subject, html_body)
-                if result.get('success'):
-                    sent += 1
-                    if finance_cc_email:
-                        email_service.send_simple_email(
-                            finance_cc_email,
-                            f"[Archive Copy] {subject}",
-                            html_body,
-                        )
-                else:
-                    failed += 1
-                    errors.append(f"{employee.name}: {result.get('message', 'send_failed')}")
-
-            _set_payslip_job(
-                job_id,
-                status='running',
-                sent=sent,
-                failed=failed,
-                whatsapp_links=whatsapp_links[:50],
-                message=f'جاري الإرسال... {sent + failed}/{len(records)}',
-                errors=errors[:30],
+                return {'success': True}
+            return email_service.send_simple_email(message.recipient, message.subject, message.body)
+
+        def _progress(summary, total):
+            job.update(
+                progress=(summary.sent + summary.failed) * 100 // max(total, 1),
+                sent=summary.sent,
+                failed=summary.failed,
+                message=f'جاري الإرسال... {summary.sent + summary.failed}/{total}',
+                errors=summary.errors[:30],
             )
+            return not job.is_cancelled()
+
+        summary = dispatch_messages(
+            current_app._get_current_object(),
+            messages,
+            _send,
+            provider='whatsapp_link' if channel == 'whatsapp' else 'sendgrid',
+            dispatch_key=dispatch_key,
+            channel=channel,
+            on_progress=_progress,
+        )
+        summary.skipped = len(records) - len(pending_records)
+        job.check_cancelled()
 
-        _set_payslip_job(
-            job_id,
-            status='done',
-            sent=sent,
-            failed=failed,
-            whatsapp_links=whatsapp_links[:50],
+        # نسخة واحدة للمالية بملخص الإرسال ومرفق CSV بدل نسخة لكل موظف
+        if finance_cc_email and email_service is not None and summary.outcomes:
+            subject, html_body, attachments = build_finance_digest(
+                summary, f"{year}/{str(month).zfill(2)}", channel
+            )
+            email_service.send_simple_email(finance_cc_email, subject, html_body, attachments=attachments)
+
+        job.update(
+            stage='completed',
+            sent=summary.sent,
+            failed=summary.failed,
+            skipped=summary.skipped,
+            whatsapp_links=_whatsapp_links(summary),
             message='اكتمل إرسال القسائم' if channel == 'email' else 'اكتمل تجهيز روابط واتساب',
-            errors=errors[:30],
+            errors=summary.errors[:30],
         )
+        return {'sent': summary.sent, 'failed': summary.failed, 'skipped': summary.skipped}
+    except JobCancelled:
+        raise
     except Exception as exc:
-        _set_payslip_job(job_id, status='failed', message=f'فشل الإرسال الجماعي: {exc}')
+        job.update(stage='failed', message=f'فشل الإرسال الجماعي: {exc}')
+        raise
 
 
 @payroll_bp.route('/automation/payslips/email-all', methods=['POST'])
 @login_required
 def automation_email_all_payslips():
-    """تشغيل إرسال جماعي لقسائم الرواتب في خلفية Thread."""
+    """جدولة إرسال جماعي لقسائم الرواتب في طابور المهام الخلفية."""
     if not check_payroll_access():
         return jsonify({'ok': False, 'message': 'ليس لديك صلاحية'}), 403
 
@@ -1824,38 +1850,30 @@ def automation_email_all_payslips():
     if channel not in {'email', 'whatsapp'}:
         channel = 'email'
     trigger_user_id = getattr(current_user, 'id', None)
-    job_id = f"payslip-{datetime.utcnow().strftime('%Y%m%d%H%M%S%f')}"
-    _set_payslip_job(
-        job_id,
-        id=job_id,
-        status='queued',
+    # نفس الفترة والنطاق والقناة لا تُرسل مرتين بالتوازي (نقر مزدوج أو أكثر من عامل)
+    job = enqueue(
+        PAYSLIP_DISPATCH_JOB,
+        payload={
+            'month': month,
+            'year': year,
+            'department_id': department_id,
+            'project_name': project_name,
+            'channel': channel,
+            'finance_cc_email': finance_cc_email,
+            'triggered_by_user_id': trigger_user_id,
+            'resend': request.values.get('resend') in ('1', 'true', 'on'),
+        },
+        owner_id=trigger_user_id,
+        idempotency_key=f"payslips:{build_dispatch_key(year, month, department_id, project_name, channel)}",
+        message='تم جدولة المهمة',
         sent=0,
         failed=0,
         total=0,
         channel=channel,
         project=project_name,
         finance_cc_email=finance_cc_email,
-        message='تم جدولة المهمة'
     )
-
-    from flask import current_app
-    app_obj = current_app._get_current_object()
-
-    def _runner():
-        with app_obj.app_context():
-            _send_payslips_email_job(
-                job_id,
-                month,
-                year,
-                department_id,
-                project_name,
-                channel,
-                finance_cc_email,
-                trigger_user_id,
-            )
-
-    thread = threading.Thread(target=_runner, daemon=True, name=f'payslip-email-{job_id[-6:]}')
-    thread.start()
+    job_id = job.id
 
     channel_label = 'واتساب' if channel == 'whatsapp' else 'البريد الإلكتروني'
     return jsonify({'ok': True, 'job_id': job_id, 'message': f'تم تشغيل الإرسال الجماعي عبر {channel_label} في الخلفية'})
@@ -1906,8 +1924,23 @@ def automation_payslip_job_status(job_id):
     if not check_payroll_access():
         return jsonify({'ok': False, 'message': 'ليس لديك صلاحية'}), 403
 
-    payload = _get_payslip_job(job_id)
-    if not payload:
+    job = get_job(job_id)
+    if job is None or job.kind != PAYSLIP_DISPATCH_JOB:
+        return jsonify({'ok': False, 'message': 'job_not_found'}), 404
+
+    return jsonify({'ok': True, 'job': job.to_dict()})
+
+
+@payroll_bp.route('/automation/payslips/jobs/<string:job_id>/cancel', methods=['POST'])
+@login_required
+def automation_cancel_payslip_job(job_id):
+    """إلغاء مهمة إرسال القسائم (فوراً إن كانت بالانتظار، أو عند القسيمة التالية إن كانت جارية)."""
+    if not check_payroll_access():
+        return jsonify({'ok': False, 'message': 'ليس لديك صلاحية'}), 403
+
+    job = get_job(job_id)
+    if job is None or job.kind != PAYSLIP_DISPATCH_JOB:
         return jsonify({'ok': False, 'message': 'job_not_found'}), 404
 
-    return jsonify({'ok': True, 'job': payload})
+    job = cancel_job(job_id)
+    return jsonify({'ok': True, 'job': job.to_dict()})
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, current_app, jsonify
 from flask_login import login_required, current_user
 from models import MobileDevice, SimCard, Employee, Department, UserRole, DeviceAssignment
+from modules.search.application.search_service import ENTITY_EMPLOYEE, apply_search_filter
 from core.extensions import db
 from datetime import datetime
 import logging
@@ -85,9 +86,9 @@ def index():
         if department_filter:
             employees_query = employees_query.join(Employee.departments).filter(Department.id == department_filter)
         if employee_search:
-            employees_query = employees_query.filter(
-                Employee.name.contains(employee_search) | 
-                Employee.employee_id.contains(employee_search)
+            employees_query = apply_search_filter(
+                employees_query, ENTITY_EMPLOYEE, Employee.id, employee_search,
+                Employee.name, Employee.employee_id,
             )
         employees = employees_query.order_by(Employee.name).all()
         
@@ -2,7 +2,6 @@ from datetime import datetime, timedelta
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
 from flask_login import login_required, current_user
 from sqlalchemy import or_, and_, func
-import pandas as pd
 import io
 from io import BytesIO
 from openpyxl import Workbook
@@ -13,6 +12,9 @@ import uuid
 
 from core.extensions import db
 from models import MobileDevice, Employee, Department, AuditLog, employee_departments, ImportedPhoneNumber
+from modules.imports.application.import_specs import IMPORT_MOBILE_DEVICES, IMPORT_PHONE_NUMBERS
+from modules.imports.presentation.web.staged_import_view import handle_staged_import
+from modules.search.application.search_service import ENTITY_EMPLOYEE, apply_search_filter
 
 # إنشاء Blueprint
 mobile_devices_bp = Blueprint('mobile_devices', __name__)
@@ -362,100 +364,21 @@ def delete(device_id):
 @mobile_devices_bp.route('/import-phone-numbers', methods=['GET', 'POST'])
 @login_required
 def import_phone_numbers():
-    """استيراد أرقام الهواتف من ملف Excel"""
-    if request.method == 'POST':
-        try:
-            file = request.files.get('excel_file')
-            if not file or file.filename == '':
-                flash('الرجاء اختيار ملف Excel', 'danger')
-                return redirect(url_for('mobile_devices.import_phone_numbers'))
-            
-            # قراءة ملف Excel
-            df = pd.read_excel(file)
-            
-            # التحقق من وجود عمود phone_number أو أرقام الهواتف
-            phone_column = None
-            description_column = None
-            
-            # البحث عن العمود المناسب لأرقام الهواتف
-            for col in df.columns:
-                if 'phone' in col.lower() or 'هاتف' in col or 'رقم' in col:
-                    phone_column = col
-                    break
-            
-            # البحث عن عمود الوصف أو الاسم
-            for col in df.columns:
-                if 'name' in col.lower() or 'description' in col.lower() or 'اسم' in col or 'وصف' in col:
-                    description_column = col
-                    break
-            
-            # إذا لم نجد عمود أرقام الهواتف، نستخدم العمود الأول
-            if phone_column is None:
-                phone_column = df.columns[0]
-            
-            imported_count = 0
-            errors = []
-            
-            for index, row in df.iterrows():
-                try:
-                    # استخراج رقم الهاتف
-                    phone_number = str(row[phone_column]).strip()
-                    
-                    # تنظيف رقم الهاتف من المسافات والرموز غير المرغوبة
-                    phone_number = phone_number.replace(' ', '').replace('-', '').replace('(', '').replace(')', '')
-                    
-                    if not phone_number or phone_number == 'nan':
-                        continue
-                    
-                    # التحقق من عدم تكرار رقم الهاتف
-                    existing_number = ImportedPhoneNumber.query.filter_by(phone_number=phone_number).first()
-                    if existing_number:
-                        continue  # تجاهل الأرقام المكررة
-                    
-                    # استخراج الوصف إذا كان موجوداً
-                    description = ''
-                    if description_column and pd.notna(row.get(description_column)):
-                        description = str(row[description_column]).strip()
-                    
-                    # إنشاء رقم هاتف مستورد جديد
-                    imported_phone = ImportedPhoneNumber()
-                    imported_phone.phone_number = phone_number
-                    imported_phone.description = description if description else None
-                    imported_phone.imported_by = current_user.id if current_user.is_authenticated else None
-                    
-                    db.session.add(imported_phone)
-                    imported_count += 1
-                    
-                except Exception as e:
-                    errors.append(f'الصف {index + 1}: {str(e)}')
-            
-            # حفظ البيانات
-            if imported_count > 0:
-                db.session.commit()
-                
-                # تسجيل العملية
-                log_activity(
-                    action='استيراد أرقام هواتف',
-                    entity_type='ImportedPhoneNumber',
-                    details=f'تم استيراد {imported_count} رقم هاتف من ملف Excel'
-                )
-            
-            # رسائل النتائج
-            if imported_count > 0:
-                flash(f'تم استيراد {imported_count} رقم هاتف بنجاح', 'success')
-            else:
-                flash('لم يتم استيراد أي أرقام جديدة', 'warning')
-            
-            if errors:
-                flash(f'حدثت أخطاء في {len(errors)} سجل', 'warning')
-            
-            return redirect(url_for('mobile_devices.dashboard'))
-            
-        except Exception as e:
-            db.session.rollback()
-            flash(f'حدث خطأ أثناء استيراد الملف: {str(e)}', 'danger')
-    
-    return render_template('mobile_devices/import_phone_numbers.html')
+    """استيراد أرقام الهواتف من ملف Excel: معاينة الفروق ثم اعتماد جماعي"""
+    def _log(result):
+        log_activity(
+            action='استيراد أرقام هواتف',
+            entity_type='ImportedPhoneNumber',
+            details=f'تم استيراد {result.inserted} رقم هاتف من ملف Excel'
+        )
+
+    return handle_staged_import(
+        IMPORT_PHONE_NUMBERS,
+        'mobile_devices/import_phone_numbers.html',
+        back_url=url_for('mobile_devices.import_phone_numbers'),
+        done_url=url_for('mobile_devices.dashboard'),
+        on_applied=_log,
+    )
 
 @mobile_devices_bp.route('/download-phone-template')
 @login_required
@@ -649,89 +572,21 @@ def bulk_unlink():
 @mobile_devices_bp.route('/import', methods=['GET', 'POST'])
 @login_required
 def import_excel():
-    """استيراد الأجهزة من ملف Excel"""
-    if request.method == 'POST':
-        try:
-            file = request.files.get('excel_file')
-            if not file or file.filename == '':
-                flash('الرجاء اختيار ملف Excel', 'danger')
-                return redirect(url_for('mobile_devices.import_excel'))
-            
-            # قراءة ملف Excel
-            df = pd.read_excel(file)
-            
-            # التحقق من الأعمدة المطلوبة
-            required_columns = ['phone_number', 'imei']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                flash(f'الأعمدة المطلوبة مفقودة: {", ".join(missing_columns)}', 'danger')
-                return redirect(url_for('mobile_devices.import_excel'))
-            
-            imported_count = 0
-            errors = []
-            
-            for index, row in df.iterrows():
-                try:
-                    # التحقق من البيانات الأساسية
-                    phone_number = str(row['phone_number']).strip()
-                    imei = str(row['imei']).strip()
-                    
-                    if not phone_number or not imei:
-                        errors.append(f'الصف {index + 1}: رقم الهاتف أو IMEI فارغ')
-                        continue
-                    
-                    # التحقق من تكرار IMEI
-                    if MobileDevice.query.filter_by(imei=imei).first():
-                        errors.append(f'الصف {index + 1}: IMEI {imei} موجود مسبقاً')
-                        continue
-                    
-                    # إنشاء الجهاز
-                    device = MobileDevice()
-                    device.phone_number = phone_number
-                    device.imei = imei
-                    device.email = str(row.get('email', '')).strip() if pd.notna(row.get('email')) else None
-                    device.device_model = str(row.get('device_model', '')).strip() if pd.notna(row.get('device_model')) else None
-                    device.device_brand = str(row.get('device_brand', '')).strip() if pd.notna(row.get('device_brand')) else None
-                    device.status = 'متاح'
-                    
-                    db.session.add(device)
-                    imported_count += 1
-                    
-                except Exception as e:
-                    errors.append(f'الصف {index + 1}: {str(e)}')
-            
-            # حفظ البيانات
-            if imported_count > 0:
-                db.session.commit()
-                
-                # تسجيل العملية
-                audit = AuditLog()
-                audit.action = 'استيراد أجهزة محمولة'
-                audit.entity_type = 'MobileDevice'
-                audit.details = f'تم استيراد {imported_count} جهاز من ملف Excel'
-                audit.user_id = current_user.id if current_user.is_authenticated else None
-                audit.timestamp = datetime.utcnow()
-                
-                db.session.add(audit)
-                db.session.commit()
-            
-            # رسائل النتائج
-            if imported_count > 0:
-                flash(f'تم استيراد {imported_count} جهاز بنجاح', 'success')
-            
-            if errors:
-                flash(f'حدثت أخطاء في {len(errors)} سجل', 'warning')
-                for error in errors[:10]:  # عرض أول 10 أخطاء
-                    flash(error, 'danger')
-            
-            return redirect(url_for('mobile_devices.index'))
-            
-        except Exception as e:
-            db.session.rollback()
-            flash(f'حدث خطأ أثناء استيراد الملف: {str(e)}', 'danger')
-    
-    return render_template('mobile_devices/import.html')
+    """استيراد الأجهزة من ملف Excel: معاينة الفروق ثم اعتماد جماعي"""
+    def _log(result):
+        log_activity(
+            action='استيراد أجهزة محمولة',
+            entity_type='MobileDevice',
+            details=f'تم استيراد {result.inserted} جهاز من ملف Excel، تحديث {result.updated}'
+        )
+
+    return handle_staged_import(
+        IMPORT_MOBILE_DEVICES,
+        'mobile_devices/import.html',
+        back_url=url_for('mobile_devices.import_excel'),
+        done_url=url_for('mobile_devices.index'),
+        on_applied=_log,
+    )
 
 @mobile_devices_bp.route('/export')
 @login_required
@@ -853,13 +708,9 @@ def assign():
         
         # تطبيق البحث النصي إذا كان محدداً
         if search:
-            employees_query = employees_query.filter(
-                or_(
-                    Employee.name.contains(search),
-                    Employee.employee_id.contains(search), 
-                    Employee.national_id.contains(search),
-                    Employee.mobile.contains(search)
-                )
+            employees_query = apply_search_filter(
+                employees_query, ENTITY_EMPLOYEE, Employee.id, search,
+                Employee.name, Employee.employee_id, Employee.national_id, Employee.mobile,
             )
         
         active_employees = employees_query.order_by(Employee.name).all()
@@ -17,10 +17,13 @@ from flask import request, flash, redirect, url_for, render_template, send_file
 from flask_login import current_user
 from datetime import datetime, timedelta
 from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
 import logging
 
 from core.extensions import db
 from models import Attendance, Employee, Department, employee_departments
+from modules.attendance.application.attendance_export_engine import stream_attendance
+from modules.search.application.search_service import ENTITY_EMPLOYEE, apply_search_filter
 from utils.date_converter import parse_date, format_date_hijri, format_date_gregorian
 from utils.excel import export_attendance_by_department
 from utils.excel_dashboard import export_attendance_by_department_with_dashboard
@@ -60,23 +63,22 @@ def export_excel():
                 flash('القسم غير موجود', 'danger')
                 return redirect(url_for('attendance.export_page'))
             
-            attendances = Attendance.query.filter(
-                Attendance.date.between(start_date, end_date)
-            ).all()
-            
-            employee_ids_with_attendance = set([att.employee_id for att in attendances])
+            # السجلات كأعمدة من مؤشر الخادم لموظفي القسم فقط، ثم مصفوفة الموظف × اليوم في الذاكرة
+            department_employee_ids = [
+                row.employee_id for row in db.session.query(employee_departments.c.employee_id).filter(
+                    employee_departments.c.department_id == department.id
+                )
+            ]
+            attendances = stream_attendance(start_date, end_date, department_employee_ids)
             
-            department_employee_ids = [emp.id for emp in department.employees]
-            employees_to_export = Employee.query.filter(
+            employees_to_export = Employee.query.options(selectinload(Employee.departments)).filter(
                 Employee.id.in_(department_employee_ids),
                 or_(
                     ~Employee.status.in_(['terminated', 'inactive']),
-                    Employee.id.in_(employee_ids_with_attendance)
+                    Employee.attendances.any(Attendance.date.between(start_date, end_date))
                 )
             ).all()
             
-            attendances = [att for att in attendances if att.employee_id in department_employee_ids]
-            
             excel_file = export_attendance_by_department(employees_to_export, attendances, start_date, end_date)
             
             if end_date_str:
@@ -84,18 +86,12 @@ def export_excel():
             else:
                 filename = f'سجل الحضور - {department.name} - {start_date_str}.xlsx'
         else:
-            departments = Department.query.all()
+            attendances = stream_attendance(start_date, end_date)
             
-            attendances = Attendance.query.filter(
-                Attendance.date.between(start_date, end_date)
-            ).all()
-            
-            employee_ids_with_attendance = set([att.employee_id for att in attendances])
-            
-            all_employees = Employee.query.filter(
+            all_employees = Employee.query.options(selectinload(Employee.departments)).filter(
                 or_(
                     ~Employee.status.in_(['terminated', 'inactive']),
-                    Employee.id.in_(employee_ids_with_attendance)
+                    Employee.attendances.any(Attendance.date.between(start_date, end_date))
                 )
             ).all()
             
@@ -199,11 +195,9 @@ def export_excel_department():
 
 def export_department_data():
     """تصدير بيانات الحضور حسب الفلاتر مع تصميم احترافي"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.chart import PieChart, BarChart, Reference
-    from openpyxl.utils import get_column_letter
-    from io import BytesIO
+    from datetime import date
+    import numpy as np
+    from modules.attendance.application import attendance_export_engine as engine
     
     try:
         department_id = request.args.get('department_id', '')
@@ -233,197 +227,128 @@ def export_department_data():
             )
         
         if search_query:
-            query = query.filter(
-                or_(
-                    Employee.name.ilike(f'%{search_query}%'),
-                    Employee.employee_id.ilike(f'%{search_query}%'),
-                    Employee.national_id.ilike(f'%{search_query}%')
-                )
+            query = apply_search_filter(
+                query, ENTITY_EMPLOYEE, Employee.id, search_query,
+                Employee.name, Employee.employee_id, Employee.national_id,
             )
         
         if status_filter:
             query = query.filter(Attendance.status == status_filter)
         
-        attendances = query.order_by(Attendance.date.desc(), Employee.name).all()
-        
-        total_count = len(attendances)
-        present_count = sum(1 for a in attendances if a.status == 'present')
-        absent_count = sum(1 for a in attendances if a.status == 'absent')
-        leave_count = sum(1 for a in attendances if a.status == 'leave')
-        sick_count = sum(1 for a in attendances if a.status == 'sick')
-        
-        wb = Workbook()
-        
-        ws = wb.active
-        ws.title = "بيانات الحضور"
-        
-        all_dates = sorted(set(att.date for att in attendances if att.date))
-        employees_dict = {}
-        for att in attendances:
-            if att.employee.id not in employees_dict:
-                employees_dict[att.employee.id] = att.employee
-        
-        sorted_employees = sorted(employees_dict.values(), key=lambda e: e.name)
-        
-        attendance_map = {}
-        for att in attendances:
-            key = (att.employee.id, att.date)
-            attendance_map[key] = att.status
-        
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 16
-        ws.column_dimensions['C'].width = 16
-        ws.column_dimensions['D'].width = 22
-        
-        for col_idx in range(len(all_dates)):
-            col_letter = get_column_letter(col_idx + 5)
-            ws.column_dimensions[col_letter].width = 4
-        
-        header_row = ['الموظف', 'الرقم الوظيفي', 'رقم الهوية', 'القسم'] + [
-            d.strftime('%b %d') for d in all_dates
-        ]
-        ws.append(header_row)
-        
-        header_fill = PatternFill(start_color="18B2B0", end_color="18B2B0", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=11)
-        thin_border = Border(
-            left=Side(style='thin', color='FFFFFF'),
-            right=Side(style='thin', color='FFFFFF'),
-            top=Side(style='thin', color='FFFFFF'),
-            bottom=Side(style='thin', color='FFFFFF')
+        # الأعمدة الثلاثة فقط من مؤشر الخادم بدل تحميل كائنات Attendance و Employee لكل سجل
+        frame = engine.read_frame(
+            query.with_entities(Attendance.employee_id, Attendance.date, Attendance.status).statement
         )
         
-        for cell in ws[1]:
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            cell.border = thin_border
-        
-        ws.row_dimensions[1].height = 28
-        
-        row_num = 2
-        for emp in sorted_employees:
-            department_name = ', '.join([d.name for d in emp.departments]) if emp.departments else '-'
-            
-            row_data = [
-                emp.name,
-                emp.employee_id or '-',
-                emp.national_id if hasattr(emp, 'national_id') and emp.national_id else '-',
-                department_name
-            ]
+        counts = engine.status_counts(frame.codes)
+        total_count = len(frame.codes)
+        present_count = int(counts[engine.CODE_PRESENT])
+        absent_count = int(counts[engine.CODE_ABSENT])
+        leave_count = int(counts[engine.CODE_LEAVE])
+        sick_count = int(counts[engine.CODE_SICK])
+        
+        all_dates = [date.fromordinal(int(o)) for o in np.unique(frame.ordinals)]
+        sorted_employees = Employee.query.options(selectinload(Employee.departments)).filter(
+            Employee.id.in_(np.unique(frame.employee_ids).tolist())
+        ).order_by(Employee.name).all()
+        matrix = engine.pivot_matrix(frame, [emp.id for emp in sorted_employees], [d.toordinal() for d in all_dates])
+        
+        # التنسيقات مسجلة مرة للملف؛ الصفوف الزوجية (2، 4، ...) بخلفية رمادية فاتحة
+        cell = {'align': 'center', 'valign': 'vcenter', 'text_wrap': True, 'border': 1, 'border_color': '#E0E0E0'}
+        even = {'bg_color': '#F8F9FA'}
+        status_cell = {
+            'P': dict(cell, bg_color='#D4EDDA', bold=True, font_color='#155724', font_size=11),
+            'A': dict(cell, bg_color='#F8D7DA', bold=True, font_color='#721C24', font_size=11),
+            'S': dict(cell, bg_color='#FFF3CD', bold=True, font_color='#856404', font_size=11),
+        }
+        stat_cell = {'align': 'center', 'valign': 'vcenter'}
+        header_fill = {'bg_color': '#18B2B0', 'font_color': '#FFFFFF', 'bold': True}
+        
+        def write(workbook):
+            formats = engine.register_formats(workbook, {
+                'header': dict(cell, border_color='#FFFFFF', font_size=11, **header_fill),
+                'name_odd': dict(cell, bold=True),
+                'name_even': dict(cell, bold=True, **even),
+                'info_odd': cell,
+                'info_even': dict(cell, **even),
+                'P': status_cell['P'],
+                'A': status_cell['A'],
+                'S': status_cell['S'],
+                'stats_title': dict(stat_cell, font_size=16, **header_fill),
+                'stats_header': dict(stat_cell, font_size=12, **header_fill),
+                'total': dict(stat_cell, bold=True, font_size=12, bg_color='#E0E7FF'),
+                'present': dict(stat_cell, bold=True, bg_color='#D4EDDA', font_color='#155724'),
+                'absent': dict(stat_cell, bold=True, bg_color='#F8D7DA', font_color='#721C24'),
+                'leave': dict(stat_cell, bold=True, bg_color='#FFF3CD', font_color='#856404'),
+                'sick': dict(stat_cell, bold=True, bg_color='#D1ECF1', font_color='#0C5460'),
+            })
+            # الإجازة والمرضي يظهران S في المصفوفة
+            labels = ('', 'P', 'A', 'S', 'S')
             
-            for date in all_dates:
-                status = attendance_map.get((emp.id, date), '')
-                
-                if status == 'present':
-                    row_data.append('P')
-                elif status == 'absent':
-                    row_data.append('A')
-                elif status == 'leave' or status == 'sick':
-                    row_data.append('S')
-                else:
-                    row_data.append('')
+            ws = workbook.add_worksheet("بيانات الحضور")
+            ws.set_column(0, 0, 20)
+            ws.set_column(1, 2, 16)
+            ws.set_column(3, 3, 22)
+            if all_dates:
+                ws.set_column(4, 3 + len(all_dates), 4)
             
-            ws.append(row_data)
+            header_row = ['الموظف', 'الرقم الوظيفي', 'رقم الهوية', 'القسم'] + [d.strftime('%b %d') for d in all_dates]
+            ws.set_row(0, 28)
+            for col, value in enumerate(header_row):
+                ws.write_string(0, col, value, formats['header'])
             
-            for col_idx in range(1, len(row_data) + 1):
-                cell_obj = ws.cell(row=row_num, column=col_idx)
-                cell_obj.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell_obj.border = Border(
-                    left=Side(style='thin', color='E0E0E0'),
-                    right=Side(style='thin', color='E0E0E0'),
-                    top=Side(style='thin', color='E0E0E0'),
-                    bottom=Side(style='thin', color='E0E0E0')
-                )
-                
-                if col_idx <= 4:
-                    cell_obj.font = Font(bold=True if col_idx == 1 else False)
-                    if row_num % 2 == 0:
-                        cell_obj.fill = PatternFill(start_color="F8F9FA", end_color="F8F9FA", fill_type="solid")
-                else:
-                    value = cell_obj.value
-                    if value == 'P':
-                        cell_obj.fill = PatternFill(start_color="D4EDDA", end_color="D4EDDA", fill_type="solid")
-                        cell_obj.font = Font(bold=True, color="155724", size=11)
-                    elif value == 'A':
-                        cell_obj.fill = PatternFill(start_color="F8D7DA", end_color="F8D7DA", fill_type="solid")
-                        cell_obj.font = Font(bold=True, color="721C24", size=11)
-                    elif value == 'S':
-                        cell_obj.fill = PatternFill(start_color="FFF3CD", end_color="FFF3CD", fill_type="solid")
-                        cell_obj.font = Font(bold=True, color="856404", size=11)
+            for index, emp in enumerate(sorted_employees):
+                row = index + 1
+                parity = 'even' if (row + 1) % 2 == 0 else 'odd'
+                ws.set_row(row, 20)
+                department_name = ', '.join([d.name for d in emp.departments]) if emp.departments else '-'
+                ws.write(row, 0, emp.name, formats[f'name_{parity}'])
+                ws.write(row, 1, emp.employee_id or '-', formats[f'info_{parity}'])
+                ws.write(row, 2, emp.national_id or '-', formats[f'info_{parity}'])
+                ws.write(row, 3, department_name, formats[f'info_{parity}'])
+                blank = formats[f'info_{parity}']
+                for col, code in enumerate(matrix[index].tolist(), start=4):
+                    label = labels[code]
+                    if label:
+                        ws.write_string(row, col, label, formats[label])
                     else:
-                        if row_num % 2 == 0:
-                            cell_obj.fill = PatternFill(start_color="F8F9FA", end_color="F8F9FA", fill_type="solid")
+                        ws.write_blank(row, col, None, blank)
             
-            ws.row_dimensions[row_num].height = 20
-            row_num += 1
-        
-        stats_ws = wb.create_sheet("الإحصائيات")
-        
-        stats_ws.merge_cells('A1:D1')
-        title_cell = stats_ws['A1']
-        title_cell.value = "ملخص إحصائيات الحضور"
-        title_cell.font = Font(bold=True, size=16, color="FFFFFF")
-        title_cell.fill = PatternFill(start_color="18B2B0", end_color="18B2B0", fill_type="solid")
-        title_cell.alignment = Alignment(horizontal='center', vertical='center')
-        stats_ws.row_dimensions[1].height = 32
-        
-        stats_ws.column_dimensions['A'].width = 25
-        stats_ws.column_dimensions['B'].width = 18
-        stats_ws.column_dimensions['C'].width = 18
-        stats_ws.column_dimensions['D'].width = 18
-        
-        stats_data = [
-            ['', 'العدد', 'النسبة %', 'الحالة'],
-            ['إجمالي السجلات', total_count, '100%', 'total'],
-            ['موظفون حاضرون', present_count, f'{int((present_count/max(total_count,1))*100)}%', 'present'],
-            ['موظفون غائبون', absent_count, f'{int((absent_count/max(total_count,1))*100)}%', 'absent'],
-            ['إجازات', leave_count, f'{int((leave_count/max(total_count,1))*100)}%', 'leave'],
-            ['مرضي', sick_count, f'{int((sick_count/max(total_count,1))*100)}%', 'sick']
-        ]
-        
-        for idx, row_data in enumerate(stats_data, 2):
-            for col_idx, value in enumerate(row_data[:3], 1):
-                cell = stats_ws.cell(row=idx, column=col_idx)
-                cell.value = value
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                
-                if idx == 2:
-                    cell.font = Font(bold=True, color="FFFFFF", size=12)
-                    cell.fill = PatternFill(start_color="18B2B0", end_color="18B2B0", fill_type="solid")
-                elif row_data[3] == 'total':
-                    cell.font = Font(bold=True, size=12)
-                    cell.fill = PatternFill(start_color="E0E7FF", end_color="E0E7FF", fill_type="solid")
-                elif row_data[3] == 'present':
-                    cell.fill = PatternFill(start_color="D4EDDA", end_color="D4EDDA", fill_type="solid")
-                    cell.font = Font(bold=True, color="155724")
-                elif row_data[3] == 'absent':
-                    cell.fill = PatternFill(start_color="F8D7DA", end_color="F8D7DA", fill_type="solid")
-                    cell.font = Font(bold=True, color="721C24")
-                elif row_data[3] == 'leave':
-                    cell.fill = PatternFill(start_color="FFF3CD", end_color="FFF3CD", fill_type="solid")
-                    cell.font = Font(bold=True, color="856404")
-                elif row_data[3] == 'sick':
-                    cell.fill = PatternFill(start_color="D1ECF1", end_color="D1ECF1", fill_type="solid")
-                    cell.font = Font(bold=True, color="0C5460")
-                
-                stats_ws.row_dimensions[idx].height = 26
-        
-        if total_count > 0:
-            pie = PieChart()
-            pie.title = "توزيع حالات الحضور"
-            pie.style = 10
-            labels = Reference(stats_ws, min_col=1, min_row=3, max_row=6)
-            data = Reference(stats_ws, min_col=2, min_row=2, max_row=6)
-            pie.add_data(data, titles_from_data=True)
-            pie.set_categories(labels)
-            pie.height = 12
-            pie.width = 16
-            stats_ws.add_chart(pie, "A9")
-        
-        output = BytesIO()
-        wb.save(output)
-        output.seek(0)
+            stats_ws = workbook.add_worksheet("الإحصائيات")
+            stats_ws.set_column(0, 0, 25)
+            stats_ws.set_column(1, 3, 18)
+            stats_ws.set_row(0, 32)
+            stats_ws.merge_range('A1:D1', "ملخص إحصائيات الحضور", formats['stats_title'])
+            
+            def percent(count):
+                return f'{int((count / max(total_count, 1)) * 100)}%'
+            
+            stats_data = [
+                ['', 'العدد', 'النسبة %', 'stats_header'],
+                ['إجمالي السجلات', total_count, '100%', 'total'],
+                ['موظفون حاضرون', present_count, percent(present_count), 'present'],
+                ['موظفون غائبون', absent_count, percent(absent_count), 'absent'],
+                ['إجازات', leave_count, percent(leave_count), 'leave'],
+                ['مرضي', sick_count, percent(sick_count), 'sick']
+            ]
+            for row, row_data in enumerate(stats_data, start=1):
+                stats_ws.set_row(row, 26)
+                stats_ws.write_row(row, 0, row_data[:3], formats[row_data[3]])
+            
+            if total_count > 0:
+                # الحالات الأربع فقط (الصفوف 4-7) دون صف الإجمالي
+                pie = workbook.add_chart({'type': 'pie'})
+                pie.add_series({
+                    'name': 'العدد',
+                    'categories': ['الإحصائيات', 3, 0, 6, 0],
+                    'values': ['الإحصائيات', 3, 1, 6, 1],
+                })
+                pie.set_title({'name': 'توزيع حالات الحضور'})
+                pie.set_style(10)
+                pie.set_size({'width': 605, 'height': 454})
+                stats_ws.insert_chart('A9', pie)
+        
+        output = engine.build_workbook(write)
         
         filename = f"حضور_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}.xlsx"
         return send_file(output, mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
@@ -12,11 +12,11 @@ Routes:
 from flask import Blueprint, render_template, request, flash, redirect, url_for
 from flask_login import current_user
 from datetime import datetime, timedelta
-from sqlalchemy import or_
 import logging
 
 from core.extensions import db
 from models import Attendance, Employee, Department, employee_departments
+from modules.search.application.search_service import ENTITY_EMPLOYEE, apply_search_filter
 from utils.date_converter import parse_date, format_date_hijri, format_date_gregorian
 from services.attendance_engine import AttendanceEngine
 
@@ -138,12 +138,9 @@ def department_attendance_view():
     
     # تطبيق البحث عن الموظف (الاسم، رقم الهوية، الرقم الوظيفي)
     if search_query:
-        query = query.filter(
-            or_(
-                Employee.name.ilike(f'%{search_query}%'),
-                Employee.employee_id.ilike(f'%{search_query}%'),
-                Employee.national_id.ilike(f'%{search_query}%')
-            )
+        query = apply_search_filter(
+            query, ENTITY_EMPLOYEE, Employee.id, search_query,
+            Employee.name, Employee.employee_id, Employee.national_id,
         )
     
     # تطبيق فلتر الحالة
@@ -19,6 +19,7 @@ import logging
 
 from core.extensions import db
 from models import Attendance, Employee, Department
+from modules.business_calendar.application.business_calendar_service import get_calendar
 from utils.date_converter import parse_date, format_date_hijri, format_date_gregorian
 from services.attendance_engine import AttendanceEngine
 from utils.audit_logger import log_attendance_activity
@@ -416,19 +417,11 @@ def department_bulk_attendance():
                 flash('لا يوجد موظفين نشطين في هذا القسم', 'warning')
                 return redirect(url_for('attendance.department_bulk_attendance'))
             
-            # إنشاء قائمة التواريخ
-            date_list = []
-            current_date = start_date
-            while current_date <= end_date:
-                # تخطي عطلة نهاية الأسبوع إذا تم تحديد الخيار
-                if skip_weekends:
-                    # 4 = الجمعة، 5 = السبت في Python (0=الإثنين)
-                    if current_date.weekday() in [4, 5]:
-                        current_date += timedelta(days=1)
-                        continue
-                
-                date_list.append(current_date)
-                current_date += timedelta(days=1)
+            # إنشاء قائمة التواريخ (تخطي أيام الراحة والعطل الرسمية حسب تقويم القسم إذا تم تحديد الخيار)
+            if skip_weekends:
+                date_list = get_calendar(department.id).working_dates(start_date, end_date)
+            else:
+                date_list = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
             
             # حساب الإحصائيات
             created_count = 0
@@ -9,6 +9,7 @@ from core.extensions import db
 from models import Employee, UserRole
 from modules.leave.domain.models import LeaveRequest, LeaveBalance
 from modules.leave.application.leave_service import LeaveService
+from modules.search.application.search_service import ENTITY_EMPLOYEE, apply_search_filter
 
 
 leave_bp = Blueprint('leaves', __name__)
@@ -189,8 +190,9 @@ def leave_balances():
     query = LeaveBalance.query.filter_by(balance_year=year)
 
     if search:
-        query = query.join(Employee, LeaveBalance.employee_id == Employee.id).filter(
-            Employee.name.ilike(f'%{search}%')
+        query = apply_search_filter(
+            query.join(Employee, LeaveBalance.employee_id == Employee.id),
+            ENTITY_EMPLOYEE, Employee.id, search, Employee.name,
         )
 
     if leave_type_filter:
@@ -7,7 +7,7 @@ from flask import Blueprint, request, jsonify
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from datetime import datetime, date, time, timezone, timedelta
-from sqlalchemy import func, and_, or_
+from sqlalchemy import func, and_
 from decimal import Decimal
 from functools import wraps
 import json
@@ -18,7 +18,19 @@ import logging
 from math import radians, sin, cos, sqrt, atan2
 
 from core.extensions import db
-from models import Employee, Attendance, EmployeeLocation, Geofence, GeofenceSession
+from core.principal_cache import resolve_principal
+from models import Attendance, GeofenceSession
+from modules.attendance.application.check_in_pipeline import (
+    CODE_ALREADY_CHECKED_OUT,
+    CODE_NO_CHECK_IN,
+    eligible_fences,
+    nearest_fence,
+    record_check_in,
+    record_check_out,
+    stage_face_image,
+    timed,
+    write_face_image_async,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -72,13 +84,10 @@ def token_required(f):
             }), 401
         
         try:
-            data = jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
-            current_employee = Employee.query.filter_by(
-                employee_id=data['employee_id'],
-                status='active'
-            ).first()
+            # لقطة الموظف من ذاكرة الهوية (بدون استعلام لكل طلب)
+            _, current_employee = resolve_principal(token, SECRET_KEY)
             
-            if not current_employee:
+            if not current_employee or not current_employee.is_active:
                 return jsonify({
                     'success': False,
                     'error': 'الموظف غير موجود أو غير نشط',
@@ -232,23 +241,19 @@ def verify_geofence(employee, latitude, longitude, strict=True):
     التحقق من أن الموظف داخل منطقة العمل
     
     Args:
-        employee: كائن الموظف
+        employee: كائن الموظف أو لقطته (EmployeePrincipal)
         latitude: خط العرض
         longitude: خط الطول
         strict: إذا كان True، يُطلب وجود geofence محدد
     
     Returns:
-        (success: bool, geofence: Geofence|None, message: str)
+        (success: bool, geofence: Fence|None, message: str)
     """
     try:
-        # البحث عن geofences المرتبطة بالموظف أو القسم
-        geofences = Geofence.query.filter(
-            or_(
-                Geofence.employees.contains(employee),
-                Geofence.department_id == employee.department_id
-            ),
-            Geofence.is_active == True
-        ).all()
+        # مناطق الموظف وأقسامه من ذاكرة خط الحضور (استعلام واحد عند أول طلب فقط)
+        with timed("geofence"):
+            geofences = eligible_fences(employee)
+            inside, geofence, distance = nearest_fence(geofences, float(latitude), float(longitude))
         
         if not geofences:
             if GEOFENCE_REQUIRED or strict:
@@ -259,82 +264,33 @@ def verify_geofence(employee, latitude, longitude, strict=True):
                 logger.warning(f"No geofence assigned for employee {employee.employee_id}")
                 return True, None, "⚠️ لا توجد منطقة محددة (تحذير)"
         
-        # التحقق من وجود الموظف داخل أي geofence
-        closest_distance = None
-        closest_geofence = None
-        
-        for geofence in geofences:
-            distance = calculate_distance(
-                float(geofence.latitude),
-                float(geofence.longitude),
-                float(latitude),
-                float(longitude)
-            )
-            
-            if distance is None:
-                continue
-                
-            # حفظ أقرب منطقة
-            if closest_distance is None or distance < closest_distance:
-                closest_distance = distance
-                closest_geofence = geofence
-            
-            # التحقق من الدخول
-            if distance <= float(geofence.radius):
-                logger.info(f"OK Employee {employee.employee_id} inside geofence '{geofence.name}' (distance: {distance:.1f}m)")
-                return True, geofence, f"✓ داخل منطقة {geofence.name}"
+        if inside:
+            logger.info(f"OK Employee {employee.employee_id} inside geofence '{geofence.name}' (distance: {distance:.1f}m)")
+            return True, geofence, f"✓ داخل منطقة {geofence.name}"
         
         # الموظف خارج جميع المناطق
-        if closest_geofence and closest_distance:
-            logger.warning(
-                f"✗ Employee {employee.employee_id} outside geofence. "
-                f"Closest: '{closest_geofence.name}' at {closest_distance:.1f}m "
-                f"(max: {closest_geofence.radius}m)"
-            )
-            return False, closest_geofence, (
-                f"✗ خارج منطقة العمل - أنت على بُعد {closest_distance:.0f}م من '{closest_geofence.name}' "
-                f"(المسموح: {closest_geofence.radius}م)"
-            )
-        else:
-            return False, None, "✗ خارج جميع مناطق العمل المحددة"
+        logger.warning(
+            f"✗ Employee {employee.employee_id} outside geofence. "
+            f"Closest: '{geofence.name}' at {distance:.1f}m "
+            f"(max: {geofence.radius:.0f}m)"
+        )
+        return False, geofence, (
+            f"✗ خارج منطقة العمل - أنت على بُعد {distance:.0f}م من '{geofence.name}' "
+            f"(المسموح: {geofence.radius:.0f}م)"
+        )
         
     except Exception as e:
         logger.error(f"Error verifying geofence for {employee.employee_id}: {e}")
         return False, None, f"خطأ في التحقق من الموقع: {str(e)}"
 
 
-def save_face_image(face_image, employee_id, check_type='check_in'):
-    """حفظ صورة الوجه"""
-    try:
-        if not face_image:
-            return None
-        
-        # إنشاء مجلد التخزين
-        upload_folder = 'static/uploads/attendance'
-        os.makedirs(upload_folder, exist_ok=True)
-        
-        # توليد اسم فريد للملف
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f'{check_type}_{employee_id}_{timestamp}.jpg'
-        filepath = os.path.join(upload_folder, filename)
-        
-        # حفظ الصورة
-        face_image.save(filepath)
-        
-        # إرجاع المسار النسبي
-        return f'uploads/attendance/{filename}'
-        
-    except Exception as e:
-        logger.error(f"Error saving face image: {e}")
-        return None
-
-
 # ============================================
 # API Endpoints
 # ============================================
 
 @attendance_api_bp.route('/check-in', methods=['POST'])
 @token_required
+@timed('check_in')
 def attendance_check_in(current_employee):
     """
     تسجيل الحضور مع التحقق من الوجه والموقع (محمي بـ JWT)
@@ -447,75 +403,50 @@ def attendance_check_in(current_employee):
                 }
             }), 403
         
-        # 7. التحقق من عدم التحضير المتكرر
+        # 7. قراءة صورة الوجه (تُكتب على القرص بعد الحفظ)
         today = date.today()
-        existing_attendance = Attendance.query.filter(
-            Attendance.employee_id == current_employee.id,
-            Attendance.date == today
-        ).first()
+        staged_image = stage_face_image(face_image, current_employee.employee_id, 'check_in')
+        
+        # 8. سجل الحضور (upsert على الموظف واليوم) والموقع في معاملة واحدة
+        verification_id = f'ver_{int(datetime.now().timestamp() * 1000)}'
+        check_in_time = check_in_timestamp.time()
+        result = record_check_in(
+            current_employee.id,
+            today,
+            attendance={
+                'check_in': check_in_time,
+                'check_in_latitude': Decimal(str(latitude)),
+                'check_in_longitude': Decimal(str(longitude)),
+                'check_in_accuracy': Decimal(str(accuracy)),
+                'check_in_face_image': staged_image.relative_path if staged_image else None,
+                'check_in_confidence': Decimal(str(confidence)) if confidence else None,
+                'check_in_liveness_score': Decimal(str(liveness_score)) if liveness_score else None,
+                'check_in_device_info': device_fingerprint,
+                'check_in_verification_id': verification_id,
+            },
+            location={
+                'latitude': Decimal(str(latitude)),
+                'longitude': Decimal(str(longitude)),
+                'accuracy': Decimal(str(accuracy)),
+                'recorded_at': check_in_timestamp,
+                'notes': f'تسجيل حضور - {geofence_msg}',
+            },
+        )
         
-        if existing_attendance and existing_attendance.check_in:
+        # 9. التحقق من عدم التحضير المتكرر
+        if not result.ok:
             return jsonify({
                 'success': False,
                 'error': 'تم تسجيل الحضور مسبقاً اليوم',
                 'code': 'ALREADY_CHECKED_IN',
                 'data': {
-                    'check_in_time': existing_attendance.check_in.strftime('%H:%M:%S'),
+                    'check_in_time': result.check_in.strftime('%H:%M:%S') if result.check_in else None,
                     'date': today.strftime('%Y-%m-%d')
                 }
             }), 400
         
-        # 8. حفظ صورة الوجه
-        face_image_path = save_face_image(face_image, current_employee.employee_id, 'check_in')
-        
-        # 9. إنشاء أو تحديث سجل الحضور
-        verification_id = f'ver_{int(datetime.now().timestamp() * 1000)}'
-        check_in_time = check_in_timestamp.time()
-        
-        if existing_attendance:
-            # تحديث السجل الموجود
-            existing_attendance.check_in = check_in_time
-            existing_attendance.status = 'present'
-            existing_attendance.check_in_latitude = Decimal(str(latitude))
-            existing_attendance.check_in_longitude = Decimal(str(longitude))
-            existing_attendance.check_in_accuracy = Decimal(str(accuracy))
-            existing_attendance.check_in_face_image = face_image_path
-            existing_attendance.check_in_confidence = Decimal(str(confidence)) if confidence else None
-            existing_attendance.check_in_liveness_score = Decimal(str(liveness_score)) if liveness_score else None
-            existing_attendance.check_in_device_info = device_fingerprint
-            existing_attendance.check_in_verification_id = verification_id
-            attendance_record = existing_attendance
-        else:
-            # إنشاء سجل جديد
-            attendance_record = Attendance(
-                employee_id=current_employee.id,
-                date=today,
-                check_in=check_in_time,
-                status='present',
-                check_in_latitude=Decimal(str(latitude)),
-                check_in_longitude=Decimal(str(longitude)),
-                check_in_accuracy=Decimal(str(accuracy)),
-                check_in_face_image=face_image_path,
-                check_in_confidence=Decimal(str(confidence)) if confidence else None,
-                check_in_liveness_score=Decimal(str(liveness_score)) if liveness_score else None,
-                check_in_device_info=device_fingerprint,
-                check_in_verification_id=verification_id
-            )
-            db.session.add(attendance_record)
-        
-        # 10. حفظ موقع الموظف
-        location_record = EmployeeLocation(
-            employee_id=current_employee.id,
-            latitude=Decimal(str(latitude)),
-            longitude=Decimal(str(longitude)),
-            accuracy_m=Decimal(str(accuracy)),
-            source='attendance_check_in',
-            recorded_at=check_in_timestamp,
-            notes=f'تسجيل حضور - {geofence_msg}'
-        )
-        db.session.add(location_record)
-        
-        db.session.commit()
+        # 10. حفظ صورة الوجه
+        write_face_image_async(staged_image)
         
         # 11. تسجيل المحاولة الناجحة
         record_attempt(current_employee.employee_id, success=True)
@@ -524,7 +455,7 @@ def attendance_check_in(current_employee):
         response_data = {
             'verification_id': verification_id,
             'server_timestamp': datetime.now(timezone.utc).isoformat(),
-            'attendance_id': attendance_record.id,
+            'attendance_id': result.attendance_id,
             'employee_id': current_employee.employee_id,
             'employee_name': current_employee.name,
             'check_in_time': check_in_time.strftime('%H:%M:%S'),
@@ -563,6 +494,7 @@ def attendance_check_in(current_employee):
 
 @attendance_api_bp.route('/check-out', methods=['POST'])
 @token_required
+@timed('check_out')
 def attendance_check_out(current_employee):
     """تسجيل الانصراف (محمي بـ JWT)"""
     try:
@@ -594,57 +526,54 @@ def attendance_check_out(current_employee):
         # 2. استقبال الصورة (اختياري)
         face_image = request.files.get('face_image')
         
-        # 3. البحث عن سجل الحضور لليوم
+        # 3. قراءة صورة الوجه (تُكتب على القرص بعد الحفظ)
         today = date.today()
-        attendance_record = Attendance.query.filter(
-            Attendance.employee_id == current_employee.id,
-            Attendance.date == today
-        ).first()
+        now = datetime.now()
+        staged_image = stage_face_image(face_image, current_employee.employee_id, 'check_out', now)
+        
+        # 4. تحديث سجل الحضور (مشروط بوجود حضور وعدم وجود انصراف) وحفظ الموقع في معاملة واحدة
+        check_out_time = now.time()
+        result = record_check_out(
+            current_employee.id,
+            today,
+            attendance={
+                'check_out': check_out_time,
+                'check_out_latitude': Decimal(str(latitude)),
+                'check_out_longitude': Decimal(str(longitude)),
+                'check_out_accuracy': Decimal(str(accuracy)),
+                'check_out_face_image': staged_image.relative_path if staged_image else None,
+            },
+            location={
+                'latitude': Decimal(str(latitude)),
+                'longitude': Decimal(str(longitude)),
+                'accuracy': Decimal(str(accuracy)),
+                'recorded_at': datetime.now(timezone.utc),
+                'notes': 'تسجيل انصراف',
+            },
+        )
         
-        if not attendance_record or not attendance_record.check_in:
+        if result.code == CODE_NO_CHECK_IN:
             return jsonify({
                 'success': False,
                 'error': 'لم يتم تسجيل الحضور اليوم. يجب تسجيل الحضور أولاً.',
                 'code': 'NO_CHECK_IN'
             }), 400
         
-        if attendance_record.check_out:
+        if result.code == CODE_ALREADY_CHECKED_OUT:
             return jsonify({
                 'success': False,
                 'error': 'تم تسجيل الانصراف مسبقاً',
                 'code': 'ALREADY_CHECKED_OUT',
                 'data': {
-                    'check_out_time': attendance_record.check_out.strftime('%H:%M:%S')
+                    'check_out_time': result.check_out.strftime('%H:%M:%S')
                 }
             }), 400
         
-        # 4. حفظ صورة الوجه
-        face_image_path = save_face_image(face_image, current_employee.employee_id, 'check_out')
-        
-        # 5. تحديث سجل الحضور
-        check_out_time = datetime.now().time()
-        attendance_record.check_out = check_out_time
-        attendance_record.check_out_latitude = Decimal(str(latitude))
-        attendance_record.check_out_longitude = Decimal(str(longitude))
-        attendance_record.check_out_accuracy = Decimal(str(accuracy))
-        attendance_record.check_out_face_image = face_image_path
-        
-        # 6. حفظ موقع الموظف
-        location_record = EmployeeLocation(
-            employee_id=current_employee.id,
-            latitude=Decimal(str(latitude)),
-            longitude=Decimal(str(longitude)),
-            accuracy_m=Decimal(str(accuracy)),
-            source='attendance_check_out',
-            recorded_at=datetime.now(timezone.utc),
-            notes='تسجيل انصراف'
-        )
-        db.session.add(location_record)
-        
-        db.session.commit()
+        # 5. حفظ صورة الوجه
+        write_face_image_async(staged_image)
         
         # 7. حساب ساعات العمل
-        check_in_datetime = datetime.combine(today, attendance_record.check_in)
+        check_in_datetime = datetime.combine(today, result.check_in)
         check_out_datetime = datetime.combine(today, check_out_time)
         work_duration = (check_out_datetime - check_in_datetime).total_seconds() / 3600  # بالساعات
         
@@ -656,7 +585,7 @@ def attendance_check_out(current_employee):
             'data': {
                 'employee_id': current_employee.employee_id,
                 'employee_name': current_employee.name,
-                'check_in_time': attendance_record.check_in.strftime('%H:%M:%S'),
+                'check_in_time': result.check_in.strftime('%H:%M:%S'),
                 'check_out_time': check_out_time.strftime('%H:%M:%S'),
                 'work_duration_hours': round(work_duration, 2),
                 'date': today.strftime('%Y-%m-%d')
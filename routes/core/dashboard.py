@@ -1,8 +1,6 @@
 from flask import Blueprint, render_template, jsonify, redirect, url_for, flash
-from sqlalchemy import func, desc
-from datetime import datetime, timedelta
+from datetime import datetime
 from flask_login import login_required, current_user
-from core.extensions import db
 from utils.decorators import module_access_required
 import logging
 
@@ -40,113 +38,27 @@ def _render_dashboard_fallback(now=None):
 @module_access_required("DASHBOARD")
 def index():
     """Main dashboard with overview of system statistics"""
-    # استيراد الموديلات هنا لتجنب الاستيراد الدائري أثناء تهيئة التطبيق
-    from models import (
-        Employee,
-        Department,
-        Attendance,
-        Document,
-        Salary,
-        Module,
-        UserRole,
-        employee_departments,
+    # استيراد الخدمة هنا لتجنب الاستيراد الدائري أثناء تهيئة التطبيق
+    from services.dashboard_snapshot_service import (
+        build_index_context,
+        get_dashboard_snapshot,
+        render_cached_fragment,
     )
     now = datetime.now()
     try:
-        total_active_employees = Employee.query.filter_by(status='active').count()
-        total_all_employees = Employee.query.count()
-        total_departments = Department.query.count()
-
-        today = now.date()
-        today_attendance = Attendance.query.filter_by(date=today).count()
-
-        expiry_threshold = today + timedelta(days=30)
-
-        from sqlalchemy import case
-        doc_stats_result = db.session.query(
-            func.count().label('total'),
-            func.sum(case((Document.expiry_date < today, 1), else_=0)).label('expired'),
-            func.sum(case(((Document.expiry_date >= today) & (Document.expiry_date <= expiry_threshold), 1), else_=0)).label('expiring'),
-            func.sum(case((Document.expiry_date > expiry_threshold, 1), else_=0)).label('valid'),
-            func.sum(case((Document.expiry_date.is_(None), 1), else_=0)).label('no_expiry')
-        ).one()
-
-        total_documents = doc_stats_result.total or 0
-        expired_documents = doc_stats_result.expired or 0
-        expiring_documents = doc_stats_result.expiring or 0
-        valid_documents = doc_stats_result.valid or 0
-        no_expiry_documents = doc_stats_result.no_expiry or 0
-
-        document_stats = {
-            'total': total_documents,
-            'valid': valid_documents,
-            'expired': expired_documents,
-            'expiring': expiring_documents,
-            'no_expiry': no_expiry_documents
-        }
-
-        departments = db.session.query(
-            Department.name,
-            func.count(Employee.id).label('employee_count')
-        ).outerjoin(
-            employee_departments, Department.id == employee_departments.c.department_id
-        ).outerjoin(
-            Employee, (employee_departments.c.employee_id == Employee.id) & (Employee.status == 'active')
-        ).group_by(Department.id, Department.name).all()
-
-        recent_employees = Employee.query.order_by(Employee.created_at.desc()).limit(5).all()
-
-        current_year = now.year
-        monthly_salaries = db.session.query(
-            Salary.month,
-            func.sum(Salary.net_salary).label('total')
-        ).filter(
-            Salary.year == current_year
-        ).group_by(Salary.month).all()
-
-        dept_labels = [dept.name for dept in departments]
-        dept_data = [count for _, count in departments]
-        if not dept_labels:
-            dept_labels = ["لا يوجد أقسام"]
-            dept_data = [0]
-
-        salary_labels = [f"شهر {month}" for month, _ in monthly_salaries]
-        salary_data = [float(total) for _, total in monthly_salaries]
-        if not salary_labels:
-            salary_labels = ["لا يوجد بيانات"]
-            salary_data = [0]
-
-        status_stats = db.session.query(
-            Employee.status,
-            func.count(Employee.id).label('count')
-        ).group_by(Employee.status).all()
-
-        status_map = {
-            'active': 'نشط',
-            'inactive': 'غير نشط',
-            'on_leave': 'في إجازة',
-            'terminated': 'متوقف عن العمل'
-        }
-
-        status_data = [
-            {'status': status_map.get(stat.status, stat.status), 'count': stat.count}
-            for stat in status_stats
-        ]
-
+        # الإحصائيات من اللقطة المشتركة بدلاً من حسابها لكل زيارة
+        snapshot = get_dashboard_snapshot()
+        context = build_index_context(snapshot)
+        dashboard_fragment = render_cached_fragment(
+            'partials/dashboard/_content.html',
+            getattr(current_user, 'role', None),
+            snapshot,
+            **context,
+        )
         return render_template('dashboard.html',
                               now=now,
-                              total_employees=total_active_employees,
-                              total_all_employees=total_all_employees,
-                              total_departments=total_departments,
-                              today_attendance=today_attendance,
-                              document_stats=document_stats,
-                              expiring_documents=expiring_documents,
-                              recent_employees=recent_employees,
-                              dept_labels=dept_labels,
-                              dept_data=dept_data,
-                              salary_labels=salary_labels,
-                              salary_data=salary_data,
-                              status_data=status_data)
+                              dashboard_fragment=dashboard_fragment,
+                              **context)
     except Exception as e:
         logger.exception("Dashboard index failed: %s", str(e))
         flash('تعذر تحميل بيانات لوحة التحكم بالكامل حالياً، وتم عرض نسخة مبسطة.', 'warning')
@@ -157,189 +69,38 @@ def index():
 @module_access_required("DASHBOARD")
 def employee_stats():
     """عرض إحصائيات الموظفين حسب القسم والحالة مع فلترة حسب قسم المستخدم"""
-    # استيراد الموديلات هنا لتجنب الاستيراد الدائري
-    from models import (
-        Employee,
-        Department,
-        employee_departments,
+    from services.dashboard_snapshot_service import (
+        STATUS_LABELS,
+        get_dashboard_snapshot,
+        get_department_stats,
     )
+    snapshot = get_dashboard_snapshot()
+
     # فلترة الإحصائيات حسب القسم المحدد للمستخدم الحالي
-    
-    if current_user.assigned_department_id:
-        # إذا كان المستخدم مرتبط بقسم محدد، عرض إحصائيات ذلك القسم فقط
-        department_stats = db.session.query(
-            Department.id,
-            Department.name,
-            func.count(func.distinct(Employee.id)).label('employee_count')
-        ).outerjoin(
-            employee_departments, Department.id == employee_departments.c.department_id
-        ).outerjoin(
-            Employee, employee_departments.c.employee_id == Employee.id
-        ).filter(
-            Department.id == current_user.assigned_department_id
-        ).group_by(Department.id, Department.name).all()
-    else:
-        # إذا لم يكن المستخدم مرتبط بقسم، عرض جميع الأقسام (للمديرين العامين)
-        department_stats = db.session.query(
-            Department.id,
-            Department.name,
-            func.count(func.distinct(Employee.id)).label('employee_count')
-        ).outerjoin(
-            employee_departments, Department.id == employee_departments.c.department_id
-        ).outerjoin(
-            Employee, employee_departments.c.employee_id == Employee.id
-        ).group_by(Department.id, Department.name).order_by(func.count(func.distinct(Employee.id)).desc()).all()
-    
-    # إحصائيات الموظفين حسب الحالة
-    status_stats = db.session.query(
-        Employee.status,
-        func.count(Employee.id).label('count')
-    ).group_by(Employee.status).all()
-    
-    # ترجمة حالات الموظفين
-    status_map = {
-        'active': 'نشط',
-        'inactive': 'غير نشط',
-        'on_leave': 'في إجازة',
-        'terminated': 'متوقف عن العمل'
-    }
-    
+    # (المستخدم غير المرتبط بقسم - المدير العام - يرى جميع الأقسام)
+    detailed_stats = get_department_stats(snapshot, current_user.assigned_department_id)
+    department_stats = [
+        {'id': d['department_id'], 'name': d['department_name'], 'employee_count': d['total']}
+        for d in detailed_stats
+    ]
+
     status_data = [
-        {'status': status_map.get(stat.status, stat.status), 'count': stat.count}
-        for stat in status_stats
+        {'status': STATUS_LABELS.get(status, status), 'count': count}
+        for status, count in snapshot['status_counts'].items()
     ]
-    
-    # إحصائيات الموظفين حسب القسم والحالة مع فلترة القسم
-    detailed_stats = []
-    
-    if current_user.assigned_department_id:
-        # عرض إحصائيات القسم المحدد فقط
-        dept = Department.query.get(current_user.assigned_department_id)
-        if dept:
-            # حساب عدد الموظفين في القسم حسب الحالة
-            active_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id,
-                Employee.status == 'active'
-            ).count()
-            
-            inactive_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id,
-                Employee.status == 'inactive'
-            ).count()
-            
-            on_leave_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id,
-                Employee.status == 'on_leave'
-            ).count()
-            
-            terminated_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id,
-                Employee.status == 'terminated'
-            ).count()
-            
-            total_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id
-            ).count()
-            
-            dept_stats = {
-                'department_id': dept.id,
-                'department_name': dept.name,
-                'active': active_count,
-                'inactive': inactive_count,
-                'on_leave': on_leave_count,
-                'terminated': terminated_count,
-                'total': total_count,
-                'total_active': active_count,
-            }
-            detailed_stats.append(dept_stats)
-    else:
-        # عرض جميع الأقسام (للمديرين العامين)
-        for dept in Department.query.all():
-            active_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id,
-                Employee.status == 'active'
-            ).count()
-            
-            inactive_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id,
-                Employee.status == 'inactive'
-            ).count()
-            
-            on_leave_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id,
-                Employee.status == 'on_leave'
-            ).count()
-            
-            terminated_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id,
-                Employee.status == 'terminated'
-            ).count()
-            
-            total_count = db.session.query(Employee.id).join(
-                employee_departments, Employee.id == employee_departments.c.employee_id
-            ).filter(
-                employee_departments.c.department_id == dept.id
-            ).count()
-            
-            dept_stats = {
-                'department_id': dept.id,
-                'department_name': dept.name,
-                'active': active_count,
-                'inactive': inactive_count,
-                'on_leave': on_leave_count,
-                'terminated': terminated_count,
-                'total': total_count,
-                'total_active': active_count,
-            }
-            detailed_stats.append(dept_stats)
-    
-    # ترتيب الإحصائيات حسب العدد الإجمالي للموظفين
-    detailed_stats.sort(key=lambda x: x['total'], reverse=True)
-    
+
     # تحضير بيانات المخطط للموظفين النشطين فقط
-    chart_labels = []
-    chart_data = []
-    chart_dept_ids = []
-    chart_percentages = []
-    
-    # الحصول على بيانات الموظفين النشطين فقط لكل قسم
-    active_dept_stats = db.session.query(
-        Department.id,
-        Department.name,
-        func.count(func.distinct(Employee.id)).label('employee_count')
-    ).outerjoin(
-        employee_departments, Department.id == employee_departments.c.department_id
-    ).outerjoin(
-        Employee, (employee_departments.c.employee_id == Employee.id) & (Employee.status == 'active')
-    ).group_by(Department.id, Department.name).order_by(func.count(func.distinct(Employee.id)).desc()).all()
-    
-    total_active = sum(stat.employee_count for stat in active_dept_stats)
-    
-    for stat in active_dept_stats:
-        chart_labels.append(stat.name)
-        chart_data.append(stat.employee_count)
-        chart_dept_ids.append(stat.id)
-        percentage = round((stat.employee_count / total_active * 100), 1) if total_active > 0 else 0
-        chart_percentages.append(percentage)
-    
+    active_dept_stats = sorted(snapshot['departments'], key=lambda d: d['active'], reverse=True)
+    total_active = sum(d['active'] for d in active_dept_stats)
+
+    chart_labels = [d['department_name'] for d in active_dept_stats]
+    chart_data = [d['active'] for d in active_dept_stats]
+    chart_dept_ids = [d['department_id'] for d in active_dept_stats]
+    chart_percentages = [
+        round((d['active'] / total_active * 100), 1) if total_active > 0 else 0
+        for d in active_dept_stats
+    ]
+
     # قائمة بالألوان للمخطط
     chart_colors = [
         'rgba(24, 144, 255, 0.85)', 'rgba(47, 194, 91, 0.85)', 'rgba(250, 173, 20, 0.85)',
@@ -364,22 +125,14 @@ def employee_stats():
 def department_employee_stats_api():
     """واجهة برمجة لإحصائيات الموظفين حسب القسم للرسوم البيانية"""
     try:
-        from models import employee_departments
-        
-        # إحصائيات الموظفين حسب القسم (فقط الموظفون النشطون) باستخدام علاقة many-to-many
-        department_stats = db.session.query(
-            Department.id,
-            Department.name,
-            func.count(func.distinct(Employee.id)).label('employee_count')
-        ).outerjoin(
-            employee_departments, Department.id == employee_departments.c.department_id
-        ).outerjoin(
-            Employee, (employee_departments.c.employee_id == Employee.id) & (Employee.status == 'active')
-        ).group_by(Department.id, Department.name).order_by(func.count(func.distinct(Employee.id)).desc()).all()
+        from services.dashboard_snapshot_service import get_dashboard_snapshot
+
+        # إحصائيات الموظفين النشطين حسب القسم من اللقطة المشتركة
+        department_stats = sorted(
+            get_dashboard_snapshot()['departments'], key=lambda d: d['active'], reverse=True
+        )
     except Exception as e:
-        import traceback
-        print(f"Error in department_employee_stats_api: {str(e)}")
-        traceback.print_exc()
+        logger.exception("Error in department_employee_stats_api: %s", str(e))
         return jsonify({
             'labels': [],
             'data': [],
@@ -424,19 +177,19 @@ def department_employee_stats_api():
             'total': 0
         })
     
-    total_employees = sum(stat.employee_count for stat in department_stats)
+    total_employees = sum(stat['active'] for stat in department_stats)
     percentages = []
     
     for idx, stat in enumerate(department_stats):
-        labels.append(stat.name)
-        data.append(stat.employee_count)
+        labels.append(stat['department_name'])
+        data.append(stat['active'])
         color_idx = idx % len(gradient_colors)
         background_colors.append(gradient_colors[color_idx][1])
         hover_colors.append(gradient_colors[color_idx][0])
-        department_ids.append(stat.id)
+        department_ids.append(stat['department_id'])
         
         # حساب النسبة المئوية
-        percentage = round((stat.employee_count / total_employees * 100), 1) if total_employees > 0 else 0
+        percentage = round((stat['active'] / total_employees * 100), 1) if total_employees > 0 else 0
         percentages.append(percentage)
     
     # تنسيق البيانات للرسم البياني
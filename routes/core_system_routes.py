@@ -1,5 +1,6 @@
-from flask import Blueprint, redirect, url_for, render_template, send_from_directory, abort, Response
+from flask import Blueprint, redirect, url_for, render_template, send_from_directory, abort, Response, request
 import os
+from infrastructure.storage.upload_delivery import resolve_upload, send_upload, uploads_root
 from utils.storage_helper import download_image
 
 core_system_bp = Blueprint('core_system', __name__)
@@ -81,16 +82,11 @@ def uploaded_file(filename):
 
 @core_system_bp.route('/static/uploads/<path:filename>')
 def static_uploaded_file(filename):
-    # البحث في static/uploads
-    file_path = os.path.join('static', 'uploads', filename)
-    if os.path.exists(file_path):
-        dir_parts = filename.split('/')
-        if len(dir_parts) > 1:
-            subdir = '/'.join(dir_parts[:-1])
-            file_name = dir_parts[-1]
-            return send_from_directory(f'static/uploads/{subdir}', file_name)
-        else:
-            return send_from_directory('static/uploads', filename)
+    # البحث في static/uploads (ETag/Range وإحالة البث للوكيل الأمامي ونسخ ?w= المصغرة)
+    root = uploads_root()
+    file_path = resolve_upload(root, filename)
+    if file_path:
+        return send_upload(file_path, root, width=request.args.get('w', type=int))
 
     # البحث في Object Storage
     image_data = download_image(filename)
@@ -5,9 +5,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_user, logout_user, login_required, current_user
 from datetime import datetime, timedelta
-from sqlalchemy import func, or_, and_, extract
-from models import Employee, Vehicle, VehicleRental, VehicleProject, VehicleHandover, Salary, Attendance, Department, User, VehicleSafetyCheck
+from sqlalchemy import extract
+from models import Employee, Vehicle, VehicleHandover, Salary, Attendance, Department, User, VehicleSafetyCheck
 from core.extensions import db
+from modules.vehicles.application.vehicle_custody_service import get_current_employee_id, vehicles_in_custody_of
+from modules.employees.application.portal_view_service import get_dashboard_view, get_vehicles_view
 # from functions.date_functions import format_date_arabic
 # from utils.audit_log import log_audit
 
@@ -131,58 +133,11 @@ def dashboard():
     """لوحة معلومات الموظف"""
     employee_id = session.get('employee_id')
     employee = Employee.query.get_or_404(employee_id)
-    
-    # احصائيات سريعة
-    stats = {}
-    
-    # السيارات المخصصة للموظف من خلال سجلات التسليم الأخيرة
-    latest_handovers = db.session.query(
-        VehicleHandover.vehicle_id,
-        func.max(VehicleHandover.handover_date).label('latest_date')
-    ).filter(
-        VehicleHandover.employee_id == employee_id,
-        VehicleHandover.handover_type == 'delivery'
-    ).group_by(VehicleHandover.vehicle_id).subquery()
-    
-    assigned_vehicles = db.session.query(Vehicle).join(
-        VehicleHandover, Vehicle.id == VehicleHandover.vehicle_id
-    ).join(
-        latest_handovers, 
-        and_(
-            VehicleHandover.vehicle_id == latest_handovers.c.vehicle_id,
-            VehicleHandover.handover_date == latest_handovers.c.latest_date
-        )
-    ).filter(
-        VehicleHandover.employee_id == employee_id,
-        VehicleHandover.handover_type == 'delivery'
-    ).all()
-    
-    stats['assigned_vehicles_count'] = len(assigned_vehicles)
-    
-    # آخر راتب
-    latest_salary = Salary.query.filter_by(employee_id=employee_id).order_by(Salary.created_at.desc()).first()
-    stats['latest_salary'] = latest_salary
-    
-    # حضور هذا الشهر
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    
-    monthly_attendance = Attendance.query.filter(
-        Attendance.employee_id == employee_id,
-        extract('month', Attendance.date) == current_month,
-        extract('year', Attendance.date) == current_year
-    ).all()
-    
-    stats['monthly_attendance_days'] = len([a for a in monthly_attendance if a.status == 'present'])
-    stats['monthly_absence_days'] = len([a for a in monthly_attendance if a.status == 'absent'])
-    
-    # الإجازات المتبقية (حقل مؤقت)
-    stats['remaining_vacation_days'] = 30  # قيمة افتراضية مؤقتة
-    
-    return render_template('employee_portal/dashboard.html', 
-                         employee=employee, 
-                         stats=stats,
-                         assigned_vehicles=assigned_vehicles)
+    view = get_dashboard_view(employee.id)
+    return render_template('employee_portal/dashboard.html',
+                         employee=employee,
+                         stats=view['stats'],
+                         assigned_vehicles=view['assigned_vehicles'])
 
 @employee_portal_bp.route('/vehicles')
 @employee_login_required
@@ -190,143 +145,11 @@ def my_vehicles():
     """عرض السيارات المخصصة للموظف مع العمليات والفحوصات"""
     employee_id = session.get('employee_id')
     employee = Employee.query.get_or_404(employee_id)
-    
-    # استيراد النماذج المطلوبة
-    from models import OperationRequest, VehicleSafetyCheck, VehiclePeriodicInspection, VehicleWorkshop
-    
-    # السيارات المخصصة للموظف من خلال سجلات التسليم الأخيرة
-    latest_handovers = db.session.query(
-        VehicleHandover.vehicle_id,
-        func.max(VehicleHandover.handover_date).label('latest_date')
-    ).filter(
-        VehicleHandover.employee_id == employee_id,
-        VehicleHandover.handover_type == 'delivery'
-    ).group_by(VehicleHandover.vehicle_id).subquery()
-    
-    current_driver_vehicles_base = db.session.query(Vehicle).join(
-        VehicleHandover, Vehicle.id == VehicleHandover.vehicle_id
-    ).join(
-        latest_handovers, 
-        and_(
-            VehicleHandover.vehicle_id == latest_handovers.c.vehicle_id,
-            VehicleHandover.handover_date == latest_handovers.c.latest_date
-        )
-    ).filter(
-        VehicleHandover.employee_id == employee_id,
-        VehicleHandover.handover_type == 'delivery'
-    ).all()
-    
-    # إضافة معلومات شاملة لكل سيارة
-    current_driver_vehicles = []
-    for vehicle in current_driver_vehicles_base:
-        # جميع نماذج التسليم والاستلام لهذه السيارة والموظف
-        vehicle_handovers = VehicleHandover.query.filter_by(
-            vehicle_id=vehicle.id,
-            employee_id=employee_id
-        ).order_by(VehicleHandover.handover_date.desc()).all()
-        
-        # العمليات المرتبطة بالموظف (لا يوجد حقل employee_id في OperationRequest)
-        # سيتم عرض العمليات العامة المرتبطة بالسيارة
-        employee_operations = []
-        
-        # فحوصات السلامة للسيارة
-        safety_checks = VehicleSafetyCheck.query.filter_by(
-            vehicle_id=vehicle.id
-        ).order_by(VehicleSafetyCheck.check_date.desc()).limit(3).all()
-        
-        # فحوصات السيارة الدورية
-        inspections = VehiclePeriodicInspection.query.filter_by(
-            vehicle_id=vehicle.id
-        ).order_by(VehiclePeriodicInspection.inspection_date.desc()).limit(3).all()
-        
-        # سجلات الورشة للسيارة
-        workshop_records = VehicleWorkshop.query.filter_by(
-            vehicle_id=vehicle.id
-        ).order_by(VehicleWorkshop.entry_date.desc()).limit(3).all()
-        
-        vehicle.handovers = vehicle_handovers
-        vehicle.employee_operations = employee_operations
-        vehicle.safety_checks = safety_checks
-        vehicle.inspections = inspections
-        vehicle.workshop_records = workshop_records
-        current_driver_vehicles.append(vehicle)
-    
-    # السيارات المؤجرة النشطة (عرض عام)
-    rented_vehicles_base = db.session.query(Vehicle, VehicleRental).join(
-        VehicleRental, Vehicle.id == VehicleRental.vehicle_id
-    ).filter(
-        VehicleRental.is_active == True
-    ).limit(10).all()
-    
-    # إضافة معلومات النماذج للسيارات المؤجرة
-    rented_vehicles = []
-    for vehicle, rental in rented_vehicles_base:
-        # البحث عن نماذج التسليم والاستلام لهذه السيارة
-        vehicle_handovers = VehicleHandover.query.filter_by(
-            vehicle_id=vehicle.id
-        ).order_by(VehicleHandover.handover_date.desc()).limit(5).all()
-        
-        # فحوصات السلامة للسيارة
-        safety_checks = VehicleSafetyCheck.query.filter_by(
-            vehicle_id=vehicle.id
-        ).order_by(VehicleSafetyCheck.check_date.desc()).limit(3).all()
-        
-        vehicle.handovers = vehicle_handovers
-        vehicle.safety_checks = safety_checks
-        rented_vehicles.append((vehicle, rental))
-    
-    # السيارات في مشاريع نشطة (عرض عام)
-    project_vehicles_base = db.session.query(Vehicle, VehicleProject).join(
-        VehicleProject, Vehicle.id == VehicleProject.vehicle_id
-    ).filter(
-        VehicleProject.is_active == True
-    ).limit(10).all()
-    
-    # إضافة معلومات النماذج للسيارات في المشاريع
-    project_vehicles = []
-    for vehicle, project in project_vehicles_base:
-        # البحث عن نماذج التسليم والاستلام لهذه السيارة
-        vehicle_handovers = VehicleHandover.query.filter_by(
-            vehicle_id=vehicle.id
-        ).order_by(VehicleHandover.handover_date.desc()).limit(5).all()
-        
-        # فحوصات السلامة للسيارة
-        safety_checks = VehicleSafetyCheck.query.filter_by(
-            vehicle_id=vehicle.id
-        ).order_by(VehicleSafetyCheck.check_date.desc()).limit(3).all()
-        
-        vehicle.handovers = vehicle_handovers
-        vehicle.safety_checks = safety_checks
-        project_vehicles.append((vehicle, project))
-    
-    # إحصائيات شاملة للموظف
-    total_operations = VehicleHandover.query.filter_by(employee_id=employee_id).count()
-    
-    # عدد فحوصات السلامة للسيارات المخصصة للموظف
-    if current_driver_vehicles:
-        vehicle_ids = [v.id for v in current_driver_vehicles]
-        total_safety_checks = VehicleSafetyCheck.query.filter(
-            VehicleSafetyCheck.vehicle_id.in_(vehicle_ids)
-        ).count()
-    else:
-        total_safety_checks = 0
-        
-    pending_operations = OperationRequest.query.filter_by(status='pending').count()
-    approved_operations = OperationRequest.query.filter_by(status='approved').count()
-    
-    stats = {
-        'total_operations': total_operations,
-        'total_safety_checks': total_safety_checks,
-        'pending_operations': pending_operations,
-        'approved_operations': approved_operations
-    }
-    
+    # العهدة والمؤجرة والمشاريع مع سجلاتها باستعلامات مجمعة (ومخزنة مؤقتاً لكل موظف)
+    view = get_vehicles_view(employee.id)
     return render_template('employee_portal/vehicles_enhanced.html',
                          employee=employee,
-                         current_driver_vehicles=current_driver_vehicles,
-                         rented_vehicles=rented_vehicles,
-                         project_vehicles=project_vehicles,
-                         stats=stats)
+                         **view)
 
 @employee_portal_bp.route('/salaries')
 @employee_login_required
@@ -482,26 +305,7 @@ def my_profile():
     department = Department.query.get(employee.department_id) if employee.department_id else None
     
     # السيارات المخصصة للموظف
-    latest_handovers = db.session.query(
-        VehicleHandover.vehicle_id,
-        func.max(VehicleHandover.handover_date).label('latest_date')
-    ).filter(
-        VehicleHandover.employee_id == employee_id,
-        VehicleHandover.handover_type == 'delivery'
-    ).group_by(VehicleHandover.vehicle_id).subquery()
-    
-    assigned_vehicles = db.session.query(Vehicle).join(
-        VehicleHandover, Vehicle.id == VehicleHandover.vehicle_id
-    ).join(
-        latest_handovers, 
-        and_(
-            VehicleHandover.vehicle_id == latest_handovers.c.vehicle_id,
-            VehicleHandover.handover_date == latest_handovers.c.latest_date
-        )
-    ).filter(
-        VehicleHandover.employee_id == employee_id,
-        VehicleHandover.handover_type == 'delivery'
-    ).all()
+    assigned_vehicles = vehicles_in_custody_of(employee_id).all()
     
     # آخر 5 أيام حضور
     recent_attendance = Attendance.query.filter_by(
@@ -599,28 +403,7 @@ def view_safety_check(safety_check_id):
     
     # التحقق من أن الموظف مخول لعرض هذا الفحص
     # يمكن للموظف عرض فحوصات السيارات المخصصة له
-    latest_handovers = db.session.query(
-        VehicleHandover.vehicle_id,
-        func.max(VehicleHandover.handover_date).label('latest_date')
-    ).filter(
-        VehicleHandover.employee_id == employee_id,
-        VehicleHandover.handover_type == 'delivery'
-    ).group_by(VehicleHandover.vehicle_id).subquery()
-    
-    assigned_vehicle_ids = db.session.query(VehicleHandover.vehicle_id).join(
-        latest_handovers, 
-        and_(
-            VehicleHandover.vehicle_id == latest_handovers.c.vehicle_id,
-            VehicleHandover.handover_date == latest_handovers.c.latest_date
-        )
-    ).filter(
-        VehicleHandover.employee_id == employee_id,
-        VehicleHandover.handover_type == 'delivery'
-    ).all()
-    
-    assigned_vehicle_ids = [v[0] for v in assigned_vehicle_ids]
-    
-    if safety_check.vehicle_id not in assigned_vehicle_ids:
+    if get_current_employee_id(safety_check.vehicle_id) != employee_id:
         flash('غير مصرح لك بعرض هذا الفحص', 'error')
         return redirect(url_for('employee_portal.my_vehicles'))
     
@@ -10,6 +10,17 @@ import json
 
 drive_browser_bp = Blueprint('drive_browser', __name__)
 
+QUEUE_RECORD_TYPES = {
+    'vehicle_workshop': 'سجل ورشة',
+    'vehicle_handover': 'عملية تسليم/استلام',
+    'vehicle_safety': 'فحص سلامة',
+}
+
+
+def _tracked(model):
+    """السجلات المرفوعة أو الموجودة في طابور الرفع (لم يُنشأ مجلدها بعد)"""
+    return or_(model.drive_folder_id.isnot(None), model.drive_upload_status.isnot(None))
+
 
 def get_drive_statistics():
     """حساب الإحصائيات الإجمالية لملفات Google Drive"""
@@ -29,7 +40,7 @@ def get_drive_statistics():
         func.sum(case((VehicleWorkshop.drive_upload_status == 'failed', 1), else_=0)).label('failed'),
         func.sum(case((VehicleWorkshop.drive_upload_status == 'pending', 1), else_=0)).label('pending'),
         func.max(VehicleWorkshop.drive_uploaded_at).label('last_upload')
-    ).filter(VehicleWorkshop.drive_folder_id.isnot(None)).first()
+    ).filter(_tracked(VehicleWorkshop)).first()
     
     handover_stats = db.session.query(
         func.count(VehicleHandover.id).label('total'),
@@ -37,7 +48,7 @@ def get_drive_statistics():
         func.sum(case((VehicleHandover.drive_upload_status == 'failed', 1), else_=0)).label('failed'),
         func.sum(case((VehicleHandover.drive_upload_status == 'pending', 1), else_=0)).label('pending'),
         func.max(VehicleHandover.drive_uploaded_at).label('last_upload')
-    ).filter(VehicleHandover.drive_folder_id.isnot(None)).first()
+    ).filter(_tracked(VehicleHandover)).first()
     
     safety_stats = db.session.query(
         func.count(VehicleExternalSafetyCheck.id).label('total'),
@@ -45,7 +56,7 @@ def get_drive_statistics():
         func.sum(case((VehicleExternalSafetyCheck.drive_upload_status == 'failed', 1), else_=0)).label('failed'),
         func.sum(case((VehicleExternalSafetyCheck.drive_upload_status == 'pending', 1), else_=0)).label('pending'),
         func.max(VehicleExternalSafetyCheck.drive_uploaded_at).label('last_upload')
-    ).filter(VehicleExternalSafetyCheck.drive_folder_id.isnot(None)).first()
+    ).filter(_tracked(VehicleExternalSafetyCheck)).first()
     
     request_stats = db.session.query(
         func.count(EmployeeRequest.id).label('total'),
@@ -91,7 +102,7 @@ def build_unified_records(filters=None, page=1, per_page=50):
         Department.name.label('department_name')
     ).join(Vehicle, VehicleWorkshop.vehicle_id == Vehicle.id
     ).outerjoin(Department, Vehicle.department_id == Department.id
-    ).filter(VehicleWorkshop.drive_folder_id.isnot(None))
+    ).filter(_tracked(VehicleWorkshop))
     
     if filters:
         if filters.get('department_id'):
@@ -143,7 +154,7 @@ def build_unified_records(filters=None, page=1, per_page=50):
         Employee.name.label('employee_name')
     ).outerjoin(Employee, VehicleHandover.employee_id == Employee.id
     ).outerjoin(Department, Employee.department_id == Department.id
-    ).filter(VehicleHandover.drive_folder_id.isnot(None))
+    ).filter(_tracked(VehicleHandover))
     
     if filters:
         if filters.get('department_id'):
@@ -196,7 +207,7 @@ def build_unified_records(filters=None, page=1, per_page=50):
         VehicleExternalSafetyCheck.vehicle_plate_number,
         VehicleExternalSafetyCheck.driver_department,
         VehicleExternalSafetyCheck.driver_name
-    ).filter(VehicleExternalSafetyCheck.drive_folder_id.isnot(None))
+    ).filter(_tracked(VehicleExternalSafetyCheck))
     
     if filters:
         if filters.get('department_id'):
@@ -378,34 +389,58 @@ def browser():
     )
 
 
+@drive_browser_bp.route('/queue')
+@login_required
+def upload_queue():
+    """طابور الرفع إلى Google Drive: حالة ملفات كل سجل مع إعادة المحاولة"""
+    from modules.drive_sync.application.drive_sync import drive_queue_stats, list_queue_records
+
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 50, type=int)
+    status = request.args.get('status') or None
+
+    records, total = list_queue_records(status=status, page=page, per_page=per_page)
+    for record in records:
+        record['type_ar'] = QUEUE_RECORD_TYPES.get(record['record_type'], record['record_type'])
+
+    return render_template(
+        'drive_browser/queue.html',
+        stats=drive_queue_stats(),
+        records=records,
+        status=status,
+        page=page,
+        per_page=per_page,
+        total=total,
+        total_pages=(total + per_page - 1) // per_page
+    )
+
+
 @drive_browser_bp.route('/retry-upload/<record_type>/<int:record_id>')
 @login_required
 def retry_upload(record_type, record_id):
-    """إعادة محاولة رفع ملف فشل رفعه"""
+    """إعادة جدولة رفع سجل فشل رفعه (يُعاد جمع ملفاته ووضعها في الطابور)"""
     from utils.vehicle_drive_uploader import VehicleDriveUploader
-    
+
+    uploaders = {
+        'vehicle_workshop': (VehicleWorkshop, VehicleDriveUploader.upload_workshop_record),
+        'vehicle_handover': (VehicleHandover, VehicleDriveUploader.upload_handover_record),
+        'vehicle_safety': (VehicleExternalSafetyCheck, VehicleDriveUploader.upload_safety_check),
+    }
+    if record_type not in uploaders:
+        flash('نوع السجل غير صحيح', 'error')
+        return redirect(request.referrer or url_for('drive_browser.browser'))
+
     try:
-        if record_type == 'vehicle_workshop':
-            record = VehicleWorkshop.query.get_or_404(record_id)
-            VehicleDriveUploader.upload_workshop_record(record)
-            db.session.commit()
-            flash('تم إعادة محاولة رفع سجل الورشة بنجاح', 'success')
-            
-        elif record_type == 'vehicle_handover':
-            record = VehicleHandover.query.get_or_404(record_id)
-            VehicleDriveUploader.upload_handover_record(record)
-            db.session.commit()
-            flash('تم إعادة محاولة رفع عملية التسليم/الاستلام بنجاح', 'success')
-            
-        elif record_type == 'vehicle_safety':
-            record = VehicleExternalSafetyCheck.query.get_or_404(record_id)
-            VehicleDriveUploader.upload_safety_check(record)
-            db.session.commit()
-            flash('تم إعادة محاولة رفع فحص السلامة بنجاح', 'success')
+        model, upload = uploaders[record_type]
+        record = model.query.get_or_404(record_id)
+        job = upload(record)
+        db.session.commit()
+        if job is not None:
+            flash('تمت إعادة جدولة الرفع، ستظهر النتيجة في طابور الرفع', 'success')
         else:
-            flash('نوع السجل غير صحيح', 'error')
-            
+            flash('لا توجد ملفات جديدة للرفع لهذا السجل', 'info')
     except Exception as e:
+        db.session.rollback()
         flash(f'حدث خطأ: {str(e)}', 'error')
-    
-    return redirect(url_for('drive_browser.browser'))
+
+    return redirect(request.referrer or url_for('drive_browser.browser'))
@@ -8,14 +8,13 @@ from pillow_heif import register_heif_opener
 
 # تسجيل plugin الـ HEIC/HEIF للتعامل مع صور الآيفون
 register_heif_opener()
-from models import VehicleExternalSafetyCheck, VehicleSafetyImage, Vehicle, Employee, User, UserRole, VehicleHandover
+from models import VehicleExternalSafetyCheck, VehicleSafetyImage, Vehicle, Employee, User, UserRole
 from core.extensions import db
 from utils.audit_logger import log_audit
 from utils.storage_helper import upload_image, delete_image
 from utils.vehicle_drive_uploader import VehicleDriveUploader
+from modules.vehicles.application.vehicle_custody_service import get_current_driver_employees, get_current_drivers
 from flask_login import current_user, login_required
-from sqlalchemy import func, select
-from sqlalchemy.orm import aliased, contains_eager
 
 from dotenv import load_dotenv
 import resend
@@ -136,44 +135,17 @@ def get_all_current_driversWithEmil():
     """
     تسترجع قاموساً يحتوي على معلومات السائق الحالي لكل مركبة.
     المفتاح هو ID المركبة، والقيمة هي قاموس يحتوي على (name, email, mobile).
+    المصدر جدول العهدة الحالية (آخر تسليم معتمد لكل مركبة) مربوطاً بالموظفين في استعلام واحد.
     """
-    # 1. نحدد أنواع التسليم
-    delivery_handover_types = ['delivery', 'تسليم', 'handover']
-    
-    # 2. إنشاء استعلام فرعي لتحديد أحدث سجل تسليم لكل مركبة
-    # (نفس منطق Window Function السابق)
-    subq = select(
-        VehicleHandover.id,
-        func.row_number().over(
-            partition_by=VehicleHandover.vehicle_id,
-            order_by=VehicleHandover.handover_date.desc()
-        ).label('row_num')
-    ).where(
-        VehicleHandover.handover_type.in_(delivery_handover_types)
-    ).subquery()
-
-    # 3. إنشاء الاستعلام الرئيسي
-    # سنربط (JOIN) بين السجلات الأحدث والموظفين المرتبطين بها
-    # ونستخدم `contains_eager` لجلب بيانات الموظف بكفاءة عالية في نفس الاستعلام
-    stmt = select(VehicleHandover).join(
-        subq, VehicleHandover.id == subq.c.id
-    ).join(
-        Employee, VehicleHandover.employee_id == Employee.id  # الربط باستخدام جدول Employee
-    ).where(subq.c.row_num == 1)
-
-    # 4. تنفيذ الاستعلام وجلب النتائج
-    latest_handovers_with_drivers = db.session.execute(stmt).scalars().all()
-    
-    # 5. تحويل النتائج إلى القاموس (dictionary) بالصيغة الجديدة
     current_drivers_map = {
-        record.vehicle_id: {
-            'name': record.driver_employee.name,
-            'email': record.driver_employee.email,
-            'mobile': record.driver_employee.mobile,
-            'phone' : record.driver_employee.mobile,
-            'national_id': record.driver_employee.national_id
+        vehicle_id: {
+            'name': employee.name,
+            'email': employee.email,
+            'mobile': employee.mobile,
+            'phone' : employee.mobile,
+            'national_id': employee.national_id
         }
-        for record in latest_handovers_with_drivers if record.driver_employee # نتأكد من وجود سائق
+        for vehicle_id, _, employee in get_current_driver_employees() if employee  # نتأكد من وجود سائق
     }
     
     return current_drivers_map
@@ -273,36 +245,9 @@ def send_vehicle_whatsapp():
 def get_all_current_drivers():
     """
     تسترجع قاموساً يحتوي على السائق الحالي لكل مركبة. (بصيغة حديثة)
-    المفتاح هو ID المركبة، والقيمة هي اسم السائق.
+    المفتاح هو ID المركبة، والقيمة هي اسم السائق (من جدول العهدة الحالية).
     """
-    
-    # 1. نحدد أنواع التسليم
-    delivery_handover_types = ['delivery', 'تسليم', 'handover']
-    
-    # 2. إنشاء استعلام فرعي (Subquery) باستخدام Window Function
-    subq = select(
-        VehicleHandover.id,
-        func.row_number().over(
-            partition_by=VehicleHandover.vehicle_id,
-            order_by=VehicleHandover.handover_date.desc()
-        ).label('row_num')
-    ).where(
-        VehicleHandover.handover_type.in_(delivery_handover_types)
-    ).subquery()
-
-    # 3. الآن، نحصل على أحدث السجلات عن طريق اختيار التي لها row_num = 1
-    stmt = select(VehicleHandover).join(
-        subq, VehicleHandover.id == subq.c.id
-    ).where(subq.c.row_num == 1)
-
-    # 4. تنفيذ الاستعلام وجلب النتائج
-    # .scalars() تجلب الكائنات (objects) مباشرة بدلاً من الصفوف (rows)
-    latest_handovers = db.session.execute(stmt).scalars().all()
-    
-    # 5. تحويل النتائج إلى قاموس (dictionary) سهل الاستخدام
-    current_drivers_map = {
-        record.vehicle_id: record.person_name for record in latest_handovers
-    }
+    current_drivers_map = get_current_drivers()
     
     return current_drivers_map
 
@@ -2538,7 +2483,8 @@ def upload_safety_check_to_drive(check_id):
         
         return jsonify({
             'success': True,
-            'message': 'تم رفع فحص السلامة على Google Drive بنجاح',
+            'message': 'تمت جدولة رفع فحص السلامة على Google Drive' if safety_check.drive_upload_status == 'pending' else 'تم رفع فحص السلامة على Google Drive بنجاح',
+            'status': safety_check.drive_upload_status,
             'folder_url': folder_url,
             'folder_id': safety_check.drive_folder_id if hasattr(safety_check, 'drive_folder_id') else None
         }), 200
@@ -3,13 +3,12 @@
 يوفر واجهات لتصدير واستيراد النسخ الاحتياطية
 """
 import json
-import os
 from datetime import datetime
-from flask import Blueprint, render_template, request, flash, redirect, url_for, send_file, current_app
+from flask import Blueprint, Response, render_template, request, flash, redirect, url_for, current_app, stream_with_context
 from flask_login import login_required
 from sqlalchemy import inspect
-from io import BytesIO
 from core.extensions import db
+from services.backup_stream_service import is_stream_backup, restore_backup, stream_backup
 from utils.decorators import permission_required
 
 database_backup_bp = Blueprint('database_backup', __name__)
@@ -131,6 +130,36 @@ TABLE_ARABIC_NAMES = {
 }
 
 
+# أسماء جداول النسخ القديمة ← أسماء الجداول الحالية
+_TABLE_NAME_MAP = {
+    'employees': 'employee',
+    'vehicles': 'vehicle',
+    'departments': 'department',
+    'users': 'user',
+    'salaries': 'salary',
+    'vehicle_handovers': 'vehicle_handover',
+    'vehicle_workshops': 'vehicle_workshop',
+    'documents': 'document',
+    'vehicle_accidents': 'vehicle_accident',
+    'external_safety_checks': 'vehicle_external_safety_check',
+    'safety_images': 'vehicle_safety_image',
+}
+
+
+def _stream_backup_response(table_names, filename):
+    """استجابة متدفقة للنسخة الاحتياطية؛ الذاكرة ثابتة بحجم دفعة واحدة."""
+    logger = current_app.logger
+
+    def _progress(table_name, rows):
+        logger.info(f"Backup export: {table_name} - {rows} rows")
+
+    return Response(
+        stream_with_context(stream_backup(table_names, progress=_progress)),
+        mimetype='application/x-tar',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
+
+
 @database_backup_bp.route('/')
 @login_required
 @permission_required('admin', 'view')
@@ -169,7 +198,7 @@ def backup_page():
 @login_required
 @permission_required('admin', 'edit')
 def export_backup():
-    """تصدير النسخة الاحتياطية كملف JSON"""
+    """تصدير النسخة الاحتياطية كأرشيف tar متدفق (NDJSON مضغوط لكل دفعة)"""
     try:
         selected_tables = request.form.getlist('tables')
         
@@ -177,66 +206,7 @@ def export_backup():
             flash('يجب اختيار جدول واحد على الأقل', 'warning')
             return redirect(url_for('database_backup.backup_page'))
         
-        backup_data = {
-            'timestamp': datetime.now().isoformat(),
-            'tables': {}
-        }
-        
-        inspector = inspect(db.engine)
-        
-        for table_name in selected_tables:
-            try:
-                # التحقق من وجود الجدول
-                if table_name not in inspector.get_table_names():
-                    continue
-                
-                import re as _re
-                if not _re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', table_name):
-                    continue
-                result = db.session.execute(db.text(f'SELECT * FROM "{table_name}"'))
-                columns = result.keys()
-                rows = result.fetchall()
-                
-                # تحويل البيانات إلى قاموس
-                table_data = []
-                for row in rows:
-                    row_dict = {}
-                    for i, col in enumerate(columns):
-                        value = row[i]
-                        # تحويل التواريخ إلى نص
-                        if hasattr(value, 'isoformat'):
-                            value = value.isoformat()
-                        elif isinstance(value, bytes):
-                            value = value.decode('utf-8', errors='ignore')
-                        row_dict[col] = value
-                    table_data.append(row_dict)
-                
-                backup_data['tables'][table_name] = {
-                    'columns': list(columns),
-                    'rows': table_data,
-                    'count': len(table_data)
-                }
-                
-            except Exception as e:
-                current_app.logger.error(f"Error exporting table {table_name}: {str(e)}")
-                flash(f'خطأ في تصدير جدول {table_name}: {str(e)}', 'danger')
-        
-        # إنشاء ملف JSON
-        json_data = json.dumps(backup_data, ensure_ascii=False, indent=2)
-        
-        # إنشاء ملف للتحميل
-        buffer = BytesIO()
-        buffer.write(json_data.encode('utf-8'))
-        buffer.seek(0)
-        
-        filename = f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        
-        return send_file(
-            buffer,
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=filename
-        )
+        return _stream_backup_response(selected_tables, f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.tar")
         
     except Exception as e:
         current_app.logger.error(f"Error creating backup: {str(e)}")
@@ -248,7 +218,7 @@ def export_backup():
 @login_required
 @permission_required('admin', 'edit')
 def import_backup():
-    """استيراد نسخة احتياطية من ملف JSON"""
+    """استيراد نسخة احتياطية (أرشيف tar المتدفق أو ملف JSON القديم)"""
     import re
     _IDENTIFIER_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
 
@@ -257,20 +227,6 @@ def import_backup():
             raise ValueError(f"Invalid identifier: {name}")
         return f'"{name}"'
 
-    _TABLE_NAME_MAP = {
-        'employees': 'employee',
-        'vehicles': 'vehicle',
-        'departments': 'department',
-        'users': 'user',
-        'salaries': 'salary',
-        'vehicle_handovers': 'vehicle_handover',
-        'vehicle_workshops': 'vehicle_workshop',
-        'documents': 'document',
-        'vehicle_accidents': 'vehicle_accident',
-        'external_safety_checks': 'vehicle_external_safety_check',
-        'safety_images': 'vehicle_safety_image',
-    }
-
     try:
         if 'backup_file' not in request.files:
             flash('يجب اختيار ملف النسخة الاحتياطية', 'warning')
@@ -285,6 +241,21 @@ def import_backup():
         if import_mode not in ('add', 'replace'):
             import_mode = 'add'
 
+        if is_stream_backup(file.stream):
+            logger = current_app.logger
+
+            def _progress(table_name, rows):
+                logger.info(f"Backup restore: {table_name} - {rows} rows")
+
+            results = restore_backup(file.stream, mode=import_mode, progress=_progress,
+                                     table_name_map=_TABLE_NAME_MAP)
+            imported_count = sum(r['imported'] for r in results.values())
+            skipped_count = sum(r['skipped'] for r in results.values())
+            summary = ' | '.join(f"{name}: {r['imported']} سجل" for name, r in list(results.items())[:10])
+            flash(f'تم استيراد {imported_count} سجل بنجاح. تم تخطي {skipped_count} سجل. ({summary})', 'success')
+            return redirect(url_for('database_backup.backup_page'))
+
+        # الصيغة القديمة: ملف JSON واحد
         backup_data = json.load(file)
 
         if 'tables' in backup_data:
@@ -379,7 +350,7 @@ def import_backup():
 @login_required
 @permission_required('admin', 'view')
 def export_single_table(table_name):
-    """تصدير جدول واحد كملف JSON"""
+    """تصدير جدول واحد كأرشيف tar متدفق"""
     try:
         inspector = inspect(db.engine)
         
@@ -391,46 +362,7 @@ def export_single_table(table_name):
         if not re.match(r'^[A-Za-z_][A-Za-z0-9_]*$', table_name):
             flash('اسم جدول غير صالح', 'danger')
             return redirect(url_for('database_backup.backup_page'))
-        result = db.session.execute(db.text(f'SELECT * FROM "{table_name}"'))
-        columns = result.keys()
-        rows = result.fetchall()
-        
-        # تحويل البيانات إلى قاموس
-        table_data = []
-        for row in rows:
-            row_dict = {}
-            for i, col in enumerate(columns):
-                value = row[i]
-                if hasattr(value, 'isoformat'):
-                    value = value.isoformat()
-                elif isinstance(value, bytes):
-                    value = value.decode('utf-8', errors='ignore')
-                row_dict[col] = value
-            table_data.append(row_dict)
-        
-        backup_data = {
-            'timestamp': datetime.now().isoformat(),
-            'table': table_name,
-            'columns': list(columns),
-            'rows': table_data,
-            'count': len(table_data)
-        }
-        
-        # إنشاء ملف JSON
-        json_data = json.dumps(backup_data, ensure_ascii=False, indent=2)
-        
-        buffer = BytesIO()
-        buffer.write(json_data.encode('utf-8'))
-        buffer.seek(0)
-        
-        filename = f"{table_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        
-        return send_file(
-            buffer,
-            mimetype='application/json',
-            as_attachment=True,
-            download_name=filename
-        )
+        return _stream_backup_response([table_name], f"{table_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.tar")
         
     except Exception as e:
         current_app.logger.error(f"Error exporting table {table_name}: {str(e)}")
@@ -5,7 +5,7 @@ Operations sharing routes:
 - Create shared packages (ZIP)
 """
 
-from flask import Blueprint, request, send_file, flash, redirect, url_for, current_app, jsonify
+from flask import Blueprint, Response, request, send_file, flash, redirect, url_for, current_app, jsonify
 from flask_login import login_required, current_user
 from core.extensions import db
 from models import OperationRequest, VehicleHandover, VehicleHandoverImage, VehicleWorkshopImage, Vehicle, UserRole, Employee
@@ -13,8 +13,7 @@ from datetime import datetime
 from utils.audit_logger import log_audit
 import io
 import os
-import zipfile
-import shutil
+from urllib.parse import quote
 
 operations_sharing_bp = Blueprint('operations_sharing', __name__, url_prefix='/operations')
 
@@ -414,70 +413,17 @@ def share_data(operation_id):
 @operations_sharing_bp.route('/<int:operation_id>/share-package', methods=['GET'])
 @login_required
 def share_package(operation_id):
-    """إنشاء حزمة ZIP شاملة للمشاركة"""
+    """حزمة ZIP شاملة للمشاركة: تُخدم من التخزين المؤقت أو تُبث مباشرة أثناء إنشائها"""
+    from services.share_package_service import (
+        build_share_entries, cached_package_path, package_cache_dir,
+        remove_stale_packages, share_package_fingerprint, stream_share_package
+    )
     
     operation = OperationRequest.query.get_or_404(operation_id)
-    
-    temp_dir = os.path.join(current_app.static_folder, '.temp', f'operation_{operation_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}')
-    zip_path = None
+    download_name = f'عملية_{operation_id}_شاملة.zip'
     
     try:
-        os.makedirs(temp_dir, exist_ok=True)
-        
-        # 1. إنشاء ملف نصي بالتفاصيل
-        details_path = os.path.join(temp_dir, 'تفاصيل_العملية.txt')
-        with open(details_path, 'w', encoding='utf-8') as f:
-            f.write('═' * 50 + '\n')
-            f.write(f'          تفاصيل العملية #{operation.id}\n')
-            f.write('═' * 50 + '\n\n')
-            
-            operation_types = {
-                'handover': 'تسليم/استلام مركبة',
-                'workshop': 'ورشة صيانة',
-                'external_authorization': 'تفويض خارجي',
-                'safety_inspection': 'فحص سلامة'
-            }
-            f.write(f'نوع العملية: {operation_types.get(operation.operation_type, operation.operation_type)}\n')
-            f.write(f'الحالة: {operation.status}\n')
-            f.write(f'التاريخ: {operation.created_at.strftime("%Y/%m/%d %H:%M")}\n\n')
-            
-            if operation.vehicle:
-                f.write('─' * 50 + '\n')
-                f.write('معلومات المركبة:\n')
-                f.write('─' * 50 + '\n')
-                f.write(f'رقم اللوحة: {operation.vehicle.plate_number}\n')
-                f.write('\n')
-        
-        # 2. إنشاء ملف Excel
-        try:
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, PatternFill, Alignment
-            
-            excel_path = os.path.join(temp_dir, f'بيانات_العملية_{operation_id}.xlsx')
-            wb = Workbook()
-            ws = wb.active
-            ws.title = 'تفاصيل العملية'
-            
-            ws['A1'] = 'البيان'
-            ws['B1'] = 'القيمة'
-            ws['A1'].font = Font(bold=True)
-            ws['B1'].font = Font(bold=True)
-            
-            wb.save(excel_path)
-        except Exception as e:
-            current_app.logger.warning(f'فشل في إنشاء Excel: {str(e)}')
-        
-        # 3. إنشاء حزمة ZIP
-        zip_dir = os.path.join(current_app.static_folder, '.temp')
-        os.makedirs(zip_dir, exist_ok=True)
-        zip_path = os.path.join(zip_dir, f'operation_{operation_id}_package.zip')
-        
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for root, dirs, files in os.walk(temp_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, temp_dir)
-                    zipf.write(file_path, arcname)
+        fingerprint, media_files = share_package_fingerprint(operation)
         
         log_audit(
             user_id=current_user.id,
@@ -487,11 +433,23 @@ def share_package(operation_id):
             details=f'إنشاء حزمة مشاركة للعملية {operation_id}'
         )
         
-        return send_file(
-            zip_path,
+        # نفس نسخة العملية سبق تجهيزها: تُرسل مباشرة
+        cached_path = cached_package_path(operation_id, fingerprint)
+        if cached_path:
+            return send_file(
+                cached_path,
+                mimetype='application/zip',
+                as_attachment=True,
+                download_name=download_name
+            )
+        
+        entries = build_share_entries(operation, media_files)
+        remove_stale_packages(operation_id, fingerprint)
+        cache_path = os.path.join(package_cache_dir(), f'operation_{operation_id}_{fingerprint}.zip')
+        return Response(
+            stream_share_package(entries, cache_path, app=current_app._get_current_object()),
             mimetype='application/zip',
-            as_attachment=True,
-            download_name=f'عملية_{operation_id}_شاملة.zip'
+            headers={'Content-Disposition': f"attachment; filename=\"operation_{operation_id}.zip\"; filename*=UTF-8''{quote(download_name)}"}
         )
     
     except Exception as e:
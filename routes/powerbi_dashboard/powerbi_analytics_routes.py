@@ -403,6 +403,60 @@ def vehicle_operations_summary():
         return jsonify({'success': False, 'error': str(e)}), 400
 
 
+@powerbi_analytics_bp.route('/fleet-telemetry')
+@login_required
+def fleet_telemetry():
+    """قياسات الأسطول للفترة من التجميع اليومي: المسافة وزمن القيادة والوقود وشذوذ الاستهلاك"""
+    from modules.vehicles.application.fleet_telemetry_service import get_anomalies, get_fleet_summary
+    
+    date_from = request.args.get('date_from')
+    date_to = request.args.get('date_to')
+    
+    try:
+        if date_from:
+            date_from = datetime.strptime(date_from, '%Y-%m-%d').date()
+        else:
+            date_from = datetime.now().date() - timedelta(days=30)
+        
+        if date_to:
+            date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
+        else:
+            date_to = datetime.now().date()
+        
+        by_vehicle = get_fleet_summary(date_from, date_to)
+        plates = dict(db.session.query(Vehicle.id, Vehicle.plate_number).filter(
+            Vehicle.id.in_([row['vehicle_id'] for row in by_vehicle])
+        ).all()) if by_vehicle else {}
+        for row in by_vehicle:
+            row['plate_number'] = plates.get(row['vehicle_id'])
+        
+        total_km = sum(row['distance_km'] for row in by_vehicle)
+        total_liters = sum(row['fuel_liters'] for row in by_vehicle)
+        
+        return jsonify({
+            'success': True,
+            'data': {
+                'by_vehicle': by_vehicle,
+                'anomalies': [{
+                    'vehicle_id': row.vehicle_id,
+                    'plate_number': plates.get(row.vehicle_id),
+                    'date': row.day.isoformat(),
+                    'anomaly': row.anomaly,
+                    'km_per_liter': row.km_per_liter,
+                    'odometer_delta_km': row.odometer_delta_km,
+                    'gps_interval_km': row.gps_interval_km,
+                } for row in get_anomalies(date_from, date_to, limit=50)],
+                'total_distance_km': round(total_km, 1),
+                'total_fuel_liters': round(total_liters, 1),
+                'total_fuel_cost': round(sum(row['fuel_cost'] for row in by_vehicle), 2),
+                'fleet_km_per_liter': round(total_km / total_liters, 2) if total_liters else None,
+                'speeding_events': sum(row['speeding_events'] for row in by_vehicle),
+            }
+        })
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+
 @powerbi_analytics_bp.route('/export-data')
 @login_required
 def export_data():
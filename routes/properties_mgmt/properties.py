@@ -2,7 +2,7 @@ from datetime import datetime, date, timedelta
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
-from sqlalchemy import func, or_, and_
+from sqlalchemy import or_, and_
 import os
 import uuid
 from PIL import Image
@@ -17,6 +17,10 @@ from models import RentalProperty, PropertyImage, PropertyPayment, PropertyFurni
 from forms.property_forms import (
     RentalPropertyForm, PropertyImagesForm, PropertyPaymentForm, PropertyFurnishingForm
 )
+from modules.properties.application import property_ledger_service as ledger
+from modules.properties.domain.models import (
+    CONTRACT_CURRENT, CONTRACT_EXPIRED, CONTRACT_EXPIRING, INSTALMENT_OVERDUE, PropertyLedgerContract
+)
 from utils.audit_logger import log_activity
 
 properties_bp = Blueprint('properties', __name__)
@@ -25,6 +29,9 @@ properties_bp = Blueprint('properties', __name__)
 UPLOAD_FOLDER = 'static/uploads/properties'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'heic', 'webp'}
 
+# الحد الأقصى لأقساط كل قائمة جانبية في لوحة العقارات
+DASHBOARD_LIST_LIMIT = 100
+
 
 def allowed_file(filename):
     """التحقق من امتداد الملف المسموح به"""
@@ -94,104 +101,56 @@ def dashboard():
     
     # الحصول على الفلتر من الـ URL
     filter_type = request.args.get('filter', 'all')
+    today = date.today()
     
-    # إحصائيات العقارات
-    total_properties = RentalProperty.query.filter_by(is_active=True).count()
-    active_properties = RentalProperty.query.filter_by(status='active', is_active=True).count()
-    
-    # العقود المنتهية
-    expired_properties_count = RentalProperty.query.filter(
-        RentalProperty.contract_end_date < date.today(),
-        RentalProperty.is_active == True
-    ).count()
-    
-    # العقود القريبة من الانتهاء (60 يوم)
-    expiring_soon_date = date.today() + timedelta(days=60)
-    expiring_soon = RentalProperty.query.filter(
-        RentalProperty.contract_end_date.between(date.today(), expiring_soon_date),
-        RentalProperty.is_active == True
-    ).count()
+    # الإحصائيات من دفتر العقود (استعلام تجميع واحد لكل جدول)
+    stats = ledger.get_dashboard_stats(today)
     
-    # إجمالي الإيجار السنوي
-    total_annual_rent = db.session.query(
-        func.sum(RentalProperty.annual_rent_amount)
-    ).filter_by(is_active=True, status='active').scalar() or 0
-    
-    # الدفعات المعلقة
-    pending_payments = PropertyPayment.query.filter_by(status='pending').count()
-    
-    # الدفعات المتأخرة
-    overdue_payments = PropertyPayment.query.filter(
-        PropertyPayment.status == 'pending',
-        PropertyPayment.payment_date < date.today()
-    ).count()
-    
-    # إجمالي المدفوعات (المدفوعة فقط)
-    total_paid = db.session.query(
-        func.sum(PropertyPayment.amount)
-    ).filter_by(status='paid').scalar() or 0
-    
-    # تطبيق الفلتر على قائمة العقارات
+    # تطبيق الفلتر على قائمة العقارات (حالة العقد محسوبة مسبقاً في الدفتر)
     query = RentalProperty.query.filter_by(is_active=True)
     
-    if filter_type == 'active':
-        # العقود النشطة (غير منتهية وليست قريبة من الانتهاء)
-        query = query.filter(
-            RentalProperty.status == 'active',
-            RentalProperty.contract_end_date > expiring_soon_date
-        )
-    elif filter_type == 'expiring':
-        # العقود القريبة من الانتهاء (خلال 60 يوم)
-        query = query.filter(
-            RentalProperty.contract_end_date.between(date.today(), expiring_soon_date)
-        )
-    elif filter_type == 'expired':
-        # العقود المنتهية
-        query = query.filter(
-            RentalProperty.contract_end_date < date.today()
-        )
+    if filter_type in ('active', 'expiring', 'expired'):
+        state = {
+            'active': CONTRACT_CURRENT,
+            'expiring': CONTRACT_EXPIRING,
+            'expired': CONTRACT_EXPIRED,
+        }[filter_type]
+        query = query.join(
+            PropertyLedgerContract, PropertyLedgerContract.property_id == RentalProperty.id
+        ).filter(PropertyLedgerContract.state == state)
+        if filter_type == 'active':
+            query = query.filter(RentalProperty.status == 'active')
     
     properties = query.order_by(RentalProperty.created_at.desc()).all()
     
     # قائمة العقارات القريبة من الانتهاء (للعمود الجانبي)
-    expiring_properties = RentalProperty.query.filter(
-        RentalProperty.contract_end_date.between(date.today(), expiring_soon_date),
-        RentalProperty.is_active == True
+    expiring_properties = RentalProperty.query.join(
+        PropertyLedgerContract, PropertyLedgerContract.property_id == RentalProperty.id
+    ).filter(
+        PropertyLedgerContract.is_active == True,
+        PropertyLedgerContract.state == CONTRACT_EXPIRING
     ).order_by(RentalProperty.contract_end_date).all()
     
-    # الدفعات القادمة (خلال 30 يوم)
-    upcoming_payments_date = date.today() + timedelta(days=30)
-    upcoming_payments = PropertyPayment.query.filter(
-        PropertyPayment.status == 'pending',
-        PropertyPayment.payment_date.between(date.today(), upcoming_payments_date)
-    ).order_by(PropertyPayment.payment_date).all()
-    
-    # قائمة الدفعات المعلقة
-    pending_payments_list = PropertyPayment.query.filter_by(status='pending').order_by(
-        PropertyPayment.payment_date
-    ).all()
-    
-    # قائمة الدفعات المتأخرة
-    overdue_payments_list = PropertyPayment.query.filter(
-        PropertyPayment.status == 'pending',
-        PropertyPayment.payment_date < date.today()
-    ).order_by(PropertyPayment.payment_date).all()
+    # أقساط الدفتر: القادمة خلال 30 يوم، غير المسددة، والمتأخرة
+    upcoming_payments = ledger.get_upcoming_instalments(today)
+    pending_payments_list = ledger.get_instalments(limit=DASHBOARD_LIST_LIMIT)
+    overdue_payments_list = ledger.get_instalments((INSTALMENT_OVERDUE,), limit=DASHBOARD_LIST_LIMIT)
     
     return render_template('properties/dashboard.html',
-                         total_properties=total_properties,
-                         active_properties=active_properties,
-                         expired_properties=expired_properties_count,
-                         expiring_soon=expiring_soon,
-                         total_annual_rent=total_annual_rent,
-                         pending_payments=pending_payments,
-                         overdue_payments=overdue_payments,
-                         total_paid=total_paid,
+                         total_properties=stats['total_properties'],
+                         active_properties=stats['active_properties'],
+                         expired_properties=stats['expired_properties'],
+                         expiring_soon=stats['expiring_soon'],
+                         total_annual_rent=stats['total_annual_rent'],
+                         pending_payments=stats['pending_payments'],
+                         overdue_payments=stats['overdue_payments'],
+                         total_paid=stats['total_paid'],
                          properties=properties,
                          expiring_properties=expiring_properties,
                          upcoming_payments=upcoming_payments,
                          pending_payments_list=pending_payments_list,
                          overdue_payments_list=overdue_payments_list,
-                         today=date.today(),
+                         today=today,
                          current_filter=filter_type)
 
 
@@ -1151,10 +1110,12 @@ def export_residents_excel(property_id):
 def export_all_properties_excel():
     """تصدير جميع بيانات العقارات إلى Excel"""
     
-    # جلب جميع العقارات النشطة
+    # جلب جميع العقارات النشطة مع حالاتها من دفتر العقود
     properties = RentalProperty.query.filter_by(is_active=True).order_by(
         RentalProperty.created_at.desc()
     ).all()
+    contracts = ledger.get_contracts([p.id for p in properties])
+    ledger_stats = ledger.get_dashboard_stats()
     
     # إنشاء ملف Excel
     wb = Workbook()
@@ -1205,20 +1166,14 @@ def export_all_properties_excel():
     cell.fill = header_fill
     cell.alignment = Alignment(horizontal='center')
     
-    # حساب الإحصائيات
-    total_properties = len(properties)
-    active_properties = sum(1 for p in properties if p.status == 'active')
-    expired_properties = sum(1 for p in properties if p.is_expired)
-    expiring_soon = sum(1 for p in properties if p.is_expiring_soon and not p.is_expired)
-    total_annual_rent = sum(p.annual_rent_amount for p in properties if p.status == 'active')
-    
     # عرض الإحصائيات
+    total_properties = len(properties)
     stats_data = [
         ['إجمالي العقارات', total_properties],
-        ['عقود نشطة', active_properties],
-        ['عقود منتهية', expired_properties],
-        ['قريبة من الانتهاء (60 يوم)', expiring_soon],
-        ['إجمالي الإيجار السنوي', f"{total_annual_rent:,.0f} ريال"],
+        ['عقود نشطة', ledger_stats['active_properties']],
+        ['عقود منتهية', ledger_stats['expired_properties']],
+        ['قريبة من الانتهاء (60 يوم)', ledger_stats['expiring_soon']],
+        ['إجمالي الإيجار السنوي', f"{ledger_stats['total_annual_rent']:,.0f} ريال"],
     ]
     
     row = 5
@@ -1254,21 +1209,12 @@ def export_all_properties_excel():
         cell.border = border
         cell.alignment = Alignment(horizontal='center')
     
-    # تجميع حسب النوع
-    property_types = {}
-    for prop in properties:
-        ptype = prop.owner_id or 'غير محدد'  # owner_id يحتوي نوع العقار مؤقتاً
-        if ptype not in property_types:
-            property_types[ptype] = {'count': 0, 'total_rent': 0}
-        property_types[ptype]['count'] += 1
-        if prop.status == 'active':
-            property_types[ptype]['total_rent'] += prop.annual_rent_amount
-    
+    # تجميع حسب النوع (owner_id يحتوي نوع العقار مؤقتاً)
     row += 1
-    for ptype, data in property_types.items():
-        ws_dashboard.cell(row=row, column=1, value=ptype).border = border
-        ws_dashboard.cell(row=row, column=2, value=data['count']).border = border
-        ws_dashboard.cell(row=row, column=3, value=f"{data['total_rent']:,.0f} ريال").border = border
+    for ptype, count, total_rent in ledger.get_type_summary():
+        ws_dashboard.cell(row=row, column=1, value=ptype or 'غير محدد').border = border
+        ws_dashboard.cell(row=row, column=2, value=count).border = border
+        ws_dashboard.cell(row=row, column=3, value=f"{total_rent:,.0f} ريال").border = border
         row += 1
     
     # ضبط عرض الأعمدة
@@ -1322,11 +1268,13 @@ def export_all_properties_excel():
         ws_properties.cell(row=row, column=10, value=f"{prop.annual_rent_amount/12:,.0f}").border = border
         ws_properties.cell(row=row, column=11, value=prop.payment_method or '-').border = border
         
-        # تحديد الحالة
-        if prop.is_expired:
+        # تحديد الحالة من الدفتر
+        contract = contracts.get(prop.id)
+        state = contract.state if contract else None
+        if state == CONTRACT_EXPIRED:
             status = 'منتهي'
             status_fill = PatternFill(start_color='FFC7CE', end_color='FFC7CE', fill_type='solid')
-        elif prop.is_expiring_soon:
+        elif state == CONTRACT_EXPIRING:
             status = f'قريب من الانتهاء ({prop.remaining_days} يوم)'
             status_fill = PatternFill(start_color='FFEB9C', end_color='FFEB9C', fill_type='solid')
         else:
@@ -1370,10 +1318,16 @@ def export_all_properties_excel():
         cell.border = border
         cell.alignment = Alignment(horizontal='center', vertical='center')
     
-    # بيانات التجهيزات
+    # بيانات التجهيزات (استعلام واحد لكل العقارات)
+    furnishings = {}
+    for furnishing in PropertyFurnishing.query.filter(
+        PropertyFurnishing.property_id.in_([p.id for p in properties])
+    ).order_by(PropertyFurnishing.id.desc()).all():
+        furnishings[furnishing.property_id] = furnishing
+    
     row = 4
     for prop in properties:
-        furnishing = PropertyFurnishing.query.filter_by(property_id=prop.id).first()
+        furnishing = furnishings.get(prop.id)
         
         ws_furnishing.cell(row=row, column=1, value=prop.contract_number or '-').border = border
         ws_furnishing.cell(row=row, column=2, value=prop.city).border = border
@@ -1401,7 +1355,7 @@ def export_all_properties_excel():
     row += 1
     
     for prop in properties:
-        furnishing = PropertyFurnishing.query.filter_by(property_id=prop.id).first()
+        furnishing = furnishings.get(prop.id)
         if furnishing and (furnishing.other_items or furnishing.notes):
             ws_furnishing[f'A{row}'] = f"{prop.contract_number or prop.city}:"
             ws_furnishing[f'A{row}'].font = Font(bold=True)
@@ -1447,12 +1401,16 @@ def export_all_properties_excel():
         cell.border = border
         cell.alignment = Alignment(horizontal='center', vertical='center')
     
-    # بيانات الدفعات
+    # بيانات الدفعات (استعلام واحد مرتب حسب ترتيب العقارات)
+    payments_by_property = {}
+    for payment in PropertyPayment.query.filter(
+        PropertyPayment.property_id.in_([p.id for p in properties])
+    ).order_by(PropertyPayment.payment_date).all():
+        payments_by_property.setdefault(payment.property_id, []).append(payment)
+    
     row = 4
     for prop in properties:
-        payments = PropertyPayment.query.filter_by(property_id=prop.id).order_by(PropertyPayment.payment_date).all()
-        
-        for payment in payments:
+        for payment in payments_by_property.get(prop.id, []):
             ws_payments.cell(row=row, column=1, value=prop.contract_number or '-').border = border
             ws_payments.cell(row=row, column=2, value=prop.city).border = border
             ws_payments.cell(row=row, column=3, value=payment.payment_date.strftime('%Y-%m-%d')).border = border
@@ -1483,17 +1441,13 @@ def export_all_properties_excel():
     # الدفعات المستحقة (القادمة خلال 30 يوم)
     ws_payments.merge_cells(f'A{row}:H{row}')
     cell = ws_payments[f'A{row}']
-    cell.value = "الدفعات المستحقة (30 يوم قادمة)"
+    cell.value = "الأقساط المستحقة (30 يوم قادمة)"
     cell.font = Font(name='Arial', size=11, bold=True, color='FFFFFF')
     cell.fill = PatternFill(start_color='17A2B8', end_color='17A2B8', fill_type='solid')
     cell.alignment = Alignment(horizontal='center')
     row += 1
     
-    upcoming_payments_date = date.today() + timedelta(days=30)
-    upcoming_payments = PropertyPayment.query.filter(
-        PropertyPayment.status == 'pending',
-        PropertyPayment.payment_date.between(date.today(), upcoming_payments_date)
-    ).order_by(PropertyPayment.payment_date).all()
+    upcoming_payments = ledger.get_upcoming_instalments()
     
     if upcoming_payments:
         for payment in upcoming_payments:
@@ -1516,15 +1470,13 @@ def export_all_properties_excel():
     row += 1
     ws_payments.merge_cells(f'A{row}:H{row}')
     cell = ws_payments[f'A{row}']
-    cell.value = "الدفعات المعلقة"
+    cell.value = "الأقساط غير المسددة"
     cell.font = Font(name='Arial', size=11, bold=True, color='000000')
     cell.fill = PatternFill(start_color='FFC107', end_color='FFC107', fill_type='solid')
     cell.alignment = Alignment(horizontal='center')
     row += 1
     
-    pending_payments_list = PropertyPayment.query.filter_by(status='pending').order_by(
-        PropertyPayment.payment_date
-    ).all()
+    pending_payments_list = ledger.get_instalments()
     
     if pending_payments_list:
         for payment in pending_payments_list:
@@ -1533,7 +1485,7 @@ def export_all_properties_excel():
             ws_payments.cell(row=row, column=2, value=prop.city).border = border
             ws_payments.cell(row=row, column=3, value=payment.payment_date.strftime('%Y-%m-%d')).border = border
             ws_payments.cell(row=row, column=4, value=f"{payment.amount:,.0f} ريال").border = border
-            cell = ws_payments.cell(row=row, column=5, value="معلق")
+            cell = ws_payments.cell(row=row, column=5, value="متأخر" if payment.status == INSTALMENT_OVERDUE else "معلق")
             cell.border = border
             cell.fill = PatternFill(start_color='FFF3CD', end_color='FFF3CD', fill_type='solid')
             row += 1
@@ -1546,16 +1498,13 @@ def export_all_properties_excel():
     row += 1
     ws_payments.merge_cells(f'A{row}:H{row}')
     cell = ws_payments[f'A{row}']
-    cell.value = "الدفعات المتأخرة"
+    cell.value = "الأقساط المتأخرة"
     cell.font = Font(name='Arial', size=11, bold=True, color='FFFFFF')
     cell.fill = PatternFill(start_color='DC3545', end_color='DC3545', fill_type='solid')
     cell.alignment = Alignment(horizontal='center')
     row += 1
     
-    overdue_payments_list = PropertyPayment.query.filter(
-        PropertyPayment.status == 'pending',
-        PropertyPayment.payment_date < date.today()
-    ).order_by(PropertyPayment.payment_date).all()
+    overdue_payments_list = ledger.get_instalments((INSTALMENT_OVERDUE,))
     
     if overdue_payments_list:
         for payment in overdue_payments_list:
@@ -1584,20 +1533,14 @@ def export_all_properties_excel():
     cell.alignment = Alignment(horizontal='center')
     row += 1
     
-    # حساب الإحصائيات
-    all_payments = PropertyPayment.query.all()
-    total_payments = len(all_payments)
-    paid_payments = sum(1 for p in all_payments if p.status == 'paid')
-    pending_payments_count = sum(1 for p in all_payments if p.status == 'pending')
-    overdue_payments_count = sum(1 for p in all_payments if p.status == 'pending' and p.payment_date < date.today())
-    total_amount = sum(p.amount for p in all_payments if p.status == 'paid')
-    
+    # الإحصائيات من الدفتر
+    paid_instalments = sum(c.instalments for c in contracts.values()) - ledger_stats['pending_payments']
     stats = [
-        ['إجمالي الدفعات', total_payments],
-        ['دفعات مدفوعة', paid_payments],
-        ['دفعات معلقة', pending_payments_count],
-        ['دفعات متأخرة', overdue_payments_count],
-        ['إجمالي المبالغ المدفوعة', f"{total_amount:,.0f} ريال"]
+        ['إجمالي الأقساط', sum(c.instalments for c in contracts.values())],
+        ['أقساط مسددة', paid_instalments],
+        ['أقساط غير مسددة', ledger_stats['pending_payments']],
+        ['أقساط متأخرة', ledger_stats['overdue_payments']],
+        ['إجمالي المبالغ المدفوعة', f"{ledger_stats['total_paid']:,.0f} ريال"]
     ]
     
     for stat in stats:
@@ -76,55 +76,7 @@ def process_and_save_contract(file, property_id):
 
 
 def get_property_stats():
-    """الحصول على إحصائيات العقارات"""
-    from datetime import date, timedelta
-    from core.extensions import db
-    from models import RentalProperty, PropertyPayment
-    from sqlalchemy import func
-    
-    total_properties = RentalProperty.query.filter_by(is_active=True).count()
-    active_properties = RentalProperty.query.filter_by(status='active', is_active=True).count()
-    
-    # العقود المنتهية
-    expired_properties_count = RentalProperty.query.filter(
-        RentalProperty.contract_end_date < date.today(),
-        RentalProperty.is_active == True
-    ).count()
-    
-    # العقود القريبة من الانتهاء (60 يوم)
-    expiring_soon_date = date.today() + timedelta(days=60)
-    expiring_soon = RentalProperty.query.filter(
-        RentalProperty.contract_end_date.between(date.today(), expiring_soon_date),
-        RentalProperty.is_active == True
-    ).count()
-    
-    # إجمالي الإيجار السنوي
-    total_annual_rent = db.session.query(
-        func.sum(RentalProperty.annual_rent_amount)
-    ).filter_by(is_active=True, status='active').scalar() or 0
-    
-    # الدفعات المعلقة
-    pending_payments = PropertyPayment.query.filter_by(status='pending').count()
-    
-    # الدفعات المتأخرة
-    overdue_payments = PropertyPayment.query.filter(
-        PropertyPayment.status == 'pending',
-        PropertyPayment.payment_date < date.today()
-    ).count()
-    
-    # إجمالي المدفوعات
-    total_paid = db.session.query(
-        func.sum(PropertyPayment.amount)
-    ).filter_by(status='paid').scalar() or 0
-    
-    return {
-        'total_properties': total_properties,
-        'active_properties': active_properties,
-        'expired_properties': expired_properties_count,
-        'expiring_soon': expiring_soon,
-        'total_annual_rent': total_annual_rent,
-        'pending_payments': pending_payments,
-        'overdue_payments': overdue_payments,
-        'total_paid': total_paid,
-        'expiring_soon_date': expiring_soon_date
-    }
+    """الحصول على إحصائيات العقارات (من دفتر العقود)"""
+    from modules.properties.application.property_ledger_service import get_dashboard_stats
+
+    return get_dashboard_stats()
@@ -1,11 +1,14 @@
 from flask import Blueprint, render_template, request, jsonify, make_response, send_file, redirect, url_for
 from flask_login import login_required
-from sqlalchemy import func, or_
+from sqlalchemy import func
 from datetime import datetime, date, timedelta
 from io import BytesIO
+from types import SimpleNamespace
+from sqlalchemy.orm import selectinload
 from utils.pdf import create_pdf, arabic_text, create_data_table, get_styles
 from core.extensions import db
-from models import Department, Employee, Attendance, Salary, Document, SystemAudit, Vehicle, Fee, VehicleChecklist, VehicleDamageMarker, VehicleChecklistImage, employee_departments
+from services.report_dataset_service import get_report_dataset, load_entities
+from models import Department, Employee, Attendance, Salary, Document, SystemAudit, Vehicle, VehicleChecklist, VehicleDamageMarker, VehicleChecklistImage, employee_departments
 from utils.date_converter import parse_date, format_date_hijri, format_date_gregorian, get_month_name_ar
 from utils.excel import generate_employee_excel, generate_salary_excel
 from utils.vehicles_export import export_vehicle_pdf, export_vehicle_excel
@@ -163,44 +166,24 @@ def vehicles_pdf():
     status = request.args.get('status', '')
     search = request.args.get('search', '')
     
-    # إنشاء استعلام المركبات
-    query = Vehicle.query
-    
-    # تطبيق الفلترة على المركبات
-    if vehicle_type:
-        query = query.filter_by(make=vehicle_type)  # نستخدم make بدلاً من vehicle_type
-    
-    if status:
-        query = query.filter_by(status=status)
-    
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Vehicle.plate_number.like(search_term),
-                Vehicle.make.like(search_term),
-                Vehicle.model.like(search_term),
-                Vehicle.color.like(search_term)
-            )
-        )
-    
-    # الحصول على المركبات المرتبة حسب الترتيب
-    vehicles = query.order_by(Vehicle.plate_number).all()
+    # بيانات التقرير المشتركة بين PDF وExcel (تُبنى مرة واحدة لكل مجموعة فلاتر)
+    dataset = get_report_dataset('vehicles', vehicle_type=vehicle_type, status=status, search=search)
     
     # تحضير مخرجات التقرير
     buffer = BytesIO()
     
     # إنشاء تقرير PDF للمركبات
-    data = []
-    for vehicle in vehicles:
-        data.append({
-            'plate_number': vehicle.plate_number,
-            'make': vehicle.make,
-            'model': vehicle.model,
-            'color': vehicle.color,
-            'year': vehicle.year,
-            'status': vehicle.status
-        })
+    data = [
+        {
+            'plate_number': row.plate_number,
+            'make': row.make,
+            'model': row.model,
+            'color': row.color,
+            'year': row.year,
+            'status': row.status
+        }
+        for row in dataset.rows()
+    ]
     
     # استدعاء دالة إنشاء PDF للمركبات
     report_title = "تقرير المركبات"
@@ -226,33 +209,15 @@ def vehicles_excel():
     status = request.args.get('status', '')
     search = request.args.get('search', '')
     
-    # إنشاء استعلام المركبات
-    query = Vehicle.query
-    
-    # تطبيق الفلترة على المركبات
-    if vehicle_type:
-        query = query.filter_by(make=vehicle_type)  # نستخدم make بدلاً من vehicle_type
-    
-    if status:
-        query = query.filter_by(status=status)
-    
-    if search:
-        search_term = f"%{search}%"
-        query = query.filter(
-            or_(
-                Vehicle.plate_number.like(search_term),
-                Vehicle.make.like(search_term),
-                Vehicle.model.like(search_term),
-                Vehicle.color.like(search_term)
-            )
-        )
-    
-    # الحصول على المركبات المرتبة حسب الترتيب
-    vehicles = query.order_by(Vehicle.plate_number).all()
+    # بيانات التقرير المشتركة بين PDF وExcel (تُبنى مرة واحدة لكل مجموعة فلاتر)
+    dataset = get_report_dataset('vehicles', vehicle_type=vehicle_type, status=status, search=search)
     
     # تحضير مخرجات التقرير
     output = BytesIO()
     
+    # مولد Excel يحتاج كائنات المركبات الكاملة: تحميلها بالمعرفات المحفوظة في مجموعة البيانات
+    vehicles = load_entities(Vehicle, dataset.column('id'))
+    
     # استدعاء دالة إنشاء Excel الاحترافية للمركبات
     generate_vehicles_excel(vehicles, output)
     
@@ -281,25 +246,10 @@ def fees_pdf():
     if date_to:
         date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
     
-    # إنشاء استعلام الرسوم
-    query = Fee.query
-    
-    # تطبيق الفلترة على الرسوم
-    if fee_type:
-        query = query.filter_by(fee_type=fee_type)
-    
-    if date_from:
-        query = query.filter(Fee.due_date >= date_from)
-    
-    if date_to:
-        query = query.filter(Fee.due_date <= date_to)
-    
-    if status:
-        is_paid_bool = (status.lower() == 'paid')
-        query = query.filter(Fee.is_paid == is_paid_bool)
-    
-    # الحصول على قائمة الرسوم المرتبة حسب تاريخ الاستحقاق
-    fees = query.order_by(Fee.due_date).all()
+    # بيانات التقرير المشتركة بين PDF وExcel مع الإجماليات محسوبة مرة واحدة
+    dataset = get_report_dataset('fees', fee_type=fee_type, date_from=date_from, date_to=date_to, status=status)
+    fees = list(dataset.rows())
+    fee_totals = dataset.aggregates
     
     # تحضير مخرجات التقرير
     buffer = BytesIO()
@@ -385,14 +335,10 @@ def fees_pdf():
         content.append(Spacer(1, 20))
         
         # إحصائيات الرسوم
-        total_fees = sum(fee.amount for fee in fees if fee.amount)
-        total_paid = sum(fee.amount for fee in fees if fee.amount and fee.is_paid)
-        total_unpaid = sum(fee.amount for fee in fees if fee.amount and not fee.is_paid)
-        
         stats = [
-            Paragraph(arabic_text(f"إجمالي الرسوم: {total_fees:.2f} ر.س"), styles['Arabic']),
-            Paragraph(arabic_text(f"إجمالي المدفوع: {total_paid:.2f} ر.س"), styles['Arabic']),
-            Paragraph(arabic_text(f"إجمالي غير المدفوع: {total_unpaid:.2f} ر.س"), styles['Arabic'])
+            Paragraph(arabic_text(f"إجمالي الرسوم: {fee_totals['total']:.2f} ر.س"), styles['Arabic']),
+            Paragraph(arabic_text(f"إجمالي المدفوع: {fee_totals['paid']:.2f} ر.س"), styles['Arabic']),
+            Paragraph(arabic_text(f"إجمالي غير المدفوع: {fee_totals['unpaid']:.2f} ر.س"), styles['Arabic'])
         ]
         
         for stat in stats:
@@ -437,25 +383,10 @@ def fees_excel():
     if date_to:
         date_to = datetime.strptime(date_to, '%Y-%m-%d').date()
     
-    # إنشاء استعلام الرسوم
-    query = Fee.query
-    
-    # تطبيق الفلترة على الرسوم
-    if fee_type:
-        query = query.filter_by(fee_type=fee_type)
-    
-    if date_from:
-        query = query.filter(Fee.due_date >= date_from)
-    
-    if date_to:
-        query = query.filter(Fee.due_date <= date_to)
-    
-    if status:
-        is_paid_bool = (status.lower() == 'paid')
-        query = query.filter(Fee.is_paid == is_paid_bool)
-    
-    # الحصول على قائمة الرسوم المرتبة حسب تاريخ الاستحقاق
-    fees = query.order_by(Fee.due_date).all()
+    # بيانات التقرير المشتركة بين PDF وExcel مع الإجماليات محسوبة مرة واحدة
+    dataset = get_report_dataset('fees', fee_type=fee_type, date_from=date_from, date_to=date_to, status=status)
+    fees = list(dataset.rows())
+    fee_totals = dataset.aggregates
     
     # تحضير بيانات Excel
     data = []
@@ -527,11 +458,7 @@ def fees_excel():
         # إضافة ورقة للإحصائيات
         stats_df = pd.DataFrame({
             'البيان': ['إجمالي الرسوم', 'إجمالي المدفوع', 'إجمالي غير المدفوع'],
-            'القيمة': [
-                sum(fee.amount for fee in fees if fee.amount),
-                sum(fee.amount for fee in fees if fee.amount and fee.is_paid),
-                sum(fee.amount for fee in fees if fee.amount and not fee.is_paid)
-            ]
+            'القيمة': [fee_totals['total'], fee_totals['paid'], fee_totals['unpaid']]
         })
         
         stats_df.to_excel(writer, sheet_name='إحصائيات', index=False)
@@ -602,18 +529,14 @@ def employees_pdf():
     department_id = request.args.get('department_id', '')
     status = request.args.get('status', '')
     
-    query = Employee.query
-    
     # تطبيق الفلاتر
     if department_id:
-        query = query.filter_by(department_id=department_id)
         department = Department.query.get(department_id)
         department_name = department.name if department else ""
     else:
         department_name = "جميع الأقسام"
     
     if status:
-        query = query.filter_by(status=status)
         if status == 'active':
             status_name = "نشط"
         elif status == 'inactive':
@@ -625,7 +548,7 @@ def employees_pdf():
     else:
         status_name = "جميع الحالات"
     
-    employees = query.all()
+    dataset = get_report_dataset('employees', department_id=department_id, status=status)
     
     # استخدام المكتبة الموحدة لإنشاء PDF
     from utils.pdf import arabic_text, create_pdf, create_data_table, get_styles
@@ -650,16 +573,16 @@ def employees_pdf():
     headers = ["الاسم", "الرقم الوظيفي", "الرقم الوطني", "الهاتف", "المسمى الوظيفي", "القسم", "الحالة"]
     data = []
     
+    # ترجمة حالة الموظف
+    status_map = {
+        'active': 'نشط',
+        'inactive': 'غير نشط',
+        'on_leave': 'في إجازة'
+    }
+    
     # إضافة بيانات الموظفين
-    for emp in employees:
-        department_name = emp.department.name if emp.department else "---"
-        
-        # ترجمة حالة الموظف
-        status_map = {
-            'active': 'نشط',
-            'inactive': 'غير نشط',
-            'on_leave': 'في إجازة'
-        }
+    for emp in dataset.rows():
+        department_name = emp.department_name or "---"
         status_text = status_map.get(emp.status, emp.status)
         
         row = [
@@ -700,15 +623,13 @@ def employees_excel():
     department_id = request.args.get('department_id', '')
     status = request.args.get('status', '')
     
-    query = Employee.query
-    
-    # تطبيق الفلاتر
-    if department_id:
-        query = query.filter_by(department_id=department_id)
-    if status:
-        query = query.filter_by(status=status)
+    dataset = get_report_dataset('employees', department_id=department_id, status=status)
     
-    employees = query.all()
+    # مولد Excel يحتاج كائنات الموظفين مع أقسامهم وجنسياتهم: تحميلها دفعة واحدة بالمعرفات
+    employees = load_entities(
+        Employee, dataset.column('id'),
+        selectinload(Employee.departments), selectinload(Employee.nationality_rel)
+    )
     
     # توليد ملف Excel
     output = generate_employee_excel(employees)
@@ -786,25 +707,14 @@ def attendance_pdf():
         from_date = datetime.now() - timedelta(days=7)
         to_date = datetime.now()
     
-    # استعلام الحضور
-    query = db.session.query(
-            Attendance, Employee
-        ).join(
-            Employee, Attendance.employee_id == Employee.id
-        ).filter(
-            Attendance.date.between(from_date, to_date)
-        )
-    
-    # تطبيق الفلاتر
+    # أسماء الفلاتر
     if department_id:
-        query = query.filter(Employee.department_id == department_id)
         department = Department.query.get(department_id)
         department_name = department.name if department else ""
     else:
         department_name = "جميع الأقسام"
     
     if status:
-        query = query.filter(Attendance.status == status)
         if status == 'present':
             status_name = "حاضر"
         elif status == 'absent':
@@ -818,8 +728,9 @@ def attendance_pdf():
     else:
         status_name = "جميع الحالات"
     
-    # الحصول على النتائج النهائية
-    results = query.order_by(Attendance.date.desc()).all()
+    # بيانات التقرير المشتركة مع تصدير Excel
+    dataset = get_report_dataset('attendance', from_date=from_date, to_date=to_date,
+                                 department_id=department_id, status=status)
     
     # إنشاء ملف PDF
     buffer = BytesIO()
@@ -888,23 +799,23 @@ def attendance_pdf():
     headers_display = [get_display(arabic_reshaper.reshape(h)) for h in headers]
     data.append(headers_display)
     
+    # ترجمة حالة الحضور
+    status_map = {
+        'present': 'حاضر',
+        'absent': 'غائب',
+        'leave': 'إجازة',
+        'sick': 'مرضي'
+    }
+    
     # إضافة بيانات الحضور
-    for attendance, employee in results:
-        department_name = employee.department.name if employee.department else "---"
-        
-        # ترجمة حالة الحضور
-        status_map = {
-            'present': 'حاضر',
-            'absent': 'غائب',
-            'leave': 'إجازة',
-            'sick': 'مرضي'
-        }
+    for attendance in dataset.rows():
+        department_name = attendance.department_name or "---"
         status_text = status_map.get(attendance.status, attendance.status)
         
         row = [
             format_date_gregorian(attendance.date),
-            get_display(arabic_reshaper.reshape(employee.name)),
-            employee.employee_id,
+            get_display(arabic_reshaper.reshape(attendance.employee_name)),
+            attendance.employee_code,
             str(attendance.check_in) if attendance.check_in else "---",
             str(attendance.check_out) if attendance.check_out else "---",
             get_display(arabic_reshaper.reshape(status_text)),
@@ -997,92 +908,45 @@ def attendance_excel():
     # ===== 1. صفحة Dashboard الرئيسية =====
     ws_dashboard = wb.create_sheet("📊 لوحة المعلومات", 0)
     
-    # جلب البيانات لجميع الأقسام
-    departments = Department.query.all() if not department_id else [Department.query.get(department_id)]
+    # بيانات التقرير المشتركة مع تصدير PDF: السجلات وإحصائيات الأقسام محسوبة مرة واحدة
+    dataset = get_report_dataset('attendance', from_date=from_date, to_date=to_date,
+                                 department_id=department_id, status=status)
     
-    # جمع إحصائيات عامة
-    total_employees = 0
-    total_present = 0
-    total_absent = 0
-    total_leave = 0
-    total_sick = 0
-    total_records = 0
+    # ربط الموظف بسجلاته (قاموس بدلاً من البحث الخطي لكل سجل)
+    roster = {emp['id']: emp for emp in dataset.aggregates['roster']}
+    records_by_employee = {}
+    for record in dataset.rows():
+        records_by_employee.setdefault(record.employee_pk, []).append(record)
     
     department_stats = []
-    
-    for dept in departments:
-        if not dept:
-            continue
-        
-        # جلب موظفي القسم عبر العلاقة الصحيحة (استبعاد المنتهية خدمتهم فقط)
-        employees = [emp for emp in dept.employees if emp.status not in ['terminated', 'inactive']]
-        dept_employee_count = len(employees)
-        
-        if dept_employee_count == 0:
-            continue
-        
-        employee_ids = [emp.id for emp in employees]
-        
-        # جلب سجلات الحضور
-        attendance_records = Attendance.query.filter(
-            Attendance.employee_id.in_(employee_ids),
-            Attendance.date >= from_date,
-            Attendance.date <= to_date
-        ).all()
-        
-        # حساب الإحصائيات
-        present_count = sum(1 for r in attendance_records if r.status == 'present')
-        absent_count = sum(1 for r in attendance_records if r.status == 'absent')
-        leave_count = sum(1 for r in attendance_records if r.status == 'leave')
-        sick_count = sum(1 for r in attendance_records if r.status == 'sick')
-        dept_total = len(attendance_records)
-        
-        attendance_rate = (present_count / dept_total * 100) if dept_total > 0 else 0
-        
-        # جمع أسماء الغائبين والإجازات
+    for dept in dataset.aggregates['departments']:
         absentees = []
         on_leave = []
         sick_list = []
-        
-        for record in attendance_records:
-            employee = next((e for e in employees if e.id == record.employee_id), None)
-            if not employee:
-                continue
-            
-            emp_data = {
-                'name': employee.name,
-                'employee_id': employee.employee_id,
-                'date': record.date,
-                'notes': record.notes
-            }
-            
-            if record.status == 'absent':
-                absentees.append(emp_data)
-            elif record.status == 'leave':
-                on_leave.append(emp_data)
-            elif record.status == 'sick':
-                sick_list.append(emp_data)
-        
-        department_stats.append({
-            'name': dept.name,
-            'employees': dept_employee_count,
-            'present': present_count,
-            'absent': absent_count,
-            'leave': leave_count,
-            'sick': sick_count,
-            'total': dept_total,
-            'rate': round(attendance_rate, 1),
-            'absentees': absentees,
-            'on_leave': on_leave,
-            'sick_list': sick_list
-        })
-        
-        total_employees += dept_employee_count
-        total_present += present_count
-        total_absent += absent_count
-        total_leave += leave_count
-        total_sick += sick_count
-        total_records += dept_total
+        for emp_id in dept['employee_ids']:
+            employee = roster[emp_id]
+            for record in records_by_employee.get(emp_id, ()):
+                emp_data = {
+                    'name': employee['name'],
+                    'employee_id': employee['employee_id'],
+                    'date': record.date,
+                    'notes': record.notes
+                }
+                if record.status == 'absent':
+                    absentees.append(emp_data)
+                elif record.status == 'leave':
+                    on_leave.append(emp_data)
+                elif record.status == 'sick':
+                    sick_list.append(emp_data)
+        
+        department_stats.append(dict(dept, absentees=absentees, on_leave=on_leave, sick_list=sick_list))
+    
+    # الإحصائيات العامة
+    totals = dataset.aggregates['totals']
+    total_employees = totals.get('employees', 0)
+    total_present = totals.get('present', 0)
+    total_absent = totals.get('absent', 0)
+    total_leave = totals.get('leave', 0)
     
     # تنسيقات عامة
     thick_border = Border(
@@ -1296,23 +1160,18 @@ def attendance_excel():
     
     # ===== صفحة حضور تفصيلية لكل قسم =====
     for dept_data in department_stats:
-        # جلب القسم من قاعدة البيانات
-        dept = Department.query.filter_by(name=dept_data['name']).first()
-        if not dept:
-            continue
-        
-        # جلب جميع موظفي القسم عبر العلاقة الصحيحة (استبعاد المنتهية خدمتهم فقط)
-        employees = [emp for emp in dept.employees if emp.status not in ['terminated', 'inactive']]
+        # موظفو القسم من مجموعة البيانات (استبعاد المنتهية خدمتهم فقط)
+        employees = [roster[emp_id] for emp_id in dept_data['employee_ids']]
         
         if not employees:
             continue
         
-        ws_dept = wb.create_sheet(f"🏢 {dept.name[:25]}")
+        ws_dept = wb.create_sheet(f"🏢 {dept_data['name'][:25]}")
         
         # العنوان
         total_cols = 9 + len(date_list)
         ws_dept.merge_cells(f'A1:{get_column_letter(total_cols)}3')
-        ws_dept['A1'].value = f"🏢 تقرير حضور قسم {dept.name}\n{from_date.strftime('%Y/%m/%d')} - {to_date.strftime('%Y/%m/%d')}"
+        ws_dept['A1'].value = f"🏢 تقرير حضور قسم {dept_data['name']}\n{from_date.strftime('%Y/%m/%d')} - {to_date.strftime('%Y/%m/%d')}"
         ws_dept['A1'].font = Font(size=18, bold=True, color="FFFFFF")
         ws_dept['A1'].fill = PatternFill(start_color="667eea", end_color="667eea", fill_type="solid")
         ws_dept['A1'].alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
@@ -1366,23 +1225,16 @@ def attendance_excel():
         data_start_row = table_start_row + 1
         for emp_idx, employee in enumerate(employees, data_start_row):
             # معلومات الموظف
-            ws_dept.cell(row=emp_idx, column=1).value = employee.name
-            ws_dept.cell(row=emp_idx, column=2).value = employee.employee_id or '-'
-            ws_dept.cell(row=emp_idx, column=3).value = employee.national_id or '-'
-            ws_dept.cell(row=emp_idx, column=4).value = employee.mobile or '-'
-            ws_dept.cell(row=emp_idx, column=5).value = employee.job_title or '-'
-            ws_dept.cell(row=emp_idx, column=6).value = employee.location or '-'
-            ws_dept.cell(row=emp_idx, column=7).value = employee.project or '-'
-            
-            # جلب سجلات الحضور لهذا الموظف
-            attendance_records = Attendance.query.filter(
-                Attendance.employee_id == employee.id,
-                Attendance.date >= from_date,
-                Attendance.date <= to_date
-            ).all()
+            ws_dept.cell(row=emp_idx, column=1).value = employee['name']
+            ws_dept.cell(row=emp_idx, column=2).value = employee['employee_id'] or '-'
+            ws_dept.cell(row=emp_idx, column=3).value = employee['national_id'] or '-'
+            ws_dept.cell(row=emp_idx, column=4).value = employee['mobile'] or '-'
+            ws_dept.cell(row=emp_idx, column=5).value = employee['job_title'] or '-'
+            ws_dept.cell(row=emp_idx, column=6).value = employee['location'] or '-'
+            ws_dept.cell(row=emp_idx, column=7).value = employee['project'] or '-'
             
-            # إنشاء dictionary لربط التاريخ بالحالة
-            attendance_dict = {record.date: record.status for record in attendance_records}
+            # إنشاء dictionary لربط التاريخ بالحالة من سجلات الموظف في مجموعة البيانات
+            attendance_dict = {record.date: record.status for record in records_by_employee.get(employee['id'], ())}
             
             # حساب إجمالي الحضور
             total_present = sum(1 for status in attendance_dict.values() if status == 'present')
@@ -1546,48 +1398,31 @@ def salaries_pdf():
     year = int(request.args.get('year', current_year))
     department_id = request.args.get('department_id', '')
     
-    # استعلام الموظفين النشطين
-    employees_query = Employee.query.filter(Employee.status == 'active')
-    
     # تطبيق فلتر القسم إذا كان محددًا
     if department_id:
-        employees_query = employees_query.filter_by(department_id=department_id)
         department = Department.query.get(department_id)
         department_name = department.name if department else ""
     else:
         department_name = "جميع الأقسام"
     
-    employees = employees_query.all()
-    
-    # الحصول على الرواتب النهائية مع التفاصيل
-    salaries = []
-    for employee in employees:
-        salary = Salary.query.filter_by(
-            employee_id=employee.id,
-            month=month,
-            year=year
-        ).first()
-        
-        if salary:
-            salaries.append({
-                'id': salary.id,
-                'employee': employee,
-                'basic_salary': salary.basic_salary,
-                'allowances': salary.allowances,
-                'deductions': salary.deductions,
-                'bonus': salary.bonus,
-                'net_salary': salary.net_salary,
-                'has_salary': True
-            })
-    
-    # حساب الإجماليات
-    totals = {
-        'basic': sum(s['basic_salary'] for s in salaries if s['has_salary']),
-        'allowances': sum(s['allowances'] for s in salaries if s['has_salary']),
-        'deductions': sum(s['deductions'] for s in salaries if s['has_salary']),
-        'bonus': sum(s['bonus'] for s in salaries if s['has_salary']),
-        'net': sum(s['net_salary'] for s in salaries if s['has_salary'])
-    }
+    # بيانات التقرير المشتركة مع تصدير Excel (الإجماليات محسوبة مرة واحدة)
+    dataset = get_report_dataset('salaries', month=month, year=year, department_id=department_id)
+    
+    # الرواتب النهائية مع التفاصيل
+    salaries = [
+        {
+            'id': row.salary_id,
+            'employee': SimpleNamespace(id=row.employee_pk, name=row.employee_name, employee_id=row.employee_code),
+            'basic_salary': row.basic_salary,
+            'allowances': row.allowances,
+            'deductions': row.deductions,
+            'bonus': row.bonus,
+            'net_salary': row.net_salary,
+            'has_salary': True
+        }
+        for row in dataset.rows() if row.has_salary
+    ]
+    totals = dataset.aggregates['totals']
     
     # توليد PDF باستخدام وحدة PDF المخصصة
     pdf_file = generate_salary_report_pdf(salaries, month, year, department_name, totals)
@@ -1678,29 +1513,12 @@ def salaries_excel():
     year = int(request.args.get('year', current_year))
     department_id = request.args.get('department_id', '')
     
-    # استعلام الموظفين النشطين
-    employees_query = Employee.query.filter(Employee.status == 'active')
-    
-    # تطبيق فلتر القسم إذا كان محددًا
-    if department_id:
-        employees_query = employees_query.filter_by(department_id=department_id)
-    
-    employees = employees_query.all()
-    
-    # الحصول على الرواتب النهائية مع التفاصيل
-    salaries = []
-    for employee in employees:
-        salary = Salary.query.filter_by(
-            employee_id=employee.id,
-            month=month,
-            year=year
-        ).first()
-        
-        if salary:
-            salaries.append(salary)
+    # بيانات التقرير المشتركة مع تصدير PDF
+    dataset = get_report_dataset('salaries', month=month, year=year, department_id=department_id)
+    salaries = [row for row in dataset.rows() if row.has_salary]
+    totals = dataset.aggregates['totals']
     
     # إنشاء ملف Excel
-    import pandas as pd
     import io
     from openpyxl import Workbook
     from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
@@ -1743,15 +1561,13 @@ def salaries_excel():
         )
         cell.border = thin_border
     
-    # إضافة البيانات
-    for idx, salary in enumerate(salaries, start=3):
-        employee = salary.employee
-        sheet.cell(row=idx, column=1).value = employee.name
-        sheet.cell(row=idx, column=2).value = employee.employee_id
+    # إضافة البيانات (تبدأ بعد صف العناوين)
+    for idx, salary in enumerate(salaries, start=4):
+        sheet.cell(row=idx, column=1).value = salary.employee_name
+        sheet.cell(row=idx, column=2).value = salary.employee_code
         
         # القسم
-        department_name = employee.department.name if employee.department else "---"
-        sheet.cell(row=idx, column=3).value = department_name
+        sheet.cell(row=idx, column=3).value = salary.department_name or "---"
         
         # تفاصيل الراتب
         sheet.cell(row=idx, column=4).value = salary.basic_salary
@@ -1780,18 +1596,11 @@ def salaries_excel():
     sheet.cell(row=total_row, column=1).font = Font(bold=True, name='Tajawal')
     sheet.merge_cells(f'A{total_row}:C{total_row}')
     
-    # حساب الإجماليات
-    basic_total = sum(s.basic_salary for s in salaries)
-    allowances_total = sum(s.allowances for s in salaries)
-    deductions_total = sum(s.deductions for s in salaries)
-    bonus_total = sum(s.bonus for s in salaries)
-    net_total = sum(s.net_salary for s in salaries)
-    
-    sheet.cell(row=total_row, column=4).value = basic_total
-    sheet.cell(row=total_row, column=5).value = allowances_total
-    sheet.cell(row=total_row, column=6).value = deductions_total
-    sheet.cell(row=total_row, column=7).value = bonus_total
-    sheet.cell(row=total_row, column=8).value = net_total
+    sheet.cell(row=total_row, column=4).value = totals['basic']
+    sheet.cell(row=total_row, column=5).value = totals['allowances']
+    sheet.cell(row=total_row, column=6).value = totals['deductions']
+    sheet.cell(row=total_row, column=7).value = totals['bonus']
+    sheet.cell(row=total_row, column=8).value = totals['net']
     
     # تنسيق صف الإجماليات
     for col in range(1, 9):
@@ -1892,26 +1701,14 @@ def documents_pdf():
     expiring_only = request.args.get('expiring_only', '') == 'true'
     expiry_days = int(request.args.get('expiry_days', 30))
     
-    # تحديد تاريخ الانتهاء للمقارنة في حالة "قريبة من الانتهاء"
-    cutoff_date = datetime.now().date() + timedelta(days=expiry_days)
-    
-    # استعلام الوثائق
-    query = db.session.query(
-            Document, Employee
-        ).join(
-            Employee, Document.employee_id == Employee.id
-        )
-    
-    # تطبيق الفلاتر والحصول على أسماء الفلاتر
+    # أسماء الفلاتر
     if department_id:
-        query = query.filter(Employee.department_id == department_id)
         department = Department.query.get(department_id)
         department_name = department.name if department else ""
     else:
         department_name = "جميع الأقسام"
     
     if document_type:
-        query = query.filter(Document.document_type == document_type)
         document_types_map = {
             'national_id': 'الهوية الوطنية',
             'passport': 'جواز السفر',
@@ -1924,13 +1721,13 @@ def documents_pdf():
         document_type_name = "جميع أنواع الوثائق"
     
     if expiring_only:
-        query = query.filter(Document.expiry_date <= cutoff_date)
         expiry_status = f"الوثائق التي ستنتهي خلال {expiry_days} يوم"
     else:
         expiry_status = "جميع الوثائق"
     
-    # الحصول على النتائج النهائية
-    results = query.order_by(Document.expiry_date).all()
+    # بيانات التقرير المشتركة مع تصدير Excel
+    dataset = get_report_dataset('documents', department_id=department_id, document_type=document_type,
+                                 expiring_only=expiring_only, expiry_days=expiry_days)
     
     # استخدام المكتبة الموحدة لإنشاء PDF
     from utils.pdf import arabic_text, create_pdf, create_data_table, get_styles
@@ -1968,14 +1765,16 @@ def documents_pdf():
     }
     
     # إضافة بيانات الوثائق
-    today = datetime.now().date()
-    for document, employee in results:
-        department_name = employee.department.name if employee.department else "---"
+    for document in dataset.rows():
+        department_name = document.department_name or "---"
         document_type_arabic = document_types_map.get(document.document_type, document.document_type)
         
         # تحديد حالة الوثيقة (سارية، قاربت الانتهاء، منتهية)
-        days_to_expiry = (document.expiry_date - today).days
-        if days_to_expiry <= 0:
+        days_to_expiry = document.days_to_expiry
+        if days_to_expiry is None:
+            status = "---"
+            status_color = colors.grey
+        elif days_to_expiry <= 0:
             status = "منتهية"
             status_color = colors.red
         elif days_to_expiry <= expiry_days:
@@ -1986,8 +1785,8 @@ def documents_pdf():
             status_color = colors.green
         
         row = [
-            arabic_text(employee.name),
-            employee.employee_id,
+            arabic_text(document.employee_name),
+            document.employee_code,
             arabic_text(department_name),
             arabic_text(document_type_arabic),
             document.document_number,
@@ -2030,29 +1829,10 @@ def documents_excel():
     expiring_only = request.args.get('expiring_only', '') == 'true'
     expiry_days = int(request.args.get('expiry_days', 30))
     
-    # تحديد تاريخ الانتهاء للمقارنة في حالة "قريبة من الانتهاء"
-    cutoff_date = datetime.now().date() + timedelta(days=expiry_days)
-    
-    # استعلام الوثائق
-    query = db.session.query(
-            Document, Employee
-        ).join(
-            Employee, Document.employee_id == Employee.id
-        )
-    
-    # تطبيق الفلاتر
-    if department_id:
-        query = query.filter(Employee.department_id == department_id)
-    if document_type:
-        query = query.filter(Document.document_type == document_type)
-    if expiring_only:
-        query = query.filter(Document.expiry_date <= cutoff_date)
-    
-    # الحصول على النتائج النهائية
-    results = query.order_by(Document.expiry_date).all()
+    # بيانات التقرير المشتركة مع تصدير PDF
+    dataset = get_report_dataset('documents', department_id=department_id, document_type=document_type,
+                                 expiring_only=expiring_only, expiry_days=expiry_days)
     
-    # إنشاء كائن Pandas DataFrame
-    import pandas as pd
     import io
     from openpyxl import Workbook
     from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
@@ -2109,14 +1889,13 @@ def documents_excel():
         'health_certificate': 'الشهادة الصحية'
     }
     
-    # إضافة البيانات
-    for idx, (document, employee) in enumerate(results, start=3):
-        sheet.cell(row=idx, column=1).value = employee.name
-        sheet.cell(row=idx, column=2).value = employee.employee_id
+    # إضافة البيانات (تبدأ بعد صف العناوين)
+    for idx, document in enumerate(dataset.rows(), start=4):
+        sheet.cell(row=idx, column=1).value = document.employee_name
+        sheet.cell(row=idx, column=2).value = document.employee_code
         
         # القسم
-        department_name = employee.department.name if employee.department else "---"
-        sheet.cell(row=idx, column=3).value = department_name
+        sheet.cell(row=idx, column=3).value = document.department_name or "---"
         
         # تفاصيل الوثيقة
         sheet.cell(row=idx, column=4).value = document_types_map.get(document.document_type, document.document_type)
@@ -2125,11 +1904,13 @@ def documents_excel():
         sheet.cell(row=idx, column=7).value = format_date_gregorian(document.expiry_date)
         
         # حالة الوثيقة (سارية، منتهية، قريبة من الانتهاء)
-        today = datetime.now().date()
-        if document.expiry_date < today:
+        if document.days_to_expiry is None:
+            status = "---"
+            status_fill = PatternFill(fill_type=None)
+        elif document.days_to_expiry < 0:
             status = "منتهية"
             status_fill = PatternFill(start_color="FFCCCC", end_color="FFCCCC", fill_type="solid")  # أحمر فاتح
-        elif document.expiry_date <= today + timedelta(days=30):
+        elif document.days_to_expiry <= 30:
             status = "تنتهي قريباً"
             status_fill = PatternFill(start_color="FFFFCC", end_color="FFFFCC", fill_type="solid")  # أصفر فاتح
         else:
@@ -11,6 +11,8 @@ import os
 import tempfile
 from werkzeug.utils import secure_filename
 from sqlalchemy import or_
+from modules.imports.application.import_specs import IMPORT_SIM_CARDS
+from modules.imports.presentation.web.staged_import_view import handle_staged_import
 
 sim_management_bp = Blueprint('sim_management', __name__)
 
@@ -690,97 +692,22 @@ def export_excel():
 @sim_management_bp.route('/import-excel', methods=['GET', 'POST'])
 @login_required
 def import_excel():
-    """استيراد أرقام SIM من ملف Excel"""
-    if request.method == 'POST':
-        try:
-            # التحقق من وجود الملف
-            if 'excel_file' not in request.files:
-                flash('يرجى اختيار ملف Excel', 'danger')
-                return render_template('sim_management/import_excel.html')
-            
-            file = request.files['excel_file']
-            if file.filename == '':
-                flash('يرجى اختيار ملف', 'danger')
-                return render_template('sim_management/import_excel.html')
-            
-            # التحقق من نوع الملف
-            if not file.filename.lower().endswith(('.xlsx', '.xls')):
-                flash('يرجى اختيار ملف Excel صحيح (.xlsx أو .xls)', 'danger')
-                return render_template('sim_management/import_excel.html')
-            
-            # قراءة الملف
-            df = pd.read_excel(file)
-            
-            # التحقق من وجود الأعمدة المطلوبة
-            required_columns = ['رقم الهاتف', 'شركة الاتصالات']
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            
-            if missing_columns:
-                flash(f'الأعمدة التالية مفقودة: {", ".join(missing_columns)}', 'danger')
-                return render_template('sim_management/import_excel.html')
-            
-            imported_count = 0
-            skipped_count = 0
-            errors = []
-            
-            for index, row in df.iterrows():
-                try:
-                    phone_number = str(row['رقم الهاتف']).strip()
-                    carrier = str(row['شركة الاتصالات']).strip()
-                    
-                    # تخطي الصفوف الفارغة
-                    if not phone_number or phone_number == 'nan':
-                        continue
-                    
-                    # التحقق من وجود الرقم
-                    existing_sim = SimCard.query.filter_by(phone_number=phone_number).first()
-                    if existing_sim:
-                        skipped_count += 1
-                        continue
-                    
-                    # إنشاء رقم جديد
-                    new_sim = SimCard(
-                        phone_number=phone_number,
-                        carrier=carrier,
-                        plan_type=str(row.get('نوع الخطة', '')).strip() if pd.notna(row.get('نوع الخطة')) else None,
-                        monthly_cost=float(row.get('التكلفة الشهرية', 0)) if pd.notna(row.get('التكلفة الشهرية')) else 0.0,
-                        description=str(row.get('الوصف', '')).strip() if pd.notna(row.get('الوصف')) else None
-                    )
-                    
-                    db.session.add(new_sim)
-                    imported_count += 1
-                    
-                except Exception as e:
-                    errors.append(f"صف {index + 2}: {str(e)}")
-                    continue
-            
-            # حفظ التغييرات
-            db.session.commit()
-            
-            # تسجيل العملية
-            log_activity(
-                action="import",
-                entity_type="SIM",
-                details=f"استيراد {imported_count} رقم SIM من Excel، تم تخطي {skipped_count} رقم موجود مسبقاً"
-            )
-            
-            # إعداد رسالة النتيجة
-            if imported_count > 0:
-                flash(f'تم استيراد {imported_count} رقم بنجاح', 'success')
-            if skipped_count > 0:
-                flash(f'تم تخطي {skipped_count} رقم موجود مسبقاً', 'info')
-            if errors:
-                flash(f'حدثت أخطاء في {len(errors)} صف', 'warning')
-            
-            return redirect(url_for('sim_management.index'))
-            
-        except Exception as e:
-            db.session.rollback()
-            current_app.logger.error(f"Error importing SIM cards: {str(e)}")
-            flash('حدث خطأ أثناء استيراد البيانات', 'danger')
-            return render_template('sim_management/import_excel.html')
-    
-    return render_template('sim_management/import_excel.html')
+    """استيراد أرقام SIM من ملف Excel: معاينة الفروق ثم اعتماد جماعي في معاملة واحدة"""
+    def _log(result):
+        log_activity(
+            action="import",
+            entity_type="SIM",
+            details=f"استيراد {result.inserted} رقم SIM من Excel، تحديث {result.updated}، "
+                    f"تم تخطي {result.skipped_existing} رقم موجود مسبقاً"
+        )
+
+    return handle_staged_import(
+        IMPORT_SIM_CARDS,
+        'sim_management/import_excel.html',
+        back_url=url_for('sim_management.import_excel'),
+        done_url=url_for('sim_management.index'),
+        on_applied=_log,
+    )
 
 @sim_management_bp.route('/details/<int:sim_id>')
 @login_required
@@ -8,6 +8,7 @@ Business logic for attendance operations
 from datetime import datetime, time, date as date_type, timedelta
 from core.extensions import db
 from models import Attendance, Employee, Department, employee_departments
+from modules.business_calendar.application.business_calendar_service import calendars_for_employees
 from utils.audit_logger import log_attendance_activity
 from sqlalchemy import func, and_
 import logging
@@ -372,10 +373,6 @@ class AttendanceEngine:
             else:
                 return 0, f'نوع الفترة غير معروف: {period_type}'
             
-            # تصفية عطلة نهاية الأسبوع إذا كان مطلوباً
-            if skip_weekends:
-                dates = [d for d in dates if d.weekday() not in [4, 5]]  # الجمعة والسبت
-            
             if not dates:
                 return 0, 'لا توجد تواريخ صالحة للفترة المحددة'
             
@@ -383,6 +380,9 @@ class AttendanceEngine:
             if not employee_ids:
                 return 0, 'لا يوجد موظفين مختاري'
             
+            # تخطي أيام الراحة والعطل الرسمية حسب تقويم قسم كل موظف إذا كان مطلوباً
+            calendars = calendars_for_employees([int(i) for i in employee_ids]) if skip_weekends else {}
+            
             # تسجيل الحضور
             count = 0
             for employee_id in employee_ids:
@@ -390,7 +390,9 @@ class AttendanceEngine:
                 if not employee:
                     continue
                 
-                for att_date in dates:
+                calendar = calendars.get(employee.id)
+                employee_dates = [d for d in dates if calendar.is_working_day(d)] if calendar else dates
+                for att_date in employee_dates:
                     # التحقق من وجود سجل سابق
                     existing = Attendance.query.filter_by(
                         employee_id=employee_id,
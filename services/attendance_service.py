@@ -21,6 +21,7 @@ from models import (
     Attendance, Employee, Department, SystemAudit, 
     employee_departments, GeofenceSession, EmployeeLocation
 )
+from modules.business_calendar.application.business_calendar_service import get_calendar
 from utils.date_converter import parse_date, format_date_hijri, format_date_gregorian
 from utils.audit_logger import log_activity
 from services.attendance_analytics import AttendanceAnalytics
@@ -275,15 +276,11 @@ class AttendanceService:
             if not employees:
                 return {'created': 0, 'updated': 0, 'skipped': 0, 'error': 'No active employees'}
             
-            # Build date list
-            date_list = []
-            current_date = start_date
-            while current_date <= end_date:
-                if skip_weekends and current_date.weekday() in [4, 5]:  # Friday, Saturday
-                    current_date += timedelta(days=1)
-                    continue
-                date_list.append(current_date)
-                current_date += timedelta(days=1)
+            # Build date list (department calendar: weekend rule + public holidays)
+            if skip_weekends:
+                date_list = get_calendar(int(department_id)).working_dates(start_date, end_date)
+            else:
+                date_list = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
             
             # Process attendance records
             created_count = 0
@@ -0,0 +1,376 @@
+"""
+محرك النسخ الاحتياطي المتدفق لقاعدة البيانات.
+- التصدير: كل جدول يُقرأ بمؤشر من جهة الخادم (stream_results) على دفعات،
+  وكل دفعة تُكتب كملف NDJSON مضغوط (gzip أو zstd إن توفرت zstandard) داخل أرشيف tar متدفق.
+- الاستيراد: قراءة الأرشيف عضواً بعد عضو وإدراج كل دفعة بـ executemany، بترتيب المفاتيح الأجنبية.
+- آخر عضو complete.json بعدد صفوف كل جدول؛ فشل تصدير جدول يكتب failed.json ويوقف البث.
+  الاستعادة ترفض (وتتراجع عن كل شيء) عند وجود failed.json أو غياب complete.json أو اختلاف العدد.
+الذاكرة ثابتة بحجم دفعة واحدة مهما كان حجم قاعدة البيانات.
+"""
+import base64
+import gzip
+import io
+import json
+import logging
+import re
+import tarfile
+import time as _time
+from datetime import date, datetime, time
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import Date, DateTime, MetaData, Time, insert, select, text
+from sqlalchemy.sql.ddl import sort_tables_and_constraints
+
+from core.extensions import db
+
+try:
+    import zstandard
+except ImportError:  # اختياري: gzip هو الافتراضي
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 2  # 2: complete.json/failed.json في نهاية الأرشيف
+CHUNK_ROWS = 5000
+MANIFEST_NAME = "manifest.json"
+COMPLETE_NAME = "complete.json"
+FAILED_NAME = "failed.json"
+SKIP_TABLES = {"alembic_version"}
+
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+ProgressCallback = Callable[[str, int], None]
+
+
+class BackupExportError(RuntimeError):
+    """فشل تصدير جدول؛ الأرشيف المكتوب حتى الآن يحمل failed.json فلا يُستعاد."""
+
+
+# ==================== الترميز ====================
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return {"$b64": base64.b64encode(bytes(value)).decode("ascii")}
+    return value
+
+
+def _decoder_for(column):
+    """دالة تحويل القيمة المخزنة إلى نوع العمود عند الاستيراد."""
+    column_type = column.type
+    if isinstance(column_type, DateTime):
+        return lambda v: datetime.fromisoformat(v) if isinstance(v, str) else v
+    if isinstance(column_type, Date):
+        return lambda v: date.fromisoformat(v[:10]) if isinstance(v, str) else v
+    if isinstance(column_type, Time):
+        return lambda v: time.fromisoformat(v) if isinstance(v, str) else v
+    return None
+
+
+def _decode_row(row: Dict[str, Any], decoders: Dict[str, Callable]) -> Dict[str, Any]:
+    out = {}
+    for key, value in row.items():
+        if isinstance(value, dict) and "$b64" in value:
+            value = base64.b64decode(value["$b64"])
+        elif value is not None and key in decoders:
+            value = decoders[key](value)
+        out[key] = value
+    return out
+
+
+def _compress(payload: bytes, codec: str) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(payload)
+    return gzip.compress(payload, compresslevel=6)
+
+
+def _decompress(payload: bytes, name: str) -> bytes:
+    if name.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("النسخة مضغوطة بـ zstd ومكتبة zstandard غير مثبتة")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    return gzip.decompress(payload)
+
+
+# ==================== الجداول ====================
+
+def reflect_tables(engine, table_names: Optional[Sequence[str]] = None):
+    """الجداول المطلوبة مرتبة حسب المفاتيح الأجنبية (الآباء قبل الأبناء)."""
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+    wanted = set(table_names) if table_names is not None else None
+    # الدورات (مثل department.manager_id ↔ employee.department_id) تُكسر دون تحذير
+    ordered = [t for t, _ in sort_tables_and_constraints(metadata.tables.values()) if t is not None]
+    return [
+        t for t in ordered
+        if t.name not in SKIP_TABLES
+        and not t.name.startswith("_")
+        and _IDENTIFIER_RE.match(t.name)
+        and (wanted is None or t.name in wanted)
+    ]
+
+
+# ==================== التصدير ====================
+
+class _TarSink(io.RawIOBase):
+    """ملف وهمي يجمع ما يكتبه tarfile ليُفرَّغ إلى الاستجابة بعد كل عضو."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _add_member(archive: tarfile.TarFile, name: str, payload: bytes) -> None:
+    info = tarfile.TarInfo(name=name)
+    info.size = len(payload)
+    info.mtime = int(_time.time())
+    archive.addfile(info, io.BytesIO(payload))
+
+
+def stream_backup(
+    table_names: Optional[Sequence[str]] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    progress: Optional[ProgressCallback] = None,
+) -> Iterator[bytes]:
+    """
+    مولّد بايتات أرشيف tar للنسخة الاحتياطية، صالح لـ Response متدفق.
+    البنية: manifest.json ثم tables/<table>/<n>.ndjson.gz لكل دفعة.
+    """
+    engine = db.engine
+    tables = reflect_tables(engine, table_names)
+    codec = "zstd" if zstandard is not None else "gzip"
+    extension = "zst" if codec == "zstd" else "gz"
+    sink = _TarSink()
+    archive = tarfile.open(fileobj=sink, mode="w|")
+
+    manifest = {
+        "format": "nuzum-backup",
+        "version": FORMAT_VERSION,
+        "timestamp": datetime.now().isoformat(),
+        "dialect": engine.dialect.name,
+        "codec": codec,
+        "tables": [{"name": t.name, "columns": [c.name for c in t.columns]} for t in tables],
+    }
+    _add_member(archive, MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False).encode("utf-8"))
+    yield sink.drain()
+
+    counts: Dict[str, int] = {}
+    with engine.connect() as conn:
+        for table in tables:
+            exported = 0
+            try:
+                result = conn.execution_options(stream_results=True, yield_per=chunk_rows).execute(select(table))
+                keys = list(result.keys())
+                for index, batch in enumerate(result.partitions(chunk_rows), start=1):
+                    lines = [
+                        json.dumps({k: _encode_value(v) for k, v in zip(keys, row)}, ensure_ascii=False)
+                        for row in batch
+                    ]
+                    payload = _compress(("\n".join(lines) + "\n").encode("utf-8"), codec)
+                    _add_member(archive, f"tables/{table.name}/{index:05d}.ndjson.{extension}", payload)
+                    exported += len(batch)
+                    if progress:
+                        progress(table.name, exported)
+                    yield sink.drain()
+            except Exception as e:
+                logger.error(f"Error exporting table {table.name}: {e}")
+                failure = {"table": table.name, "exported": exported, "error": str(e)[:500]}
+                _add_member(archive, FAILED_NAME, json.dumps(failure, ensure_ascii=False).encode("utf-8"))
+                archive.close()
+                yield sink.drain()
+                raise BackupExportError(f"Backup aborted: table {table.name} failed: {e}") from e
+            counts[table.name] = exported
+    _add_member(archive, COMPLETE_NAME, json.dumps({"tables": counts}).encode("utf-8"))
+    archive.close()
+    yield sink.drain()
+
+
+# ==================== الاستيراد ====================
+
+def _member_table(name: str) -> Optional[str]:
+    parts = name.split("/")
+    if len(parts) == 3 and parts[0] == "tables" and _IDENTIFIER_RE.match(parts[1]):
+        return parts[1]
+    return None
+
+
+def _insert_batch(conn, table, rows: List[Dict[str, Any]], mode: str) -> Tuple[int, int]:
+    """إدراج دفعة بـ executemany؛ في وضع الإضافة تُعاد المحاولة صفاً صفاً عند التعارض."""
+    if not rows:
+        return 0, 0
+    stmt = insert(table)
+    savepoint = conn.begin_nested()
+    try:
+        conn.execute(stmt, rows)
+        savepoint.commit()
+        return len(rows), 0
+    except Exception:
+        savepoint.rollback()
+        if mode != "add":
+            raise
+    imported = skipped = 0
+    for row in rows:
+        savepoint = conn.begin_nested()
+        try:
+            conn.execute(stmt, row)
+            savepoint.commit()
+            imported += 1
+        except Exception:
+            savepoint.rollback()
+            skipped += 1
+    return imported, skipped
+
+
+def _reset_sequences(conn, tables) -> None:
+    """PostgreSQL: مزامنة تسلسلات المفاتيح بعد إدراج معرفات صريحة."""
+    if conn.dialect.name != "postgresql":
+        return
+    for table in tables:
+        if "id" in table.c and table.c.id.primary_key:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{table.name}\"', 'id'), "
+                f"COALESCE((SELECT MAX(id) FROM \"{table.name}\"), 1))"
+            ))
+
+
+def restore_backup(
+    fileobj,
+    mode: str = "add",
+    progress: Optional[ProgressCallback] = None,
+    table_name_map: Optional[Dict[str, str]] = None,
+) -> Dict[str, Dict[str, int]]:
+    """
+    استعادة أرشيف tar من stream_backup بالتدفق (دون تحميل الملف كاملاً).
+    mode: add (تخطي الصفوف المتعارضة) أو replace (حذف بيانات الجداول الموجودة في النسخة أولاً).
+    يعيد {table: {"imported": n, "skipped": m}}.
+    """
+    table_name_map = table_name_map or {}
+    engine = db.engine
+    results: Dict[str, Dict[str, int]] = {}
+    read_counts: Dict[str, int] = {}
+    manifest: Dict[str, Any] = {}
+    complete = None
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as archive, engine.begin() as conn:
+            tables = {t.name: t for t in reflect_tables(engine)}
+            ordered: List[Any] = []
+            decoders: Dict[str, Dict[str, Callable]] = {}
+            for member in archive:
+                if not member.isfile():
+                    continue
+                extracted = archive.extractfile(member)
+                if member.name == FAILED_NAME:
+                    failure = json.loads(extracted.read().decode("utf-8"))
+                    raise ValueError(f"النسخة الاحتياطية غير مكتملة: فشل تصدير الجدول {failure.get('table')}")
+                if member.name == COMPLETE_NAME:
+                    complete = json.loads(extracted.read().decode("utf-8"))
+                    continue
+                if member.name == MANIFEST_NAME:
+                    manifest = json.loads(extracted.read().decode("utf-8"))
+                    if manifest.get("format") != "nuzum-backup":
+                        raise ValueError("ملف النسخة الاحتياطية غير صالح")
+                    for entry in manifest.get("tables", []):
+                        name = table_name_map.get(entry["name"], entry["name"])
+                        if name in tables:
+                            ordered.append(tables[name])
+                    if mode == "replace":
+                        # الأبناء قبل الآباء عند الحذف
+                        for table in reversed(ordered):
+                            conn.execute(table.delete())
+                    continue
+                backup_name = _member_table(member.name)
+                name = table_name_map.get(backup_name, backup_name) if backup_name else None
+                if name not in tables:
+                    continue
+                table = tables[name]
+                if name not in decoders:
+                    decoders[name] = {c.name: d for c in table.columns if (d := _decoder_for(c))}
+                    results.setdefault(name, {"imported": 0, "skipped": 0})
+                valid_columns = set(table.c.keys())
+                rows = []
+                for line in _decompress(extracted.read(), member.name).decode("utf-8").splitlines():
+                    if not line:
+                        continue
+                    read_counts[backup_name] = read_counts.get(backup_name, 0) + 1
+                    row = {k: v for k, v in json.loads(line).items() if k in valid_columns}
+                    if row:
+                        rows.append(_decode_row(row, decoders[name]))
+                imported, skipped = _insert_batch(conn, table, rows, mode)
+                results[name]["imported"] += imported
+                results[name]["skipped"] += skipped
+                if progress:
+                    progress(name, results[name]["imported"])
+            _verify_complete(manifest, complete, read_counts, tables, table_name_map)
+            _reset_sequences(conn, [tables[n] for n in results])
+    except tarfile.ReadError as e:
+        raise ValueError(f"النسخة الاحتياطية تالفة أو غير مكتملة: {e}") from e
+    return results
+
+
+def _verify_complete(manifest, complete, read_counts, tables, table_name_map) -> None:
+    """رفض النسخة المقطوعة: بلا complete.json أو بعدد صفوف أقل مما صُدِّر (يتراجع الاستيراد كاملاً)."""
+    if manifest.get("version", 1) < 2:
+        return  # نسخ الصيغة 1 لا تحمل علامة اكتمال
+    if complete is None:
+        raise ValueError("النسخة الاحتياطية غير مكتملة (انقطع التصدير قبل نهايته)")
+    for backup_name, expected in complete.get("tables", {}).items():
+        if table_name_map.get(backup_name, backup_name) not in tables:
+            continue
+        if read_counts.get(backup_name, 0) != expected:
+            raise ValueError(
+                f"النسخة الاحتياطية غير مكتملة: الجدول {backup_name} فيه "
+                f"{read_counts.get(backup_name, 0)} من {expected} سجل"
+            )
+
+
+def is_stream_backup(fileobj) -> bool:
+    """هل الملف أرشيف tar (الصيغة الجديدة) وليس JSON القديم؟ يعيد المؤشر لمكانه."""
+    position = fileobj.tell()
+    header = fileobj.read(512)
+    fileobj.seek(position)
+    return len(header) == 512 and header[257:262] == b"ustar"
+
+
+
+# ==================== أوامر CLI ====================
+
+@click.command("db-backup")
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option("--table", "tables", multiple=True, help="جدول محدد (يمكن تكراره)؛ الافتراضي كل الجداول")
+@with_appcontext
+def db_backup_command(path, tables):
+    """كتابة نسخة احتياطية متدفقة إلى ملف tar."""
+    with open(path, "wb") as out:
+        for data in stream_backup(tables or None, progress=lambda t, n: click.echo(f"{t}: {n}")):
+            out.write(data)
+    click.echo(f"Backup written to {path}")
+
+
+@click.command("db-restore")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--mode", type=click.Choice(["add", "replace"]), default="add")
+@with_appcontext
+def db_restore_command(path, mode):
+    """استعادة نسخة احتياطية من ملف tar."""
+    with open(path, "rb") as src:
+        results = restore_backup(src, mode=mode, progress=lambda t, n: click.echo(f"{t}: {n}"))
+    for name, r in results.items():
+        click.echo(f"{name}: imported={r['imported']} skipped={r['skipped']}")
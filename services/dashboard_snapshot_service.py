@@ -0,0 +1,236 @@
+"""
+لقطة لوحة التحكم الرئيسية — تُحسب كل التجميعات مرة واحدة وتُخزن في التخزين المؤقت المشترك.
+- صلاحية قصيرة (SNAPSHOT_FRESH_SECONDS) ثم تُقدّم اللقطة القديمة بينما تُحدّث في الخلفية
+  (stale-while-revalidate) حتى SNAPSHOT_STALE_SECONDS.
+- أجزاء القوالب المعروضة تُخزن بمفتاح ثابت لكل (قالب، دور) مع وقت حساب اللقطة داخل القيمة،
+  فلا يتكرر العرض لكل مستخدم ولا تتراكم مفاتيح جديدة مع كل لقطة.
+"""
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from flask import current_app, render_template
+from sqlalchemy import case, func
+from sqlalchemy.orm import selectinload
+
+from core.cache import get_cache
+from core.extensions import db
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY = "dashboard:snapshot:v1"
+SNAPSHOT_LOCK_KEY = "dashboard:snapshot:lock"
+FRAGMENT_KEY_PREFIX = "dashboard:fragment:v2"
+SNAPSHOT_FRESH_SECONDS = 120
+SNAPSHOT_STALE_SECONDS = 600
+SNAPSHOT_LOCK_SECONDS = 60
+RECENT_EMPLOYEES_LIMIT = 5
+
+EMPLOYEE_STATUSES = ("active", "inactive", "on_leave", "terminated")
+
+STATUS_LABELS = {
+    'active': 'نشط',
+    'inactive': 'غير نشط',
+    'on_leave': 'في إجازة',
+    'terminated': 'متوقف عن العمل'
+}
+
+
+def _department_matrix() -> List[Dict]:
+    """عدد الموظفين لكل قسم وحالة في استعلام واحد بدلاً من خمسة استعلامات لكل قسم."""
+    from models import Department, Employee, employee_departments
+
+    rows = db.session.query(
+        Department.id,
+        Department.name,
+        Employee.status,
+        func.count(func.distinct(Employee.id)),
+    ).outerjoin(
+        employee_departments, Department.id == employee_departments.c.department_id
+    ).outerjoin(
+        Employee, employee_departments.c.employee_id == Employee.id
+    ).group_by(Department.id, Department.name, Employee.status).all()
+
+    departments = {}
+    for dept_id, dept_name, status, count in rows:
+        entry = departments.get(dept_id)
+        if entry is None:
+            entry = {'department_id': dept_id, 'department_name': dept_name, 'total': 0}
+            entry.update({s: 0 for s in EMPLOYEE_STATUSES})
+            departments[dept_id] = entry
+        if status is None:
+            continue
+        entry[status] = entry.get(status, 0) + count
+        entry['total'] += count
+    for entry in departments.values():
+        entry['total_active'] = entry['active']
+    return list(departments.values())
+
+
+def _recent_employees() -> List[Dict]:
+    from models import Employee
+
+    employees = (Employee.query.options(selectinload(Employee.departments))
+                 .order_by(Employee.created_at.desc()).limit(RECENT_EMPLOYEES_LIMIT).all())
+    result = []
+    for employee in employees:
+        department = employee.department
+        result.append({
+            'id': employee.id,
+            'name': employee.name,
+            'employee_id': employee.employee_id,
+            'job_title': employee.job_title,
+            'department_name': department.name if department else None,
+            'join_date': employee.join_date.isoformat() if employee.join_date else None,
+        })
+    return result
+
+
+def compute_dashboard_snapshot(now: Optional[datetime] = None) -> Dict:
+    """حساب كل إحصائيات الصفحة الرئيسية وصفحة إحصائيات الموظفين في مرور واحد."""
+    from models import Attendance, Document, Employee, Salary
+
+    now = now or datetime.now()
+    today = now.date()
+    expiry_threshold = today + timedelta(days=30)
+
+    status_counts = dict(
+        db.session.query(Employee.status, func.count(Employee.id)).group_by(Employee.status).all()
+    )
+    departments = _department_matrix()
+    today_attendance = Attendance.query.filter_by(date=today).count()
+
+    doc_stats = db.session.query(
+        func.count().label('total'),
+        func.sum(case((Document.expiry_date < today, 1), else_=0)).label('expired'),
+        func.sum(case(((Document.expiry_date >= today) & (Document.expiry_date <= expiry_threshold), 1), else_=0)).label('expiring'),
+        func.sum(case((Document.expiry_date > expiry_threshold, 1), else_=0)).label('valid'),
+        func.sum(case((Document.expiry_date.is_(None), 1), else_=0)).label('no_expiry')
+    ).one()
+
+    monthly_salaries = db.session.query(
+        Salary.month,
+        func.sum(Salary.net_salary).label('total')
+    ).filter(Salary.year == now.year).group_by(Salary.month).order_by(Salary.month).all()
+
+    return {
+        'computed_at': now.isoformat(timespec='seconds'),
+        'total_employees': status_counts.get('active', 0),
+        'total_all_employees': sum(status_counts.values()),
+        'total_departments': len(departments),
+        'today_attendance': today_attendance,
+        'document_stats': {
+            'total': doc_stats.total or 0,
+            'valid': int(doc_stats.valid or 0),
+            'expired': int(doc_stats.expired or 0),
+            'expiring': int(doc_stats.expiring or 0),
+            'no_expiry': int(doc_stats.no_expiry or 0),
+        },
+        'status_counts': {str(k): v for k, v in status_counts.items()},
+        'departments': departments,
+        'salary_months': [[month, float(total or 0)] for month, total in monthly_salaries],
+        'recent_employees': _recent_employees(),
+    }
+
+
+def _store(cache, snapshot: Dict) -> None:
+    cache.set(SNAPSHOT_KEY, {
+        'fresh_until': time.time() + SNAPSHOT_FRESH_SECONDS,
+        'snapshot': snapshot,
+    }, SNAPSHOT_STALE_SECONDS)
+
+
+def refresh_dashboard_snapshot(app=None) -> Dict:
+    """إعادة حساب اللقطة وتخزينها (تُستدعى من الطلب أو المجدول أو خيط الخلفية)."""
+    app = app or current_app._get_current_object()
+    snapshot = compute_dashboard_snapshot()
+    _store(get_cache(app), snapshot)
+    return snapshot
+
+
+def _refresh_in_background(app) -> None:
+    def _run():
+        with app.app_context():
+            try:
+                refresh_dashboard_snapshot(app)
+            except Exception as e:
+                logger.error(f"خطأ في تحديث لقطة لوحة التحكم: {str(e)}")
+            finally:
+                get_cache(app).delete(SNAPSHOT_LOCK_KEY)
+
+    threading.Thread(target=_run, name="dashboard-snapshot-refresh", daemon=True).start()
+
+
+def get_dashboard_snapshot() -> Dict:
+    """اللقطة الحالية: حديثة من التخزين، أو قديمة مع تحديث خلفي، أو محسوبة الآن عند غيابها."""
+    app = current_app._get_current_object()
+    cache = get_cache(app)
+    envelope = cache.get(SNAPSHOT_KEY)
+    if envelope is not None:
+        if envelope['fresh_until'] <= time.time() and cache.add(SNAPSHOT_LOCK_KEY, 1, SNAPSHOT_LOCK_SECONDS):
+            _refresh_in_background(app)
+        return envelope['snapshot']
+    return refresh_dashboard_snapshot(app)
+
+
+def invalidate_dashboard_snapshot() -> None:
+    get_cache().delete(SNAPSHOT_KEY)
+
+
+def build_index_context(snapshot: Dict) -> Dict:
+    """متغيرات قالب dashboard.html من اللقطة."""
+    departments = snapshot['departments']
+    dept_labels = [d['department_name'] for d in departments] or ["لا يوجد أقسام"]
+    dept_data = [d['active'] for d in departments] or [0]
+
+    salary_months = snapshot['salary_months']
+    salary_labels = [f"شهر {month}" for month, _ in salary_months] or ["لا يوجد بيانات"]
+    salary_data = [total for _, total in salary_months] or [0]
+
+    recent_employees = []
+    for employee in snapshot['recent_employees']:
+        employee = dict(employee)
+        if employee['join_date']:
+            employee['join_date'] = date.fromisoformat(employee['join_date'])
+        recent_employees.append(employee)
+
+    return {
+        'total_employees': snapshot['total_employees'],
+        'total_all_employees': snapshot['total_all_employees'],
+        'total_departments': snapshot['total_departments'],
+        'today_attendance': snapshot['today_attendance'],
+        'document_stats': snapshot['document_stats'],
+        'expiring_documents': snapshot['document_stats']['expiring'],
+        'recent_employees': recent_employees,
+        'dept_labels': dept_labels,
+        'dept_data': dept_data,
+        'salary_labels': salary_labels,
+        'salary_data': salary_data,
+        'status_data': [
+            {'status': STATUS_LABELS.get(status, status), 'count': count}
+            for status, count in snapshot['status_counts'].items()
+        ],
+    }
+
+
+def get_department_stats(snapshot: Dict, department_id: Optional[int] = None) -> List[Dict]:
+    """إحصائيات الأقسام حسب الحالة مرتبة تنازلياً بالإجمالي، مع فلترة اختيارية لقسم واحد."""
+    departments = snapshot['departments']
+    if department_id:
+        departments = [d for d in departments if d['department_id'] == department_id]
+    return sorted(departments, key=lambda d: d['total'], reverse=True)
+
+
+def render_cached_fragment(template: str, role: Optional[str], snapshot: Dict, **context) -> str:
+    """عرض جزء قالب مرة واحدة لكل دور ولقطة؛ المستخدمون بنفس الدور يتشاركون نفس HTML.
+    المفتاح ثابت لكل (قالب، دور) ويُعاد العرض عندما يختلف computed_at المخزن عن اللقطة الحالية."""
+    cache = get_cache()
+    key = f"{FRAGMENT_KEY_PREFIX}:{template}:{role or 'none'}"
+    cached = cache.get(key)
+    if isinstance(cached, dict) and cached.get('computed_at') == snapshot['computed_at']:
+        return cached['html']
+    html = render_template(template, **context)
+    cache.set(key, {'computed_at': snapshot['computed_at'], 'html': html}, SNAPSHOT_STALE_SECONDS)
+    return html
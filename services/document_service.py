@@ -34,7 +34,15 @@ from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 
 from core.extensions import db
 from models import Document, Employee, Department, SystemAudit, Notification, User
+from modules.employees.domain.models import DOCUMENT_TYPE_LABELS
+from modules.expiry.application.expiry_calendar_service import (
+    ENTITY_DOCUMENT,
+    build_expiry_message,
+    dispatch_expiry_notifications,
+    get_bucket_counts,
+)
 from utils.date_converter import parse_date, format_date_hijri, format_date_gregorian
+from utils.hijri_table import hijri_strings
 from utils.audit_logger import log_activity
 from services.file_service import FileService
 import os
@@ -65,17 +73,7 @@ class DocumentService:
     @staticmethod
     def get_document_type_label(doc_type: str) -> str:
         """Get Arabic label for document type"""
-        types_map = {
-            'national_id': 'الهوية الوطنية',
-            'passport': 'جواز السفر',
-            'health_certificate': 'الشهادة الصحية',
-            'work_permit': 'رخصة العمل',
-            'education_certificate': 'الشهادة التعليمية',
-            'driving_license': 'رخصة القيادة',
-            'annual_leave': 'إجازة سنوية',
-            'other': 'أخرى'
-        }
-        return types_map.get(doc_type, doc_type)
+        return DOCUMENT_TYPE_LABELS.get(doc_type, doc_type)
     
     # ==================== Security & Validation ====================
     
@@ -711,6 +709,10 @@ class DocumentService:
         
         # Create DataFrame
         df = pd.DataFrame(data)
+        if 'تاريخ الانتهاء' in df.columns:
+            # Hijri expiry next to the Gregorian one, converted in one pass from the precomputed table
+            df.insert(df.columns.get_loc('تاريخ الانتهاء') + 1, 'تاريخ الانتهاء (هجري)',
+                      hijri_strings([doc.expiry_date for doc in documents]))
         
         # Create Excel file in memory
         output = BytesIO()
@@ -762,21 +764,15 @@ class DocumentService:
         """Get dashboard statistics"""
         try:
             current_date = datetime.now().date()
-            expiring_date = current_date + timedelta(days=60)
             warning_date = current_date + timedelta(days=30)
             
-            # Document counts
+            # Document counts (من تقويم الانتهاء: قراءة GROUP BY واحدة)
             total_documents = Document.query.count()
-            expired_documents = Document.query.filter(Document.expiry_date < current_date).count()
-            expiring_soon = Document.query.filter(
-                Document.expiry_date >= current_date,
-                Document.expiry_date <= warning_date
-            ).count()
-            expiring_later = Document.query.filter(
-                Document.expiry_date > warning_date,
-                Document.expiry_date <= expiring_date
-            ).count()
-            valid_documents = Document.query.filter(Document.expiry_date > expiring_date).count()
+            buckets = get_bucket_counts([ENTITY_DOCUMENT])
+            expired_documents = buckets['expired']
+            expiring_soon = buckets['d7'] + buckets['d30']
+            expiring_later = buckets['d60']
+            valid_documents = buckets['d90'] + buckets['later']
             
             # Top expired documents
             expired_docs = Document.query.join(Employee)\
@@ -827,29 +823,11 @@ class DocumentService:
     def get_expiry_stats() -> Dict[str, Any]:
         """Get document expiry statistics"""
         try:
-            today = datetime.now().date()
-            thirty_days = today + timedelta(days=30)
-            sixty_days = today + timedelta(days=60)
-            ninety_days = today + timedelta(days=90)
-            
-            base_query = Document.query.filter(Document.expiry_date.isnot(None))
-            
-            expiring_30 = base_query.filter(
-                Document.expiry_date <= thirty_days,
-                Document.expiry_date >= today
-            ).count()
-            
-            expiring_60 = base_query.filter(
-                Document.expiry_date <= sixty_days,
-                Document.expiry_date > thirty_days
-            ).count()
-            
-            expiring_90 = base_query.filter(
-                Document.expiry_date <= ninety_days,
-                Document.expiry_date > sixty_days
-            ).count()
-            
-            expired = base_query.filter(Document.expiry_date < today).count()
+            buckets = get_bucket_counts([ENTITY_DOCUMENT])
+            expiring_30 = buckets['d7'] + buckets['d30']
+            expiring_60 = buckets['d60']
+            expiring_90 = buckets['d90']
+            expired = buckets['expired']
             
             # Type counts
             type_counts = db.session.query(
@@ -885,22 +863,9 @@ class DocumentService:
         try:
             from flask import url_for
             
-            if days_until_expiry < 0:
-                title = f'وثيقة منتهية - {document_type}'
-                description = f'انتهت صلاحية {document_type} للموظف {employee_name} منذ {abs(days_until_expiry)} يوم'
-                priority = 'critical'
-            elif days_until_expiry <= 7:
-                title = f'تنبيه عاجل: وثيقة تنتهي قريباً'
-                description = f'{document_type} للموظف {employee_name} تنتهي خلال {days_until_expiry} أيام'
-                priority = 'critical'
-            elif days_until_expiry <= 30:
-                title = f'تذكير: وثيقة تنتهي خلال شهر'
-                description = f'{document_type} للموظف {employee_name} تنتهي خلال {days_until_expiry} يوماً'
-                priority = 'high'
-            else:
-                title = f'تذكير: وثيقة قريبة من الانتهاء'
-                description = f'{document_type} للموظف {employee_name} تنتهي خلال {days_until_expiry} يوماً'
-                priority = 'normal'
+            title, description, priority = build_expiry_message(
+                ENTITY_DOCUMENT, document_type, employee_name, days_until_expiry
+            )
             
             notification = Notification(
                 user_id=user_id,
@@ -922,44 +887,15 @@ class DocumentService:
     
     @staticmethod
     def create_bulk_expiry_notifications() -> Tuple[bool, str, int]:
-        """Create expiry notifications for all users"""
+        """
+        Create expiry notifications for all users from the expiry calendar
+        (documents, vehicle documents and SIM renewals), bulk-inserted and deduplicated per day.
+        """
         try:
-            current_date = datetime.now().date()
-            warning_date = current_date + timedelta(days=30)
-            
-            # Get expiring/expired documents
-            expiring_docs = Document.query.join(Employee)\
-                .filter(Document.expiry_date <= warning_date)\
-                .order_by(Document.expiry_date)\
-                .limit(5).all()
-            
-            if not expiring_docs:
-                return False, 'لا توجد وثائق منتهية أو قريبة من الانتهاء', 0
-            
-            all_users = User.query.all()
-            notification_count = 0
-            
-            for doc in expiring_docs:
-                days_until_expiry = (doc.expiry_date - current_date).days if doc.expiry_date else -999
-                doc_type = DocumentService.get_document_type_label(doc.document_type)
-                employee_name = doc.employee.name if doc.employee else 'غير محدد'
-                
-                for user in all_users:
-                    try:
-                        DocumentService.create_expiry_notification(
-                            user_id=user.id,
-                            document_type=doc_type,
-                            employee_name=employee_name,
-                            days_until_expiry=days_until_expiry,
-                            document_id=doc.id
-                        )
-                        notification_count += 1
-                    except Exception:
-                        pass
-            
-            db.session.commit()
-            
-            return True, f'تم إنشاء {notification_count} إشعار', notification_count
+            count = dispatch_expiry_notifications()
+            if count == 0:
+                return False, 'لا توجد وثائق منتهية أو قريبة من الانتهاء أو تم إرسال إشعاراتها اليوم', 0
+            return True, f'تم إنشاء {count} إشعار', count
             
         except Exception as e:
             db.session.rollback()
@@ -1,6 +1,5 @@
 import os
 import sys
-from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail, Email, To, Content, Attachment, MailSettings, SandBoxMode
 import base64
 import mimetypes
@@ -14,6 +13,35 @@ from email.mime.application import MIMEApplication
 from email.utils import formataddr
 import io
 
+from core.http_client import get_http_client
+
+
+class PooledSendGridClient:
+    """بديل SendGridAPIClient.send يرسل JSON نفس رسالة Mail عبر العميل المشترك
+    (اتصال keep-alive، حد تزامن، قاطع دائرة) بدل اتصال جديد لكل رسالة."""
+
+    API_URL = 'https://api.sendgrid.com/v3/mail/send'
+
+    def __init__(self, api_key):
+        self.api_key = api_key
+
+    def send(self, message):
+        response = get_http_client('sendgrid').post(
+            self.API_URL,
+            headers={
+                'Authorization': f'Bearer {self.api_key}',
+                'Content-Type': 'application/json',
+            },
+            json=message.get(),
+        )
+        if response.status_code >= 400:
+            raise requests.HTTPError(
+                f'SendGrid API error ({response.status_code}): {response.text}',
+                response=response,
+            )
+        return response
+
+
 class EmailService:
     def __init__(self):
         self.sendgrid_key = None
@@ -30,7 +58,7 @@ class EmailService:
             if hostname and repl_identity:
                 x_replit_token = f'repl {repl_identity}'
                 
-                response = requests.get(
+                response = get_http_client('replit-connectors').get(
                     f'https://{hostname}/api/v2/connection?include_secrets=true&connector_names=sendgrid',
                     headers={
                         'Accept': 'application/json',
@@ -47,7 +75,7 @@ class EmailService:
                         
                         if self.sendgrid_key and self.from_email:
                             current_app.logger.info("تم تحميل بيانات SendGrid من Replit Connection بنجاح")
-                            self.sg = SendGridAPIClient(self.sendgrid_key)
+                            self.sg = PooledSendGridClient(self.sendgrid_key)
                             return
         except Exception as e:
             current_app.logger.warning(f"فشل تحميل بيانات SendGrid من Connection: {str(e)}")
@@ -58,7 +86,7 @@ class EmailService:
         
         if self.sendgrid_key:
             current_app.logger.info("تم تحميل بيانات SendGrid من المتغيرات البيئية")
-            self.sg = SendGridAPIClient(self.sendgrid_key)
+            self.sg = PooledSendGridClient(self.sendgrid_key)
         else:
             current_app.logger.error("SENDGRID_API_KEY غير متوفر")
     
@@ -563,9 +591,10 @@ class EmailService:
                 "solution": "1. دخول حساب SendGrid\n2. Settings → Sender Authentication\n3. إضافة Single Sender مع الإيميل المطلوب\n4. تأكيد الإيميل من صندوق الوارد"
             }
     
-    def send_simple_email(self, to_email, subject, content, sender_email="test@sink.sendgrid.net"):
+    def send_simple_email(self, to_email, subject, content, sender_email="test@sink.sendgrid.net", attachments=None):
         """
         إرسال إيميل بسيط
+        attachments: قائمة اختيارية من {'filename', 'content' (bytes), 'content_type'}
         """
         try:
             if not self.sendgrid_key:
@@ -578,12 +607,24 @@ class EmailService:
                 html_content=content
             )
             
+            if attachments:
+                message.attachment = [
+                    Attachment(
+                        file_content=base64.b64encode(item['content']).decode(),
+                        file_name=item['filename'],
+                        file_type=item.get('content_type') or 'application/octet-stream',
+                        disposition='attachment',
+                    )
+                    for item in attachments
+                ]
+            
             response = self.sg.send(message)
             
             return {
                 "success": True,
                 "message": "تم إرسال الإيميل بنجاح",
-                "status_code": response.status_code
+                "status_code": response.status_code,
+                "id": response.headers.get('X-Message-Id'),
             }
             
         except Exception as e:
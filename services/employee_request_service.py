@@ -19,6 +19,7 @@ from werkzeug.utils import secure_filename
 import shutil
 
 from core.extensions import db
+from core.principal_cache import EmployeePrincipal, resolve_principal
 from models import (
     User, Employee, EmployeeRequest, InvoiceRequest, AdvancePaymentRequest,
     CarWashRequest, CarInspectionRequest, CarWashMedia, CarInspectionMedia,
@@ -245,20 +246,19 @@ class EmployeeRequestService:
         return token
     
     @staticmethod
-    def verify_jwt_token(token: str) -> Optional[Employee]:
+    def verify_jwt_token(token: str) -> Optional[EmployeePrincipal]:
         """
-        Verify JWT token and return employee.
+        Verify JWT token and return the cached employee snapshot.
         
         Args:
             token: JWT token string
             
         Returns:
-            Employee object if token is valid, None otherwise
+            EmployeePrincipal (id, employee_id, name, status, department_id...) if token is valid, None otherwise
         """
         try:
-            data = jwt.decode(token, EmployeeRequestService.SECRET_KEY, algorithms=['HS256'])
-            employee = Employee.query.filter_by(employee_id=data['employee_id']).first()
-            return employee
+            _, principal = resolve_principal(token, EmployeeRequestService.SECRET_KEY)
+            return principal
         except jwt.ExpiredSignatureError:
             logger.warning("Expired JWT token")
             return None
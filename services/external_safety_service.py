@@ -22,13 +22,11 @@ from pillow_heif import register_heif_opener
 import os
 import uuid
 import resend
-from sqlalchemy import func, select
-from sqlalchemy.orm import aliased, contains_eager
 
 # Database Models
 from models import (
     VehicleExternalSafetyCheck, VehicleSafetyImage, Vehicle, 
-    Employee, User, UserRole, VehicleHandover, Notification
+    Employee, User, UserRole, Notification
 )
 from core.extensions import db
 from utils.audit_logger import log_audit
@@ -57,39 +55,13 @@ class ExternalSafetyService:
         استرجاع السائقين الحاليين مع بريدهم الإلكتروني
         Returns: dict {vehicle_id: {'driver_name': str, 'email': str}}
         """
-        delivery_handover_types = ['delivery', 'تسليم', 'handover']
-        
-        # Window Function للحصول على آخر تسليم لكل مركبة
-        subq = select(
-            VehicleHandover.id,
-            func.row_number().over(
-                partition_by=VehicleHandover.vehicle_id,
-                order_by=VehicleHandover.handover_date.desc()
-            ).label('row_num')
-        ).where(
-            VehicleHandover.handover_type.in_(delivery_handover_types)
-        ).subquery()
+        from modules.vehicles.application.vehicle_custody_service import get_current_driver_employees
 
-        # Eager loading للموظف لتقليل الاستعلامات
-        employee_alias = aliased(Employee)
-        stmt = (
-            select(VehicleHandover)
-            .options(contains_eager(VehicleHandover.employee.of_type(employee_alias)))
-            .outerjoin(employee_alias, VehicleHandover.employee_id == employee_alias.id)
-            .join(subq, VehicleHandover.id == subq.c.id)
-            .where(subq.c.row_num == 1)
-        )
-
-        latest_handovers = db.session.execute(stmt).scalars().unique().all()
-        
-        # بناء القاموس للوصول السريع
-        current_drivers_map = {}
-        for record in latest_handovers:
-            email = record.employee.email if record.employee else None
-            current_drivers_map[record.vehicle_id] = {
-                'driver_name': record.person_name,
-                'email': email
-            }
+        # جدول العهدة الحالية: آخر تسليم معتمد لكل مركبة مع الموظف في ربط واحد
+        current_drivers_map = {
+            vehicle_id: {'driver_name': name, 'email': employee.email if employee else None}
+            for vehicle_id, name, employee in get_current_driver_employees()
+        }
         
         return current_drivers_map
     
@@ -99,27 +71,9 @@ class ExternalSafetyService:
         استرجاع السائقين الحاليين فقط (بدون بريد إلكتروني)
         Returns: dict {vehicle_id: driver_name}
         """
-        delivery_handover_types = ['delivery', 'تسليم', 'handover']
-        
-        subq = select(
-            VehicleHandover.id,
-            func.row_number().over(
-                partition_by=VehicleHandover.vehicle_id,
-                order_by=VehicleHandover.handover_date.desc()
-            ).label('row_num')
-        ).where(
-            VehicleHandover.handover_type.in_(delivery_handover_types)
-        ).subquery()
+        from modules.vehicles.application.vehicle_custody_service import get_current_drivers
 
-        stmt = select(VehicleHandover).join(
-            subq, VehicleHandover.id == subq.c.id
-        ).where(subq.c.row_num == 1)
-
-        latest_handovers = db.session.execute(stmt).scalars().all()
-        
-        current_drivers_map = {
-            record.vehicle_id: record.person_name for record in latest_handovers
-        }
+        current_drivers_map = get_current_drivers()
         
         return current_drivers_map
     
@@ -13,6 +13,7 @@ from urllib.parse import quote
 import requests
 
 from core.extensions import db
+from core.http_client import get_http_client
 from models import Attendance, Salary
 from models_accounting import Account, FiscalYear
 from modules.accounting.domain.profitability_models import ProjectContract
@@ -221,7 +222,7 @@ class ERPNextClient:
 
     def _request(self, method, path, params=None, payload=None):
         try:
-            response = requests.request(
+            response = get_http_client('erpnext').request(
                 method=method,
                 url=self._url(path),
                 headers=self._headers(),
@@ -0,0 +1,381 @@
+"""
+طبقة بيانات التقارير — كل تقرير يُبنى مرة واحدة لكل مجموعة فلاتر ويُغذي عارضي PDF وExcel معاً.
+- الصفوف تُخزن عمودياً بأنواع محددة (ReportDataset.columns) مع تجميعات محسوبة في مرور واحد (aggregates).
+- المجموعة تُخزن لفترة قصيرة (REPORT_DATASET_TTL) في التخزين المؤقت المشترك،
+  فتصدير نفس التقرير بصيغتين لا يضاعف كلفة قاعدة البيانات والمعالجة.
+"""
+import hashlib
+import json
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_
+
+from core.cache import get_cache
+from core.extensions import db
+
+logger = logging.getLogger(__name__)
+
+REPORT_DATASET_TTL = 90
+DATASET_KEY_PREFIX = "reports:dataset:v1"
+IN_CHUNK_SIZE = 500
+
+STR, INT, FLOAT, BOOL, DATE, TIME = "str", "int", "float", "bool", "date", "time"
+
+_DECODERS = {
+    STR: str,
+    INT: int,
+    FLOAT: float,
+    BOOL: bool,
+    DATE: date.fromisoformat,
+    TIME: time.fromisoformat,
+}
+
+# حالات الموظفين المستبعدة من قوائم الحضور (نفس منطق تقرير Excel السابق)
+ATTENDANCE_EXCLUDED_STATUSES = ("terminated", "inactive")
+ATTENDANCE_STATUSES = ("present", "absent", "leave", "sick")
+
+
+@dataclass
+class ReportDataset:
+    """صفوف تقرير واحد بشكل عمودي: columns[اسم العمود] قائمة بطول عدد الصفوف."""
+    name: str
+    schema: Tuple[Tuple[str, str], ...]
+    columns: Dict[str, list]
+    aggregates: Dict = field(default_factory=dict)
+    built_at: str = ""
+
+    def __len__(self) -> int:
+        first = self.schema[0][0] if self.schema else None
+        return len(self.columns.get(first, [])) if first else 0
+
+    def column(self, name: str) -> list:
+        return self.columns[name]
+
+    def rows(self) -> Iterator[SimpleNamespace]:
+        """الصفوف ككائنات بسمات (row.name، row.amount...) للعارضين."""
+        names = [name for name, _ in self.schema]
+        for values in zip(*(self.columns[name] for name in names)):
+            yield SimpleNamespace(**dict(zip(names, values)))
+
+    def to_payload(self) -> Dict:
+        """صيغة JSON للتخزين المؤقت (التواريخ والأوقات بصيغة ISO)."""
+        encoded = {}
+        for name, kind in self.schema:
+            values = self.columns[name]
+            if kind in (DATE, TIME):
+                values = [v.isoformat() if v is not None else None for v in values]
+            encoded[name] = values
+        return {
+            "name": self.name,
+            "schema": [list(item) for item in self.schema],
+            "columns": encoded,
+            "aggregates": self.aggregates,
+            "built_at": self.built_at,
+        }
+
+    @classmethod
+    def from_payload(cls, payload: Dict) -> "ReportDataset":
+        schema = tuple((name, kind) for name, kind in payload["schema"])
+        columns = {}
+        for name, kind in schema:
+            decode = _DECODERS[kind]
+            columns[name] = [decode(v) if v is not None else None for v in payload["columns"][name]]
+        return cls(payload["name"], schema, columns, payload.get("aggregates") or {}, payload.get("built_at", ""))
+
+
+_BUILDERS: Dict[str, Tuple[Tuple[Tuple[str, str], ...], Callable]] = {}
+
+
+def report_dataset(name: str, *schema: Tuple[str, str]):
+    """تسجيل دالة بناء مجموعة بيانات تقرير؛ الدالة تعيد (صفوف بترتيب المخطط، تجميعات)."""
+    def decorator(func):
+        _BUILDERS[name] = (tuple(schema), func)
+        return func
+    return decorator
+
+
+def _normalize(value):
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    if value is None:
+        return ""
+    return value if isinstance(value, (int, float, bool)) else str(value)
+
+
+def _cache_key(name: str, filters: Dict) -> str:
+    normalized = json.dumps({k: _normalize(v) for k, v in filters.items()}, sort_keys=True, ensure_ascii=False)
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+    return f"{DATASET_KEY_PREFIX}:{name}:{digest}"
+
+
+def build_report_dataset(name: str, **filters) -> ReportDataset:
+    """بناء مجموعة البيانات مباشرة من قاعدة البيانات (بدون تخزين مؤقت)."""
+    schema, builder = _BUILDERS[name]
+    rows, aggregates = builder(**filters)
+    names = [column for column, _ in schema]
+    columns = {column: [row[i] for row in rows] for i, column in enumerate(names)}
+    return ReportDataset(name, schema, columns, aggregates, datetime.now().isoformat(timespec="seconds"))
+
+
+def get_report_dataset(name: str, **filters) -> ReportDataset:
+    """مجموعة بيانات التقرير لهذه الفلاتر: من التخزين المؤقت إن وُجدت، وإلا تُبنى وتُخزن."""
+    cache = get_cache()
+    key = _cache_key(name, filters)
+    payload = cache.get(key)
+    if payload is not None:
+        try:
+            return ReportDataset.from_payload(payload)
+        except Exception as e:
+            logger.warning(f"تعذر قراءة بيانات التقرير المخزنة {name}: {str(e)}")
+    dataset = build_report_dataset(name, **filters)
+    cache.set(key, dataset.to_payload(), REPORT_DATASET_TTL)
+    return dataset
+
+
+def load_entities(model, ids: Sequence[int], *options) -> List:
+    """كائنات ORM لعارض يحتاجها (مثل مولدات Excel الجاهزة) بترتيب مجموعة البيانات، باستعلام PK واحد لكل دفعة."""
+    by_id = {}
+    ids = list(ids)
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        chunk = ids[start:start + IN_CHUNK_SIZE]
+        for entity in model.query.options(*options).filter(model.id.in_(chunk)).all():
+            by_id[entity.id] = entity
+    return [by_id[i] for i in ids if i in by_id]
+
+
+def _as_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _department_id(value) -> Optional[int]:
+    """معرف القسم من معامل الطلب؛ القيم الفارغة أو غير الرقمية (مثل "all") تعني كل الأقسام."""
+    value = str(value or "").strip()
+    return int(value) if value.isdigit() else None
+
+
+def _department_member_filter(department_id: int):
+    from models import Employee, employee_departments
+    member_ids = db.session.query(employee_departments.c.employee_id).filter(
+        employee_departments.c.department_id == department_id
+    )
+    return Employee.id.in_(member_ids)
+
+
+def _department_names(employee_ids) -> Dict[int, str]:
+    """اسم القسم الأول لكل موظف (مثل Employee.department) باستعلام واحد لكل دفعة بدلاً من استعلام لكل صف."""
+    from models import Department, employee_departments
+    names: Dict[int, str] = {}
+    ids = list(set(employee_ids))
+    for start in range(0, len(ids), IN_CHUNK_SIZE):
+        rows = db.session.query(employee_departments.c.employee_id, Department.name).join(
+            Department, Department.id == employee_departments.c.department_id
+        ).filter(employee_departments.c.employee_id.in_(ids[start:start + IN_CHUNK_SIZE])).all()
+        for employee_id, department_name in rows:
+            names.setdefault(employee_id, department_name)
+    return names
+
+
+@report_dataset("vehicles", ("id", INT), ("plate_number", STR), ("make", STR), ("model", STR),
+                ("color", STR), ("year", INT), ("status", STR))
+def _build_vehicles(vehicle_type="", status="", search=""):
+    from models import Vehicle
+    query = db.session.query(Vehicle.id, Vehicle.plate_number, Vehicle.make, Vehicle.model,
+                             Vehicle.color, Vehicle.year, Vehicle.status)
+    if vehicle_type:
+        query = query.filter(Vehicle.make == vehicle_type)  # نستخدم make بدلاً من vehicle_type
+    if status:
+        query = query.filter(Vehicle.status == status)
+    if search:
+        term = f"%{search}%"
+        query = query.filter(or_(Vehicle.plate_number.like(term), Vehicle.make.like(term),
+                                 Vehicle.model.like(term), Vehicle.color.like(term)))
+    rows = query.order_by(Vehicle.plate_number).all()
+    return rows, {"total": len(rows), "by_status": dict(Counter(row.status for row in rows))}
+
+
+@report_dataset("employees", ("id", INT), ("name", STR), ("employee_id", STR), ("national_id", STR),
+                ("mobile", STR), ("job_title", STR), ("status", STR), ("department_name", STR))
+def _build_employees(department_id="", status=""):
+    from models import Employee
+    query = db.session.query(Employee.id, Employee.name, Employee.employee_id, Employee.national_id,
+                             Employee.mobile, Employee.job_title, Employee.status)
+    department_id = _department_id(department_id)
+    if department_id:
+        query = query.filter(_department_member_filter(department_id))
+    if status:
+        query = query.filter(Employee.status == status)
+    employees = query.order_by(Employee.id).all()
+    departments = _department_names(row.id for row in employees)
+    rows = [tuple(row) + (departments.get(row.id),) for row in employees]
+    return rows, {"total": len(rows), "by_status": dict(Counter(row.status for row in employees))}
+
+
+@report_dataset("fees", ("id", INT), ("fee_type", STR), ("description", STR), ("amount", FLOAT),
+                ("due_date", DATE), ("is_paid", BOOL), ("recipient", STR))
+def _build_fees(fee_type="", date_from=None, date_to=None, status=""):
+    from models import Fee
+    query = db.session.query(Fee.id, Fee.fee_type, Fee.description, Fee.amount,
+                             Fee.due_date, Fee.is_paid, Fee.recipient)
+    if fee_type:
+        query = query.filter(Fee.fee_type == fee_type)
+    if date_from:
+        query = query.filter(Fee.due_date >= date_from)
+    if date_to:
+        query = query.filter(Fee.due_date <= date_to)
+    if status:
+        query = query.filter(Fee.is_paid == (status.lower() == "paid"))
+    rows = query.order_by(Fee.due_date).all()
+
+    total = paid = 0.0
+    for row in rows:
+        if row.amount:
+            total += row.amount
+            if row.is_paid:
+                paid += row.amount
+    return rows, {"count": len(rows), "total": total, "paid": paid, "unpaid": total - paid}
+
+
+@report_dataset("attendance", ("id", INT), ("employee_pk", INT), ("employee_name", STR),
+                ("employee_code", STR), ("date", DATE), ("check_in", TIME), ("check_out", TIME),
+                ("status", STR), ("notes", STR), ("department_name", STR))
+def _build_attendance(from_date, to_date, department_id="", status=""):
+    """سجلات الحضور مع إحصائيات الأقسام وقوائم موظفيها النشطين في مرور واحد على السجلات."""
+    from models import Attendance, Department, Employee, employee_departments
+    from_date, to_date = _as_date(from_date), _as_date(to_date)
+
+    query = db.session.query(
+        Attendance.id, Attendance.employee_id.label("employee_pk"), Employee.name,
+        Employee.employee_id.label("employee_code"), Attendance.date,
+        Attendance.check_in, Attendance.check_out, Attendance.status, Attendance.notes,
+    ).join(Employee, Attendance.employee_id == Employee.id).filter(Attendance.date.between(from_date, to_date))
+    department_id = _department_id(department_id)
+    if department_id:
+        query = query.filter(_department_member_filter(department_id))
+    if status:
+        query = query.filter(Attendance.status == status)
+    records = query.order_by(Attendance.date.desc()).all()
+    departments_by_employee = _department_names(row.employee_pk for row in records)
+    rows = [tuple(row) + (departments_by_employee.get(row.employee_pk),) for row in records]
+
+    # موظفو كل قسم (استعلام واحد لكل الأقسام)
+    roster_query = db.session.query(
+        Department.id, Department.name, Employee.id, Employee.name, Employee.employee_id,
+        Employee.national_id, Employee.mobile, Employee.job_title, Employee.location, Employee.project,
+    ).join(employee_departments, employee_departments.c.department_id == Department.id).join(
+        Employee, and_(Employee.id == employee_departments.c.employee_id,
+                       Employee.status.notin_(ATTENDANCE_EXCLUDED_STATUSES))
+    )
+    if department_id:
+        roster_query = roster_query.filter(Department.id == department_id)
+    departments: Dict[int, Dict] = {}
+    roster: Dict[int, Dict] = {}
+    for dept_id, dept_name, emp_id, name, code, national_id, mobile, job_title, location, project in roster_query.order_by(Department.id).all():
+        entry = departments.setdefault(dept_id, {"id": dept_id, "name": dept_name, "employee_ids": []})
+        entry["employee_ids"].append(emp_id)
+        roster[emp_id] = {"id": emp_id, "name": name, "employee_id": code, "national_id": national_id,
+                          "mobile": mobile, "job_title": job_title, "location": location, "project": project}
+
+    counts_by_employee: Dict[int, Counter] = {}
+    for row in records:
+        counts_by_employee.setdefault(row.employee_pk, Counter())[row.status] += 1
+
+    stats = []
+    totals = Counter()
+    for entry in departments.values():
+        counts = Counter()
+        for emp_id in entry["employee_ids"]:
+            counts.update(counts_by_employee.get(emp_id, {}))
+        dept_total = sum(counts.values())
+        entry.update({s: counts.get(s, 0) for s in ATTENDANCE_STATUSES})
+        entry.update({
+            "employees": len(entry["employee_ids"]),
+            "total": dept_total,
+            "rate": round(counts.get("present", 0) / dept_total * 100, 1) if dept_total else 0,
+        })
+        stats.append(entry)
+        totals.update({s: entry[s] for s in ATTENDANCE_STATUSES + ("employees", "total")})
+
+    return rows, {
+        "from_date": from_date.isoformat(),
+        "to_date": to_date.isoformat(),
+        "departments": stats,
+        "roster": list(roster.values()),
+        "totals": dict(totals),
+    }
+
+
+@report_dataset("salaries", ("employee_pk", INT), ("employee_name", STR), ("employee_code", STR),
+                ("department_name", STR), ("salary_id", INT), ("basic_salary", FLOAT), ("allowances", FLOAT),
+                ("deductions", FLOAT), ("bonus", FLOAT), ("net_salary", FLOAT), ("has_salary", BOOL))
+def _build_salaries(month, year, department_id=""):
+    """الموظفون النشطون مع راتب الشهر (إن وُجد) في استعلام واحد بدلاً من استعلام راتب لكل موظف."""
+    from models import Employee, Salary
+    query = db.session.query(
+        Employee.id, Employee.name, Employee.employee_id, Salary.id, Salary.basic_salary,
+        Salary.allowances, Salary.deductions, Salary.bonus, Salary.net_salary,
+    ).outerjoin(Salary, and_(Salary.employee_id == Employee.id, Salary.month == month, Salary.year == year)
+    ).filter(Employee.status == "active")
+    department_id = _department_id(department_id)
+    if department_id:
+        query = query.filter(_department_member_filter(department_id))
+
+    seen = set()
+    records = []
+    for row in query.order_by(Employee.id, Salary.id).all():
+        if row[0] not in seen:  # راتب واحد لكل موظف كما في الاستعلام السابق (.first())
+            seen.add(row[0])
+            records.append(row)
+    departments = _department_names(seen)
+
+    rows = []
+    totals = {"basic": 0.0, "allowances": 0.0, "deductions": 0.0, "bonus": 0.0, "net": 0.0, "count": 0}
+    for emp_id, name, code, salary_id, basic, allowances, deductions, bonus, net in records:
+        has_salary = salary_id is not None
+        values = (basic or 0.0, allowances or 0.0, deductions or 0.0, bonus or 0.0, net or 0.0)
+        if has_salary:
+            for key, value in zip(("basic", "allowances", "deductions", "bonus", "net"), values):
+                totals[key] += value
+            totals["count"] += 1
+        rows.append((emp_id, name, code, departments.get(emp_id), salary_id) + values + (has_salary,))
+    return rows, {"totals": totals}
+
+
+@report_dataset("documents", ("id", INT), ("employee_name", STR), ("employee_code", STR), ("department_name", STR),
+                ("document_type", STR), ("document_number", STR), ("issue_date", DATE), ("expiry_date", DATE),
+                ("notes", STR), ("days_to_expiry", INT))
+def _build_documents(department_id="", document_type="", expiring_only=False, expiry_days=30, today=None):
+    from models import Document, Employee
+    today = today or date.today()
+    query = db.session.query(
+        Document.id, Employee.id, Employee.name, Employee.employee_id, Document.document_type,
+        Document.document_number, Document.issue_date, Document.expiry_date, Document.notes,
+    ).join(Employee, Document.employee_id == Employee.id)
+    department_id = _department_id(department_id)
+    if department_id:
+        query = query.filter(_department_member_filter(department_id))
+    if document_type:
+        query = query.filter(Document.document_type == document_type)
+    if expiring_only:
+        query = query.filter(Document.expiry_date <= date.fromordinal(today.toordinal() + int(expiry_days)))
+    records = query.order_by(Document.expiry_date).all()
+    departments = _department_names(row[1] for row in records)
+
+    rows = []
+    counts = Counter()
+    for doc_id, emp_id, name, code, doc_type, number, issue_date, expiry_date, notes in records:
+        days = (expiry_date - today).days if expiry_date else None
+        if days is not None:
+            counts["expired" if days <= 0 else "expiring" if days <= int(expiry_days) else "valid"] += 1
+        rows.append((doc_id, name, code, departments.get(emp_id), doc_type, number, issue_date,
+                     expiry_date, notes, days))
+    return rows, {"total": len(rows), "expired": counts["expired"],
+                  "expiring": counts["expiring"], "valid": counts["valid"]}
@@ -7,6 +7,8 @@ import base64
 from flask import current_app
 from typing import List, Dict, Any, Optional
 
+from core.http_client import get_http_client
+
 
 def send_email_with_resend(
     to_email: str,
@@ -78,7 +80,7 @@ def send_email_with_resend(
     
     try:
         # إرسال الطلب
-        response = requests.post(
+        response = get_http_client('resend').post(
             'https://api.resend.com/emails',
             headers=headers,
             json=email_data,
@@ -140,7 +142,7 @@ def test_resend_connection() -> Dict[str, Any]:
     
     try:
         # اختبار بسيط للتحقق من صحة المفتاح
-        response = requests.get(
+        response = get_http_client('resend').get(
             'https://api.resend.com/domains',
             headers=headers,
             timeout=10
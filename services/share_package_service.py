@@ -0,0 +1,330 @@
+"""
+حزم مشاركة العمليات (ZIP) المتدفقة مع تخزين مؤقت على القرص.
+- عناصر الأرشيف تُكتب مباشرة إلى الاستجابة دون مجلد مؤقت وسيط؛ الذاكرة ثابتة بحجم كتلة قراءة واحدة.
+- الوسائط المضغوطة أصلاً (صور، فيديو، PDF، xlsx) تُخزن دون إعادة ضغط؛ النصوص تُضغط.
+- الحزمة المكتملة تُحفظ أثناء البث باسم يتضمن رقم العملية وبصمة آخر تعديل،
+  فالمشاركة التالية لنفس النسخة تُخدم من الملف مباشرة، والنسخ القديمة تُحذف حسب العمر والحجم.
+"""
+import glob
+import hashlib
+import io
+import logging
+import os
+import time
+import uuid
+import zipfile
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+from flask import current_app
+
+from core.extensions import db
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_FORMAT_VERSION = 1
+READ_CHUNK_BYTES = 256 * 1024
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_CACHE_MAX_AGE = 7 * 24 * 3600
+PART_FILE_MAX_AGE = 3600
+
+# صيغ مضغوطة أصلاً: إعادة ضغطها تستهلك المعالج دون توفير يذكر
+STORED_EXTENSIONS = frozenset({
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".heif",
+    ".mp4", ".mov", ".m4v", ".webm", ".3gp", ".mp3", ".m4a", ".aac", ".ogg",
+    ".pdf", ".zip", ".gz", ".rar", ".7z", ".xlsx", ".docx", ".pptx",
+})
+
+OPERATION_TYPE_LABELS = {
+    'handover': 'تسليم/استلام مركبة',
+    'workshop': 'ورشة صيانة',
+    'external_authorization': 'تفويض خارجي',
+    'safety_inspection': 'فحص سلامة'
+}
+
+
+@dataclass
+class PackageEntry:
+    """عنصر واحد في الحزمة: بيانات في الذاكرة أو ملف على القرص يُقرأ على كتل."""
+    arcname: str
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+
+    @property
+    def compress_type(self) -> int:
+        extension = os.path.splitext(self.path or self.arcname)[1].lower()
+        return zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+
+
+class _ZipSink(io.RawIOBase):
+    """ملف وهمي غير قابل للتنقل يجمع ما يكتبه zipfile ليُفرَّغ إلى الاستجابة بعد كل كتلة."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+# ==================== التخزين المؤقت ====================
+
+def package_cache_dir(app=None) -> str:
+    app = app or current_app
+    path = app.config.get('SHARE_PACKAGE_CACHE_DIR') or os.path.join(app.instance_path, 'share_packages')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def evict_share_packages(cache_dir: str, max_bytes: int, max_age: int, now: Optional[float] = None) -> int:
+    """حذف الحزم الأقدم من max_age ثم الأقل استخداماً حتى يصبح المجموع ضمن max_bytes."""
+    now = now or time.time()
+    removed = 0
+    packages = []
+    for path in glob.glob(os.path.join(cache_dir, '*')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        is_part = path.endswith('.part')
+        if now - stat.st_mtime > (PART_FILE_MAX_AGE if is_part else max_age):
+            removed += _remove(path)
+        elif not is_part:
+            packages.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in packages)
+    for _, size, path in sorted(packages):
+        if total <= max_bytes:
+            break
+        removed += _remove(path)
+        total -= size
+    return removed
+
+
+def _remove(path: str) -> int:
+    try:
+        os.remove(path)
+        return 1
+    except OSError:
+        return 0
+
+
+def _evict_from_config(app) -> None:
+    try:
+        evict_share_packages(
+            package_cache_dir(app),
+            app.config.get('SHARE_PACKAGE_CACHE_MAX_BYTES', DEFAULT_CACHE_MAX_BYTES),
+            app.config.get('SHARE_PACKAGE_CACHE_MAX_AGE', DEFAULT_CACHE_MAX_AGE),
+        )
+    except Exception as e:
+        logger.warning(f"تعذر تنظيف حزم المشاركة المخزنة: {str(e)}")
+
+
+def cached_package_path(operation_id: int, fingerprint: str) -> Optional[str]:
+    """مسار الحزمة المخزنة لهذه النسخة من العملية إن وُجدت (مع تحديث وقت آخر استخدام)."""
+    path = os.path.join(package_cache_dir(), f"operation_{operation_id}_{fingerprint}.zip")
+    if not os.path.isfile(path):
+        return None
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+    return path
+
+
+# ==================== محتوى الحزمة ====================
+
+def _resolve_media_path(static_folder: str, stored_path: Optional[str]) -> Optional[str]:
+    """مسارات الصور مخزنة بصيغ مختلفة (نسبية لـ static أو uploads أو مطلقة)."""
+    if not stored_path:
+        return None
+    if os.path.isabs(stored_path):
+        return stored_path if os.path.isfile(stored_path) else None
+    relative = stored_path.lstrip('/')
+    if relative.startswith('static/'):
+        relative = relative[len('static/'):]
+    for candidate in (
+        os.path.join(static_folder, relative),
+        os.path.join(static_folder, 'uploads', relative),
+        os.path.join(static_folder, 'uploads', 'workshop_images', relative),
+    ):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _operation_media(operation) -> Tuple[Optional[object], List[str]]:
+    """السجل المرتبط بالعملية ومسارات وسائطه المخزنة."""
+    from models import VehicleHandover, VehicleHandoverImage, VehicleWorkshop, VehicleWorkshopImage
+
+    if not operation.related_record_id:
+        return None, []
+    if operation.operation_type == 'handover':
+        record = db.session.get(VehicleHandover, operation.related_record_id)
+        images = VehicleHandoverImage.query.filter_by(handover_record_id=operation.related_record_id).order_by(VehicleHandoverImage.id).all()
+        media = []
+        for image in images:
+            media += [path for path in (image.image_path, image.file_path) if path and path not in media]
+        return record, media
+    if operation.operation_type == 'workshop':
+        record = db.session.get(VehicleWorkshop, operation.related_record_id)
+        images = VehicleWorkshopImage.query.filter_by(workshop_record_id=operation.related_record_id).order_by(VehicleWorkshopImage.id).all()
+        return record, [image.image_path for image in images]
+    return None, []
+
+
+def _details_text(operation) -> str:
+    lines = [
+        '═' * 50,
+        f'          تفاصيل العملية #{operation.id}',
+        '═' * 50,
+        '',
+        f'نوع العملية: {OPERATION_TYPE_LABELS.get(operation.operation_type, operation.operation_type)}',
+        f'الحالة: {operation.status}',
+        f'التاريخ: {operation.created_at.strftime("%Y/%m/%d %H:%M")}',
+        '',
+    ]
+    if operation.vehicle:
+        lines += ['─' * 50, 'معلومات المركبة:', '─' * 50, f'رقم اللوحة: {operation.vehicle.plate_number}', '']
+    return '\n'.join(lines) + '\n'
+
+
+def _details_workbook(operation) -> Optional[bytes]:
+    try:
+        from openpyxl import Workbook
+        from openpyxl.styles import Font
+
+        wb = Workbook()
+        ws = wb.active
+        ws.title = 'تفاصيل العملية'
+        ws['A1'] = 'البيان'
+        ws['B1'] = 'القيمة'
+        ws['A1'].font = Font(bold=True)
+        ws['B1'].font = Font(bold=True)
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        return buffer.getvalue()
+    except Exception as e:
+        logger.warning(f'فشل في إنشاء Excel: {str(e)}')
+        return None
+
+
+def share_package_fingerprint(operation) -> Tuple[str, List[str]]:
+    """
+    بصمة نسخة الحزمة ومسارات وسائطها على القرص، من تواريخ التعديل وخصائص الملفات فقط.
+    البصمة تتغير عند تعديل العملية أو سجلها المرتبط أو إضافة/تغيير أي وسائط، فتُبنى حزمة جديدة تلقائياً.
+    """
+    static_folder = current_app.static_folder
+    record, stored_media = _operation_media(operation)
+
+    media_files = []
+    for stored_path in stored_media:
+        path = _resolve_media_path(static_folder, stored_path)
+        if path and path not in media_files:
+            media_files.append(path)
+
+    parts = [
+        f"v{PACKAGE_FORMAT_VERSION}",
+        str(operation.id),
+        operation.status or '',
+        (operation.updated_at or operation.created_at).isoformat() if (operation.updated_at or operation.created_at) else '',
+        getattr(record, 'updated_at', None).isoformat() if getattr(record, 'updated_at', None) else '',
+        operation.vehicle.plate_number if operation.vehicle else '',
+    ]
+    for path in media_files:
+        stat = os.stat(path)
+        parts.append(f"{path}:{stat.st_size}:{int(stat.st_mtime)}")
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:16], media_files
+
+
+def build_share_entries(operation, media_files: List[str]) -> List[PackageEntry]:
+    """عناصر الحزمة (النص وملف Excel والوسائط)؛ تُبنى فقط عند عدم وجود نسخة مخزنة بنفس البصمة."""
+    entries = [PackageEntry('تفاصيل_العملية.txt', data=_details_text(operation).encode('utf-8'))]
+    workbook = _details_workbook(operation)
+    if workbook is not None:
+        entries.append(PackageEntry(f'بيانات_العملية_{operation.id}.xlsx', data=workbook))
+    for index, path in enumerate(media_files, start=1):
+        entries.append(PackageEntry(f"media/{index:02d}_{os.path.basename(path)}", path=path))
+    return entries
+
+
+# ==================== البث ====================
+
+def _write_entry(archive: zipfile.ZipFile, entry: PackageEntry) -> Iterator[None]:
+    """كتابة عنصر في الأرشيف؛ تتوقف (yield) بعد كل كتلة ليُفرَّغ الناتج إلى العميل."""
+    if entry.data is not None:
+        info = zipfile.ZipInfo(entry.arcname, date_time=time.localtime()[:6])
+        info.compress_type = entry.compress_type
+        archive.writestr(info, entry.data)
+        yield
+        return
+    try:
+        info = zipfile.ZipInfo.from_file(entry.path, entry.arcname)
+        source = open(entry.path, 'rb')
+    except OSError as e:
+        logger.warning(f"تعذر إضافة {entry.arcname} إلى حزمة المشاركة: {str(e)}")
+        return
+    info.compress_type = entry.compress_type
+    with source, archive.open(info, 'w', force_zip64=info.file_size > zipfile.ZIP64_LIMIT) as dest:
+        while True:
+            chunk = source.read(READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            dest.write(chunk)
+            yield
+    yield
+
+
+def stream_share_package(entries: List[PackageEntry], cache_path: Optional[str] = None, app=None) -> Iterator[bytes]:
+    """
+    مولّد بايتات أرشيف ZIP صالح لـ Response متدفق.
+    إن مُرّر cache_path تُنسخ البايتات إلى ملف جزئي يُعاد تسميته عند اكتمال الحزمة فقط.
+    """
+    app = app or current_app._get_current_object()
+    sink = _ZipSink()
+    part_path = f"{cache_path}.{uuid.uuid4().hex}.part" if cache_path else None
+    part_file = open(part_path, 'wb') if part_path else None
+    completed = False
+
+    def _flush() -> bytes:
+        chunk = sink.drain()
+        if part_file is not None and chunk:
+            part_file.write(chunk)
+        return chunk
+
+    try:
+        with zipfile.ZipFile(sink, 'w') as archive:
+            for entry in entries:
+                for _ in _write_entry(archive, entry):
+                    chunk = _flush()
+                    if chunk:
+                        yield chunk
+        chunk = _flush()
+        if chunk:
+            yield chunk
+        completed = True
+    finally:
+        if part_file is not None:
+            part_file.close()
+            if completed:
+                os.replace(part_path, cache_path)
+                _evict_from_config(app)
+            else:
+                _remove(part_path)
+
+
+def remove_stale_packages(operation_id: int, fingerprint: str) -> None:
+    """حذف النسخ السابقة لحزمة العملية بعد تغير بصمتها."""
+    current = f"operation_{operation_id}_{fingerprint}.zip"
+    for path in glob.glob(os.path.join(package_cache_dir(), f"operation_{operation_id}_*.zip")):
+        if os.path.basename(path) != current:
+            _remove(path)
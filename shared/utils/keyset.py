@@ -0,0 +1,111 @@
+"""
+ترقيم الصفحات بالمفتاح (Keyset Pagination) — زمن ثابت للصفحة مهما كان حجم الجدول.
+المؤشر (cursor) نص base64 يحمل قيم أعمدة الترتيب لآخر/أول صف في الصفحة.
+"""
+import base64
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import and_, or_
+
+
+@dataclass
+class KeysetPage:
+    """صفحة نتائج مع مؤشرات الانتقال للأمام وللخلف."""
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self) -> bool:
+        return self.prev_cursor is not None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[list]:
+    """فك المؤشر؛ يعيد None للمؤشر الفارغ أو التالف (تُعرض الصفحة الأولى)."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        return [_decode_value(v) for v in values] if isinstance(values, list) else None
+    except (ValueError, TypeError):
+        return None
+
+
+def _after_condition(columns, values, descending: bool):
+    """شرط "بعد المفتاح" معمّم لعدة أعمدة: (a > x) OR (a = x AND b > y) ..."""
+    clauses = []
+    for i, column in enumerate(columns):
+        prefix = [columns[j] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*prefix, step))
+    return or_(*clauses)
+
+
+def paginate_keyset(query, sort_columns: Sequence[Any], key_getter, limit: int = 50,
+                    after: Optional[str] = None, before: Optional[str] = None,
+                    descending: bool = False) -> KeysetPage:
+    """
+    تطبيق ترقيم المفتاح على استعلام ORM.
+
+    sort_columns: أعمدة (أو تعبيرات) ترتيب غير فارغة، ويجب أن تنتهي بعمود فريد (مثل id).
+    key_getter: دالة تأخذ عنصراً وتعيد قيم أعمدة الترتيب له (بنفس الترتيب).
+    """
+    after_values = decode_cursor(after)
+    if after_values is not None and len(after_values) != len(sort_columns):
+        after_values = None
+    before_values = None if after_values else decode_cursor(before)
+    if before_values is not None and len(before_values) != len(sort_columns):
+        before_values = None
+    backwards = before_values is not None
+
+    if after_values:
+        query = query.filter(_after_condition(sort_columns, after_values, descending))
+    elif backwards:
+        query = query.filter(_after_condition(sort_columns, before_values, not descending))
+
+    reverse = descending != backwards
+    query = query.order_by(*[c.desc() if reverse else c.asc() for c in sort_columns])
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    page = KeysetPage(items=rows)
+    if rows:
+        # الرجوع من مؤشر "قبل" يعني وجود صفوف بعده، والتقدم من مؤشر "بعد" يعني وجود صفوف قبله
+        if backwards or has_more:
+            page.next_cursor = encode_cursor(key_getter(rows[-1]))
+        if (backwards and has_more) or (not backwards and after_values):
+            page.prev_cursor = encode_cursor(key_getter(rows[0]))
+    return page
@@ -13,3 +13,32 @@ if str(src_dir) not in sys.path:
 base_dir = Path(__file__).resolve().parent.parent
 if str(base_dir) not in sys.path:
     sys.path.insert(0, str(base_dir))
+
+
+import pytest
+from flask import Flask
+
+from core.extensions import db
+
+
+@pytest.fixture
+def app_config():
+    """إعدادات إضافية لتطبيق الاختبار؛ تعيد ملفات الاختبار تعريفها حسب الحاجة."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    """
+    تطبيق Flask على SQLite مؤقت بكل الجداول داخل app context.
+    ملفات الاختبار التي تحتاج تهيئة إضافية (مستمعات، ذاكرة، مسارات) تعرّف app(app) فوقه.
+    """
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config["TESTING"] = True
+    app.config.update(app_config)
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
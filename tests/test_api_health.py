@@ -0,0 +1,50 @@
+import pytest
+from flask_login import LoginManager
+
+from core.extensions import db
+from models import User
+from presentation.web.api_routes import api_bp
+
+
+@pytest.fixture
+def app_config():
+    return {"SECRET_KEY": "test"}
+
+
+@pytest.fixture
+def app(app):
+    # المستخدم يُحدَّد بترويسة X-User في الاختبار بدل جلسة الدخول
+    login_manager = LoginManager(app)
+    login_manager.request_loader(lambda request: User.query.filter_by(email=request.headers.get("X-User")).first())
+    app.register_blueprint(api_bp)
+    db.session.add_all([User(email="admin@example.com", role="admin"), User(email="staff@example.com", role="employee")])
+    db.session.commit()
+    return app
+
+
+def _status(app, path, user=None):
+    headers = {"X-User": user} if user else {}
+    with app.app_context():  # g جديد لكل طلب فلا يبقى المستخدم المحمّل من الطلب السابق
+        return app.test_client().get(path, headers=headers).status_code
+
+
+def test_plain_health_stays_public(app):
+    assert _status(app, "/api/health") == 200
+
+
+def test_integrations_metrics_are_admin_only(app):
+    assert _status(app, "/api/health/integrations") == 401
+    assert _status(app, "/api/health/integrations", "staff@example.com") == 403
+    assert _status(app, "/api/health/integrations", "admin@example.com") == 200
+
+
+def test_auth_cache_stats_are_admin_only(app):
+    assert _status(app, "/api/health/auth-cache") == 401
+    assert _status(app, "/api/health/auth-cache", "staff@example.com") == 403
+    assert _status(app, "/api/health/auth-cache", "admin@example.com") == 200
+
+
+def test_check_in_stage_timings_are_admin_only(app):
+    assert _status(app, "/api/health/check-in") == 401
+    assert _status(app, "/api/health/check-in", "staff@example.com") == 403
+    assert _status(app, "/api/health/check-in", "admin@example.com") == 200
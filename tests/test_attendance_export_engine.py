@@ -0,0 +1,105 @@
+from datetime import date, timedelta
+from io import BytesIO
+
+from openpyxl import load_workbook
+
+from core.extensions import db
+from models import Attendance, Department, Employee
+from modules.attendance.application import attendance_export_engine as engine
+from utils.excel_attendance_utils import export_attendance_by_department
+from utils.excel_dashboard import export_attendance_by_department_with_dashboard
+
+START = date(2026, 3, 1)
+END = date(2026, 3, 5)
+
+
+def _company():
+    sales, ops = Department(name="المبيعات"), Department(name="العمليات")
+    employees = [
+        Employee(employee_id=f"E{i}", national_id=f"10{i}", name=name, mobile="0500000000", job_title="فني")
+        for i, name in enumerate(["سالم", "أحمد", "خالد"])
+    ]
+    db.session.add_all([sales, ops, *employees])
+    db.session.flush()
+    employees[0].departments.append(sales)
+    employees[1].departments.append(sales)
+    employees[2].departments.append(ops)
+    statuses = {
+        (0, 0): "present", (0, 1): "absent", (0, 2): "leave",
+        (1, 0): "present", (1, 3): "sick", (1, 4): "late",
+        (2, 0): "absent",
+    }
+    for (emp, day), status in statuses.items():
+        db.session.add(Attendance(employee_id=employees[emp].id, date=START + timedelta(days=day), status=status))
+    db.session.add(Attendance(employee_id=employees[2].id, date=END + timedelta(days=1), status="present"))
+    db.session.commit()
+    return employees
+
+
+def _sheet_rows(output, name):
+    return [list(row) for row in load_workbook(output)[name].iter_rows(values_only=True)]
+
+
+def test_stream_and_pivot_build_the_employee_day_matrix(app):
+    employees = _company()
+    frame = engine.stream_attendance(START, END, chunk_size=2)
+    assert len(frame.codes) == 7
+
+    ids = [e.id for e in employees]
+    days = [d.toordinal() for d in engine.date_range(START, END)]
+    matrix = engine.pivot_matrix(frame, ids, days, missing=engine.CODE_ABSENT)
+    assert matrix.tolist() == [
+        [1, 2, 3, 2, 2],
+        [1, 2, 2, 4, 0],
+        [2, 2, 2, 2, 2],
+    ]
+    assert engine.status_counts(frame.codes).tolist() == [1, 2, 2, 1, 1]
+    grouped = engine.grouped_status_counts(frame, {ids[0]: 0, ids[1]: 0, ids[2]: 1}, 2)
+    assert grouped.tolist() == [[1, 2, 1, 1, 1], [0, 0, 1, 0, 0]]
+    assert engine.daily_status_counts(frame, days)[0].tolist() == [0, 2, 1, 0, 0]
+
+    only_first = engine.stream_attendance(START, END, [ids[0]])
+    assert set(only_first.employee_ids.tolist()) == {ids[0]}
+
+
+def test_department_export_matches_the_template(app):
+    employees = _company()
+    output = export_attendance_by_department(employees, engine.stream_attendance(START, END), START, END)
+
+    rows = _sheet_rows(output, "المبيعات")
+    assert rows[0][9] == "Sun\n01/03/2026"
+    assert rows[1][:9] == ["Name", "ID Number", "Emp. No.", "Job Title", "No. Mobile", "Car", "Location",
+                           "Project", "Total"]
+    # الموظفون مرتبون بالاسم، واليوم بلا سجل يُحسب حاضراً، والحالة غير المعروفة خلية فارغة
+    assert rows[2][0] == "أحمد" and rows[2][8] == 3 and rows[2][9:] == ["P", "P", "P", "S", None]
+    assert rows[3][0] == "سالم" and rows[3][8] == 3 and rows[3][9:] == ["P", "A", "L", "P", "P"]
+    assert _sheet_rows(output, "دليل الرموز")[2] == ["P", "حاضر (Present)"]
+
+    # قائمة سجلات ORM ما زالت مقبولة وتعطي النتيجة نفسها
+    records = Attendance.query.filter(Attendance.date.between(START, END)).all()
+    legacy = export_attendance_by_department(employees, records, START, END)
+    assert _sheet_rows(legacy, "المبيعات") == rows
+
+
+def test_dashboard_export_counts_and_sheets(app):
+    employees = _company()
+    output = export_attendance_by_department_with_dashboard(employees, engine.stream_attendance(START, END),
+                                                            START, END)
+    workbook = load_workbook(output)
+    assert workbook.sheetnames == ["ChartData", "📊 لوحة المعلومات", "العمليات", "المبيعات", "دليل الرموز"]
+
+    chart_rows = [list(r) for r in workbook["ChartData"].iter_rows(min_row=5, max_row=9, values_only=True)]
+    assert [r[1] for r in chart_rows[:4]] == [2, 2, 1, 1]
+    assert chart_rows[0][3:8] == ["العمليات", 0, 1, 0, 0]
+    assert chart_rows[1][3:8] == ["المبيعات", 2, 1, 1, 1]
+    assert chart_rows[4][9:12] == ["2026-03-05", 0, 0]
+
+    ops = [list(r) for r in workbook["العمليات"].iter_rows(values_only=True)]
+    assert ops[2][9:] == ["A"] * 5 and ops[2][8] == 0
+
+
+def test_workbooks_use_constant_memory(app):
+    output = BytesIO()
+    workbook = engine.new_workbook(output)
+    assert workbook.constant_memory
+    workbook.close()
@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+from core.extensions import db
+from models import Department
+from services import backup_stream_service as backup
+
+
+def _seed(count=7):
+    db.session.add_all([Department(name=f"قسم {i}", description="وصف") for i in range(count)])
+    db.session.commit()
+    db.session.remove()
+
+
+def _export(**kwargs):
+    return list(backup.stream_backup(["department"], chunk_rows=3, **kwargs))
+
+
+def _names():
+    db.session.remove()
+    return sorted(name for (name,) in db.session.query(Department.name))
+
+
+def test_export_restore_round_trip(app):
+    _seed()
+    expected = _names()
+    archive = b"".join(_export())
+
+    db.session.query(Department).delete()
+    db.session.commit()
+    results = backup.restore_backup(io.BytesIO(archive), mode="replace")
+    assert results == {"department": {"imported": 7, "skipped": 0}}
+    assert _names() == expected
+
+    # إعادة الاستعادة في وضع الإضافة تتخطى الموجود
+    assert backup.restore_backup(io.BytesIO(archive))["department"] == {"imported": 0, "skipped": 7}
+
+
+def test_failed_table_aborts_export_and_restore_refuses_it(app, monkeypatch):
+    _seed()
+    compress = backup._compress
+    calls = []
+
+    def failing_compress(payload, codec):
+        calls.append(codec)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        return compress(payload, codec)
+
+    monkeypatch.setattr(backup, "_compress", failing_compress)
+    chunks = []
+    with pytest.raises(backup.BackupExportError):
+        for chunk in backup.stream_backup(["department"], chunk_rows=3):
+            chunks.append(chunk)
+
+    db.session.query(Department).delete()
+    db.session.commit()
+    with pytest.raises(ValueError, match="department"):
+        backup.restore_backup(io.BytesIO(b"".join(chunks)), mode="replace")
+    assert _names() == []
+
+
+def test_truncated_archive_is_rolled_back(app):
+    _seed()
+    chunks = _export()
+    truncated = b"".join(chunks[:-1])  # انقطع قبل complete.json
+
+    with pytest.raises(ValueError, match="مكتملة"):
+        backup.restore_backup(io.BytesIO(truncated), mode="replace")
+    assert len(_names()) == 7  # لم يُحذف شيء
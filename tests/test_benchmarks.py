@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+
+from core.extensions import db
+from infrastructure.benchmarks import (BenchmarkRunner, Scenario, ScenarioResult, compare, generate_dataset,
+                                       get_scale)
+from infrastructure.benchmarks.dataset import DatasetGenerator
+from models import Attendance, Employee, EmployeeLocation, VehicleHandover
+
+ANCHOR = date(2026, 3, 31)
+TINY = dict(employees=12, departments=2, attendance_days=10, tracked_drivers=4, tracking_days=2,
+            points_per_day=6, vehicles=3, handovers_per_vehicle=2, salary_months=1)
+
+
+def test_generator_is_deterministic():
+    first = DatasetGenerator(get_scale("ci", **TINY), seed=7, anchor=ANCHOR)
+    second = DatasetGenerator(get_scale("ci", **TINY), seed=7, anchor=ANCHOR)
+    assert list(first.attendance()) == list(second.attendance())
+    assert list(first.employee_locations()) == list(second.employee_locations())
+    other = DatasetGenerator(get_scale("ci", **TINY), seed=8, anchor=ANCHOR)
+    assert list(first.employees()) != list(other.employees())
+    with pytest.raises(ValueError):
+        get_scale("huge")
+
+
+def test_generate_dataset_fills_tables(app):
+    counts = generate_dataset("ci", seed=1, anchor=ANCHOR, **TINY)
+    assert Employee.query.count() == counts["employees"] == 12
+    assert EmployeeLocation.query.count() == counts["employee_locations"] == 4 * 2 * 6
+    assert VehicleHandover.query.count() == 6
+    # الجمعة مستثناة من أيام الحضور
+    assert Attendance.query.count() == counts["attendance"] < 12 * 10
+    assert all(a.date.weekday() != 4 for a in Attendance.query.all())
+
+
+def test_runner_measures_queries_and_compares_baseline(app):
+    generate_dataset("ci", seed=1, anchor=ANCHOR, **TINY)
+
+    def per_employee_lookups():
+        return [db.session.get(Employee, e.id, populate_existing=True).name for e in Employee.query.all()]
+
+    runner = BenchmarkRunner(app, repeats=2, warmup=0)
+    result = runner.run_scenario(Scenario("lookups", service=per_employee_lookups))
+    assert result.status == "ok" and result.queries == 13 and result.peak_memory_kb > 0
+    assert runner.run_scenario(Scenario("missing", endpoint="nope.index")).status == "skipped"
+
+    baseline = {"lookups": {"latency_median_ms": result.latency_median_ms * 10, "queries": 1,
+                            "peak_memory_kb": result.peak_memory_kb * 10}}
+    [row] = compare([result, ScenarioResult("broken", "error")], baseline)
+    assert row["regressions"] == ["queries"] and row["queries_change"] == 12
+
+
+def test_payroll_run_benchmark(app, request):
+    pytest.importorskip("pytest_benchmark")
+    benchmark = request.getfixturevalue("benchmark")
+    generate_dataset("ci", seed=1, anchor=ANCHOR, **TINY)
+    from infrastructure.benchmarks.runner import _payroll_run
+
+    processed = benchmark.pedantic(_payroll_run, rounds=3, warmup_rounds=1)
+    assert processed == Employee.query.filter_by(status="active").count()
@@ -0,0 +1,113 @@
+import io
+from datetime import date, timedelta
+
+import pytest
+from openpyxl import Workbook
+
+from core.extensions import db
+from models import ImportBatch, ImportedPhoneNumber, SimCard, Vehicle
+from modules.vehicles.application.vehicle_compliance_service import DOC_BITS
+from modules.imports.application import bulk_import_service as imports
+from modules.imports.application.import_specs import IMPORT_PHONE_NUMBERS, IMPORT_SIM_CARDS, IMPORT_VEHICLES
+
+
+@pytest.fixture
+def app_config():
+    return {"IMPORT_CHUNK_SIZE": 2}  # يفرض عدة دفعات كتابة
+
+
+def _xlsx(rows):
+    workbook = Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def test_sim_import_previews_diff_then_applies_in_bulk(app):
+    db.session.add(SimCard(phone_number="0500000001", carrier="STC", monthly_cost=50))
+    db.session.add(SimCard(phone_number="0500000002", carrier="زين", monthly_cost=70))
+    db.session.commit()
+
+    sheet = _xlsx([
+        ["رقم الهاتف", "شركة الاتصالات", "التكلفة الشهرية", "الوصف"],
+        ["0500000001", "موبايلي", 50, None],  # موجود: تغيرت الشركة
+        ["0500000002", "زين", 70, None],  # موجود بلا تغيير
+        [None, None, None, None],  # صف فارغ
+        [555000003, "STC", "120", "خط إداري"],  # رقم كخلية عددية
+        ["0500000004", None, None, None],  # بلا شركة
+        [555000003, "STC", 0, None],  # مكرر في الملف
+    ])
+    batch = imports.stage_file(IMPORT_SIM_CARDS, sheet, "sims.xlsx", user_id=7)
+    assert batch.total_rows == 5
+    assert batch.counts == {"new": 1, "update": 1, "unchanged": 1, "duplicate": 1, "invalid": 1}
+    assert SimCard.query.count() == 2  # المعاينة لا تلمس الجدول الهدف
+
+    preview = imports.preview_batch(batch.id)
+    assert preview["samples"]["update"][0].changes == {"carrier": ["STC", "موبايلي"]}
+    assert preview["samples"]["invalid"][0].row_number == 6
+
+    result = imports.apply_batch(batch.id, update_existing=True)
+    assert (result.inserted, result.updated, result.rejected) == (1, 1, 2)
+    assert SimCard.query.filter_by(phone_number="555000003").one().monthly_cost == 120
+    assert SimCard.query.filter_by(phone_number="0500000001").one().carrier == "موبايلي"
+    assert db.session.get(ImportBatch, batch.id).status == "applied"
+    with pytest.raises(imports.ImportFormatError):
+        imports.apply_batch(batch.id)
+
+
+def test_phone_numbers_csv_with_free_form_headers(app):
+    db.session.add(ImportedPhoneNumber(phone_number="0511111111"))
+    db.session.commit()
+    csv_file = io.BytesIO("الاسم,رقم الجوال\nأحمد,051 111 1111\nسعيد,(052) 222-2222\n".encode("utf-8-sig"))
+
+    result = imports.import_file(IMPORT_PHONE_NUMBERS, csv_file, "numbers.csv", user_id=3)
+    assert (result.inserted, result.skipped_existing) == (1, 1)
+    added = ImportedPhoneNumber.query.filter_by(phone_number="0522222222").one()
+    assert added.description == "سعيد" and added.imported_by == 3
+
+
+def test_vehicle_import_reports_missing_columns_and_existing_plates(app):
+    header = ["رقم اللوحة", "الشركة المصنعة", "الموديل", "السنة", "اللون", "نوع السيارة", "الحالة"]
+    with pytest.raises(imports.ImportFormatError):
+        imports.import_file(IMPORT_VEHICLES, _xlsx([header[:3], ["1 أ ب", "تويوتا", "هايلكس"]]))
+
+    db.session.add(Vehicle(plate_number="1111 أ", make="نيسان", model="صني", year=2020, color="أبيض",
+                           type_of_car="سيارة عادية"))
+    db.session.commit()
+    result = imports.import_file(IMPORT_VEHICLES, _xlsx([
+        header,
+        ["2222 ب", "تويوتا", "هايلكس", 2022.0, "أبيض", None, "في الورشة"],
+        ["1111 أ", "نيسان", "صني", 2020, "أبيض", "سيارة عادية", None],
+        ["3333 ج", "هيونداي", "النترا", None, "أسود", None, None],
+    ]))
+    assert (result.inserted, result.invalid, result.skipped_existing) == (1, 1, 1)
+    assert result.errors == ["الصف 3: رقم اللوحة 1111 أ موجود مسبقاً", "الصف 4: سنة الصنع مطلوبة"]
+    vehicle = Vehicle.query.filter_by(plate_number="2222 ب").one()
+    assert (vehicle.year, vehicle.status, vehicle.type_of_car) == (2022, "in_workshop", "سيارة عادية")
+
+
+def test_vehicle_import_refreshes_compliance_of_written_rows(app):
+    existing = Vehicle(plate_number="1111 أ", make="نيسان", model="صني", year=2020, color="أبيض",
+                       type_of_car="سيارة عادية", registration_expiry_date=date.today() - timedelta(days=1))
+    db.session.add(existing)
+    db.session.commit()
+    # قيم قديمة كما لو انتهت الوثيقة بعد آخر حفظ
+    Vehicle.query.filter_by(id=existing.id).update({"expired_docs_mask": 0, "compliance_checked_on": None})
+    db.session.commit()
+
+    header = ["رقم اللوحة", "الشركة المصنعة", "الموديل", "السنة", "اللون", "نوع السيارة"]
+    result = imports.import_file(IMPORT_VEHICLES, _xlsx([
+        header,
+        ["1111 أ", "نيسان", "صني", 2021, "أبيض", "سيارة عادية"],
+        ["2222 ب", "تويوتا", "هايلكس", 2022, "أبيض", "سيارة نقل"],
+    ]), update_existing=True)
+    assert (result.inserted, result.updated) == (1, 1)
+
+    db.session.expire_all()
+    updated = Vehicle.query.filter_by(plate_number="1111 أ").one()
+    assert updated.expired_docs_mask == DOC_BITS["registration"] and updated.compliance_checked_on == date.today()
+    added = Vehicle.query.filter_by(plate_number="2222 ب").one()
+    assert added.expired_docs_mask == 0 and added.compliance_checked_on == date.today()
@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+
+import pytest
+
+from core.extensions import db
+from models import BusinessHoliday, Department, Employee, WeekendRule
+from modules.business_calendar.application import business_calendar_service as calendars
+from modules.business_calendar.application.business_calendar_service import BusinessCalendar, HolidayRule
+from modules.leave.application.leave_service import LeaveService
+
+
+@pytest.fixture
+def app(app):
+    calendars.init_business_calendar(app)
+    calendars.invalidate_calendar_cache()
+    yield app
+    calendars.invalidate_calendar_cache()
+
+
+def _naive_working_days(calendar, start, end):
+    days, current = 0, start
+    while current <= end:
+        if current.weekday() not in calendar.weekend_days and not calendar.is_holiday(current):
+            days += 1
+        current += timedelta(days=1)
+    return days
+
+
+def test_prefix_counts_match_day_walk_across_years():
+    calendar = BusinessCalendar((4, 5), [
+        HolidayRule("اليوم الوطني", "gregorian", 9, 23, None, 1, None),
+        HolidayRule("عيد الفطر", "hijri", 10, 1, None, 4, None),
+        HolidayRule("إجازة نهاية السنة", "gregorian", 12, 30, 2025, 5, None),
+    ])
+    for start, end in [(date(2025, 1, 1), date(2025, 12, 31)), (date(2025, 3, 15), date(2027, 2, 3)),
+                       (date(2025, 12, 29), date(2026, 1, 6)), (date(2026, 5, 5), date(2026, 5, 5))]:
+        assert calendar.working_days(start, end) == _naive_working_days(calendar, start, end)
+    assert calendar.working_days(date(2026, 1, 2), date(2026, 1, 1)) == 0
+
+    # عيد الفطر 1447 هـ يبدأ 20 مارس 2026 (الجمعة)؛ الأحد 22 مارس عطلة وليس يوم عمل
+    assert calendar.is_holiday(date(2026, 3, 20))
+    assert not calendar.is_working_day(date(2026, 3, 22))
+    assert calendar.holidays_between(date(2026, 3, 1), date(2026, 3, 31)) == [date(2026, 3, 22), date(2026, 3, 23)]
+    # عطلة بدأت في 2025 وامتدت إلى 2026
+    assert calendar.is_holiday(date(2026, 1, 3))
+
+
+def test_department_rules_drive_leave_working_days(app):
+    sales, ops = Department(name="المبيعات"), Department(name="التشغيل")
+    employee = Employee(employee_id="E1", national_id="101", name="موظف", mobile="0500000000", job_title="محاسب")
+    other = Employee(employee_id="E2", national_id="102", name="موظف آخر", mobile="0500000001", job_title="سائق")
+    employee.departments.append(ops)
+    other.departments.append(sales)
+    db.session.add_all([sales, ops, employee, other])
+    db.session.commit()
+
+    week = (date(2026, 4, 5), date(2026, 4, 11))  # الأحد إلى السبت
+    service = LeaveService()
+    assert service.calculate_working_days(*week, employee_id=employee.id) == 5
+
+    db.session.add_all([
+        WeekendRule(department_id=ops.id, weekend_days="5"),
+        BusinessHoliday(name="عطلة القسم", calendar="gregorian", month=4, day=7, year=2026, department_id=ops.id),
+    ])
+    db.session.commit()
+
+    assert service.calculate_working_days(*week, employee_id=employee.id) == 5  # الجمعة يوم عمل، الثلاثاء عطلة
+    assert service.calculate_working_days(*week, employee_id=other.id) == 5
+    assert calendars.calendar_departments_for([employee.id, other.id]) == {employee.id: ops.id, other.id: None}
+    assert calendars.working_days_between(*week, department_id=ops.id) == 5
+    assert not calendars.get_calendar(ops.id).is_working_day(date(2026, 4, 7))
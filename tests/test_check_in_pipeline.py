@@ -0,0 +1,137 @@
+from datetime import date, datetime, time
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import event
+
+from core.extensions import db
+from core.principal_cache import EmployeePrincipal
+from models import Attendance, Department, Employee, EmployeeLocation, Geofence
+from modules.attendance.application import check_in_pipeline as pipeline
+
+DAY = date(2026, 3, 1)
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {"UPLOAD_FOLDER": str(tmp_path / "uploads")}
+
+
+@pytest.fixture
+def app(app):
+    pipeline.init_check_in_pipeline(app)
+    pipeline.invalidate_fence_cache()
+    pipeline.reset_check_in_stats()
+    return app
+
+
+def _employee():
+    department = Department(name="المشاريع")
+    employee = Employee(employee_id="E1", national_id="101", name="موظف", mobile="0500000000", job_title="فني")
+    db.session.add_all([department, employee])
+    db.session.flush()
+    employee.departments.append(department)
+    db.session.add(Geofence(name="الموقع أ", center_latitude=Decimal("24.7136"), center_longitude=Decimal("46.6753"),
+                            radius_meters=200, department_id=department.id, is_active=True))
+    db.session.commit()
+    return EmployeePrincipal.from_employee(employee)
+
+
+def _check_in(employee_pk, hour=8):
+    return pipeline.record_check_in(
+        employee_pk, DAY,
+        attendance={"check_in": time(hour, 0), "check_in_latitude": Decimal("24.7136")},
+        location={"latitude": Decimal("24.7136"), "longitude": Decimal("46.6753"), "accuracy": Decimal("10"),
+                  "recorded_at": datetime(2026, 3, 1, hour), "notes": "تسجيل حضور"},
+    )
+
+
+def _check_out(employee_pk):
+    return pipeline.record_check_out(
+        employee_pk, DAY,
+        attendance={"check_out": time(17, 0)},
+        location={"latitude": Decimal("24.7136"), "longitude": Decimal("46.6753"), "accuracy": Decimal("10"),
+                  "recorded_at": datetime(2026, 3, 1, 17), "notes": "تسجيل انصراف"},
+    )
+
+
+def test_fences_are_cached_until_a_geofence_changes(app):
+    principal = _employee()
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    fences = pipeline.eligible_fences(principal)
+    assert [f.name for f in fences] == ["الموقع أ"]
+    inside, fence, distance = pipeline.nearest_fence(fences, 24.7140, 46.6755)
+    assert inside and fence.radius == 200 and distance < 200
+    assert pipeline.nearest_fence(fences, 24.80, 46.70)[0] is False
+
+    statements.clear()
+    pipeline.eligible_fences(principal)
+    assert statements == []
+
+    geofence = Geofence.query.one()
+    geofence.radius_meters = 50
+    db.session.commit()
+    assert pipeline.eligible_fences(principal)[0].radius == 50
+
+
+def test_fences_follow_the_department_relationship_of_an_employee(app):
+    principal = _employee()
+    employee = db.session.get(Employee, principal.id)
+    assert [f.name for f in pipeline.eligible_fences(employee)] == ["الموقع أ"]
+
+    employee.departments.clear()
+    db.session.commit()
+    assert pipeline.eligible_fences(employee) == ()
+
+
+def test_check_in_is_recorded_once_per_day(app):
+    principal = _employee()
+    first = _check_in(principal.id)
+    assert first.ok and first.attendance_id
+
+    second = _check_in(principal.id, hour=9)
+    assert not second.ok and second.code == pipeline.CODE_ALREADY_CHECKED_IN
+    assert second.check_in == time(8, 0)
+
+    record = Attendance.query.one()
+    assert record.status == "present" and record.check_in == time(8, 0)
+    assert EmployeeLocation.query.count() == 1
+
+
+def test_check_in_fills_an_existing_absent_row(app):
+    principal = _employee()
+    db.session.add(Attendance(employee_id=principal.id, date=DAY, status="absent"))
+    db.session.commit()
+
+    result = _check_in(principal.id)
+    assert result.ok
+    record = Attendance.query.one()
+    assert record.id == result.attendance_id and record.status == "present"
+
+
+def test_check_out_requires_a_single_open_check_in(app):
+    principal = _employee()
+    assert _check_out(principal.id).code == pipeline.CODE_NO_CHECK_IN
+
+    _check_in(principal.id)
+    done = _check_out(principal.id)
+    assert done.ok and done.check_in == time(8, 0) and done.check_out == time(17, 0)
+
+    again = _check_out(principal.id)
+    assert again.code == pipeline.CODE_ALREADY_CHECKED_OUT and again.check_out == time(17, 0)
+    assert EmployeeLocation.query.count() == 2
+
+    stats = pipeline.get_check_in_stats()
+    assert stats["attendance_write"]["count"] == 4
+    assert stats["attendance_write"]["p50_ms"] <= stats["attendance_write"]["p99_ms"]
+
+
+def test_face_image_is_written_after_staging(app, tmp_path):
+    upload = SimpleNamespace(read=lambda: b"jpeg-bytes")
+    staged = pipeline.stage_face_image(upload, "E1", "check_in", datetime(2026, 3, 1, 8))
+    assert staged.relative_path == "uploads/attendance/check_in_E1_20260301_080000.jpg"
+    pipeline.write_face_image_async(staged).result()
+    assert (tmp_path / "uploads" / "attendance" / "check_in_E1_20260301_080000.jpg").read_bytes() == b"jpeg-bytes"
@@ -0,0 +1,95 @@
+import pytest
+
+from core.extensions import db
+from modules.drive_sync.application import drive_sync
+from modules.drive_sync.application.folder_cache import clear_folder_memory
+from modules.drive_sync.domain.models import DriveUpload
+
+
+class FakeDrive:
+    """بديل Drive في الذاكرة: يعد استدعاءات المجلدات والرفع."""
+
+    def __init__(self, fail_uploads=0):
+        self.folder_calls = []
+        self.uploads = []
+        self.fail_uploads = fail_uploads
+
+    def get_root_folder(self):
+        return "root"
+
+    def find_or_create_folder(self, name, parent_id):
+        self.folder_calls.append((parent_id, name))
+        return f"{parent_id}/{name}"
+
+    def stream_upload(self, path, folder_id, name):
+        if self.fail_uploads:
+            self.fail_uploads -= 1
+            raise IOError("connection reset")
+        self.uploads.append((path, folder_id, name))
+        file_id = f"file-{len(self.uploads)}"
+        return {"file_id": file_id, "file_name": name, "web_view_link": f"https://drive/{file_id}", "download_link": None}
+
+
+@pytest.fixture
+def app(app):
+    clear_folder_memory()
+    yield app
+    drive_sync.set_drive_client(None)
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_identical_files_uploaded_once_and_folders_cached(app, tmp_path):
+    drive = FakeDrive()
+    drive_sync.set_drive_client(drive)
+    a = _write(tmp_path, "a.jpg", b"same")
+    b = _write(tmp_path, "b.jpg", b"same")
+    c = _write(tmp_path, "c.pdf", b"other")
+
+    job = drive_sync.queue_record_upload("test_record", 1, ["ABC 123", "workshop", "2026-01-01"],
+                                         [("image", a), ("image", b), ("pdf", c)])
+    assert job.kind == drive_sync.DRIVE_SYNC_JOB
+    summary = drive_sync.sync_record("test_record", 1)
+
+    assert summary["uploaded"] == 3
+    assert len(drive.uploads) == 2
+    assert len(drive.folder_calls) == 3
+    links = {u.source: u.file_id for u in DriveUpload.query.all()}
+    assert links[a] == links[b]
+
+    # نفس المجلد والمحتوى لسجل آخر: لا استعلام مجلدات ولا رفع جديد
+    clear_folder_memory()
+    d = _write(tmp_path, "d.jpg", b"same")
+    drive_sync.queue_record_upload("test_record", 2, ["ABC 123", "workshop", "2026-01-01"], [("image", d)])
+    drive_sync.sync_record("test_record", 2)
+    assert len(drive.folder_calls) == 3
+    assert len(drive.uploads) == 2
+
+
+def test_failed_upload_is_retried(app, tmp_path):
+    drive = FakeDrive(fail_uploads=1)
+    drive_sync.set_drive_client(drive)
+    path = _write(tmp_path, "a.jpg", b"data")
+    drive_sync.queue_record_upload("test_record", 1, ["P"], [("image", path)])
+
+    with pytest.raises(drive_sync.DriveSyncError):
+        drive_sync.sync_record("test_record", 1, final_attempt=False)
+    upload = DriveUpload.query.one()
+    assert upload.status == "failed" and upload.attempts == 1
+
+    summary = drive_sync.sync_record("test_record", 1, final_attempt=False)
+    db.session.refresh(upload)
+    assert summary == {"uploaded": 1, "pending": 0, "missing": 0}
+    assert upload.status == "done" and upload.attempts == 2
+
+
+def test_missing_local_file_is_not_retried(app, tmp_path):
+    drive_sync.set_drive_client(FakeDrive())
+    drive_sync.queue_record_upload("test_record", 1, ["P"], [("image", str(tmp_path / "gone.jpg"))])
+    summary = drive_sync.sync_record("test_record", 1, final_attempt=False)
+    assert summary["missing"] == 1
+    assert DriveUpload.query.one().status == "missing"
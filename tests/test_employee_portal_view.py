@@ -0,0 +1,159 @@
+import json
+from datetime import date, datetime, time
+
+import pytest
+from sqlalchemy import event
+
+from core.cache import get_cache
+from core.extensions import db
+from models import Employee, Vehicle, VehicleHandover, VehicleRental, VehicleSafetyCheck
+from modules.attendance.application import check_in_pipeline
+from modules.employees.application import portal_view_service as portal
+from modules.vehicles.application import vehicle_custody_service as custody
+from modules.vehicles.application.custody_events import register_custody_listeners
+
+
+@pytest.fixture
+def app_config():
+    return {"EMPLOYEE_PORTAL_CACHE_TTL": 60}
+
+
+@pytest.fixture
+def app(app):
+    if not custody._state["listeners"]:
+        register_custody_listeners()
+        custody._state["listeners"] = True
+    portal.init_employee_portal(app)
+    portal.invalidate_portal_cache()
+    return app
+
+
+def _fleet(count):
+    driver = Employee(employee_id="E1", national_id="101", name="سائق", mobile="0500000000", job_title="سائق")
+    vehicles = [Vehicle(plate_number=f"{i} أ ب", make="تويوتا", model="هايلكس", year=2022, color="أبيض",
+                        type_of_car="سيارة نقل") for i in range(count)]
+    db.session.add_all([driver, *vehicles])
+    db.session.commit()
+    for vehicle in vehicles:
+        for day in range(1, 8):
+            db.session.add(VehicleHandover(vehicle_id=vehicle.id, employee_id=driver.id, person_name=driver.name,
+                                           handover_type="delivery", handover_date=date(2026, 1, day),
+                                           mileage=1000, fuel_level="full"))
+            db.session.add(VehicleSafetyCheck(vehicle_id=vehicle.id, check_date=date(2026, 1, day),
+                                              check_type="daily", driver_name=driver.name, supervisor_name="مشرف"))
+    db.session.add(VehicleRental(vehicle_id=vehicles[0].id, start_date=date(2026, 1, 1), monthly_cost=1500,
+                                 is_active=True))
+    db.session.commit()
+    return driver, vehicles
+
+
+def _count_queries():
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_vehicles_view_uses_constant_queries(app):
+    driver, vehicles = _fleet(4)
+    driver_id, vehicle_ids = driver.id, [v.id for v in vehicles]
+    statements = _count_queries()
+    view = portal.get_vehicles_view(driver_id)
+    first_count = len(statements)
+
+    assert [v.id for v in view["current_driver_vehicles"]] == vehicle_ids
+    current = view["current_driver_vehicles"][0]
+    assert len(current.handovers) == portal.HANDOVERS_PER_VEHICLE
+    assert current.handovers[0].handover_date == date(2026, 1, 7)
+    assert [c.check_date.day for c in current.safety_checks] == [7, 6, 5]
+    assert view["stats"]["total_operations"] == 28 and view["stats"]["total_safety_checks"] == 28
+    rented, rental = view["rented_vehicles"][0]
+    assert rented.id == vehicle_ids[0] and rental.monthly_cost == 1500
+
+    # عدد الاستعلامات لا يتغير بعدد المركبات
+    for i in range(4, 8):
+        vehicle = Vehicle(plate_number=f"{i} أ ب", make="نيسان", model="صني", year=2021, color="أبيض",
+                          type_of_car="سيارة عادية")
+        db.session.add(vehicle)
+        db.session.flush()
+        db.session.add(VehicleHandover(vehicle_id=vehicle.id, employee_id=driver_id, person_name="سائق",
+                                       handover_type="delivery", handover_date=date(2026, 2, 1), mileage=1,
+                                       fuel_level="full"))
+    db.session.commit()
+    statements.clear()
+    assert len(portal.get_vehicles_view(driver_id)["current_driver_vehicles"]) == 8
+    assert len(statements) == first_count
+
+
+def test_view_does_not_touch_vehicle_relationships(app):
+    driver, vehicles = _fleet(1)
+    portal.get_vehicles_view(driver.id)
+    db.session.commit()
+    assert VehicleSafetyCheck.query.count() == 7
+    assert len(db.session.get(Vehicle, vehicles[0].id).safety_checks) == 7
+
+
+def test_cache_is_cleared_when_records_change(app):
+    driver, vehicles = _fleet(1)
+    statements = _count_queries()
+    portal.get_dashboard_view(driver.id)
+    statements.clear()
+    assert portal.get_dashboard_view(driver.id)["stats"]["assigned_vehicles_count"] == 1
+    assert statements == []
+
+    db.session.add(VehicleHandover(vehicle_id=vehicles[0].id, person_name="مستلم آخر", handover_type="delivery",
+                                   handover_date=date(2026, 3, 1), mileage=2000, fuel_level="full"))
+    db.session.commit()
+    assert portal.get_dashboard_view(driver.id)["stats"]["assigned_vehicles_count"] == 0
+
+
+def test_cached_view_keeps_snapshot_types(app):
+    driver, vehicles = _fleet(1)
+    fresh = portal.get_vehicles_view(driver.id)
+    cached = portal.get_vehicles_view(driver.id)
+    assert cached == fresh
+    assert portal._decode(json.loads(json.dumps(portal._encode(fresh)))) == fresh  # نفس الصيغة عبر Redis
+    handover = cached["current_driver_vehicles"][0].handovers[0]
+    assert handover.handover_date == date(2026, 1, 7) and isinstance(handover.created_at, datetime)
+    rented, rental = cached["rented_vehicles"][0]
+    assert rented.id == vehicles[0].id and rental.start_date == date(2026, 1, 1)
+
+
+def test_invalidation_waits_for_commit(app):
+    driver, vehicles = _fleet(1)
+    driver_id = driver.id
+    portal.get_dashboard_view(driver_id)
+    db.session.add(VehicleHandover(vehicle_id=vehicles[0].id, person_name="مستلم آخر", handover_type="delivery",
+                                   handover_date=date(2026, 3, 1), mileage=2000, fuel_level="full"))
+    db.session.flush()
+    assert portal.get_dashboard_view(driver_id)["stats"]["assigned_vehicles_count"] == 1
+    db.session.rollback()
+    assert portal.get_dashboard_view(driver_id)["stats"]["assigned_vehicles_count"] == 1
+    assert db.session.info.get(portal._PENDING_KEY) is None
+
+
+def test_employee_change_keeps_other_views_and_generation(app):
+    driver, _ = _fleet(1)
+    other = Employee(employee_id="E2", national_id="102", name="آخر", mobile="0500000001", job_title="فني")
+    db.session.add(other)
+    db.session.commit()
+    driver_id, other_id = driver.id, other.id
+    portal.get_dashboard_view(driver_id)
+    portal.get_dashboard_view(other_id)
+    generation = get_cache().get(portal.GENERATION_KEY)
+
+    portal.invalidate_portal_cache(driver_id)
+    assert get_cache().get(portal.GENERATION_KEY) == generation
+    assert get_cache().get(portal._cache_key(generation, portal.PAGE_DASHBOARD, driver_id)) is None
+    assert get_cache().get(portal._cache_key(generation, portal.PAGE_DASHBOARD, other_id)) is not None
+
+
+def test_core_check_in_refreshes_the_dashboard(app):
+    driver, _ = _fleet(1)
+    driver_id = driver.id
+    assert portal.get_dashboard_view(driver_id)["stats"]["monthly_attendance_days"] == 0
+    written = check_in_pipeline.record_check_in(
+        driver_id, date.today(), attendance={"check_in": time(8, 0)},
+        location={"latitude": 24.7, "longitude": 46.6, "accuracy": 10, "recorded_at": datetime.now(), "notes": ""},
+    )
+    assert written.ok
+    assert portal.get_dashboard_view(driver_id)["stats"]["monthly_attendance_days"] == 1
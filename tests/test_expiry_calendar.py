@@ -0,0 +1,69 @@
+from datetime import date, timedelta
+
+from core.extensions import db
+from models import BackgroundJob, Notification, User, Vehicle
+from modules.expiry.application import expiry_calendar_service as expiry
+from modules.expiry.domain.models import ExpiryCalendarEntry, bucket_for
+from modules.jobs.application import job_queue as jobs
+from modules.jobs.domain.models import JOB_DONE
+
+TODAY = date(2026, 3, 10)
+
+
+def _entry(entity_id, days):
+    expiry_date = TODAY + timedelta(days=days)
+    db.session.add(ExpiryCalendarEntry(entity_type=expiry.ENTITY_DOCUMENT, entity_id=entity_id, doc_type="passport",
+                                       doc_label="جواز السفر", owner_label=f"موظف {entity_id}",
+                                       expiry_date=expiry_date, bucket=bucket_for(expiry_date, TODAY)))
+
+
+def _notified():
+    return sorted(entity_id for (entity_id,) in db.session.query(Notification.related_entity_id))
+
+
+def test_long_expired_documents_are_not_renotified(app):
+    db.session.add_all([User(email="a@example.com", role="admin"), User(email="b@example.com", role="admin")])
+    _entry(1, -400)  # منتهية منذ أكثر من سنة
+    _entry(2, -3)
+    _entry(3, 5)
+    _entry(4, 45)  # خارج نافذة الثلاثين يوماً
+    db.session.commit()
+
+    assert expiry.dispatch_expiry_notifications(today=TODAY) == 4
+    assert _notified() == [2, 2, 3, 3]
+    # نفس اليوم: لا تكرار
+    assert expiry.dispatch_expiry_notifications(today=TODAY) == 0
+
+    # بعد انقضاء نافذة الرجوع لا تعود الوثيقة المنتهية إلى الإشعارات
+    later = TODAY + timedelta(days=expiry.NOTIFY_LOOKBACK_DAYS)
+    assert expiry.dispatch_expiry_notifications(today=later) == 2
+    assert _notified() == [2, 2, 3, 3, 3, 3]
+
+
+def test_each_run_is_capped(app):
+    db.session.add(User(email="a@example.com", role="admin"))
+    for entity_id in range(1, 6):
+        _entry(entity_id, entity_id)
+    db.session.commit()
+
+    assert expiry.dispatch_expiry_notifications(today=TODAY, max_entries=3) == 3
+    assert _notified() == [1, 2, 3]
+
+
+def test_empty_calendar_is_built_by_one_queued_job(app, monkeypatch):
+    monkeypatch.setitem(expiry._state, "listeners", True)  # بلا أحداث: الجدول يبقى فارغاً حتى البناء
+    db.session.add(Vehicle(plate_number="100", make="تويوتا", model="هايلكس", year=2022, color="أبيض",
+                           type_of_car="سيارة نقل", authorization_expiry_date=TODAY))
+    db.session.commit()
+
+    expiry.init_expiry_calendar(app)
+    expiry.init_expiry_calendar(app)  # عملية أخرى تقلع معاً
+    [job] = BackgroundJob.query.filter_by(kind=expiry.REBUILD_JOB).all()
+    assert job.idempotency_key == expiry.REBUILD_KEY and ExpiryCalendarEntry.query.count() == 0
+
+    job_id = job.id
+    jobs.run_job(jobs._claim_next_job("w1"))
+    assert jobs.get_job(job_id).status == JOB_DONE
+    assert [(e.entity_type, e.doc_type) for e in ExpiryCalendarEntry.query.all()] == [
+        (expiry.ENTITY_VEHICLE, "authorization")
+    ]
@@ -0,0 +1,141 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import event
+
+from core.extensions import db
+from models import Employee, EmployeeLocation, Vehicle, VehicleFuelConsumption, VehicleTelemetryDaily
+from modules.vehicles.application import fleet_telemetry_service as telemetry
+
+
+def test_haversine_matches_known_distance():
+    # الرياض -> جدة تقريباً 846 كم
+    assert telemetry.haversine_km([24.7136], [46.6753], [21.4858], [39.1925])[0] == pytest.approx(846, rel=0.01)
+    assert telemetry.haversine_km(np.zeros(3), np.zeros(3), np.zeros(3), np.zeros(3)).tolist() == [0, 0, 0]
+
+
+def test_summarize_track_splits_driving_idle_and_speeding():
+    start = datetime(2026, 5, 1, 23, 50)
+    # نقطة كل دقيقة شرقاً: 2.5 كم/دقيقة = 150 كم/س، ثم توقف، ثم عبور منتصف الليل
+    times = [start + timedelta(minutes=i) for i in range(6)] + [start + timedelta(minutes=11)]
+    lons = [46.0 + 0.0248 * min(i, 3) for i in range(6)] + [46.0 + 0.0248 * 3]
+    speeds = [None, None, None, None, 0, 0, 0]
+    days = telemetry.summarize_track(times, [24.0] * 7, lons, speeds)
+
+    first, second = days[date(2026, 5, 1)], days[date(2026, 5, 2)]
+    assert first["points"] == 6 and second["points"] == 1
+    assert first["distance_km"] == pytest.approx(7.5, rel=0.02)
+    assert first["driving_seconds"] == 180 and first["idle_seconds"] == 120
+    assert first["speeding_events"] == 1 and first["max_speed_kmh"] > 140
+    assert second["idle_seconds"] == 360 and second["last_point_at"] == times[-1]
+
+    # التشغيل التالي يكمل من آخر نقطة محفوظة دون عدّها مرة أخرى
+    carry = (times[-1], 24.0, lons[-1], 0)
+    more = telemetry.summarize_track([times[-1] + timedelta(minutes=1)], [24.0], [lons[-1] + 0.0248], [None], carry)
+    assert more[date(2026, 5, 2)]["points"] == 1
+    assert more[date(2026, 5, 2)]["distance_km"] == pytest.approx(2.5, rel=0.02)
+
+
+def test_rollup_is_incremental_and_fuel_is_reconciled(app):
+    vehicle = Vehicle(plate_number="5678 د هـ و", make="نيسان", model="نافارا", year=2023, color="أبيض",
+                      type_of_car="سيارة نقل")
+    driver = Employee(employee_id="E1", national_id="101", name="سائق", mobile="0500000000", job_title="سائق")
+    db.session.add_all([vehicle, driver])
+    db.session.commit()
+
+    day = datetime(2026, 5, 3, 8, 0)
+
+    def _points(minutes):
+        db.session.add_all([
+            EmployeeLocation(employee_id=driver.id, vehicle_id=vehicle.id, latitude=24.0,
+                             longitude=46.0 + 0.01 * m, speed_kmh=60, recorded_at=day + timedelta(minutes=m))
+            for m in minutes
+        ])
+        db.session.commit()
+
+    _points(range(0, 10))
+    assert telemetry.rollup_locations() == 1
+    _points(range(10, 20))
+    telemetry.rollup_locations()
+    telemetry.rollup_locations()  # بلا نقاط جديدة: لا تغيير
+
+    row = db.session.get(VehicleTelemetryDaily, (vehicle.id, day.date()))
+    assert row.points == 20
+    assert row.distance_km == pytest.approx(19 * 1.017, rel=0.02)
+    assert row.driving_seconds == 19 * 60
+
+    db.session.add_all([
+        VehicleFuelConsumption(vehicle_id=vehicle.id, date=date(2026, 5, 1), liters=40, cost=90,
+                               kilometer_reading=10000),
+        VehicleFuelConsumption(vehicle_id=vehicle.id, date=date(2026, 5, 3), liters=5, cost=11,
+                               kilometer_reading=10100),
+    ])
+    db.session.commit()
+    assert telemetry.reconcile_fuel(date(2026, 5, 1), date(2026, 5, 3)) == 2
+    db.session.expire_all()
+
+    row = db.session.get(VehicleTelemetryDaily, (vehicle.id, day.date()))
+    assert row.odometer_delta_km == 100 and row.km_per_liter == 20.0
+    assert row.anomaly == "gps_mismatch"  # العداد 100 كم بينما GPS نحو 19 كم
+    assert db.session.get(VehicleTelemetryDaily, (vehicle.id, date(2026, 5, 1))).fuel_liters == 40
+
+    summary = telemetry.get_fleet_summary(date(2026, 5, 1), date(2026, 5, 31))
+    assert summary[0]["vehicle_id"] == vehicle.id and summary[0]["anomalies"] == 1
+
+
+def test_rollup_reads_only_points_after_the_watermark(app, monkeypatch):
+    vehicle = Vehicle(plate_number="1111 أ ب ج", make="نيسان", model="نافارا", year=2023, color="أبيض",
+                      type_of_car="سيارة نقل")
+    driver = Employee(employee_id="E1", national_id="101", name="سائق", mobile="0500000000", job_title="سائق")
+    db.session.add_all([vehicle, driver])
+    db.session.commit()
+    start = datetime(2026, 5, 3, 8, 0)
+    db.session.add_all([
+        EmployeeLocation(employee_id=driver.id, vehicle_id=vehicle.id, latitude=24.0, longitude=46.0 + 0.01 * m,
+                         speed_kmh=60, recorded_at=start + timedelta(minutes=m))
+        for m in range(12)
+    ])
+    db.session.commit()
+    db.session.add(VehicleTelemetryDaily(vehicle_id=vehicle.id, day=start.date(), points=10,
+                                         first_point_at=start, last_point_at=start + timedelta(minutes=9),
+                                         last_latitude=24.0, last_longitude=46.09, last_speed_kmh=60))
+    db.session.commit()
+
+    seen = []
+    summarize = telemetry.summarize_track
+    monkeypatch.setattr(telemetry, "summarize_track",
+                        lambda times, *args: seen.append(list(times)) or summarize(times, *args))
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    telemetry.rollup_locations()
+
+    # العلامة في شرط الاستعلام نفسه لا في تصفية بايثون بعد جلب كل النقاط
+    points_query = next(s for s in statements if "FROM employee_locations" in s and "speed_kmh" in s)
+    assert "employee_locations.recorded_at >" in points_query
+    assert seen == [[start + timedelta(minutes=10), start + timedelta(minutes=11)]]
+    db.session.expire_all()
+    assert db.session.get(VehicleTelemetryDaily, (vehicle.id, start.date())).points == 12
+
+
+class _RecordingConnection:
+    def __init__(self, dialect):
+        self.dialect = type("Dialect", (), {"name": dialect})()
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return type("Result", (), {"scalar": lambda self: 1})()
+
+
+def test_rollup_lock_is_taken_per_dialect():
+    pg = _RecordingConnection("postgresql")
+    with telemetry._telemetry_lock(pg):
+        pass
+    assert pg.statements == ["SELECT pg_advisory_xact_lock(:key)"]
+
+    mysql = _RecordingConnection("mysql")
+    with pytest.raises(ValueError):
+        with telemetry._telemetry_lock(mysql):
+            raise ValueError("rollup failed")
+    assert mysql.statements == ["SELECT GET_LOCK(:name, :timeout)", "SELECT RELEASE_LOCK(:name)"]
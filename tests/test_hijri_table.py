@@ -0,0 +1,50 @@
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from hijri_converter import convert
+
+from utils import hijri_table
+from utils.date_converter import format_date_hijri, parse_date
+from utils.hijri_converter import convert_gregorian_to_hijri, convert_hijri_to_gregorian
+
+
+def test_table_matches_library_across_supported_range():
+    first, last = hijri_table.supported_range()
+    assert (first, last) == (date(1924, 8, 1), date(2077, 11, 16))
+    day = first
+    while day <= last:
+        expected = convert.Gregorian(day.year, day.month, day.day).to_hijri()
+        hijri = hijri_table.to_hijri(day)
+        assert hijri == (expected.year, expected.month, expected.day), day
+        assert hijri_table.from_hijri(*hijri) == day
+        day += timedelta(days=1)
+    assert hijri_table.to_hijri(first - timedelta(days=1)) is None
+    assert hijri_table.to_hijri(last + timedelta(days=1)) is None
+
+
+def test_invalid_hijri_dates_are_rejected():
+    assert hijri_table.from_hijri(1447, 13, 1) is None
+    assert hijri_table.from_hijri(1447, 1, 31) is None
+    assert hijri_table.from_hijri(1200, 1, 1) is None
+    assert convert_hijri_to_gregorian(1447, 9, 1) == date(2026, 2, 18)
+    assert convert_gregorian_to_hijri(datetime(2026, 2, 18, 9, 30)).month_name("ar") == "رمضان"
+
+
+def test_vectorized_conversion_handles_series_and_missing_values():
+    series = pd.Series(pd.to_datetime(["2026-03-01", None, "2026-03-01", "1900-01-01"]))
+    years, months, days = hijri_table.to_hijri_array(series)
+    assert years.tolist() == [1447, 0, 1447, 0]
+    assert (months[0], days[0]) == (9, 12)
+    assert hijri_table.hijri_strings(series) == ["12/9/1447 هـ", "", "12/9/1447 هـ", ""]
+
+    mixed = [date(2026, 3, 1), None, float("nan"), datetime(2026, 3, 2, 23, 59)]
+    assert hijri_table.hijri_strings(mixed, "full") == ["12 رمضان 1447 هـ", "", "", "13 رمضان 1447 هـ"]
+    assert hijri_table.hijri_strings(np.array([], dtype="datetime64[D]")) == []
+
+
+def test_formatters_use_the_table():
+    assert format_date_hijri(date(2026, 3, 1)) == "12/9/1447 هـ"
+    assert format_date_hijri(None) == ""
+    assert hijri_table.hijri_filter(date(2026, 3, 1), "iso") == "1447-09-12"
+    assert parse_date("12/9/1447 هـ") == date(2026, 3, 1)
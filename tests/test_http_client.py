@@ -0,0 +1,107 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from core.http_client import IntegrationConfig, OutboundClient, CircuitOpenError
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    statuses = []
+    calls = []
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        type(self).calls.append((self.command, self.client_address[1]))
+        status = type(self).statuses.pop(0) if type(self).statuses else 200
+        body = b'{"ok": true}'
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    _StubHandler.statuses = []
+    _StubHandler.calls = []
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}'
+    server.shutdown()
+    server.server_close()
+
+
+def _client(**overrides):
+    config = dict(timeout=5, max_retries=2, backoff_base=0.01, backoff_max=0.02,
+                  failure_threshold=3, reset_timeout=60)
+    config.update(overrides)
+    return OutboundClient('stub', IntegrationConfig(**config))
+
+
+def test_reuses_keep_alive_connection(stub_url):
+    client = _client()
+    for _ in range(3):
+        assert client.get(f'{stub_url}/ping').status_code == 200
+    ports = {port for _, port in _StubHandler.calls}
+    assert len(ports) == 1
+    assert client.histogram.snapshot()['count'] == 3
+
+
+def test_retries_idempotent_calls_only(stub_url):
+    client = _client()
+    _StubHandler.statuses = [503, 200]
+    assert client.get(f'{stub_url}/x').status_code == 200
+    assert len(_StubHandler.calls) == 2
+
+    _StubHandler.statuses = [503, 200]
+    assert client.post(f'{stub_url}/x', json={}).status_code == 503
+    assert len(_StubHandler.calls) == 3
+
+
+def test_circuit_opens_after_consecutive_failures(stub_url):
+    client = _client(max_retries=0)
+    _StubHandler.statuses = [500, 500, 500]
+    for _ in range(3):
+        assert client.get(f'{stub_url}/x').status_code == 500
+    with pytest.raises(CircuitOpenError):
+        client.get(f'{stub_url}/x')
+    assert isinstance(CircuitOpenError('x'), requests.RequestException)
+    assert client.breaker.state == 'open'
+    assert len(_StubHandler.calls) == 3
+
+
+def test_half_open_trial_ends_on_any_request_error(stub_url, monkeypatch):
+    client = _client(max_retries=0, failure_threshold=1, reset_timeout=0.05)
+    _StubHandler.statuses = [500]
+    client.get(f'{stub_url}/x')
+    assert client.breaker.state == 'open'
+
+    time.sleep(0.06)
+    request = client.session.request
+
+    def redirect_loop(*args, **kwargs):
+        raise requests.TooManyRedirects()
+
+    monkeypatch.setattr(client.session, 'request', redirect_loop)
+    with pytest.raises(requests.TooManyRedirects):
+        client.get(f'{stub_url}/x')
+    assert client.breaker.state == 'open'
+
+    time.sleep(0.06)
+    monkeypatch.setattr(client.session, 'request', request)
+    assert client.get(f'{stub_url}/x').status_code == 200
+    assert client.breaker.state == 'closed'
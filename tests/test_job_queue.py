@@ -0,0 +1,121 @@
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from core.extensions import db
+from models import Department
+from modules.jobs.application import job_queue as jobs
+from modules.jobs.domain.models import JOB_CANCELLED, JOB_DONE, JOB_QUEUED, JOB_RUNNING, BackgroundJob
+
+TEST_JOB = "tests.job"
+_steps = {}
+
+
+@jobs.job_handler(TEST_JOB)
+def _run_test_job(ctx, step="noop"):
+    return _steps[step](ctx)
+
+
+def _set_heartbeat(job_id, when):
+    t = BackgroundJob.__table__
+    with db.engine.begin() as conn:
+        conn.execute(update(t).where(t.c.id == job_id).values(heartbeat_at=when))
+
+
+def _status(job_id):
+    db.session.expire_all()
+    return jobs.get_job(job_id).status
+
+
+def test_stale_job_is_requeued_and_old_worker_cannot_finish(app):
+    job_id = jobs.enqueue(TEST_JOB, max_attempts=2).id
+    first = jobs._claim_next_job("w1")
+    _set_heartbeat(job_id, datetime.utcnow() - timedelta(seconds=jobs.LEASE_SECONDS + 1))
+
+    assert jobs.requeue_stale_jobs() == 1
+    assert _status(job_id) == JOB_QUEUED
+    second = jobs._claim_next_job("w2")
+    assert second["id"] == job_id and second["attempts"] == 2
+
+    # العامل القديم فقد الحجز: لا تحديث ولا نتيجة باسمه
+    stale = jobs.JobContext(job_id, TEST_JOB, first["attempts"], worker_id="w1")
+    with pytest.raises(jobs.JobLeaseLost):
+        stale.update(progress=50)
+    assert jobs._finish(job_id, "w1", status=JOB_DONE) is False
+    assert _status(job_id) == JOB_RUNNING
+
+    _steps["noop"] = lambda ctx: "ok"
+    jobs.run_job(second)
+    job = jobs.get_job(job_id)
+    assert job.status == JOB_DONE and job.result == "ok" and job.worker_id == "w2"
+
+
+def test_heartbeat_renews_the_lease_during_long_steps(app, monkeypatch):
+    monkeypatch.setattr(jobs, "HEARTBEAT_SECONDS", 0.05)
+
+    def long_step(ctx):
+        _set_heartbeat(ctx.id, datetime.utcnow() - timedelta(seconds=jobs.LEASE_SECONDS + 1))
+        time.sleep(0.3)  # خطوة طويلة بلا ctx.update
+        return jobs.requeue_stale_jobs()
+
+    _steps["long"] = long_step
+    job_id = jobs.enqueue(TEST_JOB, {"step": "long"}).id
+    jobs.run_job(jobs._claim_next_job("w1"))
+    job = jobs.get_job(job_id)
+    assert job.status == JOB_DONE and job.result == 0
+
+
+def test_cancel_queued_and_running_jobs(app):
+    queued = jobs.enqueue(TEST_JOB)
+    assert jobs.cancel_job(queued.id).status == JOB_CANCELLED
+    assert jobs._claim_next_job("w1") is None
+
+    def cancelled_midway(ctx):
+        jobs.cancel_job(ctx.id)
+        ctx.update(progress=40)
+        ctx.check_cancelled()
+        return "unreachable"
+
+    _steps["cancel"] = cancelled_midway
+    job_id = jobs.enqueue(TEST_JOB, {"step": "cancel"}).id
+    jobs.run_job(jobs._claim_next_job("w1"))
+    job = jobs.get_job(job_id)
+    assert job.status == JOB_CANCELLED and job.progress == 40 and job.result is None
+
+
+def test_idempotency_key_is_reused_while_active_then_released(app):
+    first_id = jobs.enqueue(TEST_JOB, idempotency_key="payslips:2026-03").id
+    assert jobs.enqueue(TEST_JOB, idempotency_key="payslips:2026-03").id == first_id
+
+    _steps["noop"] = lambda ctx: None
+    jobs.run_job(jobs._claim_next_job("w1"))
+    again = jobs.enqueue(TEST_JOB, idempotency_key="payslips:2026-03")
+    assert again.id != first_id and again.status == JOB_QUEUED
+    assert jobs.get_job(first_id).idempotency_key is None
+
+
+def test_idempotency_race_keeps_the_callers_pending_rows(app, monkeypatch):
+    # طلب آخر أدرج المفتاح بعد أن تحقق هذا الطلب من عدم وجوده
+    with db.engine.begin() as conn:
+        conn.execute(BackgroundJob.__table__.insert().values(
+            id="other", kind=TEST_JOB, status=JOB_QUEUED, payload={}, state={}, attempts=0, max_attempts=1,
+            idempotency_key="drive:uploads", run_after=datetime.utcnow(),
+        ))
+    lookup = jobs._job_for_key
+    lookups = []
+
+    def stale_first_lookup(key):
+        lookups.append(key)
+        return lookup(key) if len(lookups) > 1 else None
+
+    monkeypatch.setattr(jobs, "_job_for_key", stale_first_lookup)
+
+    db.session.add(Department(name="المشاريع"))
+    job = jobs.enqueue(TEST_JOB, idempotency_key="drive:uploads")
+
+    assert job.id == "other" and len(lookups) == 2
+    db.session.expire_all()
+    assert [d.name for d in Department.query.all()] == ["المشاريع"]
+    assert BackgroundJob.query.count() == 1
@@ -0,0 +1,62 @@
+from datetime import date
+
+from core.extensions import db
+from models import Employee
+from modules.payroll.application.payslip_dispatch import RESULT_LINK, RESULT_SENT
+from modules.payroll.domain.models import PayrollRecord, PayslipDispatchResult
+from routes.admin import payroll_admin
+
+EMPLOYEES = 60
+
+
+class FakeJob:
+    def __init__(self):
+        self.state = {}
+
+    def update(self, **values):
+        self.state.update(values)
+
+    def is_cancelled(self):
+        return False
+
+    def check_cancelled(self):
+        pass
+
+
+def _payroll():
+    employees = [Employee(employee_id=f"E{i}", national_id=f"1{i:04d}", name=f"موظف {i}", mobile=f"05{i:08d}",
+                          job_title="فني") for i in range(EMPLOYEES)]
+    db.session.add_all(employees)
+    db.session.flush()
+    db.session.add_all([
+        PayrollRecord(employee_id=employee.id, pay_period_year=2026, pay_period_month=3,
+                      pay_period_start=date(2026, 3, 1), pay_period_end=date(2026, 3, 31), basic_salary=5000)
+        for employee in employees
+    ])
+    db.session.commit()
+
+
+def _run_whatsapp():
+    job = FakeJob()
+    result = payroll_admin._send_payslips_email_job(job, 3, 2026, None, None, "whatsapp", None, None)
+    return job, result
+
+
+def test_whatsapp_links_are_all_returned_and_regenerated_on_rerun(app, monkeypatch):
+    monkeypatch.setattr(payroll_admin, "_build_secure_payslip_url",
+                        lambda employee, month, year: f"https://example.com/payslip/{employee.id}")
+    _payroll()
+
+    job, result = _run_whatsapp()
+    assert result == {"sent": EMPLOYEES, "failed": 0, "skipped": 0}
+    links = job.state["whatsapp_links"]
+    assert len(links) == EMPLOYEES
+    assert {row["employee_id"] for row in links} == {f"E{i}" for i in range(EMPLOYEES)}
+    assert links[0]["link"].startswith("https://wa.me/966")
+
+    # الرابط ليس تسليماً: لا يُسجل كمرسل، فإعادة التشغيل تعيد كل الروابط
+    statuses = {status for (status,) in db.session.query(PayslipDispatchResult.status)}
+    assert statuses == {RESULT_LINK} and RESULT_SENT not in statuses
+    job, result = _run_whatsapp()
+    assert result["skipped"] == 0 and len(job.state["whatsapp_links"]) == EMPLOYEES
+    assert PayslipDispatchResult.query.count() == EMPLOYEES
@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from sqlalchemy import event
+
+from core import principal_cache
+from core.extensions import db
+from models import Department, Employee
+
+SECRET = "test-secret"
+
+
+@pytest.fixture
+def app(app):
+    principal_cache.reset_principal_cache()
+    yield app
+    principal_cache.reset_principal_cache()
+
+
+@pytest.fixture
+def employee(app):
+    employee = Employee(employee_id="5216", national_id="1000000001", name="أحمد", mobile="0500000000",
+                        job_title="سائق", status="active")
+    db.session.add(employee)
+    db.session.commit()
+    return employee
+
+
+def _token(employee_id="5216", minutes=60):
+    return jwt.encode({"employee_id": employee_id, "exp": datetime.utcnow() + timedelta(minutes=minutes)},
+                      SECRET, algorithm="HS256")
+
+
+def _count_queries():
+    counter = {"n": 0}
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        counter["n"] += 1
+
+    event.listen(db.engine, "before_cursor_execute", _on_execute)
+    return counter
+
+
+def test_repeat_calls_skip_database(app, employee):
+    token = _token()
+    _, principal = principal_cache.resolve_principal(token, SECRET)
+    assert principal.employee_id == "5216" and principal.is_active
+
+    queries = _count_queries()
+    for _ in range(5):
+        _, cached = principal_cache.resolve_principal(token, SECRET)
+    assert cached == principal
+    assert queries["n"] == 0
+    stats = principal_cache.get_principal_cache_stats()
+    assert stats["hits"] == 5 and stats["misses"] == 1
+
+
+def test_status_and_department_changes_invalidate(app, employee):
+    token = _token()
+    principal_cache.resolve_principal(token, SECRET)
+
+    employee.status = "inactive"
+    db.session.commit()
+    _, principal = principal_cache.resolve_principal(token, SECRET)
+    assert not principal.is_active
+
+    department = Department(name="العمليات")
+    db.session.add(department)
+    employee.departments.append(department)
+    db.session.commit()
+    _, principal = principal_cache.resolve_principal(token, SECRET)
+    assert principal.department_ids == (department.id,)
+    assert principal_cache.get_principal_cache_stats()["hits"] == 0
+
+
+def test_invalid_and_expired_tokens_are_not_cached(app, employee):
+    with pytest.raises(jwt.ExpiredSignatureError):
+        principal_cache.resolve_principal(_token(minutes=-1), SECRET)
+    with pytest.raises(jwt.InvalidTokenError):
+        principal_cache.resolve_principal(_token(), "other-secret")
+    _, principal = principal_cache.resolve_principal(_token(employee_id="missing"), SECRET)
+    assert principal is None
+    assert principal_cache.get_principal_cache_stats()["size"] == 0
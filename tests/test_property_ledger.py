@@ -0,0 +1,87 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import delete
+
+from core.extensions import db
+from models import BackgroundJob, PropertyLedgerContract, PropertyLedgerEntry, PropertyPayment, RentalProperty
+from modules.jobs.application import job_queue as jobs
+from modules.properties.application import property_ledger_service as ledger
+from modules.properties.application.ledger_events import register_ledger_listeners
+
+
+@pytest.fixture
+def app(app):
+    if not ledger._state["listeners"]:
+        register_ledger_listeners()
+        ledger._state["listeners"] = True
+    return app
+
+
+def _property(start, end, method="quarterly", rent=12000, **kwargs):
+    prop = RentalProperty(city="الرياض", address="حي النخيل", owner_name="مالك", owner_id="شقة",
+                          contract_start_date=start, contract_end_date=end, annual_rent_amount=rent,
+                          payment_method=method, **kwargs)
+    db.session.add(prop)
+    db.session.commit()
+    return prop
+
+
+def test_schedule_follows_payment_method():
+    schedule = ledger.instalment_schedule(date(2026, 1, 31), date(2026, 12, 31), "quarterly", 12000)
+    assert [d for d, _ in schedule] == [date(2026, 1, 31), date(2026, 4, 30), date(2026, 7, 31), date(2026, 10, 31)]
+    assert {amount for _, amount in schedule} == {3000}
+
+
+def test_payments_maintain_instalments_on_write(app):
+    today = date.today()
+    prop = _property(today - timedelta(days=200), today + timedelta(days=160))
+    entries = PropertyLedgerEntry.query.order_by(PropertyLedgerEntry.seq).all()
+    assert [e.status for e in entries] == ["overdue", "overdue", "overdue", "due"]
+
+    payment = PropertyPayment(property_id=prop.id, payment_date=today, amount=4500, status="paid")
+    db.session.add(payment)
+    db.session.commit()
+    statuses = [(e.status, e.amount_paid) for e in PropertyLedgerEntry.query.order_by(PropertyLedgerEntry.seq)]
+    assert statuses == [("paid", 3000), ("overdue", 1500), ("overdue", 0), ("due", 0)]
+
+    payment.status = "pending"
+    db.session.commit()
+    contract = db.session.get(PropertyLedgerContract, prop.id)
+    db.session.refresh(contract)
+    assert contract.total_paid == 0 and contract.overdue_count == 3
+
+    db.session.delete(prop)
+    db.session.commit()
+    assert PropertyLedgerEntry.query.count() == 0
+
+
+def test_nightly_batch_marks_overdue_and_moves_contracts(app):
+    today = date.today()
+    _property(today, today + timedelta(days=61), method="monthly")
+    stats = ledger.get_dashboard_stats(today)
+    assert stats["overdue_payments"] == 0 and stats["expiring_soon"] == 0
+
+    result = ledger.mark_overdue(today + timedelta(days=2))
+    assert result == {"overdue": 1, "moved": 1}
+    db.session.expire_all()
+    stats = ledger.get_dashboard_stats()
+    assert stats["overdue_payments"] == 1 and stats["pending_payments"] == 3
+    assert stats["expiring_soon"] == 1 and stats["total_annual_rent"] == 12000
+    assert db.session.query(PropertyLedgerContract.overdue_count).scalar() == 1
+
+
+def test_empty_ledger_is_built_by_one_queued_job(app):
+    today = date.today()
+    _property(today - timedelta(days=10), today + timedelta(days=350))
+    db.session.execute(delete(PropertyLedgerEntry))
+    db.session.execute(delete(PropertyLedgerContract))
+    db.session.commit()
+
+    ledger.init_property_ledger(app)
+    ledger.init_property_ledger(app)  # عملية أخرى تقلع معاً
+    [job] = BackgroundJob.query.filter_by(kind=ledger.REBUILD_JOB).all()
+    assert job.idempotency_key == ledger.REBUILD_KEY and PropertyLedgerEntry.query.count() == 0
+
+    jobs.run_job(jobs._claim_next_job("w1"))
+    assert PropertyLedgerContract.query.count() == 1 and PropertyLedgerEntry.query.count() == 4
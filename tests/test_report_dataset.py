@@ -0,0 +1,114 @@
+from datetime import date, datetime, time
+
+from sqlalchemy import event
+
+from core.cache import get_cache
+from core.extensions import db
+from models import Attendance, Department, Employee, Fee, Vehicle
+from services import report_dataset_service as reports
+
+START = date(2026, 3, 1)
+END = date(2026, 3, 31)
+
+
+def _employees():
+    sales, ops = Department(name="المبيعات"), Department(name="العمليات")
+    employees = [
+        Employee(employee_id=f"E{i}", national_id=f"10{i}", name=name, mobile="0500000000", job_title="فني",
+                 status=status)
+        for i, (name, status) in enumerate([("سالم", "active"), ("أحمد", "active"), ("خالد", "inactive")])
+    ]
+    db.session.add_all([sales, ops, *employees])
+    db.session.flush()
+    employees[0].departments.append(sales)
+    employees[1].departments.append(sales)
+    employees[2].departments.append(ops)
+    db.session.commit()
+    return (sales, ops), employees
+
+
+def _count_statements():
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    return statements
+
+
+def test_cache_key_normalizes_dates_and_ignores_filter_order():
+    key = reports._cache_key("fees", {"date_from": datetime(2026, 3, 1, 9, 30), "fee_type": "", "status": None})
+    assert key.startswith(f"{reports.DATASET_KEY_PREFIX}:fees:")
+    assert key == reports._cache_key("fees", {"status": "", "fee_type": None, "date_from": date(2026, 3, 1)})
+    assert key != reports._cache_key("fees", {"date_from": date(2026, 3, 2)})
+    assert key != reports._cache_key("vehicles", {"date_from": date(2026, 3, 1)})
+
+
+def test_payload_round_trip_keeps_column_types():
+    dataset = reports.ReportDataset(
+        "sample", (("id", reports.INT), ("day", reports.DATE), ("at", reports.TIME), ("paid", reports.BOOL)),
+        {"id": [1, 2], "day": [START, None], "at": [time(8, 15), None], "paid": [True, False]},
+        {"total": 2}, "2026-03-01T10:00:00",
+    )
+    restored = reports.ReportDataset.from_payload(dataset.to_payload())
+    assert restored == dataset and len(restored) == 2
+    assert [(r.id, r.day, r.at) for r in restored.rows()] == [(1, START, time(8, 15)), (2, None, None)]
+
+
+def test_fees_dataset_is_built_once_for_both_renderers(app):
+    db.session.add_all([
+        Fee(fee_type="تجديد", amount=100.0, due_date=date(2026, 3, 5), is_paid=True),
+        Fee(fee_type="تجديد", amount=50.0, due_date=date(2026, 3, 20)),
+        Fee(fee_type="مخالفة", amount=30.0, due_date=date(2026, 3, 10)),
+    ])
+    db.session.commit()
+
+    built = reports.build_report_dataset("fees", fee_type="تجديد", date_from=START, date_to=END)
+    assert built.column("amount") == [100.0, 50.0] and built.column("due_date") == [date(2026, 3, 5), date(2026, 3, 20)]
+    assert built.aggregates == {"count": 2, "total": 150.0, "paid": 100.0, "unpaid": 50.0}
+
+    statements = _count_statements()
+    first = reports.get_report_dataset("fees", fee_type="تجديد", date_from=START, date_to=END)
+    queries = len(statements)
+    assert queries > 0
+    second = reports.get_report_dataset("fees", date_to=END, date_from=START, fee_type="تجديد")
+    assert len(statements) == queries  # الصيغة الثانية من التخزين المؤقت
+    assert second.columns == first.columns and second.aggregates == first.aggregates
+
+
+def test_corrupt_cache_entry_is_rebuilt(app):
+    db.session.add(Vehicle(plate_number="100", make="تويوتا", model="هايلكس", year=2022, color="أبيض",
+                           type_of_car="سيارة نقل"))
+    db.session.commit()
+    get_cache().set(reports._cache_key("vehicles", {}), {"schema": "broken"}, 60)
+
+    dataset = reports.get_report_dataset("vehicles")
+    assert dataset.column("plate_number") == ["100"]
+    assert dataset.aggregates == {"total": 1, "by_status": {"available": 1}}
+
+
+def test_employee_and_attendance_datasets_filter_by_department(app):
+    (sales, ops), employees = _employees()
+    db.session.add_all([
+        Attendance(employee_id=employees[0].id, date=date(2026, 3, 2), status="present", check_in=time(8, 0)),
+        Attendance(employee_id=employees[1].id, date=date(2026, 3, 2), status="absent"),
+        Attendance(employee_id=employees[2].id, date=date(2026, 3, 2), status="present"),
+        Attendance(employee_id=employees[0].id, date=date(2026, 4, 2), status="present"),
+    ])
+    db.session.commit()
+
+    staff = reports.build_report_dataset("employees", department_id=str(sales.id))
+    assert staff.column("name") == ["سالم", "أحمد"] and staff.column("department_name") == ["المبيعات"] * 2
+    assert len(reports.build_report_dataset("employees", department_id="all")) == 3
+
+    attendance = reports.build_report_dataset("attendance", from_date=START, to_date=datetime(2026, 3, 31))
+    assert len(attendance) == 3 and attendance.column("check_in").count(time(8, 0)) == 1
+    by_name = {d["name"]: d for d in attendance.aggregates["departments"]}
+    # الموظف غير النشط خارج قائمة القسم وإحصائياته
+    assert by_name["المبيعات"]["present"] == 1 and by_name["المبيعات"]["absent"] == 1
+    assert by_name["المبيعات"]["rate"] == 50.0 and "العمليات" not in by_name
+    assert attendance.aggregates["totals"]["employees"] == 2
+
+
+def test_load_entities_keeps_dataset_order_across_chunks(app, monkeypatch):
+    _, employees = _employees()
+    monkeypatch.setattr(reports, "IN_CHUNK_SIZE", 2)
+    ids = [employees[2].id, employees[0].id, 999, employees[1].id]
+    assert [e.name for e in reports.load_entities(Employee, ids)] == ["خالد", "سالم", "أحمد"]
@@ -0,0 +1,79 @@
+import pytest
+
+from core.extensions import db
+from models import Employee
+from modules.jobs.domain.models import BackgroundJob
+from modules.search.application import search_service as search
+
+
+@pytest.fixture
+def app(app):
+    saved = dict(search._state)
+    search.init_search(app)
+    yield app
+    search._state.update(saved)
+
+
+def _employees(names):
+    db.session.add_all([
+        Employee(employee_id=f"E{i}", national_id=f"1{i:05d}", name=name, mobile="0500000000", job_title="فني")
+        for i, name in enumerate(names)
+    ])
+    db.session.commit()
+
+
+def _filtered(term):
+    return search.apply_search_filter(Employee.query, search.ENTITY_EMPLOYEE, Employee.id, term, Employee.name)
+
+
+def test_filter_is_not_truncated_and_pages_in_sql(app):
+    if not search._state["sqlite_tables"]:
+        pytest.skip("SQLite بدون FTS5")
+    _employees([f"محمد {i}" for i in range(650)] + ["سالم"])
+    search.rebuild_index()
+
+    query = _filtered("محمد")
+    assert query.count() == 650
+    page = query.order_by(Employee.id).offset(600).limit(100).all()
+    assert len(page) == 50 and all(e.name.startswith("محمد") for e in page)
+
+
+def test_filter_is_exact_without_fuzzy_matches(app):
+    _employees(["أحمد العتيبي", "خالد"])
+    search.rebuild_index()
+
+    assert [e.name for e in _filtered("احمد").all()] == ["أحمد العتيبي"]
+    assert [e.name for e in _filtered("العتي").all()] == ["أحمد العتيبي"]
+    # خطأ إملائي: البحث العام يتسامح معه، أما الفلتر فلا يوسّع النتائج
+    assert _filtered("احمط").count() == 0
+
+
+def test_empty_index_queues_one_build_and_falls_back_to_ilike(app):
+    search.init_search(app)  # عملية أخرى تقلع على نفس قاعدة البيانات
+    assert BackgroundJob.query.filter_by(kind=search.REBUILD_JOB).count() == 1
+
+    # سجل أُدرج دون فهرسة (مثل تحديث جماعي): الفهرس ما زال فارغاً فيُستخدم ilike
+    search._state["enabled"] = False
+    _employees(["Salem"])
+    search._state["enabled"] = True
+    assert not search._index_ready()
+    assert [e.name for e in _filtered("ale").all()] == ["Salem"]
+
+
+
+def test_filter_matches_inside_words_and_numbers(app):
+    db.session.add_all([
+        Employee(employee_id="E1", national_id="1098765432", name="محمد الزهراني", mobile="0551234567",
+                 job_title="فني"),
+        Employee(employee_id="E2", national_id="1011111111", name="سالم", mobile="0509999999", job_title="فني"),
+    ])
+    db.session.commit()
+    search.rebuild_index()
+    assert search._index_ready()
+
+    assert [e.name for e in _filtered("زهراني").all()] == ["محمد الزهراني"]
+    assert [e.name for e in _filtered("1234567").all()] == ["محمد الزهراني"]
+    assert [e.name for e in _filtered("876").all()] == ["محمد الزهراني"]
+    assert [e.name for e in _filtered("99").all()] == ["سالم"]  # أقصر من ثلاثية
+    assert [e.name for e in _filtered("زهراني 0551").all()] == ["محمد الزهراني"]
+    assert _filtered("زهراني 0509").count() == 0
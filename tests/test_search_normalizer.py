@@ -0,0 +1,30 @@
+from modules.search.application.arabic_normalizer import normalize_arabic, tokenize, similarity, token_similarity
+
+
+def test_strips_diacritics_and_tatweel():
+    assert normalize_arabic('مُحَمَّـــد') == 'محمد'
+
+
+def test_folds_alef_hamza_and_ta_marbuta():
+    assert normalize_arabic('أحمد إبراهيم آمنة') == 'احمد ابراهيم امنه'
+    assert normalize_arabic('مصطفى مسؤول هيئة') == 'مصطفي مسوول هييه'
+
+
+def test_converts_arabic_indic_digits():
+    assert normalize_arabic('أ ب ج ١٢٣٤') == 'ا ب ج 1234'
+    assert normalize_arabic('۱۲۳') == '123'
+
+
+def test_tokenize_dedupes_and_drops_punctuation():
+    assert tokenize('فاطمة، فاطمه - Ali') == ['فاطمه', 'ali']
+
+
+def test_similarity_tolerates_typos():
+    assert similarity('الزهراني', 'الزهرانى') == 1.0
+    assert similarity('محمد', 'محمود') > 0.3
+    assert similarity('محمد', 'سيارة') == 0.0
+
+
+def test_token_similarity_prefers_prefix_and_infix():
+    assert token_similarity('زهر', 'محمد الزهراني') == 0.9
+    assert token_similarity('محم', 'محمد الزهراني') == 1.0
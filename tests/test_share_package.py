@@ -0,0 +1,78 @@
+import io
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from flask_login import LoginManager
+
+from core.extensions import db
+from models import OperationRequest, User, Vehicle
+from routes.operations.operations_sharing_routes import operations_sharing_bp
+from services import share_package_service
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {"SHARE_PACKAGE_CACHE_DIR": str(tmp_path / "packages"), "SECRET_KEY": "test"}
+
+
+@pytest.fixture
+def app(app):
+    login_manager = LoginManager(app)
+    login_manager.request_loader(lambda request: db.session.get(User, 1))
+    app.register_blueprint(operations_sharing_bp)
+    return app
+
+
+@pytest.fixture
+def operation(app):
+    user = User(email="admin@example.com", role="admin")
+    vehicle = Vehicle(plate_number="1234 أ ب ج", make="تويوتا", model="هايلكس", year=2022, color="أبيض",
+                      type_of_car="سيارة نقل")
+    db.session.add_all([user, vehicle])
+    db.session.flush()
+    operation = OperationRequest(operation_type="handover", related_record_id=99, vehicle_id=vehicle.id,
+                                 title="تسليم", requested_by=user.id)
+    db.session.add(operation)
+    db.session.commit()
+    return operation.id
+
+
+def _download(client, url):
+    # خيط مستقل بلا app context كما في خادم WSGI: البث يكمل بعد إغلاق سياق الطلب
+    def fetch():
+        response = client.get(url)
+        try:
+            return response.status_code, response.mimetype, response.headers, response.get_data()
+        finally:
+            response.close()
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(fetch).result()
+
+
+def test_uncached_package_is_streamed_then_served_from_cache(app, operation, tmp_path):
+    client = app.test_client()
+    status, mimetype, _, streamed = _download(client, f"/operations/{operation}/share-package")
+    assert status == 200 and mimetype == "application/zip"
+
+    names = zipfile.ZipFile(io.BytesIO(streamed)).namelist()
+    assert names[0] == "تفاصيل_العملية.txt"
+    cached = list((tmp_path / "packages").glob(f"operation_{operation}_*.zip"))
+    assert len(cached) == 1 and cached[0].read_bytes() == streamed
+
+    status, _, headers, served = _download(client, f"/operations/{operation}/share-package")
+    assert status == 200 and served == streamed
+    assert "filename*=UTF-8''" in headers["Content-Disposition"]
+
+
+def test_cache_hit_skips_building_entries(app, operation, monkeypatch):
+    client = app.test_client()
+    _, _, _, streamed = _download(client, f"/operations/{operation}/share-package")
+
+    def fail(*args):
+        raise AssertionError("entries built on a cache hit")
+
+    monkeypatch.setattr(share_package_service, "build_share_entries", fail)
+    status, _, _, served = _download(client, f"/operations/{operation}/share-package")
+    assert status == 200 and served == streamed
@@ -0,0 +1,44 @@
+import time
+
+from jinja2 import DictLoader
+
+from core.cache import MemoryCache, get_cache
+from services import dashboard_snapshot_service as dashboard
+
+
+def test_memory_cache_is_bounded_and_drops_least_recently_used():
+    cache = MemoryCache(max_entries=3)
+    for key in "abc":
+        cache.set(key, key, ttl=60)
+    assert cache.get("a") == "a"  # a أصبح الأحدث استخداماً
+    cache.set("d", "d", ttl=60)
+    assert len(cache) == 3 and cache.get("b") is None
+    assert [cache.get(k) for k in "acd"] == ["a", "c", "d"]
+
+
+def test_memory_cache_sweeps_expired_keys_first():
+    cache = MemoryCache(max_entries=2)
+    cache.set("old", 1, ttl=0)
+    cache.set("live", 2, ttl=60)
+    time.sleep(0.01)
+    assert cache.add("new", 3, ttl=60)
+    assert len(cache) == 2 and cache.get("live") == 2 and cache.get("new") == 3
+
+
+def test_dashboard_fragments_reuse_one_key_per_role(app, monkeypatch):
+    app.jinja_loader = DictLoader({"fragment.html": "{{ label }}:{{ total }}"})
+    renders = []
+    render = dashboard.render_template
+    monkeypatch.setattr(dashboard, "render_template",
+                        lambda template, **context: renders.append(template) or render(template, **context))
+
+    for total in range(5):
+        snapshot = {"computed_at": f"2026-03-01T10:0{total}:00"}
+        html = dashboard.render_cached_fragment("fragment.html", "admin", snapshot, label="admin", total=total)
+        assert html == f"admin:{total}"
+        # نفس اللقطة: من التخزين المؤقت دون إعادة عرض
+        assert dashboard.render_cached_fragment("fragment.html", "admin", snapshot, label="admin",
+                                                total=-1) == f"admin:{total}"
+
+    assert len(renders) == 5
+    assert len(get_cache()) == 1
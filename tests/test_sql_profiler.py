@@ -0,0 +1,62 @@
+import pytest
+
+from core import sql_profiler
+from core.extensions import db
+from models import Department
+
+
+@pytest.fixture
+def app_config():
+    return {"SQL_PROFILE_SAMPLE_RATE": 1.0}
+
+
+@pytest.fixture
+def app(app):
+    sql_profiler.init_sql_profiler(app)
+
+    @app.route("/departments")
+    def departments():
+        ids = [d.id for d in Department.query.all()]
+        names = [db.session.get(Department, i, populate_existing=True).name for i in ids]
+        return ",".join(names)
+
+    @app.route("/plain")
+    def plain():
+        return "ok"
+
+    db.session.add_all([Department(name=f"قسم {i}") for i in range(6)])
+    db.session.commit()
+    db.session.remove()
+    sql_profiler.reset_sql_profile()
+    yield app
+    sql_profiler.reset_sql_profile()
+
+
+def test_normalize_statement_collapses_values():
+    a = sql_profiler.normalize_statement("SELECT * FROM t WHERE id IN (?, ?, ?) AND name = 'x''y' LIMIT 5")
+    b = sql_profiler.normalize_statement("SELECT * FROM t WHERE id IN (?) AND name = 'z'  LIMIT 10")
+    assert a == b == "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?"
+    assert sql_profiler.normalize_statement("SELECT x::text FROM t WHERE id = %(id_1)s") == \
+        "SELECT x::text FROM t WHERE id = ?"
+
+
+def test_server_timing_and_nplus1_detection(app):
+    client = app.test_client()
+    response = client.get("/departments")
+    assert response.status_code == 200
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("db;dur=") and '"7 queries"' in timing
+
+    assert 'desc="0 queries"' in client.get("/plain").headers["Server-Timing"]
+
+    worst = sql_profiler.get_worst_endpoints(order="nplus1")
+    assert worst[0]["endpoint"] == "GET departments"
+    assert worst[0]["nplus1_requests"] == 1 and worst[0]["max_queries"] == 7
+    assert worst[0]["nplus1_shapes"][0]["max_repeat"] == 6
+
+
+def test_disabled_profiler_adds_nothing(app):
+    app.config["SQL_PROFILE_ENABLED"] = False
+    response = app.test_client().get("/departments")
+    assert "Server-Timing" not in response.headers
+    assert sql_profiler.get_worst_endpoints() == []
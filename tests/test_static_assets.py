@@ -0,0 +1,78 @@
+import gzip
+import json
+
+import pytest
+from flask import Flask, url_for
+
+from core import static_assets
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    root = tmp_path / "static"
+    (root / "css").mkdir(parents=True)
+    (root / "fonts").mkdir()
+    (root / "uploads").mkdir()
+    (root / "fonts" / "tajawal.woff2").write_bytes(b"\x00font" * 10)
+    (root / "css" / "app.css").write_text(
+        "@font-face{src:url('../fonts/tajawal.woff2') format('woff2')}\n"
+        "body{background:url(/static/fonts/tajawal.woff2);color:#333}\n" * 60
+    )
+    (root / "uploads" / "avatar.png").write_bytes(b"png")
+    (root / "sw.js").write_text("self.addEventListener('fetch', () => {});")
+    return root
+
+
+@pytest.fixture
+def app(static_dir):
+    static_assets.build_assets(str(static_dir))
+    app = Flask(__name__, static_folder=str(static_dir))
+    static_assets.init_static_assets(app)
+    yield app
+    static_assets._activate({})
+
+
+def test_build_hashes_rewrites_css_and_precompresses(static_dir):
+    manifest = static_assets.build_assets(str(static_dir))
+    assets = manifest["assets"]
+
+    assert set(assets) == {"css/app.css", "fonts/tajawal.woff2"}  # لا رفع مستخدمين ولا service worker
+    font = assets["fonts/tajawal.woff2"]["path"]
+    css = assets["css/app.css"]
+    assert css["path"].startswith("dist/css/app.") and css["encodings"] == ["br", "gzip"]
+
+    built = (static_dir / css["path"]).read_text()
+    assert f"url('../fonts/{font.rsplit('/', 1)[1]}')" in built and f"url(/static/{font})" in built
+    assert gzip.decompress((static_dir / (css["path"] + ".gz")).read_bytes()).decode() == built
+    assert json.loads((static_dir / "dist" / "manifest.json").read_text())["assets"] == assets
+
+    # إعادة البناء بلا تغيير تعطي الأسماء نفسها
+    assert static_assets.build_assets(str(static_dir))["assets"] == assets
+
+
+def test_hashed_urls_and_precompressed_serving(app):
+    hashed = static_assets.asset_path("css/app.css")
+    with app.test_request_context():
+        assert url_for("static", filename="css/app.css") == f"/static/{hashed}"
+        assert static_assets.asset_url("css/app.css") == f"/static/{hashed}"
+        assert url_for("static", filename="sw.js") == "/static/sw.js"
+
+    client = app.test_client()
+    response = client.get(f"/static/{hashed}", headers={"Accept-Encoding": "gzip, br"})
+    assert response.headers["Content-Encoding"] == "br"
+    assert response.mimetype == "text/css"
+    assert "immutable" in response.headers["Cache-Control"]
+    assert "Accept-Encoding" in response.headers["Vary"]
+    response.close()
+
+    response = client.get(f"/static/{hashed}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    response.close()
+
+    response = client.get(f"/static/{hashed}")
+    assert "Content-Encoding" not in response.headers and b"@font-face" in response.data
+    response.close()
+
+    response = client.get("/static/sw.js")
+    assert "immutable" not in response.headers.get("Cache-Control", "")
+    response.close()
@@ -0,0 +1,77 @@
+import pytest
+from flask import abort, request
+from PIL import Image
+
+from infrastructure.storage import upload_delivery as delivery
+
+
+@pytest.fixture
+def app(app, tmp_path):
+    uploads = tmp_path / "static" / "uploads"
+    (uploads / "handovers").mkdir(parents=True)
+    (uploads / "docs.pdf").write_bytes(bytes(range(256)) * 40)
+    Image.new("RGB", (1600, 1200), (200, 30, 30)).save(uploads / "handovers" / "car.jpg")
+
+    app.static_folder = str(tmp_path / "static")
+    delivery.init_upload_delivery(app)
+
+    @app.route("/static/uploads/<path:filename>")
+    def static_uploaded_file(filename):
+        root = delivery.uploads_root()
+        path = delivery.resolve_upload(root, filename)
+        if not path:
+            abort(404)
+        return delivery.send_upload(path, root, width=request.args.get("w", type=int))
+
+    return app
+
+
+def test_strong_etag_conditional_get_and_range(app):
+    client = app.test_client()
+    response = client.get("/static/uploads/docs.pdf")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200 and not etag.startswith("W/")
+    assert response.headers["Accept-Ranges"] == "bytes" and "private" in response.headers["Cache-Control"]
+    response.close()
+
+    response = client.get("/static/uploads/docs.pdf", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    response.close()
+
+    response = client.get("/static/uploads/docs.pdf", headers={"Range": "bytes=256-511"})
+    assert response.status_code == 206 and response.data == bytes(range(256))
+    assert response.headers["Content-Range"] == "bytes 256-511/10240"
+    response.close()
+
+    assert client.get("/static/uploads/../../etc/passwd").status_code == 404
+
+
+def test_proxy_offload_modes(app):
+    client = app.test_client()
+    app.config["UPLOADS_DELIVERY_MODE"] = "x-accel"
+    response = client.get("/static/uploads/docs.pdf")
+    assert response.headers["X-Accel-Redirect"] == "/_uploads_internal/docs.pdf"
+    assert response.data == b"" and response.mimetype == "application/pdf"
+    assert client.get("/static/uploads/docs.pdf", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+
+    app.config["UPLOADS_DELIVERY_MODE"] = "x-sendfile"
+    response = client.get("/static/uploads/docs.pdf")
+    assert response.headers["X-Sendfile"].endswith("docs.pdf")
+
+
+def test_resized_variant_is_cached_on_disk(app, tmp_path):
+    client = app.test_client()
+    with app.test_request_context():
+        url = delivery.upload_url("static/uploads/handovers/car.jpg", 600)
+    assert url == "/static/uploads/handovers/car.jpg?w=640"
+
+    response = client.get(url)
+    variant = tmp_path / "static" / "uploads" / "_variants" / "w640" / "handovers" / "car.jpg"
+    assert response.status_code == 200 and variant.exists()
+    response.close()
+    with Image.open(variant) as image:
+        assert image.size == (640, 480)
+
+    mtime = variant.stat().st_mtime_ns
+    client.get(url).close()
+    assert variant.stat().st_mtime_ns == mtime  # لا يُعاد التصغير
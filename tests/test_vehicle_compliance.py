@@ -0,0 +1,100 @@
+from datetime import date, timedelta
+
+from sqlalchemy import event
+
+from core.extensions import db
+from models import BackgroundJob, Vehicle
+from modules.jobs.application import job_queue as jobs
+from modules.vehicles.application import vehicle_compliance_service as compliance
+from modules.vehicles.application.vehicle_service import get_index_context
+
+TODAY = date.today()
+
+
+def _vehicle(plate, **dates):
+    vehicle = Vehicle(plate_number=plate, make="تويوتا", model="هايلكس", year=2022, color="أبيض",
+                      type_of_car="سيارة نقل", **dates)
+    db.session.add(vehicle)
+    return vehicle
+
+
+def _walk(first, next_page):
+    """كل عناصر الصفحات بدءاً من first باتباع next_cursor."""
+    items, page, seen = [], first, 0
+    while True:
+        items.extend(page["items"])
+        seen += 1
+        assert seen < 20
+        if not page["cursor"]:
+            return items
+        page = next_page(page["cursor"])
+
+
+def test_flags_are_computed_on_save_and_refreshed_by_the_queued_job(app):
+    soon = _vehicle("100", authorization_expiry_date=TODAY + timedelta(days=1),
+                    inspection_expiry_date=TODAY + timedelta(days=40))
+    expired = _vehicle("200", inspection_expiry_date=TODAY - timedelta(days=1))
+    db.session.commit()
+    assert soon.expired_docs_mask == 0 and soon.next_expiry_date == TODAY + timedelta(days=1)
+    assert expired.expired_docs_mask == compliance.DOC_BITS["inspection"] and expired.next_expiry_date is None
+
+    later = TODAY + timedelta(days=3)
+    job = compliance.queue_compliance_refresh(later)
+    assert compliance.queue_compliance_refresh(later).id == job.id
+    job_id = job.id
+    jobs.run_job(jobs._claim_next_job("w1"))
+
+    finished = db.session.get(BackgroundJob, job_id)
+    assert finished.status == jobs.JOB_DONE and finished.result == {"changed": 1}
+    soon = Vehicle.query.filter_by(plate_number="100").one()
+    assert soon.expired_docs_mask == compliance.DOC_BITS["authorization"]
+    assert soon.next_expiry_date == TODAY + timedelta(days=40)
+
+    counts = compliance.get_compliance_counts(later)
+    assert counts["expired_authorization"] == 1 and counts["expired_inspection"] == 1
+    assert counts["expired_total"] == 2
+
+
+def test_index_context_reads_without_writing(app):
+    _vehicle("100", authorization_expiry_date=TODAY - timedelta(days=2))
+    _vehicle("200", registration_expiry_date=TODAY + timedelta(days=10))
+    db.session.commit()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(db.engine, "before_cursor_execute", listener)
+    try:
+        context = get_index_context()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", listener)
+
+    assert not [s for s in statements if s.lstrip().upper().startswith(("UPDATE", "INSERT", "DELETE"))]
+    assert BackgroundJob.query.count() == 0
+    assert [v.plate_number for v in context["expired_authorization_vehicles"]] == ["100"]
+    assert context["expired_authorization_next_cursor"] is None
+    assert [d["plate_number"] for d in context["expiring_documents"]] == ["200"]
+    assert context["compliance"]["expired_authorization"] == 1 and context["compliance"]["expiring_registration"] == 1
+
+
+def test_vehicle_list_and_expired_lists_are_keyset_paged(app):
+    plates = [f"{n:03d}" for n in range(1, 8)]
+    for plate in reversed(plates):
+        _vehicle(plate, authorization_expiry_date=TODAY - timedelta(days=int(plate)))
+    _vehicle("900")
+    db.session.commit()
+
+    def vehicles_page(cursor=None):
+        context = get_index_context(sort="plate", page_size=3, after=cursor)
+        assert len(context["vehicles"]) <= 3
+        return {"items": [v.plate_number for v in context["vehicles"]], "cursor": context["next_cursor"]}
+
+    assert _walk(vehicles_page(), vehicles_page) == plates + ["900"]
+
+    def expired_page(cursor=None):
+        context = get_index_context(page_size=3, expired_authorization_after=cursor)
+        assert len(context["expired_authorization_vehicles"]) <= 3
+        return {"items": [v.plate_number for v in context["expired_authorization_vehicles"]],
+                "cursor": context["expired_authorization_next_cursor"]}
+
+    assert _walk(expired_page(), expired_page) == plates
+    assert compliance.get_expired_vehicles("inspection").items == []
@@ -0,0 +1,96 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import delete
+
+from core.extensions import db
+from models import BackgroundJob, Employee, OperationRequest, User, Vehicle, VehicleCurrentCustody, VehicleHandover
+from modules.jobs.application import job_queue as jobs
+from modules.vehicles.application import vehicle_custody_service as custody
+from modules.vehicles.application.custody_events import register_custody_listeners
+
+
+@pytest.fixture
+def app(app):
+    if not custody._state["listeners"]:
+        register_custody_listeners()
+        custody._state["listeners"] = True
+    return app
+
+
+@pytest.fixture
+def fleet(app):
+    user = User(email="admin@example.com", role="admin")
+    vehicle = Vehicle(plate_number="1234 أ ب ج", make="تويوتا", model="هايلكس", year=2022, color="أبيض",
+                      type_of_car="سيارة نقل")
+    drivers = [Employee(employee_id=f"E{i}", national_id=f"10{i}", name=f"سائق {i}", mobile="0500000000",
+                        job_title="سائق") for i in range(2)]
+    db.session.add_all([user, vehicle, *drivers])
+    db.session.commit()
+    return user, vehicle, drivers
+
+
+def _handover(vehicle, employee, day, kind="delivery"):
+    record = VehicleHandover(vehicle_id=vehicle.id, employee_id=employee.id, person_name=employee.name,
+                             handover_type=kind, handover_date=day, mileage=1000, fuel_level="full")
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+def test_custody_follows_approved_deliveries(fleet):
+    user, vehicle, (first, second) = fleet
+    legacy = _handover(vehicle, first, date(2026, 1, 1))
+    assert custody.get_current_employee_id(vehicle.id) == first.id
+
+    pending = _handover(vehicle, second, date(2026, 2, 1))
+    request = OperationRequest(operation_type="handover", related_record_id=pending.id, vehicle_id=vehicle.id,
+                               title="تسليم", requested_by=user.id, status="pending")
+    db.session.add(request)
+    db.session.commit()
+    assert custody.get_current_employee_id(vehicle.id) == first.id
+
+    request.status = "approved"
+    db.session.commit()
+    row = custody.get_current_custody(vehicle.id)
+    assert (row.employee_id, row.handover_id, row.since) == (second.id, pending.id, date(2026, 2, 1))
+    assert [v.id for v in custody.vehicles_in_custody_of(second.id)] == [vehicle.id]
+    assert custody.vehicles_in_custody_of(first.id).count() == 0
+
+    db.session.delete(request)
+    db.session.delete(pending)
+    db.session.commit()
+    db.session.expire_all()
+    assert custody.get_current_custody(vehicle.id).handover_id == legacy.id
+
+
+def test_rebuild_matches_incremental_and_serves_lookups(fleet):
+    _, vehicle, (first, second) = fleet
+    _handover(vehicle, first, date(2026, 1, 1))
+    _handover(vehicle, first, date(2026, 1, 5), kind="return")
+    _handover(vehicle, second, date(2026, 1, 10))
+    incremental = [(r.vehicle_id, r.employee_id, r.handover_id) for r in VehicleCurrentCustody.query.all()]
+
+    assert custody.rebuild_custody() == 1
+    db.session.expire_all()
+    assert [(r.vehicle_id, r.employee_id, r.handover_id) for r in VehicleCurrentCustody.query.all()] == incremental
+    assert custody.get_current_employee_ids([vehicle.id, 999]) == {vehicle.id: second.id}
+    assert custody.get_current_drivers() == {vehicle.id: second.name}
+    [(vehicle_id, name, employee)] = custody.get_current_driver_employees()
+    assert (vehicle_id, employee.id) == (vehicle.id, second.id)
+
+
+def test_empty_custody_is_built_by_one_queued_job(app, fleet):
+    _, vehicle, (first, _) = fleet
+    _handover(vehicle, first, date(2026, 1, 1))
+    vehicle_id, employee_id = vehicle.id, first.id  # run_job يغلق الجلسة
+    db.session.execute(delete(VehicleCurrentCustody))
+    db.session.commit()
+
+    custody.init_vehicle_custody(app)
+    custody.init_vehicle_custody(app)  # عملية أخرى تقلع معاً
+    [job] = BackgroundJob.query.filter_by(kind=custody.REBUILD_JOB).all()
+    assert job.idempotency_key == custody.REBUILD_KEY and custody.get_current_employee_id(vehicle_id) is None
+
+    jobs.run_job(jobs._claim_next_job("w1"))
+    assert custody.get_current_employee_id(vehicle_id) == employee_id
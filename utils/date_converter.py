@@ -1,6 +1,7 @@
 import re
 from datetime import datetime
-from hijri_converter import convert
+
+from utils.hijri_table import from_hijri, hijri_filter
 
 def parse_date(date_str):
     """
@@ -35,12 +36,10 @@ def parse_date(date_str):
         match = re.search(pattern, date_str)
         if match:
             day, month, year = map(int, match.groups())
-            try:
-                # Convert Hijri to Gregorian
-                gregorian_date = convert.Hijri(year, month, day).to_gregorian()
-                return gregorian_date.date()
-            except ValueError:
-                pass
+            # Convert Hijri to Gregorian (None if invalid or out of range)
+            gregorian_date = from_hijri(year, month, day)
+            if gregorian_date:
+                return gregorian_date
     
     # If all parsing attempts fail, raise error
     raise ValueError(f"Could not parse date: {date_str}")
@@ -55,14 +54,7 @@ def format_date_hijri(date):
     Returns:
         String in format DD/MM/YYYY هـ
     """
-    if not date:
-        return ''
-    
-    try:
-        hijri_date = convert.Gregorian(date.year, date.month, date.day).to_hijri()
-        return f"{hijri_date.day}/{hijri_date.month}/{hijri_date.year} هـ"
-    except ValueError:
-        return ''
+    return hijri_filter(date)
 
 def format_date_gregorian(date):
     """
@@ -2,8 +2,11 @@
 دالة التصدير مع داش بورد خيالي لنظام الحضور
 """
 from io import BytesIO
-from datetime import timedelta
-import xlsxwriter
+from datetime import date
+
+import numpy as np
+
+from modules.attendance.application import attendance_export_engine as engine
 
 
 def export_attendance_by_department_with_dashboard(employees, attendances, start_date, end_date=None):
@@ -12,7 +15,7 @@ def export_attendance_by_department_with_dashboard(employees, attendances, start
     
     Args:
         employees: قائمة بجميع الموظفين
-        attendances: قائمة بسجلات الحضور
+        attendances: AttendanceFrame من stream_attendance أو قائمة بسجلات الحضور
         start_date: تاريخ البداية
         end_date: تاريخ النهاية
     
@@ -21,7 +24,8 @@ def export_attendance_by_department_with_dashboard(employees, attendances, start
     """
     try:
         output = BytesIO()
-        workbook = xlsxwriter.Workbook(output)
+        # constant_memory: صفوف كل ورقة تُكتب بالترتيب وتُفرغ للقرص فور انتهائها
+        workbook = engine.new_workbook(output)
         
         # تحديد الفترة الزمنية
         if end_date is None:
@@ -96,12 +100,6 @@ def export_attendance_by_department_with_dashboard(employees, attendances, start
             'valign': 'vcenter'
         })
         
-        normal_format = workbook.add_format({
-            'border': 1,
-            'align': 'center',
-            'valign': 'vcenter'
-        })
-        
         absent_row_format = workbook.add_format({
             'border': 1,
             'align': 'center',
@@ -110,71 +108,52 @@ def export_attendance_by_department_with_dashboard(employees, attendances, start
         })
         
         # ========== حساب الإحصائيات العامة ==========
-        attendance_data = {}
-        for att in attendances:
-            emp_id = att.employee_id
-            if emp_id not in attendance_data:
-                attendance_data[emp_id] = {}
-            attendance_data[emp_id][att.date] = att.status
-        
-        total_present = sum(1 for att in attendances if att.status == 'present')
-        total_absent = sum(1 for att in attendances if att.status == 'absent')
-        total_leave = sum(1 for att in attendances if att.status == 'leave')
-        total_sick = sum(1 for att in attendances if att.status == 'sick')
-        total_records = len(attendances)
+        frame = engine.as_frame(attendances)
+        date_list = engine.date_range(start_date, end_date)
+        day_ordinals = [d.toordinal() for d in date_list]
+
+        totals = engine.status_counts(frame.codes)
+        total_present = int(totals[engine.CODE_PRESENT])
+        total_absent = int(totals[engine.CODE_ABSENT])
+        total_leave = int(totals[engine.CODE_LEAVE])
+        total_sick = int(totals[engine.CODE_SICK])
+        total_records = len(frame.codes)
         
         # حساب نسبة الحضور
         attendance_rate = (total_present / total_records * 100) if total_records > 0 else 0
         
         # تنظيم الموظفين حسب الأقسام
-        departments = {}
-        for employee in employees:
-            dept_name = ', '.join([dept.name for dept in employee.departments]) if employee.departments else 'بدون قسم'
-            if dept_name not in departments:
-                departments[dept_name] = []
-            departments[dept_name].append(employee)
-        
-        # حساب إحصائيات كل قسم
+        departments = dict(sorted(engine.group_by_department(employees).items()))
+        
+        # حساب إحصائيات كل قسم (عدّ كل الحالات لكل الأقسام في تمريرة واحدة)
+        dept_of_employee = {
+            emp.id: position
+            for position, dept_employees in enumerate(departments.values())
+            for emp in dept_employees
+        }
+        dept_counts = engine.grouped_status_counts(frame, dept_of_employee, len(departments))
         dept_stats = []
-        for dept_name, dept_employees in sorted(departments.items()):
-            emp_ids = [emp.id for emp in dept_employees]
-            dept_attendances = [att for att in attendances if att.employee_id in emp_ids]
-            
-            dept_present = sum(1 for att in dept_attendances if att.status == 'present')
-            dept_absent = sum(1 for att in dept_attendances if att.status == 'absent')
-            dept_leave = sum(1 for att in dept_attendances if att.status == 'leave')
-            dept_sick = sum(1 for att in dept_attendances if att.status == 'sick')
-            dept_total = len(dept_attendances)
+        for (dept_name, dept_employees), counts in zip(departments.items(), dept_counts):
+            dept_present = int(counts[engine.CODE_PRESENT])
+            dept_total = int(counts.sum())
             dept_rate = (dept_present / dept_total * 100) if dept_total > 0 else 0
             
             dept_stats.append({
                 'name': dept_name,
                 'employees': len(dept_employees),
                 'present': dept_present,
-                'absent': dept_absent,
-                'leave': dept_leave,
-                'sick': dept_sick,
+                'absent': int(counts[engine.CODE_ABSENT]),
+                'leave': int(counts[engine.CODE_LEAVE]),
+                'sick': int(counts[engine.CODE_SICK]),
                 'total': dept_total,
                 'rate': dept_rate
             })
         
         # حساب الحضور اليومي للرسم الخطي
-        date_list = []
-        current_date = start_date
-        while current_date <= end_date:
-            date_list.append(current_date)
-            current_date += timedelta(days=1)
-        
-        daily_stats = []
-        for date in date_list:
-            day_attendances = [att for att in attendances if att.date == date]
-            day_present = sum(1 for att in day_attendances if att.status == 'present')
-            day_absent = sum(1 for att in day_attendances if att.status == 'absent')
-            daily_stats.append({
-                'date': date,
-                'present': day_present,
-                'absent': day_absent
-            })
+        daily_stats = [
+            {'date': day, 'present': int(counts[engine.CODE_PRESENT]), 'absent': int(counts[engine.CODE_ABSENT])}
+            for day, counts in zip(date_list, engine.daily_status_counts(frame, day_ordinals))
+        ]
         
         # ========== إنشاء ورقة بيانات احترافية للرسوم البيانية ==========
         chart_data = workbook.add_worksheet('ChartData')
@@ -222,67 +201,54 @@ def export_attendance_by_department_with_dashboard(employees, attendances, start
             'bold': True
         })
         
+        chart_data.set_column('A:A', 20)
+        chart_data.set_column('B:B', 15)
+        chart_data.set_column('D:D', 25)
+        chart_data.set_column('E:H', 12)
+        chart_data.set_column('J:J', 15)
+        chart_data.set_column('K:L', 12)
+        
         # العنوان الرئيسي
         chart_data.merge_range('A1:L1', 'بيانات الرسوم البيانية والإحصائيات', title_format)
         chart_data.set_row(0, 40)
         
-        # ========== القسم الأول: توزيع الحضور ==========
+        # عناوين الأقسام الثلاثة: توزيع الحضور، إحصائيات الأقسام، التطور اليومي
         chart_data.merge_range('A3:B3', '📊 توزيع الحضور والغياب', section_title_format)
-        chart_data.set_row(2, 30)
-        
-        chart_data.write('A4', 'الحالة', data_header_format)
-        chart_data.write('B4', 'العدد', data_header_format)
-        
-        chart_data.write('A5', '✅ حاضر', data_cell_format)
-        chart_data.write('B5', total_present, success_cell_format)
-        
-        chart_data.write('A6', '❌ غائب', data_cell_format)
-        chart_data.write('B6', total_absent, danger_cell_format)
-        
-        chart_data.write('A7', '🏖️ إجازة', data_cell_format)
-        chart_data.write('B7', total_leave, data_cell_format)
-        
-        chart_data.write('A8', '🏥 مرضي', data_cell_format)
-        chart_data.write('B8', total_sick, data_cell_format)
-        
-        chart_data.set_column('A:A', 20)
-        chart_data.set_column('B:B', 15)
-        
-        # ========== القسم الثاني: إحصائيات الأقسام ==========
         chart_data.merge_range('D3:H3', '📋 إحصائيات الأقسام التفصيلية', section_title_format)
-        chart_data.set_row(2, 30)
-        
-        chart_data.write('D4', 'القسم', data_header_format)
-        chart_data.write('E4', 'حضور ✅', data_header_format)
-        chart_data.write('F4', 'غياب ❌', data_header_format)
-        chart_data.write('G4', 'إجازات 🏖️', data_header_format)
-        chart_data.write('H4', 'مرضي 🏥', data_header_format)
-        
-        for idx, dept in enumerate(dept_stats[:10], start=5):  # أول 10 أقسام
-            chart_data.write(f'D{idx}', dept['name'], data_cell_format)
-            chart_data.write(f'E{idx}', dept['present'], success_cell_format)
-            chart_data.write(f'F{idx}', dept['absent'], danger_cell_format)
-            chart_data.write(f'G{idx}', dept['leave'], data_cell_format)
-            chart_data.write(f'H{idx}', dept['sick'], data_cell_format)
-        
-        chart_data.set_column('D:D', 25)
-        chart_data.set_column('E:H', 12)
-        
-        # ========== القسم الثالث: التطور اليومي ==========
         chart_data.merge_range('J3:L3', '📅 التطور اليومي', section_title_format)
         chart_data.set_row(2, 30)
         
-        chart_data.write('J4', 'التاريخ', data_header_format)
-        chart_data.write('K4', 'حضور ✅', data_header_format)
-        chart_data.write('L4', 'غياب ❌', data_header_format)
-        
-        for idx, day_stat in enumerate(daily_stats, start=5):
-            chart_data.write(f'J{idx}', day_stat['date'].strftime('%Y-%m-%d'), data_cell_format)
-            chart_data.write(f'K{idx}', day_stat['present'], success_cell_format)
-            chart_data.write(f'L{idx}', day_stat['absent'], danger_cell_format)
-        
-        chart_data.set_column('J:J', 15)
-        chart_data.set_column('K:L', 12)
+        for col, header in (('A', 'الحالة'), ('B', 'العدد'), ('D', 'القسم'), ('E', 'حضور ✅'), ('F', 'غياب ❌'),
+                            ('G', 'إجازات 🏖️'), ('H', 'مرضي 🏥'), ('J', 'التاريخ'), ('K', 'حضور ✅'),
+                            ('L', 'غياب ❌')):
+            chart_data.write(f'{col}4', header, data_header_format)
+        
+        # الأقسام الثلاثة متجاورة؛ تُكتب صفاً صفاً لأن الملف في وضع constant_memory
+        status_rows = [
+            ('✅ حاضر', total_present, success_cell_format),
+            ('❌ غائب', total_absent, danger_cell_format),
+            ('🏖️ إجازة', total_leave, data_cell_format),
+            ('🏥 مرضي', total_sick, data_cell_format),
+        ]
+        top_departments = dept_stats[:10]  # أول 10 أقسام
+        for offset in range(max(len(status_rows), len(top_departments), len(daily_stats))):
+            idx = offset + 5
+            if offset < len(status_rows):
+                label, value, value_format = status_rows[offset]
+                chart_data.write(f'A{idx}', label, data_cell_format)
+                chart_data.write(f'B{idx}', value, value_format)
+            if offset < len(top_departments):
+                dept = top_departments[offset]
+                chart_data.write(f'D{idx}', dept['name'], data_cell_format)
+                chart_data.write(f'E{idx}', dept['present'], success_cell_format)
+                chart_data.write(f'F{idx}', dept['absent'], danger_cell_format)
+                chart_data.write(f'G{idx}', dept['leave'], data_cell_format)
+                chart_data.write(f'H{idx}', dept['sick'], data_cell_format)
+            if offset < len(daily_stats):
+                day_stat = daily_stats[offset]
+                chart_data.write(f'J{idx}', day_stat['date'].strftime('%Y-%m-%d'), data_cell_format)
+                chart_data.write(f'K{idx}', day_stat['present'], success_cell_format)
+                chart_data.write(f'L{idx}', day_stat['absent'], danger_cell_format)
         
         # ========== إنشاء ورقة الداش بورد ==========
         dashboard = workbook.add_worksheet('📊 لوحة المعلومات')
@@ -516,25 +482,24 @@ def export_attendance_by_department_with_dashboard(employees, attendances, start
         for col, header in enumerate(headers[:6]):
             dashboard.write(row-1, col, header, header_format)
         
-        # جمع جميع حالات الغياب
+        # أحدث 100 حالة غياب/إجازة/مرضي لموظفي التقرير (ترتيب تنازلي بالتاريخ)
+        employees_by_id = {emp.id: emp for emp in employees}
+        status_ar = {engine.CODE_ABSENT: '❌ غياب', engine.CODE_LEAVE: '🏖️ إجازة', engine.CODE_SICK: '🏥 مرضي'}
+        positions = np.flatnonzero(
+            np.isin(frame.codes, list(status_ar)) & np.isin(frame.employee_ids, list(employees_by_id))
+        )
+        positions = positions[np.argsort(-frame.ordinals[positions], kind='stable')][:100]
         absent_records = []
-        for att in attendances:
-            if att.status in ['absent', 'leave', 'sick']:
-                emp = next((e for e in employees if e.id == att.employee_id), None)
-                if emp:
-                    dept_name = ', '.join([d.name for d in emp.departments]) if emp.departments else 'بدون قسم'
-                    status_ar = {'absent': '❌ غياب', 'leave': '🏖️ إجازة', 'sick': '🏥 مرضي'}
-                    absent_records.append({
-                        'date': att.date,
-                        'name': emp.name,
-                        'emp_id': emp.employee_id,
-                        'dept': dept_name,
-                        'job': emp.job_title or '-',
-                        'status': status_ar.get(att.status, att.status)
-                    })
-        
-        # ترتيب حسب التاريخ
-        absent_records.sort(key=lambda x: x['date'], reverse=True)
+        for position in positions.tolist():
+            emp = employees_by_id[int(frame.employee_ids[position])]
+            absent_records.append({
+                'date': date.fromordinal(int(frame.ordinals[position])),
+                'name': emp.name,
+                'emp_id': emp.employee_id,
+                'dept': engine.department_name(emp),
+                'job': emp.job_title or '-',
+                'status': status_ar[int(frame.codes[position])]
+            })
         
         # كتابة سجلات الغياب
         for record in absent_records[:100]:  # أول 100 سجل
@@ -558,162 +523,34 @@ def export_attendance_by_department_with_dashboard(employees, attendances, start
         dashboard.set_column('I:L', 12)
         
         # ========== إضافة أوراق الأقسام ==========
-        # تنسيقات للأقسام
-        date_header_format = workbook.add_format({
-            'bold': True,
-            'bg_color': '#00B0B0',
-            'font_color': 'white',
-            'border': 1,
-            'align': 'center',
-            'valign': 'vcenter',
-            'text_wrap': True
-        })
-        
-        right_aligned_format = workbook.add_format({
-            'border': 1,
-            'align': 'right',
-            'valign': 'vcenter'
-        })
-        
-        present_format = workbook.add_format({
-            'border': 1,
-            'align': 'center',
-            'valign': 'vcenter',
-            'bold': True,
-            'font_color': '#006100'
-        })
-        
-        absent_format = workbook.add_format({
-            'border': 1,
-            'align': 'center',
-            'valign': 'vcenter',
-            'bold': True,
-            'font_color': '#FF0000'
-        })
-        
-        leave_format = workbook.add_format({
-            'border': 1,
-            'align': 'center',
-            'valign': 'vcenter',
-            'font_color': '#FF9900'
-        })
-        
-        sick_format = workbook.add_format({
-            'border': 1,
-            'align': 'center',
-            'valign': 'vcenter',
-            'font_color': '#0070C0'
-        })
-        
-        weekdays = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
+        # تنسيقات مصفوفة الحضور مسجلة مرة ومشتركة بين كل خلايا أوراق الأقسام
+        matrix_formats = engine.register_formats(workbook, engine.MATRIX_FORMATS)
+        col_headers = ["Name", "ID Number", "Emp. No.", "Job Title", "No. Mobile", "Car", "Location", "Project", "Total"]
+        widths = [30, 15, 12, 20, 15, 10, 15, 15, 10]
         
         # إنشاء ورقة لكل قسم
-        for dept_name, dept_employees in sorted(departments.items()):
-            sheet_name = dept_name[:31]
-            worksheet = workbook.add_worksheet(sheet_name)
-            
-            col_headers = ["Name", "ID Number", "Emp. No.", "Job Title", "No. Mobile", "Car", "Location", "Project", "Total"]
-            
-            for col_idx, header in enumerate(col_headers):
-                worksheet.write(1, col_idx, header, header_format)
-            
-            first_date_col = len(col_headers)
-            
-            for col_idx, date in enumerate(date_list):
-                day_of_week = weekdays[date.weekday()]
-                date_str = date.strftime("%d/%m/%Y")
-                day_header = f"{day_of_week}\n{date_str}"
-                col = first_date_col + col_idx
-                worksheet.write(0, col, day_header, date_header_format)
-            
-            worksheet.set_column(0, 0, 30)
-            worksheet.set_column(1, 1, 15)
-            worksheet.set_column(2, 2, 12)
-            worksheet.set_column(3, 3, 20)
-            worksheet.set_column(4, 4, 15)
-            worksheet.set_column(5, 5, 10)
-            worksheet.set_column(6, 6, 15)
-            worksheet.set_column(7, 7, 15)
-            worksheet.set_column(8, 8, 10)
-            
-            for col_idx in range(len(date_list)):
-                col = first_date_col + col_idx
-                worksheet.set_column(col, col, 4)
-            
-            worksheet.set_row(0, 30)
-            worksheet.set_row(1, 20)
-            
-            row = 2
-            for employee in dept_employees:
-                worksheet.write(row, 0, employee.name, right_aligned_format)
-                worksheet.write(row, 1, employee.national_id or '', normal_format)
-                worksheet.write(row, 2, employee.employee_id, normal_format)
-                worksheet.write(row, 3, employee.job_title or '', right_aligned_format)
-                worksheet.write(row, 4, employee.mobile or '', normal_format)
-                worksheet.write(row, 5, '', normal_format)
-                worksheet.write(row, 6, '', normal_format)
-                worksheet.write(row, 7, employee.project or '', right_aligned_format)
-                
-                present_days = 0
-                for col_idx, date in enumerate(date_list):
-                    col = first_date_col + col_idx
-                    
-                    if employee.id in attendance_data and date in attendance_data[employee.id]:
-                        status = attendance_data[employee.id][date]
-                        if status == 'present':
-                            cell_value = "P"
-                            cell_format = present_format
-                            present_days += 1
-                        elif status == 'absent':
-                            cell_value = "A"
-                            cell_format = absent_format
-                        elif status == 'leave':
-                            cell_value = "L"
-                            cell_format = leave_format
-                        elif status == 'sick':
-                            cell_value = "S"
-                            cell_format = sick_format
-                    else:
-                        # إذا لم يكن هناك سجل حضور، يعتبر غائب وليس حاضر
-                        cell_value = "A"
-                        cell_format = absent_format
-                    
-                    worksheet.write(row, col, cell_value, cell_format)
-                
-                worksheet.write(row, 8, present_days, normal_format)
-                row += 1
+        for dept_name, dept_employees in departments.items():
+            # إذا لم يكن هناك سجل حضور، يعتبر غائب وليس حاضر
+            matrix = engine.pivot_matrix(frame, [emp.id for emp in dept_employees], day_ordinals,
+                                         missing=engine.CODE_ABSENT)
+            info_rows = [
+                [
+                    (employee.name, 'right'),
+                    (employee.national_id or '', 'normal'),
+                    (employee.employee_id, 'normal'),
+                    (employee.job_title or '', 'right'),
+                    (employee.mobile or '', 'normal'),
+                    ('', 'normal'),
+                    ('', 'normal'),
+                    (employee.project or '', 'right'),
+                ]
+                for employee in dept_employees
+            ]
+            engine.write_matrix_sheet(workbook, matrix_formats, dept_name[:31], col_headers, widths, info_rows,
+                                      date_list, matrix, day_width=4, rtl=False, header_height=20)
         
         # ورقة دليل الرموز
-        legend_sheet = workbook.add_worksheet('دليل الرموز')
-        
-        title_format2 = workbook.add_format({
-            'bold': True,
-            'font_size': 14,
-            'align': 'center',
-            'valign': 'vcenter'
-        })
-        
-        description_format = workbook.add_format({
-            'align': 'right',
-            'valign': 'vcenter',
-            'text_wrap': True
-        })
-        
-        legend_sheet.merge_range('A1:B1', 'دليل رموز الحضور والغياب', title_format2)
-        legend_sheet.set_column(0, 0, 10)
-        legend_sheet.set_column(1, 1, 40)
-        
-        legend_sheet.write(2, 0, 'P', present_format)
-        legend_sheet.write(2, 1, 'حاضر (Present)', description_format)
-        
-        legend_sheet.write(3, 0, 'A', absent_format)
-        legend_sheet.write(3, 1, 'غائب (Absent)', description_format)
-        
-        legend_sheet.write(4, 0, 'L', leave_format)
-        legend_sheet.write(4, 1, 'إجازة (Leave)', description_format)
-        
-        legend_sheet.write(5, 0, 'S', sick_format)
-        legend_sheet.write(5, 1, 'مرضي (Sick Leave)', description_format)
+        engine.write_legend(workbook, matrix_formats)
         
         workbook.close()
         output.seek(0)
@@ -4,6 +4,8 @@
 """
 import os
 import json
+import mimetypes
+import threading
 import requests
 from datetime import datetime
 from typing import Optional, Dict, List
@@ -11,6 +13,10 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive']
+UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024  # مضاعف 256KB كما يشترط Drive
+UPLOAD_CHUNK_RETRIES = 3
+
 
 class GoogleDriveService:
     """خدمة رفع الملفات إلى Google Drive"""
@@ -22,6 +28,7 @@ class GoogleDriveService:
         self.root_folder_id = "1AvaKUW2VKb9t4O4Dwo_KXTntBfDQ1IYe"  # مجلد "نُظم" الرئيسي (Shared Drive)
         self.shared_drive_id = "1AvaKUW2VKb9t4O4Dwo_KXTntBfDQ1IYe"  # Shared Drive ID (نفس المجلد الرئيسي)
         self.requests_folder_id = "1AvaKUW2VKb9t4O4Dwo_KXTntBfDQ1IYe"  # مجلد طلبات الموظفين (نفس المجلد الرئيسي)
+        self._local = threading.local()
         
     def _load_credentials(self) -> Optional[Dict]:
         """تحميل بيانات الاعتماد من المتغيرات البيئية أو ملف"""
@@ -78,31 +85,37 @@ class GoogleDriveService:
             logger.error(f"خطأ في المصادقة: {e}")
             return False
     
-    def _get_or_create_folder(self, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
-        """الحصول على مجلد أو إنشاؤه إذا لم يكن موجوداً - مع دعم Shared Drive"""
-        try:
+    def _api(self):
+        """خدمة Drive API مبنية مرة واحدة لكل خيط (كائنات googleapiclient غير آمنة بين الخيوط)"""
+        service = getattr(self._local, 'service', None)
+        if service is None:
             from google.oauth2 import service_account
             from googleapiclient.discovery import build
-            
-            # إنشاء الـ credentials مع الصلاحيات الكاملة
-            SCOPES = [
-                'https://www.googleapis.com/auth/drive'  # صلاحيات كاملة
-            ]
+
             credentials = service_account.Credentials.from_service_account_info(
-                self.credentials, scopes=SCOPES
+                self.credentials, scopes=DRIVE_SCOPES
             )
-            
-            # إنشاء خدمة Drive
-            service = build('drive', 'v3', credentials=credentials)
-            
+            service = build('drive', 'v3', credentials=credentials, cache_discovery=False)
+            self._local.service = service
+        return service
+
+    def _get_or_create_folder(self, folder_name: str, parent_id: Optional[str] = None) -> Optional[str]:
+        """الحصول على مجلد أو إنشاؤه - المعرف يُحفظ في drive_folder_cache فلا يتكرر استعلام Drive"""
+        from modules.drive_sync.application.folder_cache import cached_folder
+
+        return cached_folder(parent_id or self.shared_drive_id, folder_name, self.find_or_create_folder)
+
+    def find_or_create_folder(self, folder_name: str, parent_id: str) -> Optional[str]:
+        """البحث عن المجلد في Drive أو إنشاؤه - مع دعم Shared Drive"""
+        try:
+            service = self._api()
+            escaped_name = folder_name.replace("\\", "\\\\").replace("'", "\\'")
+
             # البحث عن المجلد مع دعم Shared Drive
-            query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-            if parent_id:
-                query += f" and '{parent_id}' in parents"
-            else:
-                query += f" and '{self.shared_drive_id}' in parents"
-            
-            # البحث مع دعم كامل للـ Shared Drive
+            query = (
+                f"name='{escaped_name}' and mimeType='application/vnd.google-apps.folder' "
+                f"and trashed=false and '{parent_id}' in parents"
+            )
             results = service.files().list(
                 q=query,
                 fields="files(id, name)",
@@ -111,28 +124,28 @@ class GoogleDriveService:
                 corpora='drive',  # ✅ مهم جداً لـ Shared Drive
                 driveId=self.shared_drive_id  # ✅ مطلوب عند استخدام corpora='drive'
             ).execute()
-            
+
             files = results.get('files', [])
             if files:
                 logger.info(f"OK وجد المجلد الموجود: {folder_name}")
                 return files[0]['id']
-            
+
             # إنشاء المجلد إذا لم يكن موجوداً
             file_metadata = {
                 'name': folder_name,
                 'mimeType': 'application/vnd.google-apps.folder',
-                'parents': [parent_id if parent_id else self.shared_drive_id]
+                'parents': [parent_id]
             }
-            
+
             folder = service.files().create(
                 body=file_metadata,
                 fields='id',
                 supportsAllDrives=True  # ✅ مهم للكتابة على Shared Drive
             ).execute()
-            
+
             logger.info(f"OK تم إنشاء المجلد: {folder_name} (ID: {folder.get('id')})")
             return folder.get('id')
-                
+
         except Exception as e:
             logger.error(f"ERROR خطأ في إنشاء/الحصول على المجلد {folder_name}: {e}")
             return None
@@ -145,87 +158,44 @@ class GoogleDriveService:
         self.root_folder_id = self.shared_drive_id
         return self.root_folder_id
     
+    def stream_upload(self, file_path: str, folder_id: str, custom_name: Optional[str] = None) -> Dict:
+        """رفع ملف بطريقة resumable يُقرأ من القرص على دفعات UPLOAD_CHUNK_SIZE - يرفع الاستثناءات للمستدعي"""
+        from googleapiclient.http import MediaFileUpload
+
+        file_name = custom_name or os.path.basename(file_path)
+        mimetype = mimetypes.guess_type(file_name)[0] or 'application/octet-stream'
+        logger.info(f"⏳ جاري رفع ملف بحجم {os.path.getsize(file_path)} بايت: {file_path}")
+
+        media = MediaFileUpload(file_path, mimetype=mimetype, resumable=True, chunksize=UPLOAD_CHUNK_SIZE)
+        request = self._api().files().create(
+            body={'name': file_name, 'parents': [folder_id]},
+            media_body=media,
+            fields='id,name,webViewLink,webContentLink',
+            supportsAllDrives=True  # ✅ مهم للـ Shared Drive
+        )
+
+        response = None
+        while response is None:
+            # next_chunk يعيد محاولة الدفعة الحالية فقط عند أخطاء الشبكة/5xx
+            status, response = request.next_chunk(num_retries=UPLOAD_CHUNK_RETRIES)
+            if status:
+                logger.info(f"⏳ تم رفع {int(status.progress() * 100)}% من {file_name}")
+
+        logger.info(f"OK تم رفع الملف بنجاح: {file_name} (ID: {response.get('id')})")
+        return {
+            'file_id': response.get('id'),
+            'file_name': response.get('name'),
+            'web_view_link': response.get('webViewLink'),
+            'download_link': response.get('webContentLink')
+        }
+
     def upload_file(self, file_path: str, folder_id: str, custom_name: Optional[str] = None) -> Optional[Dict]:
         """رفع ملف إلى Google Drive Shared Drive مع الصلاحيات الكاملة"""
+        if not os.path.exists(file_path):
+            logger.error(f"الملف غير موجود: {file_path}")
+            return None
         try:
-            from google.oauth2 import service_account
-            from googleapiclient.discovery import build
-            from googleapiclient.http import MediaIoBaseUpload
-            import io
-            
-            # التحقق من وجود الملف وحجمه
-            if not os.path.exists(file_path):
-                logger.error(f"الملف غير موجود: {file_path}")
-                return None
-            
-            file_size = os.path.getsize(file_path)
-            logger.info(f"⏳ جاري رفع ملف بحجم {file_size} بايت: {file_path}")
-            
-            if file_size == 0:
-                logger.warning(f"WARN تحذير: الملف فارغ: {file_path}")
-            
-            # قراءة الملف بالكامل في الذاكرة
-            with open(file_path, 'rb') as f:
-                file_content = f.read()
-            
-            logger.info(f"OK تم قراءة الملف: {len(file_content)} بايت")
-            
-            # إنشاء الـ credentials مع الصلاحيات الكاملة
-            SCOPES = ['https://www.googleapis.com/auth/drive']  # صلاحيات كاملة
-            credentials = service_account.Credentials.from_service_account_info(
-                self.credentials, scopes=SCOPES
-            )
-            
-            # إنشاء خدمة Drive
-            service = build('drive', 'v3', credentials=credentials)
-            
-            # اسم الملف
-            file_name = custom_name or os.path.basename(file_path)
-            
-            # metadata للملف
-            file_metadata = {
-                'name': file_name,
-                'parents': [folder_id]
-            }
-            
-            # تحويل البيانات إلى BytesIO لرفعها
-            file_stream = io.BytesIO(file_content)
-            media = MediaIoBaseUpload(file_stream, mimetype='application/octet-stream', resumable=True, chunksize=1024*1024*5)
-            
-            request = service.files().create(
-                body=file_metadata,
-                media_body=media,
-                fields='id,name,webViewLink,webContentLink',
-                supportsAllDrives=True  # ✅ مهم للـ Shared Drive
-            )
-            
-            # إكمال الرفع مع تتبع التقدم
-            response = None
-            retry_count = 0
-            max_retries = 3
-            
-            while response is None and retry_count < max_retries:
-                try:
-                    status, response = request.next_chunk()
-                    if status:
-                        progress_pct = int(status.progress() * 100)
-                        logger.info(f"⏳ تم رفع {progress_pct}% من {file_name}")
-                    retry_count = 0  # إعادة تعيين العداد عند النجاح
-                except Exception as e:
-                    retry_count += 1
-                    if retry_count >= max_retries:
-                        logger.error(f"ERROR فشل الرفع بعد {max_retries} محاولات: {str(e)[:100]}")
-                        return None
-                    logger.warning(f"WARN خطأ في الرفع، إعادة محاولة {retry_count}: {str(e)[:100]}")
-            
-            logger.info(f"OK تم رفع الملف بنجاح: {file_name} (ID: {response.get('id')})")
-            return {
-                'file_id': response.get('id'),
-                'file_name': response.get('name'),
-                'web_view_link': response.get('webViewLink'),
-                'download_link': response.get('webContentLink')
-            }
-                
+            return self.stream_upload(file_path, folder_id, custom_name)
         except Exception as e:
             logger.error(f"ERROR خطأ في رفع الملف {file_path}: {str(e)[:200]}", exc_info=False)
             return None
@@ -1,10 +1,12 @@
 """
 دوال تحويل التواريخ بين التقويم الميلادي والهجري
+(التحويل من جدول utils.hijri_table المحسوب مسبقاً؛ كائن Hijri يُعاد كما كان للتوافق)
 """
 
-from datetime import date
 from hijri_converter import convert
 
+from utils.hijri_table import from_hijri, to_hijri
+
 def convert_gregorian_to_hijri(gregorian_date):
     """
     تحويل تاريخ من التقويم الميلادي إلى التقويم الهجري
@@ -18,20 +20,11 @@ def convert_gregorian_to_hijri(gregorian_date):
     if not gregorian_date:
         return None
     
-    # إذا كان التاريخ من نوع datetime، استخرج الجزء date منه
-    if hasattr(gregorian_date, 'date'):
-        gregorian_date = gregorian_date.date()
-    
-    try:
-        hijri_date = convert.Gregorian(
-            gregorian_date.year, 
-            gregorian_date.month, 
-            gregorian_date.day
-        ).to_hijri()
-        return hijri_date
-    except Exception as e:
-        print(f"خطأ في تحويل التاريخ الميلادي إلى هجري: {str(e)}")
+    hijri_date = to_hijri(gregorian_date)
+    if hijri_date is None:
+        print(f"خطأ في تحويل التاريخ الميلادي إلى هجري: التاريخ {gregorian_date} خارج النطاق المدعوم")
         return None
+    return convert.Hijri(*hijri_date, validate=False)
 
 def convert_hijri_to_gregorian(hijri_year, hijri_month, hijri_day):
     """
@@ -45,16 +38,10 @@ def convert_hijri_to_gregorian(hijri_year, hijri_month, hijri_day):
     Returns:
         كائن datetime.date يمثل التاريخ الميلادي
     """
-    try:
-        gregorian_date = convert.Hijri(
-            hijri_year, 
-            hijri_month, 
-            hijri_day
-        ).to_gregorian()
-        return date(gregorian_date.year, gregorian_date.month, gregorian_date.day)
-    except Exception as e:
-        print(f"خطأ في تحويل التاريخ الهجري إلى ميلادي: {str(e)}")
-        return None
+    gregorian_date = from_hijri(hijri_year, hijri_month, hijri_day)
+    if gregorian_date is None:
+        print(f"خطأ في تحويل التاريخ الهجري إلى ميلادي: {hijri_day}/{hijri_month}/{hijri_year} غير صالح أو خارج النطاق")
+    return gregorian_date
 
 def format_hijri_date(hijri_date, format_type='full'):
     """
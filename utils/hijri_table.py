@@ -0,0 +1,158 @@
+"""
+جدول التحويل الميلادي ↔ الهجري (أم القرى) محسوب مسبقاً لكل يوم في النطاق المدعوم.
+- يُبنى مرة في العملية من بدايات الأشهر في hijri_converter.ummalqura (نحو 56 ألف يوم، بضع مئات KB)،
+  فتحويل تاريخ = فهرسة مصفوفة بـ (ordinal - أول يوم) بدل إنشاء كائن Gregorian/Hijri.
+- to_hijri / from_hijri لتاريخ واحد؛ to_hijri_array و hijri_strings لقوائم التواريخ ومصفوفات numpy
+  وأعمدة pandas (التقارير والتصدير)، مع تنسيق كل تاريخ مختلف مرة واحدة فقط.
+- خارج النطاق (1343–1500 هـ / 1924-08-01 – 2077-11-16) أو القيم الفارغة: None أو نص فارغ.
+"""
+import threading
+from array import array
+from collections import namedtuple
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+from hijri_converter import ummalqura
+
+HijriDate = namedtuple("HijriDate", "year month day")
+
+HIJRI_MONTHS_AR = (
+    "محرم", "صفر", "ربيع الأول", "ربيع الثاني", "جمادى الأولى", "جمادى الآخرة",
+    "رجب", "شعبان", "رمضان", "شوال", "ذو القعدة", "ذو الحجة",
+)
+FORMAT_SHORT = "short"  # 5/9/1447 هـ (كما في format_date_hijri)
+FORMAT_FULL = "full"  # 5 رمضان 1447 هـ
+FORMAT_ISO = "iso"  # 1447-09-05
+
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_MISSING = -1
+
+_table = {}
+_lock = threading.Lock()
+
+
+def _build() -> dict:
+    # بدايات الأشهر أيام جوليانية مختصرة (RJD)؛ الفرق بينها وبين ordinal ثابت نأخذه من أول يوم مدعوم
+    starts = np.asarray(ummalqura.MONTH_STARTS, dtype=np.int64)
+    first_ordinal = date(*ummalqura.GREGORIAN_RANGE[0]).toordinal()
+    lengths = np.diff(starts)
+    months = np.arange(len(lengths)) + ummalqura.HIJRI_OFFSET  # أشهر منذ بداية التقويم الهجري
+    offsets = starts[:-1] - starts[0]
+    day_month = np.repeat(np.arange(len(lengths)), lengths)
+    years = (months[day_month] // 12 + 1).astype(np.int16)
+    month_numbers = (months[day_month] % 12 + 1).astype(np.int8)
+    days = (np.arange(len(day_month)) - offsets[day_month] + 1).astype(np.int8)
+    return {
+        "first_ordinal": first_ordinal,
+        "month_ordinals": (offsets + first_ordinal).tolist(),
+        "month_lengths": lengths.tolist(),
+        "years": years,
+        "months": month_numbers,
+        "days": days,
+        # YYYYMMDD لكل يوم: فهرسة array.array تعيد int مباشرة، أسرع من عناصر numpy لتاريخ واحد
+        "packed": array("l", (years.astype(np.int64) * 10000 + month_numbers.astype(np.int64) * 100 + days).tolist()),
+    }
+
+
+def table() -> dict:
+    if not _table:
+        with _lock:
+            if not _table:
+                _table.update(_build())
+    return _table
+
+
+def supported_range() -> Tuple[date, date]:
+    t = table()
+    return date.fromordinal(t["first_ordinal"]), date.fromordinal(t["first_ordinal"] + len(t["days"]) - 1)
+
+
+# ==================== تاريخ واحد ====================
+
+def to_hijri(value) -> Optional[HijriDate]:
+    """HijriDate لتاريخ أو datetime، أو None للقيم الفارغة وخارج النطاق."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    t = table()
+    index = value.toordinal() - t["first_ordinal"]
+    if not 0 <= index < len(t["packed"]):
+        return None
+    packed = t["packed"][index]
+    return HijriDate(packed // 10000, packed // 100 % 100, packed % 100)
+
+
+def from_hijri(year: int, month: int, day: int) -> Optional[date]:
+    """التاريخ الميلادي لتاريخ هجري، أو None إن كان غير صالح أو خارج النطاق."""
+    t = table()
+    index = (year - 1) * 12 + month - 1 - ummalqura.HIJRI_OFFSET
+    if not 1 <= month <= 12 or not 0 <= index < len(t["month_lengths"]):
+        return None
+    if not 1 <= day <= t["month_lengths"][index]:
+        return None
+    return date.fromordinal(t["month_ordinals"][index] + day - 1)
+
+
+def format_hijri(hijri: Optional[HijriDate], fmt: str = FORMAT_SHORT) -> str:
+    if not hijri:
+        return ""
+    year, month, day = hijri
+    if fmt == FORMAT_ISO:
+        return f"{year:04d}-{month:02d}-{day:02d}"
+    if fmt == FORMAT_FULL:
+        return f"{day} {HIJRI_MONTHS_AR[month - 1]} {year} هـ"
+    return f"{day}/{month}/{year} هـ"
+
+
+def hijri_filter(value, fmt: str = FORMAT_SHORT) -> str:
+    """فلتر القوالب: {{ document.expiry_date|hijri }} أو |hijri('full')."""
+    return format_hijri(to_hijri(value), fmt)
+
+
+# ==================== مصفوفات ====================
+
+def _ordinals(values) -> np.ndarray:
+    """ordinal لكل قيمة (MISSING للفارغ و NaT)؛ مصفوفات datetime64 وأعمدة pandas تُحوّل دون حلقة."""
+    array = np.asarray(values)
+    if array.dtype.kind == "M":
+        days = array.astype("datetime64[D]")
+        result = days.astype(np.int64) + _EPOCH_ORDINAL
+        result[np.isnat(days)] = _MISSING
+        return result
+    result = np.full(len(array), _MISSING, dtype=np.int64)
+    for i, value in enumerate(array.tolist()):
+        if value is not None and value == value and hasattr(value, "toordinal"):  # value == value يستبعد NaN و NaT
+            result[i] = value.toordinal()
+    return result
+
+
+def _lookup(ordinals: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    t = table()
+    index = ordinals - t["first_ordinal"]
+    valid = (index >= 0) & (index < len(t["days"]))
+    safe = np.where(valid, index, 0)
+    return (
+        np.where(valid, t["years"][safe], 0),
+        np.where(valid, t["months"][safe], 0),
+        np.where(valid, t["days"][safe], 0),
+    )
+
+
+def to_hijri_array(values) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(السنوات، الأشهر، الأيام) كمصفوفات؛ 0 للقيم الفارغة وخارج النطاق."""
+    return _lookup(_ordinals(values))
+
+
+def hijri_strings(values, fmt: str = FORMAT_SHORT) -> List[str]:
+    """نص هجري لكل قيمة بترتيبها؛ كل يوم مختلف يُنسق مرة واحدة مهما تكرر."""
+    ordinals = _ordinals(values)
+    if not len(ordinals):
+        return []
+    unique, inverse = np.unique(ordinals, return_inverse=True)
+    labels = [
+        format_hijri(HijriDate(int(y), int(m), int(d)), fmt) if y else ""
+        for y, m, d in zip(*_lookup(unique))
+    ]
+    return [labels[i] for i in inverse.ravel()]
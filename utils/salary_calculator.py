@@ -5,6 +5,7 @@
 from datetime import datetime, timedelta
 import os
 from models import Attendance, Employee
+from modules.business_calendar.application.business_calendar_service import calendar_for_employee
 from calendar import monthrange
 
 
@@ -158,6 +159,11 @@ def get_attendance_statistics(employee_id, month, year):
         recorded_days = len(attendances)
         unrecorded_days = total_days - recorded_days
         
+        # أيام العمل والعطل الرسمية من تقويم العمل المشترك (نفس أرقام الإجازات والرواتب)
+        calendar = calendar_for_employee(employee_id)
+        business_days = calendar.working_days(first_day, last_day)
+        holiday_days = len(calendar.holidays_between(first_day, last_day))
+        
         return {
             'total_days': total_days,
             'present_days': present_days,
@@ -165,6 +171,8 @@ def get_attendance_statistics(employee_id, month, year):
             'leave_days': leave_days,
             'sick_days': sick_days,
             'unrecorded_days': unrecorded_days,  # للمعلومات فقط
+            'business_days': business_days,  # أيام العمل حسب تقويم قسم الموظف
+            'holiday_days': holiday_days,  # العطل الرسمية الواقعة على أيام عمل
             'working_days': present_days,
             'total_absent': absent_days  # نخصم الغياب الصريح فقط
         }
@@ -1,246 +1,182 @@
 """
 نظام الرفع التلقائي لملفات السيارات إلى Google Drive
-يعمل في الخلفية دون التأثير على العمليات الحالية
+يضع ملفات العملية في طابور الرفع (drive_uploads) ويعود فوراً؛ الرفع نفسه تنفذه مهمة خلفية
 """
 import os
-import json
 import logging
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from utils.google_drive_service import drive_service
 
 logger = logging.getLogger(__name__)
 
+UPLOADS_ROOT = 'static/uploads'
+
+
+def _local_or_storage(path: str) -> str:
+    """المسار المحلي إن وُجد، وإلا مفتاح التخزين السحابي ليُحمّل داخل مهمة الرفع"""
+    from modules.drive_sync.application.drive_sync import STORAGE_PREFIX
+
+    local_path = path if path.startswith(UPLOADS_ROOT) else os.path.join(UPLOADS_ROOT, path)
+    if os.path.exists(local_path):
+        return local_path
+    return f"{STORAGE_PREFIX}{path}"
+
 
 class VehicleDriveUploader:
     """مدير الرفع التلقائي لملفات السيارات"""
-    
+
+    @staticmethod
+    def _load(model, record):
+        """بعض المستدعين يمررون المعرف بدل الكائن"""
+        if isinstance(record, int):
+            from models import db
+            return db.session.get(model, record)
+        return record
+
+    @staticmethod
+    def _queue(record, record_type: str, plate_number: str, operation_type: str,
+               operation_date, files: List[Tuple[str, str]]):
+        """وضع ملفات العملية في طابور الرفع وتعليم السجل pending"""
+        from modules.drive_sync.application.drive_sync import queue_record_upload
+
+        if operation_date is None:
+            operation_date = datetime.now()
+        segments = [plate_number or "غير_معروف", operation_type, operation_date.strftime("%Y-%m-%d_%H-%M-%S")]
+        record.drive_upload_status = 'pending'
+        job = queue_record_upload(record_type, record.id, segments, files)
+        if job is None:
+            # لا ملفات جديدة: الحالة تبقى كما كانت بعد آخر رفع
+            record.drive_upload_status = 'success' if record.drive_folder_id else None
+        logger.info(f"تمت جدولة رفع {record_type} {record.id} إلى Google Drive ({len(files)} ملف)")
+        return job
+
     @staticmethod
     def upload_workshop_record(workshop_record, pdf_path: Optional[str] = None):
         """
-        رفع سجل ورشة إلى Google Drive
-        
+        جدولة رفع سجل ورشة إلى Google Drive
+
         Args:
-            workshop_record: كائن VehicleWorkshop
+            workshop_record: كائن VehicleWorkshop أو معرفه
             pdf_path: مسار ملف PDF الإيصال (اختياري)
         """
         if not drive_service.is_configured():
             logger.info("Google Drive غير مكوّن - تم تخطي الرفع")
             return
-        
+
+        from models import VehicleWorkshop
+        workshop_record = VehicleDriveUploader._load(VehicleWorkshop, workshop_record)
+        if workshop_record is None:
+            return
+
         try:
-            # جمع بيانات العملية
             vehicle = workshop_record.vehicle
             plate_number = vehicle.plate_number if vehicle else "غير_معروف"
-            
-            # تحديد نوع العملية
-            operation_type = "سجلات الورش"
-            
-            # جمع الصور
-            image_paths = []
+
+            files = []
+            if pdf_path and os.path.exists(pdf_path):
+                files.append(('pdf', pdf_path))
             for img in workshop_record.images:
-                img_path = os.path.join('static/uploads', img.image_path)
+                img_path = os.path.join(UPLOADS_ROOT, img.image_path)
                 if os.path.exists(img_path):
-                    image_paths.append(img_path)
-            
-            # رفع إلى Google Drive
-            result = drive_service.upload_vehicle_operation(
-                vehicle_plate=plate_number,
-                operation_type=operation_type,
-                pdf_path=pdf_path,
-                image_paths=image_paths if image_paths else None,
-                operation_date=workshop_record.entry_date
+                    files.append(('image', img_path))
+
+            return VehicleDriveUploader._queue(
+                workshop_record, 'vehicle_workshop', plate_number, "سجلات الورش",
+                workshop_record.entry_date, files
             )
-            
-            if result:
-                # تحديث السجل بروابط Google Drive
-                workshop_record.drive_folder_id = result.get('folder_id')
-                if result.get('pdf_info'):
-                    workshop_record.drive_pdf_link = result['pdf_info'].get('web_view_link')
-                
-                if result.get('images_info'):
-                    workshop_record.drive_images_links = json.dumps([
-                        img.get('web_view_link') for img in result['images_info']
-                    ])
-                
-                workshop_record.drive_upload_status = 'success'
-                workshop_record.drive_uploaded_at = datetime.utcnow()
-                
-                logger.info(f"تم رفع سجل الورشة {workshop_record.id} بنجاح")
-            else:
-                workshop_record.drive_upload_status = 'failed'
-                
         except Exception as e:
-            logger.error(f"خطأ في رفع سجل الورشة: {e}")
+            logger.error(f"خطأ في جدولة رفع سجل الورشة: {e}")
             workshop_record.drive_upload_status = 'failed'
-    
+
     @staticmethod
     def upload_handover_record(handover_record, pdf_path: Optional[str] = None):
         """
-        رفع سجل تسليم/استلام إلى Google Drive
-        
+        جدولة رفع سجل تسليم/استلام إلى Google Drive
+
         Args:
-            handover_record: كائن VehicleHandover
+            handover_record: كائن VehicleHandover أو معرفه
             pdf_path: مسار ملف PDF الإيصال (اختياري)
         """
         if not drive_service.is_configured():
             logger.info("Google Drive غير مكوّن - تم تخطي الرفع")
             return
-        
+
+        from models import VehicleHandover
+        handover_record = VehicleDriveUploader._load(VehicleHandover, handover_record)
+        if handover_record is None:
+            return
+
         try:
-            # جمع بيانات العملية
             vehicle = handover_record.vehicle
             plate_number = handover_record.vehicle_plate_number or (vehicle.plate_number if vehicle else "غير_معروف")
-            
-            # تحديد نوع العملية
+
             if handover_record.handover_type == 'delivery':
                 operation_type = "عمليات التسليم"
             else:
                 operation_type = "عمليات الاستلام"
-            
-            # جمع الصور
-            image_paths = []
+
+            files = []
+            if pdf_path and os.path.exists(pdf_path):
+                files.append(('pdf', pdf_path))
             for img in handover_record.images:
                 img_path = img.get_path()
-                full_path = os.path.join('static/uploads', img_path) if img_path else None
+                full_path = os.path.join(UPLOADS_ROOT, img_path) if img_path else None
                 if full_path and os.path.exists(full_path):
-                    image_paths.append(full_path)
-            
-            # رفع إلى Google Drive
-            result = drive_service.upload_vehicle_operation(
-                vehicle_plate=plate_number,
-                operation_type=operation_type,
-                pdf_path=pdf_path,
-                image_paths=image_paths if image_paths else None,
-                operation_date=handover_record.handover_date
+                    files.append(('image', full_path))
+
+            return VehicleDriveUploader._queue(
+                handover_record, 'vehicle_handover', plate_number, operation_type,
+                handover_record.handover_date, files
             )
-            
-            if result:
-                # تحديث السجل بروابط Google Drive
-                handover_record.drive_folder_id = result.get('folder_id')
-                if result.get('pdf_info'):
-                    handover_record.drive_pdf_link = result['pdf_info'].get('web_view_link')
-                
-                if result.get('images_info'):
-                    handover_record.drive_images_links = json.dumps([
-                        img.get('web_view_link') for img in result['images_info']
-                    ])
-                
-                handover_record.drive_upload_status = 'success'
-                handover_record.drive_uploaded_at = datetime.utcnow()
-                
-                logger.info(f"تم رفع سجل التسليم/الاستلام {handover_record.id} بنجاح")
-            else:
-                handover_record.drive_upload_status = 'failed'
-                
         except Exception as e:
-            logger.error(f"خطأ في رفع سجل التسليم/الاستلام: {e}")
+            logger.error(f"خطأ في جدولة رفع سجل التسليم/الاستلام: {e}")
             handover_record.drive_upload_status = 'failed'
-    
+
+    # الاسم المستخدم في مسارات التسليم
+    upload_handover_operation = upload_handover_record
+
     @staticmethod
     def upload_safety_check(safety_check, pdf_path: Optional[str] = None):
         """
-        رفع فحص سلامة خارجي إلى Google Drive
-        
+        جدولة رفع فحص سلامة خارجي إلى Google Drive
+        الصور غير الموجودة محلياً تُحمّل من Object Storage داخل مهمة الرفع لا أثناء الطلب
+
         Args:
-            safety_check: كائن VehicleExternalSafetyCheck
+            safety_check: كائن VehicleExternalSafetyCheck أو معرفه
             pdf_path: مسار ملف PDF الفحص (اختياري)
         """
         if not drive_service.is_configured():
             logger.info("Google Drive غير مكوّن - تم تخطي الرفع")
             return
-        
+
+        from models import VehicleExternalSafetyCheck
+        safety_check = VehicleDriveUploader._load(VehicleExternalSafetyCheck, safety_check)
+        if safety_check is None:
+            return
+
         try:
-            from utils.storage_helper import download_image
-            import tempfile
-            
-            # جمع بيانات العملية
-            plate_number = safety_check.vehicle_plate_number
-            
-            # نوع العملية
-            operation_type = "فحوصات السلامة"
-            
-            # جمع الصور
-            image_paths = []
-            for img in safety_check.safety_images:
-                if not img.image_path:
-                    continue
-                
-                # إصلاح المسار - لا نضيف static/uploads إذا كانت موجودة بالفعل
-                img_path = img.image_path
-                if not img_path.startswith('static/uploads'):
-                    img_path = os.path.join('static/uploads', img_path)
-                
-                # البحث عن الملف محلياً أولاً
-                if os.path.exists(img_path):
-                    image_paths.append(img_path)
-                    logger.info(f"تم العثور على صورة محلياً: {img_path}")
+            files = []
+            if pdf_path and os.path.exists(pdf_path):
+                files.append(('pdf', pdf_path))
+            elif safety_check.pdf_file_path:
+                stored_pdf = safety_check.pdf_file_path
+                local_pdf = stored_pdf if stored_pdf.startswith(UPLOADS_ROOT) else os.path.join(UPLOADS_ROOT, stored_pdf)
+                if os.path.exists(local_pdf):
+                    files.append(('pdf', local_pdf))
                 else:
-                    # محاولة تحميل الصورة من Object Storage وحفظها مؤقتاً
-                    try:
-                        image_data = download_image(img.image_path)
-                        if image_data:
-                            # إنشاء ملف مؤقت
-                            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp:
-                                tmp.write(image_data)
-                                tmp_path = tmp.name
-                            image_paths.append(tmp_path)
-                            logger.info(f"تم تحميل صورة من Object Storage: {img.image_path}")
-                        else:
-                            logger.warning(f"لم يتم العثور على صورة: {img.image_path}")
-                    except Exception as e:
-                        logger.warning(f"خطأ في تحميل صورة {img.image_path}: {e}")
-            
-            # استخدام ملف PDF الموجود إذا لم يتم توفير واحد
-            if not pdf_path and safety_check.pdf_file_path:
-                pdf_path = safety_check.pdf_file_path
-                if not pdf_path.startswith('static/uploads'):
-                    pdf_path = os.path.join('static/uploads', pdf_path)
-                
-                if not os.path.exists(pdf_path):
-                    logger.warning(f"ملف PDF غير موجود: {pdf_path}")
-                    pdf_path = None
-            
-            logger.info(f"جاري رفع فحص السلامة {safety_check.id} - {len(image_paths)} صورة، PDF: {pdf_path is not None}")
-            
-            # رفع إلى Google Drive
-            result = drive_service.upload_vehicle_operation(
-                vehicle_plate=plate_number,
-                operation_type=operation_type,
-                pdf_path=pdf_path,
-                image_paths=image_paths if image_paths else None,
-                operation_date=safety_check.inspection_date
+                    logger.warning(f"ملف PDF غير موجود: {local_pdf}")
+
+            for img in safety_check.safety_images:
+                if img.image_path:
+                    files.append(('image', _local_or_storage(img.image_path)))
+
+            return VehicleDriveUploader._queue(
+                safety_check, 'vehicle_safety', safety_check.vehicle_plate_number, "فحوصات السلامة",
+                safety_check.inspection_date, files
             )
-            
-            # تنظيف الملفات المؤقتة
-            for img_path in image_paths:
-                if img_path.startswith('/tmp'):
-                    try:
-                        os.remove(img_path)
-                    except:
-                        pass
-            
-            if result:
-                # تحديث السجل بروابط Google Drive
-                safety_check.drive_folder_id = result.get('folder_id')
-                if result.get('pdf_info'):
-                    safety_check.drive_pdf_link = result['pdf_info'].get('web_view_link')
-                
-                if result.get('images_info'):
-                    safety_check.drive_images_links = json.dumps([
-                        img.get('web_view_link') for img in result['images_info']
-                    ])
-                
-                safety_check.drive_upload_status = 'success'
-                safety_check.drive_uploaded_at = datetime.utcnow()
-                
-                logger.info(f"تم رفع فحص السلامة {safety_check.id} بنجاح - Folder ID: {result.get('folder_id')}")
-            else:
-                safety_check.drive_upload_status = 'failed'
-                logger.warning(f"فشل رفع فحص السلامة {safety_check.id} - لم يتم استلام نتيجة من Google Drive")
-                
         except Exception as e:
-            logger.error(f"خطأ في رفع فحص السلامة: {e}", exc_info=True)
+            logger.error(f"خطأ في جدولة رفع فحص السلامة: {e}", exc_info=True)
             safety_check.drive_upload_status = 'failed'
 
 
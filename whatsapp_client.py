@@ -5,6 +5,8 @@ import requests
 import json
 from dotenv import load_dotenv
 
+from core.http_client import get_http_client
+
 # تحميل متغيرات البيئة من ملف .env
 load_dotenv()
 
@@ -40,7 +42,7 @@ class WhatsAppWrapper:
         """
         url = f"{self.base_url}/messages"
         try:
-            response = requests.post(url, headers=self.headers, data=json.dumps(payload))
+            response = get_http_client("whatsapp").post(url, headers=self.headers, data=json.dumps(payload))
             response.raise_for_status()  # يثير استثناء إذا كان هناك خطأ في الطلب (e.g., 4xx or 5xx)
             return response.json()
         except requests.exceptions.RequestException as e: